@@ -7,10 +7,32 @@ GaiYa每日进度条 - AI Client
 import json
 import logging
 import os
+import time
 import requests
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional
 from PySide6.QtWidgets import QMessageBox
 
+from gaiya.core.ai_stream import IncrementalTaskParser, iter_sse_events
+from gaiya.core.http_pool import get_http_pool
+
+
+# 部分结果回调: on_partial({"text": 已接收全文, "delta": 本次片段, "tasks": [...]})
+PartialCallback = Callable[[Dict], None]
+
+
+class _StreamedResponse:
+    """流式请求的最终结果，接口与requests.Response保持一致(status_code/json()/text)"""
+
+    def __init__(self, status_code: int, payload: Optional[Dict], text: str = ""):
+        self.status_code = status_code
+        self._payload = payload
+        self.text = text if text else json.dumps(payload or {}, ensure_ascii=False)
+
+    def json(self) -> Dict:
+        if self._payload is None:
+            raise ValueError("流式响应未包含JSON结果")
+        return self._payload
+
 
 class GaiyaAIClient:
     """GaiYa每日进度条 - AI功能客户端"""
@@ -34,12 +56,14 @@ class GaiyaAIClient:
         self.user_id = user_id
         self.user_tier = "free"  # 默认免费版
         self.timeout = 300  # ✅ P1-1.6: API请求超时时间（秒）- 从60秒延长到5分钟
+        # 流式模式下的读超时是两个数据片段之间的最长间隔，而不是整次生成的时长
+        self.stream_idle_timeout = 60
+        self.partial_interval = 0.1  # 文本片段回调的最小间隔（秒）
         self.service_type = "cloud"  # 云端服务
 
-        # ✅ P1-1.5: 使用Session以确保代理设置持久化(与AuthClient保持一致)
-        self.session = requests.Session()
-        self.session.proxies = {}  # 显式禁用代理
-        self.session.trust_env = False  # 禁止读取环境变量
+        # ✅ P1-1.5: 与AuthClient共用连接池(长连接、代理与SSL配置一致, 不读取环境变量代理)
+        self._http = get_http_pool()
+        self.session = self._http.session
 
         # 清除环境变量(防御性措施,但Session已不依赖此)
         for env_var in ['HTTP_PROXY', 'HTTPS_PROXY', 'http_proxy', 'https_proxy']:
@@ -51,13 +75,15 @@ class GaiyaAIClient:
         if tier in ["free", "pro"]:
             self.user_tier = tier
 
-    def plan_tasks(self, user_input: str, parent_widget=None) -> Optional[Dict]:
+    def plan_tasks(self, user_input: str, parent_widget=None,
+                   on_partial: Optional[PartialCallback] = None) -> Optional[Dict]:
         """
         调用任务规划API
 
         Args:
             user_input: 用户的自然语言输入
             parent_widget: 父窗口(用于显示对话框)
+            on_partial: 部分结果回调(传入时使用流式模式，每解析出一个完整任务回调一次)
 
         Returns:
             {"tasks": [...], "quota_info": {...}} 或 None(如果失败)
@@ -69,14 +95,16 @@ class GaiyaAIClient:
             logging.info(f"[AI API] 发起请求: {api_url}")
             logging.info(f"[AI API] 请求参数: user_id={self.user_id}, user_tier={self.user_tier}, input_length={len(user_input)}")
 
-            response = self.session.post(
+            response = self._post(
                 api_url,
-                json={
+                {
                     "user_id": self.user_id,
                     "input": user_input,
                     "user_tier": self.user_tier
                 },
-                timeout=self.timeout
+                self.timeout,
+                on_partial,
+                task_parser=IncrementalTaskParser() if on_partial else None
             )
 
             logging.info(f"[AI API] 响应状态码: {response.status_code}")
@@ -126,26 +154,29 @@ class GaiyaAIClient:
             self._show_error_dialog(error_msg, parent_widget)
             return None
 
-    def generate_weekly_report(self, statistics: Dict, parent_widget=None) -> Optional[str]:
+    def generate_weekly_report(self, statistics: Dict, parent_widget=None,
+                               on_partial: Optional[PartialCallback] = None) -> Optional[str]:
         """
         生成周报
 
         Args:
             statistics: 统计数据字典
             parent_widget: 父窗口
+            on_partial: 部分结果回调(传入时使用流式模式)
 
         Returns:
             Markdown格式的周报文本 或 None
         """
         try:
-            response = self.session.post(
+            response = self._post(
                 f"{self.backend_url}/api/generate-weekly-report",
-                json={
+                {
                     "user_id": self.user_id,
                     "statistics": statistics,
                     "user_tier": self.user_tier
                 },
-                timeout=self.timeout
+                self.timeout,
+                on_partial
             )
 
             if response.status_code == 403:
@@ -168,7 +199,8 @@ class GaiyaAIClient:
             self._show_error_dialog(f"发生错误: {str(e)}", parent_widget)
             return None
 
-    def chat_query(self, query: str, context: Dict, parent_widget=None) -> Optional[str]:
+    def chat_query(self, query: str, context: Dict, parent_widget=None,
+                   on_partial: Optional[PartialCallback] = None) -> Optional[str]:
         """
         对话查询
 
@@ -176,20 +208,22 @@ class GaiyaAIClient:
             query: 用户问题
             context: 统计数据上下文
             parent_widget: 父窗口
+            on_partial: 部分结果回调(传入时使用流式模式)
 
         Returns:
             AI回答 或 None
         """
         try:
-            response = self.session.post(
+            response = self._post(
                 f"{self.backend_url}/api/chat-query",
-                json={
+                {
                     "user_id": self.user_id,
                     "query": query,
                     "context": context,
                     "user_tier": self.user_tier
                 },
-                timeout=self.timeout
+                self.timeout,
+                on_partial
             )
 
             if response.status_code == 403:
@@ -221,7 +255,7 @@ class GaiyaAIClient:
         """
         try:
             # Vercel冷启动可能需要10-15秒，使用较长的超时时间
-            response = self.session.get(
+            response = self._http.get(
                 f"{self.backend_url}/api/quota-status",
                 params={
                     "user_id": self.user_id,
@@ -240,7 +274,8 @@ class GaiyaAIClient:
             logging.debug(f"[AI Client] 配额查询失败: {e}")
             return None
 
-    def analyze_task_completion(self, date: str, task_completions: List[Dict], parent_widget=None) -> Optional[str]:
+    def analyze_task_completion(self, date: str, task_completions: List[Dict], parent_widget=None,
+                                on_partial: Optional[PartialCallback] = None) -> Optional[str]:
         """
         分析任务完成情况
 
@@ -248,21 +283,23 @@ class GaiyaAIClient:
             date: 日期 (YYYY-MM-DD)
             task_completions: 任务完成数据列表
             parent_widget: 父窗口
+            on_partial: 部分结果回调(传入时使用流式模式)
 
         Returns:
             AI分析文本 或 None
         """
         try:
             # AI分析需要更长的超时时间(后端可能重试多次)
-            response = self.session.post(
+            response = self._post(
                 f"{self.backend_url}/api/analyze-task-completion",
-                json={
+                {
                     "user_id": self.user_id,
                     "date": date,
                     "task_completions": task_completions,
                     "user_tier": self.user_tier
                 },
-                timeout=150  # 增加到150秒,确保后端有足够时间重试
+                150,  # 增加到150秒,确保后端有足够时间重试
+                on_partial
             )
 
             # 检查响应状态
@@ -332,6 +369,71 @@ class GaiyaAIClient:
             self._show_error_dialog(f"发生错误: {str(e)}", parent_widget)
             return None
 
+    def _post(self, url: str, payload: Dict, timeout: float,
+              on_partial: Optional[PartialCallback] = None,
+              task_parser: Optional[IncrementalTaskParser] = None):
+        """
+        发送AI请求
+
+        未传入on_partial时等价于session.post；传入时请求SSE流式响应，
+        边接收边回调部分结果，返回与requests.Response接口一致的最终结果。
+        后端不支持流式(返回普通JSON)时自动按非流式处理。
+        """
+        if on_partial is None:
+            return self.session.post(url, json=payload, timeout=timeout)
+
+        response = self.session.post(
+            url,
+            json=dict(payload, stream=True),
+            headers={"Accept": "text/event-stream"},
+            timeout=(min(timeout, 30), self.stream_idle_timeout),
+            stream=True
+        )
+
+        content_type = response.headers.get("Content-Type", "")
+        if "text/event-stream" not in content_type:
+            return response
+
+        text = ""
+        last_emit = 0.0
+
+        try:
+            for event, data in iter_sse_events(response.iter_lines(decode_unicode=True)):
+                try:
+                    message = json.loads(data)
+                except json.JSONDecodeError:
+                    logging.warning(f"[AI API] 无法解析流式事件: {data[:100]}")
+                    continue
+
+                if event == "delta":
+                    delta = message.get("text", "")
+                    text += delta
+                    new_tasks = task_parser.feed(delta) if task_parser else []
+
+                    now = time.monotonic()
+                    if task_parser is not None:
+                        # 任务规划只在解析出新任务(或收到首个片段)时回调
+                        should_emit = bool(new_tasks) or last_emit == 0.0
+                    else:
+                        should_emit = now - last_emit >= self.partial_interval
+                    if should_emit:
+                        last_emit = now
+                        partial = {"text": text, "delta": delta}
+                        if task_parser is not None:
+                            partial["tasks"] = list(task_parser.tasks)
+                            partial["new_tasks"] = new_tasks
+                        on_partial(partial)
+
+                elif event == "done":
+                    return _StreamedResponse(200, message)
+                elif event == "error":
+                    return _StreamedResponse(message.pop("status", 500), message)
+        finally:
+            response.close()
+
+        # 流在done事件之前断开
+        raise requests.exceptions.ConnectionError("流式响应在完成前中断")
+
     def check_backend_health(self) -> bool:
         """
         检查后端服务器健康状态
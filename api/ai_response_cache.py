@@ -0,0 +1,433 @@
+"""
+AI响应缓存 - 内容寻址的上游模型响应缓存
+
+特性：
+- 缓存键 = 端点 + 规范化后的请求体（模型、消息、参数）的SHA256
+- 可插拔存储：内存（默认）、SQLite（/tmp，同一实例的多次调用共享）、Supabase表（跨实例共享）
+- 每个端点独立的TTL
+- 单飞（single-flight）：同一实例内相同的并发请求只调用一次上游
+- 配额策略：缓存命中时是否扣除配额（例如客户端超时重试不重复扣费）
+- 流式：传入on_delta时以流式调用上游，逐片段回调，结束后照常写入缓存
+
+使用示例:
+    from ai_response_cache import get_ai_response_cache
+
+    ai_cache = get_ai_response_cache()
+    if not ai_cache.is_free_hit("plan_tasks", api_request_body, user_id):
+        ...  # 检查配额
+    result = ai_cache.chat_completion("plan_tasks", api_url, TUZI_API_KEY, api_request_body,
+                                      timeout=240, user_id=user_id)
+    if result.status_code == 200 and result.charge_quota:
+        quota_manager.use_quota(user_id, "daily_plan", 1)
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import requests
+
+from ai_stream import stream_chat_completion
+
+
+# 各端点缓存有效期（秒），可通过环境变量 AI_CACHE_TTL_<ENDPOINT> 覆盖
+ENDPOINT_TTLS = {
+    "plan_tasks": 600,               # 10分钟：覆盖客户端超时重试
+    "generate_weekly_report": 3600,  # 同一份周统计的报告
+    "chat_query": 300,
+    "recommend_theme": 3600,
+    "generate_theme": 3600,
+}
+
+# 缓存命中时的配额策略
+#   free      - 命中不扣配额
+#   same_user - 同一用户命中不扣配额（重试），其他用户命中照常扣除
+#   always    - 命中照常扣配额（只节省上游调用时间）
+QUOTA_POLICY_FREE = "free"
+QUOTA_POLICY_SAME_USER = "same_user"
+QUOTA_POLICY_ALWAYS = "always"
+
+ENDPOINT_QUOTA_POLICIES = {
+    "plan_tasks": QUOTA_POLICY_SAME_USER,
+    "generate_weekly_report": QUOTA_POLICY_SAME_USER,
+    "chat_query": QUOTA_POLICY_SAME_USER,
+    "recommend_theme": QUOTA_POLICY_FREE,
+    "generate_theme": QUOTA_POLICY_FREE,
+}
+
+
+@dataclass
+class CacheEntry:
+    """缓存条目"""
+    response: Dict[str, Any]  # 上游返回的JSON
+    owner: str                # 首次产生该响应（已扣费）的用户
+    expires_at: float         # 过期时间（Unix时间戳）
+
+    def is_expired(self, now: Optional[float] = None) -> bool:
+        return (now or time.time()) >= self.expires_at
+
+
+@dataclass
+class CompletionResult:
+    """chat_completion 的返回结果"""
+    status_code: int
+    data: Optional[Dict[str, Any]]  # 状态码200时的上游JSON
+    text: str                       # 非200时的原始响应文本
+    cache_hit: bool = False
+    charge_quota: bool = True       # 是否应扣除配额
+
+
+def make_cache_key(endpoint: str, request_body: Dict[str, Any]) -> str:
+    """
+    生成内容寻址的缓存键
+
+    规范化规则：消息内容去除首尾空白并合并连续空白，字典按键排序，
+    使仅有空白差异的重复提交命中同一条缓存
+
+    Args:
+        endpoint: 端点名（如 "plan_tasks"）
+        request_body: 发往上游的请求体（model、messages、temperature等）
+
+    Returns:
+        64位十六进制SHA256字符串
+    """
+    def normalize(value):
+        if isinstance(value, str):
+            return " ".join(value.split())
+        if isinstance(value, dict):
+            return {k: normalize(v) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [normalize(v) for v in value]
+        return value
+
+    payload = json.dumps(
+        {"endpoint": endpoint, "request": normalize(request_body)},
+        sort_keys=True, ensure_ascii=False, separators=(",", ":")
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# ============================================
+# 存储后端
+# ============================================
+
+class MemoryCacheStore:
+    """进程内LRU存储（Serverless热实例内共享）"""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.is_expired():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: CacheEntry) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class SQLiteCacheStore:
+    """SQLite存储（默认 /tmp/gaiya_ai_cache.db，Vercel实例内可写）"""
+
+    def __init__(self, db_path: str = "/tmp/gaiya_ai_cache.db"):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS ai_response_cache ("
+            " cache_key TEXT PRIMARY KEY,"
+            " response TEXT NOT NULL,"
+            " owner TEXT NOT NULL,"
+            " expires_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, owner, expires_at FROM ai_response_cache WHERE cache_key = ?",
+                (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            entry = CacheEntry(json.loads(row[0]), row[1], row[2])
+            if entry.is_expired():
+                self._conn.execute("DELETE FROM ai_response_cache WHERE cache_key = ?", (key,))
+                self._conn.commit()
+                return None
+            return entry
+
+    def set(self, key: str, entry: CacheEntry) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO ai_response_cache (cache_key, response, owner, expires_at)"
+                " VALUES (?, ?, ?, ?)",
+                (key, json.dumps(entry.response, ensure_ascii=False), entry.owner, entry.expires_at)
+            )
+            # 顺带清理过期条目
+            self._conn.execute("DELETE FROM ai_response_cache WHERE expires_at <= ?", (time.time(),))
+            self._conn.commit()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM ai_response_cache WHERE cache_key = ?", (key,))
+            self._conn.commit()
+
+
+class SupabaseCacheStore:
+    """Supabase表存储（跨Serverless实例共享，表结构见 ai_response_cache.sql）"""
+
+    TABLE = "ai_response_cache"
+
+    def __init__(self, client):
+        self.client = client
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        try:
+            response = self.client.table(self.TABLE).select("response, owner, expires_at") \
+                .eq("cache_key", key).limit(1).execute()
+            if not response.data:
+                return None
+            row = response.data[0]
+            expires_at = datetime.fromisoformat(row["expires_at"].replace("Z", "+00:00")).timestamp()
+            entry = CacheEntry(row["response"], row["owner"], expires_at)
+            return None if entry.is_expired() else entry
+        except Exception as e:
+            print(f"[AI-CACHE] Supabase get failed: {e}", file=sys.stderr)
+            return None
+
+    def set(self, key: str, entry: CacheEntry) -> None:
+        try:
+            self.client.table(self.TABLE).upsert({
+                "cache_key": key,
+                "response": entry.response,
+                "owner": entry.owner,
+                "expires_at": datetime.fromtimestamp(entry.expires_at, timezone.utc).isoformat(),
+            }, on_conflict="cache_key").execute()
+        except Exception as e:
+            print(f"[AI-CACHE] Supabase set failed: {e}", file=sys.stderr)
+
+    def delete(self, key: str) -> None:
+        try:
+            self.client.table(self.TABLE).delete().eq("cache_key", key).execute()
+        except Exception as e:
+            print(f"[AI-CACHE] Supabase delete failed: {e}", file=sys.stderr)
+
+
+# ============================================
+# 单飞
+# ============================================
+
+class SingleFlight:
+    """同一键的并发调用只执行一次，其余调用等待并共享结果"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Dict[str, Any]] = {}
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        执行或等待同键调用
+
+        Returns:
+            (结果, 是否为共享结果)。领头调用抛出的异常会同样抛给等待者
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = {"event": threading.Event(), "result": None, "error": None}
+                self._calls[key] = call
+                leader = True
+            else:
+                leader = False
+
+        if not leader:
+            call["event"].wait()
+            if call["error"] is not None:
+                raise call["error"]
+            return call["result"], True
+
+        try:
+            call["result"] = fn()
+        except Exception as e:
+            call["error"] = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call["event"].set()
+
+        return call["result"], False
+
+
+# ============================================
+# 缓存门面
+# ============================================
+
+class AIResponseCache:
+    """AI端点响应缓存"""
+
+    def __init__(self, store=None, ttls: Optional[Dict[str, int]] = None,
+                 policies: Optional[Dict[str, str]] = None):
+        """
+        Args:
+            store: 存储后端（需实现 get/set/delete），默认内存存储
+            ttls: 端点TTL覆盖
+            policies: 端点配额策略覆盖
+        """
+        self.store = store or MemoryCacheStore()
+        self.ttls = dict(ENDPOINT_TTLS, **(ttls or {}))
+        self.policies = dict(ENDPOINT_QUOTA_POLICIES, **(policies or {}))
+        self.single_flight = SingleFlight()
+
+    def get_ttl(self, endpoint: str) -> int:
+        env_value = os.getenv(f"AI_CACHE_TTL_{endpoint.upper()}")
+        if env_value is not None:
+            try:
+                return int(env_value)
+            except ValueError:
+                pass
+        return self.ttls.get(endpoint, 0)
+
+    def should_charge(self, endpoint: str, entry: CacheEntry, user_id: str) -> bool:
+        """按端点策略判断缓存命中是否扣配额"""
+        policy = self.policies.get(endpoint, QUOTA_POLICY_ALWAYS)
+        if policy == QUOTA_POLICY_FREE:
+            return False
+        if policy == QUOTA_POLICY_SAME_USER:
+            return entry.owner != user_id
+        return True
+
+    def is_free_hit(self, endpoint: str, request_body: Dict[str, Any], user_id: str) -> bool:
+        """请求是否会命中缓存且不扣配额（用于跳过配额/速率预检，避免重试被429拒绝）"""
+        if self.get_ttl(endpoint) <= 0:
+            return False
+        entry = self.store.get(make_cache_key(endpoint, request_body))
+        return entry is not None and not self.should_charge(endpoint, entry, user_id)
+
+    def chat_completion(self, endpoint: str, api_url: str, api_key: str,
+                        request_body: Dict[str, Any], timeout: float,
+                        user_id: str = "anonymous",
+                        on_delta: Optional[Callable[[str], None]] = None) -> CompletionResult:
+        """
+        带缓存和单飞的上游chat-completion调用
+
+        只缓存状态码200的响应；requests异常（如超时）原样抛出
+
+        Args:
+            on_delta: 文本片段回调。传入时以流式调用上游（timeout为片段间隔超时）；
+                      缓存命中或搭便车的并发请求会一次性回调完整内容
+        """
+        ttl = self.get_ttl(endpoint)
+        key = make_cache_key(endpoint, request_body)
+
+        if ttl > 0:
+            entry = self.store.get(key)
+            if entry is not None:
+                print(f"[AI-CACHE] Hit for {endpoint} ({key[:12]})", file=sys.stderr)
+                self._replay(entry.response, on_delta)
+                return CompletionResult(200, entry.response, "", cache_hit=True,
+                                        charge_quota=self.should_charge(endpoint, entry, user_id))
+
+        def call_upstream() -> Tuple[int, Optional[Dict[str, Any]], str]:
+            if on_delta is not None:
+                status_code, data, text = stream_chat_completion(
+                    api_url, api_key, request_body, timeout, on_delta)
+                if status_code == 200 and ttl > 0:
+                    self.store.set(key, CacheEntry(data, user_id, time.time() + ttl))
+                return status_code, data, text
+
+            response = requests.post(
+                api_url,
+                headers={
+                    "Authorization": f"Bearer {api_key}",
+                    "Content-Type": "application/json",
+                },
+                json=request_body,
+                timeout=timeout,
+            )
+            if response.status_code != 200:
+                return response.status_code, None, response.text
+            data = response.json()
+            if ttl > 0:
+                self.store.set(key, CacheEntry(data, user_id, time.time() + ttl))
+            return 200, data, ""
+
+        (status_code, data, text), shared = self.single_flight.do(key, call_upstream)
+
+        if shared and status_code == 200:
+            # 搭便车的并发请求按缓存命中处理
+            self._replay(data, on_delta)
+            shared_entry = CacheEntry(data, self._leader_owner(key, user_id), 0)
+            return CompletionResult(200, data, "", cache_hit=True,
+                                    charge_quota=self.should_charge(endpoint, shared_entry, user_id))
+
+        return CompletionResult(status_code, data, text)
+
+    @staticmethod
+    def _replay(data: Dict[str, Any], on_delta: Optional[Callable[[str], None]]) -> None:
+        """流式请求命中缓存时，把完整内容作为一个片段回调"""
+        if on_delta is None:
+            return
+        try:
+            content = data["choices"][0]["message"]["content"]
+        except (KeyError, IndexError, TypeError):
+            return
+        if content:
+            on_delta(content)
+
+    def _leader_owner(self, key: str, default: str) -> str:
+        entry = self.store.get(key)
+        return entry.owner if entry is not None else default
+
+    def invalidate(self, endpoint: str, request_body: Dict[str, Any]) -> None:
+        """删除一条缓存（例如响应内容解析失败时）"""
+        self.store.delete(make_cache_key(endpoint, request_body))
+
+
+_cache_instance: Optional[AIResponseCache] = None
+
+
+def _create_store():
+    backend = os.getenv("AI_CACHE_BACKEND", "memory").lower()
+    if backend == "sqlite":
+        return SQLiteCacheStore(os.getenv("AI_CACHE_SQLITE_PATH", "/tmp/gaiya_ai_cache.db"))
+    if backend == "supabase":
+        url = os.getenv("SUPABASE_URL", "")
+        key = os.getenv("SUPABASE_SERVICE_KEY") or os.getenv("SUPABASE_ANON_KEY", "")
+        if url and key:
+            from supabase import create_client
+            return SupabaseCacheStore(create_client(url, key))
+        print("[AI-CACHE] Supabase credentials not configured, falling back to memory", file=sys.stderr)
+    return MemoryCacheStore()
+
+
+def get_ai_response_cache() -> AIResponseCache:
+    """获取进程级缓存单例（存储后端由 AI_CACHE_BACKEND 选择: memory | sqlite | supabase）"""
+    global _cache_instance
+    if _cache_instance is None:
+        _cache_instance = AIResponseCache(_create_store())
+    return _cache_instance
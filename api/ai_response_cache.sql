@@ -0,0 +1,28 @@
+-- ai_response_cache 表: AI端点上游响应的内容寻址缓存
+-- 由 ai_response_cache.SupabaseCacheStore 读写 (AI_CACHE_BACKEND=supabase)
+
+CREATE TABLE IF NOT EXISTS ai_response_cache (
+    -- SHA256(端点 + 规范化请求体)
+    cache_key TEXT PRIMARY KEY,
+
+    -- 上游chat-completion返回的JSON
+    response JSONB NOT NULL,
+
+    -- 首次产生该响应(已扣配额)的用户
+    owner TEXT NOT NULL,
+
+    -- 过期时间
+    expires_at TIMESTAMPTZ NOT NULL,
+
+    -- 记录创建时间
+    created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- 按过期时间清理
+CREATE INDEX IF NOT EXISTS idx_ai_response_cache_expires_at ON ai_response_cache(expires_at);
+
+-- 仅服务端(service role)访问
+ALTER TABLE ai_response_cache ENABLE ROW LEVEL SECURITY;
+
+-- 定期清理过期缓存(可配合 pg_cron 执行)
+-- DELETE FROM ai_response_cache WHERE expires_at < NOW();
@@ -0,0 +1,156 @@
+"""
+AI流式响应 - 上游模型SSE流转发
+
+特性：
+- 以 stream=True 调用上游chat-completion，逐片段回调模型输出
+- 流结束后拼装为与非流式响应相同结构的结果（可直接写入响应缓存）
+- EventStream: 在 BaseHTTPRequestHandler 上输出SSE事件（delta / done / error）
+
+客户端通过请求体 "stream": true 或 Accept: text/event-stream 请求流式响应。
+事件格式:
+    event: delta   data: {"text": "本次片段"}
+    event: done    data: {与非流式响应体相同的JSON}
+    event: error   data: {"status": 状态码, "error": "...", ...}
+
+使用示例:
+    from ai_stream import EventStream, wants_stream
+
+    stream = EventStream(self, self.allowed_origin) if wants_stream(self, user_data) else None
+    result = ai_cache.chat_completion(..., on_delta=stream.delta if stream else None)
+"""
+import json
+import sys
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+import requests
+
+
+def wants_stream(handler, user_data: Dict[str, Any]) -> bool:
+    """客户端是否请求了流式响应"""
+    if user_data.get("stream") is True:
+        return True
+    return "text/event-stream" in handler.headers.get("Accept", "")
+
+
+def iter_upstream_deltas(lines: Iterable) -> Iterator[Tuple[str, Optional[Dict[str, Any]]]]:
+    """
+    解析上游OpenAI格式的SSE流
+
+    Yields:
+        (文本片段, usage)，usage只在上游返回时非空
+    """
+    for line in lines:
+        if not line:
+            continue
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        if not line.startswith("data:"):
+            continue
+
+        payload = line[5:].strip()
+        if payload == "[DONE]":
+            return
+
+        try:
+            chunk = json.loads(payload)
+        except json.JSONDecodeError:
+            print(f"[AI-STREAM] Skipping malformed chunk: {payload[:100]}", file=sys.stderr)
+            continue
+
+        text = ""
+        choices = chunk.get("choices") or []
+        if choices:
+            delta = choices[0].get("delta") or {}
+            text = delta.get("content") or ""
+
+        usage = chunk.get("usage")
+        if text or usage:
+            yield text, usage
+
+
+def stream_chat_completion(api_url: str, api_key: str, request_body: Dict[str, Any],
+                           timeout: float, on_delta: Callable[[str], None]
+                           ) -> Tuple[int, Optional[Dict[str, Any]], str]:
+    """
+    以流式方式调用上游chat-completion
+
+    Args:
+        timeout: 两个数据片段之间的最长等待时间（秒），而非整次生成的时长
+        on_delta: 每个文本片段的回调
+
+    Returns:
+        (状态码, 与非流式响应相同结构的数据, 错误文本)
+    """
+    response = requests.post(
+        api_url,
+        headers={
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+            "Accept": "text/event-stream",
+        },
+        json=dict(request_body, stream=True),
+        timeout=timeout,
+        stream=True,
+    )
+
+    try:
+        if response.status_code != 200:
+            return response.status_code, None, response.text
+
+        parts = []
+        usage = None
+        for text, chunk_usage in iter_upstream_deltas(response.iter_lines(decode_unicode=True)):
+            if chunk_usage:
+                usage = chunk_usage
+            if text:
+                parts.append(text)
+                on_delta(text)
+    finally:
+        response.close()
+
+    data: Dict[str, Any] = {
+        "choices": [{"message": {"role": "assistant", "content": "".join(parts)}}]
+    }
+    if usage:
+        data["usage"] = usage
+    return 200, data, ""
+
+
+class EventStream:
+    """在HTTP处理器上输出SSE事件流
+
+    响应头在第一个事件发出时才写出，因此在此之前仍可改用普通JSON响应（如429配额错误）。
+    """
+
+    def __init__(self, handler, allowed_origin: str = "*"):
+        self.handler = handler
+        self.allowed_origin = allowed_origin
+        self.started = False
+
+    def start(self) -> None:
+        if self.started:
+            return
+        self.started = True
+        self.handler.send_response(200)
+        self.handler.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.handler.send_header("Cache-Control", "no-cache")
+        self.handler.send_header("X-Accel-Buffering", "no")
+        self.handler.send_header("Access-Control-Allow-Origin", self.allowed_origin)
+        self.handler.end_headers()
+
+    def send(self, event: str, data: Dict[str, Any]) -> None:
+        """发送一个事件并立即刷新"""
+        self.start()
+        message = f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+        self.handler.wfile.write(message.encode("utf-8"))
+        self.handler.wfile.flush()
+
+    def delta(self, text: str) -> None:
+        self.send("delta", {"text": text})
+
+    def finish(self, status_code: int, data: Dict[str, Any]) -> None:
+        """发送最终结果: 200为done事件，其他状态码为error事件"""
+        if status_code == 200:
+            self.send("done", data)
+        else:
+            self.send("error", dict(data, status=status_code))
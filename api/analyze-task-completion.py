@@ -12,14 +12,19 @@ sys.path.insert(0, os.path.dirname(__file__))
 from quota_manager import QuotaManager
 from rate_limiter import RateLimiter
 from cors_config import get_cors_origin
+from logger_util import get_logger, log_requests
+from ai_stream import EventStream, stream_chat_completion, wants_stream
 
 TUZI_API_KEY = os.getenv("TUZI_API_KEY")
 TUZI_BASE_URL = os.getenv("TUZI_BASE_URL", "https://api.tu-zi.com/v1")
 
+logger = get_logger("analyze-task-completion")
+
+@log_requests
 class handler(BaseHTTPRequestHandler):
     def do_OPTIONS(self):
         """处理CORS预检请求"""
-        print("CORS preflight request for analyze-task-completion", file=sys.stderr)
+        logger.debug("CORS preflight request")
         request_origin = self.headers.get('Origin', '')
         allowed_origin = get_cors_origin(request_origin)
 
@@ -32,13 +37,13 @@ class handler(BaseHTTPRequestHandler):
 
     def do_POST(self):
         """处理POST请求 - 任务完成度深度分析"""
-        print("Analyze task completion function called", file=sys.stderr)
+        logger.info("Analyze task completion function called")
 
         request_origin = self.headers.get('Origin', '')
         self.allowed_origin = get_cors_origin(request_origin)
 
         if not TUZI_API_KEY:
-            print("API key not configured", file=sys.stderr)
+            logger.error("API key not configured")
             self._send_json_response(500, {'error': 'API密钥未配置'})
             return
 
@@ -47,7 +52,7 @@ class handler(BaseHTTPRequestHandler):
             content_length = int(self.headers.get('Content-Length', 0))
             body = self.rfile.read(content_length).decode('utf-8')
 
-            print(f"Request body: {body[:200]}", file=sys.stderr)
+            logger.debug("Request received", body_length=len(body))
 
             if not body:
                 self._send_json_response(400, {'error': '请求数据为空'})
@@ -56,6 +61,8 @@ class handler(BaseHTTPRequestHandler):
             request_data = json.loads(body)
             user_id = request_data.get('user_id', 'user_demo')
             user_tier = request_data.get('user_tier', 'free')
+            # 客户端请求流式响应时边生成边转发(SSE)
+            self.event_stream = EventStream(self, self.allowed_origin) if wants_stream(self, request_data) else None
             date = request_data.get('date')
             task_completions = request_data.get('task_completions', [])
 
@@ -68,7 +75,7 @@ class handler(BaseHTTPRequestHandler):
             is_allowed, rate_info = limiter.check_rate_limit("analyze_completion", user_id)
 
             if not is_allowed:
-                print(f"[ANALYZE-COMPLETION] 🚫 Rate limit exceeded for user: {user_id}", file=sys.stderr)
+                logger.warning("Rate limit exceeded", user_id=user_id)
                 self._send_json_response(429, {
                     'success': False,
                     'error': 'Daily AI analysis quota exceeded. Please try again tomorrow.',
@@ -82,7 +89,7 @@ class handler(BaseHTTPRequestHandler):
 
             # 使用 daily_plan 配额（与任务规划共享）
             if quota_status['remaining']['daily_plan'] <= 0:
-                print(f"Quota exceeded for user {user_id}", file=sys.stderr)
+                logger.warning("Quota exceeded", user_id=user_id)
                 self._send_json_response(429, {
                     'success': False,
                     'error': '今日AI配额已用尽',
@@ -130,27 +137,35 @@ class handler(BaseHTTPRequestHandler):
             }
 
             # 调用AI API (带重试和更长超时)
-            print(f"Calling AI API for task completion analysis", file=sys.stderr)
+            logger.debug("Calling AI API for task completion analysis")
 
             max_retries = 2
             last_error = None
 
             for attempt in range(max_retries):
                 try:
-                    api_response = requests.post(
-                        api_url,
-                        headers={
-                            "Authorization": f"Bearer {TUZI_API_KEY}",
-                            "Content-Type": "application/json"
-                        },
-                        json=api_request_body,
-                        timeout=60  # 增加到60秒
-                    )
-
-                    if api_response.status_code != 200:
+                    if self.event_stream:
+                        # 流式: timeout为片段间隔超时，长分析不会因总时长超时
+                        status_code, api_result, error_message = stream_chat_completion(
+                            api_url, TUZI_API_KEY, api_request_body, 60, self.event_stream.delta
+                        )
+                    else:
+                        api_response = requests.post(
+                            api_url,
+                            headers={
+                                "Authorization": f"Bearer {TUZI_API_KEY}",
+                                "Content-Type": "application/json"
+                            },
+                            json=api_request_body,
+                            timeout=60  # 增加到60秒
+                        )
+                        status_code = api_response.status_code
+                        api_result = api_response.json() if status_code == 200 else None
                         error_message = api_response.text
-                        print(f"AI API error (attempt {attempt+1}): {error_message}", file=sys.stderr)
-                        last_error = f"API返回错误状态码: {api_response.status_code}"
+
+                    if status_code != 200:
+                        logger.warning("AI API error", attempt=attempt + 1, error=error_message)
+                        last_error = f"API返回错误状态码: {status_code}"
 
                         if attempt < max_retries - 1:
                             continue  # 重试
@@ -163,23 +178,26 @@ class handler(BaseHTTPRequestHandler):
                             return
 
                     # 成功
-                    api_result = api_response.json()
                     analysis_text = api_result['choices'][0]['message']['content']
                     break  # 成功,跳出循环
 
                 except requests.exceptions.Timeout:
-                    print(f"[ANALYZE-COMPLETION] API timeout (attempt {attempt+1}/{max_retries})", file=sys.stderr)
+                    logger.warning("AI API timeout", attempt=attempt + 1, max_retries=max_retries)
                     last_error = "AI服务响应超时"
+                    if self._stream_interrupted(last_error):
+                        return
                     if attempt < max_retries - 1:
                         continue  # 重试
                 except requests.exceptions.RequestException as e:
-                    print(f"[ANALYZE-COMPLETION] API request failed: {e}", file=sys.stderr)
+                    logger.warning("AI API request failed", attempt=attempt + 1, error=str(e))
                     last_error = f"网络请求失败: {str(e)}"
+                    if self._stream_interrupted(last_error):
+                        return
                     if attempt < max_retries - 1:
                         continue  # 重试
             else:
                 # 所有重试都失败 - 返回降级响应
-                print(f"[ANALYZE-COMPLETION] All retries failed, returning fallback response", file=sys.stderr)
+                logger.error("All retries failed, returning fallback response", max_retries=max_retries)
 
                 # 不扣配额,返回降级分析
                 fallback_analysis = self._generate_fallback_analysis(task_completions, date)
@@ -195,11 +213,11 @@ class handler(BaseHTTPRequestHandler):
                 })
                 return
 
-            # 扣除配额
-            quota_manager.use_quota(user_id, 'daily_plan', 1)
-            updated_quota = quota_manager.get_quota_status(user_id, user_tier)
+            # 扣除配额(返回值包含完整的剩余配额, 无需再次查询)
+            quota_result = quota_manager.use_quota(user_id, 'daily_plan', 1, user_tier)
+            updated_quota = quota_result.get('full_quota_status') or quota_manager.get_quota_status(user_id, user_tier)
 
-            print(f"Analysis completed successfully", file=sys.stderr)
+            logger.info("Analysis completed")
 
             # 返回成功响应
             self._send_json_response(200, {
@@ -211,19 +229,25 @@ class handler(BaseHTTPRequestHandler):
             })
 
         except json.JSONDecodeError as e:
-            print(f"JSON decode error: {e}", file=sys.stderr)
+            logger.error("JSON decode error", error=str(e))
             self._send_json_response(400, {
                 'success': False,
                 'error': '无效的JSON格式'
             })
         except Exception as e:
-            print(f"Unexpected error: {e}", file=sys.stderr)
-            print(traceback.format_exc(), file=sys.stderr)
+            logger.error("Unexpected error", error=f"{type(e).__name__}: {e}", traceback=traceback.format_exc())
             self._send_json_response(500, {
                 'success': False,
                 'error': f'服务器内部错误: {str(e)}'
             })
 
+    def _stream_interrupted(self, error_message):
+        """流式输出中途失败时发送error事件(已输出部分内容,重试或降级会导致内容重复)"""
+        if not (self.event_stream and self.event_stream.started):
+            return False
+        self._send_json_response(504, {'success': False, 'error': error_message})
+        return True
+
     def _format_task_completions(self, tasks):
         """格式化任务完成数据为可读文本"""
         lines = []
@@ -311,6 +335,11 @@ class handler(BaseHTTPRequestHandler):
 
     def _send_json_response(self, status_code, data, rate_info=None):
         """发送JSON响应"""
+        # 流式响应已开始时，最终结果作为done/error事件发送
+        if getattr(self, 'event_stream', None) and self.event_stream.started:
+            self.event_stream.finish(status_code, data)
+            return
+
         self.send_response(status_code)
         self.send_header('Content-Type', 'application/json; charset=utf-8')
         self.send_header('Access-Control-Allow-Origin', self.allowed_origin)
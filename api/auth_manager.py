@@ -4,8 +4,11 @@ GaiYa每日进度条 - 用户认证管理器
 """
 import os
 import hashlib
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Dict, Optional
+from typing import Any, Dict, Optional
 from functools import lru_cache
 from supabase import create_client, Client
 import sys
@@ -40,6 +43,79 @@ SUPABASE_URL = os.getenv("SUPABASE_URL", "")
 SUPABASE_KEY = os.getenv("SUPABASE_ANON_KEY", "")
 SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY", "")
 
+# 已验证令牌/用户记录缓存的容量
+AUTH_CACHE_MAX_ENTRIES = 1024
+# users记录缓存有效期（秒），0表示不缓存
+USER_CACHE_TTL_SECONDS = int(os.getenv("AUTH_USER_CACHE_TTL", "30"))
+# 经Supabase Auth确认的会话缓存有效期（秒），0表示每次都远程确认
+SESSION_CACHE_TTL_SECONDS = int(os.getenv("AUTH_SESSION_CACHE_TTL", "30"))
+
+
+class _ExpiringCache:
+    """带过期时间的LRU缓存（线程安全）"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if time.time() >= expires_at:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, expires_at: float) -> None:
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+# 模块级缓存：同一实例的多次调用（warm invocation）共享
+# 令牌声明按令牌哈希缓存到令牌的exp为止，命中时跳过签名验证
+_token_claims_cache = _ExpiringCache(AUTH_CACHE_MAX_ENTRIES)
+# users记录按user_id短期缓存，资料/订阅写入时失效
+_user_row_cache = _ExpiringCache(AUTH_CACHE_MAX_ENTRIES)
+# 经Supabase Auth确认的会话（令牌哈希 -> user_id）短期缓存，登出/吊销最多延迟该时长生效
+_session_cache = _ExpiringCache(AUTH_CACHE_MAX_ENTRIES)
+
+
+def _token_cache_key(access_token: str) -> str:
+    """令牌缓存键（不在内存中保留原始令牌）"""
+    return hashlib.sha256(access_token.encode('utf-8')).hexdigest()
+
+
+def invalidate_user_cache(user_id: Optional[str] = None) -> None:
+    """
+    使缓存的users记录失效
+
+    修改users表（资料、邮箱验证、会员等级）后调用。
+    只影响当前实例，其他实例的缓存最多在 USER_CACHE_TTL_SECONDS 后过期。
+
+    Args:
+        user_id: 用户ID，None表示清空全部（如只知道邮箱时）
+    """
+    if user_id is None:
+        _user_row_cache.clear()
+    else:
+        _user_row_cache.delete(user_id)
+
 
 class AuthManager:
     """用户认证管理器"""
@@ -72,12 +148,19 @@ class AuthManager:
         """
         安全验证并解码JWT token
 
+        验证通过的声明按令牌哈希缓存到exp，同一令牌再次调用时不重复验签
+
         Args:
             access_token: Supabase JWT token
 
         Returns:
             user_id (sub claim) if valid, None otherwise
         """
+        cache_key = _token_cache_key(access_token)
+        claims = _token_claims_cache.get(cache_key)
+        if claims is not None:
+            return claims.get("sub")
+
         jwt_secret = _get_jwt_secret()
         if not jwt_secret:
             # [SECURITY] 生产环境必须配置JWT密钥，拒绝不安全的降级解码
@@ -93,6 +176,8 @@ class AuthManager:
                 algorithms=["HS256"],
                 audience="authenticated"
             )
+            if payload.get("exp"):
+                _token_claims_cache.set(cache_key, payload, float(payload["exp"]))
             return payload.get("sub")
         except jwt.ExpiredSignatureError:
             print("[AUTH] Token expired", file=sys.stderr)
@@ -213,6 +298,7 @@ class AuthManager:
             self.client.table("users").update({
                 "last_login_at": datetime.now().isoformat()
             }).eq("id", auth_response.user.id).execute()
+            invalidate_user_cache(auth_response.user.id)
 
             # 3. 获取用户信息
             user_response = self.client.table("users").select("*").eq("id", auth_response.user.id).execute()
@@ -248,6 +334,10 @@ class AuthManager:
             return {"success": False, "error": "Supabase not configured"}
 
         try:
+            if access_token:
+                cache_key = _token_cache_key(access_token)
+                _token_claims_cache.delete(cache_key)
+                _session_cache.delete(cache_key)
             self.client.auth.sign_out()
             print("User signed out", file=sys.stderr)
             return {"success": True}
@@ -331,6 +421,7 @@ class AuthManager:
                         "email_verified": True,
                         "status": "active"
                     }).eq("id", auth_user.id).execute()
+                    invalidate_user_cache(auth_user.id)
                     print(f"[CHECK-VERIFICATION] ✅ Synced to public.users successfully", file=sys.stderr)
                 except Exception as sync_error:
                     print(f"[CHECK-VERIFICATION] ⚠️ Failed to sync to public.users: {sync_error}", file=sys.stderr)
@@ -414,6 +505,10 @@ class AuthManager:
         """
         通过访问令牌获取用户信息
 
+        配置了JWT密钥时先在本地验签，伪造或过期的令牌不发起远程请求；
+        会话始终经Supabase Auth确认（已登出/吊销的令牌被拒绝），确认结果缓存
+        SESSION_CACHE_TTL_SECONDS 秒；users记录缓存 USER_CACHE_TTL_SECONDS 秒
+
         Args:
             access_token: 访问令牌
 
@@ -424,24 +519,60 @@ class AuthManager:
             return None
 
         try:
-            # 1. 验证token并获取用户
-            user_response = self.client.auth.get_user(access_token)
-
-            if not user_response.user:
+            # 1. 验证token并获取用户ID
+            user_id = self._get_session_user_id(access_token)
+            if not user_id:
                 return None
 
+            cached_user = _user_row_cache.get(user_id)
+            if cached_user is not None:
+                return dict(cached_user)
+
             # 2. 从数据库获取完整用户信息
-            db_response = self.client.table("users").select("*").eq("id", user_response.user.id).execute()
+            db_response = self.client.table("users").select("*").eq("id", user_id).execute()
 
             if not db_response.data:
                 return None
 
+            if USER_CACHE_TTL_SECONDS > 0:
+                _user_row_cache.set(user_id, dict(db_response.data[0]), time.time() + USER_CACHE_TTL_SECONDS)
             return db_response.data[0]
 
         except Exception as e:
             print(f"Error getting user by token: {e}", file=sys.stderr)
             return None
 
+    def _get_session_user_id(self, access_token: str) -> Optional[str]:
+        """
+        确认令牌对应的会话仍然有效
+
+        Args:
+            access_token: 访问令牌
+
+        Returns:
+            user_id，令牌无效或会话已失效时返回None
+        """
+        cache_key = _token_cache_key(access_token)
+        user_id = _session_cache.get(cache_key)
+        if user_id is not None:
+            return user_id
+
+        if _get_jwt_secret() and not self._verify_and_decode_token(access_token):
+            return None
+
+        user_response = self.client.auth.get_user(access_token)
+        user_id = user_response.user.id if user_response.user else None
+        if not user_id:
+            return None
+
+        if SESSION_CACHE_TTL_SECONDS > 0:
+            expires_at = time.time() + SESSION_CACHE_TTL_SECONDS
+            claims = _token_claims_cache.get(cache_key)
+            if claims and claims.get("exp"):
+                expires_at = min(expires_at, float(claims["exp"]))
+            _session_cache.set(cache_key, user_id, expires_at)
+        return user_id
+
     def refresh_access_token(self, refresh_token: str) -> Dict:
         """
         刷新访问令牌
@@ -500,6 +631,7 @@ class AuthManager:
                 }
 
             response = self.client.table("users").update(filtered_updates).eq("id", user_id).execute()
+            invalidate_user_cache(user_id)
 
             print(f"User profile updated: {user_id}", file=sys.stderr)
 
@@ -546,6 +678,7 @@ class AuthManager:
             self.client.table("users").update({
                 "email_verified": True
             }).eq("id", auth_response.user.id).execute()
+            invalidate_user_cache(auth_response.user.id)
 
             print(f"Email verified for user: {auth_response.user.id}", file=sys.stderr)
 
@@ -701,6 +834,7 @@ class AuthManager:
             self.client.table("users").update({
                 "status": "deleted"
             }).eq("id", user_id).execute()
+            invalidate_user_cache(user_id)
 
             # 2. 删除Auth用户（可选，根据业务需求）
             # self.client.auth.admin.delete_user(user_id)
@@ -967,6 +1101,7 @@ class AuthManager:
             response = self.client.table("users").update({
                 "email_verified": True
             }).eq("email", email).execute()
+            invalidate_user_cache()
 
             print(f"Email marked as verified: {email}", file=sys.stderr)
 
@@ -10,15 +10,21 @@ sys.path.insert(0, os.path.dirname(__file__))
 
 from rate_limiter import RateLimiter
 from cors_config import get_cors_origin
+from logger_util import get_logger, log_requests
+from ai_response_cache import get_ai_response_cache
+from ai_stream import EventStream, wants_stream
 
 TUZI_API_KEY = os.getenv("TUZI_API_KEY")
 TUZI_BASE_URL = os.getenv("TUZI_BASE_URL", "https://api.tu-zi.com/v1")
 
+logger = get_logger("chat-query")
 
+
+@log_requests
 class handler(BaseHTTPRequestHandler):
     def do_OPTIONS(self):
         """处理CORS预检请求"""
-        print("CORS preflight request for chat-query", file=sys.stderr)
+        logger.debug("CORS preflight request")
         # ✅ 安全修复: CORS源白名单验证
         request_origin = self.headers.get('Origin', '')
         allowed_origin = get_cors_origin(request_origin)
@@ -32,43 +38,29 @@ class handler(BaseHTTPRequestHandler):
 
     def do_POST(self):
         """处理POST请求 - 对话查询"""
-        print("Chat query function called", file=sys.stderr)
+        logger.info("Chat query function called")
 
         # ✅ 安全修复: CORS源白名单验证
         request_origin = self.headers.get('Origin', '')
         self.allowed_origin = get_cors_origin(request_origin)
 
         if not TUZI_API_KEY:
-            print("API key not configured", file=sys.stderr)
+            logger.error("API key not configured")
             self._send_json_response(500, {"error": "API密钥未配置"})
             return
 
         try:
             content_length = int(self.headers.get("Content-Length", 0))
             body = self.rfile.read(content_length).decode("utf-8") if content_length else ""
-            print(f"Request body: {body[:200]}", file=sys.stderr)
+            logger.debug("Request received", body_length=len(body))
 
             user_data = json.loads(body) if body else {}
             user_id = user_data.get("user_id", "user_demo")
+            # 客户端请求流式响应时边生成边转发(SSE)，避免长时间生成触发超时
+            self.event_stream = EventStream(self, self.allowed_origin) if wants_stream(self, user_data) else None
             query = user_data.get("query", "")
             context = user_data.get("context", {})
 
-            # ✅ 安全修复: 速率限制检查（防止对话API滥用）
-            limiter = RateLimiter()
-
-            # 检查速率限制 (50次/1小时，基于user_id)
-            is_allowed, rate_info = limiter.check_rate_limit("chat_query", user_id)
-
-            if not is_allowed:
-                # 返回429 Too Many Requests
-                print(f"[CHAT-QUERY] 🚫 Rate limit exceeded for user: {user_id}", file=sys.stderr)
-                self._send_json_response(429, {
-                    "success": False,
-                    "error": "Chat query rate limit exceeded. Please try again later.",
-                    "retry_after": rate_info.get("retry_after", 60)
-                }, rate_info)
-                return
-
             api_url = f"{TUZI_BASE_URL}/chat/completions"
             api_request_body = {
                 "model": "gpt-5",
@@ -96,20 +88,40 @@ class handler(BaseHTTPRequestHandler):
                 "max_tokens": 1000,
             }
 
-            response = requests.post(
+            # ✅ 安全修复: 速率限制检查（防止对话API滥用）
+            # 命中缓存且按策略不计次时(如客户端超时后重试)跳过速率检查
+            rate_info = None
+            if not get_ai_response_cache().is_free_hit("chat_query", api_request_body, user_id):
+                limiter = RateLimiter()
+
+                # 检查速率限制 (50次/1小时，基于user_id)
+                is_allowed, rate_info = limiter.check_rate_limit("chat_query", user_id)
+
+                if not is_allowed:
+                    # 返回429 Too Many Requests
+                    logger.warning("Rate limit exceeded", user_id=user_id)
+                    self._send_json_response(429, {
+                        "success": False,
+                        "error": "Chat query rate limit exceeded. Please try again later.",
+                        "retry_after": rate_info.get("retry_after", 60)
+                    }, rate_info)
+                    return
+
+            # 转发请求到上游(带响应缓存和并发去重)
+            response = get_ai_response_cache().chat_completion(
+                "chat_query",
                 api_url,
-                headers={
-                    "Authorization": f"Bearer {TUZI_API_KEY}",
-                    "Content-Type": "application/json",
-                },
-                json=api_request_body,
+                TUZI_API_KEY,
+                api_request_body,
                 timeout=60,
+                user_id=user_id,
+                on_delta=self.event_stream.delta if self.event_stream else None,
             )
 
-            print(f"API response status: {response.status_code}", file=sys.stderr)
+            logger.info("AI API responded", status_code=response.status_code, cache_hit=response.cache_hit)
 
             if response.status_code == 200:
-                api_response = response.json()
+                api_response = response.data
                 answer = api_response["choices"][0]["message"]["content"]
 
                 self._send_json_response(
@@ -124,7 +136,7 @@ class handler(BaseHTTPRequestHandler):
                     rate_info
                 )
             else:
-                print(f"API request failed: {response.text[:200]}", file=sys.stderr)
+                logger.error("AI API request failed", status_code=response.status_code, details=response.text[:200])
                 self._send_json_response(
                     response.status_code,
                     {
@@ -134,14 +146,13 @@ class handler(BaseHTTPRequestHandler):
                 )
 
         except json.JSONDecodeError as e:
-            print(f"JSON decode error: {str(e)}", file=sys.stderr)
+            logger.error("JSON decode error", error=str(e))
             self._send_json_response(400, {"error": f"请求数据格式错误: {str(e)}"})
         except requests.exceptions.Timeout:
-            print("Request timeout", file=sys.stderr)
+            logger.error("AI API request timed out")
             self._send_json_response(504, {"error": "请求超时,请稍后再试"})
         except Exception as e:
-            print(f"Error in handler: {str(e)}", file=sys.stderr)
-            traceback.print_exc(file=sys.stderr)
+            logger.error("Error in handler", error=f"{type(e).__name__}: {e}", traceback=traceback.format_exc())
             self._send_json_response(
                 500,
                 {
@@ -152,6 +163,11 @@ class handler(BaseHTTPRequestHandler):
 
     def _send_json_response(self, status_code, data, rate_info: dict = None):
         """发送JSON响应（包含速率限制响应头）"""
+        # 流式响应已开始时，最终结果作为done/error事件发送
+        if getattr(self, "event_stream", None) and self.event_stream.started:
+            self.event_stream.finish(status_code, data)
+            return
+
         self.send_response(status_code)
         self.send_header("Content-Type", "application/json")
         self.send_header("Access-Control-Allow-Origin", getattr(self, 'allowed_origin', '*'))
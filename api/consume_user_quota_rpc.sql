@@ -0,0 +1,206 @@
+-- 创建 RPC 函数用于原子扣除AI配额
+-- 一次往返完成: 创建缺失的配额记录、按需重置日/周窗口、检查上限、扣除并返回剩余配额快照
+-- 行锁(SELECT ... FOR UPDATE)保证并发请求不会超额扣除
+-- 退还配额(AI调用失败后释放预扣的配额)使用单独的 refund_user_quota
+-- 两个函数都信任传入的用户ID与等级, 只允许服务端(service_role)调用
+-- Python等价实现见 quota_manager.LocalQuotaRpc (测试/本地开发使用)
+
+CREATE OR REPLACE FUNCTION consume_user_quota(
+    p_user_id TEXT,
+    p_quota_type TEXT,
+    p_amount INTEGER DEFAULT 1,
+    p_user_tier TEXT DEFAULT 'free'
+)
+RETURNS JSON
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = ''
+AS $$
+DECLARE
+    v_row public.user_quotas%ROWTYPE;
+    -- *_reset_at 为 TIMESTAMPTZ: 直接与 NOW() 比较; 重置时间取中国标准时间(UTC+8)的零点,
+    -- 再转换回 TIMESTAMPTZ, 与 quota_manager.py 保持一致
+    v_now TIMESTAMPTZ := NOW();
+    v_tomorrow TIMESTAMPTZ := (date_trunc('day', NOW() AT TIME ZONE 'Asia/Shanghai') + INTERVAL '1 day') AT TIME ZONE 'Asia/Shanghai';
+    v_next_week TIMESTAMPTZ := (date_trunc('day', NOW() AT TIME ZONE 'Asia/Shanghai') + INTERVAL '7 days') AT TIME ZONE 'Asia/Shanghai';
+    v_used INTEGER;
+    v_total INTEGER;
+    v_success BOOLEAN := TRUE;
+BEGIN
+    IF p_quota_type NOT IN ('daily_plan', 'weekly_report', 'chat') THEN
+        RAISE EXCEPTION 'Unknown quota type: %', p_quota_type;
+    END IF;
+    IF p_amount IS NULL OR p_amount < 0 THEN
+        RAISE EXCEPTION 'Invalid quota amount: %', p_amount;
+    END IF;
+
+    -- 新用户按请求的等级创建配额记录(已存在时以数据库中的等级为准)
+    INSERT INTO public.user_quotas (
+        user_id, user_tier,
+        daily_plan_total, weekly_report_total, chat_total,
+        daily_plan_used, weekly_report_used, chat_used,
+        daily_plan_reset_at, weekly_report_reset_at, chat_reset_at
+    )
+    VALUES (
+        p_user_id, p_user_tier,
+        CASE WHEN p_user_tier = 'pro' THEN 20 ELSE 3 END,
+        CASE WHEN p_user_tier = 'pro' THEN 10 ELSE 1 END,
+        CASE WHEN p_user_tier = 'pro' THEN 100 ELSE 10 END,
+        0, 0, 0,
+        v_tomorrow, v_next_week, v_tomorrow
+    )
+    ON CONFLICT (user_id) DO NOTHING;
+
+    SELECT * INTO v_row
+    FROM public.user_quotas
+    WHERE user_id = p_user_id
+    FOR UPDATE;
+
+    -- 按需重置过期的配额窗口
+    IF v_row.daily_plan_reset_at IS NOT NULL AND v_now >= v_row.daily_plan_reset_at THEN
+        v_row.daily_plan_used := 0;
+        v_row.daily_plan_reset_at := v_tomorrow;
+    END IF;
+    IF v_row.chat_reset_at IS NOT NULL AND v_now >= v_row.chat_reset_at THEN
+        v_row.chat_used := 0;
+        v_row.chat_reset_at := v_tomorrow;
+    END IF;
+    IF v_row.weekly_report_reset_at IS NOT NULL AND v_now >= v_row.weekly_report_reset_at THEN
+        v_row.weekly_report_used := 0;
+        v_row.weekly_report_reset_at := v_next_week;
+    END IF;
+
+    v_used := CASE p_quota_type
+        WHEN 'daily_plan' THEN COALESCE(v_row.daily_plan_used, 0)
+        WHEN 'weekly_report' THEN COALESCE(v_row.weekly_report_used, 0)
+        ELSE COALESCE(v_row.chat_used, 0)
+    END;
+    v_total := CASE p_quota_type
+        WHEN 'daily_plan' THEN COALESCE(v_row.daily_plan_total, 0)
+        WHEN 'weekly_report' THEN COALESCE(v_row.weekly_report_total, 0)
+        ELSE COALESCE(v_row.chat_total, 0)
+    END;
+
+    IF p_amount > 0 AND v_used + p_amount > v_total THEN
+        v_success := FALSE;
+    ELSE
+        v_used := v_used + p_amount;
+        IF p_quota_type = 'daily_plan' THEN
+            v_row.daily_plan_used := v_used;
+        ELSIF p_quota_type = 'weekly_report' THEN
+            v_row.weekly_report_used := v_used;
+        ELSE
+            v_row.chat_used := v_used;
+        END IF;
+    END IF;
+
+    -- 超额时也写回重置结果
+    UPDATE public.user_quotas
+    SET
+        daily_plan_used = v_row.daily_plan_used,
+        daily_plan_reset_at = v_row.daily_plan_reset_at,
+        weekly_report_used = v_row.weekly_report_used,
+        weekly_report_reset_at = v_row.weekly_report_reset_at,
+        chat_used = v_row.chat_used,
+        chat_reset_at = v_row.chat_reset_at,
+        updated_at = NOW()
+    WHERE user_id = p_user_id;
+
+    RETURN json_build_object(
+        'success', v_success,
+        'error', CASE WHEN v_success THEN NULL ELSE 'Quota exceeded' END,
+        'quota_type', p_quota_type,
+        'used', v_used,
+        'total', v_total,
+        'remaining', v_total - v_used,
+        'requested', p_amount,
+        'full_quota_status', json_build_object(
+            'remaining', json_build_object(
+                'daily_plan', COALESCE(v_row.daily_plan_total, 0) - COALESCE(v_row.daily_plan_used, 0),
+                'weekly_report', COALESCE(v_row.weekly_report_total, 0) - COALESCE(v_row.weekly_report_used, 0),
+                'chat', COALESCE(v_row.chat_total, 0) - COALESCE(v_row.chat_used, 0)
+            ),
+            'user_tier', v_row.user_tier
+        )
+    );
+END;
+$$;
+
+-- 退还配额: 已用次数减少 p_amount(不低于0), 返回与 consume_user_quota 相同结构的结果
+CREATE OR REPLACE FUNCTION refund_user_quota(
+    p_user_id TEXT,
+    p_quota_type TEXT,
+    p_amount INTEGER DEFAULT 1
+)
+RETURNS JSON
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = ''
+AS $$
+DECLARE
+    v_row public.user_quotas%ROWTYPE;
+    v_used INTEGER;
+    v_total INTEGER;
+BEGIN
+    IF p_quota_type NOT IN ('daily_plan', 'weekly_report', 'chat') THEN
+        RAISE EXCEPTION 'Unknown quota type: %', p_quota_type;
+    END IF;
+    IF p_amount IS NULL OR p_amount < 0 THEN
+        RAISE EXCEPTION 'Invalid refund amount: %', p_amount;
+    END IF;
+
+    UPDATE public.user_quotas
+    SET
+        daily_plan_used = CASE WHEN p_quota_type = 'daily_plan'
+            THEN GREATEST(COALESCE(daily_plan_used, 0) - p_amount, 0) ELSE daily_plan_used END,
+        weekly_report_used = CASE WHEN p_quota_type = 'weekly_report'
+            THEN GREATEST(COALESCE(weekly_report_used, 0) - p_amount, 0) ELSE weekly_report_used END,
+        chat_used = CASE WHEN p_quota_type = 'chat'
+            THEN GREATEST(COALESCE(chat_used, 0) - p_amount, 0) ELSE chat_used END,
+        updated_at = NOW()
+    WHERE user_id = p_user_id
+    RETURNING * INTO v_row;
+
+    IF NOT FOUND THEN
+        RETURN json_build_object('success', FALSE, 'error', 'No quota record', 'quota_type', p_quota_type);
+    END IF;
+
+    v_used := CASE p_quota_type
+        WHEN 'daily_plan' THEN v_row.daily_plan_used
+        WHEN 'weekly_report' THEN v_row.weekly_report_used
+        ELSE v_row.chat_used
+    END;
+    v_total := CASE p_quota_type
+        WHEN 'daily_plan' THEN COALESCE(v_row.daily_plan_total, 0)
+        WHEN 'weekly_report' THEN COALESCE(v_row.weekly_report_total, 0)
+        ELSE COALESCE(v_row.chat_total, 0)
+    END;
+
+    RETURN json_build_object(
+        'success', TRUE,
+        'quota_type', p_quota_type,
+        'used', v_used,
+        'total', v_total,
+        'remaining', v_total - v_used,
+        'refunded', p_amount,
+        'full_quota_status', json_build_object(
+            'remaining', json_build_object(
+                'daily_plan', COALESCE(v_row.daily_plan_total, 0) - COALESCE(v_row.daily_plan_used, 0),
+                'weekly_report', COALESCE(v_row.weekly_report_total, 0) - COALESCE(v_row.weekly_report_used, 0),
+                'chat', COALESCE(v_row.chat_total, 0) - COALESCE(v_row.chat_used, 0)
+            ),
+            'user_tier', v_row.user_tier
+        )
+    );
+END;
+$$;
+
+-- 仅服务端(service_role)可以调用: API使用 SUPABASE_SERVICE_KEY 并自行校验用户身份与等级
+REVOKE EXECUTE ON FUNCTION consume_user_quota(TEXT, TEXT, INTEGER, TEXT) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION refund_user_quota(TEXT, TEXT, INTEGER) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION consume_user_quota(TEXT, TEXT, INTEGER, TEXT) TO service_role;
+GRANT EXECUTE ON FUNCTION refund_user_quota(TEXT, TEXT, INTEGER) TO service_role;
+
+-- 添加注释
+COMMENT ON FUNCTION consume_user_quota IS '原子地重置过期窗口、检查并扣除AI配额,返回剩余配额快照';
+COMMENT ON FUNCTION refund_user_quota IS '退还预扣的AI配额(已用次数不低于0),返回剩余配额快照';
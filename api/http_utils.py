@@ -6,6 +6,7 @@ HTTP请求/响应工具函数
 - 统一响应格式（成功/错误/速率限制）
 - 减少代码重复，提高可维护性
 """
+import hashlib
 import json
 import sys
 from http.server import BaseHTTPRequestHandler
@@ -113,6 +114,41 @@ def send_success_response(
             pass  # 连接已关闭，无法发送响应
 
 
+def send_json_with_etag(
+    handler: BaseHTTPRequestHandler,
+    data: Dict[str, Any],
+    cache_control: str = "private, no-cache"
+):
+    """
+    发送带ETag的JSON响应（用于幂等的GET查询）
+
+    请求头If-None-Match与本次内容的ETag一致时只返回304，
+    客户端直接使用缓存的响应体，省去传输与解析。
+
+    Args:
+        handler: HTTP请求处理器实例
+        data: 响应数据（原样发送）
+        cache_control: Cache-Control响应头，默认每次都需向服务端验证
+    """
+    body = json.dumps(data, sort_keys=True).encode('utf-8')
+    etag = f'W/"{hashlib.sha1(body).hexdigest()}"'
+    not_modified = etag in (handler.headers.get('If-None-Match') or '')
+
+    handler.send_response(304 if not_modified else 200)
+    handler.send_header('ETag', etag)
+    handler.send_header('Cache-Control', cache_control)
+    handler.send_header('Access-Control-Allow-Origin', getattr(handler, 'allowed_origin', '*'))
+    # 允许的源随请求的Origin变化, 共享缓存须按Origin区分
+    handler.send_header('Vary', 'Origin')
+    if not_modified:
+        handler.end_headers()
+        return
+
+    handler.send_header('Content-Type', 'application/json')
+    handler.end_headers()
+    handler.wfile.write(body)
+
+
 def send_error_response(
     handler: BaseHTTPRequestHandler,
     status_code: int,
@@ -4,23 +4,41 @@
 ✅ 安全修复 (Priority 10): 日志规范化
 - 统一日志格式和级别
 - 自动脱敏敏感信息（邮箱、IP、Token等）
-- 结构化日志输出
+- 结构化日志输出（每个事件一行JSON）
 - 可配置的详细程度（通过环境变量控制）
 
+✅ 性能优化: 日志不占用请求关键路径
+- 先检查级别再格式化，低于LOG_LEVEL的调用几乎零开销
+- 字段值可以传入无参函数，仅在确实输出时求值
+- 脱敏规则按字段名编译并缓存，不再逐条匹配
+- 请求期间的日志（包括遗留的print到stderr）写入缓冲区，请求结束时一次性输出
+- 每条日志带有请求关联ID（request_id）
+
 使用示例:
-    from logger_util import get_logger
+    from logger_util import get_logger, log_requests
 
     logger = get_logger("auth-signin")
     logger.info("User login attempt", email="user@example.com")  # 自动脱敏
     logger.error("Login failed", error=str(e))
-    logger.debug("Debug info", data=some_data)  # 仅在DEBUG模式显示
+    logger.debug("Debug info", data=lambda: build_snapshot())  # 仅在DEBUG模式求值
+
+    @log_requests
+    class handler(BaseHTTPRequestHandler):
+        ...
 """
 
 import sys
 import os
 import re
-from datetime import datetime
-from typing import Any, Dict, Optional
+import json
+import time
+import uuid
+import threading
+import functools
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
 from enum import Enum
 
 
@@ -33,6 +51,162 @@ class LogLevel(Enum):
     CRITICAL = 4 # 严重错误
 
 
+_LEVEL_NAMES = {level.name: level for level in LogLevel}
+
+# 字段名 → 脱敏类型（规则只编译一次，判定结果按字段名缓存）
+_EMAIL_KEY = re.compile(r"email|mail", re.IGNORECASE)
+_IP_KEY = re.compile(r"ip|addr|address", re.IGNORECASE)
+_SECRET_KEY = re.compile(r"token|key|password|secret|auth", re.IGNORECASE)
+_ID_KEY = re.compile(r"id", re.IGNORECASE)
+
+# 请求缓冲区超过该大小时提前输出，避免长请求占用过多内存
+MAX_BUFFERED_CHARS = 64 * 1024
+
+
+@functools.lru_cache(maxsize=512)
+def _redaction_for(key: str) -> Optional[str]:
+    """按字段名判断脱敏类型: email / ip / secret / id / None"""
+    if _EMAIL_KEY.search(key):
+        return "email"
+    if _IP_KEY.search(key):
+        return "ip"
+    if _SECRET_KEY.search(key):
+        return "secret"
+    if _ID_KEY.search(key):
+        return "id"
+    return None
+
+
+class _RequestLog:
+    """单个请求的日志上下文: 关联ID与待输出的缓冲区"""
+
+    def __init__(self, request_id: str):
+        self.request_id = request_id
+        self.chunks: List[str] = []
+        self.size = 0
+
+
+_current_request: ContextVar[Optional[_RequestLog]] = ContextVar("_current_request", default=None)
+
+
+class _BufferedStderr:
+    """
+    请求期间替换sys.stderr的代理
+
+    当前上下文处于请求中时写入该请求的缓冲区, 其余情况(后台线程等)直接写入原始stderr。
+    遗留的 print(..., file=sys.stderr) 因此也会随请求结束一次性输出。
+    """
+
+    def __init__(self, target):
+        self.target = target
+
+    def write(self, text: str) -> int:
+        request_log = _current_request.get()
+        if request_log is None:
+            return self.target.write(text)
+        request_log.chunks.append(text)
+        request_log.size += len(text)
+        if request_log.size >= MAX_BUFFERED_CHARS:
+            _drain(request_log, self.target)
+        return len(text)
+
+    def flush(self):
+        if _current_request.get() is None:
+            self.target.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.target, name)
+
+
+_stderr_lock = threading.Lock()
+_active_requests = 0
+_saved_stderr = None
+
+
+def _drain(request_log: _RequestLog, target) -> None:
+    if not request_log.chunks:
+        return
+    target.write("".join(request_log.chunks))
+    target.flush()
+    request_log.chunks.clear()
+    request_log.size = 0
+
+
+def get_request_id() -> Optional[str]:
+    """当前请求的关联ID（不在请求中时返回None）"""
+    request_log = _current_request.get()
+    return request_log.request_id if request_log else None
+
+
+@contextmanager
+def request_logging(request_id: Optional[str] = None):
+    """
+    在请求范围内缓冲日志，退出时一次性写入stderr
+
+    Args:
+        request_id: 请求关联ID（默认随机生成）
+    """
+    global _active_requests, _saved_stderr
+
+    with _stderr_lock:
+        if _active_requests == 0:
+            _saved_stderr = sys.stderr
+            sys.stderr = _BufferedStderr(_saved_stderr)
+        _active_requests += 1
+        proxy = sys.stderr
+
+    request_log = _RequestLog(request_id or uuid.uuid4().hex[:16])
+    token = _current_request.set(request_log)
+    try:
+        yield request_log.request_id
+    finally:
+        _current_request.reset(token)
+        target = proxy.target if isinstance(proxy, _BufferedStderr) else proxy
+        try:
+            _drain(request_log, target)
+        except (OSError, ValueError):
+            pass  # stderr已关闭
+        with _stderr_lock:
+            _active_requests -= 1
+            if _active_requests == 0 and sys.stderr is proxy:
+                sys.stderr = _saved_stderr
+
+
+def log_requests(handler_cls):
+    """
+    处理器类装饰器: 为 do_GET/do_POST 等方法启用请求级日志缓冲
+
+    请求ID优先取 X-Request-Id / X-Vercel-Id 请求头，请求结束时记录一条耗时日志。
+    """
+    access_logger = get_logger("request")
+
+    def wrap(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            headers = getattr(self, "headers", None)
+            request_id = None
+            if headers is not None:
+                request_id = headers.get("X-Request-Id") or headers.get("X-Vercel-Id")
+            started = time.perf_counter()
+            with request_logging(request_id):
+                try:
+                    return method(self, *args, **kwargs)
+                finally:
+                    access_logger.info(
+                        "Request completed",
+                        method=self.command,
+                        path=(self.path or "").split("?", 1)[0],
+                        duration_ms=round((time.perf_counter() - started) * 1000, 1),
+                    )
+        return wrapper
+
+    for name in ("do_GET", "do_POST", "do_PUT", "do_PATCH", "do_DELETE"):
+        method = handler_cls.__dict__.get(name)
+        if method is not None:
+            setattr(handler_cls, name, wrap(method))
+    return handler_cls
+
+
 class Logger:
     """统一的日志记录器"""
 
@@ -47,19 +221,17 @@ class Logger:
 
         # 从环境变量读取日志级别
         env_level = os.getenv("LOG_LEVEL", "INFO").upper()
-        level_map = {
-            "DEBUG": LogLevel.DEBUG,
-            "INFO": LogLevel.INFO,
-            "WARNING": LogLevel.WARNING,
-            "ERROR": LogLevel.ERROR,
-            "CRITICAL": LogLevel.CRITICAL
-        }
-        self.min_level = level_map.get(env_level, LogLevel.INFO)
+        self.min_level = _LEVEL_NAMES.get(env_level, LogLevel.INFO)
+        self._min_value = self.min_level.value
 
         # 是否显示详细信息（敏感数据脱敏前的原始值）
         # ⚠️ 生产环境必须设置为 False
         self.verbose = os.getenv("LOG_VERBOSE", "false").lower() == "true"
 
+    def is_enabled_for(self, level: LogLevel) -> bool:
+        """该级别的日志是否会输出（用于跳过昂贵的日志准备工作）"""
+        return level.value >= self._min_value
+
     def _sanitize_email(self, email: str) -> str:
         """
         邮箱地址脱敏
@@ -128,60 +300,58 @@ class Logger:
         if self.verbose:
             return value
 
+        redaction = _redaction_for(key)
+        if redaction is None:
+            return value
+
         value_str = str(value)
 
-        # 邮箱地址
-        if any(k in key.lower() for k in ["email", "mail"]):
+        if redaction == "email":
             return self._sanitize_email(value_str)
-
-        # IP地址
-        if any(k in key.lower() for k in ["ip", "addr", "address"]) and "email" not in key.lower():
+        if redaction == "ip":
             return self._sanitize_ip(value_str)
-
-        # Token/密钥/密码
-        if any(k in key.lower() for k in ["token", "key", "password", "secret", "auth"]):
+        if redaction == "secret":
             return self._sanitize_token(value_str)
 
         # 用户ID（UUID格式） - 保留前8位
-        if "user_id" in key.lower() or "id" in key.lower():
-            if len(value_str) > 16 and "-" in value_str:  # 可能是UUID
-                return f"{value_str[:8]}***"
-
+        if len(value_str) > 16 and "-" in value_str:  # 可能是UUID
+            return f"{value_str[:8]}***"
         return value
 
     def _format_message(self, level: LogLevel, message: str, **kwargs) -> str:
         """
-        格式化日志消息
+        格式化日志消息为一行JSON
 
-        格式: [时间戳] [级别] [模块名] 消息 key1=value1 key2=value2
+        格式: {"ts": ..., "level": ..., "logger": ..., "msg": ..., "request_id": ..., key1: value1, ...}
 
         Args:
             level: 日志级别
             message: 主要消息
-            **kwargs: 附加的键值对参数
+            **kwargs: 附加的键值对参数（无参函数在此时求值）
 
         Returns:
-            格式化后的日志字符串
+            JSON字符串
         """
-        # 时间戳（ISO 8601格式，精确到毫秒）
-        timestamp = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
-
-        # 级别标记
-        level_str = level.name
-
-        # 构建基础消息
-        parts = [f"[{timestamp}]", f"[{level_str}]", f"[{self.module_name}]", message]
+        record: Dict[str, Any] = {
+            "ts": datetime.now(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z"),
+            "level": level.name,
+            "logger": self.module_name,
+            "msg": message,
+        }
 
-        # 添加键值对参数（自动脱敏）
-        if kwargs:
-            sanitized_params = []
-            for key, value in kwargs.items():
-                sanitized_value = self._sanitize_value(key, value)
-                sanitized_params.append(f"{key}={sanitized_value}")
+        request_id = get_request_id()
+        if request_id:
+            record["request_id"] = request_id
 
-            parts.append(" | ".join(sanitized_params))
+        for key, value in kwargs.items():
+            if callable(value):
+                try:
+                    value = value()
+                except Exception as e:
+                    value = f"<error: {type(e).__name__}>"
+            record[key] = self._sanitize_value(key, value)
 
-        return " ".join(parts)
+        return json.dumps(record, ensure_ascii=False, default=str)
 
     def _log(self, level: LogLevel, message: str, **kwargs):
         """
@@ -192,12 +362,11 @@ class Logger:
             message: 消息内容
             **kwargs: 附加参数
         """
-        # 检查日志级别
-        if level.value < self.min_level.value:
+        # 检查日志级别（在任何格式化之前）
+        if level.value < self._min_value:
             return
 
-        formatted_msg = self._format_message(level, message, **kwargs)
-        print(formatted_msg, file=sys.stderr)
+        sys.stderr.write(self._format_message(level, message, **kwargs) + "\n")
 
     def debug(self, message: str, **kwargs):
         """
@@ -259,7 +428,7 @@ def get_logger(module_name: str) -> Logger:
         logger.info("User login attempt", email="user@example.com", ip="192.168.1.1")
 
         输出:
-        [2025-11-17T10:30:45.123Z] [INFO] [auth-signin] User login attempt email=u***@example.com | ip=192.168.***。***
+        {"ts": "2025-11-17T10:30:45.123Z", "level": "INFO", "logger": "auth-signin", "msg": "User login attempt", "email": "u***@example.com", "ip": "192.168.***.***"}
     """
     return Logger(module_name)
 
@@ -17,12 +17,14 @@ from datetime import datetime, timedelta
 
 try:
     from subscription_manager import SubscriptionManager
+    from auth_manager import invalidate_user_cache
     from validators_enhanced import validate_user_id, validate_plan_type
     from cors_config import get_cors_origin
     from supabase import create_client, Client
 except ImportError:
     sys.path.insert(0, os.path.dirname(__file__))
     from subscription_manager import SubscriptionManager
+    from auth_manager import invalidate_user_cache
     from validators_enhanced import validate_user_id, validate_plan_type
     from cors_config import get_cors_origin
     from supabase import create_client, Client
@@ -192,6 +194,8 @@ class handler(BaseHTTPRequestHandler):
 
                 updated_user = result.data[0]
 
+            invalidate_user_cache(user_id)
+
             # 8. 记录支付记录(如果订单号提供)
             if out_trade_no:
                 try:
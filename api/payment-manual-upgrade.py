@@ -9,12 +9,12 @@ import sys
 from datetime import datetime, timedelta
 
 try:
-    from auth_manager import AuthManager
+    from auth_manager import AuthManager, invalidate_user_cache
     from cors_config import get_cors_origin
 except ImportError:
     import os
     sys.path.insert(0, os.path.dirname(__file__))
-    from auth_manager import AuthManager
+    from auth_manager import AuthManager, invalidate_user_cache
     from cors_config import get_cors_origin
 
 
@@ -78,6 +78,7 @@ class handler(BaseHTTPRequestHandler):
             print(f"[MANUAL-UPGRADE] Updating user {user_id} with data: {update_data}", file=sys.stderr)
             result = auth_manager.admin_client.table("users").update(update_data).eq("id", user_id).execute()
             print(f"[MANUAL-UPGRADE] Update result: {result}", file=sys.stderr)
+            invalidate_user_cache(user_id)
 
             if result.data:
                 print(f"[MANUAL-UPGRADE] ✓ User upgraded successfully: {user_id}", file=sys.stderr)
@@ -2,6 +2,7 @@
 支付结果异步通知API
 GET /api/payment-notify
 ZPAY会通过GET方式发送支付结果通知
+验签后写入幂等账本并立即确认, 订阅激活由 webhook_jobs.WebhookJobProcessor 完成
 """
 from http.server import BaseHTTPRequestHandler
 import json
@@ -10,24 +11,22 @@ from urllib.parse import parse_qs, urlparse
 
 try:
     from zpay_manager import ZPayManager
-    from subscription_manager import SubscriptionManager
-    from supabase import create_client, Client
     from cors_config import get_cors_origin
-    import os
+    from logger_util import get_logger, log_requests
+    from webhook_jobs import WebhookJobProcessor, WebhookLedger, accept_webhook_event
 except ImportError:
     import os
     import sys
     sys.path.insert(0, os.path.dirname(__file__))
     from zpay_manager import ZPayManager
-    from subscription_manager import SubscriptionManager
-    from supabase import create_client, Client
     from cors_config import get_cors_origin
+    from logger_util import get_logger, log_requests
+    from webhook_jobs import WebhookJobProcessor, WebhookLedger, accept_webhook_event
 
-# Supabase配置
-SUPABASE_URL = os.getenv("SUPABASE_URL", "")
-SUPABASE_KEY = os.getenv("SUPABASE_ANON_KEY", "")
+logger = get_logger("payment-notify")
 
 
+@log_requests
 class handler(BaseHTTPRequestHandler):
     """支付通知处理器"""
 
@@ -44,27 +43,28 @@ class handler(BaseHTTPRequestHandler):
             for key, value in parse_qs(parsed_url.query).items():
                 params[key] = value[0] if len(value) == 1 else value
 
-            # ✅ 增强日志: 记录完整回调信息
-            print(f"[PAYMENT-NOTIFY] ========== NEW NOTIFICATION ==========", file=sys.stderr)
-            print(f"[PAYMENT-NOTIFY] Order ID: {params.get('out_trade_no', 'N/A')}", file=sys.stderr)
-            print(f"[PAYMENT-NOTIFY] Trade NO: {params.get('trade_no', 'N/A')}", file=sys.stderr)
-            print(f"[PAYMENT-NOTIFY] Status: {params.get('trade_status', 'N/A')}", file=sys.stderr)
-            print(f"[PAYMENT-NOTIFY] Amount: ¥{params.get('money', 'N/A')}", file=sys.stderr)
-            print(f"[PAYMENT-NOTIFY] Pay Type: {params.get('type', 'N/A')}", file=sys.stderr)
-            print(f"[PAYMENT-NOTIFY] Param: {params.get('param', 'N/A')}", file=sys.stderr)
-            print(f"[PAYMENT-NOTIFY] Full URL: {self.path}", file=sys.stderr)
+            # ✅ 增强日志: 记录回调信息(结构化字段, 不记录签名)
+            logger.info(
+                "New notification",
+                out_trade_no=params.get('out_trade_no'),
+                trade_no=params.get('trade_no'),
+                trade_status=params.get('trade_status'),
+                money=params.get('money'),
+                pay_type=params.get('type'),
+                param=params.get('param'),
+            )
 
             # 2. 验证签名
             zpay = ZPayManager()
             if not zpay.verify_notify(params):
-                print(f"[PAYMENT-NOTIFY] Invalid signature!", file=sys.stderr)
+                logger.warning("Invalid signature", out_trade_no=params.get("out_trade_no"))
                 self._send_response("fail")
                 return
 
             # 3. 检查支付状态
             trade_status = params.get("trade_status")
             if trade_status != "TRADE_SUCCESS":
-                print(f"[PAYMENT-NOTIFY] Trade status is not SUCCESS: {trade_status}", file=sys.stderr)
+                logger.warning("Trade status is not SUCCESS", trade_status=trade_status)
                 self._send_response("fail")
                 return
 
@@ -81,9 +81,9 @@ class handler(BaseHTTPRequestHandler):
                     parts = param_str.split("|")
                     if len(parts) == 2:
                         user_id, plan_type = parts
-                        print(f"[PAYMENT-NOTIFY] Parsed param (delimiter format): user={user_id}, plan={plan_type}", file=sys.stderr)
+                        logger.debug("Parsed param (delimiter format)", user_id=user_id, plan_type=plan_type)
                     else:
-                        print(f"[PAYMENT-NOTIFY] Invalid delimiter param format: {param_str}", file=sys.stderr)
+                        logger.warning("Invalid delimiter param format", param=param_str)
                         self._send_response("fail")
                         return
                 else:
@@ -91,211 +91,62 @@ class handler(BaseHTTPRequestHandler):
                     param_data = json.loads(param_str) if param_str and param_str != "{}" else {}
                     user_id = param_data.get("user_id")
                     plan_type = param_data.get("plan_type")
-                    print(f"[PAYMENT-NOTIFY] Parsed param (JSON format): user={user_id}, plan={plan_type}", file=sys.stderr)
+                    logger.debug("Parsed param (JSON format)", user_id=user_id, plan_type=plan_type)
             except json.JSONDecodeError as e:
-                print(f"[PAYMENT-NOTIFY] Invalid JSON param: {param_str}, error: {e}", file=sys.stderr)
+                logger.warning("Invalid JSON param", param=param_str, error=str(e))
                 self._send_response("fail")
                 return
             except Exception as e:
-                print(f"[PAYMENT-NOTIFY] Unexpected error parsing param: {e}", file=sys.stderr)
+                logger.error("Unexpected error parsing param", error=str(e))
                 self._send_response("fail")
                 return
 
-            print(f"[PAYMENT-NOTIFY] Processing payment for user {user_id}, plan: {plan_type}", file=sys.stderr)
-
-            # 5. 检查订单是否已处理（防止重复通知）
-            if self._is_order_processed(out_trade_no):
-                print(f"[PAYMENT-NOTIFY] Order already processed: {out_trade_no}", file=sys.stderr)
-                self._send_response("success")
-                return
-
-            # 6. ✅ 新增: 缓存支付状态到 payment_cache 表
-            cache_success = self._cache_payment_status(params, user_id, plan_type)
-            if not cache_success:
-                print(f"[PAYMENT-NOTIFY] ⚠️ Failed to cache payment status, but continue processing", file=sys.stderr)
-
-            # 7. 创建支付记录（状态为pending，等订阅成功后再标记completed）
-            payment_id = self._create_payment_record(
-                user_id=user_id,
-                order_id=out_trade_no,
-                trade_no=trade_no,
-                amount=money,
-                plan_type=plan_type,
-                payment_method=params.get("type", "alipay"),
-                status="pending"  # [SECURITY] 先创建pending状态，订阅成功后才completed
-            )
+            logger.info("Processing payment", user_id=user_id, plan_type=plan_type)
 
-            if not payment_id:
-                print(f"[PAYMENT-NOTIFY] Failed to create payment record", file=sys.stderr)
+            # 5. 写入幂等账本: 同一订单的重复通知在数据库层被拒绝
+            job = {
+                "kind": "subscription_payment",
+                "user_id": user_id,
+                "plan_type": plan_type,
+                "payment": {
+                    "order_id": out_trade_no,
+                    "trade_no": trade_no,
+                    "amount": money,
+                    "currency": "CNY",
+                    "payment_method": params.get("type", "alipay"),
+                },
+                # 订阅激活后写入 payment_cache, 唤醒在 payment-wait 上等待的客户端
+                "status_record": {
+                    "out_trade_no": out_trade_no,
+                    "trade_no": trade_no,
+                    "money": params.get("money"),
+                    "param": f"{user_id}|{plan_type}",
+                    "name": params.get("name", ""),
+                    "type": params.get("type", ""),
+                },
+            }
+            try:
+                ledger = WebhookLedger()
+                event = accept_webhook_event("zpay", out_trade_no, trade_status, job, ledger)
+            except Exception as e:
+                # 账本不可用时返回fail, 由ZPAY稍后重试通知
+                logger.error("Failed to record notification", error=f"{type(e).__name__}: {e}")
                 self._send_response("fail")
                 return
 
-            # 8. 创建订阅并激活会员
-            sub_manager = SubscriptionManager()
-            result = sub_manager.create_subscription(user_id, plan_type, payment_id)
+            # 6. 立即确认: 已记录的通知不再需要ZPAY重试
+            self._send_response("success")
 
-            if result["success"]:
-                # [SECURITY] 订阅成功后，将支付状态更新为completed
-                if self._complete_payment_record(payment_id):
-                    print(f"[PAYMENT-NOTIFY] Subscription activated for user {user_id}", file=sys.stderr)
-                    self._send_response("success")
-                else:
-                    # 支付状态更新失败，但订阅已创建，记录警告但仍返回成功
-                    print(f"[PAYMENT-NOTIFY] ⚠️ Subscription created but payment status update failed", file=sys.stderr)
-                    self._send_response("success")
-            else:
-                # [SECURITY] 订阅创建失败，删除pending状态的支付记录，允许重试
-                self._delete_pending_payment(payment_id)
-                print(f"[PAYMENT-NOTIFY] Failed to create subscription: {result.get('error')}", file=sys.stderr)
-                self._send_response("fail")
+            # 7. 履约(失败时事件留在账本中, 由 webhook-worker 重试)
+            if event:
+                WebhookJobProcessor(ledger).process(event)
 
         except Exception as e:
-            print(f"[PAYMENT-NOTIFY] Error: {e}", file=sys.stderr)
+            logger.error("Notification handling failed", error=str(e))
             import traceback
             traceback.print_exc(file=sys.stderr)
             self._send_response("fail")
 
-    def _cache_payment_status(self, params: dict, user_id: str, plan_type: str) -> bool:
-        """
-        缓存支付状态到 payment_cache 表
-
-        这个缓存表供客户端轮询查询使用,无需等待订阅激活完成。
-        客户端可以立即读取到支付成功状态并显示给用户。
-        """
-        try:
-            from datetime import datetime, timezone
-
-            client = create_client(SUPABASE_URL, SUPABASE_KEY)
-
-            # 准备缓存数据
-            cache_data = {
-                'out_trade_no': params.get('out_trade_no'),
-                'trade_no': params.get('trade_no'),
-                'status': 'paid',
-                'money': params.get('money'),
-                'param': f"{user_id}|{plan_type}",  # 保存业务参数
-                'name': params.get('name', ''),
-                'type': params.get('type', ''),
-                'paid_at': datetime.now(timezone.utc).isoformat(),
-                'updated_at': datetime.now(timezone.utc).isoformat()
-            }
-
-            # 使用 upsert 插入或更新
-            result = client.table('payment_cache').upsert(
-                cache_data,
-                on_conflict='out_trade_no'
-            ).execute()
-
-            print(f"[PAYMENT-NOTIFY] ✅ Payment status cached: {params.get('out_trade_no')}", file=sys.stderr)
-            return True
-
-        except Exception as e:
-            print(f"[PAYMENT-NOTIFY] ❌ Cache error: {type(e).__name__}: {str(e)}", file=sys.stderr)
-            return False
-
-    def _is_order_processed(self, out_trade_no: str) -> bool:
-        """检查订单是否已处理"""
-        try:
-            client = create_client(SUPABASE_URL, SUPABASE_KEY)
-            response = client.table("payments").select("*").eq(
-                "order_id", out_trade_no
-            ).eq("status", "completed").execute()
-
-            return bool(response.data)
-
-        except Exception as e:
-            print(f"[PAYMENT-NOTIFY] Error checking order: {e}", file=sys.stderr)
-            # ⚠️ 安全模式：异常时假设已处理，避免重复收款
-            # 宁可漏处理一笔（用户可重新支付），不可重复收款（需要退款）
-            return True
-
-    def _create_payment_record(
-        self,
-        user_id: str,
-        order_id: str,
-        trade_no: str,
-        amount: float,
-        plan_type: str,
-        payment_method: str,
-        status: str = "pending"
-    ) -> str:
-        """创建支付记录
-
-        Args:
-            status: 支付状态，默认"pending"，订阅成功后更新为"completed"
-        """
-        try:
-            client = create_client(SUPABASE_URL, SUPABASE_KEY)
-
-            payment_data = {
-                "user_id": user_id,
-                "order_id": order_id,
-                "amount": amount,
-                "currency": "CNY",
-                "payment_method": payment_method,
-                "payment_provider": "zpay",
-                "status": status,
-                "item_type": "subscription",
-                "item_metadata": json.dumps({
-                    "plan_type": plan_type,
-                    "trade_no": trade_no
-                }),
-            }
-
-            # 只有completed状态才设置completed_at
-            if status == "completed":
-                payment_data["completed_at"] = "now()"
-
-            response = client.table("payments").insert(payment_data).execute()
-
-            if response.data:
-                return response.data[0]["id"]
-
-            return None
-
-        except Exception as e:
-            print(f"[PAYMENT-NOTIFY] Error creating payment record: {e}", file=sys.stderr)
-            return None
-
-    def _complete_payment_record(self, payment_id: str) -> bool:
-        """将支付记录状态更新为completed
-
-        [SECURITY] 仅在订阅创建成功后调用，确保事务一致性
-        """
-        try:
-            client = create_client(SUPABASE_URL, SUPABASE_KEY)
-            response = client.table("payments").update({
-                "status": "completed",
-                "completed_at": "now()"
-            }).eq("id", payment_id).execute()
-
-            return bool(response.data)
-
-        except Exception as e:
-            print(f"[PAYMENT-NOTIFY] Error completing payment: {e}", file=sys.stderr)
-            return False
-
-    def _delete_pending_payment(self, payment_id: str) -> bool:
-        """删除pending状态的支付记录
-
-        [SECURITY] 仅在订阅创建失败时调用，允许ZPAY重试
-        仅删除pending状态的记录，防止误删已完成的支付
-        """
-        try:
-            client = create_client(SUPABASE_URL, SUPABASE_KEY)
-            response = client.table("payments").delete().eq(
-                "id", payment_id
-            ).eq("status", "pending").execute()
-
-            if response.data:
-                print(f"[PAYMENT-NOTIFY] Deleted pending payment: {payment_id}", file=sys.stderr)
-                return True
-            return False
-
-        except Exception as e:
-            print(f"[PAYMENT-NOTIFY] Error deleting pending payment: {e}", file=sys.stderr)
-            return False
-
     def _send_response(self, status: str):
         """
         发送响应
@@ -0,0 +1,156 @@
+"""
+长轮询等待支付结果API
+GET /api/payment-wait?out_trade_no=xxx[&trade_no=xxx][&timeout=25]
+
+请求会被挂起,直到 payment-notify / stripe-webhook 写入已支付状态或到达截止时间。
+截止时仍未支付则向Z-Pay查询一次作为兜底(回调丢失时仍能发现已支付的订单),
+返回 {"success": true, "order": {...}, "timed_out": bool, "retry_after": 秒}
+"""
+from http.server import BaseHTTPRequestHandler
+import json
+import sys
+from urllib.parse import parse_qs, urlparse
+
+try:
+    from zpay_manager import ZPayManager
+    from cors_config import get_cors_origin
+    from logger_util import log_requests
+    from payment_status import (
+        MAX_WAIT_SECONDS, RETRY_AFTER_SECONDS, get_payment_status_broker, publish_payment_status
+    )
+except ImportError:
+    import os
+    import sys
+    sys.path.insert(0, os.path.dirname(__file__))
+    from zpay_manager import ZPayManager
+    from cors_config import get_cors_origin
+    from logger_util import log_requests
+    from payment_status import (
+        MAX_WAIT_SECONDS, RETRY_AFTER_SECONDS, get_payment_status_broker, publish_payment_status
+    )
+
+
+@log_requests
+class handler(BaseHTTPRequestHandler):
+    """长轮询支付状态处理器"""
+
+    def do_GET(self):
+        """挂起直到订单已支付或超时"""
+        try:
+            request_origin = self.headers.get('Origin', '')
+            self.allowed_origin = get_cors_origin(request_origin)
+
+            params = parse_qs(urlparse(self.path).query)
+            out_trade_no = params.get("out_trade_no", [None])[0]
+            trade_no = params.get("trade_no", [None])[0]
+
+            if not out_trade_no:
+                self._send_error(400, "Missing out_trade_no parameter")
+                return
+
+            try:
+                timeout = float(params.get("timeout", [MAX_WAIT_SECONDS])[0])
+            except (TypeError, ValueError):
+                timeout = MAX_WAIT_SECONDS
+            timeout = max(0.0, min(timeout, MAX_WAIT_SECONDS))
+
+            print(f"[PAYMENT-WAIT] Waiting for order {out_trade_no} (up to {timeout:.0f}s)", file=sys.stderr)
+
+            record = get_payment_status_broker().wait_for_paid(out_trade_no, timeout)
+            if record:
+                print(f"[PAYMENT-WAIT] ✅ Order is PAID: {out_trade_no}", file=sys.stderr)
+                self._send_success({
+                    "success": True,
+                    "timed_out": False,
+                    "order": self._order_from_cache(record),
+                })
+                return
+
+            # 截止时仍未收到回调: Z-Pay订单兜底查询一次(Stripe会话只依赖webhook)
+            order = None
+            if not out_trade_no.startswith("cs_"):
+                order = self._query_zpay(out_trade_no, trade_no)
+
+            if order is None:
+                order = {"out_trade_no": out_trade_no, "status": "unpaid"}
+
+            self._send_success({
+                "success": True,
+                "timed_out": order.get("status") != "paid",
+                "retry_after": RETRY_AFTER_SECONDS,
+                "order": order,
+            })
+
+        except Exception as e:
+            print(f"[PAYMENT-WAIT] Error: {e}", file=sys.stderr)
+            self._send_error(500, f"Internal server error: {str(e)}")
+
+    def _query_zpay(self, out_trade_no: str, trade_no: str = None):
+        """向Z-Pay查询订单; 已支付时写入payment_cache,后续等待直接命中缓存"""
+        result = ZPayManager().query_order(out_trade_no=out_trade_no, trade_no=trade_no)
+        if not result.get("success"):
+            return None
+
+        order = result["order"]
+        paid = self._is_paid_status(order.get("status"))
+        response_order = {
+            "out_trade_no": order.get("out_trade_no"),
+            "trade_no": order.get("trade_no"),
+            "name": order.get("name"),
+            "money": order.get("money"),
+            "status": "paid" if paid else "unpaid",
+            "type": order.get("type"),
+            "param": order.get("param", ""),
+        }
+
+        if paid:
+            print(f"[PAYMENT-WAIT] Z-Pay reports PAID without callback: {out_trade_no}", file=sys.stderr)
+            publish_payment_status(dict(response_order, out_trade_no=out_trade_no))
+        return response_order
+
+    @staticmethod
+    def _order_from_cache(record: dict) -> dict:
+        return {
+            "out_trade_no": record.get("out_trade_no"),
+            "trade_no": record.get("trade_no"),
+            "name": record.get("name"),
+            "money": record.get("money"),
+            "status": "paid",
+            "type": record.get("type"),
+            "param": record.get("param", ""),
+        }
+
+    def _send_success(self, data: dict):
+        """发送成功响应"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Cache-Control', 'no-store')
+        self.send_header('Access-Control-Allow-Origin', getattr(self, 'allowed_origin', '*'))
+        self.end_headers()
+        self.wfile.write(json.dumps(data).encode('utf-8'))
+
+    def _send_error(self, code: int, message: str):
+        """发送错误响应"""
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Cache-Control', 'no-store')
+        self.send_header('Access-Control-Allow-Origin', getattr(self, 'allowed_origin', '*'))
+        self.end_headers()
+        self.wfile.write(json.dumps({"success": False, "error": message}).encode('utf-8'))
+
+    @staticmethod
+    def _is_paid_status(status_value) -> bool:
+        """兼容Z-Pay返回的 "1"/"0"、数值以及 paid/unpaid 字符串"""
+        if status_value is None:
+            return False
+        if isinstance(status_value, str):
+            normalized = status_value.strip().lower()
+            if normalized in {"paid", "unpaid"}:
+                return normalized == "paid"
+            if normalized == "":
+                return False
+            status_value = normalized
+        try:
+            return int(float(status_value)) == 1
+        except (ValueError, TypeError):
+            return False
@@ -0,0 +1,143 @@
+"""
+支付状态发布与长轮询等待
+payment-notify / stripe-webhook 写入 payment_cache 后发布订单状态,
+payment-wait 挂起客户端请求直到订单变为已支付或到达截止时间,
+客户端因此只需保持一个未完成的请求,不再每3秒轮询一次
+"""
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional
+
+# 单次挂起的最长时间(秒): 低于Vercel函数默认超时,并给Z-Pay兜底查询留出余量
+MAX_WAIT_SECONDS = 25
+# 跨实例时依赖重新读取payment_cache, 读取间隔从MIN逐步放宽到MAX
+MIN_RECHECK_SECONDS = 0.5
+MAX_RECHECK_SECONDS = 3.0
+# 建议客户端在未支付的长轮询返回后等待的时间(秒)
+RETRY_AFTER_SECONDS = 1
+
+
+class PaymentStatusBroker:
+    """
+    进程内的支付状态通知
+
+    publish()写入payment_cache并唤醒同一进程内等待该订单的请求;
+    不同Serverless实例之间没有共享内存,等待方仍会按递增间隔重新读取缓存表。
+    """
+
+    def __init__(self, reader: Optional[Callable[[str], Optional[Dict]]] = None,
+                 writer: Optional[Callable[[Dict], bool]] = None):
+        """
+        Args:
+            reader: 读取缓存记录的函数(默认查询payment_cache表)
+            writer: 写入缓存记录的函数(默认upsert到payment_cache表)
+        """
+        self._reader = reader or read_payment_cache
+        self._writer = writer or write_payment_cache
+        self._condition = threading.Condition()
+        self._versions: Dict[str, int] = {}
+
+    def publish(self, record: Dict) -> bool:
+        """
+        写入订单状态并唤醒等待方
+
+        Args:
+            record: payment_cache记录(至少包含out_trade_no和status)
+
+        Returns:
+            是否写入成功(写入失败时仍会唤醒本进程内的等待方)
+        """
+        out_trade_no = record.get("out_trade_no")
+        if not out_trade_no:
+            return False
+
+        record = dict(record)
+        now = datetime.now(timezone.utc).isoformat()
+        record.setdefault("updated_at", now)
+        if record.get("status") == "paid":
+            record.setdefault("paid_at", now)
+
+        saved = self._writer(record)
+
+        with self._condition:
+            self._versions[out_trade_no] = self._versions.get(out_trade_no, 0) + 1
+            self._condition.notify_all()
+        return saved
+
+    def wait_for_paid(self, out_trade_no: str, timeout: float = MAX_WAIT_SECONDS) -> Optional[Dict]:
+        """
+        挂起直到订单已支付或超时
+
+        Args:
+            out_trade_no: 商户订单号
+            timeout: 最长等待秒数(会被限制在MAX_WAIT_SECONDS内)
+
+        Returns:
+            已支付的缓存记录; 超时返回None
+        """
+        deadline = time.monotonic() + max(0.0, min(timeout, MAX_WAIT_SECONDS))
+        interval = MIN_RECHECK_SECONDS
+
+        while True:
+            with self._condition:
+                seen = self._versions.get(out_trade_no, 0)
+
+            record = self._reader(out_trade_no)
+            if record and record.get("status") == "paid":
+                return record
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+
+            with self._condition:
+                if self._versions.get(out_trade_no, 0) == seen:
+                    self._condition.wait(min(interval, remaining))
+            interval = min(interval * 2, MAX_RECHECK_SECONDS)
+
+
+def read_payment_cache(out_trade_no: str) -> Optional[Dict]:
+    """从payment_cache表读取订单记录,不存在或出错返回None"""
+    try:
+        from supabase_client import get_supabase_client
+
+        response = get_supabase_client().table('payment_cache').select('*').eq(
+            'out_trade_no', out_trade_no
+        ).execute()
+        return response.data[0] if response.data else None
+    except Exception as e:
+        print(f"[PAYMENT-STATUS] Cache read error: {type(e).__name__}: {e}", file=sys.stderr)
+        return None
+
+
+def write_payment_cache(record: Dict) -> bool:
+    """将订单记录upsert到payment_cache表"""
+    try:
+        from supabase_client import get_supabase_client
+
+        get_supabase_client().table('payment_cache').upsert(
+            record,
+            on_conflict='out_trade_no'
+        ).execute()
+        return True
+    except Exception as e:
+        print(f"[PAYMENT-STATUS] Cache write error: {type(e).__name__}: {e}", file=sys.stderr)
+        return False
+
+
+_broker: Optional[PaymentStatusBroker] = None
+
+
+def get_payment_status_broker() -> PaymentStatusBroker:
+    """获取进程内共享的PaymentStatusBroker"""
+    global _broker
+    if _broker is None:
+        _broker = PaymentStatusBroker()
+    return _broker
+
+
+def publish_payment_status(record: Dict) -> bool:
+    """发布订单状态(写入payment_cache并唤醒等待方)"""
+    return get_payment_status_broker().publish(record)
@@ -10,14 +10,20 @@ sys.path.insert(0, os.path.dirname(__file__))
 
 from quota_manager import QuotaManager
 from cors_config import get_cors_origin
+from logger_util import get_logger, log_requests
+from ai_response_cache import get_ai_response_cache
+from ai_stream import EventStream, wants_stream
 
 TUZI_API_KEY = os.getenv("TUZI_API_KEY")
 TUZI_BASE_URL = os.getenv("TUZI_BASE_URL", "https://api.tu-zi.com/v1")
 
+logger = get_logger("plan-tasks")
+
+@log_requests
 class handler(BaseHTTPRequestHandler):
     def do_OPTIONS(self):
         """处理CORS预检请求"""
-        print("CORS preflight request for plan-tasks", file=sys.stderr)
+        logger.debug("CORS preflight request")
         # ✅ 安全修复: CORS源白名单验证
         request_origin = self.headers.get('Origin', '')
         allowed_origin = get_cors_origin(request_origin)
@@ -31,23 +37,27 @@ class handler(BaseHTTPRequestHandler):
 
     def do_POST(self):
         """处理POST请求 - 任务规划"""
-        print("Plan tasks function called", file=sys.stderr)
+        logger.info("Plan tasks function called")
 
         # ✅ 安全修复: CORS源白名单验证
         request_origin = self.headers.get('Origin', '')
         self.allowed_origin = get_cors_origin(request_origin)
 
         if not TUZI_API_KEY:
-            print("API key not configured", file=sys.stderr)
+            logger.error("API key not configured")
             self._send_json_response(500, {'error': 'API密钥未配置'})
             return
 
+        # 预扣的配额: 生成未成功时在finally中退还
+        quota_reservation = None
+        quota_settled = False
+
         try:
             # 读取请求体
             content_length = int(self.headers.get('Content-Length', 0))
             body = self.rfile.read(content_length).decode('utf-8')
 
-            print(f"Request body: {body[:200]}", file=sys.stderr)
+            logger.debug("Request received", body_length=len(body))
 
             if not body:
                 self._send_json_response(400, {'error': '请求数据为空'})
@@ -55,25 +65,16 @@ class handler(BaseHTTPRequestHandler):
 
             user_data = json.loads(body)
             user_id = user_data.get('user_id', 'user_demo')
+            # 客户端请求流式响应时边生成边转发(SSE)，避免长时间生成触发超时
+            self.event_stream = EventStream(self, self.allowed_origin) if wants_stream(self, user_data) else None
             user_tier = user_data.get('user_tier', 'free')
 
             # ✅ P1-1.6.4: 移除速率限制器,统一使用配额管理器
             # 原因: 速率限制(20次)和配额系统(free:3次, pro:无限)重复,导致混淆
             # 现在: 所有用户(免费/付费)都只受配额系统约束
 
-            # 检查并扣除配额
             quota_manager = QuotaManager()
-
-            # 先检查配额是否足够
-            quota_status = quota_manager.get_quota_status(user_id, user_tier)
-            if quota_status['remaining']['daily_plan'] <= 0:
-                print(f"Quota exceeded for user {user_id}", file=sys.stderr)
-                self._send_json_response(429, {
-                    'success': False,
-                    'error': '今日配额已用尽',
-                    'quota_info': quota_status
-                })
-                return
+            ai_cache = get_ai_response_cache()
 
             # 构造API请求 - 使用OpenAI格式
             api_url = f"{TUZI_BASE_URL}/chat/completions"
@@ -116,24 +117,43 @@ class handler(BaseHTTPRequestHandler):
                 "temperature": 0.3
             }
 
-            print(f"Calling API: {api_url}", file=sys.stderr)
+            # 一次原子调用检查并预扣配额(生成失败时退还), 并发请求不会超额
+            # 命中缓存且按策略不扣配额时(如客户端超时后重试)跳过预扣,避免重试被429拒绝
+            if not ai_cache.is_free_hit('plan_tasks', api_request_body, user_id):
+                quota_result = quota_manager.use_quota(user_id, 'daily_plan', 1, user_tier)
+                if quota_result.get('error') == 'Quota exceeded':
+                    logger.warning("Quota exceeded", user_id=user_id, user_tier=user_tier)
+                    self._send_json_response(429, {
+                        'success': False,
+                        'error': '今日配额已用尽',
+                        'quota_info': quota_result.get('full_quota_status')
+                        or quota_manager.get_quota_status(user_id, user_tier)
+                    })
+                    return
+                if quota_result.get('success'):
+                    quota_reservation = quota_result
+                else:
+                    # 配额服务异常时不阻塞生成(与之前的降级行为一致)
+                    logger.warning("Failed to reserve quota", user_id=user_id, error=quota_result.get('error'))
 
-            # 转发请求到真实API
+            logger.debug("Calling AI API", api_url=api_url, stream=self.event_stream is not None)
+
+            # 转发请求到真实API(带响应缓存和并发去重)
             # ✅ P1-1.6: 延长AI API请求超时时间到4分钟 (Vercel maxDuration=5分钟,留1分钟缓冲)
-            response = requests.post(
+            response = ai_cache.chat_completion(
+                'plan_tasks',
                 api_url,
-                headers={
-                    "Authorization": f"Bearer {TUZI_API_KEY}",
-                    "Content-Type": "application/json"
-                },
-                json=api_request_body,
-                timeout=240  # 4分钟 (Vercel执行限制5分钟,留1分钟缓冲处理响应)
+                TUZI_API_KEY,
+                api_request_body,
+                timeout=240,  # 4分钟 (Vercel执行限制5分钟,留1分钟缓冲处理响应)
+                user_id=user_id,
+                on_delta=self.event_stream.delta if self.event_stream else None
             )
 
-            print(f"API response status: {response.status_code}", file=sys.stderr)
+            logger.info("AI API responded", status_code=response.status_code, cache_hit=response.cache_hit)
 
             if response.status_code == 200:
-                api_response = response.json()
+                api_response = response.data
                 content = api_response['choices'][0]['message']['content'].strip()
 
                 # ✅ P1-1.5: 提取token使用量
@@ -142,7 +162,12 @@ class handler(BaseHTTPRequestHandler):
                     usage = api_response['usage']
                     # OpenAI格式: total_tokens = prompt_tokens + completion_tokens
                     token_usage = usage.get('total_tokens', 0)
-                    print(f"Token usage: prompt={usage.get('prompt_tokens', 0)}, completion={usage.get('completion_tokens', 0)}, total={token_usage}", file=sys.stderr)
+                    logger.info(
+                        "AI usage",
+                        usage_prompt=usage.get('prompt_tokens', 0),
+                        usage_completion=usage.get('completion_tokens', 0),
+                        usage_total=token_usage
+                    )
 
                 # 尝试从markdown代码块中提取JSON
                 if content.startswith("```"):
@@ -156,6 +181,7 @@ class handler(BaseHTTPRequestHandler):
                     tasks = result.get("tasks", [])
 
                     if not tasks:
+                        ai_cache.invalidate('plan_tasks', api_request_body)
                         self._send_json_response(500, {
                             "success": False,
                             "error": "未生成任何任务",
@@ -171,23 +197,31 @@ class handler(BaseHTTPRequestHandler):
                     for i, task in enumerate(tasks):
                         task["color"] = color_palette[i % len(color_palette)]
 
-                    # 任务生成成功，扣除配额
-                    quota_result = quota_manager.use_quota(user_id, 'daily_plan', 1)
+                    # 任务生成成功，确认预扣的配额(缓存命中且策略免扣时退还)
+                    quota_settled = True
+                    if quota_reservation and not response.charge_quota:
+                        logger.info("Cache hit, quota refunded", user_id=user_id)
+                        quota_result = quota_manager.refund_quota(user_id, 'daily_plan', 1)
+                    elif quota_reservation:
+                        quota_result = quota_reservation
+                    elif response.charge_quota:
+                        # 预判为免扣但缓存已过期, 照常扣除
+                        quota_result = quota_manager.use_quota(user_id, 'daily_plan', 1, user_tier)
+                    else:
+                        logger.info("Cache hit, quota not charged", user_id=user_id)
+                        quota_result = {}
 
+                    # ✅ 使用配额调用返回的完整配额状态,避免额外查询
+                    quota_info = quota_result.get('full_quota_status')
                     if quota_result.get('success'):
-                        print(f"Successfully used quota for {user_id}, remaining: {quota_result['remaining']}", file=sys.stderr)
-                        # ✅ 使用use_quota返回的完整配额状态,避免额外查询和缓存问题
-                        quota_info = quota_result.get('full_quota_status')
-                        if not quota_info:
-                            # 降级方案:如果没有返回完整状态,才重新查询
-                            print(f"Warning: full_quota_status not in result, falling back to get_quota_status", file=sys.stderr)
-                            quota_info = quota_manager.get_quota_status(user_id, user_tier)
-                    else:
-                        print(f"Failed to use quota: {quota_result}", file=sys.stderr)
+                        logger.info("Quota used", user_id=user_id, remaining=quota_result.get('remaining'))
+                    elif quota_result:
                         # 即使配额扣除失败，也返回任务（已经调用了API）
-                        quota_info = quota_status
+                        logger.warning("Failed to use quota", user_id=user_id, error=quota_result.get('error'))
+                    if not quota_info:
+                        quota_info = quota_manager.get_quota_status(user_id, user_tier)
 
-                    print(f"Successfully generated {len(tasks)} tasks", file=sys.stderr)
+                    logger.info("Tasks generated", task_count=len(tasks))
 
                     self._send_json_response(200, {
                         "success": True,
@@ -197,32 +231,41 @@ class handler(BaseHTTPRequestHandler):
                     })
 
                 except json.JSONDecodeError as e:
-                    print(f"JSON decode error: {str(e)}", file=sys.stderr)
+                    logger.error("Failed to parse AI response", error=str(e), content_length=len(content))
+                    ai_cache.invalidate('plan_tasks', api_request_body)
                     self._send_json_response(500, {
                         "success": False,
                         "error": f"JSON解析失败: {str(e)}",
                         "raw_response": content
                     })
             else:
-                print(f"API request failed: {response.text[:200]}", file=sys.stderr)
+                logger.error("AI API request failed", status_code=response.status_code, details=response.text[:200])
                 self._send_json_response(response.status_code, {
                     'error': 'API请求失败',
                     'details': response.text[:200]
                 })
 
         except requests.exceptions.Timeout:
-            print("Request timeout", file=sys.stderr)
+            logger.error("AI API request timed out")
             self._send_json_response(504, {'error': '请求超时,请稍后再试'})
         except Exception as e:
-            print(f"Error in handler: {str(e)}", file=sys.stderr)
-            traceback.print_exc(file=sys.stderr)
+            logger.error("Error in handler", error=f"{type(e).__name__}: {e}", traceback=traceback.format_exc())
             self._send_json_response(500, {
                 'error': '服务器内部错误',
                 'details': str(e)
             })
+        finally:
+            if quota_reservation and not quota_settled:
+                logger.info("Generation failed, refunding quota", user_id=user_id)
+                quota_manager.refund_quota(user_id, 'daily_plan', 1)
 
     def _send_json_response(self, status_code, data):
         """发送JSON响应的辅助方法"""
+        # 流式响应已开始时，最终结果作为done/error事件发送
+        if getattr(self, 'event_stream', None) and self.event_stream.started:
+            self.event_stream.finish(status_code, data)
+            return
+
         self.send_response(status_code)
         self.send_header('Content-Type', 'application/json')
         self.send_header('Access-Control-Allow-Origin', getattr(self, 'allowed_origin', '*'))
@@ -8,7 +8,10 @@ sys.path.insert(0, os.path.dirname(__file__))
 
 from quota_manager import QuotaManager
 from cors_config import get_cors_origin
+from logger_util import log_requests
+from http_utils import send_json_with_etag
 
+@log_requests
 class handler(BaseHTTPRequestHandler):
     def do_GET(self):
         print("Quota status function called", file=sys.stderr)
@@ -34,11 +37,7 @@ class handler(BaseHTTPRequestHandler):
 
             print(f"Returning quota: {quota_data}", file=sys.stderr)
 
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.send_header('Access-Control-Allow-Origin', getattr(self, 'allowed_origin', '*'))
-            self.end_headers()
-            self.wfile.write(json.dumps(quota_data).encode('utf-8'))
+            send_json_with_etag(self, quota_data)
 
         except Exception as e:
             print(f"Error getting quota: {e}", file=sys.stderr)
@@ -3,29 +3,57 @@ PyDayBar 配额管理工具
 使用Supabase进行真实配额追踪和管理
 """
 import os
-from datetime import datetime, timedelta
+import threading
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
 from supabase import create_client, Client
-from typing import Dict, Optional, Any
+from typing import Callable, Dict, Optional, Any
 import sys
 
+try:
+    from logger_util import get_logger
+except ImportError:
+    sys.path.insert(0, os.path.dirname(__file__))
+    from logger_util import get_logger
+
+logger = get_logger("quota")
+
 # Supabase配置
 SUPABASE_URL = os.getenv("SUPABASE_URL", "")
-SUPABASE_KEY = os.getenv("SUPABASE_ANON_KEY", "")
+# 配额函数只授权给 service_role(见 consume_user_quota_rpc.sql)
+SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_KEY") or os.getenv("SUPABASE_ANON_KEY", "")
+
+# 原子扣除/退还配额的数据库函数(见 consume_user_quota_rpc.sql)
+CONSUME_QUOTA_RPC = "consume_user_quota"
+REFUND_QUOTA_RPC = "refund_user_quota"
+# 这些函数支持的配额类型(对应 user_quotas 表的 *_used / *_total 列)
+RPC_QUOTA_TYPES = ("daily_plan", "weekly_report", "chat")
+
+# 数据库尚未部署的函数, 当前实例后续直接使用读-改-写方式
+_missing_rpcs = set()
+
 
 class QuotaManager:
     """配额管理器"""
 
-    def __init__(self):
-        """初始化Supabase客户端"""
-        if not SUPABASE_URL or not SUPABASE_KEY:
-            print("WARNING: Supabase credentials not configured", file=sys.stderr)
+    def __init__(self, client=None):
+        """
+        初始化Supabase客户端
+
+        Args:
+            client: 指定客户端(如测试/本地开发使用的LocalQuotaRpc), 默认按环境变量创建
+        """
+        if client is not None:
+            self.client = client
+        elif not SUPABASE_URL or not SUPABASE_KEY:
+            logger.warning("Supabase credentials not configured")
             self.client = None
         else:
             try:
                 self.client: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-                print("Supabase client initialized successfully", file=sys.stderr)
+                logger.debug("Supabase client initialized")
             except Exception as e:
-                print(f"Failed to initialize Supabase client: {e}", file=sys.stderr)
+                logger.error("Failed to initialize Supabase client", error=str(e))
                 self.client = None
 
     def get_or_create_user(self, user_id: str, user_tier: str = "free") -> Optional[Dict]:
@@ -44,14 +72,14 @@ class QuotaManager:
                 # 问题根因: 自动降级会将Pro(20配额)降为Free(3配额),导致配额耗尽
                 # 解决方案: 以数据库tier为准,忽略请求参数中的tier
                 if user_quota.get("user_tier") != user_tier:
-                    print(f"[Quota Warning] Tier mismatch: DB={user_quota.get('user_tier')}, Request={user_tier}. Using DB value.", file=sys.stderr)
+                    logger.warning("Tier mismatch, using DB value", db_tier=user_quota.get('user_tier'), request_tier=user_tier)
                 return self._check_and_reset_quota(user_quota)
             else:
                 # 用户不存在，创建新用户
                 return self._create_user_quota(user_id, user_tier)
 
         except Exception as e:
-            print(f"Error getting user quota: {e}", file=sys.stderr)
+            logger.error("Error getting user quota", error=str(e))
             return self._get_fallback_quota(user_tier)
 
     def _create_user_quota(self, user_id: str, user_tier: str) -> Dict:
@@ -95,10 +123,10 @@ class QuotaManager:
 
         try:
             response = self.client.table("user_quotas").insert(new_user).execute()
-            print(f"Created new user quota for {user_id}", file=sys.stderr)
+            logger.info("Created new user quota", user_id=user_id)
             return response.data[0] if response.data else new_user
         except Exception as e:
-            print(f"Error creating user quota: {e}", file=sys.stderr)
+            logger.error("Error creating user quota", error=str(e))
             return new_user
 
     def _check_and_reset_quota(self, user_quota: Dict) -> Dict:
@@ -139,29 +167,109 @@ class QuotaManager:
         if updates and self.client:
             try:
                 response = self.client.table("user_quotas").update(updates).eq("user_id", user_quota["user_id"]).execute()
-                print(f"Reset quota for user {user_quota['user_id']}: {list(updates.keys())}", file=sys.stderr)
+                logger.info("Reset quota", user_id=user_quota['user_id'], fields=list(updates.keys()))
                 return response.data[0] if response.data else {**user_quota, **updates}
             except Exception as e:
-                print(f"Error resetting quota: {e}", file=sys.stderr)
+                logger.error("Error resetting quota", error=str(e))
                 return {**user_quota, **updates}
 
         return user_quota
 
-    def use_quota(self, user_id: str, quota_type: str, amount: int = 1) -> Dict:
+    def use_quota(self, user_id: str, quota_type: str, amount: int = 1, user_tier: str = "free") -> Dict:
         """
         使用配额
 
+        通过 consume_user_quota 函数一次往返原子地完成重置、检查与扣除,
+        并发请求不会超额; 数据库未部署该函数时回退到读-改-写方式。
+
         Args:
             user_id: 用户ID
             quota_type: 配额类型 (daily_plan, weekly_report, chat, theme_recommend, theme_generate)
             amount: 使用数量
+            user_tier: 用户等级(仅在首次创建配额记录时使用)
+
+        Returns:
+            更新后的配额信息, 包含 full_quota_status (所有类型的剩余配额)
+        """
+        if not self.client:
+            return {"success": False, "error": "Supabase not configured"}
+        if amount < 0:
+            return {"success": False, "error": "Invalid quota amount"}
+
+        result = self._call_quota_rpc(CONSUME_QUOTA_RPC, quota_type, {
+            "p_user_id": user_id,
+            "p_quota_type": quota_type,
+            "p_amount": amount,
+            "p_user_tier": user_tier
+        })
+        if result is not None:
+            return result
+        return self._use_quota_read_modify_write(user_id, quota_type, amount)
+
+    def refund_quota(self, user_id: str, quota_type: str, amount: int = 1) -> Dict:
+        """
+        退还配额(预扣配额后AI调用失败时使用)
 
         Returns:
-            更新后的配额信息
+            退还后的配额信息, 包含 full_quota_status
         """
         if not self.client:
             return {"success": False, "error": "Supabase not configured"}
 
+        result = self._call_quota_rpc(REFUND_QUOTA_RPC, quota_type, {
+            "p_user_id": user_id,
+            "p_quota_type": quota_type,
+            "p_amount": amount
+        })
+        if result is not None:
+            return result
+
+        try:
+            user_quota = self.get_or_create_user(user_id)
+            used_key = f"{quota_type}_used"
+            new_used = max(user_quota.get(used_key, 0) - amount, 0)
+            self.client.table("user_quotas").update({used_key: new_used}).eq("user_id", user_id).execute()
+            logger.info("Refunded quota", user_id=user_id, quota_type=quota_type, amount=amount, new_used=new_used)
+            return {
+                "success": True,
+                "quota_type": quota_type,
+                "used": new_used,
+                "full_quota_status": self._remaining_snapshot({**user_quota, used_key: new_used})
+            }
+        except Exception as e:
+            logger.error("Error refunding quota", error=str(e))
+            return {"success": False, "error": str(e)}
+
+    def _call_quota_rpc(self, rpc: str, quota_type: str, params: Dict) -> Optional[Dict]:
+        """调用 consume_user_quota / refund_user_quota; 函数不可用时返回None"""
+        if rpc in _missing_rpcs or quota_type not in RPC_QUOTA_TYPES:
+            return None
+
+        try:
+            response = self.client.rpc(rpc, params).execute()
+        except Exception as e:
+            message = str(e)
+            if "PGRST202" in message or "Could not find the function" in message:
+                _missing_rpcs.add(rpc)
+                logger.warning("Quota RPC not deployed, using read-modify-write", rpc=rpc, error=message)
+            else:
+                logger.warning("Quota RPC failed, using read-modify-write", rpc=rpc, error=message)
+            return None
+
+        result = response.data
+        if isinstance(result, list):
+            result = result[0] if result else None
+        if not isinstance(result, dict):
+            logger.error("Unexpected quota RPC response", rpc=rpc, response=repr(result))
+            return None
+
+        result = {key: value for key, value in result.items() if value is not None}
+        logger.info("Quota RPC completed", rpc=rpc, user_id=params["p_user_id"], quota_type=quota_type,
+                    amount=params["p_amount"], success=result.get('success'), remaining=result.get('remaining'))
+        return result
+
+    def _use_quota_read_modify_write(self, user_id: str, quota_type: str, amount: int = 1) -> Dict:
+        """读取-检查-更新方式扣除配额(数据库未部署consume_user_quota时的兼容路径, 并发时可能超额)"""
         try:
             # 获取当前配额
             user_quota = self.get_or_create_user(user_id)
@@ -189,15 +297,13 @@ class QuotaManager:
                 used_key: new_used
             }).eq("user_id", user_id).execute()
 
-            print(f"Used {amount} {quota_type} quota for {user_id}, new_used: {new_used}, total: {total_quota}, remaining: {total_quota - new_used}", file=sys.stderr)
+            logger.info("Used quota", user_id=user_id, quota_type=quota_type, amount=amount,
+                        used=new_used, total=total_quota, remaining=total_quota - new_used)
 
             # ✅ P1-1.6.8: 彻底修复配额显示延迟问题
             # 问题根因: L202-206先用旧快照构造字典,L209的覆盖操作可能失效
             # 解决方案: 直接在构造时判断,当前更新的quota_type使用new_used,其他使用快照值
 
-            # 记录快照值用于调试
-            print(f"[Quota Debug] Snapshot values - daily_plan_used: {user_quota.get('daily_plan_used')}, weekly_report_used: {user_quota.get('weekly_report_used')}, chat_used: {user_quota.get('chat_used')}", file=sys.stderr)
-
             # 构造remaining_quotas:直接使用正确的值,无需后续覆盖
             def get_remaining(qtype: str, total_key: str, used_key: str) -> int:
                 """获取剩余配额:当前更新的类型使用new_used,其他使用快照值"""
@@ -214,10 +320,13 @@ class QuotaManager:
                 "chat": get_remaining("chat", "chat_total", "chat_used")
             }
 
-            # 记录构造结果用于验证
-            print(f"[Quota Debug] Constructed remaining_quotas: {remaining_quotas}", file=sys.stderr)
-            print(f"[Quota Debug] Current quota_type: {quota_type}, new_used: {new_used}, calculated_remaining: {total_quota - new_used}", file=sys.stderr)
-            print(f"[Quota Debug] Returning full response: remaining={total_quota - new_used}, full_status={remaining_quotas}", file=sys.stderr)
+            # 记录快照与构造结果用于调试(仅LOG_LEVEL=DEBUG时格式化)
+            logger.debug(
+                "Quota snapshot",
+                quota_type=quota_type,
+                snapshot=lambda: {k: user_quota.get(k) for k in ("daily_plan_used", "weekly_report_used", "chat_used")},
+                remaining_quotas=remaining_quotas,
+            )
 
             return {
                 "success": True,
@@ -232,7 +341,7 @@ class QuotaManager:
             }
 
         except Exception as e:
-            print(f"Error using quota: {e}", file=sys.stderr)
+            logger.error("Error using quota", error=str(e))
             return {"success": False, "error": str(e)}
 
     def _update_user_tier(self, user_id: str, new_tier: str, old_quota: Dict):
@@ -259,10 +368,10 @@ class QuotaManager:
 
             # 更新数据库
             self.client.table("user_quotas").update(new_quotas).eq("user_id", user_id).execute()
-            print(f"Updated user tier from {old_quota.get('user_tier')} to {new_tier}", file=sys.stderr)
+            logger.info("Updated user tier", old_tier=old_quota.get('user_tier'), new_tier=new_tier)
 
         except Exception as e:
-            print(f"Error updating user tier: {e}", file=sys.stderr)
+            logger.error("Error updating user tier", error=str(e))
 
     def get_quota_status(self, user_id: str, user_tier: str = "free") -> Dict:
         """获取配额状态"""
@@ -271,6 +380,11 @@ class QuotaManager:
         if not user_quota:
             return self._get_fallback_quota(user_tier)
 
+        return self._remaining_snapshot(user_quota, user_tier)
+
+    @staticmethod
+    def _remaining_snapshot(user_quota: Dict, user_tier: str = "free") -> Dict:
+        """由配额记录计算各类型剩余配额"""
         return {
             "remaining": {
                 "daily_plan": user_quota.get("daily_plan_total", 3) - user_quota.get("daily_plan_used", 0),
@@ -302,3 +416,114 @@ class QuotaManager:
                 "chat_used": 0,
                 "user_tier": user_tier
             }
+
+
+class _LocalRpcCall:
+    """模拟Supabase的 rpc(...) 调用对象"""
+
+    def __init__(self, func: Callable[[], Dict]):
+        self._func = func
+
+    def execute(self):
+        return SimpleNamespace(data=self._func())
+
+
+class LocalQuotaRpc:
+    """
+    consume_user_quota / refund_user_quota 的进程内等价实现
+
+    提供与Supabase客户端相同的 rpc(name, params).execute() 调用方式,
+    用于测试和本地开发(无需部署SQL函数); 行锁由进程内的锁代替。
+    """
+
+    def __init__(self, now: Optional[Callable[[], datetime]] = None):
+        self.rows: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._now = now or (lambda: datetime.now(timezone(timedelta(hours=8))))
+
+    def rpc(self, name: str, params: Dict) -> _LocalRpcCall:
+        if name == CONSUME_QUOTA_RPC:
+            return _LocalRpcCall(lambda: self.consume_user_quota(**params))
+        if name == REFUND_QUOTA_RPC:
+            return _LocalRpcCall(lambda: self.refund_user_quota(**params))
+        raise Exception(f"PGRST202: Could not find the function public.{name}")
+
+    def refund_user_quota(self, p_user_id: str, p_quota_type: str, p_amount: int = 1) -> Dict:
+        if p_quota_type not in RPC_QUOTA_TYPES:
+            raise Exception(f"Unknown quota type: {p_quota_type}")
+        if p_amount is None or p_amount < 0:
+            raise Exception(f"Invalid refund amount: {p_amount}")
+
+        with self._lock:
+            row = self.rows.get(p_user_id)
+            if row is None:
+                return {"success": False, "error": "No quota record", "quota_type": p_quota_type}
+
+            used = max(row[f"{p_quota_type}_used"] - p_amount, 0)
+            row[f"{p_quota_type}_used"] = used
+            total = row[f"{p_quota_type}_total"]
+            return {
+                "success": True,
+                "quota_type": p_quota_type,
+                "used": used,
+                "total": total,
+                "remaining": total - used,
+                "refunded": p_amount,
+                "full_quota_status": QuotaManager._remaining_snapshot(row),
+            }
+
+    def consume_user_quota(self, p_user_id: str, p_quota_type: str,
+                           p_amount: int = 1, p_user_tier: str = "free") -> Dict:
+        if p_quota_type not in RPC_QUOTA_TYPES:
+            raise Exception(f"Unknown quota type: {p_quota_type}")
+        if p_amount is None or p_amount < 0:
+            raise Exception(f"Invalid quota amount: {p_amount}")
+
+        now = self._now()
+        tomorrow = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+        next_week = (now + timedelta(days=7)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+        with self._lock:
+            row = self.rows.get(p_user_id)
+            if row is None:
+                pro = p_user_tier == "pro"
+                row = {
+                    "user_id": p_user_id,
+                    "user_tier": p_user_tier,
+                    "daily_plan_total": 20 if pro else 3,
+                    "weekly_report_total": 10 if pro else 1,
+                    "chat_total": 100 if pro else 10,
+                    "daily_plan_used": 0,
+                    "weekly_report_used": 0,
+                    "chat_used": 0,
+                    "daily_plan_reset_at": tomorrow,
+                    "weekly_report_reset_at": next_week,
+                    "chat_reset_at": tomorrow,
+                }
+                self.rows[p_user_id] = row
+
+            for qtype, next_reset in (("daily_plan", tomorrow), ("chat", tomorrow), ("weekly_report", next_week)):
+                reset_at = row.get(f"{qtype}_reset_at")
+                if reset_at is not None and now >= reset_at:
+                    row[f"{qtype}_used"] = 0
+                    row[f"{qtype}_reset_at"] = next_reset
+
+            used = row[f"{p_quota_type}_used"]
+            total = row[f"{p_quota_type}_total"]
+            success = not (p_amount > 0 and used + p_amount > total)
+            if success:
+                used = used + p_amount
+                row[f"{p_quota_type}_used"] = used
+
+            result = {
+                "success": success,
+                "quota_type": p_quota_type,
+                "used": used,
+                "total": total,
+                "remaining": total - used,
+                "requested": p_amount,
+                "full_quota_status": QuotaManager._remaining_snapshot(row),
+            }
+            if not success:
+                result["error"] = "Quota exceeded"
+            return result
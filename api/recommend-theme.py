@@ -9,15 +9,19 @@ import traceback
 sys.path.insert(0, os.path.dirname(__file__))
 
 from cors_config import get_cors_origin
+from logger_util import get_logger
+from ai_response_cache import get_ai_response_cache
 
 TUZI_API_KEY = os.getenv("TUZI_API_KEY")
 TUZI_BASE_URL = os.getenv("TUZI_BASE_URL", "https://api.tu-zi.com/v1")
 
+logger = get_logger("recommend-theme")
+
 
 class handler(BaseHTTPRequestHandler):
     def do_OPTIONS(self):
         """处理CORS预检请求"""
-        print("CORS preflight request for recommend-theme", file=sys.stderr)
+        logger.debug("CORS preflight request")
         # ✅ 安全修复: CORS源白名单验证
         request_origin = self.headers.get('Origin', '')
         allowed_origin = get_cors_origin(request_origin)
@@ -31,21 +35,21 @@ class handler(BaseHTTPRequestHandler):
 
     def do_POST(self):
         """处理POST请求 - 主题推荐"""
-        print("Recommend theme function called", file=sys.stderr)
+        logger.info("Recommend theme function called")
 
         # ✅ 安全修复: CORS源白名单验证
         request_origin = self.headers.get('Origin', '')
         self.allowed_origin = get_cors_origin(request_origin)
 
         if not TUZI_API_KEY:
-            print("API key not configured", file=sys.stderr)
+            logger.error("API key not configured")
             self._send_json_response(500, {"error": "API密钥未配置"})
             return
 
         try:
             content_length = int(self.headers.get("Content-Length", 0))
             body = self.rfile.read(content_length).decode("utf-8") if content_length else ""
-            print(f"Request body: {body[:200]}", file=sys.stderr)
+            logger.debug("Request received", body_length=len(body))
 
             user_data = json.loads(body) if body else {}
             tasks = user_data.get("tasks", [])
@@ -97,20 +101,20 @@ class handler(BaseHTTPRequestHandler):
                 "temperature": 0.7,
             }
 
-            response = requests.post(
+            # 转发请求到上游(带响应缓存和并发去重)
+            response = get_ai_response_cache().chat_completion(
+                "recommend_theme",
                 api_url,
-                headers={
-                    "Authorization": f"Bearer {TUZI_API_KEY}",
-                    "Content-Type": "application/json",
-                },
-                json=api_request_body,
+                TUZI_API_KEY,
+                api_request_body,
                 timeout=60,
+                user_id=user_data.get("user_id", "anonymous"),
             )
 
-            print(f"API response status: {response.status_code}", file=sys.stderr)
+            logger.info("AI API responded", status_code=response.status_code, cache_hit=response.cache_hit)
 
             if response.status_code == 200:
-                api_response = response.json()
+                api_response = response.data
                 content = api_response["choices"][0]["message"]["content"].strip()
 
                 if "```" in content:
@@ -126,7 +130,7 @@ class handler(BaseHTTPRequestHandler):
                         rec.setdefault("theme_id", f"recommended_{idx}")
                         rec.setdefault("config", {})
 
-                    print(f"Generated {len(recommendations)} recommendations", file=sys.stderr)
+                    logger.info("Recommendations generated", recommendation_count=len(recommendations))
 
                     self._send_json_response(
                         200,
@@ -140,7 +144,7 @@ class handler(BaseHTTPRequestHandler):
                         },
                     )
                 except json.JSONDecodeError as e:
-                    print(f"JSON decode error: {str(e)}", file=sys.stderr)
+                    logger.error("JSON decode error", error=str(e))
                     self._send_json_response(
                         500,
                         {
@@ -150,7 +154,7 @@ class handler(BaseHTTPRequestHandler):
                         },
                     )
             else:
-                print(f"API request failed: {response.text[:200]}", file=sys.stderr)
+                logger.error("AI API request failed", status_code=response.status_code, details=response.text[:200])
                 self._send_json_response(
                     response.status_code,
                     {
@@ -160,14 +164,13 @@ class handler(BaseHTTPRequestHandler):
                 )
 
         except json.JSONDecodeError as e:
-            print(f"JSON decode error: {str(e)}", file=sys.stderr)
+            logger.error("JSON decode error", error=str(e))
             self._send_json_response(400, {"error": f"请求数据格式错误: {str(e)}"})
         except requests.exceptions.Timeout:
-            print("Request timeout", file=sys.stderr)
+            logger.error("AI API request timed out")
             self._send_json_response(504, {"error": "请求超时,请稍后再试"})
         except Exception as e:
-            print(f"Error in handler: {str(e)}", file=sys.stderr)
-            traceback.print_exc(file=sys.stderr)
+            logger.error("Error in handler", error=f"{type(e).__name__}: {e}", traceback=traceback.format_exc())
             self._send_json_response(
                 500,
                 {
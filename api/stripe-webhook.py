@@ -2,21 +2,24 @@
 Stripe Webhook处理API
 POST /api/stripe-webhook
 接收Stripe的webhook事件通知
+验签后写入幂等账本并立即确认, 订阅变更由 webhook_jobs.WebhookJobProcessor 完成
 """
 from http.server import BaseHTTPRequestHandler
-import json
 import sys
 import os
+from typing import Dict, Optional
 
 try:
     from stripe_manager import StripeManager
-    from subscription_manager import SubscriptionManager
     from supabase import create_client, Client
+    from webhook_jobs import WebhookJobProcessor, WebhookLedger, accept_webhook_event
+    from logger_util import log_requests
 except ImportError:
     sys.path.insert(0, os.path.dirname(__file__))
     from stripe_manager import StripeManager
-    from subscription_manager import SubscriptionManager
     from supabase import create_client, Client
+    from webhook_jobs import WebhookJobProcessor, WebhookLedger, accept_webhook_event
+    from logger_util import log_requests
 
 # Supabase配置
 SUPABASE_URL = os.getenv("SUPABASE_URL", "")
@@ -24,6 +27,7 @@ SUPABASE_URL = os.getenv("SUPABASE_URL", "")
 SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_KEY") or os.getenv("SUPABASE_ANON_KEY", "")
 
 
+@log_requests
 class handler(BaseHTTPRequestHandler):
     """Stripe Webhook处理器"""
 
@@ -59,22 +63,25 @@ class handler(BaseHTTPRequestHandler):
 
             print(f"[STRIPE-WEBHOOK] Received event: {event_type}", file=sys.stderr)
 
-            # 4. 处理不同事件类型
-            if event_type == "checkout.session.completed":
-                self._handle_checkout_completed(event)
-            elif event_type == "customer.subscription.updated":
-                self._handle_subscription_updated(event)
-            elif event_type == "customer.subscription.deleted":
-                self._handle_subscription_deleted(event)
-            elif event_type == "invoice.payment_succeeded":
-                self._handle_invoice_paid(event)
-            elif event_type == "invoice.payment_failed":
-                self._handle_payment_failed(event)
-            else:
-                print(f"[STRIPE-WEBHOOK] Unhandled event type: {event_type}", file=sys.stderr)
+            # 4. 将事件转换为履约任务(不需要写库的事件直接确认)
+            job = self._build_job(event)
+            if job is None:
+                self._send_response(200, "OK")
+                return
+
+            # 5. 写入幂等账本: Stripe重发的同一事件在数据库层被拒绝
+            try:
+                ledger = WebhookLedger()
+                recorded = accept_webhook_event("stripe", event["id"], event_type, job, ledger)
+            except Exception as e:
+                print(f"[STRIPE-WEBHOOK] Failed to record event: {type(e).__name__}: {e}", file=sys.stderr)
+                self._send_response(500, "Failed to record event")
+                return
 
-            # 5. 返回成功响应
+            # 6. 立即确认, 然后履约(失败时事件留在账本中, 由 webhook-worker 重试)
             self._send_response(200, "OK")
+            if recorded:
+                WebhookJobProcessor(ledger).process(recorded)
 
         except Exception as e:
             print(f"[STRIPE-WEBHOOK] Error: {e}", file=sys.stderr)
@@ -82,284 +89,167 @@ class handler(BaseHTTPRequestHandler):
             traceback.print_exc(file=sys.stderr)
             self._send_response(500, f"Internal error: {str(e)}")
 
-    def _handle_checkout_completed(self, event):
-        """处理Checkout Session完成事件"""
-        try:
-            session = event["data"]["object"]
-
-            # 提取信息
-            session_id = session["id"]
-            customer_email = session.get("customer_email", "")
-            customer_id = session.get("customer", "")
-            payment_status = session.get("payment_status", "")
-            mode = session.get("mode", "")  # payment/subscription
-
-            # 从metadata获取用户信息
-            metadata = session.get("metadata", {})
-            user_id = metadata.get("user_id")
-            plan_type = metadata.get("plan_type")
-
-            # 如果metadata中没有信息，尝试从其他地方获取
-            if not user_id:
-                # 尝试从customer_details获取email，然后查找用户
-                customer_details = session.get("customer_details", {})
-                customer_email = customer_details.get("email") or session.get("customer_email", "")
-
-                if customer_email:
-                    print(f"[STRIPE-WEBHOOK] No user_id in metadata, looking up by email: {customer_email}", file=sys.stderr)
-                    user_id = self._get_user_id_by_email(customer_email)
-
-                if not user_id:
-                    print(f"[STRIPE-WEBHOOK] Cannot find user_id for email: {customer_email}", file=sys.stderr)
-                    return
-
-            # 如果没有plan_type，从金额推断
-            if not plan_type:
-                amount_total = session.get("amount_total", 0) / 100  # 转换为美元
-                plan_type = self._infer_plan_type(amount_total)
-                print(f"[STRIPE-WEBHOOK] Inferred plan_type from amount ${amount_total}: {plan_type}", file=sys.stderr)
+    def _build_job(self, event) -> Optional[Dict]:
+        """根据事件类型生成履约任务, 无需处理时返回None"""
+        event_type = event["type"]
+        if event_type == "checkout.session.completed":
+            return self._checkout_completed_job(event)
+        if event_type == "customer.subscription.updated":
+            return self._subscription_updated_job(event)
+        if event_type == "customer.subscription.deleted":
+            return self._subscription_deleted_job(event)
+        if event_type == "invoice.payment_succeeded":
+            self._log_invoice_paid(event)
+        elif event_type == "invoice.payment_failed":
+            self._log_payment_failed(event)
+        else:
+            print(f"[STRIPE-WEBHOOK] Unhandled event type: {event_type}", file=sys.stderr)
+        return None
 
-                if not plan_type:
-                    print(f"[STRIPE-WEBHOOK] Cannot infer plan_type from amount: ${amount_total}", file=sys.stderr)
-                    return
+    def _checkout_completed_job(self, event) -> Optional[Dict]:
+        """处理Checkout Session完成事件"""
+        session = event["data"]["object"]
 
-            print(f"[STRIPE-WEBHOOK] Checkout completed: user={user_id}, plan={plan_type}, mode={mode}", file=sys.stderr)
+        # 提取信息
+        session_id = session["id"]
+        customer_id = session.get("customer", "")
+        payment_status = session.get("payment_status", "")
+        mode = session.get("mode", "")  # payment/subscription
 
-            # 检查支付状态
-            if payment_status != "paid":
-                print(f"[STRIPE-WEBHOOK] Payment not completed: {payment_status}", file=sys.stderr)
-                return
+        # 从metadata获取用户信息
+        metadata = session.get("metadata", {})
+        user_id = metadata.get("user_id")
+        plan_type = metadata.get("plan_type")
 
-            # 获取金额（单位：分）
-            amount_total = session.get("amount_total", 0) / 100  # 转换为美元
+        # 如果metadata中没有信息，尝试从其他地方获取
+        if not user_id:
+            # 尝试从customer_details获取email，然后查找用户
+            customer_details = session.get("customer_details", {})
+            customer_email = customer_details.get("email") or session.get("customer_email", "")
 
-            # 获取订阅ID（如果是订阅模式）
-            subscription_id = session.get("subscription", "")
+            if customer_email:
+                print(f"[STRIPE-WEBHOOK] No user_id in metadata, looking up by email: {customer_email}", file=sys.stderr)
+                user_id = self._get_user_id_by_email(customer_email)
 
-            # 检查是否已处理
-            if self._is_session_processed(session_id):
-                print(f"[STRIPE-WEBHOOK] Session already processed: {session_id}", file=sys.stderr)
-                return
-
-            # 创建支付记录
-            payment_id = self._create_payment_record(
-                user_id=user_id,
-                order_id=session_id,
-                trade_no=subscription_id or session_id,
-                amount=amount_total,
-                plan_type=plan_type,
-                payment_method="stripe",
-                currency="USD",
-                stripe_customer_id=customer_id,
-                stripe_subscription_id=subscription_id
-            )
-
-            if not payment_id:
-                print(f"[STRIPE-WEBHOOK] Failed to create payment record", file=sys.stderr)
-                return
+            if not user_id:
+                print(f"[STRIPE-WEBHOOK] Cannot find user_id for email: {customer_email}", file=sys.stderr)
+                return None
 
-            # 创建订阅并激活会员
-            sub_manager = SubscriptionManager()
-            result = sub_manager.create_subscription(
-                user_id=user_id,
-                plan_type=plan_type,
-                payment_id=payment_id,
-                stripe_subscription_id=subscription_id,
-                stripe_customer_id=customer_id
-            )
-
-            if result["success"]:
-                print(f"[STRIPE-WEBHOOK] Subscription activated for user {user_id}", file=sys.stderr)
-            else:
-                print(f"[STRIPE-WEBHOOK] Failed to create subscription: {result.get('error')}", file=sys.stderr)
+        # 获取金额（单位：分）
+        amount_total = session.get("amount_total", 0) / 100  # 转换为美元
 
-        except Exception as e:
-            print(f"[STRIPE-WEBHOOK] Error handling checkout completed: {e}", file=sys.stderr)
-            import traceback
-            traceback.print_exc(file=sys.stderr)
+        # 如果没有plan_type，从金额推断
+        if not plan_type:
+            plan_type = self._infer_plan_type(amount_total)
+            print(f"[STRIPE-WEBHOOK] Inferred plan_type from amount ${amount_total}: {plan_type}", file=sys.stderr)
 
-    def _handle_subscription_updated(self, event):
+            if not plan_type:
+                print(f"[STRIPE-WEBHOOK] Cannot infer plan_type from amount: ${amount_total}", file=sys.stderr)
+                return None
+
+        print(f"[STRIPE-WEBHOOK] Checkout completed: user={user_id}, plan={plan_type}, mode={mode}", file=sys.stderr)
+
+        # 检查支付状态
+        if payment_status != "paid":
+            print(f"[STRIPE-WEBHOOK] Payment not completed: {payment_status}", file=sys.stderr)
+            return None
+
+        # 获取订阅ID（如果是订阅模式）
+        subscription_id = session.get("subscription", "")
+
+        return {
+            "kind": "subscription_payment",
+            "user_id": user_id,
+            "plan_type": plan_type,
+            "payment": {
+                "order_id": session_id,
+                "trade_no": subscription_id or session_id,
+                "amount": amount_total,
+                "currency": "USD",
+                "payment_method": "stripe",
+                "stripe_customer_id": customer_id,
+                "stripe_subscription_id": subscription_id,
+            },
+            # 以session_id为订单号唤醒在payment-wait上等待的客户端
+            "status_record": {
+                "out_trade_no": session_id,
+                "trade_no": subscription_id or session_id,
+                "money": amount_total,
+                "param": f"{user_id}|{plan_type}",
+                "name": plan_type,
+                "type": "stripe",
+            },
+        }
+
+    def _subscription_updated_job(self, event) -> Optional[Dict]:
         """处理订阅更新事件"""
-        try:
-            subscription = event["data"]["object"]
-            subscription_id = subscription["id"]
-            status = subscription["status"]
-
-            metadata = subscription.get("metadata", {})
-            user_id = metadata.get("user_id")
-
-            print(f"[STRIPE-WEBHOOK] Subscription updated: {subscription_id}, status={status}", file=sys.stderr)
-
-            if user_id:
-                # 更新用户订阅状态
-                self._update_subscription_status(user_id, subscription_id, status)
-
-        except Exception as e:
-            print(f"[STRIPE-WEBHOOK] Error handling subscription update: {e}", file=sys.stderr)
-
-    def _handle_subscription_deleted(self, event):
+        subscription = event["data"]["object"]
+        subscription_id = subscription["id"]
+        status = subscription["status"]
+
+        metadata = subscription.get("metadata", {})
+        user_id = metadata.get("user_id")
+
+        print(f"[STRIPE-WEBHOOK] Subscription updated: {subscription_id}, status={status}", file=sys.stderr)
+
+        if not user_id:
+            return None
+
+        # 根据Stripe状态映射到我们的状态
+        status_map = {
+            "active": "active",
+            "past_due": "past_due",
+            "canceled": "canceled",
+            "unpaid": "unpaid",
+            "trialing": "active"
+        }
+
+        return {
+            "kind": "subscription_status",
+            "user_id": user_id,
+            "subscription_id": subscription_id,
+            "status": status_map.get(status, status),
+            "stripe_status": status,
+        }
+
+    def _subscription_deleted_job(self, event) -> Optional[Dict]:
         """处理订阅取消事件"""
-        try:
-            subscription = event["data"]["object"]
-            subscription_id = subscription["id"]
+        subscription = event["data"]["object"]
+        subscription_id = subscription["id"]
 
-            metadata = subscription.get("metadata", {})
-            user_id = metadata.get("user_id")
+        metadata = subscription.get("metadata", {})
+        user_id = metadata.get("user_id")
 
-            print(f"[STRIPE-WEBHOOK] Subscription deleted: {subscription_id}", file=sys.stderr)
+        print(f"[STRIPE-WEBHOOK] Subscription deleted: {subscription_id}", file=sys.stderr)
 
-            if user_id:
-                # 取消用户订阅
-                self._cancel_user_subscription(user_id, subscription_id)
+        if not user_id:
+            return None
 
-        except Exception as e:
-            print(f"[STRIPE-WEBHOOK] Error handling subscription deletion: {e}", file=sys.stderr)
+        return {
+            "kind": "subscription_canceled",
+            "user_id": user_id,
+            "subscription_id": subscription_id,
+        }
 
-    def _handle_invoice_paid(self, event):
+    def _log_invoice_paid(self, event):
         """处理发票支付成功事件（续费）"""
-        try:
-            invoice = event["data"]["object"]
-            subscription_id = invoice.get("subscription")
-            customer_id = invoice.get("customer")
-            amount_paid = invoice.get("amount_paid", 0) / 100
+        invoice = event["data"]["object"]
+        subscription_id = invoice.get("subscription")
+        amount_paid = invoice.get("amount_paid", 0) / 100
 
-            print(f"[STRIPE-WEBHOOK] Invoice paid: subscription={subscription_id}, amount=${amount_paid}", file=sys.stderr)
+        print(f"[STRIPE-WEBHOOK] Invoice paid: subscription={subscription_id}, amount=${amount_paid}", file=sys.stderr)
 
-            # 这里可以记录续费记录或发送通知
+        # 这里可以记录续费记录或发送通知
 
-        except Exception as e:
-            print(f"[STRIPE-WEBHOOK] Error handling invoice paid: {e}", file=sys.stderr)
-
-    def _handle_payment_failed(self, event):
+    def _log_payment_failed(self, event):
         """处理支付失败事件"""
-        try:
-            invoice = event["data"]["object"]
-            subscription_id = invoice.get("subscription")
-            customer_email = invoice.get("customer_email")
+        invoice = event["data"]["object"]
+        subscription_id = invoice.get("subscription")
+        customer_email = invoice.get("customer_email")
 
-            print(f"[STRIPE-WEBHOOK] Payment failed: subscription={subscription_id}, email={customer_email}", file=sys.stderr)
+        print(f"[STRIPE-WEBHOOK] Payment failed: subscription={subscription_id}, email={customer_email}", file=sys.stderr)
 
-            # 这里可以发送邮件通知用户更新支付方式
-
-        except Exception as e:
-            print(f"[STRIPE-WEBHOOK] Error handling payment failed: {e}", file=sys.stderr)
-
-    def _is_session_processed(self, session_id: str) -> bool:
-        """检查Session是否已处理"""
-        try:
-            if not SUPABASE_URL or not SUPABASE_KEY:
-                return False
-
-            supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-
-            result = supabase.table("payments").select("id").eq("order_id", session_id).execute()
-
-            return len(result.data) > 0
-
-        except Exception as e:
-            print(f"[STRIPE-WEBHOOK] Error checking session: {e}", file=sys.stderr)
-            return False
-
-    def _create_payment_record(
-        self,
-        user_id: str,
-        order_id: str,
-        trade_no: str,
-        amount: float,
-        plan_type: str,
-        payment_method: str,
-        currency: str = "USD",
-        stripe_customer_id: str = "",
-        stripe_subscription_id: str = ""
-    ) -> str:
-        """创建支付记录"""
-        try:
-            if not SUPABASE_URL or not SUPABASE_KEY:
-                print("[STRIPE-WEBHOOK] Supabase not configured", file=sys.stderr)
-                return ""
-
-            supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-
-            # item_type统一设为subscription（所有会员购买都是订阅类型）
-            item_type = "subscription"
-
-            payment_data = {
-                "user_id": user_id,
-                "order_id": order_id,
-                "trade_no": trade_no,
-                "amount": amount,
-                "currency": currency,
-                "plan_type": plan_type,
-                "payment_method": payment_method,
-                "status": "completed",
-                "item_type": item_type,
-                "stripe_customer_id": stripe_customer_id,
-                "stripe_subscription_id": stripe_subscription_id
-            }
-
-            result = supabase.table("payments").insert(payment_data).execute()
-
-            if result.data and len(result.data) > 0:
-                return result.data[0]["id"]
-
-            return ""
-
-        except Exception as e:
-            print(f"[STRIPE-WEBHOOK] Error creating payment record: {e}", file=sys.stderr)
-            return ""
-
-    def _update_subscription_status(self, user_id: str, subscription_id: str, status: str):
-        """更新订阅状态"""
-        try:
-            if not SUPABASE_URL or not SUPABASE_KEY:
-                return
-
-            supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-
-            # 根据Stripe状态映射到我们的状态
-            status_map = {
-                "active": "active",
-                "past_due": "past_due",
-                "canceled": "canceled",
-                "unpaid": "unpaid",
-                "trialing": "active"
-            }
-
-            our_status = status_map.get(status, status)
-
-            supabase.table("subscriptions").update({
-                "status": our_status,
-                "stripe_status": status
-            }).eq("stripe_subscription_id", subscription_id).execute()
-
-            print(f"[STRIPE-WEBHOOK] Updated subscription status: {subscription_id} -> {our_status}", file=sys.stderr)
-
-        except Exception as e:
-            print(f"[STRIPE-WEBHOOK] Error updating subscription status: {e}", file=sys.stderr)
-
-    def _cancel_user_subscription(self, user_id: str, subscription_id: str):
-        """取消用户订阅"""
-        try:
-            if not SUPABASE_URL or not SUPABASE_KEY:
-                return
-
-            supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-
-            # 更新订阅状态为已取消
-            supabase.table("subscriptions").update({
-                "status": "canceled",
-                "stripe_status": "canceled"
-            }).eq("stripe_subscription_id", subscription_id).execute()
-
-            # 更新用户等级为免费
-            supabase.table("users").update({
-                "user_tier": "free"
-            }).eq("id", user_id).execute()
-
-            print(f"[STRIPE-WEBHOOK] Cancelled subscription for user {user_id}", file=sys.stderr)
-
-        except Exception as e:
-            print(f"[STRIPE-WEBHOOK] Error cancelling subscription: {e}", file=sys.stderr)
+        # 这里可以发送邮件通知用户更新支付方式
 
     def _get_user_id_by_email(self, email: str) -> str:
         """通过邮箱查找用户ID"""
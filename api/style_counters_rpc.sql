@@ -0,0 +1,46 @@
+-- 创建 RPC 函数用于原子更新样式/时间标记的计数器(收藏数、下载数)
+-- 单条 UPDATE 完成加减, 避免"先读后写"在并发收藏/购买时丢失更新
+
+CREATE OR REPLACE FUNCTION increment_item_counter(
+    p_table TEXT,
+    p_item_id UUID,
+    p_column TEXT,
+    p_delta INTEGER
+)
+RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = ''
+AS $$
+DECLARE
+    v_count INTEGER;
+BEGIN
+    -- 只允许更新已知的表和计数列(表名/列名无法参数化, 必须白名单校验)
+    IF p_table NOT IN ('progress_bar_styles', 'time_markers') THEN
+        RAISE EXCEPTION 'Unsupported table: %', p_table;
+    END IF;
+    IF p_column NOT IN ('favorites', 'downloads') THEN
+        RAISE EXCEPTION 'Unsupported counter column: %', p_column;
+    END IF;
+    -- 每次收藏/取消收藏/下载只加减1
+    IF p_delta IS NULL OR p_delta NOT IN (-1, 1) THEN
+        RAISE EXCEPTION 'Counter delta must be 1 or -1, got %', p_delta;
+    END IF;
+
+    EXECUTE format(
+        'UPDATE public.%I SET %I = GREATEST(COALESCE(%I, 0) + $1, 0) WHERE id = $2 RETURNING %I',
+        p_table, p_column, p_column, p_column
+    )
+    INTO v_count
+    USING p_delta, p_item_id;
+
+    RETURN v_count;
+END;
+$$;
+
+-- 仅服务端(service_role)可以调用: API使用 SUPABASE_SERVICE_KEY 并自行校验用户身份
+REVOKE EXECUTE ON FUNCTION increment_item_counter(TEXT, UUID, TEXT, INTEGER) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION increment_item_counter(TEXT, UUID, TEXT, INTEGER) TO service_role;
+
+-- 添加注释
+COMMENT ON FUNCTION increment_item_counter IS '原子地增减样式/时间标记的收藏数或下载数,返回更新后的值';
@@ -2,23 +2,58 @@
 GaiYa每日进度条 - 样式管理器
 管理进度条样式和时间标记的下载、购买、收藏等功能
 """
+import hashlib
+import json
 import os
+import threading
+import time
 from datetime import datetime
-from typing import Dict, Optional, List
+from typing import Dict, Optional, List, Tuple
 from supabase import create_client, Client
 import sys
 
 # Supabase配置
 SUPABASE_URL = os.getenv("SUPABASE_URL", "")
-SUPABASE_KEY = os.getenv("SUPABASE_ANON_KEY", "")
+# 计数器函数只授权给 service_role(见 style_counters_rpc.sql)
+SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_KEY") or os.getenv("SUPABASE_ANON_KEY", "")
+
+# 公共样式目录快照在实例内的有效期（秒），与styles-list的边缘缓存时间一致
+CATALOG_TTL_SECONDS = int(os.getenv("STYLE_CATALOG_TTL", "300"))
+
+# 原子更新收藏数/下载数的数据库函数(见 style_counters_rpc.sql)
+INCREMENT_COUNTER_RPC = "increment_item_counter"
+
+ITEM_TABLES = {"style": "progress_bar_styles", "marker": "time_markers"}
+
+# 公共目录快照: (等级范围, 分类, 仅精选) -> (过期时间, 快照)
+_catalog_cache: Dict[Tuple, Tuple[float, Dict]] = {}
+_catalog_lock = threading.Lock()
+
+
+def catalog_scope(user_tier: str) -> str:
+    """目录按等级只分两种: 免费用户只能看到free样式, 其他等级看到全部"""
+    return "free" if user_tier == "free" else "all"
+
+
+def clear_catalog_cache():
+    """清空目录快照(样式发布/下架后或测试时使用)"""
+    with _catalog_lock:
+        _catalog_cache.clear()
 
 
 class StyleManager:
     """样式管理器"""
 
-    def __init__(self):
-        """初始化Supabase客户端"""
-        if not SUPABASE_URL or not SUPABASE_KEY:
+    def __init__(self, client=None):
+        """
+        初始化Supabase客户端
+
+        Args:
+            client: 指定客户端(测试时使用), 默认按环境变量创建
+        """
+        if client is not None:
+            self.client = client
+        elif not SUPABASE_URL or not SUPABASE_KEY:
             print("WARNING: Supabase credentials not configured", file=sys.stderr)
             self.client = None
         else:
@@ -52,47 +87,101 @@ class StyleManager:
             return []
 
         try:
-            # 1. 构建查询
-            query = self.client.table("progress_bar_styles").select("*")
+            # 1. 公共目录(实例内快照, 不随用户变化)
+            catalog = self.get_catalog_snapshot(user_tier, category, featured_only)
 
-            # 根据用户等级筛选
-            if user_tier == "free":
-                # 免费用户：基础样式 + 已购买的样式
-                query = query.eq("tier", "free")
-            # Pro/Lifetime用户可以看到所有样式（free + pro）
+            # 2. 叠加用户自己的数据: 已购买的样式与收藏标记
+            overlay = self.get_user_overlay(user_id, user_tier)
+            styles = self.merge_overlay(catalog["styles"], overlay)
 
-            # 分类筛选
-            if category:
-                query = query.eq("category", category)
+            print(f"Retrieved {len(styles)} styles for user {user_id}", file=sys.stderr)
 
-            # 仅精选
-            if featured_only:
-                query = query.eq("featured", True)
+            return styles
 
-            # 仅显示已发布的样式
-            query = query.eq("status", "published")
+        except Exception as e:
+            print(f"Error getting available styles: {e}", file=sys.stderr)
+            return []
 
-            response = query.order("created_at", desc=True).execute()
+    def get_catalog_snapshot(
+        self,
+        user_tier: str,
+        category: Optional[str] = None,
+        featured_only: bool = False
+    ) -> Dict:
+        """
+        获取公共样式目录快照
 
-            styles = response.data if response.data else []
+        目录与用户无关, 在实例内缓存 CATALOG_TTL_SECONDS 秒;
+        version 为内容哈希, 内容不变时各实例得到相同的版本号(用作ETag)。
 
-            # 2. 如果是免费用户，添加已购买的样式
-            if user_tier == "free":
-                purchased_styles = self._get_purchased_styles(user_id, "style")
-                styles.extend(purchased_styles)
+        Returns:
+            {"version": "...", "styles": [...]}
+        """
+        if not self.client:
+            return {"version": "", "styles": []}
 
-            # 3. 添加是否已收藏的标记
-            favorite_ids = self._get_user_favorite_ids(user_id, "style")
-            for style in styles:
-                style["is_favorited"] = style["id"] in favorite_ids
+        key = (catalog_scope(user_tier), category, featured_only)
+        now = time.monotonic()
+        with _catalog_lock:
+            cached = _catalog_cache.get(key)
+            if cached and cached[0] > now:
+                return cached[1]
 
-            print(f"Retrieved {len(styles)} styles for user {user_id}", file=sys.stderr)
+        # 构建查询
+        query = self.client.table("progress_bar_styles").select("*")
 
-            return styles
+        # 根据用户等级筛选
+        if key[0] == "free":
+            # 免费用户：基础样式（已购买的样式由用户数据叠加）
+            query = query.eq("tier", "free")
+        # Pro/Lifetime用户可以看到所有样式（free + pro）
 
-        except Exception as e:
-            print(f"Error getting available styles: {e}", file=sys.stderr)
-            return []
+        # 分类筛选
+        if category:
+            query = query.eq("category", category)
+
+        # 仅精选
+        if featured_only:
+            query = query.eq("featured", True)
+
+        # 仅显示已发布的样式
+        query = query.eq("status", "published")
+
+        response = query.order("created_at", desc=True).execute()
+        styles = response.data if response.data else []
+
+        body = json.dumps(styles, sort_keys=True, default=str).encode("utf-8")
+        snapshot = {"version": hashlib.sha1(body).hexdigest()[:16], "styles": styles}
+
+        with _catalog_lock:
+            _catalog_cache[key] = (now + CATALOG_TTL_SECONDS, snapshot)
+        return snapshot
+
+    def get_user_overlay(self, user_id: str, user_tier: str) -> Dict:
+        """
+        获取叠加在公共目录之上的用户数据
+
+        查询次数固定(收藏1次, 免费用户的购买记录2次), 与收藏数量无关。
+
+        Returns:
+            {"purchased": [已购买的样式], "favorite_ids": [收藏的样式ID]}
+        """
+        purchased = self._get_purchased_styles(user_id, "style") if user_tier == "free" else []
+        favorite_ids = self._get_user_favorite_ids(user_id, "style")
+        return {"purchased": purchased, "favorite_ids": sorted(favorite_ids)}
+
+    @staticmethod
+    def merge_overlay(catalog_styles: List[Dict], overlay: Dict) -> List[Dict]:
+        """合并目录与用户数据(复制样式字典, 不修改共享的目录快照)"""
+        favorite_ids = set(overlay.get("favorite_ids", []))
+        seen = set()
+        styles = []
+        for style in list(catalog_styles) + list(overlay.get("purchased", [])):
+            if style["id"] in seen:
+                continue
+            seen.add(style["id"])
+            styles.append(dict(style, is_favorited=style["id"] in favorite_ids))
+        return styles
 
     def _get_purchased_styles(self, user_id: str, item_type: str) -> List[Dict]:
         """获取用户已购买的样式"""
@@ -217,9 +306,7 @@ class StyleManager:
             purchase_response = self.client.table("user_purchased_styles").insert(purchase_data).execute()
 
             # 4. 更新下载统计
-            self.client.table("progress_bar_styles").update({
-                "downloads": style.get("downloads", 0) + 1
-            }).eq("id", style["id"]).execute()
+            self._increment_counter("progress_bar_styles", style["id"], "downloads", 1)
 
             # 5. 如果是用户创作的样式，记录创作者收益
             if style.get("author_type") == "user" and style.get("author_id"):
@@ -294,22 +381,16 @@ class StyleManager:
 
         try:
             # 检查是否已收藏
-            existing = self.client.table("user_favorites").select("*").eq(
+            existing = self.client.table("user_favorites").select("id").eq(
                 "user_id", user_id
             ).eq("item_type", item_type).eq("item_id", item_id).execute()
 
+            table_name = ITEM_TABLES.get(item_type, "time_markers")
+
             if existing.data:
                 # 取消收藏
                 self.client.table("user_favorites").delete().eq("id", existing.data[0]["id"]).execute()
-
-                # 更新统计
-                table_name = "progress_bar_styles" if item_type == "style" else "time_markers"
-                item = self.client.table(table_name).select("favorites").eq("id", item_id).execute()
-
-                if item.data:
-                    new_count = max(0, item.data[0].get("favorites", 0) - 1)
-                    self.client.table(table_name).update({"favorites": new_count}).eq("id", item_id).execute()
-
+                self._increment_counter(table_name, item_id, "favorites", -1)
                 return {"success": True, "favorited": False}
             else:
                 # 添加收藏
@@ -320,21 +401,35 @@ class StyleManager:
                 }
 
                 self.client.table("user_favorites").insert(favorite_data).execute()
-
-                # 更新统计
-                table_name = "progress_bar_styles" if item_type == "style" else "time_markers"
-                item = self.client.table(table_name).select("favorites").eq("id", item_id).execute()
-
-                if item.data:
-                    new_count = item.data[0].get("favorites", 0) + 1
-                    self.client.table(table_name).update({"favorites": new_count}).eq("id", item_id).execute()
-
+                self._increment_counter(table_name, item_id, "favorites", 1)
                 return {"success": True, "favorited": True}
 
         except Exception as e:
             print(f"Error toggling favorite: {e}", file=sys.stderr)
             return {"success": False, "error": str(e)}
 
+    def _increment_counter(self, table_name: str, item_id: str, column: str, delta: int):
+        """
+        原子地增减计数器(收藏数/下载数)
+
+        数据库未部署 increment_item_counter 时回退到先读后写(并发时可能丢失更新)。
+        """
+        try:
+            self.client.rpc(INCREMENT_COUNTER_RPC, {
+                "p_table": table_name,
+                "p_item_id": item_id,
+                "p_column": column,
+                "p_delta": delta
+            }).execute()
+            return
+        except Exception as e:
+            print(f"{INCREMENT_COUNTER_RPC} unavailable, using read-then-write: {e}", file=sys.stderr)
+
+        item = self.client.table(table_name).select(column).eq("id", item_id).execute()
+        if item.data:
+            new_count = max(0, (item.data[0].get(column) or 0) + delta)
+            self.client.table(table_name).update({column: new_count}).eq("id", item_id).execute()
+
     def get_user_favorites(self, user_id: str, item_type: Optional[str] = None) -> List[Dict]:
         """
         获取用户收藏列表
@@ -360,16 +455,25 @@ class StyleManager:
             if not favorites.data:
                 return []
 
-            # 获取样式详情
-            result = []
+            # 获取样式详情: 每张表一次批量查询
+            ids_by_table: Dict[str, List[str]] = {}
             for fav in favorites.data:
-                table_name = "progress_bar_styles" if fav["item_type"] == "style" else "time_markers"
-                item = self.client.table(table_name).select("*").eq("id", fav["item_id"]).execute()
+                table_name = ITEM_TABLES.get(fav["item_type"], "time_markers")
+                ids_by_table.setdefault(table_name, []).append(fav["item_id"])
 
-                if item.data:
-                    item_data = item.data[0]
-                    item_data["favorited_at"] = fav["created_at"]
-                    result.append(item_data)
+            items: Dict[Tuple[str, str], Dict] = {}
+            for table_name, item_ids in ids_by_table.items():
+                response = self.client.table(table_name).select("*").in_("id", item_ids).execute()
+                for item in response.data or []:
+                    items[(table_name, item["id"])] = item
+
+            # 保持收藏时间倒序
+            result = []
+            for fav in favorites.data:
+                table_name = ITEM_TABLES.get(fav["item_type"], "time_markers")
+                item = items.get((table_name, fav["item_id"]))
+                if item:
+                    result.append(dict(item, favorited_at=fav["created_at"]))
 
             return result
 
@@ -1,6 +1,11 @@
 """
 样式列表查询API
+GET /api/styles-list?user_tier=free&category=basic
+    公共样式目录(与用户无关), 带ETag与公共Cache-Control, 可由边缘节点和客户端缓存
+GET /api/styles-list?user_id=xxx&user_tier=free&overlay=true
+    仅返回该用户的数据(已购买的样式、收藏ID)与目录版本, 客户端与缓存的目录合并
 GET /api/styles-list?user_id=xxx&user_tier=free&category=basic
+    合并后的完整列表(兼容旧客户端)
 """
 from http.server import BaseHTTPRequestHandler
 import json
@@ -8,16 +13,27 @@ import sys
 from urllib.parse import parse_qs, urlparse
 
 try:
-    from style_manager import StyleManager
+    from style_manager import CATALOG_TTL_SECONDS, StyleManager
     from cors_config import get_cors_origin
+    from logger_util import log_requests
+    from http_utils import send_json_with_etag
 except ImportError:
     import os
     import sys
     sys.path.insert(0, os.path.dirname(__file__))
-    from style_manager import StyleManager
+    from style_manager import CATALOG_TTL_SECONDS, StyleManager
     from cors_config import get_cors_origin
+    from logger_util import log_requests
+    from http_utils import send_json_with_etag
 
+# 公共目录: 边缘节点缓存TTL时长, 过期后在后台重新验证
+CATALOG_CACHE_CONTROL = (
+    f"public, max-age=60, s-maxage={CATALOG_TTL_SECONDS}, "
+    f"stale-while-revalidate={CATALOG_TTL_SECONDS * 2}"
+)
 
+
+@log_requests
 class handler(BaseHTTPRequestHandler):
     """样式列表查询处理器"""
 
@@ -36,25 +52,43 @@ class handler(BaseHTTPRequestHandler):
             user_tier = params.get("user_tier", ["free"])[0]
             category = params.get("category", [None])[0]
             featured_only = params.get("featured", ["false"])[0].lower() == "true"
+            overlay_only = params.get("overlay", ["false"])[0].lower() == "true"
+
+            style_manager = StyleManager()
+            catalog = style_manager.get_catalog_snapshot(user_tier, category, featured_only)
 
+            # 2. 未指定用户: 公共目录(可缓存)
             if not user_id:
-                self._send_error(400, "Missing user_id parameter")
+                if overlay_only:
+                    self._send_error(400, "Missing user_id parameter")
+                    return
+                send_json_with_etag(self, {
+                    "success": True,
+                    "catalog_version": catalog["version"],
+                    "styles": catalog["styles"],
+                    "count": len(catalog["styles"]),
+                    "user_tier": user_tier
+                }, cache_control=CATALOG_CACHE_CONTROL)
+                print(f"[STYLES-LIST] Returned catalog {catalog['version']} ({len(catalog['styles'])} styles)", file=sys.stderr)
                 return
 
             print(f"[STYLES-LIST] Fetching styles for user {user_id}, tier: {user_tier}", file=sys.stderr)
 
-            # 2. 调用样式管理器
-            style_manager = StyleManager()
-            styles = style_manager.get_available_styles(
-                user_id=user_id,
-                user_tier=user_tier,
-                category=category,
-                featured_only=featured_only
-            )
-
-            # 3. 返回响应
-            self._send_success({
+            # 3. 用户数据(查询次数与收藏数量无关)
+            overlay = style_manager.get_user_overlay(user_id, user_tier)
+
+            if overlay_only:
+                send_json_with_etag(self, {
+                    "success": True,
+                    "catalog_version": catalog["version"],
+                    **overlay
+                })
+                return
+
+            styles = style_manager.merge_overlay(catalog["styles"], overlay)
+            send_json_with_etag(self, {
                 "success": True,
+                "catalog_version": catalog["version"],
                 "styles": styles,
                 "count": len(styles),
                 "user_tier": user_tier
@@ -66,14 +100,6 @@ class handler(BaseHTTPRequestHandler):
             print(f"[STYLES-LIST] Error: {e}", file=sys.stderr)
             self._send_error(500, f"Internal server error: {str(e)}")
 
-    def _send_success(self, data: dict):
-        """发送成功响应"""
-        self.send_response(200)
-        self.send_header('Content-Type', 'application/json')
-        self.send_header('Access-Control-Allow-Origin', getattr(self, 'allowed_origin', '*'))
-        self.end_headers()
-        self.wfile.write(json.dumps(data).encode('utf-8'))
-
     def _send_error(self, code: int, message: str):
         """发送错误响应"""
         self.send_response(code)
@@ -97,6 +123,6 @@ class handler(BaseHTTPRequestHandler):
         self.send_response(200)
         self.send_header('Access-Control-Allow-Origin', allowed_origin)
         self.send_header('Access-Control-Allow-Methods', 'GET, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, If-None-Match')
         self.send_header('Access-Control-Max-Age', '3600')
         self.end_headers()
@@ -10,14 +10,19 @@ from urllib.parse import parse_qs, urlparse
 try:
     from subscription_manager import SubscriptionManager
     from cors_config import get_cors_origin
+    from logger_util import log_requests
+    from http_utils import send_json_with_etag
 except ImportError:
     import os
     import sys
     sys.path.insert(0, os.path.dirname(__file__))
     from subscription_manager import SubscriptionManager
     from cors_config import get_cors_origin
+    from logger_util import log_requests
+    from http_utils import send_json_with_etag
 
 
+@log_requests
 class handler(BaseHTTPRequestHandler):
     """订阅状态查询处理器"""
 
@@ -55,12 +60,8 @@ class handler(BaseHTTPRequestHandler):
             self._send_error(500, f"Internal server error: {str(e)}")
 
     def _send_success(self, data: dict):
-        """发送成功响应"""
-        self.send_response(200)
-        self.send_header('Content-Type', 'application/json')
-        self.send_header('Access-Control-Allow-Origin', getattr(self, 'allowed_origin', '*'))
-        self.end_headers()
-        self.wfile.write(json.dumps(data).encode('utf-8'))
+        """发送成功响应(带ETag, 内容未变时返回304)"""
+        send_json_with_etag(self, data)
 
     def _send_error(self, code: int, message: str):
         """发送错误响应"""
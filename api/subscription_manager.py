@@ -8,6 +8,12 @@ from typing import Dict, Optional, List, Any, cast
 from supabase import create_client, Client
 import sys
 
+try:
+    from auth_manager import invalidate_user_cache
+except ImportError:
+    sys.path.insert(0, os.path.dirname(__file__))
+    from auth_manager import invalidate_user_cache
+
 # Supabase配置
 SUPABASE_URL = os.getenv("SUPABASE_URL", "")
 # 优先使用Service Key（绕过RLS），否则使用Anon Key
@@ -120,6 +126,7 @@ class SubscriptionManager:
                 user_update_data["stripe_customer_id"] = stripe_customer_id
 
             self.client.table("users").update(user_update_data).eq("id", user_id).execute()
+            invalidate_user_cache(user_id)
 
             # 3. 更新配额
             if user_tier in ["pro", "lifetime"]:
@@ -255,6 +262,7 @@ class SubscriptionManager:
             self.client.table("users").update({
                 "user_tier": "free"
             }).eq("id", user_id).execute()
+            invalidate_user_cache(user_id)
 
             # 3. 重置配额为免费等级
             self.client.table("user_quotas").update({
@@ -303,6 +311,7 @@ class SubscriptionManager:
             self.client.table("users").update({
                 "user_tier": "free"
             }).eq("id", user_id).execute()
+            invalidate_user_cache(user_id)
 
             # 3. 重置配额
             self.client.table("user_quotas").update({
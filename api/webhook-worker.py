@@ -0,0 +1,43 @@
+"""
+支付回调履约任务的后台处理API
+GET /api/webhook-worker
+由Vercel Cron定时调用(请求头 Authorization: Bearer $CRON_SECRET),
+认领 webhook_events 中待处理或履约失败的事件并重试
+"""
+from http.server import BaseHTTPRequestHandler
+import hmac
+import os
+import sys
+
+try:
+    from webhook_jobs import WebhookJobProcessor
+    from logger_util import get_logger, log_requests
+    from http_utils import send_error_response, send_success_response
+except ImportError:
+    sys.path.insert(0, os.path.dirname(__file__))
+    from webhook_jobs import WebhookJobProcessor
+    from logger_util import get_logger, log_requests
+    from http_utils import send_error_response, send_success_response
+
+logger = get_logger("webhook-worker")
+
+
+@log_requests
+class handler(BaseHTTPRequestHandler):
+    """履约任务处理器"""
+
+    def do_GET(self):
+        """处理一批待履约事件"""
+        cron_secret = os.getenv("CRON_SECRET", "")
+        authorization = self.headers.get('Authorization', '')
+        if not cron_secret or not hmac.compare_digest(authorization, f"Bearer {cron_secret}"):
+            send_error_response(self, 401, "Unauthorized")
+            return
+
+        try:
+            stats = WebhookJobProcessor().run_pending()
+            logger.info("Processed webhook events", **stats)
+            send_success_response(self, stats)
+        except Exception as e:
+            logger.error("Webhook worker failed", error=f"{type(e).__name__}: {e}")
+            send_error_response(self, 500, "Failed to process webhook events")
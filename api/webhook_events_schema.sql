@@ -0,0 +1,277 @@
+-- webhook_events 表与配套 RPC: 支付回调的幂等账本与异步履约
+-- payment-notify / stripe-webhook 验签后只写入一条账本记录即返回确认,
+-- 履约(支付记录、订阅、用户等级、配额)由 webhook_jobs.WebhookJobProcessor 调用 fulfill_webhook_event 在一个事务内完成
+-- (provider, event_id) 唯一约束保证重复回调在数据库层被拒绝, 不依赖实例内存
+-- ⚠️ 部署新版回调接口前必须先执行本文件
+-- Python等价实现见 webhook_jobs.LocalWebhookStore (测试/本地开发使用)
+
+CREATE TABLE IF NOT EXISTS webhook_events (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+
+    -- 支付提供商: zpay / stripe
+    provider TEXT NOT NULL,
+
+    -- 幂等键: ZPAY 为商户订单号 out_trade_no, Stripe 为事件ID evt_xxx
+    event_id TEXT NOT NULL,
+    event_type TEXT NOT NULL,
+
+    -- 验签后归一化的履约任务
+    payload JSONB NOT NULL,
+
+    -- 处理状态: pending / processed / failed / discarded
+    status TEXT NOT NULL DEFAULT 'pending' CHECK (status IN (
+        'pending', 'processed', 'failed', 'discarded'
+    )),
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+
+    -- 被后台任务认领期间不会再次分发
+    locked_until TIMESTAMPTZ,
+
+    received_at TIMESTAMPTZ DEFAULT NOW(),
+    processed_at TIMESTAMPTZ,
+
+    CONSTRAINT webhook_events_provider_event_key UNIQUE (provider, event_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_webhook_events_pending
+    ON webhook_events(received_at) WHERE status IN ('pending', 'failed');
+
+ALTER TABLE webhook_events ENABLE ROW LEVEL SECURITY;
+
+COMMENT ON TABLE webhook_events IS '支付回调幂等账本,每个(provider, event_id)只履约一次';
+
+
+-- 1. 记录回调事件: 首次收到返回TRUE, 重复回调返回FALSE
+CREATE OR REPLACE FUNCTION record_webhook_event(
+    p_provider TEXT,
+    p_event_id TEXT,
+    p_event_type TEXT,
+    p_payload JSONB
+)
+RETURNS BOOLEAN
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = ''
+AS $$
+BEGIN
+    INSERT INTO public.webhook_events (provider, event_id, event_type, payload)
+    VALUES (p_provider, p_event_id, p_event_type, p_payload)
+    ON CONFLICT (provider, event_id) DO NOTHING;
+
+    RETURN FOUND;
+END;
+$$;
+
+
+-- 2. 认领待处理事件(SKIP LOCKED: 多个工作实例并发认领时互不重复)
+CREATE OR REPLACE FUNCTION claim_webhook_events(
+    p_limit INTEGER DEFAULT 20,
+    p_max_attempts INTEGER DEFAULT 5,
+    p_lease_seconds INTEGER DEFAULT 120
+)
+RETURNS JSON
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = ''
+AS $$
+DECLARE
+    v_rows JSON;
+BEGIN
+    WITH claimed AS (
+        SELECT id
+        FROM public.webhook_events
+        WHERE status IN ('pending', 'failed')
+          AND attempts < p_max_attempts
+          AND (locked_until IS NULL OR locked_until < NOW())
+        ORDER BY received_at
+        LIMIT p_limit
+        FOR UPDATE SKIP LOCKED
+    ), leased AS (
+        UPDATE public.webhook_events e
+        SET locked_until = NOW() + make_interval(secs => p_lease_seconds)
+        FROM claimed
+        WHERE e.id = claimed.id
+        RETURNING e.provider, e.event_id, e.event_type, e.payload, e.attempts, e.received_at
+    )
+    SELECT COALESCE(json_agg(leased ORDER BY leased.received_at), '[]'::json)
+    INTO v_rows
+    FROM leased;
+
+    RETURN v_rows;
+END;
+$$;
+
+
+-- 3. 履约: 在一个事务内写入支付记录、订阅、用户等级、配额并标记事件已处理
+-- 任一写入失败整体回滚, 事件保持待处理状态等待重试
+CREATE OR REPLACE FUNCTION fulfill_webhook_event(
+    p_provider TEXT,
+    p_event_id TEXT,
+    p_fulfillment JSONB
+)
+RETURNS JSON
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = ''
+AS $$
+DECLARE
+    v_event public.webhook_events%ROWTYPE;
+    v_kind TEXT := p_fulfillment->>'kind';
+    v_user_id TEXT := p_fulfillment->>'user_id';
+    v_payment JSONB := p_fulfillment->'payment';
+    v_subscription JSONB := p_fulfillment->'subscription';
+    v_quota JSONB := p_fulfillment->'quota';
+    v_payment_id UUID;
+    v_subscription_id UUID;
+BEGIN
+    SELECT * INTO v_event
+    FROM public.webhook_events
+    WHERE provider = p_provider AND event_id = p_event_id
+    FOR UPDATE;
+
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'Webhook event not recorded: %/%', p_provider, p_event_id;
+    END IF;
+
+    IF v_event.status = 'processed' THEN
+        RETURN json_build_object('success', TRUE, 'status', 'already_processed');
+    END IF;
+
+    IF v_kind = 'subscription_payment' THEN
+        -- payments.order_id 唯一: 同一订单来自不同事件时也只入账一次
+        INSERT INTO public.payments (
+            user_id, order_id, trade_no, amount, currency, plan_type,
+            payment_method, payment_provider, status, item_type, item_metadata,
+            stripe_customer_id, stripe_subscription_id, completed_at
+        )
+        VALUES (
+            v_user_id::UUID,
+            v_payment->>'order_id',
+            v_payment->>'trade_no',
+            (v_payment->>'amount')::DECIMAL,
+            v_payment->>'currency',
+            p_fulfillment->>'plan_type',
+            v_payment->>'payment_method',
+            p_provider,
+            'completed',
+            'subscription',
+            jsonb_build_object('plan_type', p_fulfillment->>'plan_type', 'trade_no', v_payment->>'trade_no'),
+            NULLIF(v_payment->>'stripe_customer_id', ''),
+            NULLIF(v_payment->>'stripe_subscription_id', ''),
+            NOW()
+        )
+        ON CONFLICT (order_id) DO NOTHING
+        RETURNING id INTO v_payment_id;
+
+        IF v_payment_id IS NULL THEN
+            UPDATE public.webhook_events
+            SET status = 'processed', processed_at = NOW(), locked_until = NULL, last_error = NULL
+            WHERE id = v_event.id;
+            RETURN json_build_object('success', TRUE, 'status', 'already_processed');
+        END IF;
+
+        INSERT INTO public.subscriptions (
+            user_id, plan_type, price, currency, status, started_at, expires_at,
+            payment_id, payment_provider, auto_renew, stripe_subscription_id, stripe_customer_id
+        )
+        VALUES (
+            v_user_id::UUID,
+            p_fulfillment->>'plan_type',
+            (v_subscription->>'price')::DECIMAL,
+            v_subscription->>'currency',
+            'active',
+            NOW(),
+            (v_subscription->>'expires_at')::TIMESTAMP,
+            v_payment_id,
+            p_provider,
+            (v_subscription->>'auto_renew')::BOOLEAN,
+            NULLIF(v_payment->>'stripe_subscription_id', ''),
+            NULLIF(v_payment->>'stripe_customer_id', '')
+        )
+        RETURNING id INTO v_subscription_id;
+
+        UPDATE public.users
+        SET
+            user_tier = p_fulfillment->>'user_tier',
+            stripe_customer_id = COALESCE(NULLIF(v_payment->>'stripe_customer_id', ''), stripe_customer_id)
+        WHERE id = v_user_id::UUID;
+
+        UPDATE public.user_quotas
+        SET
+            user_tier = p_fulfillment->>'user_tier',
+            daily_plan_total = (v_quota->>'daily_plan_total')::INTEGER,
+            weekly_report_total = (v_quota->>'weekly_report_total')::INTEGER,
+            chat_total = (v_quota->>'chat_total')::INTEGER,
+            updated_at = NOW()
+        WHERE user_id = v_user_id;
+
+    ELSIF v_kind = 'subscription_status' THEN
+        UPDATE public.subscriptions
+        SET status = p_fulfillment->>'status', stripe_status = p_fulfillment->>'stripe_status'
+        WHERE stripe_subscription_id = p_fulfillment->>'subscription_id';
+
+    ELSIF v_kind = 'subscription_canceled' THEN
+        UPDATE public.subscriptions
+        SET status = 'canceled', stripe_status = 'canceled'
+        WHERE stripe_subscription_id = p_fulfillment->>'subscription_id';
+
+        UPDATE public.users
+        SET user_tier = 'free'
+        WHERE id = v_user_id::UUID;
+
+    ELSE
+        RAISE EXCEPTION 'Unknown fulfillment kind: %', v_kind;
+    END IF;
+
+    UPDATE public.webhook_events
+    SET status = 'processed', processed_at = NOW(), locked_until = NULL, last_error = NULL
+    WHERE id = v_event.id;
+
+    RETURN json_build_object(
+        'success', TRUE,
+        'status', 'processed',
+        'payment_id', v_payment_id,
+        'subscription_id', v_subscription_id
+    );
+END;
+$$;
+
+
+-- 4. 记录履约失败: 释放认领并累计重试次数; p_permanent 为TRUE时不再重试
+CREATE OR REPLACE FUNCTION fail_webhook_event(
+    p_provider TEXT,
+    p_event_id TEXT,
+    p_error TEXT,
+    p_permanent BOOLEAN DEFAULT FALSE
+)
+RETURNS VOID
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = ''
+AS $$
+BEGIN
+    UPDATE public.webhook_events
+    SET
+        status = CASE WHEN p_permanent THEN 'discarded' ELSE 'failed' END,
+        attempts = attempts + 1,
+        last_error = LEFT(p_error, 1000),
+        locked_until = NULL
+    WHERE provider = p_provider AND event_id = p_event_id AND status <> 'processed';
+END;
+$$;
+
+-- 仅服务端(service_role)可以调用: 回调接口使用 SUPABASE_SERVICE_KEY
+REVOKE EXECUTE ON FUNCTION record_webhook_event(TEXT, TEXT, TEXT, JSONB) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION claim_webhook_events(INTEGER, INTEGER, INTEGER) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION fulfill_webhook_event(TEXT, TEXT, JSONB) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION fail_webhook_event(TEXT, TEXT, TEXT, BOOLEAN) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION record_webhook_event(TEXT, TEXT, TEXT, JSONB) TO service_role;
+GRANT EXECUTE ON FUNCTION claim_webhook_events(INTEGER, INTEGER, INTEGER) TO service_role;
+GRANT EXECUTE ON FUNCTION fulfill_webhook_event(TEXT, TEXT, JSONB) TO service_role;
+GRANT EXECUTE ON FUNCTION fail_webhook_event(TEXT, TEXT, TEXT, BOOLEAN) TO service_role;
+
+COMMENT ON FUNCTION record_webhook_event IS '写入支付回调幂等账本,重复事件返回FALSE';
+COMMENT ON FUNCTION claim_webhook_events IS '认领待履约的回调事件,供后台任务批量处理';
+COMMENT ON FUNCTION fulfill_webhook_event IS '在单个事务内完成支付入账、订阅、用户等级与配额更新';
+COMMENT ON FUNCTION fail_webhook_event IS '记录回调事件履约失败,等待下次重试';
@@ -0,0 +1,356 @@
+"""
+支付回调的幂等账本与异步履约
+payment-notify / stripe-webhook 验签后把归一化的履约任务写入 webhook_events 账本并立即确认,
+WebhookJobProcessor 再调用 fulfill_webhook_event 在一个数据库事务内完成全部写入。
+(provider, event_id) 唯一约束在数据库层拒绝重复回调, 不再依赖实例内存中的nonce缓存;
+履约失败的事件留在账本中, 由 webhook-worker 定时认领重试。
+数据库函数见 webhook_events_schema.sql
+"""
+import sys
+import threading
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional, cast
+
+try:
+    from subscription_manager import SubscriptionManager
+    from auth_manager import invalidate_user_cache
+    from payment_status import publish_payment_status
+    from logger_util import get_logger
+except ImportError:
+    import os
+    sys.path.insert(0, os.path.dirname(__file__))
+    from subscription_manager import SubscriptionManager
+    from auth_manager import invalidate_user_cache
+    from payment_status import publish_payment_status
+    from logger_util import get_logger
+
+logger = get_logger("webhook-jobs")
+
+RECORD_EVENT_RPC = "record_webhook_event"
+CLAIM_EVENTS_RPC = "claim_webhook_events"
+FULFILL_EVENT_RPC = "fulfill_webhook_event"
+FAIL_EVENT_RPC = "fail_webhook_event"
+
+# 单次认领的事件数、最大重试次数与认领租期(秒)
+CLAIM_BATCH_SIZE = 20
+MAX_ATTEMPTS = 5
+LEASE_SECONDS = 120
+
+# Pro/终身会员的配额上限(与 SubscriptionManager.create_subscription 一致)
+PAID_QUOTA = {"daily_plan_total": 20, "weekly_report_total": 10, "chat_total": 100}
+
+
+class PermanentJobError(ValueError):
+    """任务内容无效, 重试也不会成功(如未知的订阅计划)"""
+
+
+class WebhookLedger:
+    """webhook_events 账本的读写"""
+
+    def __init__(self, client=None):
+        """
+        Args:
+            client: 指定客户端(如测试/本地开发使用的LocalWebhookStore), 默认使用服务端Supabase客户端
+        """
+        if client is None:
+            from supabase_client import get_supabase_client
+            client = get_supabase_client()
+        self.client = client
+
+    def record(self, provider: str, event_id: str, event_type: str, payload: Dict) -> bool:
+        """
+        写入回调事件
+
+        Returns:
+            首次收到返回True, 重复回调返回False; 数据库错误直接抛出(回调方需要重试)
+        """
+        response = self.client.rpc(RECORD_EVENT_RPC, {
+            "p_provider": provider,
+            "p_event_id": event_id,
+            "p_event_type": event_type,
+            "p_payload": payload,
+        }).execute()
+        return bool(response.data)
+
+    def claim(self, limit: int = CLAIM_BATCH_SIZE) -> List[Dict]:
+        """认领待处理和可重试的事件"""
+        response = self.client.rpc(CLAIM_EVENTS_RPC, {
+            "p_limit": limit,
+            "p_max_attempts": MAX_ATTEMPTS,
+            "p_lease_seconds": LEASE_SECONDS,
+        }).execute()
+        return list(response.data or [])
+
+    def fulfill(self, provider: str, event_id: str, fulfillment: Dict) -> Dict:
+        """在一个事务内执行履约并标记事件已处理"""
+        response = self.client.rpc(FULFILL_EVENT_RPC, {
+            "p_provider": provider,
+            "p_event_id": event_id,
+            "p_fulfillment": fulfillment,
+        }).execute()
+        result = response.data
+        if isinstance(result, list):
+            result = result[0] if result else {}
+        return result or {}
+
+    def fail(self, provider: str, event_id: str, error: str, permanent: bool = False) -> None:
+        """记录履约失败"""
+        self.client.rpc(FAIL_EVENT_RPC, {
+            "p_provider": provider,
+            "p_event_id": event_id,
+            "p_error": error,
+            "p_permanent": permanent,
+        }).execute()
+
+
+def build_fulfillment(payload: Dict, now: Optional[datetime] = None) -> Dict:
+    """
+    将账本中的任务转换为 fulfill_webhook_event 的参数
+
+    订阅价格、到期时间和配额在履约时按 SubscriptionManager.PLANS 计算,
+    账本中只保存回调里的原始业务信息。
+    """
+    kind = payload.get("kind")
+    if kind != "subscription_payment":
+        if kind not in ("subscription_status", "subscription_canceled"):
+            raise PermanentJobError(f"Unknown job kind: {kind}")
+        return dict(payload)
+
+    plan_type = payload.get("plan_type")
+    plan = SubscriptionManager.PLANS.get(plan_type)
+    if not plan or not payload.get("user_id"):
+        raise PermanentJobError(f"Invalid subscription payment: user={payload.get('user_id')}, plan={plan_type}")
+
+    now = now or datetime.now()
+    expires_at = None
+    if plan["duration_days"]:
+        expires_at = (now + timedelta(days=cast(int, plan["duration_days"]))).isoformat()
+
+    return {
+        "kind": kind,
+        "user_id": payload["user_id"],
+        "plan_type": plan_type,
+        "user_tier": "lifetime" if plan_type == "lifetime" else "pro",
+        "payment": payload.get("payment", {}),
+        "subscription": {
+            "price": plan["price"],
+            "currency": plan["currency"],
+            "expires_at": expires_at,
+            "auto_renew": bool(plan["duration_days"]),
+        },
+        "quota": dict(PAID_QUOTA),
+    }
+
+
+class WebhookJobProcessor:
+    """执行账本中的履约任务"""
+
+    def __init__(self, ledger: Optional[WebhookLedger] = None,
+                 publisher: Optional[Callable[[Dict], bool]] = None):
+        """
+        Args:
+            ledger: 账本(默认使用服务端Supabase客户端)
+            publisher: 履约成功后发布支付状态的函数(默认写入payment_cache并唤醒payment-wait)
+        """
+        self.ledger = ledger or WebhookLedger()
+        self._publish = publisher or publish_payment_status
+
+    def process(self, event: Dict) -> Dict:
+        """
+        履约单个事件(不抛出异常, 失败时记录到账本等待重试)
+
+        Args:
+            event: 账本记录(provider, event_id, event_type, payload)
+
+        Returns:
+            {"success": bool, "status": "processed" / "already_processed" / "failed" / "discarded"}
+        """
+        provider, event_id = event["provider"], event["event_id"]
+        payload = event.get("payload") or {}
+
+        try:
+            fulfillment = build_fulfillment(payload)
+            result = self.ledger.fulfill(provider, event_id, fulfillment)
+        except PermanentJobError as e:
+            logger.warning("Discarding webhook event", provider=provider, event_id=event_id, error=str(e))
+            self._record_failure(provider, event_id, str(e), permanent=True)
+            return {"success": False, "status": "discarded", "error": str(e)}
+        except Exception as e:
+            logger.error("Fulfillment failed", provider=provider, event_id=event_id, error=f"{type(e).__name__}: {e}")
+            self._record_failure(provider, event_id, f"{type(e).__name__}: {e}")
+            return {"success": False, "status": "failed", "error": str(e)}
+
+        logger.info("Webhook event fulfilled", provider=provider, event_id=event_id,
+                    event_type=event.get('event_type'), status=result.get('status'))
+        if fulfillment.get("user_id"):
+            invalidate_user_cache(fulfillment["user_id"])
+
+        status_record = payload.get("status_record")
+        if status_record:
+            # 订阅已激活后才唤醒等待支付结果的客户端
+            self._publish(dict(status_record, status="paid"))
+        return {"success": True, **result}
+
+    def run_pending(self, limit: int = CLAIM_BATCH_SIZE) -> Dict:
+        """认领并处理一批待履约事件"""
+        events = self.ledger.claim(limit)
+        stats = {"claimed": len(events), "processed": 0, "failed": 0}
+        for event in events:
+            result = self.process(event)
+            stats["processed" if result["success"] else "failed"] += 1
+        return stats
+
+    def _record_failure(self, provider: str, event_id: str, error: str, permanent: bool = False):
+        try:
+            self.ledger.fail(provider, event_id, error, permanent)
+        except Exception as e:
+            # 账本更新失败时事件的认领租期到期后仍会被重新认领
+            logger.error("Failed to record fulfillment failure", provider=provider, event_id=event_id, error=str(e))
+
+
+def accept_webhook_event(provider: str, event_id: str, event_type: str, payload: Dict,
+                         ledger: Optional[WebhookLedger] = None) -> Optional[Dict]:
+    """
+    将已验签的回调写入账本
+
+    Returns:
+        新事件返回账本记录(交给WebhookJobProcessor.process), 重复回调返回None
+    """
+    ledger = ledger or WebhookLedger()
+    if not ledger.record(provider, event_id, event_type, payload):
+        logger.info("Duplicate webhook event ignored", provider=provider, event_id=event_id)
+        return None
+    return {"provider": provider, "event_id": event_id, "event_type": event_type, "payload": payload}
+
+
+class _LocalRpcCall:
+    """模拟Supabase的 rpc(...) 调用对象"""
+
+    def __init__(self, func: Callable[[], object]):
+        self._func = func
+
+    def execute(self):
+        return SimpleNamespace(data=self._func())
+
+
+class LocalWebhookStore:
+    """
+    webhook_events 相关数据库函数的进程内等价实现
+
+    提供与Supabase客户端相同的 rpc(name, params).execute() 调用方式,
+    用于测试和本地开发; 事务与行锁由进程内的锁代替。
+    """
+
+    def __init__(self):
+        self.events: Dict[tuple, Dict] = {}
+        self.payments: Dict[str, Dict] = {}
+        self.subscriptions: List[Dict] = []
+        self.users: Dict[str, Dict] = {}
+        self.user_quotas: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def rpc(self, name: str, params: Dict) -> _LocalRpcCall:
+        functions = {
+            RECORD_EVENT_RPC: self.record_webhook_event,
+            CLAIM_EVENTS_RPC: self.claim_webhook_events,
+            FULFILL_EVENT_RPC: self.fulfill_webhook_event,
+            FAIL_EVENT_RPC: self.fail_webhook_event,
+        }
+        if name not in functions:
+            raise Exception(f"PGRST202: Could not find the function public.{name}")
+        return _LocalRpcCall(lambda: functions[name](**params))
+
+    def record_webhook_event(self, p_provider: str, p_event_id: str, p_event_type: str, p_payload: Dict) -> bool:
+        with self._lock:
+            key = (p_provider, p_event_id)
+            if key in self.events:
+                return False
+            self.events[key] = {
+                "provider": p_provider,
+                "event_id": p_event_id,
+                "event_type": p_event_type,
+                "payload": p_payload,
+                "status": "pending",
+                "attempts": 0,
+                "last_error": None,
+                "locked_until": None,
+            }
+            return True
+
+    def claim_webhook_events(self, p_limit: int = CLAIM_BATCH_SIZE, p_max_attempts: int = MAX_ATTEMPTS,
+                             p_lease_seconds: int = LEASE_SECONDS) -> List[Dict]:
+        now = datetime.now()
+        claimed = []
+        with self._lock:
+            for event in self.events.values():
+                if len(claimed) >= p_limit:
+                    break
+                if event["status"] not in ("pending", "failed") or event["attempts"] >= p_max_attempts:
+                    continue
+                if event["locked_until"] and event["locked_until"] >= now:
+                    continue
+                event["locked_until"] = now + timedelta(seconds=p_lease_seconds)
+                claimed.append({key: event[key] for key in ("provider", "event_id", "event_type", "payload", "attempts")})
+        return claimed
+
+    def fulfill_webhook_event(self, p_provider: str, p_event_id: str, p_fulfillment: Dict) -> Dict:
+        with self._lock:
+            event = self.events.get((p_provider, p_event_id))
+            if event is None:
+                raise Exception(f"Webhook event not recorded: {p_provider}/{p_event_id}")
+            if event["status"] == "processed":
+                return {"success": True, "status": "already_processed"}
+
+            result = {"success": True, "status": "processed", "payment_id": None, "subscription_id": None}
+            kind = p_fulfillment.get("kind")
+            user_id = p_fulfillment.get("user_id")
+
+            if kind == "subscription_payment":
+                payment = p_fulfillment["payment"]
+                if payment["order_id"] in self.payments:
+                    result["status"] = "already_processed"
+                else:
+                    payment_id = str(uuid.uuid4())
+                    subscription_id = str(uuid.uuid4())
+                    self.payments[payment["order_id"]] = dict(
+                        payment, id=payment_id, user_id=user_id, plan_type=p_fulfillment["plan_type"],
+                        payment_provider=p_provider, status="completed"
+                    )
+                    self.subscriptions.append(dict(
+                        p_fulfillment["subscription"], id=subscription_id, user_id=user_id,
+                        plan_type=p_fulfillment["plan_type"], status="active", payment_id=payment_id,
+                        payment_provider=p_provider,
+                        stripe_subscription_id=payment.get("stripe_subscription_id") or None
+                    ))
+                    self.users.setdefault(user_id, {"id": user_id})["user_tier"] = p_fulfillment["user_tier"]
+                    if user_id in self.user_quotas:
+                        self.user_quotas[user_id].update(p_fulfillment["quota"], user_tier=p_fulfillment["user_tier"])
+                    result.update(payment_id=payment_id, subscription_id=subscription_id)
+            elif kind in ("subscription_status", "subscription_canceled"):
+                canceled = kind == "subscription_canceled"
+                for subscription in self.subscriptions:
+                    if subscription.get("stripe_subscription_id") == p_fulfillment["subscription_id"]:
+                        subscription["status"] = "canceled" if canceled else p_fulfillment["status"]
+                        subscription["stripe_status"] = "canceled" if canceled else p_fulfillment["stripe_status"]
+                if canceled:
+                    self.users.setdefault(user_id, {"id": user_id})["user_tier"] = "free"
+            else:
+                raise Exception(f"Unknown fulfillment kind: {kind}")
+
+            event.update(status="processed", locked_until=None, last_error=None)
+            return result
+
+    def fail_webhook_event(self, p_provider: str, p_event_id: str, p_error: str, p_permanent: bool = False) -> None:
+        with self._lock:
+            event = self.events.get((p_provider, p_event_id))
+            if event is None or event["status"] == "processed":
+                return None
+            event.update(
+                status="discarded" if p_permanent else "failed",
+                attempts=event["attempts"] + 1,
+                last_error=p_error[:1000],
+                locked_until=None,
+            )
+            return None
@@ -7,8 +7,6 @@ import hashlib
 import hmac
 import json
 import requests
-import threading
-import time
 from datetime import datetime
 from typing import Dict, Optional
 import sys
@@ -20,33 +18,6 @@ ZPAY_API_URL = "https://zpayz.cn"
 ZPAY_PID = os.getenv("ZPAY_PID")
 ZPAY_PKEY = os.getenv("ZPAY_PKEY")
 
-# 防重放攻击: Nonce缓存（线程安全，TTL过期机制）
-# 注意：Vercel Serverless环境中，每个实例有独立缓存
-# 建议后续迁移至Redis等分布式缓存
-_processed_nonces: Dict[str, float] = {}  # {nonce: timestamp}
-_nonce_lock = threading.Lock()
-_NONCE_CACHE_MAX_SIZE = 10000  # 防止内存无限增长
-_NONCE_TTL_SECONDS = 300  # 5分钟TTL，与时间戳验证窗口一致
-
-
-def _cleanup_expired_nonces() -> int:
-    """
-    清理过期的nonce（内部函数，需要在持有锁的情况下调用）
-
-    Returns:
-        清理的nonce数量
-    """
-    global _processed_nonces
-    now = time.time()
-    expired_nonces = [
-        nonce for nonce, ts in _processed_nonces.items()
-        if now - ts > _NONCE_TTL_SECONDS
-    ]
-    for nonce in expired_nonces:
-        del _processed_nonces[nonce]
-    return len(expired_nonces)
-
-
 class ZPayManager:
     """ZPAY支付管理器"""
 
@@ -405,8 +376,6 @@ class ZPayManager:
         Returns:
             签名是否有效
         """
-        global _processed_nonces
-
         try:
             # ✅ 安全检查1：签名必须存在
             received_sign = params.get("sign", "")
@@ -421,31 +390,8 @@ class ZPayManager:
                     print(f"[SECURITY] Required field '{field}' missing in payment callback", file=sys.stderr)
                     return False
 
-            # ✅ 安全检查3：Nonce去重（防止5分钟窗口内重放攻击）
-            # 使用 out_trade_no + trade_no 作为唯一标识
-            nonce = f"{params.get('out_trade_no')}:{params.get('trade_no')}"
-            with _nonce_lock:
-                # 先清理过期的nonce
-                expired_count = _cleanup_expired_nonces()
-                if expired_count > 0:
-                    print(f"[SECURITY] Cleaned up {expired_count} expired nonces", file=sys.stderr)
-
-                # 检查是否重复
-                if nonce in _processed_nonces:
-                    print(f"[SECURITY] Duplicate payment callback detected (nonce: {nonce[:20]}...)", file=sys.stderr)
-                    return False
-
-                # 缓存大小控制：超限时强制清理最旧的条目
-                if len(_processed_nonces) >= _NONCE_CACHE_MAX_SIZE:
-                    # 按时间戳排序，删除最旧的一半
-                    sorted_nonces = sorted(_processed_nonces.items(), key=lambda x: x[1])
-                    to_remove = len(sorted_nonces) // 2
-                    for old_nonce, _ in sorted_nonces[:to_remove]:
-                        del _processed_nonces[old_nonce]
-                    print(f"[SECURITY] Nonce cache overflow, evicted {to_remove} oldest entries", file=sys.stderr)
-
-                # 添加当前nonce及其时间戳
-                _processed_nonces[nonce] = time.time()
+            # ✅ 安全检查3：重复回调由 webhook_events 账本在数据库层去重
+            # (见 webhook_jobs.accept_webhook_event), 不再使用实例内存中的nonce缓存
 
             # ✅ 安全检查4：时间戳验证（防止重放攻击）
             timestamp = params.get("timestamp")
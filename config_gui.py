@@ -4,6 +4,7 @@ GaiYa每日进度条 - 可视化配置界面
 提供图形化界面来管理配置和任务
 """
 
+import copy
 import json
 import os
 import sys
@@ -22,11 +23,13 @@ from PySide6.QtGui import QColor, QIcon
 from timeline_editor import TimelineEditor
 from ai_client import GaiyaAIClient
 from autostart_manager import AutoStartManager
-import requests
 from gaiya.core.theme_manager import ThemeManager
 from gaiya.core.theme_ai_helper import ThemeAIHelper
+from gaiya.core.http_pool import get_shared_session
+from gaiya.core.account_state import get_account_state
 import logging
 from gaiya.utils import path_utils, time_utils, data_loader
+from gaiya.utils.config_changes import ConfigChangeSet
 from version import __version__, VERSION_STRING, VERSION_STRING_ZH
 
 # i18n国际化支持
@@ -46,6 +49,9 @@ from gaiya.core.marker_presets import MarkerPresetManager
 # Payment module (extracted for maintainability)
 from gaiya.ui.config_modules.payment_manager import PaymentManager, PaymentOptionCard
 from gaiya.ui.config_modules.account_manager import AccountManager
+from gaiya.ui.config_modules.task_table_model import (
+    TaskTableModel, create_task_table_view, stable_task_id,
+)
 
 # Achievement module
 from gaiya.core.achievement_manager import AchievementManager, Achievement, ACHIEVEMENT_CATEGORIES
@@ -297,7 +303,7 @@ class SaveTemplateDialog(QDialog):
 class ConfigManager(QMainWindow):
     """配置管理主窗口"""
 
-    config_saved = Signal()  # 配置保存信号
+    config_changed = Signal(object)  # 配置变更集(ConfigChangeSet),进度条在内存中应用
 
     # 预设色板:定义新任务的默认颜色循环顺序
     COLOR_PALETTE = [
@@ -337,13 +343,25 @@ class ConfigManager(QMainWindow):
         self.config = {}
         self.tasks = []
 
-        # ✅ 性能优化: 配置文件防抖动保存器(减少磁盘I/O)
+        # 变更集基线: 已提交(将写入磁盘)的版本,以及进度条当前显示的版本(含实时预览)
+        self._committed_config: Dict = {}
+        self._committed_tasks: List[Dict] = []
+        self._live_config: Dict = {}
+
+        # ✅ 性能优化: 配置文件防抖动保存器(减少磁盘I/O,后台原子写入)
         from gaiya.utils.config_debouncer import ConfigDebouncer
         self.config_debouncer = ConfigDebouncer(
             config_file=self.config_file,
-            delay_ms=500,  # 500ms防抖动延迟
-            on_save_callback=lambda: self.config_saved.emit()  # 保存完成后发送信号
+            delay_ms=500  # 500ms防抖动延迟
         )
+        self.tasks_debouncer = ConfigDebouncer(config_file=self.tasks_file, delay_ms=500)
+
+        # 任务列表模型(与视图解耦: 任务标签页未创建时也能读写任务)
+        self.tasks_table = None  # QTableView,任务标签页创建时生成
+        self.task_model = TaskTableModel(parent=self)
+        self.task_model.dataChanged.connect(self._on_task_model_edited)
+        self.task_model.rowsInserted.connect(self._on_task_model_edited)
+        self.task_model.rowsRemoved.connect(self._on_task_model_edited)
         
         # 延迟初始化AI相关组件(避免阻塞UI显示)
         self.ai_client = None
@@ -363,6 +381,7 @@ class ConfigManager(QMainWindow):
         # 延迟初始化模板管理器
         self.template_manager = None
         self.schedule_manager = None
+        self.template_calendar = None
         # 初始化标记图片预设管理器
         self.marker_preset_manager = MarkerPresetManager()
 
@@ -413,6 +432,9 @@ class ConfigManager(QMainWindow):
         try:
             self.config = self.load_config()
             self.tasks = self.load_tasks()
+            self._committed_config = copy.deepcopy(self.config)
+            self._committed_tasks = copy.deepcopy(self.tasks)
+            self._live_config = copy.deepcopy(self.config)
             
             # 如果任务为空,默认加载24小时模板
             if not self.tasks:
@@ -421,9 +443,8 @@ class ConfigManager(QMainWindow):
             # 更新UI控件的值（如果已创建）
             self._update_ui_from_config()
             
-            # 如果任务表格已创建，加载任务
-            if hasattr(self, 'tasks_table') and self.tasks_table is not None:
-                self.load_tasks_to_table()
+            # 加载任务到模型(视图创建后自动显示)
+            self.load_tasks_to_table()
             
             logging.info("配置和任务加载完成")
         except Exception as e:
@@ -642,12 +663,68 @@ class ConfigManager(QMainWindow):
             self.schedule_manager = ScheduleManager(self.app_dir, logging.getLogger(__name__))
             logging.info("时间表管理器初始化完成")
 
+            self._build_template_calendar_async()
+
             # 如果时间表UI已创建，刷新显示
             if hasattr(self, 'schedule_table'):
                 self._load_schedule_table()
         except Exception as e:
             logging.error(f"初始化时间表管理器失败: {e}")
 
+    def _build_template_calendar_async(self):
+        """在后台线程加载或构建模板日历索引(首次构建可能需要联网获取节假日数据)"""
+        if self.template_calendar is not None or getattr(self, '_template_calendar_worker', None) is not None:
+            return
+        if not self.schedule_manager:
+            return
+
+        class TemplateCalendarWorker(QThread):
+            """只使用规则副本构建索引, 绑定到正在使用的管理器在UI线程完成"""
+            built = Signal(object)
+
+            def __init__(self, app_dir, schedule_manager, template_manager):
+                super().__init__()
+                self.app_dir = app_dir
+                self.schedule_manager = schedule_manager.snapshot()
+                self.template_manager = template_manager.snapshot() if template_manager else None
+
+            def run(self):
+                try:
+                    from gaiya.core.template_calendar import TemplateCalendar
+                    calendar = TemplateCalendar(
+                        self.app_dir,
+                        self.schedule_manager,
+                        self.template_manager,
+                        logging.getLogger(__name__)
+                    )
+                except Exception as e:
+                    logging.error(f"构建模板日历索引失败: {e}")
+                    calendar = None
+                self.built.emit(calendar)
+
+        worker = TemplateCalendarWorker(self.app_dir, self.schedule_manager, self.template_manager)
+        worker.built.connect(self._on_template_calendar_built)
+        worker.finished.connect(worker.deleteLater)
+        self._template_calendar_worker = worker
+        worker.start()
+
+    def _on_template_calendar_built(self, calendar):
+        """模板日历索引构建完成(UI线程): 绑定到正在使用的管理器以接收规则变化"""
+        self._template_calendar_worker = None
+        if calendar is not None:
+            try:
+                calendar.attach(self.schedule_manager, self.template_manager)
+            except Exception as e:
+                logging.error(f"绑定模板日历索引失败: {e}")
+                calendar = None
+        self.template_calendar = calendar
+
+    def _get_template_calendar(self):
+        """获取模板日历索引(规则变化时自动增量更新); 后台构建尚未完成时返回None"""
+        if self.template_calendar is None:
+            self._build_template_calendar_async()
+        return self.template_calendar
+
     def _load_schedule_table(self):
         """加载时间表规则到表格"""
         try:
@@ -1353,11 +1430,16 @@ class ConfigManager(QMainWindow):
             def perform_test():
                 selected_date = date_edit.date().toPython()
 
-                # 获取匹配的模板
-                matched_template_id = self.schedule_manager.get_template_for_date(selected_date)
-
-                # 获取该日期的所有冲突模板
-                all_matched = self.schedule_manager.get_conflicts_for_date(selected_date)
+                # 从模板日历索引查询匹配的模板和该日期的所有冲突模板
+                calendar = self._get_template_calendar()
+                calendar_day = calendar.lookup(selected_date) if calendar else None
+                if calendar_day is not None:
+                    matched_template_id = calendar_day.schedule_template_id
+                    all_matched = calendar_day.conflicts
+                else:
+                    # 索引尚未构建完成或日期在索引窗口之外: 逐条规则匹配
+                    matched_template_id = self.schedule_manager.get_template_for_date(selected_date)
+                    all_matched = self.schedule_manager.get_conflicts_for_date(selected_date)
 
                 # 构建结果文本
                 result_lines = []
@@ -1440,6 +1522,12 @@ class ConfigManager(QMainWindow):
             # 设置正确的tier
             self.ai_client.set_user_tier(user_tier)
 
+            # 账户状态缓存: 配额/会员等级立即从本地缓存渲染, 由后台定时刷新
+            self.account_state = get_account_state()
+            self.account_state.attach(self.auth_client)
+            self.account_state.quota_changed.connect(self._on_quota_status_finished)
+            self.account_state.start()
+
             # 注意：使用代理服务器模式时，不需要启动本地后端服务
             # BackendManager仅用于向后兼容（如果用户需要本地模式）
             # 使用代理服务器时，不需要BackendManager
@@ -1549,7 +1637,7 @@ class ConfigManager(QMainWindow):
             def run(self):
                 try:
                     # Vercel冷启动可能需要10-15秒，增加超时时间
-                    response = requests.get(f"{self.backend_url}/api/health", timeout=15)
+                    response = get_shared_session().get(f"{self.backend_url}/api/health", timeout=15)
                     self.finished.emit(response.status_code == 200)
                 except Exception as e:
                     logging.warning(f"健康检查失败: {str(e)}")
@@ -1672,9 +1760,12 @@ class ConfigManager(QMainWindow):
             }
         """)
 
-        # 立即创建外观配置和任务管理标签页(基础功能)
+        # 立即创建外观配置标签页(首个可见标签页)
         tabs.addTab(self.create_config_tab(), "🎨 " + self.i18n.tr("config.tabs.appearance"))
-        tabs.addTab(self.create_tasks_tab(), "📋 " + self.i18n.tr("config.tabs.tasks"))
+
+        # 延迟创建任务管理标签页(任务数据保存在task_model中,不依赖视图)
+        self.tasks_tab_widget = None
+        tabs.addTab(QWidget(), "📋 " + self.i18n.tr("config.tabs.tasks"))  # 占位widget
 
         # 延迟创建场景设置标签页
         self.scene_tab_widget = None
@@ -1743,7 +1834,10 @@ class ConfigManager(QMainWindow):
             self.cancel_btn.show()
 
         # 懒加载各标签页
-        if index == 2:  # 场景设置标签页
+        if index == 1:  # 任务管理标签页
+            if self.tasks_tab_widget is None:
+                self._load_tasks_tab()
+        elif index == 2:  # 场景设置标签页
             if self.scene_tab_widget is None:
                 self._load_scene_tab()
         elif index == 3:  # 通知设置标签页
@@ -1759,6 +1853,28 @@ class ConfigManager(QMainWindow):
             if self.about_tab_widget is None:
                 self._load_about_tab()
 
+    def _load_tasks_tab(self):
+        """加载任务管理标签页"""
+        if self.tasks_tab_widget is not None:
+            return  # 已经加载过了
+
+        try:
+            # Block signals to prevent recursive tab change events
+            self.tabs.blockSignals(True)
+
+            self.tasks_tab_widget = self.create_tasks_tab()
+            # 替换占位widget
+            self.tabs.removeTab(1)
+            self.tabs.insertTab(1, self.tasks_tab_widget, "📋 " + self.i18n.tr("config.tabs.tasks"))
+            self.tabs.setCurrentIndex(1)  # 切换到任务管理标签页
+
+            # Restore signals
+            self.tabs.blockSignals(False)
+        except Exception as e:
+            logging.error(f"加载任务管理标签页失败: {e}", exc_info=True)
+            # Ensure signals are restored even on error
+            self.tabs.blockSignals(False)
+
     def _load_scene_tab(self):
         """加载场景设置标签页"""
         if self.scene_tab_widget is not None:
@@ -1911,13 +2027,14 @@ class ConfigManager(QMainWindow):
         scroll_area.setWidgetResizable(True)
         scroll_area.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
 
-        # 创建内容widget
+        # 创建内容widget(控件样式在容器上统一设置一次,子控件继承)
         widget = QWidget()
+        widget.setStyleSheet(StyleManager.config_page())
         layout = QVBoxLayout(widget)
 
         # 基本设置组
         basic_group = QGroupBox(tr("appearance.basic_settings"))
-        basic_group.setStyleSheet("QGroupBox::title { color: #666666; font-weight: bold; font-size: 14px; }")
+        basic_group.setProperty("role", "section")
         basic_layout = QFormLayout()
         basic_layout.setVerticalSpacing(12)
         basic_layout.setHorizontalSpacing(10)
@@ -1946,6 +2063,7 @@ class ConfigManager(QMainWindow):
             name = self.i18n.tr(name_key)
             btn = QPushButton(f"{name} ({height}px)")
             btn.setCheckable(True)
+            btn.setProperty("role", "preset")
             btn.setMaximumWidth(100)
             # 使用 partial 避免 Lambda 循环引用
             btn.clicked.connect(partial(self.set_height_preset, height))
@@ -1959,7 +2077,6 @@ class ConfigManager(QMainWindow):
         height_layout.addWidget(custom_label)
 
         self.height_spin = QSpinBox()
-        self.height_spin.setStyleSheet(StyleManager.input_number())
         self.height_spin.setRange(2, 50)
         # 延迟读取配置值，避免配置未加载时出错
         current_height = self.config.get('bar_height', 20) if self.config else 20
@@ -1978,7 +2095,6 @@ class ConfigManager(QMainWindow):
 
         # 显示器索引 (隐藏,使用默认值)
         self.screen_spin = QSpinBox()
-        self.screen_spin.setStyleSheet(StyleManager.input_number())
         self.screen_spin.setRange(0, 10)
         self.screen_spin.setValue(self.config.get('screen_index', 0) if self.config else 0)
         self.screen_spin.setVisible(False)  # 隐藏控件
@@ -1986,7 +2102,6 @@ class ConfigManager(QMainWindow):
 
         # 更新间隔 (隐藏,使用默认值)
         self.interval_spin = QSpinBox()
-        self.interval_spin.setStyleSheet(StyleManager.input_number())
         self.interval_spin.setRange(100, 60000)
         self.interval_spin.setValue(self.config.get('update_interval', 1000) if self.config else 1000)
         self.interval_spin.setSuffix(" " + tr("appearance.milliseconds"))
@@ -1999,7 +2114,6 @@ class ConfigManager(QMainWindow):
         language_layout.setContentsMargins(0, 0, 0, 0)
 
         self.language_combo = QComboBox()
-        self.language_combo.setStyleSheet(StyleManager.dropdown())
         self.language_combo.addItem(tr("config.language_zh_cn"), "zh_CN")
         self.language_combo.addItem(tr("config.language_en_us"), "en_US")
 
@@ -2044,7 +2158,7 @@ class ConfigManager(QMainWindow):
 
         # 颜色设置组
         color_group = QGroupBox(tr("appearance.color_settings"))
-        color_group.setStyleSheet("QGroupBox::title { color: #666666; font-weight: bold; font-size: 14px; }")
+        color_group.setProperty("role", "section")
         color_layout = QVBoxLayout()  # 改用VBoxLayout以避免QFormLayout的标签间距
         color_layout.setSpacing(15)
         color_layout.setContentsMargins(10, 10, 10, 10)
@@ -2119,6 +2233,10 @@ class ConfigManager(QMainWindow):
         self.opacity_slider.valueChanged.connect(
             lambda value: self.opacity_label.setText(f"{value}%")
         )
+        # 拖动时实时预览
+        self.opacity_slider.valueChanged.connect(
+            lambda value: self._preview_config_value(('background_opacity',), int(value * 255 / 100))
+        )
 
         opacity_layout.addWidget(QLabel(tr("appearance.background_opacity") + ":"))
         opacity_layout.addWidget(self.opacity_slider)
@@ -2134,7 +2252,6 @@ class ConfigManager(QMainWindow):
         marker_width_layout = QHBoxLayout()
         marker_width_layout.addWidget(QLabel(self.i18n.tr("config.labels.marker_width") + ":"))
         self.marker_width_spin = QSpinBox()
-        self.marker_width_spin.setStyleSheet(StyleManager.input_number())
         self.marker_width_spin.setRange(1, 10)
         self.marker_width_spin.setValue(self.config.get('marker_width', 2) if self.config else 2)
         self.marker_width_spin.setSuffix(" " + tr("appearance.pixels"))
@@ -2147,7 +2264,6 @@ class ConfigManager(QMainWindow):
         marker_type_layout = QHBoxLayout()
         marker_type_layout.addWidget(QLabel(self.i18n.tr("config.labels.marker_type") + ":"))
         self.marker_type_combo = QComboBox()
-        self.marker_type_combo.setStyleSheet(StyleManager.dropdown())
         self.marker_type_combo.addItems(["line", "image", "gif"])
         marker_type = self.config.get('marker_type', 'line') if self.config else 'line'
         self.marker_type_combo.setCurrentText(marker_type)
@@ -2155,7 +2271,7 @@ class ConfigManager(QMainWindow):
         marker_type_layout.addWidget(self.marker_type_combo)
 
         marker_type_hint = QLabel(tr("appearance.marker_type_note"))
-        marker_type_hint.setStyleSheet("color: #888888; font-size: 9pt;")
+        marker_type_hint.setProperty("role", "hint")
         marker_type_layout.addWidget(marker_type_hint)
         marker_type_layout.addStretch()
 
@@ -2166,7 +2282,6 @@ class ConfigManager(QMainWindow):
         preset_selector_layout.addWidget(QLabel("📦 标记图片预设:"))
 
         self.marker_preset_combo = QComboBox()
-        self.marker_preset_combo.setStyleSheet(StyleManager.dropdown())
 
         # 添加所有预设到下拉框
         current_preset_id = self.marker_preset_manager.get_current_preset_id()
@@ -2258,7 +2373,6 @@ class ConfigManager(QMainWindow):
         marker_size_layout.addWidget(custom_size_label)
 
         self.marker_size_spin = QSpinBox()
-        self.marker_size_spin.setStyleSheet(StyleManager.input_number())
         self.marker_size_spin.setRange(20, 200)
         marker_size = self.config.get('marker_size', 50) if self.config else 50
         self.marker_size_spin.setValue(marker_size)
@@ -2285,7 +2399,6 @@ class ConfigManager(QMainWindow):
         # X轴偏移
         offset_layout.addWidget(QLabel("X:"))
         self.marker_x_offset_spin = QSpinBox()
-        self.marker_x_offset_spin.setStyleSheet(StyleManager.input_number())
         self.marker_x_offset_spin.setRange(-100, 100)
         self.marker_x_offset_spin.setValue(self.config.get('marker_x_offset', 0))
         self.marker_x_offset_spin.setSuffix(" px")
@@ -2298,7 +2411,6 @@ class ConfigManager(QMainWindow):
         # Y轴偏移
         offset_layout.addWidget(QLabel("Y:"))
         self.marker_y_offset_spin = QSpinBox()
-        self.marker_y_offset_spin.setStyleSheet(StyleManager.input_number())
         self.marker_y_offset_spin.setRange(-100, 100)
         self.marker_y_offset_spin.setValue(self.config.get('marker_y_offset', 0))
         self.marker_y_offset_spin.setSuffix(" px")
@@ -2308,7 +2420,7 @@ class ConfigManager(QMainWindow):
 
         # 合并的提示信息
         offset_hint = QLabel(tr("appearance.marker_offset_note"))
-        offset_hint.setStyleSheet("color: #888888; font-size: 9pt;")
+        offset_hint.setProperty("role", "hint")
         offset_layout.addWidget(offset_hint)
         offset_layout.addStretch()
 
@@ -2320,14 +2432,13 @@ class ConfigManager(QMainWindow):
 
         # 标记动画播放速度
         self.marker_speed_spin = QSpinBox()
-        self.marker_speed_spin.setStyleSheet(StyleManager.input_number())
         self.marker_speed_spin.setRange(10, 500)
         self.marker_speed_spin.setValue(self.config.get('marker_speed', 100))
         self.marker_speed_spin.setSuffix(" %")
         self.marker_speed_spin.setSingleStep(10)
         self.marker_speed_spin.setMaximumWidth(100)
         speed_hint = QLabel(tr("appearance.marker_speed_note"))
-        speed_hint.setStyleSheet("color: #888888; font-size: 9pt;")
+        speed_hint.setProperty("role", "hint")
         speed_layout = QHBoxLayout()
         speed_layout.addWidget(QLabel(self.i18n.tr("config.labels.animation_speed") + ":"))
         speed_layout.addWidget(self.marker_speed_spin)
@@ -2354,7 +2465,7 @@ class ConfigManager(QMainWindow):
 
         # 弹幕设置组
         danmaku_group = QGroupBox("弹幕设置")
-        danmaku_group.setStyleSheet("QGroupBox::title { color: #666666; font-weight: bold; font-size: 14px; }")
+        danmaku_group.setProperty("role", "section")
         danmaku_layout = QVBoxLayout()  # 改用VBoxLayout以避免左侧标签间距
         danmaku_layout.setSpacing(12)
         danmaku_layout.setContentsMargins(10, 10, 10, 10)
@@ -2364,7 +2475,7 @@ class ConfigManager(QMainWindow):
         danmaku_config = self.config.get('danmaku', {})
         self.danmaku_enabled_check.setChecked(danmaku_config.get('enabled', True))
         danmaku_hint = QLabel("在进度条上方显示B站风格的滚动弹幕")
-        danmaku_hint.setStyleSheet("color: #888888; font-size: 9pt;")
+        danmaku_hint.setProperty("role", "hint")
         danmaku_enable_layout = QHBoxLayout()
         danmaku_enable_layout.addWidget(self.danmaku_enabled_check)
         danmaku_enable_layout.addWidget(danmaku_hint)
@@ -2373,13 +2484,12 @@ class ConfigManager(QMainWindow):
 
         # 弹幕频率
         self.danmaku_frequency_spin = QSpinBox()
-        self.danmaku_frequency_spin.setStyleSheet(StyleManager.input_number())
         self.danmaku_frequency_spin.setRange(5, 120)
         self.danmaku_frequency_spin.setValue(danmaku_config.get('frequency', 30))
         self.danmaku_frequency_spin.setSuffix(" 秒")
         self.danmaku_frequency_spin.setMaximumWidth(80)
         freq_hint = QLabel("每隔多少秒生成一条弹幕")
-        freq_hint.setStyleSheet("color: #888888; font-size: 9pt;")
+        freq_hint.setProperty("role", "hint")
         freq_layout = QHBoxLayout()
         freq_layout.addWidget(QLabel("生成频率:"))
         freq_layout.addWidget(self.danmaku_frequency_spin)
@@ -2389,14 +2499,16 @@ class ConfigManager(QMainWindow):
 
         # 弹幕速度
         self.danmaku_speed_spin = QDoubleSpinBox()
-        self.danmaku_speed_spin.setStyleSheet(StyleManager.input_number())
         self.danmaku_speed_spin.setRange(0.5, 3.0)
         self.danmaku_speed_spin.setValue(danmaku_config.get('speed', 1.0))
         self.danmaku_speed_spin.setSingleStep(0.1)
         self.danmaku_speed_spin.setSuffix(" x")
         self.danmaku_speed_spin.setMaximumWidth(80)
+        self.danmaku_speed_spin.valueChanged.connect(
+            lambda value: self._preview_config_value(('danmaku', 'speed'), value)
+        )
         speed_hint = QLabel("弹幕移动速度倍率")
-        speed_hint.setStyleSheet("color: #888888; font-size: 9pt;")
+        speed_hint.setProperty("role", "hint")
         speed_layout = QHBoxLayout()
         speed_layout.addWidget(QLabel("移动速度:"))
         speed_layout.addWidget(self.danmaku_speed_spin)
@@ -2406,13 +2518,12 @@ class ConfigManager(QMainWindow):
 
         # 字体大小
         self.danmaku_font_size_spin = QSpinBox()
-        self.danmaku_font_size_spin.setStyleSheet(StyleManager.input_number())
         self.danmaku_font_size_spin.setRange(10, 24)
         self.danmaku_font_size_spin.setValue(danmaku_config.get('font_size', 14))
         self.danmaku_font_size_spin.setSuffix(" px")
         self.danmaku_font_size_spin.setMaximumWidth(80)
         font_hint = QLabel("弹幕文字大小")
-        font_hint.setStyleSheet("color: #888888; font-size: 9pt;")
+        font_hint.setProperty("role", "hint")
         font_layout = QHBoxLayout()
         font_layout.addWidget(QLabel("字体大小:"))
         font_layout.addWidget(self.danmaku_font_size_spin)
@@ -2439,6 +2550,9 @@ class ConfigManager(QMainWindow):
         self.danmaku_opacity_slider.valueChanged.connect(
             lambda value: self.danmaku_opacity_label.setText(f"{value}%")
         )
+        self.danmaku_opacity_slider.valueChanged.connect(
+            lambda value: self._preview_config_value(('danmaku', 'opacity'), round(value / 100, 2))
+        )
 
         opacity_layout.addWidget(self.danmaku_opacity_slider)
         opacity_layout.addWidget(self.danmaku_opacity_label)
@@ -2451,12 +2565,11 @@ class ConfigManager(QMainWindow):
 
         # 同屏数量
         self.danmaku_max_count_spin = QSpinBox()
-        self.danmaku_max_count_spin.setStyleSheet(StyleManager.input_number())
         self.danmaku_max_count_spin.setRange(1, 10)
         self.danmaku_max_count_spin.setValue(danmaku_config.get('max_count', 3))
         self.danmaku_max_count_spin.setMaximumWidth(80)
         count_hint = QLabel("同时显示的最大弹幕数量")
-        count_hint.setStyleSheet("color: #888888; font-size: 9pt;")
+        count_hint.setProperty("role", "hint")
         count_layout = QHBoxLayout()
         count_layout.addWidget(QLabel("同屏数量:"))
         count_layout.addWidget(self.danmaku_max_count_spin)
@@ -2466,13 +2579,12 @@ class ConfigManager(QMainWindow):
 
         # Y轴偏移
         self.danmaku_y_offset_spin = QSpinBox()
-        self.danmaku_y_offset_spin.setStyleSheet(StyleManager.input_number())
         self.danmaku_y_offset_spin.setRange(20, 200)
         self.danmaku_y_offset_spin.setValue(danmaku_config.get('y_offset', 80))
         self.danmaku_y_offset_spin.setSuffix(" px")
         self.danmaku_y_offset_spin.setMaximumWidth(80)
         y_offset_hint = QLabel("弹幕距离进度条的垂直距离")
-        y_offset_hint.setStyleSheet("color: #888888; font-size: 9pt;")
+        y_offset_hint.setProperty("role", "hint")
         y_offset_layout = QHBoxLayout()
         y_offset_layout.addWidget(QLabel("垂直位置:"))
         y_offset_layout.addWidget(self.danmaku_y_offset_spin)
@@ -2482,14 +2594,13 @@ class ConfigManager(QMainWindow):
 
         # 颜色模式
         self.danmaku_color_mode_combo = QComboBox()
-        self.danmaku_color_mode_combo.setStyleSheet(StyleManager.dropdown())
         self.danmaku_color_mode_combo.addItem("自动(根据任务类型)", "auto")
         self.danmaku_color_mode_combo.addItem("固定白色", "fixed")
         current_color_mode = danmaku_config.get('color_mode', 'auto')
         index = 0 if current_color_mode == 'auto' else 1
         self.danmaku_color_mode_combo.setCurrentIndex(index)
         color_mode_hint = QLabel("弹幕颜色显示方式")
-        color_mode_hint.setStyleSheet("color: #888888; font-size: 9pt;")
+        color_mode_hint.setProperty("role", "hint")
         color_mode_layout = QHBoxLayout()
         color_mode_layout.addWidget(QLabel("颜色模式:"))
         color_mode_layout.addWidget(self.danmaku_color_mode_combo)
@@ -2520,7 +2631,7 @@ class ConfigManager(QMainWindow):
     def _create_ai_planning_group(self) -> QGroupBox:
         """创建AI任务规划区域组件。"""
         ai_group = QGroupBox("🤖 " + self.i18n.tr("tasks.sections.ai_planning"))
-        ai_group.setStyleSheet("QGroupBox::title { color: #666666; font-weight: bold; font-size: 14px; }")
+        ai_group.setProperty("role", "section")
         ai_layout = QVBoxLayout()
 
         # 说明标签
@@ -2583,14 +2694,13 @@ class ConfigManager(QMainWindow):
     def _create_theme_selection_group(self) -> QGroupBox:
         """创建预设主题选择区域组件。"""
         theme_group = QGroupBox("🎨 " + self.i18n.tr("tasks.sections.preset_themes"))
-        theme_group.setStyleSheet("QGroupBox::title { color: #666666; font-weight: bold; font-size: 14px; }")
+        theme_group.setProperty("role", "section")
         theme_layout = QHBoxLayout()
 
         theme_label = QLabel(self.i18n.tr("tasks.labels.select_theme"))
         theme_layout.addWidget(theme_label)
 
         self.theme_combo = QComboBox()
-        self.theme_combo.setStyleSheet(StyleManager.dropdown())
         self.theme_combo.setMinimumWidth(150)
         QTimer.singleShot(200, self._load_preset_themes)
         self.theme_combo.currentIndexChanged.connect(self.on_preset_theme_changed_with_preview)
@@ -2616,7 +2726,7 @@ class ConfigManager(QMainWindow):
         if not schedule_title.startswith("📅"):
             schedule_title = "📅 " + schedule_title
         schedule_panel = QGroupBox(schedule_title)
-        schedule_panel.setStyleSheet("QGroupBox::title { color: #666666; font-weight: bold; font-size: 14px; }")
+        schedule_panel.setProperty("role", "section")
         schedule_layout = QVBoxLayout()
 
         # 说明文字
@@ -2678,8 +2788,9 @@ class ConfigManager(QMainWindow):
         scroll_area.setWidgetResizable(True)
         scroll_area.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
 
-        # 创建内容widget
+        # 创建内容widget(控件样式在容器上统一设置一次,子控件继承)
         widget = QWidget()
+        widget.setStyleSheet(StyleManager.config_page())
         layout = QVBoxLayout(widget)
 
         # 顶部信息和模板加载区域
@@ -2710,7 +2821,7 @@ class ConfigManager(QMainWindow):
 
         # 合并的模板管理区域
         self.template_group = QGroupBox("📋 模板管理")
-        self.template_group.setStyleSheet("QGroupBox::title { color: #666666; font-weight: bold; font-size: 14px; }")
+        self.template_group.setProperty("role", "section")
 
         template_container = QVBoxLayout()
 
@@ -2723,7 +2834,6 @@ class ConfigManager(QMainWindow):
         self.template_layout.addWidget(type_label)
 
         self.template_type_combo = QComboBox()
-        self.template_type_combo.setStyleSheet(StyleManager.dropdown())
         self.template_type_combo.setMinimumWidth(120)
         self.template_type_combo.addItem("📋 预设模板", "preset")
         self.template_type_combo.addItem("💾 我的模板", "custom")
@@ -2736,7 +2846,6 @@ class ConfigManager(QMainWindow):
 
         # 统一的模板选择下拉框(动态内容)
         self.unified_template_combo = QComboBox()
-        self.unified_template_combo.setStyleSheet(StyleManager.dropdown())
         self.unified_template_combo.setMinimumWidth(200)
         self.template_layout.addWidget(self.unified_template_combo)
 
@@ -2770,7 +2879,7 @@ class ConfigManager(QMainWindow):
 
         # 可视化时间轴编辑器（延迟创建，避免初始化时阻塞）
         timeline_group = QGroupBox("🎨 " + self.i18n.tr("tasks.sections.visual_timeline"))
-        timeline_group.setStyleSheet("QGroupBox::title { color: #666666; font-weight: bold; font-size: 14px; }")
+        timeline_group.setProperty("role", "section")
         timeline_layout = QVBoxLayout()
 
         timeline_hint = QLabel(self.i18n.tr("tasks.hints.drag_to_adjust"))
@@ -2791,11 +2900,14 @@ class ConfigManager(QMainWindow):
         # 延迟创建时间轴编辑器
         QTimer.singleShot(150, lambda: self._init_timeline_editor(timeline_layout, timeline_placeholder))
 
-        # 任务表格
-        self.tasks_table = QTableWidget()
-        self.tasks_table.setStyleSheet(StyleManager.table())
-        self.tasks_table.setColumnCount(6)
-        self.tasks_table.setHorizontalHeaderLabels([self.i18n.tr("config.table.start_time"), self.i18n.tr("config.table.end_time"), self.i18n.tr("config.table.task_name"), self.i18n.tr("config.table.bg_color"), self.i18n.tr("config.table.text_color"), self.i18n.tr("config.table.actions")])
+        # 任务表格(模型/视图: 委托绘制单元格,只为正在编辑的单元格创建编辑器)
+        self.task_model.set_headers([self.i18n.tr("config.table.start_time"), self.i18n.tr("config.table.end_time"), self.i18n.tr("config.table.task_name"), self.i18n.tr("config.table.bg_color"), self.i18n.tr("config.table.text_color"), self.i18n.tr("config.table.actions")])
+        self.tasks_table = create_task_table_view(
+            self.task_model,
+            stylesheet=StyleManager.table(),
+            time_editor_style=StyleManager.input_time(),
+        )
+        self.tasks_table.delete_delegate.delete_requested.connect(self.delete_task)
         self.tasks_table.horizontalHeader().setSectionResizeMode(2, QHeaderView.Stretch)
         # 设置列宽以适应英文文本
         self.tasks_table.setColumnWidth(0, 100)  # Start Time
@@ -2812,8 +2924,8 @@ class ConfigManager(QMainWindow):
         min_visible_rows = 8  # 至少显示8行
         max_visible_rows = 15  # 最多显示15行,超出则显示滚动条
 
-        # 计算实际高度 (初始化时使用 self.tasks)
-        actual_row_count = len(self.tasks) if hasattr(self, 'tasks') else 0
+        # 计算实际高度
+        actual_row_count = self.task_model.rowCount()
         visible_rows = max(min_visible_rows, min(actual_row_count, max_visible_rows))
         calculated_height = header_height + (visible_rows * row_height) + 20  # +20 padding
 
@@ -2824,12 +2936,7 @@ class ConfigManager(QMainWindow):
         self.tasks_table.setVerticalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAsNeeded)
         self.tasks_table.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
 
-        # 监听表格项的变化,实时同步到时间轴
-        self.tasks_table.itemChanged.connect(self.on_table_item_changed)
-
-        # 延迟加载任务到表格，避免初始化时阻塞UI
-        QTimer.singleShot(100, self.load_tasks_to_table)
-
+        # 任务已在task_model中,视图创建即显示(表格编辑经模型信号同步到时间轴)
         layout.addWidget(self.tasks_table)
 
         # 按钮组
@@ -2928,9 +3035,9 @@ class ConfigManager(QMainWindow):
             self.config.setdefault('theme', {})['mode'] = 'preset'
             self.config.setdefault('theme', {})['current_theme_id'] = self.selected_theme_id
             
-            # 立即保存配置（确保主题设置持久化）
+            # 立即提交配置（确保主题设置持久化）
             # 使用防抖动保存（主题切换通常是单次操作，但防抖动可以防止快速切换时的多次写入）
-            self.config_debouncer.save_debounced(self.config)
+            self._commit_config(self.config)
 
     def apply_selected_theme(self) -> None:
         """Apply selected theme with user notification
@@ -3097,20 +3204,13 @@ class ConfigManager(QMainWindow):
             # 更新时间轴编辑器显示（仅预览，不保存）
             QTimer.singleShot(50, lambda: self.timeline_editor.set_tasks(temp_tasks) if self.timeline_editor else None)
 
-        # 同时更新任务表格中的颜色输入框（确保保存时使用主题配色）
-        if task_colors and hasattr(self, 'tasks_table') and self.tasks_table:
-            for row in range(self.tasks_table.rowCount()):
-                color_widget = self.tasks_table.cellWidget(row, 3)
-                if color_widget:
-                    color_input = color_widget.findChild(QLineEdit)
-                    if color_input:
-                        color_index = row % len(task_colors)
-                        new_color = task_colors[color_index]
-                        color_input.setText(new_color)
-                        # 更新颜色按钮预览
-                        color_btn = color_widget.findChild(QPushButton)
-                        if color_btn:
-                            color_btn.setStyleSheet(f"background-color: {new_color}; border: 1px solid #ccc; border-radius: 3px;")
+        # 同时更新任务表格中的颜色（确保保存时使用主题配色）
+        if task_colors:
+            self._syncing_from_timeline = True  # 时间轴已在上方预览,无需再次刷新
+            try:
+                self.task_model.apply_colors(task_colors)
+            finally:
+                self._syncing_from_timeline = False
             logging.info(f"主题 {theme_id} 已应用到任务表格: {len(task_colors)} 种配色")
 
 
@@ -4277,10 +4377,13 @@ class ConfigManager(QMainWindow):
         self.account_tab_widget = None
         self._load_account_tab()
 
+        # 新账号登录: 丢弃上一个账号的缓存
+        self._sync_account_state()
+
         # Refresh quota display in task management tab
         if hasattr(self, 'quota_label'):
             logging.info("[LOGIN] Refreshing quota display")
-            self.refresh_quota_status_async()
+            self.refresh_quota_status_async(force=True)
 
     def _on_account_logout_success(self):
         """Callback when AccountManager logout succeeds."""
@@ -4295,9 +4398,17 @@ class ConfigManager(QMainWindow):
         self.account_tab_widget = None
         self._load_account_tab()
 
+        if getattr(self, 'account_state', None):
+            self.account_state.set_user_tier(new_tier)
+
         # Refresh quota display
         if hasattr(self, 'quota_label'):
-            self.refresh_quota_status_async()
+            self.refresh_quota_status_async(force=True)
+
+    def _sync_account_state(self):
+        """登录/会员变化后将账户状态缓存与auth_client同步(切换账号时清空缓存)"""
+        if getattr(self, 'account_state', None) and self.auth_client:
+            self.account_state.attach(self.auth_client)
 
     # ==================== Account Methods (Proxy to AccountManager) ====================
 
@@ -4353,10 +4464,12 @@ class ConfigManager(QMainWindow):
             self.ai_client.user_tier = user_tier
             logging.info(f"[LOGIN] 已更新ai_client.user_tier: {user_tier}")
 
+        self._sync_account_state()
+
         # 刷新任务管理tab中的配额显示
         if hasattr(self, 'quota_label'):
             logging.info("[LOGIN] 刷新任务管理tab中的配额显示")
-            self.refresh_quota_status_async()
+            self.refresh_quota_status_async(force=True)
 
     def _on_refresh_account_clicked(self):
         """
@@ -4432,6 +4545,9 @@ class ConfigManager(QMainWindow):
                 self.ai_client.user_tier = user_tier
                 logging.info(f"[ACCOUNT] 已更新ai_client.user_tier: {user_tier}")
 
+            if getattr(self, 'account_state', None):
+                self.account_state.update_subscription(result)
+
             # ⚠️ 关键修复：同步更新主窗口的auth_client.user_info（修复进度条水印问题）
             # 因为main.py和config_gui.py使用不同的AuthClient实例，需要手动同步
             if self.main_window and hasattr(self.main_window, 'auth_client'):
@@ -4446,7 +4562,7 @@ class ConfigManager(QMainWindow):
             # ⚠️ 关键修复：刷新任务管理tab中的配额显示(在重新加载account_tab之前)
             if hasattr(self, 'quota_label'):
                 logging.info("[ACCOUNT] 刷新任务管理tab中的配额显示")
-                self.refresh_quota_status_async()
+                self.refresh_quota_status_async(force=True)
 
             # 重新加载个人中心tab以显示最新状态
             logging.info(f"[ACCOUNT] 准备重新加载个人中心tab")
@@ -4664,13 +4780,13 @@ class ConfigManager(QMainWindow):
             True: 配额充足,可以继续
             False: 配额已用完,显示升级对话框
         """
-        from gaiya.core.auth_client import AuthClient
         from gaiya.ui.onboarding import QuotaExhaustedDialog
 
         try:
             logging.info("[配额检查] 开始检查AI配额...")
-            auth_client = AuthClient()
-            user_tier = auth_client.get_user_tier()
+            # 从账户状态缓存读取,不阻塞UI; 缓存过期时后台刷新
+            account_state = getattr(self, 'account_state', None) or get_account_state()
+            user_tier = account_state.user_tier()
             logging.info(f"[配额检查] 用户等级: {user_tier}")
 
             # Pro会员或以上不受限制
@@ -4679,7 +4795,7 @@ class ConfigManager(QMainWindow):
                 return True
 
             # 免费用户检查配额
-            quota_status = auth_client.get_quota_status()
+            quota_status = account_state.quota()
             logging.info(f"[配额检查] 免费用户,配额状态: {quota_status}")
 
             # 检查 daily_plan 配额 - 处理嵌套结构
@@ -4698,6 +4814,12 @@ class ConfigManager(QMainWindow):
             else:
                 logging.warning(f"[配额检查] 配额状态不是字典: {type(quota_status)}")
 
+            if remaining_quota <= 0 and account_state.quota_predates_reset():
+                # 缓存来自每日重置之前,配额可能已恢复: 强制后台刷新,本次请求交由服务端判定(用完时返回429)
+                logging.info("[配额检查] 缓存配额早于每日重置,强制刷新并交由服务端判定")
+                account_state.refresh(force=True)
+                return True
+
             if remaining_quota <= 0:
                 # 配额已用完,显示升级对话框
                 logging.warning("[配额检查] 配额已用完,显示升级对话框")
@@ -5870,6 +5992,11 @@ class ConfigManager(QMainWindow):
         if hasattr(self, "update_account_display"):
             self.update_account_display()
 
+        # 升级后的会员等级与配额
+        self._sync_account_state()
+        if hasattr(self, 'quota_label'):
+            self.refresh_quota_status_async(force=True)
+
     def _show_payment_method_dialog(self, plan_id: str):
         """显示支付方式选择对话框 - 代理到 PaymentManager"""
         # ✅ Use PaymentManager if available (modular implementation)
@@ -7015,289 +7142,50 @@ class ConfigManager(QMainWindow):
             self.payment_polling_dialog.close()
 
     def on_timeline_task_changed(self, task_index, new_start_minutes, new_end_minutes):
-        """时间轴任务时间改变时更新表格"""
-        if 0 <= task_index < len(self.timeline_editor.tasks):
-            # 更新表格中的时间
-            if task_index < self.tasks_table.rowCount():
-                # 获取时间控件
-                start_widget = self.tasks_table.cellWidget(task_index, 0)
-                end_widget = self.tasks_table.cellWidget(task_index, 1)
-
-                if start_widget and end_widget:
-                    # 转换分钟为 QTime
-                    start_hours = new_start_minutes // 60
-                    start_mins = new_start_minutes % 60
-                    end_hours = new_end_minutes // 60
-                    end_mins = new_end_minutes % 60
-
-                    start_widget.setTime(QTime(start_hours, start_mins))
-                    end_widget.setTime(QTime(end_hours, end_mins))
-
-            # 如果有相邻任务也被影响，同步更新
-            # 更新下一个任务
-            if task_index + 1 < len(self.timeline_editor.tasks):
-                next_task = self.timeline_editor.tasks[task_index + 1]
-                next_start_min = self.timeline_editor.time_to_minutes(next_task['start'])
-                next_end_min = self.timeline_editor.time_to_minutes(next_task['end'])
-
-                if task_index + 1 < self.tasks_table.rowCount():
-                    next_start_widget = self.tasks_table.cellWidget(task_index + 1, 0)
-                    next_end_widget = self.tasks_table.cellWidget(task_index + 1, 1)
-
-                    if next_start_widget and next_end_widget:
-                        next_start_widget.setTime(QTime(next_start_min // 60, next_start_min % 60))
-                        next_end_widget.setTime(QTime(next_end_min // 60, next_end_min % 60))
-
-            # 更新上一个任务
-            if task_index > 0:
-                prev_task = self.timeline_editor.tasks[task_index - 1]
-                prev_start_min = self.timeline_editor.time_to_minutes(prev_task['start'])
-                prev_end_min = self.timeline_editor.time_to_minutes(prev_task['end'])
-
-                prev_start_widget = self.tasks_table.cellWidget(task_index - 1, 0)
-                prev_end_widget = self.tasks_table.cellWidget(task_index - 1, 1)
-
-                if prev_start_widget and prev_end_widget:
-                    prev_start_widget.setTime(QTime(prev_start_min // 60, prev_start_min % 60))
-                    prev_end_widget.setTime(QTime(prev_end_min // 60, prev_end_min % 60))
-
-    def on_table_item_changed(self, item):
-        """表格项改变时的处理(任务名称修改)"""
-        # 只处理任务名称列(第2列)的修改
-        if item and item.column() == 2:
-            # 使用防抖，避免频繁刷新时间轴
-            if not hasattr(self, '_table_refresh_timer'):
-                self._table_refresh_timer = QTimer()
-                self._table_refresh_timer.setSingleShot(True)
-                self._table_refresh_timer.timeout.connect(self.refresh_timeline_from_table)
-            
-            # 重置定时器
-            if self._table_refresh_timer.isActive():
-                self._table_refresh_timer.stop()
-            self._table_refresh_timer.start(300)  # 300ms防抖
+        """时间轴任务时间改变时更新表格(拖动可能同时影响相邻任务)"""
+        timeline_tasks = self.timeline_editor.tasks
+        if not 0 <= task_index < len(timeline_tasks):
+            return
+
+        self._syncing_from_timeline = True
+        try:
+            for row in (task_index - 1, task_index, task_index + 1):
+                if 0 <= row < len(timeline_tasks) and row < self.task_model.rowCount():
+                    task = timeline_tasks[row]
+                    self.task_model.set_times(row, task['start'], task['end'])
+        finally:
+            self._syncing_from_timeline = False
+
+    def _on_task_model_edited(self, *args):
+        """任务模型被编辑(名称/颜色/时间/增删行)时,防抖刷新时间轴"""
+        if getattr(self, '_syncing_from_timeline', False):
+            return  # 改动来自时间轴本身
+
+        # 使用防抖，避免频繁刷新时间轴
+        if not hasattr(self, '_table_refresh_timer'):
+            self._table_refresh_timer = QTimer()
+            self._table_refresh_timer.setSingleShot(True)
+            self._table_refresh_timer.timeout.connect(self.refresh_timeline_from_table)
+
+        # 重置定时器
+        if self._table_refresh_timer.isActive():
+            self._table_refresh_timer.stop()
+        self._table_refresh_timer.start(300)  # 300ms防抖
 
     def refresh_timeline_from_table(self):
         """从表格刷新时间轴"""
-        tasks = []
-        for row in range(self.tasks_table.rowCount()):
-            start_widget = self.tasks_table.cellWidget(row, 0)
-            end_widget = self.tasks_table.cellWidget(row, 1)
-            name_item = self.tasks_table.item(row, 2)
-            color_widget = self.tasks_table.cellWidget(row, 3)
-
-            if start_widget and end_widget and name_item and color_widget:
-                color_input = color_widget.findChild(QLineEdit)
-
-                start_time = start_widget.time().toString("HH:mm")
-                end_time = end_widget.time().toString("HH:mm")
-
-                # 处理 24:00
-                if end_widget.property("is_midnight"):
-                    end_time = "24:00"
-                elif end_time == "00:00" and row == self.tasks_table.rowCount() - 1:
-                    end_time = "24:00"
-
-                task = {
-                    "start": start_time,
-                    "end": end_time,
-                    "task": name_item.text(),
-                    "color": color_input.text() if color_input else "#4CAF50"
-                }
-                tasks.append(task)
+        tasks = [
+            {"start": t['start'], "end": t['end'], "task": t['task'], "color": t['color']}
+            for t in self.task_model.tasks()
+        ]
 
         # 刷新时间轴编辑器（延迟执行，避免阻塞）
         if hasattr(self, 'timeline_editor') and self.timeline_editor:
             QTimer.singleShot(50, lambda: self.timeline_editor.set_tasks(tasks) if self.timeline_editor else None)
 
     def load_tasks_to_table(self):
-        """加载任务到表格（优化性能，分批创建UI组件）"""
-        # 暂时阻塞itemChanged信号,避免在加载时触发同步
-        self.tasks_table.blockSignals(True)
-        
-        # 禁用UI更新，加快批量操作
-        self.tasks_table.setUpdatesEnabled(False)
-
-        self.tasks_table.setRowCount(len(self.tasks))
-
-        # 批量创建UI组件，使用延迟刷新避免阻塞
-        for row, task in enumerate(self.tasks):
-            # 设置行高以适配36px按钮
-            self.tasks_table.setRowHeight(row, 48)
-
-            # 开始时间
-            start_time = QTimeEdit()
-            start_time.setStyleSheet(StyleManager.input_time())
-            start_time.setDisplayFormat("HH:mm")
-            # 特殊处理 24:00
-            if task['start'] == "24:00":
-                start_time.setTime(QTime(0, 0))  # 显示为 00:00
-            else:
-                start_time.setTime(QTime.fromString(task['start'], "HH:mm"))
-            self.tasks_table.setCellWidget(row, 0, start_time)
-
-            # 结束时间
-            end_time = QTimeEdit()
-            end_time.setStyleSheet(StyleManager.input_time())
-            end_time.setDisplayFormat("HH:mm")
-            # 特殊处理 24:00
-            if task['end'] == "24:00":
-                end_time.setTime(QTime(0, 0))  # 显示为 00:00,但保存时会处理
-                # 添加一个属性标记这是 24:00
-                end_time.setProperty("is_midnight", True)
-            else:
-                end_time.setTime(QTime.fromString(task['end'], "HH:mm"))
-            self.tasks_table.setCellWidget(row, 1, end_time)
-
-            # 任务名称
-            name_item = QTableWidgetItem(task['task'])
-            self.tasks_table.setItem(row, 2, name_item)
-
-            # 颜色选择
-            color_widget = QWidget()
-            color_layout = QHBoxLayout(color_widget)
-            color_layout.setContentsMargins(4, 4, 4, 4)
-
-            # 隐藏的颜色值输入框(用于存储数据)
-            color_input = QLineEdit(task['color'])
-            color_input.setVisible(False)
-
-            # 可点击的色块按钮
-            color_btn = QPushButton()
-            color_btn.setFixedSize(50, 30)
-            color_btn.setStyleSheet(f"""
-                QPushButton {{
-                    background-color: {task['color']};
-                    border: 2px solid #CCCCCC;
-                    border-radius: 4px;
-                }}
-                QPushButton:hover {{
-                    border: 2px solid #999999;
-                }}
-            """)
-            color_btn.setCursor(Qt.CursorShape.PointingHandCursor)
-            color_btn.setToolTip("点击选择颜色")
-            # 点击色块直接打开颜色选择器
-            color_btn.clicked.connect(partial(self.choose_color, color_input))
-
-            # 当颜色值改变时,更新色块样式
-            def on_color_changed(text):
-                color_btn.setStyleSheet(f"""
-                    QPushButton {{
-                        background-color: {text};
-                        border: 2px solid #CCCCCC;
-                        border-radius: 4px;
-                    }}
-                    QPushButton:hover {{
-                        border: 2px solid #999999;
-                    }}
-                """)
-                # 使用防抖，避免频繁刷新时间轴
-                if not hasattr(self, '_timeline_refresh_timer'):
-                    self._timeline_refresh_timer = QTimer()
-                    self._timeline_refresh_timer.setSingleShot(True)
-                    self._timeline_refresh_timer.timeout.connect(self.refresh_timeline_from_table)
-
-                # 重置定时器
-                if self._timeline_refresh_timer.isActive():
-                    self._timeline_refresh_timer.stop()
-                self._timeline_refresh_timer.start(300)  # 300ms防抖
-
-            color_input.textChanged.connect(on_color_changed)
-
-            color_layout.addWidget(color_input)
-            color_layout.addWidget(color_btn)
-            color_layout.addStretch()
-
-            self.tasks_table.setCellWidget(row, 3, color_widget)
-
-            # 文字颜色选择
-            text_color = task.get('text_color', '#FFFFFF')  # 默认白色
-            text_color_widget = QWidget()
-            text_color_layout = QHBoxLayout(text_color_widget)
-            text_color_layout.setContentsMargins(4, 4, 4, 4)
-
-            # 隐藏的颜色值输入框(用于存储数据)
-            text_color_input = QLineEdit(text_color)
-            text_color_input.setVisible(False)
-
-            # 可点击的色块按钮
-            text_color_btn = QPushButton()
-            text_color_btn.setFixedSize(50, 30)
-            text_color_btn.setStyleSheet(f"""
-                QPushButton {{
-                    background-color: {text_color};
-                    border: 2px solid #CCCCCC;
-                    border-radius: 4px;
-                }}
-                QPushButton:hover {{
-                    border: 2px solid #999999;
-                }}
-            """)
-            text_color_btn.setCursor(Qt.CursorShape.PointingHandCursor)
-            text_color_btn.setToolTip("点击选择颜色")
-            # 点击色块直接打开颜色选择器
-            text_color_btn.clicked.connect(partial(self.choose_color, text_color_input))
-
-            # 当颜色值改变时,更新色块样式
-            def on_text_color_changed(text):
-                text_color_btn.setStyleSheet(f"""
-                    QPushButton {{
-                        background-color: {text};
-                        border: 2px solid #CCCCCC;
-                        border-radius: 4px;
-                    }}
-                    QPushButton:hover {{
-                        border: 2px solid #999999;
-                    }}
-                """)
-                # 使用防抖，避免频繁刷新时间轴
-                if not hasattr(self, '_timeline_refresh_timer'):
-                    self._timeline_refresh_timer = QTimer()
-                    self._timeline_refresh_timer.setSingleShot(True)
-                    self._timeline_refresh_timer.timeout.connect(self.refresh_timeline_from_table)
-
-                # 重置定时器
-                if self._timeline_refresh_timer.isActive():
-                    self._timeline_refresh_timer.stop()
-                self._timeline_refresh_timer.start(300)  # 300ms防抖
-
-            text_color_input.textChanged.connect(on_text_color_changed)
-
-            text_color_layout.addWidget(text_color_input)
-            text_color_layout.addWidget(text_color_btn)
-            text_color_layout.addStretch()
-
-            self.tasks_table.setCellWidget(row, 4, text_color_widget)
-
-            # 删除按钮 (仅图标,极简风格)
-            delete_btn = QPushButton("🗑")
-            # 使用 partial 避免 Lambda 循环引用
-            delete_btn.clicked.connect(partial(self.delete_task, row))
-            delete_btn.setFixedSize(32, 32)
-            delete_btn.setStyleSheet("""
-                QPushButton {
-                    background-color: transparent;
-                    border: 1px solid #CCCCCC;
-                    border-radius: 4px;
-                    font-size: 16px;
-                }
-                QPushButton:hover {
-                    background-color: #F5F5F5;
-                    border: 1px solid #999999;
-                }
-            """)
-            delete_btn.setToolTip("删除任务")
-            delete_btn.setCursor(Qt.CursorShape.PointingHandCursor)
-            self.tasks_table.setCellWidget(row, 5, delete_btn)
-
-        # 恢复UI更新
-        self.tasks_table.setUpdatesEnabled(True)
-
-        # 延迟调整列宽，避免阻塞
-        QTimer.singleShot(100, lambda: self.tasks_table.resizeColumnsToContents() if hasattr(self, 'tasks_table') else None)
-
-        # 恢复itemChanged信号
-        self.tasks_table.blockSignals(False)
+        """加载任务到表格(一次模型重置,不再逐行创建控件)"""
+        self.task_model.set_tasks(self.tasks)
 
         # 更新表格高度
         self.update_table_height()
@@ -7308,179 +7196,25 @@ class ConfigManager(QMainWindow):
 
     def add_task(self):
         """添加新任务,自动接续上一个任务的结束时间"""
-        row = self.tasks_table.rowCount()
-        self.tasks_table.insertRow(row)
-
-        # 设置行高以适配36px按钮
-        self.tasks_table.setRowHeight(row, 48)
-
-        # 智能计算开始时间:接续上一个任务的结束时间
-        if row > 0:
-            # 获取上一个任务的结束时间
-            prev_end_widget = self.tasks_table.cellWidget(row - 1, 1)
-            if prev_end_widget:
-                prev_end_time = prev_end_widget.time()
-                new_start_time = prev_end_time
-                # 默认新任务持续1小时
-                new_end_time = prev_end_time.addSecs(3600)
-            else:
-                # 如果获取失败,使用默认值
-                new_start_time = QTime(9, 0)
-                new_end_time = QTime(10, 0)
-        else:
-            # 第一个任务,使用默认值
-            new_start_time = QTime(9, 0)
-            new_end_time = QTime(10, 0)
-
-        # 设置开始时间
-        start_time = QTimeEdit()
-        start_time.setStyleSheet(StyleManager.input_time())
-        start_time.setDisplayFormat("HH:mm")
-        start_time.setTime(new_start_time)
-        self.tasks_table.setCellWidget(row, 0, start_time)
-
-        # 设置结束时间
-        end_time = QTimeEdit()
-        end_time.setStyleSheet(StyleManager.input_time())
-        end_time.setDisplayFormat("HH:mm")
-        end_time.setTime(new_end_time)
-        self.tasks_table.setCellWidget(row, 1, end_time)
-
-        name_item = QTableWidgetItem("新任务")
-        self.tasks_table.setItem(row, 2, name_item)
-
         # 根据当前任务数量从色板中循环选择颜色
+        row = self.task_model.rowCount()
         default_color = self.COLOR_PALETTE[row % len(self.COLOR_PALETTE)]
+        self.task_model.add_task("新任务", default_color)
 
-        # 颜色选择
-        color_widget = QWidget()
-        color_layout = QHBoxLayout(color_widget)
-        color_layout.setContentsMargins(4, 4, 4, 4)
-
-        # 隐藏的颜色值输入框(用于存储数据)
-        color_input = QLineEdit(default_color)
-        color_input.setVisible(False)
-
-        # 可点击的色块按钮
-        color_btn = QPushButton()
-        color_btn.setFixedSize(50, 30)
-        color_btn.setStyleSheet(f"""
-            QPushButton {{
-                background-color: {default_color};
-                border: 2px solid #CCCCCC;
-                border-radius: 4px;
-            }}
-            QPushButton:hover {{
-                border: 2px solid #999999;
-            }}
-        """)
-        color_btn.setCursor(Qt.CursorShape.PointingHandCursor)
-        color_btn.setToolTip("点击选择颜色")
-        color_btn.clicked.connect(partial(self.choose_color, color_input))
-
-        # 当颜色值改变时,更新色块样式
-        def on_color_changed(text):
-            color_btn.setStyleSheet(f"""
-                QPushButton {{
-                    background-color: {text};
-                    border: 2px solid #CCCCCC;
-                    border-radius: 4px;
-                }}
-                QPushButton:hover {{
-                    border: 2px solid #999999;
-                }}
-            """)
-
-        color_input.textChanged.connect(on_color_changed)
-
-        color_layout.addWidget(color_input)
-        color_layout.addWidget(color_btn)
-        color_layout.addStretch()
-
-        self.tasks_table.setCellWidget(row, 3, color_widget)
-
-        # 文字颜色选择（默认白色）
-        text_color_widget = QWidget()
-        text_color_layout = QHBoxLayout(text_color_widget)
-        text_color_layout.setContentsMargins(4, 4, 4, 4)
-
-        # 隐藏的颜色值输入框(用于存储数据)
-        text_color_input = QLineEdit("#FFFFFF")
-        text_color_input.setVisible(False)
-
-        # 可点击的色块按钮
-        text_color_btn = QPushButton()
-        text_color_btn.setFixedSize(50, 30)
-        text_color_btn.setStyleSheet(f"""
-            QPushButton {{
-                background-color: #FFFFFF;
-                border: 2px solid #CCCCCC;
-                border-radius: 4px;
-            }}
-            QPushButton:hover {{
-                border: 2px solid #999999;
-            }}
-        """)
-        text_color_btn.setCursor(Qt.CursorShape.PointingHandCursor)
-        text_color_btn.setToolTip("点击选择颜色")
-        text_color_btn.clicked.connect(partial(self.choose_color, text_color_input))
-
-        # 当颜色值改变时,更新色块样式
-        def on_text_color_changed(text):
-            text_color_btn.setStyleSheet(f"""
-                QPushButton {{
-                    background-color: {text};
-                    border: 2px solid #CCCCCC;
-                    border-radius: 4px;
-                }}
-                QPushButton:hover {{
-                    border: 2px solid #999999;
-                }}
-            """)
-
-        text_color_input.textChanged.connect(on_text_color_changed)
-
-        text_color_layout.addWidget(text_color_input)
-        text_color_layout.addWidget(text_color_btn)
-        text_color_layout.addStretch()
-
-        self.tasks_table.setCellWidget(row, 4, text_color_widget)
-
-        # 删除按钮 (仅图标,极简风格)
-        delete_btn = QPushButton("🗑")
-        # 使用 partial 避免 Lambda 循环引用
-        delete_btn.clicked.connect(partial(self.delete_task, row))
-        delete_btn.setFixedSize(32, 32)
-        delete_btn.setStyleSheet("""
-            QPushButton {
-                background-color: transparent;
-                border: 1px solid #CCCCCC;
-                border-radius: 4px;
-                font-size: 16px;
-            }
-            QPushButton:hover {
-                background-color: #F5F5F5;
-                border: 1px solid #999999;
-            }
-        """)
-        delete_btn.setToolTip("删除任务")
-        delete_btn.setCursor(Qt.CursorShape.PointingHandCursor)
-        self.tasks_table.setCellWidget(row, 5, delete_btn)
-
-        # 刷新时间轴
-        self.refresh_timeline_from_table()
-
-        # 更新表格高度
+        # 更新表格高度(时间轴由模型信号防抖刷新)
         self.update_table_height()
 
     def update_table_height(self):
         """根据当前任务数量动态更新表格高度"""
+        if self.tasks_table is None:
+            return
+
         row_height = 60
         header_height = 30
         min_visible_rows = 8
         max_visible_rows = 15
 
-        actual_row_count = self.tasks_table.rowCount()
+        actual_row_count = self.task_model.rowCount()
         visible_rows = max(min_visible_rows, min(actual_row_count, max_visible_rows))
         calculated_height = header_height + (visible_rows * row_height) + 20
 
@@ -7496,19 +7230,9 @@ class ConfigManager(QMainWindow):
         )
 
         if reply == QMessageBox.Yes:
-            self.tasks_table.removeRow(row)
-            # 重新绑定删除按钮
-            for r in range(self.tasks_table.rowCount()):
-                delete_btn = self.tasks_table.cellWidget(r, 5)
-                if delete_btn:
-                    delete_btn.clicked.disconnect()
-                    # 使用 partial 避免 Lambda 循环引用
-                    delete_btn.clicked.connect(partial(self.delete_task, r))
-
-            # 刷新时间轴
-            self.refresh_timeline_from_table()
+            self.task_model.remove_task(row)
 
-            # 更新表格高度
+            # 更新表格高度(时间轴由模型信号防抖刷新)
             self.update_table_height()
 
     def clear_all_tasks(self):
@@ -7520,7 +7244,7 @@ class ConfigManager(QMainWindow):
         )
 
         if reply == QMessageBox.Yes:
-            self.tasks_table.setRowCount(0)
+            self.task_model.set_tasks([])
             # 刷新时间轴（延迟执行）
             if hasattr(self, 'timeline_editor') and self.timeline_editor:
                 QTimer.singleShot(50, lambda: self.timeline_editor.set_tasks([]) if self.timeline_editor else None)
@@ -7550,7 +7274,7 @@ class ConfigManager(QMainWindow):
 
     def save_as_template(self):
         """将当前任务保存为自定义模板"""
-        if self.tasks_table.rowCount() == 0:
+        if self.task_model.rowCount() == 0:
             QMessageBox.warning(self, self.i18n.tr("account.message.cannot_save_empty"), "当前没有任何任务,无法保存为模板!")
             return
 
@@ -7568,32 +7292,10 @@ class ConfigManager(QMainWindow):
             return
 
         # 收集当前所有任务
-        tasks = []
-        for row in range(self.tasks_table.rowCount()):
-            start_widget = self.tasks_table.cellWidget(row, 0)
-            end_widget = self.tasks_table.cellWidget(row, 1)
-            name_item = self.tasks_table.item(row, 2)
-            color_widget = self.tasks_table.cellWidget(row, 3)
-
-            if start_widget and end_widget and name_item and color_widget:
-                color_input = color_widget.findChild(QLineEdit)
-
-                start_time = start_widget.time().toString("HH:mm")
-                end_time = end_widget.time().toString("HH:mm")
-
-                # 处理 24:00
-                if end_widget.property("is_midnight"):
-                    end_time = "24:00"
-                elif end_time == "00:00" and row == self.tasks_table.rowCount() - 1:
-                    end_time = "24:00"
-
-                task = {
-                    "start": start_time,
-                    "end": end_time,
-                    "task": name_item.text(),
-                    "color": color_input.text() if color_input else "#4CAF50"
-                }
-                tasks.append(task)
+        tasks = [
+            {"start": t['start'], "end": t['end'], "task": t['task'], "color": t['color']}
+            for t in self.task_model.tasks()
+        ]
 
         # 保存到用户目录
         template_filename = f"tasks_custom_{template_name}.json"
@@ -7701,10 +7403,7 @@ class ConfigManager(QMainWindow):
             )
 
             if reply == QMessageBox.Yes:
-                # 清空当前任务
-                self.tasks_table.setRowCount(0)
-
-                # 加载模板任务
+                # 加载模板任务(替换当前任务)
                 self.tasks = template_tasks
                 self.load_tasks_to_table()
 
@@ -8025,10 +7724,7 @@ class ConfigManager(QMainWindow):
             )
 
             if reply == QMessageBox.Yes:
-                # 清空当前任务
-                self.tasks_table.setRowCount(0)
-
-                # 加载模板任务
+                # 加载模板任务(替换当前任务)
                 self.tasks = template_tasks
                 self.load_tasks_to_table()
 
@@ -8234,12 +7930,19 @@ class ConfigManager(QMainWindow):
                 selected_date = date_edit.date().toPython()
                 test_datetime = datetime(selected_date.year, selected_date.month, selected_date.day)
 
-                # 获取日期类型
-                date_type = self.template_manager.get_date_type(test_datetime)
-
-                # 获取匹配的模板
-                matching_templates = self.template_manager.get_matching_templates(test_datetime)
-                best_match = self.template_manager.get_best_match_template(test_datetime)
+                # 从模板日历索引查询日期类型和自动应用的模板
+                calendar = self._get_template_calendar()
+                calendar_day = calendar.lookup(selected_date) if calendar else None
+                if calendar_day is not None:
+                    date_type = calendar_day.date_type
+                    matching_templates = self.template_manager.get_matching_templates_for_type(date_type)
+                    best_match = (self.template_manager.get_template_by_id(calendar_day.auto_template_id)
+                                  if calendar_day.auto_template_id else None)
+                else:
+                    # 索引尚未构建完成或日期在索引窗口之外: 逐条规则匹配
+                    date_type = self.template_manager.get_date_type(test_datetime)
+                    matching_templates = self.template_manager.get_matching_templates(test_datetime)
+                    best_match = self.template_manager.get_best_match_template(test_datetime)
 
                 # 构建结果文本
                 result_lines = []
@@ -8318,10 +8021,7 @@ class ConfigManager(QMainWindow):
             )
 
             if reply == QMessageBox.Yes:
-                # 清空当前任务
-                self.tasks_table.setRowCount(0)
-
-                # 加载模板任务
+                # 加载模板任务(替换当前任务)
                 self.tasks = template_tasks
                 self.load_tasks_to_table()
 
@@ -8347,44 +8047,16 @@ class ConfigManager(QMainWindow):
         self.update_height_preset_buttons()
 
     def on_height_value_changed(self, value):
-        """高度值改变时更新按钮状态"""
+        """高度值改变时更新按钮状态,并实时预览"""
         self.update_height_preset_buttons()
+        self._preview_config_value(('bar_height',), value)
 
     def update_height_preset_buttons(self):
-        """更新预设高度按钮的选中状态"""
+        """更新预设高度按钮的选中状态(样式由容器的:checked规则决定)"""
         current_height = self.height_spin.value()
         for btn, height in self.height_preset_buttons:
             # 只有当前值等于预设值时才选中按钮
-            is_selected = current_height == height
-            btn.setChecked(is_selected)
-
-            # 更新按钮样式
-            if is_selected:
-                btn.setStyleSheet("""
-                    QPushButton {
-                        background-color: #2196F3;
-                        color: white;
-                        border: 2px solid #1976D2;
-                        padding: 5px;
-                        font-weight: bold;
-                    }
-                    QPushButton:hover {
-                        background-color: #1976D2;
-                    }
-                """)
-            else:
-                btn.setStyleSheet("""
-                    QPushButton {
-                        background-color: #f0f0f0;
-                        color: #333;
-                        border: 1px solid #ccc;
-                        padding: 5px;
-                    }
-                    QPushButton:hover {
-                        background-color: #e0e0e0;
-                        border: 1px solid #999;
-                    }
-                """)
+            btn.setChecked(current_height == height)
 
     def _update_autostart_status_label(self):
         """更新自启动状态标签"""
@@ -8632,6 +8304,53 @@ class ConfigManager(QMainWindow):
                 logging.error(f"加载任务文件失败: {e}")
         return []
 
+    def _commit_config(self, config: Dict, tasks: Optional[List[Dict]] = None) -> None:
+        """提交配置(和任务): 发送变更集给进度条,文件在后台防抖动写入
+
+        Args:
+            config: 完整配置
+            tasks: 完整任务列表(None表示任务未修改)
+        """
+        change_set = ConfigChangeSet.between(self._live_config, config, self._committed_tasks, tasks)
+
+        self._committed_config = copy.deepcopy(config)
+        self._live_config = copy.deepcopy(config)
+        self.config_debouncer.save_debounced(config)
+        if tasks is not None:
+            self._committed_tasks = copy.deepcopy(tasks)
+            self.tasks_debouncer.save_debounced(tasks)
+
+        if change_set:
+            logging.info(f"[配置提交] 变更字段: {['.'.join(path) for path in change_set.changes]}"
+                         f"{', 任务列表' if change_set.tasks is not None else ''}")
+            self.config_changed.emit(change_set)
+
+    def _preview_config_value(self, path: Tuple[str, ...], value) -> None:
+        """滑块拖动时实时预览: 只发送变更集,不写入磁盘"""
+        if not self._live_config:
+            return  # 配置尚未加载
+
+        new_config = copy.deepcopy(self._live_config)
+        node = new_config
+        for key in path[:-1]:
+            node = node.setdefault(key, {})
+        node[path[-1]] = value
+
+        change_set = ConfigChangeSet.between(self._live_config, new_config, live=True)
+        if change_set:
+            self._live_config = new_config
+            self.config_changed.emit(change_set)
+
+    def _revert_config_preview(self) -> None:
+        """关闭窗口时撤销未保存的实时预览"""
+        if not self._live_config:
+            return
+        change_set = ConfigChangeSet.between(self._live_config, self._committed_config, live=True)
+        self._live_config = copy.deepcopy(self._committed_config)
+        if change_set:
+            logging.info("[配置预览] 撤销未保存的预览修改")
+            self.config_changed.emit(change_set)
+
     def check_task_overlap(self, tasks):
         """检查任务时间是否重叠"""
         for i in range(len(tasks)):
@@ -8763,55 +8482,30 @@ class ConfigManager(QMainWindow):
         Returns:
             任务列表, 如果验证失败返回 None
         """
-        import hashlib
-
         tasks = []
         auto_apply = self.config.get('theme', {}).get('auto_apply_task_colors', False)
-        logging.info(f"[保存任务] 开始从表格读取任务,表格行数: {self.tasks_table.rowCount()}")
-
-        for row in range(self.tasks_table.rowCount()):
-            start_widget = self.tasks_table.cellWidget(row, 0)
-            end_widget = self.tasks_table.cellWidget(row, 1)
-            name_item = self.tasks_table.item(row, 2)
-            color_widget = self.tasks_table.cellWidget(row, 3)
-            text_color_widget = self.tasks_table.cellWidget(row, 4)
-
-            if not all([start_widget, end_widget, name_item, color_widget, text_color_widget]):
-                continue
-
-            color_input = color_widget.findChild(QLineEdit)
-            text_color_input = text_color_widget.findChild(QLineEdit)
+        logging.info(f"[保存任务] 开始从表格读取任务,表格行数: {self.task_model.rowCount()}")
 
+        for row, task in enumerate(self.task_model.tasks()):
             # 确定任务颜色
             if auto_apply and theme_colors:
                 task_color = theme_colors[row % len(theme_colors)]
             else:
-                task_color = color_input.text() if color_input else "#4CAF50"
-
-            start_time = start_widget.time().toString("HH:mm")
-            end_time = end_widget.time().toString("HH:mm")
+                task_color = task['color'] or "#4CAF50"
 
-            # 处理午夜时间
-            if end_widget.property("is_midnight") or (end_time == "00:00" and row == self.tasks_table.rowCount() - 1):
-                end_time = "24:00"
-
-            task_name = name_item.text()
+            start_time, end_time, task_name = task['start'], task['end'], task['task']
 
             # 验证任务时长
             if not self._validate_task_duration(row, task_name, start_time, end_time):
                 return None
 
-            # 生成稳定ID
-            stable_key = f"{start_time}|{end_time}|{task_name}"
-            task_id = hashlib.sha1(stable_key.encode('utf-8')).hexdigest()
-
             tasks.append({
-                "id": task_id,
+                "id": stable_task_id(start_time, end_time, task_name),  # 生成稳定ID
                 "start": start_time,
                 "end": end_time,
                 "task": task_name,
                 "color": task_color,
-                "text_color": text_color_input.text() if text_color_input else "#FFFFFF"
+                "text_color": task['text_color'] or "#FFFFFF"
             })
 
         return tasks
@@ -8945,18 +8639,14 @@ class ConfigManager(QMainWindow):
             if self.marker_preset_manager:
                 config.update(self.marker_preset_manager.save_to_config())
 
-            # ========== 3. 保存配置 ==========
             self.config = config
-            self.config_debouncer.save_debounced(config)
 
-            # ========== 4. 收集并保存任务 ==========
+            # ========== 3. 收集任务 ==========
             theme_colors = self._get_theme_colors()
             tasks = self._collect_tasks_from_table(theme_colors)
-            if tasks is None:
-                return  # 验证失败
 
             # 检查任务时间重叠
-            overlap = self.check_task_overlap(tasks)
+            overlap = self.check_task_overlap(tasks) if tasks is not None else None
             if overlap:
                 row1, row2, task1_name, task2_name = overlap
                 reply = QMessageBox.warning(
@@ -8965,10 +8655,12 @@ class ConfigManager(QMainWindow):
                     QMessageBox.Yes | QMessageBox.No
                 )
                 if reply == QMessageBox.No:
-                    return
+                    tasks = None
 
-            with open(self.tasks_file, 'w', encoding='utf-8') as f:
-                json.dump(tasks, f, indent=4, ensure_ascii=False)
+            # ========== 4. 提交配置和任务(变更集即时生效,文件后台写入) ==========
+            self._commit_config(config, tasks)
+            if tasks is None:
+                return  # 任务验证失败或用户取消: 只保存配置
 
             # ========== 5. 日志和用户反馈 ==========
             logging.info(f"[任务保存] 任务已保存到文件: {len(tasks)}个任务")
@@ -8977,7 +8669,7 @@ class ConfigManager(QMainWindow):
                 logging.info(f"[任务保存] 最后一个任务: {tasks[-1].get('task', 'N/A')}, 结束: {tasks[-1].get('end', 'N/A')}")
 
             QMessageBox.information(self, self.i18n.tr("message.success"), "配置和任务已保存!\n\n如果 Gaiya 正在运行,更改会自动生效。")
-            logging.info("[任务保存] 配置保存完成，信号由ConfigDebouncer回调发送")
+            logging.info("[任务保存] 配置保存完成，变更集已发送")
 
             # 将主窗口提到前台
             if self.main_window:
@@ -8993,13 +8685,21 @@ class ConfigManager(QMainWindow):
         self._start_ai_status_timer_if_needed()
     
     def refresh_quota_status(self):
-        """刷新配额状态（同步版本，用于按钮点击）"""
-        self.refresh_quota_status_async()
+        """刷新配额状态（用于按钮点击，强制向服务端重新查询）"""
+        self.refresh_quota_status_async(force=True)
     
-    def refresh_quota_status_async(self):
-        """异步刷新配额状态（不阻塞UI）"""
+    def refresh_quota_status_async(self, force: bool = False):
+        """
+        刷新配额状态（不阻塞UI）
+
+        立即用本地缓存渲染; 缓存过期或force=True时后台刷新,
+        结果通过 account_state.quota_changed 回调 _on_quota_status_finished
+
+        Args:
+            force: 是否忽略缓存有效期立即刷新(登录、升级会员后)
+        """
         # 检查AI客户端是否已初始化
-        if not self.ai_client:
+        if not self.ai_client or not getattr(self, 'account_state', None):
             if hasattr(self, 'quota_label'):
                 self.quota_label.setText(self.i18n.tr("account.ui.connecting_cloud"))
                 self.quota_label.setStyleSheet("color: #ff9800; padding: 5px; font-weight: bold;")
@@ -9007,73 +8707,9 @@ class ConfigManager(QMainWindow):
                 self.generate_btn.setEnabled(False)
             return
 
-        # 异步获取配额状态
-        class QuotaCheckWorker(QThread):
-            finished = Signal(object)
-
-            def __init__(self, backend_url, user_id, user_tier):
-                super().__init__()
-                self.backend_url = backend_url
-                self.user_id = user_id
-                self.user_tier = user_tier
-
-            def run(self):
-                try:
-                    # Vercel冷启动可能需要10-15秒，增加超时时间
-                    response = requests.get(
-                        f"{self.backend_url}/api/quota-status",
-                        params={
-                            "user_id": self.user_id,
-                            "user_tier": self.user_tier
-                        },
-                        timeout=20  # 增加超时时间以应对Vercel冷启动
-                    )
-                    if response.status_code == 200:
-                        self.finished.emit(response.json())
-                    elif response.status_code == 404:
-                        # API未部署,使用本地默认配额(不显示错误)
-                        logging.debug(f"配额API未部署(404),使用默认配额")
-                        default_quota = {
-                            "remaining": {
-                                "daily_plan": 3 if self.user_tier == "free" else 50,
-                                "weekly_report": 1 if self.user_tier == "free" else 10,
-                                "chat": 10 if self.user_tier == "free" else 100
-                            },
-                            "user_tier": self.user_tier,
-                            "fallback": True  # 标记为fallback数据
-                        }
-                        self.finished.emit(default_quota)
-                    else:
-                        logging.warning(f"配额查询返回错误状态码: {response.status_code}")
-                        self.finished.emit(None)
-                except Exception as e:
-                    logging.warning(f"配额查询失败: {str(e)}")
-                    self.finished.emit(None)
-
-        # 创建并启动工作线程
-        # ⚠️ 关键修复: 使用 auth_client 的 user_tier,确保使用最新值
-        current_user_tier = self.ai_client.user_tier
-        if hasattr(self, 'auth_client') and self.auth_client and self.auth_client.user_info:
-            current_user_tier = self.auth_client.user_info.get('user_tier', current_user_tier)
-            logging.info(f"[QUOTA] 使用auth_client的tier: {current_user_tier}")
-
-        logging.info(f"[QUOTA] 开始查询配额: user_id={self.ai_client.user_id}, user_tier={current_user_tier}")
-        worker = QuotaCheckWorker(
-            self.ai_client.backend_url,
-            self.ai_client.user_id,
-            current_user_tier
-        )
-
-        # 使用lambda包装回调，确保worker在完成后被清理
-        def on_finished(quota_info):
-            self._on_quota_status_finished(quota_info)
-            # 断开信号连接
-            worker.finished.disconnect()
-            # 延迟删除worker对象
-            worker.deleteLater()
-
-        worker.finished.connect(on_finished)
-        worker.start()
+        self._on_quota_status_finished(self.account_state.quota())
+        if force:
+            self.account_state.refresh(force=True)
     
     def _on_quota_status_finished(self, quota_info):
         """配额状态检查完成回调"""
@@ -9205,7 +8841,7 @@ class ConfigManager(QMainWindow):
                     return
 
                 # 询问是否替换当前任务
-                if self.tasks_table.rowCount() > 0:
+                if self.task_model.rowCount() > 0:
                     reply = QMessageBox.question(
                         self,
                         '确认替换',
@@ -9216,15 +8852,12 @@ class ConfigManager(QMainWindow):
                     if reply == QMessageBox.No:
                         return
 
-                # 清空当前任务表格
-                self.tasks_table.setRowCount(0)
-
-                # 加载AI生成的任务
+                # 加载AI生成的任务(替换当前任务)
                 self.tasks = tasks
                 logging.info(f"[AI生成] 更新self.tasks,任务数: {len(self.tasks)}")
                 logging.info(f"[AI生成] 第一个任务: {self.tasks[0].get('task', 'N/A') if self.tasks else 'N/A'}")
                 self.load_tasks_to_table()
-                logging.info(f"[AI生成] load_tasks_to_table完成,tasks_table行数: {self.tasks_table.rowCount()}")
+                logging.info(f"[AI生成] load_tasks_to_table完成,任务行数: {self.task_model.rowCount()}")
 
                 # ✅ P1-1.5: 自动切换到任务管理tab
                 if hasattr(self, 'tabs'):
@@ -9254,13 +8887,14 @@ class ConfigManager(QMainWindow):
                 # ✅ P1-1.6.6: 使用API返回的quota_info直接更新UI,避免额外请求
                 quota_info = result.get('quota_info')
                 logging.info(f"[AI生成] result完整内容: success={result.get('success')}, tasks数={len(result.get('tasks', []))}, quota_info={quota_info}")
+                # 写入账户状态缓存, 通过quota_changed更新配额显示
                 if quota_info:
                     logging.info(f"[AI生成] 使用API返回的配额信息更新UI: {quota_info}")
-                    self._on_quota_status_finished(quota_info)
+                    self.account_state.update_quota(quota_info)
                 else:
-                    # 如果API没有返回quota_info,才发起新请求
-                    logging.warning("[AI生成] API未返回quota_info,发起新的配额查询")
-                    self.refresh_quota_status()
+                    # API没有返回quota_info时乐观扣减本地配额, 下次刷新以服务端为准
+                    logging.warning("[AI生成] API未返回quota_info,本地扣减配额")
+                    self.account_state.consume_quota("daily_plan")
 
                 # ✅ P1-1.6: 自动保存AI生成的任务为模板
                 self._auto_save_ai_template(tasks)
@@ -9466,6 +9100,8 @@ class ConfigManager(QMainWindow):
 
         self.ai_worker.finished.connect(on_finished)
         self.ai_worker.error.connect(on_error)
+        # 流式到达的任务实时显示在进度对话框中
+        self.ai_worker.partial.connect(self.ai_progress_dialog.update_partial)
         logging.info("[改进版AI生成] 启动AI工作线程...")
         self.ai_worker.start()
         logging.info(f"[改进版AI生成] AI生成任务已启动,prompt长度: {len(prompt)}")
@@ -9502,7 +9138,7 @@ class ConfigManager(QMainWindow):
         """横幅关闭按钮点击"""
         # 保存到配置
         self.config['ai_banner_closed'] = True
-        self.save_config()
+        self._commit_config(self.config)
         logging.info("AI功能横幅已关闭")
 
     def create_about_tab(self):
@@ -9752,8 +9388,7 @@ class ConfigManager(QMainWindow):
 
             def run(self):
                 try:
-                    import requests
-                    response = requests.get(self.url, stream=True, timeout=60)
+                    response = get_shared_session().get(self.url, stream=True, timeout=60)
                     response.raise_for_status()
 
                     downloaded = 0
@@ -9924,26 +9559,15 @@ del /f /q "%~f0"
     def _fetch_latest_release(self) -> dict:
         """获取最新版本信息(在后台线程中执行)"""
         from version import __version__, APP_METADATA
-        import requests
-        from requests.adapters import HTTPAdapter
-        from urllib3.util.retry import Retry
+        from gaiya.core.http_pool import get_http_pool
 
         # 调用GitHub API获取最新版本
         repo = APP_METADATA['repository'].replace('https://github.com/', '')
         api_url = f"https://api.github.com/repos/{repo}/releases/latest"
 
-        # 创建带重试机制的 Session，解决 SSL 连接复用问题
-        session = requests.Session()
-        retry_strategy = Retry(
-            total=3,
-            backoff_factor=0.5,
-            status_forcelist=[500, 502, 503, 504],
-        )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
-        session.mount("https://", adapter)
-
         try:
-            response = session.get(api_url, timeout=15)
+            # 共享连接池自带重试; 再次检查时带ETag, 未变化的304不计入GitHub速率限制
+            response = get_http_pool().get(api_url, timeout=15)
             response.raise_for_status()
 
             latest_release = response.json()
@@ -10196,8 +9820,8 @@ del /f /q "%~f0"
             # 更新语言配置
             self.config['language'] = new_lang
 
-            # 保存完整配置（使用防抖动保存）
-            self.config_debouncer.save_debounced(self.config)
+            # 提交完整配置（使用防抖动保存）
+            self._commit_config(self.config)
 
             # Get language display name
             language_names = {
@@ -10325,6 +9949,13 @@ del /f /q "%~f0"
                 self.ai_status_timer.stop()
             self.ai_status_timer = None
 
+        # 账户状态缓存为进程共享,只断开本窗口的订阅
+        if getattr(self, 'account_state', None):
+            try:
+                self.account_state.quota_changed.disconnect(self._on_quota_status_finished)
+            except (RuntimeError, TypeError):
+                pass
+
         # 取消正在运行的AI工作线程
         if hasattr(self, 'ai_worker') and self.ai_worker:
             try:
@@ -10350,6 +9981,17 @@ del /f /q "%~f0"
             self.ai_worker.deleteLater()
             self.ai_worker = None
 
+        # 等待模板日历构建线程结束(正在写索引缓存,不强制终止)
+        calendar_worker = getattr(self, '_template_calendar_worker', None)
+        if calendar_worker is not None:
+            try:
+                calendar_worker.built.disconnect()
+            except (RuntimeError, TypeError):
+                pass
+            calendar_worker.quit()
+            calendar_worker.wait()
+            self._template_calendar_worker = None
+
         # 停止支付轮询定时器 (PaymentManager)
         if hasattr(self, 'payment_manager') and self.payment_manager:
             self.payment_manager.stop_payment_polling()
@@ -10375,11 +10017,16 @@ del /f /q "%~f0"
             except Exception:
                 pass
 
+        # 撤销未保存的实时预览
+        self._revert_config_preview()
+
         # ✅ 性能优化: 应用关闭时立即保存待处理的配置（防抖动刷新）
-        if hasattr(self, 'config_debouncer') and self.config_debouncer:
+        for debouncer in (getattr(self, 'config_debouncer', None), getattr(self, 'tasks_debouncer', None)):
+            if not debouncer:
+                continue
             try:
-                if self.config_debouncer.flush():
-                    logging.info("ConfigDebouncer: 关闭时已刷新待处理的配置")
+                if debouncer.flush():
+                    logging.info(f"ConfigDebouncer: 关闭时已刷新待处理的文件 {debouncer.config_file.name}")
             except Exception as e:
                 logging.error(f"ConfigDebouncer刷新失败: {e}")
 
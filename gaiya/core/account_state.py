@@ -0,0 +1,320 @@
+"""
+GaiYa每日进度条 - 账户状态本地缓存
+配额、订阅与会员等级的离线优先缓存:
+- 读取立即返回磁盘/内存中的缓存值(stale-while-revalidate), 过期时在后台刷新
+- 同一时间只有一个后台刷新线程, 结果通过Qt信号通知所有订阅的界面
+- 本地已知的结果(AI调用成功后配额减一)先乐观更新, 下次刷新时以服务端为准
+"""
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+from PySide6.QtCore import QObject, QTimer, Signal
+
+logger = logging.getLogger(__name__)
+
+# 缓存超过该时长视为过期, 读取时触发后台刷新
+STALE_AFTER_SECONDS = 300
+# 定时刷新间隔(毫秒)
+REFRESH_INTERVAL_MS = 5 * 60 * 1000
+
+# 服务端每天在北京时间零点重置配额
+QUOTA_RESET_TZ = timezone(timedelta(hours=8))
+
+# 与 AuthClient.get_quota_status 的默认配额保持一致
+FREE_QUOTA = {"daily_plan": 3, "weekly_report": 1, "chat": 10}
+PAID_QUOTA = {"daily_plan": 50, "weekly_report": 10, "chat": 100}
+
+
+def last_quota_reset(now: Optional[float] = None) -> float:
+    """最近一次配额重置(北京时间零点)的时间戳"""
+    now_dt = datetime.fromtimestamp(time.time() if now is None else now, QUOTA_RESET_TZ)
+    return now_dt.replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+
+
+def default_quota(user_tier: str) -> Dict:
+    """服务端不可用且本地无缓存时使用的默认配额"""
+    remaining = FREE_QUOTA if user_tier == "free" else PAID_QUOTA
+    return {"remaining": dict(remaining), "user_tier": user_tier, "fallback": True}
+
+
+class AccountStateCache(QObject):
+    """
+    配额/订阅/会员等级的本地缓存
+
+    用法:
+        state = get_account_state()
+        state.quota_changed.connect(on_quota)
+        on_quota(state.quota())   # 立即用缓存渲染, 过期时后台刷新后再次回调
+    """
+
+    quota_changed = Signal(dict)
+    subscription_changed = Signal(dict)
+    tier_changed = Signal(str)
+
+    # 后台线程 -> 主线程
+    _refreshed = Signal(object)
+
+    def __init__(self, state_file: Optional[Path] = None,
+                 fetcher: Optional[Callable[[], Dict]] = None,
+                 stale_after: float = STALE_AFTER_SECONDS,
+                 parent: Optional[QObject] = None):
+        """
+        Args:
+            state_file: 缓存文件路径(默认 ~/.gaiya/account_state.json)
+            fetcher: 后台刷新函数, 返回 {"quota": {...}, "subscription": {...}}
+                     (默认通过AuthClient请求后端)
+            stale_after: 缓存过期秒数
+        """
+        super().__init__(parent)
+        self.state_file = state_file or Path.home() / ".gaiya" / "account_state.json"
+        self.stale_after = stale_after
+        self._fetcher = fetcher or self._fetch_from_backend
+        self._auth_client = None
+
+        self._lock = threading.Lock()
+        self._refresh_thread: Optional[threading.Thread] = None
+        self._state = self._load()
+
+        self._refreshed.connect(self._apply_refresh)
+
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(lambda: self.refresh(force=True))
+
+    # ========== 读取(立即返回缓存) ==========
+
+    def user_tier(self) -> str:
+        """缓存的会员等级"""
+        with self._lock:
+            return self._state.get("user_tier") or "free"
+
+    def quota(self) -> Dict:
+        """缓存的配额状态({"remaining": {...}, "user_tier": ...}), 过期时后台刷新"""
+        self.refresh()
+        with self._lock:
+            quota = self._state.get("quota")
+            tier = self._state.get("user_tier") or "free"
+        if not quota:
+            return default_quota(tier)
+        return json.loads(json.dumps(quota))
+
+    def remaining(self, feature: str = "daily_plan") -> int:
+        """某个AI功能的剩余配额"""
+        return int(self.quota().get("remaining", {}).get(feature, 0) or 0)
+
+    def subscription(self) -> Dict:
+        """缓存的订阅状态(未知时为空字典), 过期时后台刷新"""
+        self.refresh()
+        with self._lock:
+            return dict(self._state.get("subscription") or {})
+
+    def is_stale(self) -> bool:
+        """缓存是否需要刷新(超过过期时长, 或获取于最近一次每日重置之前)"""
+        with self._lock:
+            fetched_at = self._state.get("fetched_at") or 0
+        return time.time() - fetched_at >= self.stale_after or fetched_at < last_quota_reset()
+
+    def quota_predates_reset(self) -> bool:
+        """缓存的配额是否获取于最近一次每日重置之前(剩余次数可能已恢复)"""
+        with self._lock:
+            fetched_at = self._state.get("fetched_at") or 0
+        return fetched_at < last_quota_reset()
+
+    # ========== 刷新 ==========
+
+    def attach(self, auth_client):
+        """绑定当前登录的AuthClient, 用于后台刷新与切换账号时清空缓存"""
+        self._auth_client = auth_client
+        user_id = auth_client.get_user_id() if auth_client else None
+        with self._lock:
+            switched = self._state.get("user_id") != user_id
+        if switched:
+            self.clear()
+            with self._lock:
+                self._state["user_id"] = user_id
+        if auth_client and auth_client.is_logged_in():
+            self.set_user_tier(auth_client.get_user_tier())
+
+    def start(self, interval_ms: int = REFRESH_INTERVAL_MS):
+        """开始定时刷新(立即刷新一次过期的缓存)"""
+        self._timer.start(interval_ms)
+        self.refresh()
+
+    def stop(self):
+        """停止定时刷新"""
+        self._timer.stop()
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        在后台刷新缓存
+
+        缓存未过期(且未强制)或已有刷新在进行时不发起请求。
+
+        Returns:
+            是否启动了新的刷新
+        """
+        if not force and not self.is_stale():
+            return False
+        with self._lock:
+            if self._refresh_thread is not None and self._refresh_thread.is_alive():
+                return False
+            self._refresh_thread = threading.Thread(
+                target=self._run_refresh, name="account-state-refresh", daemon=True
+            )
+            thread = self._refresh_thread
+        thread.start()
+        return True
+
+    def wait_for_refresh(self, timeout: Optional[float] = None) -> bool:
+        """等待进行中的刷新线程结束(应用退出/测试时使用)"""
+        thread = self._refresh_thread
+        if thread is None:
+            return True
+        thread.join(timeout)
+        return not thread.is_alive()
+
+    def _run_refresh(self):
+        try:
+            result = self._fetcher() or {}
+        except Exception as e:
+            logger.warning(f"[账户状态] 后台刷新失败: {e}")
+            result = {}
+        self._refreshed.emit(result)
+
+    def _apply_refresh(self, result: Dict):
+        """主线程中应用刷新结果; 请求失败的部分保留原缓存"""
+        subscription = result.get("subscription")
+        if isinstance(subscription, dict) and subscription.get("success"):
+            self.update_subscription(subscription)
+
+        quota = result.get("quota")
+        if isinstance(quota, dict) and isinstance(quota.get("remaining"), dict):
+            # 默认配额只在没有真实数据时使用, 不覆盖已缓存的服务端结果
+            if not quota.get("fallback") or not self._has_server_quota():
+                self.update_quota(quota)
+                return
+
+        # 刷新失败也更新时间戳, 避免每次读取都重新请求
+        with self._lock:
+            self._state["fetched_at"] = time.time()
+        self._save()
+
+    def _fetch_from_backend(self) -> Dict:
+        auth_client = self._auth_client
+        if auth_client is None:
+            from gaiya.core.auth_client import AuthClient
+            auth_client = AuthClient()
+        if not auth_client.is_logged_in():
+            return {"quota": auth_client.get_quota_status()}
+        return {
+            "subscription": auth_client.get_subscription_status(),
+            "quota": auth_client.get_quota_status(),
+        }
+
+    # ========== 写入(本地已知结果) ==========
+
+    def update_quota(self, quota_info: Dict):
+        """写入服务端返回的配额(如quota-status或plan-tasks返回的quota_info)"""
+        if not isinstance(quota_info, dict):
+            return
+        quota = json.loads(json.dumps(quota_info))
+        with self._lock:
+            quota.setdefault("user_tier", self._state.get("user_tier") or "free")
+            self._state["quota"] = quota
+            self._state["fetched_at"] = time.time()
+        self._save()
+        self.quota_changed.emit(json.loads(json.dumps(quota)))
+
+    def consume_quota(self, feature: str = "daily_plan", amount: int = 1):
+        """AI调用成功后乐观地扣减本地配额, 下次刷新时以服务端为准"""
+        with self._lock:
+            quota = self._state.get("quota") or default_quota(self._state.get("user_tier") or "free")
+            remaining = quota.setdefault("remaining", {})
+            if feature not in remaining:
+                return
+            remaining[feature] = max(0, int(remaining[feature] or 0) - amount)
+            self._state["quota"] = quota
+            snapshot = json.loads(json.dumps(quota))
+        self._save()
+        self.quota_changed.emit(snapshot)
+
+    def update_subscription(self, status: Dict):
+        """写入订阅状态(如subscription-status的返回值), 会员等级变化时通知"""
+        if not isinstance(status, dict):
+            return
+        with self._lock:
+            self._state["subscription"] = dict(status)
+        self._save()
+        self.subscription_changed.emit(dict(status))
+        if status.get("user_tier"):
+            self.set_user_tier(status["user_tier"])
+
+    def set_user_tier(self, user_tier: str):
+        """更新会员等级(支付成功/刷新账户后); 变化时丢弃按旧等级缓存的配额"""
+        with self._lock:
+            if self._state.get("user_tier") == user_tier:
+                return
+            self._state["user_tier"] = user_tier
+            quota = self._state.get("quota")
+            if quota and quota.get("user_tier") != user_tier:
+                self._state.pop("quota", None)
+                self._state["fetched_at"] = 0
+        self._save()
+        self.tier_changed.emit(user_tier)
+
+    def clear(self):
+        """清空缓存(登出/切换账号)"""
+        with self._lock:
+            self._state = {}
+        self._save()
+
+    # ========== 持久化 ==========
+
+    def _has_server_quota(self) -> bool:
+        with self._lock:
+            quota = self._state.get("quota")
+        return bool(quota) and not quota.get("fallback")
+
+    def _load(self) -> Dict:
+        try:
+            if self.state_file.exists():
+                with open(self.state_file, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if isinstance(data, dict):
+                    return data
+        except (OSError, ValueError) as e:
+            logger.warning(f"[账户状态] 读取缓存失败,将重新获取: {e}")
+        return {}
+
+    def _save(self):
+        with self._lock:
+            data = json.dumps(self._state, ensure_ascii=False, indent=2)
+        try:
+            self.state_file.parent.mkdir(parents=True, exist_ok=True)
+            temp_file = self.state_file.with_suffix(".tmp")
+            with open(temp_file, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(temp_file, self.state_file)
+        except OSError as e:
+            logger.warning(f"[账户状态] 保存缓存失败: {e}")
+
+
+_account_state: Optional[AccountStateCache] = None
+
+
+def get_account_state(create: bool = True) -> Optional[AccountStateCache]:
+    """
+    获取进程内共享的账户状态缓存
+
+    Args:
+        create: 尚未创建时是否创建(False时可能返回None)
+    """
+    global _account_state
+    if _account_state is None and create:
+        _account_state = AccountStateCache()
+    return _account_state
@@ -19,6 +19,8 @@ from typing import Dict, List, Optional, Callable, Any
 from datetime import datetime, date
 from pathlib import Path
 
+from gaiya.utils.json_store import write_json
+
 
 # Achievement Category Definitions
 ACHIEVEMENT_CATEGORIES = {
@@ -627,6 +629,7 @@ class AchievementManager:
         self.achievements_file = data_dir / 'achievements.json'
 
         self.achievements: Dict[str, Achievement] = {}
+        self._saved_snapshot: Optional[Dict[str, Any]] = None  # last persisted unlocked/progress
         self._initialize_achievements()
         self._load_achievements()
 
@@ -668,41 +671,43 @@ class AchievementManager:
                     if achievement_id in self.achievements:
                         self.achievements[achievement_id].progress = progress
 
+                self._saved_snapshot = self._snapshot()
                 self.logger.info(f"Loaded {len(unlocked_achievements)} unlocked achievements")
 
         except Exception as e:
             self.logger.error(f"Failed to load achievements: {e}")
 
-    def _save_achievements(self):
-        """Save unlocked achievements and progress to JSON file"""
-        try:
-            self.data_dir.mkdir(parents=True, exist_ok=True)
-
-            unlocked = [
-                {
-                    'achievement_id': achievement.achievement_id,
-                    'unlocked_at': achievement.unlocked_at
-                }
-                for achievement in self.achievements.values()
-                if achievement.unlocked
-            ]
-
-            # Save progress for all achievements
-            progress = {
-                achievement.achievement_id: achievement.progress
-                for achievement in self.achievements.values()
+    def _snapshot(self) -> Dict[str, Any]:
+        """Unlocked achievements and progress as persisted in achievements.json"""
+        unlocked = [
+            {
+                'achievement_id': achievement.achievement_id,
+                'unlocked_at': achievement.unlocked_at
             }
+            for achievement in self.achievements.values()
+            if achievement.unlocked
+        ]
 
-            data = {
-                'unlocked': unlocked,
-                'progress': progress,
-                'last_updated': datetime.now().isoformat()
-            }
+        # Save progress for all achievements
+        progress = {
+            achievement.achievement_id: achievement.progress
+            for achievement in self.achievements.values()
+        }
+
+        return {'unlocked': unlocked, 'progress': progress}
+
+    def _save_achievements(self):
+        """Save unlocked achievements and progress to JSON file (skipped when nothing changed)"""
+        try:
+            snapshot = self._snapshot()
+            if snapshot == self._saved_snapshot:
+                return
 
-            with open(self.achievements_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+            data = {**snapshot, 'last_updated': datetime.now().isoformat()}
+            write_json(self.achievements_file, data)
+            self._saved_snapshot = snapshot
 
-            self.logger.info(f"Saved {len(unlocked)} unlocked achievements")
+            self.logger.info(f"Saved {len(snapshot['unlocked'])} unlocked achievements")
 
         except Exception as e:
             self.logger.error(f"Failed to save achievements: {e}")
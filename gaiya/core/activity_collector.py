@@ -6,34 +6,53 @@ Collects user activity data including:
 - Window titles
 - Browser URLs (Chrome/Edge/Firefox)
 
+Samples are stored run-length encoded as spans (app, title, url, start_ts, end_ts):
+a span is extended in place while the state is unchanged, so storage and range
+queries scale with the number of context switches rather than wall-clock time.
+
 Author: GaiYa Team
 Date: 2025-12-08
 """
 
 import time
 import logging
-from dataclasses import dataclass, asdict
-from typing import Optional, List
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, Optional, List
 from datetime import datetime
 import sqlite3
 import os
 
-import psutil
-import win32gui
-import win32process
-
-
-@dataclass
-class ActivitySnapshot:
-    """User activity snapshot data structure"""
-    app: str                    # Process name (e.g., "chrome.exe")
-    window_title: str          # Window title
-    url: str                   # Browser URL (empty if not a browser)
-    timestamp: int             # Unix timestamp
-
-    def to_dict(self) -> dict:
-        """Convert to dictionary"""
-        return asdict(self)
+from gaiya.data.sqlite_maintenance import DEFAULT_VACUUM_FREE_RATIO, delete_in_chunks, optimize_database
+from gaiya.core.activity_sampler import (
+    ActivitySampler, ActivitySnapshot, ForegroundSource, extract_browser_url
+)
+
+
+@dataclass(frozen=True)
+class ActivitySpan:
+    """A run of identical consecutive samples"""
+    app: str
+    window_title: str
+    url: str
+    start_ts: int              # First sample (Unix timestamp)
+    end_ts: int                # Last sample, or the next span's start when closed by a switch
+    sample_count: int = 1
+
+    @property
+    def duration(self) -> int:
+        """Span duration in seconds"""
+        return self.end_ts - self.start_ts
+
+    def to_snapshot(self) -> ActivitySnapshot:
+        """Latest state of the span as a snapshot"""
+        return ActivitySnapshot(
+            app=self.app,
+            window_title=self.window_title,
+            url=self.url,
+            timestamp=self.end_ts
+        )
 
 
 class ActivityCollector:
@@ -44,14 +63,22 @@ class ActivityCollector:
     - Monitor active window process
     - Collect window titles
     - Extract browser URLs (Chrome/Edge/Firefox)
-    - Persist data to local SQLite database
+    - Persist data to local SQLite database as run-length spans
     - Configurable collection frequency
     """
 
+    # Schema version (PRAGMA user_version); 1 = spans
+    SCHEMA_VERSION = 1
+
+    # A sample extends the open span only if it arrives within this many
+    # collection intervals (longer gaps mean the collector was stopped/asleep)
+    MAX_GAP_INTERVALS = 3
+
     def __init__(self,
                  db_path: str = None,
                  collection_interval: int = 5,
-                 logger: Optional[logging.Logger] = None):
+                 logger: Optional[logging.Logger] = None,
+                 source: Optional[ForegroundSource] = None):
         """
         Initialize Activity Collector
 
@@ -59,6 +86,8 @@ class ActivityCollector:
             db_path: SQLite database path (default: gaiya/data/activity_log.db)
             collection_interval: Collection interval in seconds (default: 5)
             logger: Logger instance
+            source: Foreground source for standalone collect_once() (default: platform source).
+                    Long-running consumers should subscribe to the shared ActivitySampler instead.
         """
         self.collection_interval = collection_interval
         self.logger = logger or logging.getLogger(__name__)
@@ -70,8 +99,16 @@ class ActivityCollector:
             db_path = os.path.join(data_dir, 'activity_log.db')
 
         self.db_path = db_path
+
+        # One connection shared by the sampler thread and readers
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._open_span: Optional[Dict] = None  # {'id', 'key', 'end_ts'}
         self._init_database()
 
+        # Standalone sampler (not started; collect_once() samples synchronously)
+        self._sampler = ActivitySampler(source=source, logger=self.logger)
+
         # State
         self.last_snapshot: Optional[ActivitySnapshot] = None
         self.is_collecting = False
@@ -79,33 +116,90 @@ class ActivityCollector:
         self.logger.info(f"ActivityCollector initialized (interval={collection_interval}s, db={db_path})")
 
     def _init_database(self):
-        """Initialize SQLite database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        # Create activity_snapshots table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS activity_snapshots (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                app TEXT NOT NULL,
-                window_title TEXT,
-                url TEXT,
-                timestamp INTEGER NOT NULL,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
+        """Initialize SQLite database (and compact legacy per-sample rows into spans)"""
+        with self._lock:
+            cursor = self._conn.cursor()
 
-        # Create index on timestamp for faster queries
-        cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_timestamp
-            ON activity_snapshots(timestamp)
-        ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS activity_spans (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    app TEXT NOT NULL,
+                    window_title TEXT,
+                    url TEXT,
+                    start_ts INTEGER NOT NULL,
+                    end_ts INTEGER NOT NULL,
+                    sample_count INTEGER NOT NULL DEFAULT 1
+                )
+            ''')
+
+            # Range queries filter on both ends
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_spans_start
+                ON activity_spans(start_ts)
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_spans_end
+                ON activity_spans(end_ts)
+            ''')
+
+            version = cursor.execute('PRAGMA user_version').fetchone()[0]
+            if version < self.SCHEMA_VERSION:
+                self._migrate_snapshots_to_spans(cursor)
+                cursor.execute(f'PRAGMA user_version = {self.SCHEMA_VERSION}')
 
-        conn.commit()
-        conn.close()
+            self._conn.commit()
+
+            # Continue the latest span after a restart if the gap is small
+            row = cursor.execute('''
+                SELECT id, app, window_title, url, end_ts
+                FROM activity_spans
+                ORDER BY end_ts DESC, id DESC
+                LIMIT 1
+            ''').fetchone()
+            if row:
+                self._open_span = {'id': row[0], 'key': (row[1], row[2] or "", row[3] or ""), 'end_ts': row[4]}
 
         self.logger.info("Activity database initialized")
 
+    def _migrate_snapshots_to_spans(self, cursor: sqlite3.Cursor):
+        """Compact rows of the legacy activity_snapshots table into spans (single pass)"""
+        exists = cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name='activity_snapshots'"
+        ).fetchone()
+        if not exists:
+            return
+
+        max_gap = self.collection_interval * self.MAX_GAP_INTERVALS
+        spans = []
+        current = None
+
+        rows = cursor.execute('''
+            SELECT app, window_title, url, timestamp
+            FROM activity_snapshots
+            ORDER BY timestamp, id
+        ''')
+        for app, title, url, timestamp in rows:
+            key = (app, title or "", url or "")
+            if current and current[0] == key and timestamp - current[2] <= max_gap:
+                current[2] = timestamp
+                current[3] += 1
+                continue
+            if current and timestamp - current[2] <= max_gap:
+                current[2] = timestamp  # Close the previous span at the switch
+            if current:
+                spans.append(current)
+            current = [key, timestamp, timestamp, 1]
+        if current:
+            spans.append(current)
+
+        cursor.executemany('''
+            INSERT INTO activity_spans (app, window_title, url, start_ts, end_ts, sample_count)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', [(key[0], key[1], key[2], start, end, count) for key, start, end, count in spans])
+        cursor.execute('DROP TABLE activity_snapshots')
+
+        self.logger.info(f"Compacted legacy activity snapshots into {len(spans)} spans")
+
     def get_active_window_info(self) -> Optional[ActivitySnapshot]:
         """
         Get current active window information
@@ -115,38 +209,13 @@ class ActivityCollector:
         """
         start_time = time.time()
         try:
-            # Get active window handle
-            hwnd = win32gui.GetForegroundWindow()
-            if not hwnd:
-                return None
-
-            # Get window title
-            window_title = win32gui.GetWindowText(hwnd)
-
-            # Get process ID
-            _, pid = win32process.GetWindowThreadProcessId(hwnd)
-
-            # Get process information
-            try:
-                process = psutil.Process(pid)
-                app_name = process.name()
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
-                app_name = "unknown"
-
-            # Extract URL if browser
-            url = self._extract_browser_url(app_name, window_title, hwnd)
-
-            # Create snapshot
-            snapshot = ActivitySnapshot(
-                app=app_name,
-                window_title=window_title,
-                url=url,
-                timestamp=int(time.time())
-            )
+            snapshot = self._sampler.sample()
 
             # Performance monitoring
-            elapsed = (time.time() - start_time) * 1000  # Convert to ms
-            self.logger.debug(f"📸 Activity snapshot: app={app_name}, title={window_title[:30]}, url={url[:50] if url else 'N/A'}, collect_time={elapsed:.1f}ms")
+            if snapshot and self.logger.isEnabledFor(logging.DEBUG):
+                elapsed = (time.time() - start_time) * 1000  # Convert to ms
+                url = snapshot.url
+                self.logger.debug(f"📸 Activity snapshot: app={snapshot.app}, title={snapshot.window_title[:30]}, url={url[:50] if url else 'N/A'}, collect_time={elapsed:.1f}ms")
 
             return snapshot
 
@@ -155,72 +224,67 @@ class ActivityCollector:
             self.logger.error(f"Failed to get active window info: {e} (time={elapsed:.1f}ms)")
             return None
 
-    def _extract_browser_url(self, app_name: str, window_title: str, hwnd: int) -> str:
+    def _extract_browser_url(self, app_name: str, window_title: str, hwnd: int = 0) -> str:
         """
         Extract URL from browser window
 
         Args:
             app_name: Process name
             window_title: Window title
-            hwnd: Window handle
+            hwnd: Window handle (unused, kept for compatibility)
 
         Returns:
             URL string (empty if not a browser or extraction failed)
         """
-        # Normalize app name
-        app_lower = app_name.lower()
-
-        # Check if it's a supported browser
-        supported_browsers = ['chrome.exe', 'msedge.exe', 'firefox.exe', 'brave.exe', 'opera.exe']
-        if app_lower not in supported_browsers:
-            return ""
-
-        # For now, we'll extract URL from window title
-        # Chrome/Edge format: "Page Title - URL"
-        # This is a simplified approach; full URL extraction requires UI Automation
-
         try:
-            # Simple heuristic: look for common URL patterns in title
-            if ' - ' in window_title:
-                parts = window_title.split(' - ')
-                for part in parts:
-                    part = part.strip()
-                    if any(part.lower().startswith(proto) for proto in ['http://', 'https://', 'www.']):
-                        return part
-
-            # If window title contains domain-like strings
-            for part in window_title.split():
-                if '.' in part and len(part) > 4:
-                    # Looks like a domain
-                    if not part.startswith('http'):
-                        return f"https://{part}"
-                    return part
-
+            return extract_browser_url(app_name, window_title)
         except Exception as e:
             self.logger.debug(f"URL extraction failed: {e}")
-
-        return ""
+            return ""
 
     def save_snapshot(self, snapshot: ActivitySnapshot):
         """
-        Save activity snapshot to database
+        Record an activity snapshot
+
+        Extends the open span when app/title/url are unchanged and the sample
+        is within the gap tolerance; otherwise closes it and starts a new span.
 
         Args:
             snapshot: ActivitySnapshot instance
         """
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
-            cursor.execute('''
-                INSERT INTO activity_snapshots (app, window_title, url, timestamp)
-                VALUES (?, ?, ?, ?)
-            ''', (snapshot.app, snapshot.window_title, snapshot.url, snapshot.timestamp))
+        key = (snapshot.app, snapshot.window_title or "", snapshot.url or "")
+        max_gap = self.collection_interval * self.MAX_GAP_INTERVALS
 
-            conn.commit()
-            conn.close()
-
-            self.logger.debug(f"Saved snapshot: {snapshot.app} - {snapshot.window_title[:50]}")
+        try:
+            with self._lock:
+                cursor = self._conn.cursor()
+                open_span = self._open_span
+                contiguous = open_span is not None and 0 <= snapshot.timestamp - open_span['end_ts'] <= max_gap
+
+                if contiguous and open_span['key'] == key:
+                    cursor.execute('''
+                        UPDATE activity_spans
+                        SET end_ts = ?, sample_count = sample_count + 1
+                        WHERE id = ?
+                    ''', (snapshot.timestamp, open_span['id']))
+                    open_span['end_ts'] = snapshot.timestamp
+                else:
+                    if contiguous:
+                        # Close the previous span at the switch so the timeline has no holes
+                        cursor.execute(
+                            'UPDATE activity_spans SET end_ts = ? WHERE id = ?',
+                            (snapshot.timestamp, open_span['id'])
+                        )
+                    cursor.execute('''
+                        INSERT INTO activity_spans (app, window_title, url, start_ts, end_ts, sample_count)
+                        VALUES (?, ?, ?, ?, ?, 1)
+                    ''', (key[0], key[1], key[2], snapshot.timestamp, snapshot.timestamp))
+                    self._open_span = {'id': cursor.lastrowid, 'key': key, 'end_ts': snapshot.timestamp}
+
+                self._conn.commit()
+
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug(f"Saved snapshot: {snapshot.app} - {snapshot.window_title[:50]}")
 
         except Exception as e:
             self.logger.error(f"Failed to save snapshot: {e}")
@@ -238,45 +302,79 @@ class ActivityCollector:
             self.last_snapshot = snapshot
         return snapshot
 
-    def get_recent_snapshots(self, limit: int = 100) -> List[ActivitySnapshot]:
+    def get_spans(self,
+                  start_ts: Optional[int] = None,
+                  end_ts: Optional[int] = None,
+                  limit: Optional[int] = None) -> List[ActivitySpan]:
         """
-        Get recent activity snapshots
+        Get spans overlapping a time range, oldest first
 
         Args:
-            limit: Maximum number of snapshots to return
+            start_ts: Range start (inclusive, default: unbounded)
+            end_ts: Range end (inclusive, default: unbounded)
+            limit: Maximum number of spans (the most recent ones are kept)
 
         Returns:
-            List of ActivitySnapshot
+            List of ActivitySpan (not clipped to the range)
         """
+        conditions = []
+        params: list = []
+        if start_ts is not None:
+            conditions.append('end_ts >= ?')
+            params.append(start_ts)
+        if end_ts is not None:
+            conditions.append('start_ts <= ?')
+            params.append(end_ts)
+
+        sql = 'SELECT app, window_title, url, start_ts, end_ts, sample_count FROM activity_spans'
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += ' ORDER BY start_ts DESC, id DESC'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(limit)
+
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            with self._lock:
+                rows = self._conn.execute(sql, params).fetchall()
+        except Exception as e:
+            self.logger.error(f"Failed to get spans: {e}")
+            return []
 
-            cursor.execute('''
-                SELECT app, window_title, url, timestamp
-                FROM activity_snapshots
-                ORDER BY timestamp DESC
-                LIMIT ?
-            ''', (limit,))
-
-            rows = cursor.fetchall()
-            conn.close()
-
-            snapshots = [
-                ActivitySnapshot(
-                    app=row[0],
-                    window_title=row[1],
-                    url=row[2],
-                    timestamp=row[3]
-                )
-                for row in rows
-            ]
+        return [
+            ActivitySpan(app=row[0], window_title=row[1] or "", url=row[2] or "",
+                         start_ts=row[3], end_ts=row[4], sample_count=row[5])
+            for row in reversed(rows)
+        ]
 
-            return snapshots
+    def get_app_durations(self, start_ts: int, end_ts: int) -> Dict[str, int]:
+        """
+        Total seconds per app within a time range (spans clipped to the range)
 
-        except Exception as e:
-            self.logger.error(f"Failed to get recent snapshots: {e}")
-            return []
+        Returns:
+            {app: seconds}, sorted by duration descending
+        """
+        durations: Dict[str, int] = defaultdict(int)
+        for span in self.get_spans(start_ts, end_ts):
+            seconds = min(span.end_ts, end_ts) - max(span.start_ts, start_ts)
+            if seconds > 0:
+                durations[span.app] += seconds
+        return dict(sorted(durations.items(), key=lambda item: item[1], reverse=True))
+
+    def get_recent_snapshots(self, limit: int = 100) -> List[ActivitySnapshot]:
+        """
+        Get recent activity snapshots
+
+        One snapshot per span (its latest state), newest first.
+
+        Args:
+            limit: Maximum number of snapshots to return
+
+        Returns:
+            List of ActivitySnapshot
+        """
+        spans = self.get_spans(limit=limit)
+        return [span.to_snapshot() for span in reversed(spans)]
 
     def cleanup_old_data(self, days_to_keep: int = 30):
         """
@@ -288,49 +386,50 @@ class ActivityCollector:
         try:
             cutoff_timestamp = int(time.time()) - (days_to_keep * 24 * 60 * 60)
 
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
-            cursor.execute('''
-                DELETE FROM activity_snapshots
-                WHERE timestamp < ?
-            ''', (cutoff_timestamp,))
+            # Chunked so the sampler thread only waits for one chunk at a time
+            deleted_count = delete_in_chunks(
+                self._conn, 'activity_spans', 'end_ts < ?', (cutoff_timestamp,), lock=self._lock
+            )
 
-            deleted_count = cursor.rowcount
-            conn.commit()
-            conn.close()
+            with self._lock:
+                if self._open_span and self._open_span['end_ts'] < cutoff_timestamp:
+                    self._open_span = None
 
-            self.logger.info(f"Cleaned up {deleted_count} old snapshots (older than {days_to_keep} days)")
+            self.logger.info(f"Cleaned up {deleted_count} old spans (older than {days_to_keep} days)")
+            return deleted_count
 
         except Exception as e:
             self.logger.error(f"Failed to cleanup old data: {e}")
+            return 0
+
+    def optimize(self, vacuum_free_ratio: float = DEFAULT_VACUUM_FREE_RATIO) -> dict:
+        """
+        Checkpoint, ANALYZE and (when fragmented) VACUUM the activity database
+
+        Returns:
+            Dictionary with pages, free_pages and vacuumed
+        """
+        with self._lock:
+            return optimize_database(self._conn, vacuum_free_ratio)
 
     def get_database_stats(self) -> dict:
         """
         Get database statistics
 
         Returns:
-            Dictionary with stats (total_records, oldest_timestamp, newest_timestamp)
+            Dictionary with stats (total_records = span count, total_samples,
+            oldest_timestamp, newest_timestamp)
         """
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
-            # Total records
-            cursor.execute('SELECT COUNT(*) FROM activity_snapshots')
-            total_records = cursor.fetchone()[0]
-
-            # Oldest and newest timestamps
-            cursor.execute('''
-                SELECT MIN(timestamp), MAX(timestamp)
-                FROM activity_snapshots
-            ''')
-            oldest, newest = cursor.fetchone()
-
-            conn.close()
+            with self._lock:
+                total_records, total_samples, oldest, newest = self._conn.execute('''
+                    SELECT COUNT(*), COALESCE(SUM(sample_count), 0), MIN(start_ts), MAX(end_ts)
+                    FROM activity_spans
+                ''').fetchone()
 
             return {
                 'total_records': total_records,
+                'total_samples': total_samples,
                 'oldest_timestamp': oldest,
                 'newest_timestamp': newest,
                 'oldest_date': datetime.fromtimestamp(oldest).isoformat() if oldest else None,
@@ -340,3 +439,8 @@ class ActivityCollector:
         except Exception as e:
             self.logger.error(f"Failed to get database stats: {e}")
             return {}
+
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
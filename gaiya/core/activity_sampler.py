@@ -0,0 +1,446 @@
+"""
+Activity Sampler - Unified foreground-activity sampling bus
+
+A single background thread queries the OS for the foreground window once per
+tick and publishes an immutable ActivitySnapshot to every subscriber (session
+aggregation, behavior analysis, danmaku engine, auto inference). Process names
+are cached per pid so the expensive process lookup only happens when the
+foreground process changes.
+
+Platform access goes through a pluggable source:
+- Win32ForegroundSource: ctypes GetForegroundWindow / QueryFullProcessImageNameW
+- ReplaySource: deterministic recorded timeline (tests, benchmarks, Linux)
+
+Usage:
+    sampler = get_activity_sampler()
+    unsubscribe = sampler.subscribe(on_snapshot, interval=5)
+    ...
+    unsubscribe()
+
+Author: GaiYa Team
+Date: 2025-12-08
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+
+SUPPORTED_BROWSERS = ('chrome.exe', 'msedge.exe', 'firefox.exe', 'brave.exe', 'opera.exe')
+
+
+@dataclass(frozen=True)
+class ActivitySnapshot:
+    """User activity snapshot data structure (immutable, shared by all subscribers)"""
+    app: str                    # Process name (e.g., "chrome.exe")
+    window_title: str          # Window title
+    url: str                   # Browser URL (empty if not a browser)
+    timestamp: int             # Unix timestamp
+    pid: int = 0               # Process id (0 if unknown)
+
+    def to_dict(self) -> dict:
+        """Convert to dictionary"""
+        return asdict(self)
+
+
+def extract_browser_url(app_name: str, window_title: str) -> str:
+    """
+    Extract URL from browser window title
+
+    Chrome/Edge format: "Page Title - URL". This is a simplified heuristic;
+    full URL extraction requires UI Automation.
+
+    Returns:
+        URL string (empty if not a browser or nothing URL-like in the title)
+    """
+    if app_name.lower() not in SUPPORTED_BROWSERS:
+        return ""
+
+    # Simple heuristic: look for common URL patterns in title
+    if ' - ' in window_title:
+        for part in window_title.split(' - '):
+            part = part.strip()
+            if any(part.lower().startswith(proto) for proto in ['http://', 'https://', 'www.']):
+                return part
+
+    # If window title contains domain-like strings
+    for part in window_title.split():
+        if '.' in part and len(part) > 4:
+            if not part.startswith('http'):
+                return f"https://{part}"
+            return part
+
+    return ""
+
+
+class ForegroundSource:
+    """
+    Platform source interface
+
+    read_foreground() returns (pid, window_title) for the current foreground
+    window, or None when there is none. process_name(pid) resolves a pid and is
+    only called on a pid-cache miss.
+    """
+
+    def read_foreground(self) -> Optional[Tuple[int, str]]:
+        raise NotImplementedError
+
+    def process_name(self, pid: int) -> Optional[str]:
+        raise NotImplementedError
+
+    def now(self) -> float:
+        """Current time (replay sources return recorded time)"""
+        return time.time()
+
+
+class Win32ForegroundSource(ForegroundSource):
+    """Windows foreground window source (ctypes, no pywin32/psutil per tick)"""
+
+    PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+
+    def __init__(self):
+        import ctypes
+        from ctypes import wintypes
+
+        self._ctypes = ctypes
+        self.user32 = ctypes.windll.user32
+        self.kernel32 = ctypes.windll.kernel32
+
+        self.user32.GetForegroundWindow.restype = wintypes.HWND
+        self.user32.GetWindowThreadProcessId.argtypes = [wintypes.HWND, ctypes.POINTER(wintypes.DWORD)]
+        self.user32.GetWindowThreadProcessId.restype = wintypes.DWORD
+        self.user32.GetWindowTextLengthW.argtypes = [wintypes.HWND]
+        self.user32.GetWindowTextLengthW.restype = ctypes.c_int
+        self.user32.GetWindowTextW.argtypes = [wintypes.HWND, wintypes.LPWSTR, ctypes.c_int]
+        self.user32.GetWindowTextW.restype = ctypes.c_int
+
+        self.kernel32.OpenProcess.argtypes = [wintypes.DWORD, wintypes.BOOL, wintypes.DWORD]
+        self.kernel32.OpenProcess.restype = wintypes.HANDLE
+        self.kernel32.CloseHandle.argtypes = [wintypes.HANDLE]
+        self.kernel32.QueryFullProcessImageNameW.argtypes = [
+            wintypes.HANDLE, wintypes.DWORD, wintypes.LPWSTR, ctypes.POINTER(wintypes.DWORD)
+        ]
+        self.kernel32.QueryFullProcessImageNameW.restype = wintypes.BOOL
+        self._wintypes = wintypes
+
+    def read_foreground(self) -> Optional[Tuple[int, str]]:
+        ctypes = self._ctypes
+        hwnd = self.user32.GetForegroundWindow()
+        if not hwnd:
+            return None
+
+        pid = self._wintypes.DWORD()
+        self.user32.GetWindowThreadProcessId(hwnd, ctypes.byref(pid))
+
+        length = self.user32.GetWindowTextLengthW(hwnd)
+        buffer = ctypes.create_unicode_buffer(length + 1)
+        self.user32.GetWindowTextW(hwnd, buffer, length + 1)
+
+        return pid.value, buffer.value
+
+    def process_name(self, pid: int) -> Optional[str]:
+        ctypes = self._ctypes
+        handle = self.kernel32.OpenProcess(self.PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+        if not handle:
+            return None
+        try:
+            size = self._wintypes.DWORD(1024)
+            buffer = ctypes.create_unicode_buffer(size.value)
+            if self.kernel32.QueryFullProcessImageNameW(handle, 0, buffer, ctypes.byref(size)):
+                return os.path.basename(buffer.value)
+            return None
+        finally:
+            self.kernel32.CloseHandle(handle)
+
+
+class ReplaySource(ForegroundSource):
+    """
+    Deterministic replay of a recorded foreground timeline
+
+    Each record is a dict with app, window_title and optional url/pid/timestamp.
+    Records without a timestamp are spaced `step` seconds apart from `start`
+    (time keeps advancing across loops).
+    read_foreground() advances one record per call; after the last record it
+    returns None (or wraps around when loop=True).
+    """
+
+    def __init__(self, records: Iterable[Dict], start: float = 0.0, step: float = 5.0, loop: bool = False):
+        self.records: List[Dict] = list(records)
+        self.start = start
+        self.step = step
+        self.loop = loop
+        self.position = 0
+        self.emitted = 0
+        self.lookups = 0  # process_name() calls, for measuring cache effectiveness
+
+        self._names: Dict[int, str] = {}
+        self._pids: Dict[str, int] = {}
+        self._current_time = start
+        self._current_url = ""
+
+    @classmethod
+    def from_jsonl(cls, path: str, **kwargs) -> "ReplaySource":
+        """Load a recorded timeline (one JSON record per line)"""
+        with open(path, 'r', encoding='utf-8') as f:
+            records = [json.loads(line) for line in f if line.strip()]
+        return cls(records, **kwargs)
+
+    def read_foreground(self) -> Optional[Tuple[int, str]]:
+        if self.position >= len(self.records):
+            if not self.loop or not self.records:
+                return None
+            self.position = 0
+
+        record = self.records[self.position]
+        self.position += 1
+
+        app = record['app']
+        pid = record.get('pid') or self._pids.setdefault(app, 1000 + len(self._pids))
+        self._names[pid] = app
+        self._current_time = record.get('timestamp', self.start + self.emitted * self.step)
+        self.emitted += 1
+        self._current_url = record.get('url', "")
+        return pid, record.get('window_title', "")
+
+    def process_name(self, pid: int) -> Optional[str]:
+        self.lookups += 1
+        return self._names.get(pid)
+
+    def now(self) -> float:
+        return self._current_time
+
+    @property
+    def current_url(self) -> str:
+        """URL recorded for the last record (overrides title heuristics)"""
+        return self._current_url
+
+
+def create_default_source() -> Optional[ForegroundSource]:
+    """Create the platform source (None on unsupported platforms)"""
+    if os.name == 'nt':
+        try:
+            return Win32ForegroundSource()
+        except Exception as e:
+            logging.getLogger(__name__).error(f"Failed to initialize Win32 foreground source: {e}")
+    return None
+
+
+class _Subscription:
+    def __init__(self, callback: Callable[[ActivitySnapshot], None], interval: float, passive: bool):
+        self.callback = callback
+        self.interval = interval
+        self.passive = passive
+        self.last_delivered: Optional[float] = None
+
+
+class ActivitySampler:
+    """
+    Foreground activity sampling bus
+
+    Samples at the smallest interval requested by any subscriber; each
+    subscriber is throttled to its own interval. Subscribers are called on the
+    sampler thread and must not block for long.
+    """
+
+    PID_CACHE_SIZE = 256
+
+    def __init__(self, source: Optional[ForegroundSource] = None, logger: Optional[logging.Logger] = None):
+        self.logger = logger or logging.getLogger(__name__)
+        self.source = source if source is not None else create_default_source()
+
+        self._subscriptions: List[_Subscription] = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+
+        # pid -> process name (LRU)
+        self._pid_names: "OrderedDict[int, str]" = OrderedDict()
+
+        self.last_snapshot: Optional[ActivitySnapshot] = None
+        self.stats = {'ticks': 0, 'process_lookups': 0, 'errors': 0}
+
+    # ------------------------------------------------------------------
+    # Subscription
+    # ------------------------------------------------------------------
+
+    def subscribe(self, callback: Callable[[ActivitySnapshot], None], interval: float = 5,
+                  passive: bool = False) -> Callable[[], None]:
+        """
+        Register a subscriber and start sampling if needed
+
+        Args:
+            callback: Called with each ActivitySnapshot (on the sampler thread)
+            interval: Minimum seconds between deliveries to this subscriber
+            passive: Only receive samples while some active subscriber keeps
+                     the sampler running (never starts sampling by itself)
+
+        Returns:
+            Function that removes the subscription
+        """
+        subscription = _Subscription(callback, max(1.0, float(interval)), passive)
+        with self._lock:
+            self._subscriptions.append(subscription)
+        if not passive:
+            self._wakeup.set()  # re-evaluate tick interval
+            self.start()
+
+        def unsubscribe():
+            with self._lock:
+                if subscription in self._subscriptions:
+                    self._subscriptions.remove(subscription)
+                active = sum(1 for s in self._subscriptions if not s.passive)
+            if active == 0:
+                self.stop()
+
+        return unsubscribe
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscriptions)
+
+    def get_tick_interval(self) -> float:
+        """Sampling interval = smallest active subscriber interval"""
+        with self._lock:
+            intervals = [s.interval for s in self._subscriptions if not s.passive]
+        return min(intervals) if intervals else 5.0
+
+    # ------------------------------------------------------------------
+    # Sampling
+    # ------------------------------------------------------------------
+
+    def sample(self) -> Optional[ActivitySnapshot]:
+        """Query the source once and build a snapshot (no delivery)"""
+        if self.source is None:
+            return None
+
+        foreground = self.source.read_foreground()
+        if foreground is None:
+            return None
+
+        pid, window_title = foreground
+        app = self._resolve_process_name(pid)
+
+        url = getattr(self.source, 'current_url', "") or extract_browser_url(app, window_title or "")
+        snapshot = ActivitySnapshot(
+            app=app,
+            window_title=window_title or "",
+            url=url,
+            timestamp=int(self.source.now()),
+            pid=pid
+        )
+        self.last_snapshot = snapshot
+        return snapshot
+
+    def tick(self) -> Optional[ActivitySnapshot]:
+        """Sample once and deliver to every subscriber whose interval has elapsed"""
+        snapshot = self.sample()
+        self.stats['ticks'] += 1
+        if snapshot is None:
+            return None
+
+        now = self.source.now()
+        with self._lock:
+            due = []
+            for subscription in self._subscriptions:
+                last = subscription.last_delivered
+                # Small tolerance so jitter in the sleep does not skip a whole tick
+                if last is None or now - last >= subscription.interval - 0.5:
+                    subscription.last_delivered = now
+                    due.append(subscription)
+
+        for subscription in due:
+            try:
+                subscription.callback(snapshot)
+            except Exception as e:
+                self.stats['errors'] += 1
+                self.logger.error(f"Activity subscriber failed: {e}", exc_info=True)
+
+        return snapshot
+
+    def _resolve_process_name(self, pid: int) -> str:
+        name = self._pid_names.get(pid)
+        if name is not None:
+            self._pid_names.move_to_end(pid)
+            return name
+
+        self.stats['process_lookups'] += 1
+        name = self.source.process_name(pid)
+        if not name:
+            return "unknown"  # Not cached: access may succeed later
+
+        self._pid_names[pid] = name
+        if len(self._pid_names) > self.PID_CACHE_SIZE:
+            self._pid_names.popitem(last=False)
+        return name
+
+    # ------------------------------------------------------------------
+    # Thread control
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """Start the sampling thread (no-op if running or no source)"""
+        if self._running or self.source is None:
+            return
+        self._running = True
+        self._wakeup.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="ActivitySamplerThread")
+        self._thread.start()
+        self.logger.info("Activity sampler started")
+
+    def stop(self, timeout: float = 5):
+        """Stop the sampling thread"""
+        if not self._running:
+            return
+        self._running = False
+        self._wakeup.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=timeout)
+        self._thread = None
+        self.logger.info("Activity sampler stopped")
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def _run(self):
+        while self._running:
+            loop_start = time.time()
+            try:
+                self.tick()
+            except Exception as e:
+                self.stats['errors'] += 1
+                self.logger.error(f"Error in activity sampler: {e}", exc_info=True)
+
+            elapsed = time.time() - loop_start
+            self.logger.debug(f"Activity sampler tick: {elapsed * 1000:.1f}ms")
+
+            self._wakeup.wait(max(0.0, self.get_tick_interval() - elapsed))
+            self._wakeup.clear()
+
+
+_sampler_instance: Optional[ActivitySampler] = None
+_sampler_lock = threading.Lock()
+
+
+def get_activity_sampler() -> ActivitySampler:
+    """Process-wide sampler shared by all consumers"""
+    global _sampler_instance
+    with _sampler_lock:
+        if _sampler_instance is None:
+            _sampler_instance = ActivitySampler()
+        return _sampler_instance
+
+
+def set_activity_sampler(sampler: Optional[ActivitySampler]):
+    """Replace the shared sampler (e.g. with a ReplaySource-backed one for tests)"""
+    global _sampler_instance
+    with _sampler_lock:
+        if _sampler_instance is not None and _sampler_instance is not sampler:
+            _sampler_instance.stop()
+        _sampler_instance = sampler
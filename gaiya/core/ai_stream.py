@@ -0,0 +1,159 @@
+"""
+GaiYa每日进度条 - AI流式响应解析
+解析后端SSE事件流，并从逐步到达的模型输出中增量提取任务列表
+"""
+import json
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+def iter_sse_events(lines: Iterable[str]) -> Iterator[Tuple[str, str]]:
+    """
+    将SSE文本行解析为事件
+
+    Args:
+        lines: 响应文本行(如 response.iter_lines(decode_unicode=True))
+
+    Yields:
+        (事件名, 数据字符串)，未指定event字段时事件名为"message"
+    """
+    event = "message"
+    data_lines: List[str] = []
+
+    for line in lines:
+        if line is None:
+            continue
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        line = line.rstrip("\r")
+
+        if not line:
+            # 空行表示一个事件结束
+            if data_lines:
+                yield event, "\n".join(data_lines)
+            event = "message"
+            data_lines = []
+            continue
+
+        if line.startswith(":"):
+            continue  # 注释行(心跳)
+
+        field, _, value = line.partition(":")
+        if value.startswith(" "):
+            value = value[1:]
+
+        if field == "event":
+            event = value
+        elif field == "data":
+            data_lines.append(value)
+
+    if data_lines:
+        yield event, "\n".join(data_lines)
+
+
+class IncrementalTaskParser:
+    """
+    增量任务列表解析器
+
+    模型输出 {"tasks": [{...}, {...}]} 时，每当一个任务对象的右花括号到达就立即解析出该任务，
+    不必等待整个JSON结束。已扫描的字符不会重复扫描，总开销与输出长度成线性关系。
+
+    用法:
+        parser = IncrementalTaskParser()
+        for delta in deltas:
+            for task in parser.feed(delta):
+                show(task)
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.tasks: List[Dict[str, Any]] = []
+
+        self._pos = 0                       # 下一个待扫描字符的位置
+        self._array_start: Optional[int] = None
+        self._done = False
+
+        # 数组内的扫描状态
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._object_start: Optional[int] = None
+
+    def feed(self, delta: str) -> List[Dict[str, Any]]:
+        """
+        追加一段模型输出
+
+        Returns:
+            本次新解析出的完整任务列表(可能为空)
+        """
+        self.text += delta
+        if self._done:
+            return []
+
+        if self._array_start is None and not self._find_array():
+            return []
+
+        new_tasks = []
+        text = self.text
+        i = self._pos
+
+        while i < len(text):
+            ch = text[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                if ch == "{" and self._depth == 0:
+                    self._object_start = i
+                self._depth += 1
+            elif ch in "}]":
+                if self._depth == 0:
+                    # 任务数组结束
+                    self._done = True
+                    i += 1
+                    break
+                self._depth -= 1
+                if self._depth == 0 and self._object_start is not None:
+                    task = self._parse_object(text[self._object_start:i + 1])
+                    if task is not None:
+                        self.tasks.append(task)
+                        new_tasks.append(task)
+                    self._object_start = None
+            i += 1
+
+        self._pos = i
+        return new_tasks
+
+    def _find_array(self) -> bool:
+        """定位任务数组的起始位置(跳过markdown代码块标记)"""
+        key_index = self.text.find('"tasks"')
+        if key_index >= 0:
+            bracket = self.text.find("[", key_index)
+        else:
+            stripped = self.text.lstrip()
+            if stripped.startswith("```"):
+                stripped = stripped.split("\n", 1)[1].lstrip() if "\n" in stripped else ""
+            if not stripped.startswith("["):
+                return False
+            bracket = self.text.find("[")
+
+        if bracket < 0:
+            return False
+
+        self._array_start = bracket
+        self._pos = bracket + 1
+        return True
+
+    @staticmethod
+    def _parse_object(raw: str) -> Optional[Dict[str, Any]]:
+        try:
+            value = json.loads(raw)
+        except json.JSONDecodeError:
+            return None
+        return value if isinstance(value, dict) else None
@@ -12,6 +12,8 @@ import os
 import logging
 from typing import Dict, List, Optional
 
+from .rule_engine import SubstringIndex
+
 
 class AppClassifier:
     """
@@ -49,6 +51,10 @@ class AppClassifier:
         self.rules: Dict[str, List[str]] = {}
         self.app_to_type_map: Dict[str, str] = {}
 
+        # Compiled partial-match index over app base names (rebuilt lazily)
+        self._index: Optional[SubstringIndex] = None
+        self.version = 0  # Bumped on every rule change
+
         self._load_rules()
 
     def _load_rules(self):
@@ -82,6 +88,21 @@ class AppClassifier:
             self.rules = {}
             self.app_to_type_map = {}
 
+        self._invalidate()
+
+    def _invalidate(self):
+        self._index = None
+        self.version += 1
+
+    def _get_index(self) -> SubstringIndex:
+        """Partial-match index; rule order decides between several matches"""
+        if self._index is None:
+            self._index = SubstringIndex(
+                (known_app.replace('.exe', ''), app_type)
+                for known_app, app_type in self.app_to_type_map.items()
+            )
+        return self._index
+
     def classify(self, app_name: str) -> str:
         """
         Classify application by process name
@@ -102,17 +123,8 @@ class AppClassifier:
         if app_lower in self.app_to_type_map:
             return self.app_to_type_map[app_lower]
 
-        # Partial match (e.g., "chrome" in "chrome.exe")
-        for known_app, app_type in self.app_to_type_map.items():
-            # Remove .exe for comparison
-            known_base = known_app.replace('.exe', '')
-            app_base = app_lower.replace('.exe', '')
-
-            if known_base in app_base or app_base in known_base:
-                return app_type
-
-        # Unknown app
-        return "other"
+        # Partial match (e.g., "chrome" in "chrome_proxy.exe"), .exe removed on both sides
+        return self._get_index().lookup(app_lower.replace('.exe', ''), "other")
 
     def get_default_mode(self, app_type: str) -> str:
         """
@@ -147,6 +159,7 @@ class AppClassifier:
         """
         app_lower = app_name.lower()
         self.app_to_type_map[app_lower] = app_type
+        self._invalidate()
         self.logger.debug(f"Added app: {app_name} -> {app_type}")
 
     def get_stats(self) -> Dict[str, int]:
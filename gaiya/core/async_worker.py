@@ -15,6 +15,10 @@ class AsyncNetworkWorker(QThread):
         worker.success.connect(on_success)
         worker.error.connect(on_error)
         worker.start()
+
+    流式用法(函数需支持on_partial回调参数,如GaiyaAIClient.chat_query):
+        worker = AsyncNetworkWorker.streaming(ai_client.chat_query, query, context)
+        worker.partial.connect(on_partial)
     """
     # 成功信号(返回结果字典)
     success = Signal(dict)
@@ -25,6 +29,9 @@ class AsyncNetworkWorker(QThread):
     # 进度信号(可选,用于显示加载状态)
     progress = Signal(str)
 
+    # 部分结果信号(流式模式下增量到达的结果)
+    partial = Signal(dict)
+
     def __init__(self, func: Callable, *args, **kwargs):
         """
         初始化工作线程
@@ -39,6 +46,13 @@ class AsyncNetworkWorker(QThread):
         self.args = args
         self.kwargs = kwargs
 
+    @classmethod
+    def streaming(cls, func: Callable, *args, **kwargs) -> "AsyncNetworkWorker":
+        """创建流式工作线程: 将partial信号作为on_partial回调传给函数"""
+        worker = cls(func, *args, **kwargs)
+        worker.kwargs["on_partial"] = worker.partial.emit
+        return worker
+
     def run(self) -> None:
         """Execute network request in background thread
 
@@ -78,6 +92,7 @@ class AsyncAIWorker(QThread):
         worker = AsyncAIWorker(ai_client, user_input)
         worker.finished.connect(on_success)
         worker.error.connect(on_error)
+        worker.partial.connect(on_partial)  # 可选: 流式到达的任务
         worker.start()
     """
     # 成功信号
@@ -86,6 +101,9 @@ class AsyncAIWorker(QThread):
     # 错误信号
     error = Signal(str)
 
+    # 部分结果信号({"tasks": 已解析任务, "new_tasks": 本次新增任务, "text": 已接收文本})
+    partial = Signal(dict)
+
     def __init__(self, ai_client, user_input: str):
         super().__init__()
         self.ai_client = ai_client
@@ -99,7 +117,8 @@ class AsyncAIWorker(QThread):
         import logging
         try:
             logging.info(f"[AsyncAIWorker] 开始调用ai_client.plan_tasks(), prompt长度: {len(self.user_input)}")
-            result = self.ai_client.plan_tasks(self.user_input, parent_widget=None)
+            result = self.ai_client.plan_tasks(self.user_input, parent_widget=None,
+                                               on_partial=self.partial.emit)
             logging.info(f"[AsyncAIWorker] plan_tasks()返回, 结果类型: {type(result)}")
             if isinstance(result, dict):
                 logging.info(f"[AsyncAIWorker] 结果: success={result.get('success')}, tasks数量={len(result.get('tasks', []))}")
@@ -9,14 +9,13 @@ import requests
 from pathlib import Path
 from typing import Dict, Optional
 from datetime import datetime
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
-import urllib3
 import ssl
 import urllib.request
 import urllib.parse
 import urllib.error
 
+from gaiya.core.http_pool import SSLAdapter, get_http_pool, ssl_verify_disabled  # noqa: F401 (SSLAdapter re-export)
+
 # Optional: load environment variables from .env when available
 try:
     from dotenv import load_dotenv
@@ -39,52 +38,6 @@ except ImportError:
 # 如果遇到SSL问题，应该更新CA证书或修复服务器配置
 
 
-class SSLAdapter(HTTPAdapter):
-    """
-    自定义SSL适配器，在保持兼容性的同时启用证书验证
-    解决Windows SSL库与代理服务器的兼容性问题
-    """
-    def init_poolmanager(self, *args, **kwargs):
-        """初始化连接池管理器，使用强化的SSL配置（兼容Clash代理）"""
-        try:
-            # 创建自定义SSL上下文
-            from urllib3.util.ssl_ import create_urllib3_context
-            ctx = create_urllib3_context()
-
-            # 强制使用TLS 1.2或更高版本（兼容现代服务器）
-            ctx.minimum_version = ssl.TLSVersion.TLSv1_2
-
-            # ✅ 安全修复: 仅在DEBUG模式且明确要求时禁用证书验证
-            is_debug = os.getenv("DEBUG", "false").lower() == "true"
-            disable_ssl_verify = os.getenv("DISABLE_SSL_VERIFY", "false").lower() == "true"
-
-            if is_debug and disable_ssl_verify:
-                # 开发/调试模式：禁用证书验证
-                ctx.check_hostname = False
-                ctx.verify_mode = ssl.CERT_NONE
-            else:
-                # ✅ 生产模式：启用证书验证
-                ctx.check_hostname = True
-                ctx.verify_mode = ssl.CERT_REQUIRED
-
-            # 设置更宽松的cipher suites（兼容代理软件）
-            # SECLEVEL=1 允许使用1024位密钥和SHA-1签名
-            ctx.set_ciphers('DEFAULT@SECLEVEL=1')
-
-            # 应用自定义SSL上下文
-            kwargs['ssl_context'] = ctx
-        except Exception as e:
-            # 如果高级配置失败，回退到基础配置
-            logger.debug(f"高级SSL配置失败，使用基础配置: {e}")
-            kwargs['ssl_version'] = ssl.PROTOCOL_TLS
-            # ✅ 安全修复: 仅在DEBUG模式且明确要求时禁用证书验证
-            is_debug = os.getenv("DEBUG", "false").lower() == "true"
-            disable_ssl_verify = os.getenv("DISABLE_SSL_VERIFY", "false").lower() == "true"
-            kwargs['cert_reqs'] = ssl.CERT_NONE if (is_debug and disable_ssl_verify) else ssl.CERT_REQUIRED
-
-        return super().init_poolmanager(*args, **kwargs)
-
-
 class AuthClient:
     """认证客户端"""
 
@@ -108,10 +61,7 @@ class AuthClient:
             ctx.minimum_version = ssl.TLSVersion.TLSv1_2
 
             # ✅ 安全修复: 仅在DEBUG模式且明确要求时禁用证书验证
-            is_debug = os.getenv("DEBUG", "false").lower() == "true"
-            disable_ssl_verify = os.getenv("DISABLE_SSL_VERIFY", "false").lower() == "true"
-
-            if is_debug and disable_ssl_verify:
+            if ssl_verify_disabled():
                 # 开发/调试模式：禁用证书验证
                 ctx.check_hostname = False
                 ctx.verify_mode = ssl.CERT_NONE
@@ -177,49 +127,11 @@ class AuthClient:
                 logger.debug(f"清除环境变量: {env_var}={os.environ[env_var]}")
                 del os.environ[env_var]
 
-        # 创建 Session 对象，配置SSL兼容性和重试机制
-        self.session = requests.Session()
-
-        # 配置重试策略（解决网络不稳定问题）
-        retry_strategy = Retry(
-            total=3,  # 最多重试3次
-            backoff_factor=1,  # 重试间隔：1秒、2秒、4秒
-            status_forcelist=[500, 502, 503, 504],  # 这些HTTP状态码会触发重试
-        )
-
-        # 使用自定义的SSLAdapter（解决SSL兼容性问题但保持证书验证）
-        ssl_adapter = SSLAdapter(max_retries=retry_strategy)
-        self.session.mount("http://", ssl_adapter)
-        self.session.mount("https://", ssl_adapter)
-
-        # ✅ 安全修复: 默认启用SSL证书验证
-        # 仅在DEBUG模式且明确要求时禁用（生产环境绝不应禁用）
-        is_debug = os.getenv("DEBUG", "false").lower() == "true"
-        disable_ssl_verify = os.getenv("DISABLE_SSL_VERIFY", "false").lower() == "true"
-
-        if is_debug and disable_ssl_verify:
-            logger.warning("SSL证书验证已禁用！这仅应用于开发环境，生产环境绝不应禁用！")
-            self.session.verify = False
-        else:
-            # 使用系统默认CA证书包
-            # 如果遇到SSL错误，建议运行: pip install --upgrade certifi
-            try:
-                import certifi
-                self.session.verify = certifi.where()
-                logger.info(f"使用CA证书包: {certifi.where()}")
-            except ImportError:
-                self.session.verify = True  # 使用系统默认证书
-                logger.info("使用系统默认CA证书")
-
-        # ✅ 安全修复: 从环境变量读取代理配置（如果存在）
-        # SOCKS5在TCP层工作，对SSL流量完全透明，不会干扰SSL握手
-        proxy_url = os.getenv("GAIYA_PROXY")
-        if proxy_url:
-            self.session.proxies = {
-                'http': proxy_url,
-                'https': proxy_url
-            }
-            logger.info(f"使用代理: {proxy_url}")
+        # 共享连接池: 与AI客户端、支付和节假日服务共用长连接、重试、SSL与代理配置
+        self._http = get_http_pool()
+        self.session = self._http.session
+        if self.session.proxies:
+            logger.info(f"使用代理: {self.session.proxies.get('https')}")
         else:
             logger.info("未配置代理，使用直连")
 
@@ -373,6 +285,9 @@ class AuthClient:
             self.refresh_token = None
             self.user_info = None
 
+            # 丢弃连接池中缓存的上一个账号的响应
+            self._http.clear_cache()
+
         except Exception as e:
             logger.error(f"清除Token失败: {e}")
 
@@ -466,28 +381,19 @@ class AuthClient:
             logger.warning(f"[AUTH-SIGNUP] requests库SSL错误(schannel): {e}")
             logger.info(f"[AUTH-SIGNUP] 🔄 切换到方案2: 使用httpx库（OpenSSL后端，解决schannel兼容性问题）")
 
-            # 方案2: 使用httpx（OpenSSL后端）
+            # 方案2: 使用httpx（OpenSSL后端，共享连接池中的后备客户端）
             try:
-                import httpx
-
-                # ✅ 安全修复: 从环境变量读取代理配置（注意httpx使用proxy而不是proxies）
-                proxy_url = os.getenv("GAIYA_PROXY")
-                if proxy_url:
-                    # httpx需要socks5://格式，如果是socks5h://则需要转换
-                    if proxy_url.startswith("socks5h://"):
-                        proxy_url = proxy_url.replace("socks5h://", "socks5://")
-
                 logger.info(f"[AUTH-SIGNUP-HTTPX] 使用httpx+OpenSSL连接到 {self.backend_url}/api/auth-signup")
 
-                with httpx.Client(proxy=proxy_url if proxy_url else None, verify=False, timeout=30.0) as client:
-                    response = client.post(
-                        f"{self.backend_url}/api/auth-signup",
-                        json={
-                            "email": email,
-                            "password": password,
-                            "username": username
-                        }
-                    )
+                response = self._http.fallback_client().post(
+                    f"{self.backend_url}/api/auth-signup",
+                    json={
+                        "email": email,
+                        "password": password,
+                        "username": username
+                    },
+                    timeout=30.0
+                )
 
                 logger.info(f"[AUTH-SIGNUP-HTTPX] httpx成功! 响应状态: {response.status_code}")
 
@@ -619,27 +525,18 @@ class AuthClient:
             logger.warning(f"[AUTH-SIGNIN] requests库SSL错误(schannel): {e}")
             logger.info(f"[AUTH-SIGNIN] 🔄 切换到方案2: 使用httpx库（OpenSSL后端）")
 
-            # 方案2: httpx（OpenSSL后端）
+            # 方案2: httpx（OpenSSL后端，共享连接池中的后备客户端）
             try:
-                import httpx
-
-                # ✅ 安全修复: 从环境变量读取代理配置（注意httpx使用proxy而不是proxies）
-                proxy_url = os.getenv("GAIYA_PROXY")
-                if proxy_url:
-                    # httpx需要socks5://格式，如果是socks5h://则需要转换
-                    if proxy_url.startswith("socks5h://"):
-                        proxy_url = proxy_url.replace("socks5h://", "socks5://")
-
                 logger.info(f"[AUTH-SIGNIN-HTTPX] 使用httpx+OpenSSL连接到 {self.backend_url}/api/auth-signin")
 
-                with httpx.Client(proxy=proxy_url if proxy_url else None, verify=False, timeout=10.0) as client:
-                    response = client.post(
-                        f"{self.backend_url}/api/auth-signin",
-                        json={
-                            "email": email,
-                            "password": password
-                        }
-                    )
+                response = self._http.fallback_client().post(
+                    f"{self.backend_url}/api/auth-signin",
+                    json={
+                        "email": email,
+                        "password": password
+                    },
+                    timeout=10.0
+                )
 
                 logger.info(f"[AUTH-SIGNIN-HTTPX] httpx成功! 响应状态: {response.status_code}")
 
@@ -798,13 +695,11 @@ class AuthClient:
             logger.warning(f"[AUTH-REFRESH] requests SSL错误,尝试使用httpx: {e}")
 
             try:
-                import httpx
-
-                with httpx.Client(timeout=10.0) as client:
-                    response = client.post(
-                        f"{self.backend_url}/api/auth-refresh",
-                        json={"refresh_token": self.refresh_token}
-                    )
+                response = self._http.fallback_client().post(
+                    f"{self.backend_url}/api/auth-refresh",
+                    json={"refresh_token": self.refresh_token},
+                    timeout=10.0
+                )
 
                 if response.status_code == 200:
                     data = response.json()
@@ -860,8 +755,8 @@ class AuthClient:
             headers['Authorization'] = f"Bearer {self.access_token}"
         kwargs['headers'] = headers
 
-        # 发起请求
-        response = self.session.request(method, url, **kwargs)
+        # 发起请求(GET经连接池合并并发的相同请求,并使用ETag缓存)
+        response = self._http.request(method, url, **kwargs)
 
         # 检测401 - Token过期
         if response.status_code == 401:
@@ -873,7 +768,7 @@ class AuthClient:
                 logger.info("[AUTH] Token刷新成功,重试请求")
                 headers['Authorization'] = f"Bearer {self.access_token}"
                 kwargs['headers'] = headers
-                response = self.session.request(method, url, **kwargs)
+                response = self._http.request(method, url, **kwargs)
 
             # Refresh Token过期 - 抛出异常
             elif refresh_result.get("expired"):
@@ -1045,6 +940,42 @@ class AuthClient:
         except Exception as e:
             return {"success": False, "error": str(e)}
 
+    def wait_payment_order(self, out_trade_no: str, trade_no: str = "", wait_seconds: int = 25) -> Dict:
+        """
+        长轮询等待支付结果
+
+        服务端挂起请求,直到支付回调写入已支付状态或等待超时后才返回,
+        客户端同一时间只需保持一个请求。后端未部署该接口时退回普通查询。
+
+        Args:
+            out_trade_no: 商户订单号
+            trade_no: 平台订单号(可选)
+            wait_seconds: 服务端最长挂起时间
+
+        Returns:
+            {"success": True/False, "order": {...}, "timed_out": bool, "retry_after": 秒}
+        """
+        try:
+            params = {"out_trade_no": out_trade_no, "timeout": wait_seconds}
+            if trade_no:
+                params["trade_no"] = trade_no
+
+            response = self.session.get(
+                f"{self.backend_url}/api/payment-wait",
+                params=params,
+                # 读超时需覆盖服务端挂起时间和兜底查询
+                timeout=(10, wait_seconds + 15)
+            )
+
+            if response.status_code == 200:
+                return response.json()
+            if response.status_code == 404:
+                return self.query_payment_order(out_trade_no, trade_no)
+            return {"success": False, "error": f"HTTP {response.status_code}"}
+
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
     def manual_upgrade_subscription(self, user_id: str, plan_type: str, out_trade_no: str) -> Dict:
         """
         手动升级订阅(主动查询方案A - 不依赖Z-Pay回调)
@@ -1134,10 +1065,10 @@ class AuthClient:
         try:
             user_tier = self.get_user_tier()
 
-            response = self.session.get(
+            response = self._http.get(
                 f"{self.backend_url}/api/quota-status",
                 params={
-                    "user_id": self.user_id,  # ✅ P1-1.5: 添加user_id参数
+                    "user_id": self.get_user_id(),  # ✅ P1-1.5: 添加user_id参数
                     "user_tier": user_tier
                 },
                 timeout=10
@@ -1154,7 +1085,8 @@ class AuthClient:
                         "weekly_report": 1 if user_tier == "free" else 10,
                         "chat": 10 if user_tier == "free" else 100
                     },
-                    "user_tier": user_tier
+                    "user_tier": user_tier,
+                    "fallback": True
                 }
             else:
                 # 返回默认配额
@@ -1165,7 +1097,8 @@ class AuthClient:
                         "weekly_report": 1 if user_tier == "free" else 10,
                         "chat": 10 if user_tier == "free" else 100
                     },
-                    "user_tier": user_tier
+                    "user_tier": user_tier,
+                    "fallback": True  # 标记为默认配额(非服务端数据)
                 }
 
         except Exception as e:
@@ -1178,7 +1111,8 @@ class AuthClient:
                     "weekly_report": 1 if user_tier == "free" else 10,
                     "chat": 10 if user_tier == "free" else 100
                 },
-                "user_tier": user_tier
+                "user_tier": user_tier,
+                "fallback": True
             }
 
     # ==================== 微信登录API ====================
@@ -1367,7 +1301,7 @@ class AuthClient:
                 "plan_type": plan_type
             }
 
-            response = requests.post(
+            response = self.session.post(
                 url,
                 json=data,
                 headers={"Authorization": f"Bearer {self.access_token}"},
@@ -29,7 +29,10 @@ class AutoInferenceEngine(QObject):
     inference_completed = Signal(list)  # 推理完成,发送推理结果列表
     inference_failed = Signal(str)      # 推理失败,发送错误信息
 
-    def __init__(self, db_manager, behavior_analyzer=None, interval_minutes=5):
+    # 采样订阅间隔(秒): 只用于判断自上次推理以来是否有新的前台活动
+    ACTIVITY_SAMPLE_INTERVAL = 60
+
+    def __init__(self, db_manager, behavior_analyzer=None, interval_minutes=5, sampler=None):
         """
         初始化自动推理引擎
 
@@ -37,6 +40,7 @@ class AutoInferenceEngine(QObject):
             db_manager: 数据库管理器 (gaiya.data.db_manager.db)
             behavior_analyzer: 行为分析器 (可选,用于高级分析)
             interval_minutes: 推理间隔(分钟),默认5分钟
+            sampler: 活动采样总线 (可选,被动订阅;没有新活动时跳过定时推理)
         """
         super().__init__()
 
@@ -49,6 +53,12 @@ class AutoInferenceEngine(QObject):
         self.last_inference_time = None
         self.inferred_tasks = []  # 存储推理结果
 
+        # 活动采样(被动订阅,不会单独启动采样)
+        self.sampler = sampler
+        self._unsubscribe_sampler = None
+        self._activity_version = 0    # 收到的采样次数
+        self._inferred_version = None  # 上次推理时的采样次数
+
         # 定时器
         self.inference_timer = QTimer()
         self.inference_timer.timeout.connect(self.run_inference)
@@ -66,6 +76,13 @@ class AutoInferenceEngine(QObject):
 
         self.is_running = True
 
+        if self.sampler is not None:
+            self._unsubscribe_sampler = self.sampler.subscribe(
+                self._on_activity_snapshot,
+                interval=self.ACTIVITY_SAMPLE_INTERVAL,
+                passive=True
+            )
+
         # 启动时立即执行一次推理
         self.run_inference()
 
@@ -78,14 +95,32 @@ class AutoInferenceEngine(QObject):
         """停止自动推理引擎"""
         self.is_running = False
         self.inference_timer.stop()
+        if self._unsubscribe_sampler:
+            self._unsubscribe_sampler()
+            self._unsubscribe_sampler = None
         logger.info("自动推理引擎已停止")
 
+    def _on_activity_snapshot(self, snapshot):
+        """采样回调(采样线程中执行,只记录有新活动)"""
+        self._activity_version += 1
+
+    def _has_new_activity(self) -> bool:
+        """自上次推理以来是否有新的前台活动(未接入采样总线时总是返回True)"""
+        if self.sampler is None or not self.sampler.running:
+            return True
+        return self._inferred_version != self._activity_version
+
     def run_inference(self):
         """执行推理任务 (核心方法)"""
         if not self.is_running:
             return
 
+        if not self._has_new_activity():
+            logger.debug("[自动推理] 自上次推理以来无新活动,跳过")
+            return
+
         try:
+            activity_version = self._activity_version
             start_time = datetime.now()
             logger.info(f"[自动推理] 开始执行推理...")
 
@@ -118,6 +153,7 @@ class AutoInferenceEngine(QObject):
             logger.info(f"[自动推理] 推理完成,耗时: {elapsed:.2f}秒")
 
             self.last_inference_time = datetime.now()
+            self._inferred_version = activity_version
 
         except Exception as e:
             logger.error(f"[自动推理] 执行失败: {e}", exc_info=True)
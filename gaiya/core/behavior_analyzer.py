@@ -17,9 +17,10 @@ from dataclasses import dataclass
 from typing import Optional, List, Dict
 from enum import Enum
 
-from .activity_collector import ActivitySnapshot
+from .activity_sampler import ActivitySnapshot
 from .app_classifier import AppClassifier
 from .domain_classifier import DomainClassifier
+from .rule_engine import ClassificationEngine
 
 
 class ContentMode(Enum):
@@ -96,6 +97,7 @@ class BehaviorAnalyzer:
         # Classifiers
         self.app_classifier = app_classifier or AppClassifier(logger=logger)
         self.domain_classifier = domain_classifier or DomainClassifier(logger=logger)
+        self.engine = ClassificationEngine(self.app_classifier, self.domain_classifier, logger=logger)
 
         # State tracking
         self.current_app: Optional[str] = None
@@ -120,26 +122,18 @@ class BehaviorAnalyzer:
         Returns:
             BehaviorInfo with comprehensive analysis
         """
-        # Classify app
-        app_type = self.app_classifier.classify(snapshot.app)
-
-        # Extract and classify domain
-        domain = ""
-        domain_category = "other"
-        domain_mode = "unknown"
-
-        if snapshot.url:
-            domain = self.domain_classifier.extract_domain(snapshot.url) or ""
-            if domain:
-                domain_category, domain_mode = self.domain_classifier.classify(snapshot.url)
-
-        # Determine content mode
-        mode = self._determine_content_mode(
-            app_type=app_type,
-            domain=domain,
-            domain_mode=domain_mode,
-            window_title=snapshot.window_title
-        )
+        # Classify app, domain and content mode (compiled rules, memoized per app/title/url)
+        verdict = self.engine.classify(snapshot.app, snapshot.window_title, snapshot.url)
+        app_type = verdict.app_type
+        domain = verdict.domain
+        domain_category = verdict.domain_category
+        mode = verdict.mode
+
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(
+                "🎯 Mode determined: %s (by %s, app_type=%s, domain=%s, title=%s)",
+                mode, verdict.source, app_type, domain, snapshot.window_title[:50]
+            )
 
         # Track duration and detect trends
         duration_sec = self._update_duration(snapshot.app, mode, snapshot.timestamp)
@@ -186,33 +180,8 @@ class BehaviorAnalyzer:
         Returns:
             Content mode string
         """
-        # Priority 1: Domain rules
-        if domain and domain_mode != "unknown":
-            self.logger.debug(f"🎯 Mode determined: {domain_mode} (priority=1:domain, domain={domain})")
-            return domain_mode
-
-        # Priority 2: Window title keywords
-        title_lower = window_title.lower()
-
-        production_keywords = ['edit', 'write', 'code', 'develop', '编辑', '写', '开发', '代码']
-        consumption_keywords = ['watch', 'video', 'browse', '视频', '看', '浏览']
-
-        if any(kw in title_lower for kw in production_keywords):
-            self.logger.debug(f"🎯 Mode determined: production (priority=2:title_keywords, title={window_title[:50]})")
-            return ContentMode.PRODUCTION.value
-        if any(kw in title_lower for kw in consumption_keywords):
-            self.logger.debug(f"🎯 Mode determined: consumption (priority=2:title_keywords, title={window_title[:50]})")
-            return ContentMode.CONSUMPTION.value
-
-        # Priority 3: AppType default mode
-        default_mode = self.app_classifier.get_default_mode(app_type)
-        if default_mode != "unknown":
-            self.logger.debug(f"🎯 Mode determined: {default_mode} (priority=3:app_type, type={app_type})")
-            return default_mode
-
-        # Priority 4: Unknown
-        self.logger.debug(f"🎯 Mode determined: unknown (priority=4:fallback)")
-        return ContentMode.UNKNOWN.value
+        mode, _ = self.engine.determine_mode(app_type, domain, domain_mode, window_title)
+        return mode
 
     def _update_duration(self, app: str, mode: str, timestamp: int) -> int:
         """
@@ -252,31 +221,31 @@ class BehaviorAnalyzer:
 
         # Focus steady: sustained production ≥20min
         if mode == ContentMode.PRODUCTION.value and duration_sec >= self.focus_steady_threshold:
-            self.logger.debug(f"🔍 Trend detected: focus_steady (mode={mode}, duration={duration_sec}s)")
+            self.logger.debug("🔍 Trend detected: focus_steady (mode=%s, duration=%ss)", mode, duration_sec)
             return BehaviorTrend.FOCUS_STEADY.value
 
         # Moyu start: in consumption mode for ≥3min (context: was working)
         if mode == ContentMode.CONSUMPTION.value and duration_sec >= self.moyu_start_threshold:
             # Check if previously was in production mode
             if self.last_snapshot and self.current_mode != mode:
-                self.logger.debug(f"🔍 Trend detected: moyu_start (mode={mode}, duration={duration_sec}s, prev_mode={previous_mode})")
+                self.logger.debug("🔍 Trend detected: moyu_start (mode=%s, duration=%ss, prev_mode=%s)", mode, duration_sec, previous_mode)
                 return BehaviorTrend.MOYU_START.value
 
         # Moyu steady: sustained consumption ≥15min
         if mode == ContentMode.CONSUMPTION.value and duration_sec >= self.moyu_steady_threshold:
-            self.logger.debug(f"🔍 Trend detected: moyu_steady (mode={mode}, duration={duration_sec}s)")
+            self.logger.debug("🔍 Trend detected: moyu_steady (mode=%s, duration=%ss)", mode, duration_sec)
             return BehaviorTrend.MOYU_STEADY.value
 
         # Mode switch (recent switch)
         if self.last_snapshot and duration_sec < 60:  # Within 1 minute of switch
             if mode != self.current_mode:
-                self.logger.debug(f"🔍 Trend detected: mode_switch (transition: {previous_mode} → {mode})")
+                self.logger.debug("🔍 Trend detected: mode_switch (transition: %s → %s)", previous_mode, mode)
                 return BehaviorTrend.MODE_SWITCH.value
 
         # Task switch
         if self.last_snapshot and duration_sec < 30:  # Within 30 seconds of switch
             if self.current_app != self.last_snapshot.app:
-                self.logger.debug(f"🔍 Trend detected: task_switch (app: {self.last_snapshot.app} → {self.current_app})")
+                self.logger.debug("🔍 Trend detected: task_switch (app: %s → %s)", self.last_snapshot.app, self.current_app)
                 return BehaviorTrend.TASK_SWITCH.value
 
         return BehaviorTrend.NONE.value
@@ -2,7 +2,7 @@
 Behavior Danmaku Manager - 行为识别弹幕管理器
 
 整合行为识别系统与弹幕显示系统:
-- 后台采集用户活动
+- 订阅共享活动采样总线(ActivitySampler)
 - 分析行为模式
 - 触发行为感知弹幕
 - 与现有时间弹幕并行工作
@@ -19,7 +19,8 @@ import time
 from typing import Dict, List, Optional
 from pathlib import Path
 
-from gaiya.core.activity_collector import ActivityCollector, ActivitySnapshot
+from gaiya.core.activity_collector import ActivityCollector
+from gaiya.core.activity_sampler import ActivitySampler, ActivitySnapshot, get_activity_sampler
 from gaiya.core.behavior_analyzer import BehaviorAnalyzer, BehaviorInfo
 from gaiya.core.danmaku_event_engine import DanmakuEventEngine, DanmakuEvent
 from gaiya.core.cooldown_manager import CooldownManager, CooldownConfig
@@ -31,20 +32,22 @@ class BehaviorDanmakuManager:
     行为识别弹幕管理器
 
     Features:
-    - 后台活动采集(独立线程)
+    - 订阅共享采样总线(与行为追踪共用一次前台窗口查询)
     - 行为分析与趋势检测
     - 事件驱动的弹幕触发
     - 与现有DanmakuManager协同工作
     - 配置化控制
     """
 
-    def __init__(self, config: Dict, logger: Optional[logging.Logger] = None):
+    def __init__(self, config: Dict, logger: Optional[logging.Logger] = None,
+                 sampler: Optional[ActivitySampler] = None):
         """
         Initialize Behavior Danmaku Manager
 
         Args:
             config: Application configuration
             logger: Logger instance
+            sampler: Activity sampling bus (default: process-wide shared sampler)
         """
         self.config = config
         self.logger = logger or logging.getLogger(__name__)
@@ -90,9 +93,10 @@ class BehaviorDanmakuManager:
         self.pending_danmakus: List[str] = []
         self.pending_lock = threading.Lock()
 
-        # 后台线程控制
+        # 采样订阅
+        self.sampler = sampler or get_activity_sampler()
         self.running = False
-        self.collection_thread: Optional[threading.Thread] = None
+        self._unsubscribe = None
 
         self.logger.info(f"BehaviorDanmakuManager initialized: enabled={self.enabled}")
 
@@ -121,7 +125,7 @@ class BehaviorDanmakuManager:
             self.behavior_templates = {}
 
     def start(self):
-        """启动后台活动采集"""
+        """订阅活动采样总线"""
         if not self.enabled:
             self.logger.info("Behavior recognition is disabled")
             return
@@ -131,54 +135,39 @@ class BehaviorDanmakuManager:
             return
 
         self.running = True
-        self.collection_thread = threading.Thread(
-            target=self._collection_loop,
-            daemon=True,
-            name="BehaviorCollectionThread"
-        )
-        self.collection_thread.start()
-        self.logger.info("Behavior collection thread started")
+        self._unsubscribe = self.sampler.subscribe(self._on_snapshot, interval=self.collection_interval)
+        self.logger.info("Behavior collection subscribed to activity sampler")
 
     def stop(self):
-        """停止后台活动采集"""
+        """取消订阅活动采样总线"""
         if not self.running:
             return
 
         self.running = False
-        if self.collection_thread:
-            self.collection_thread.join(timeout=5)
-        self.logger.info("Behavior collection thread stopped")
-
-    def _collection_loop(self):
-        """后台活动采集循环"""
-        self.logger.info("Behavior collection loop started")
-
-        while self.running:
-            loop_start = time.time()
-            try:
-                # 采集活动快照
-                snapshot = self.activity_collector.collect_once()
-
-                if snapshot:
-                    # 分析行为
-                    behavior_info = self.behavior_analyzer.analyze(snapshot)
-
-                    # 处理行为信息
-                    self._process_behavior(behavior_info)
+        if self._unsubscribe:
+            self._unsubscribe()
+            self._unsubscribe = None
+        self.logger.info("Behavior collection stopped")
+
+    def _on_snapshot(self, snapshot: ActivitySnapshot):
+        """采样回调(在采样线程中执行)"""
+        start_time = time.time()
+        try:
+            self.activity_collector.save_snapshot(snapshot)
+            self.activity_collector.last_snapshot = snapshot
 
-                # Performance monitoring
-                loop_elapsed = (time.time() - loop_start) * 1000  # Convert to ms
-                self.logger.debug(f"⏱️ Collection loop cycle: {loop_elapsed:.1f}ms")
+            # 分析行为
+            behavior_info = self.behavior_analyzer.analyze(snapshot)
 
-                # 等待下一次采集
-                time.sleep(self.collection_interval)
+            # 处理行为信息
+            self._process_behavior(behavior_info)
 
-            except Exception as e:
-                loop_elapsed = (time.time() - loop_start) * 1000
-                self.logger.error(f"Error in collection loop: {e} (cycle_time={loop_elapsed:.1f}ms)", exc_info=True)
-                time.sleep(self.collection_interval)
+        except Exception as e:
+            self.logger.error(f"Error processing activity snapshot: {e}", exc_info=True)
 
-        self.logger.info("Behavior collection loop ended")
+        # Performance monitoring
+        elapsed = (time.time() - start_time) * 1000  # Convert to ms
+        self.logger.debug(f"⏱️ Behavior snapshot processed: {elapsed:.1f}ms")
 
     def _process_behavior(self, behavior_info: BehaviorInfo):
         """处理行为信息,生成弹幕事件"""
@@ -278,6 +267,7 @@ class BehaviorDanmakuManager:
         self.enabled = behavior_config.get("enabled", True)
 
         # 更新配置
+        old_interval = self.collection_interval
         self.collection_interval = behavior_config.get("collection_interval", 5)
         self.trigger_probability = behavior_config.get("trigger_probability", 0.4)
 
@@ -291,11 +281,15 @@ class BehaviorDanmakuManager:
             tone_cooldown_sec=behavior_config.get("tone_cooldown", 120)
         )
 
-        # 启动/停止采集线程
+        # 启动/停止采集订阅
         if self.enabled and not old_enabled:
             self.start()
         elif not self.enabled and old_enabled:
             self.stop()
+        elif self.running and self.collection_interval != old_interval:
+            # 采样间隔变化时重新订阅
+            self.stop()
+            self.start()
 
         self.logger.info(f"Config reloaded: enabled={self.enabled}")
 
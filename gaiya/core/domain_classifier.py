@@ -13,6 +13,8 @@ import logging
 from typing import Dict, Optional, Tuple
 from urllib.parse import urlparse
 
+from .rule_engine import DomainTrie
+
 
 class DomainClassifier:
     """
@@ -55,6 +57,10 @@ class DomainClassifier:
         self.domains: Dict[str, Dict] = {}
         self.wildcards: Dict[str, Dict] = {}
 
+        # Compiled reversed-label trie over exact and wildcard rules
+        self._trie = DomainTrie()
+        self.version = 0  # Bumped on every rule change
+
         self._load_rules()
 
     def _load_rules(self):
@@ -82,6 +88,17 @@ class DomainClassifier:
             self.domains = {}
             self.wildcards = {}
 
+        self._build_trie()
+
+    def _build_trie(self):
+        self._trie = DomainTrie()
+        for pattern, rule in self.wildcards.items():
+            if pattern.startswith('*.'):
+                self._trie.add(pattern, rule)
+        for domain, rule in self.domains.items():
+            self._trie.add(domain, rule)
+        self.version += 1
+
     def extract_domain(self, url: str) -> Optional[str]:
         """
         Extract domain from URL
@@ -129,21 +146,22 @@ class DomainClassifier:
         if not domain:
             return ("other", "unknown")
 
-        # Exact match
-        if domain in self.domains:
-            rule = self.domains[domain]
-            return (rule['category'], rule['mode'])
+        return self.classify_domain(domain)
 
-        # Wildcard match
-        for pattern, rule in self.wildcards.items():
-            # Simple wildcard matching (*.example.com)
-            if pattern.startswith('*.'):
-                suffix = pattern[2:]  # Remove "*."
-                if domain.endswith(suffix):
-                    return (rule['category'], rule['mode'])
+    def classify_domain(self, domain: str) -> Tuple[str, str]:
+        """
+        Classify an already extracted domain
 
-        # Unknown domain
-        return ("other", "unknown")
+        Exact rules win over wildcards (*.example.com matches example.com
+        and its subdomains); cost depends on the number of labels only.
+
+        Returns:
+            Tuple of (category, mode)
+        """
+        rule = self._trie.lookup(domain)
+        if rule is None:
+            return ("other", "unknown")
+        return (rule['category'], rule['mode'])
 
     def get_category(self, url: str) -> str:
         """Get domain category"""
@@ -170,6 +188,8 @@ class DomainClassifier:
             'mode': mode,
             'description': description
         }
+        self._trie.add(domain, self.domains[domain])
+        self.version += 1
         self.logger.debug(f"Added domain: {domain} -> {category}/{mode}")
 
     def get_stats(self) -> Dict[str, int]:
@@ -20,6 +20,8 @@ from datetime import datetime, date, timedelta
 from pathlib import Path
 import uuid
 
+from gaiya.utils.json_store import write_json
+
 
 class Goal:
     """
@@ -168,6 +170,7 @@ class GoalManager:
         self.goals_file = data_dir / 'goals.json'
 
         self.goals: Dict[str, Goal] = {}
+        self._saved_goals: Optional[List[Dict]] = None  # last persisted goal list
         self._load_goals()
 
     def _load_goals(self):
@@ -181,6 +184,7 @@ class GoalManager:
                     goal = Goal.from_dict(goal_data)
                     self.goals[goal.goal_id] = goal
 
+                self._saved_goals = [goal.to_dict() for goal in self.goals.values()]
                 self.logger.info(f"Loaded {len(self.goals)} goals from {self.goals_file}")
             else:
                 self.logger.info("No existing goals file found, starting fresh")
@@ -190,18 +194,19 @@ class GoalManager:
             self.goals = {}
 
     def _save_goals(self):
-        """Save goals to JSON file"""
+        """Save goals to JSON file (skipped when nothing changed)"""
         try:
-            # Ensure data directory exists
-            self.data_dir.mkdir(parents=True, exist_ok=True)
+            goals = [goal.to_dict() for goal in self.goals.values()]
+            if goals == self._saved_goals:
+                return
 
             data = {
-                'goals': [goal.to_dict() for goal in self.goals.values()],
+                'goals': goals,
                 'last_updated': datetime.now().isoformat()
             }
 
-            with open(self.goals_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+            write_json(self.goals_file, data)
+            self._saved_goals = goals
 
             self.logger.info(f"Saved {len(self.goals)} goals to {self.goals_file}")
 
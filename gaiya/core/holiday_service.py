@@ -9,7 +9,9 @@ import logging
 import requests
 from pathlib import Path
 from datetime import datetime, timedelta
-from typing import Optional, Dict
+from typing import Optional, Dict, Set
+from gaiya.core.http_pool import get_http_pool
+from gaiya.utils.json_store import get_json_writer
 
 
 class HolidayService:
@@ -37,6 +39,9 @@ class HolidayService:
         # 内存缓存
         self.holiday_cache: Dict = {}
 
+        # 本次运行中获取失败的年份，避免每次查询都重新发起超时请求
+        self._failed_years: Set[int] = set()
+
         # 加载本地缓存
         self._load_cache()
 
@@ -57,9 +62,9 @@ class HolidayService:
     def _save_cache(self):
         """保存缓存到本地文件"""
         try:
-            with open(self.cache_file, 'w', encoding='utf-8') as f:
-                json.dump(self.holiday_cache, f, ensure_ascii=False, indent=2)
-            self.logger.debug("节假日缓存已保存")
+            # 交给后台写入线程, 多个年份连续获取时合并为一次写入
+            get_json_writer().submit(self.cache_file, self.holiday_cache)
+            self.logger.debug("节假日缓存已提交保存")
         except Exception as e:
             self.logger.error(f"保存节假日缓存失败: {e}")
 
@@ -82,7 +87,7 @@ class HolidayService:
 
         try:
             self.logger.info(f"正在从API获取 {year} 年节假日数据...")
-            response = requests.get(url, headers=headers, timeout=10)
+            response = get_http_pool().get(url, headers=headers, timeout=10)
             response.raise_for_status()
 
             data = response.json()
@@ -122,6 +127,9 @@ class HolidayService:
             self.logger.debug(f"{year} 年节假日数据已缓存")
             return True
 
+        if year in self._failed_years:
+            return False
+
         # 从API获取
         holiday_data = self._fetch_year_holidays(year)
         if holiday_data:
@@ -129,8 +137,33 @@ class HolidayService:
             self._save_cache()
             return True
 
+        self._failed_years.add(year)
         return False
 
+    def has_year_data(self, year: int) -> bool:
+        """指定年份的节假日数据是否已缓存（不触发网络请求）"""
+        return str(year) in self.holiday_cache
+
+    def get_holiday_dates(self, year: int) -> Optional[Set[str]]:
+        """
+        获取指定年份所有节假日的日期集合（批量查询，供日历索引使用）
+
+        Args:
+            year: 年份
+
+        Returns:
+            节假日日期集合（格式: YYYY-MM-DD），数据不可用时返回None
+        """
+        if not self._ensure_year_data(year):
+            return None
+
+        year_data = self.holiday_cache.get(str(year), {})
+        return {
+            f"{year}-{date_key}"
+            for date_key, day_info in year_data.items()
+            if isinstance(day_info, dict) and day_info.get('holiday', False)
+        }
+
     def is_holiday(self, date: Optional[datetime] = None) -> bool:
         """
         判断指定日期是否为节假日
@@ -223,6 +256,7 @@ class HolidayService:
     def clear_cache(self):
         """清空缓存"""
         self.holiday_cache = {}
+        self._failed_years.clear()
         if self.cache_file.exists():
             self.cache_file.unlink()
         self.logger.info("节假日缓存已清空")
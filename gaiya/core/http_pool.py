@@ -0,0 +1,290 @@
+"""
+GaiYa每日进度条 - 共享HTTP连接池
+所有桌面端网络客户端(AuthClient / GaiyaAIClient / 支付二维码 / 节假日与主题服务)
+共用一个连接池: 保持长连接避免重复TLS握手, 统一代理与SSL配置,
+合并相同的并发GET请求, 并用ETag/Last-Modified缓存幂等读取
+"""
+import logging
+import os
+import ssl
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+# 连接池大小(每个主机保持的长连接数)
+POOL_MAXSIZE = 16
+# 条件请求缓存的最大条目数
+VALIDATOR_CACHE_SIZE = 128
+
+
+def ssl_verify_disabled() -> bool:
+    """仅在DEBUG模式且明确要求时禁用证书验证"""
+    is_debug = os.getenv("DEBUG", "false").lower() == "true"
+    disable_ssl_verify = os.getenv("DISABLE_SSL_VERIFY", "false").lower() == "true"
+    return is_debug and disable_ssl_verify
+
+
+def proxy_url() -> Optional[str]:
+    """GAIYA_PROXY环境变量中的代理地址(未配置时直连)"""
+    return os.getenv("GAIYA_PROXY") or None
+
+
+class SSLAdapter(HTTPAdapter):
+    """
+    自定义SSL适配器，在保持兼容性的同时启用证书验证
+    解决Windows SSL库与代理服务器的兼容性问题
+    """
+    def init_poolmanager(self, *args, **kwargs):
+        """初始化连接池管理器，使用强化的SSL配置（兼容Clash代理）"""
+        try:
+            # 创建自定义SSL上下文
+            from urllib3.util.ssl_ import create_urllib3_context
+            ctx = create_urllib3_context()
+
+            # 强制使用TLS 1.2或更高版本（兼容现代服务器）
+            ctx.minimum_version = ssl.TLSVersion.TLSv1_2
+
+            if ssl_verify_disabled():
+                # 开发/调试模式：禁用证书验证
+                ctx.check_hostname = False
+                ctx.verify_mode = ssl.CERT_NONE
+            else:
+                # ✅ 生产模式：启用证书验证
+                ctx.check_hostname = True
+                ctx.verify_mode = ssl.CERT_REQUIRED
+
+            # 设置更宽松的cipher suites（兼容代理软件）
+            # SECLEVEL=1 允许使用1024位密钥和SHA-1签名
+            ctx.set_ciphers('DEFAULT@SECLEVEL=1')
+
+            # 应用自定义SSL上下文
+            kwargs['ssl_context'] = ctx
+        except Exception as e:
+            # 如果高级配置失败，回退到基础配置
+            logger.debug(f"高级SSL配置失败，使用基础配置: {e}")
+            kwargs['ssl_version'] = ssl.PROTOCOL_TLS
+            kwargs['cert_reqs'] = ssl.CERT_NONE if ssl_verify_disabled() else ssl.CERT_REQUIRED
+
+        return super().init_poolmanager(*args, **kwargs)
+
+
+class _InFlight:
+    """一次正在进行的GET请求,相同请求的其他调用方等待其结果"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.response: Optional[requests.Response] = None
+        self.error: Optional[BaseException] = None
+
+
+class HttpPool:
+    """
+    共享的HTTP连接池
+
+    session 是所有客户端共用的 requests.Session (长连接、重试、SSL与代理配置)。
+    get() / request("GET") 在此之上增加:
+    - 合并: 相同URL+参数+认证头的并发GET只发出一次请求, 其余调用方共享响应
+    - 条件请求: 服务端返回ETag/Last-Modified时缓存响应, 之后带上
+      If-None-Match/If-Modified-Since, 收到304时直接返回缓存的响应
+    """
+
+    def __init__(self, pool_maxsize: int = POOL_MAXSIZE, cache_size: int = VALIDATOR_CACHE_SIZE):
+        self.session = self._create_session(pool_maxsize)
+        self._cache_size = cache_size
+        self._validators: "OrderedDict[Tuple, Tuple[Dict[str, str], requests.Response]]" = OrderedDict()
+        self._in_flight: Dict[Tuple, _InFlight] = {}
+        self._lock = threading.Lock()
+        self._fallback_client = None
+
+    @staticmethod
+    def _create_session(pool_maxsize: int) -> requests.Session:
+        session = requests.Session()
+        # 不读取环境变量中的代理, 代理只由GAIYA_PROXY决定
+        session.trust_env = False
+
+        # 配置重试策略（解决网络不稳定问题）
+        retry_strategy = Retry(
+            total=3,  # 最多重试3次
+            backoff_factor=1,  # 重试间隔：1秒、2秒、4秒
+            status_forcelist=[500, 502, 503, 504],  # 这些HTTP状态码会触发重试
+        )
+        adapter = SSLAdapter(max_retries=retry_strategy, pool_maxsize=pool_maxsize)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+
+        if ssl_verify_disabled():
+            logger.warning("SSL证书验证已禁用！这仅应用于开发环境，生产环境绝不应禁用！")
+            session.verify = False
+        else:
+            try:
+                import certifi
+                session.verify = certifi.where()
+            except ImportError:
+                session.verify = True  # 使用系统默认证书
+
+        proxy = proxy_url()
+        if proxy:
+            session.proxies = {'http': proxy, 'https': proxy}
+            logger.info(f"使用代理: {proxy}")
+        else:
+            session.proxies = {}
+        return session
+
+    # ========== 请求 ==========
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """GET请求(合并并发的相同请求, 使用条件请求缓存)"""
+        return self.request("GET", url, **kwargs)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        发起请求
+
+        非GET或流式请求直接交给session; GET请求参与合并与条件请求缓存。
+        """
+        if method.upper() != "GET" or kwargs.get("stream"):
+            return self.session.request(method, url, **kwargs)
+
+        key = self._request_key(url, kwargs.get("params"), kwargs.get("headers"))
+
+        with self._lock:
+            flight = self._in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = _InFlight()
+                self._in_flight[key] = flight
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.response
+
+        try:
+            flight.response = self._conditional_get(key, url, kwargs)
+            return flight.response
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            flight.done.set()
+
+    def _conditional_get(self, key: Tuple, url: str, kwargs: Dict) -> requests.Response:
+        with self._lock:
+            cached = self._validators.get(key)
+
+        if cached:
+            kwargs = dict(kwargs)
+            kwargs["headers"] = {**(kwargs.get("headers") or {}), **cached[0]}
+
+        response = self.session.request("GET", url, **kwargs)
+
+        if cached and response.status_code == 304:
+            with self._lock:
+                if key in self._validators:
+                    self._validators.move_to_end(key)
+            return cached[1]
+
+        if response.status_code == 200:
+            self._remember(key, response)
+        return response
+
+    def _remember(self, key: Tuple, response: requests.Response):
+        validators = {}
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if isinstance(etag, str) and etag:
+            validators["If-None-Match"] = etag
+        if isinstance(last_modified, str) and last_modified:
+            validators["If-Modified-Since"] = last_modified
+
+        with self._lock:
+            if not validators:
+                self._validators.pop(key, None)
+                return
+            self._validators[key] = (validators, response)
+            self._validators.move_to_end(key)
+            while len(self._validators) > self._cache_size:
+                self._validators.popitem(last=False)
+
+    @staticmethod
+    def _request_key(url: str, params, headers) -> Tuple:
+        """URL+查询参数+影响响应内容的请求头(认证信息不同的请求不会合并)"""
+        full_url = requests.Request("GET", url, params=params).prepare().url
+        headers = headers or {}
+        return (
+            full_url,
+            headers.get("Authorization", ""),
+            headers.get("Accept", ""),
+            headers.get("Accept-Language", ""),
+        )
+
+    def clear_cache(self):
+        """清空条件请求缓存(如登出后)"""
+        with self._lock:
+            self._validators.clear()
+
+    # ========== httpx后备客户端 ==========
+
+    def fallback_client(self):
+        """
+        共享的httpx客户端(OpenSSL后端), 用于requests出现SSL错误时的后备方案
+
+        同样保持长连接; 安装了h2时启用HTTP/2。
+        """
+        if self._fallback_client is None:
+            import httpx
+
+            proxy = proxy_url()
+            # httpx需要socks5://格式，如果是socks5h://则需要转换
+            if proxy and proxy.startswith("socks5h://"):
+                proxy = proxy.replace("socks5h://", "socks5://")
+
+            try:
+                import h2  # noqa: F401
+                http2 = True
+            except ImportError:
+                http2 = False
+
+            self._fallback_client = httpx.Client(
+                proxy=proxy,
+                verify=self.session.verify,
+                timeout=30.0,
+                http2=http2,
+                trust_env=False,
+            )
+        return self._fallback_client
+
+    def close(self):
+        """关闭所有连接(应用退出时调用)"""
+        self.session.close()
+        if self._fallback_client is not None:
+            self._fallback_client.close()
+            self._fallback_client = None
+
+
+_pool: Optional[HttpPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_http_pool() -> HttpPool:
+    """获取进程内共享的HttpPool"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = HttpPool()
+    return _pool
+
+
+def get_shared_session() -> requests.Session:
+    """获取共享的requests.Session"""
+    return get_http_pool().session
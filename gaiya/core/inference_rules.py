@@ -17,6 +17,8 @@
 }
 """
 
+from gaiya.core.rule_engine import SubstringIndex
+
 INFERENCE_RULES = {
     # ==================== 开发相关 ====================
     'coding_python': {
@@ -250,17 +252,24 @@ INFERENCE_RULES = {
 
 # ==================== 辅助函数 ====================
 
-def get_rule_by_app(app_name: str):
-    """根据应用名称查找匹配的规则"""
-    app_lower = app_name.lower()
+_app_index = None
+
 
-    for rule_name, rule in INFERENCE_RULES.items():
-        # 检查主应用列表
-        if any(app.lower() in app_lower or app_lower in app.lower()
-               for app in rule.get('apps', [])):
-            return rule
+def _get_app_index() -> SubstringIndex:
+    """应用名索引(首次使用时编译，规则顺序决定多条匹配时的结果)"""
+    global _app_index
+    if _app_index is None:
+        _app_index = SubstringIndex(
+            (app.lower(), rule)
+            for rule in INFERENCE_RULES.values()
+            for app in rule.get('apps', [])
+        )
+    return _app_index
 
-    return None
+
+def get_rule_by_app(app_name: str):
+    """根据应用名称查找匹配的规则(应用名互为子串即匹配)"""
+    return _get_app_index().lookup(app_name.lower())
 
 
 def get_all_task_types():
@@ -15,7 +15,6 @@ Version: 1.0
 import logging
 from typing import Any, Dict, List, Optional, Tuple
 from datetime import date, datetime, timedelta
-from collections import defaultdict
 
 
 class InsightsGenerator:
@@ -40,12 +39,14 @@ class InsightsGenerator:
         self.stats_manager = stats_manager
         self.logger = logger or logging.getLogger(__name__)
 
-    def generate_weekly_insights(self, days: int = 7) -> Dict[str, Any]:
+    def generate_weekly_insights(self, days: int = 7, history=None) -> Dict[str, Any]:
         """
         Generate comprehensive weekly insights
 
         Args:
             days: Number of days to analyze (default: 7)
+            history: Optional StatsFrame covering at least ``days * 2`` days,
+                shared with the charts so the store is only scanned once
 
         Returns:
             Dictionary with insights:
@@ -54,15 +55,18 @@ class InsightsGenerator:
                 'productivity_trend': dict,       # Trend analysis
                 'top_apps': List[dict],          # Top time-consuming apps
                 'focus_analysis': dict,          # Focus hours analysis
+                'week_over_week': dict,          # Completion rate vs previous period
                 'suggestions': List[str],        # Improvement suggestions
                 'summary': str                   # Overall summary
             }
         """
         self.logger.info(f"Generating weekly insights for last {days} days...")
 
-        # Get data
-        trend_data = self.stats_manager.get_weekly_trend(days=days)
-        category_data = self.stats_manager.get_category_distribution(days=days)
+        # Get data (the previous period is only needed for week-over-week deltas)
+        if history is None:
+            history = self.stats_manager.get_analytics(days=days * 2)
+        frame = history.tail(days)
+        category_data = frame.category_totals()
 
         # Analysis period
         end_date = date.today()
@@ -70,22 +74,25 @@ class InsightsGenerator:
         period_str = f"{start_date.strftime('%Y-%m-%d')} ~ {end_date.strftime('%Y-%m-%d')}"
 
         # 1. Productivity Trend Analysis
-        productivity_trend = self._analyze_productivity_trend(trend_data)
+        productivity_trend = self._analyze_productivity_trend(frame)
 
         # 2. Top Time-Consuming Categories
         top_apps = self._get_top_categories(category_data, top_n=3)
 
         # 3. Focus Time Analysis
-        focus_analysis = self._analyze_focus_patterns(trend_data)
+        focus_analysis = self._analyze_focus_patterns(frame)
 
-        # 4. Personalized Suggestions
+        # 4. Week-over-week comparison
+        week_over_week = history.week_over_week('completion_rate', period=days)
+
+        # 5. Personalized Suggestions
         suggestions = self._generate_suggestions(
             productivity_trend,
             category_data,
             focus_analysis
         )
 
-        # 5. Overall Summary
+        # 6. Overall Summary
         summary = self._generate_summary(
             productivity_trend,
             top_apps,
@@ -97,6 +104,7 @@ class InsightsGenerator:
             'productivity_trend': productivity_trend,
             'top_apps': top_apps,
             'focus_analysis': focus_analysis,
+            'week_over_week': week_over_week,
             'suggestions': suggestions,
             'summary': summary,
             'generated_at': datetime.now().isoformat()
@@ -105,17 +113,17 @@ class InsightsGenerator:
         self.logger.info("Weekly insights generated successfully")
         return insights
 
-    def _analyze_productivity_trend(self, trend_data: List[Dict]) -> Dict[str, Any]:
+    def _analyze_productivity_trend(self, frame) -> Dict[str, Any]:
         """
         Analyze productivity trend (improving/declining/stable)
 
         Args:
-            trend_data: Weekly trend data
+            frame: StatsFrame for the analysis period
 
         Returns:
             Trend analysis dict
         """
-        if not trend_data or len(trend_data) < 2:
+        if len(frame) < 2:
             return {
                 'status': 'insufficient_data',
                 'description': '数据不足,无法分析趋势',
@@ -124,13 +132,7 @@ class InsightsGenerator:
             }
 
         # Calculate average completion rate for first half and second half
-        mid_point = len(trend_data) // 2
-        first_half = trend_data[:mid_point]
-        second_half = trend_data[mid_point:]
-
-        first_avg = sum(d['completion_rate'] for d in first_half) / len(first_half) if first_half else 0
-        second_avg = sum(d['completion_rate'] for d in second_half) / len(second_half) if second_half else 0
-
+        first_avg, second_avg = frame.halves_mean('completion_rate')
         change = second_avg - first_avg
 
         # Determine trend status
@@ -212,34 +214,34 @@ class InsightsGenerator:
 
         return top_categories
 
-    def _analyze_focus_patterns(self, trend_data: List[Dict]) -> Dict[str, Any]:
+    def _analyze_focus_patterns(self, frame) -> Dict[str, Any]:
         """
         Analyze focus time patterns
 
         Args:
-            trend_data: Weekly trend data
+            frame: StatsFrame for the analysis period
 
         Returns:
             Focus analysis dict
         """
-        if not trend_data:
+        if not len(frame):
             return {
                 'best_days': [],
                 'avg_completion_rate': 0.0,
                 'total_tasks': 0,
-                'completed_tasks': 0
+                'completed_tasks': 0,
+                'peak_hour': None
             }
 
         # Find best performing days
-        sorted_days = sorted(
-            trend_data,
-            key=lambda x: x['completion_rate'],
-            reverse=True
-        )
+        dates = frame.date_strings()
+        rates = frame.column('completion_rate')
+        totals = frame.column('total_tasks')
+        completions = frame.column('completed_tasks')
 
         best_days = []
-        for day in sorted_days[:3]:  # Top 3 days
-            day_of_week = datetime.strptime(day['date'], '%Y-%m-%d').strftime('%A')
+        for index in frame.best_days(3):  # Top 3 days
+            day_of_week = datetime.strptime(dates[index], '%Y-%m-%d').strftime('%A')
             day_of_week_cn = {
                 'Monday': '周一',
                 'Tuesday': '周二',
@@ -251,23 +253,24 @@ class InsightsGenerator:
             }.get(day_of_week, day_of_week)
 
             best_days.append({
-                'date': day['date'],
+                'date': dates[index],
                 'day_of_week': day_of_week_cn,
-                'completion_rate': day['completion_rate'],
-                'total_tasks': day['total_tasks'],
-                'completed_tasks': day['completed_tasks']
+                'completion_rate': float(rates[index]),
+                'total_tasks': int(totals[index]),
+                'completed_tasks': int(completions[index])
             })
 
         # Overall stats
-        total_tasks = sum(d['total_tasks'] for d in trend_data)
-        completed_tasks = sum(d['completed_tasks'] for d in trend_data)
+        total_tasks = int(totals.sum())
+        completed_tasks = int(completions.sum())
         avg_completion_rate = (completed_tasks / total_tasks * 100) if total_tasks > 0 else 0
 
         return {
             'best_days': best_days,
             'avg_completion_rate': round(avg_completion_rate, 1),
             'total_tasks': total_tasks,
-            'completed_tasks': completed_tasks
+            'completed_tasks': completed_tasks,
+            'peak_hour': frame.peak_hour(completed_only=True)
         }
 
     def _generate_suggestions(
@@ -330,6 +333,14 @@ class InsightsGenerator:
                 f"(完成率{best_day['completion_rate']:.0f}%),尝试在这天安排重要任务"
             )
 
+        # 5. Peak hour insights
+        peak_hour = focus_analysis.get('peak_hour')
+        if peak_hour is not None:
+            suggestions.append(
+                f"⏰ 你完成的任务集中在 {peak_hour:02d}:00-{(peak_hour + 1) % 24:02d}:00,"
+                f"可以把需要专注的任务安排在这个时段"
+            )
+
         # Limit to 5 suggestions
         return suggestions[:5]
 
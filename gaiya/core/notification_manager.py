@@ -1,14 +1,31 @@
 """
 任务提醒通知管理器
+
+任务和通知配置在每天(或重新加载配置时)编译为按时间排序的触发时间线,
+免打扰时段在编译时过滤,运行时只为下一个触发点启动一个单次定时器
 """
-from datetime import datetime, date
+from dataclasses import dataclass
+from datetime import datetime, date, timedelta
+from typing import List, Optional
 from PySide6.QtWidgets import QApplication, QSystemTrayIcon
-from PySide6.QtCore import QTimer, QTime
+from PySide6.QtCore import Qt, QTimer, QTime
+
+
+@dataclass(frozen=True)
+class NotificationTrigger:
+    """时间线上的一个提醒触发点"""
+    fire_at: datetime   # 触发时刻
+    key: str            # 当天去重键
+    title: str          # 通知标题
+    message: str        # 通知内容
 
 
 class NotificationManager:
     """任务提醒通知管理器"""
 
+    # 定时器延迟后仍补发的宽限时间(秒),超过则视为错过(如系统休眠)
+    MISSED_GRACE_SECONDS = 60
+
     def __init__(self, config, tasks, tray_icon, logger):
         """初始化通知管理器
 
@@ -29,13 +46,19 @@ class NotificationManager:
         # 通知历史记录(最多保留10条)
         self.notification_history = []
 
-        # 初始化定时器(每分钟检查一次)
+        # 编译后的触发时间线(按 fire_at 排序)及其对应日期
+        self.timeline: List[NotificationTrigger] = []
+        self.timeline_date: Optional[date] = None
+
+        # 单次定时器: 只在下一个触发点(或午夜重新编译)时唤醒
         self.check_timer = QTimer()
+        self.check_timer.setSingleShot(True)
+        self.check_timer.setTimerType(Qt.PreciseTimer)
         self.check_timer.timeout.connect(self.check_and_notify)
 
-        # 如果通知已启用,启动定时器
+        # 如果通知已启用,编译时间线并启动定时器
         if self.is_enabled():
-            self.check_timer.start(60000)  # 60秒检查一次
+            self.rebuild_timeline()
             self.logger.info("通知管理器已启动")
 
     def is_enabled(self):
@@ -44,17 +67,19 @@ class NotificationManager:
 
     def reload_config(self, config, tasks):
         """重新加载配置和任务"""
+        was_active = self.check_timer.isActive()
         self.config = config
         self.tasks = tasks
 
-        # 根据配置启动或停止定时器
+        # 根据配置重新编译时间线或停止定时器
         if self.is_enabled():
-            if not self.check_timer.isActive():
-                self.check_timer.start(60000)
+            self.rebuild_timeline()
+            if not was_active:
                 self.logger.info("通知管理器已启动")
         else:
-            if self.check_timer.isActive():
-                self.check_timer.stop()
+            self.check_timer.stop()
+            self.timeline = []
+            if was_active:
                 self.logger.info("通知管理器已停止")
 
     def is_in_quiet_hours(self, current_time):
@@ -92,22 +117,59 @@ class NotificationManager:
             self.logger.error(f"免打扰时段配置错误: {e}")
             return False
 
-    def check_and_notify(self):
-        """检查并发送通知(每分钟调用一次)"""
-        if not self.is_enabled():
-            return
+    def rebuild_timeline(self, now: Optional[datetime] = None):
+        """为当天编译触发时间线并启动定时器
+
+        Args:
+            now: 当前时间(测试用,默认 datetime.now())
+        """
+        now = now or datetime.now()
+        self.timeline = self.compile_timeline(now.date())
+        self.timeline_date = now.date()
+        self._clean_old_notifications(now.date().isoformat())
+        self.logger.info(f"通知时间线已编译: {len(self.timeline)} 个触发点")
+        self._arm_timer(now)
 
-        current_time = QTime.currentTime()
-        current_date = date.today().isoformat()
+    def compile_timeline(self, day: date) -> List[NotificationTrigger]:
+        """将任务和通知配置编译为指定日期的触发时间线
 
-        # 检查是否在免打扰时段
-        if self.is_in_quiet_hours(current_time):
-            return
+        每个任务的时间只解析一次,免打扰时段内的触发点在此处直接剔除
 
-        # 清理昨天的通知记录
-        self._clean_old_notifications(current_date)
+        Args:
+            day: 目标日期
 
+        Returns:
+            按触发时刻排序的触发点列表
+        """
         notification_config = self.config.get('notification', {})
+        before_start_minutes = notification_config.get('before_start_minutes', [])
+        before_end_minutes = notification_config.get('before_end_minutes', [])
+        on_start = notification_config.get('on_start', False)
+        on_end = notification_config.get('on_end', False)
+
+        day_str = day.isoformat()
+        midnight = datetime.combine(day, datetime.min.time())
+
+        # 预先解析任务开始时间,用于查找下一个任务
+        parsed_starts = []
+        for task in self.tasks:
+            try:
+                parsed_starts.append((self._time_to_minutes(task.get('start', '00:00')), task.get('task', '')))
+            except (ValueError, IndexError):
+                parsed_starts.append((None, task.get('task', '')))
+
+        triggers = []
+
+        def add(offset_secs, key, title, message):
+            # 与QTime.addSecs一致: 跨午夜的提前提醒回绕到当天
+            offset_secs %= 24 * 3600
+            offset = QTime(0, 0).addSecs(offset_secs)
+            if self.is_in_quiet_hours(offset):
+                return
+            triggers.append(NotificationTrigger(
+                midnight + timedelta(seconds=offset_secs),
+                f"{key}_{day_str}", title, message
+            ))
 
         for task in self.tasks:
             task_name = task.get('task', '')
@@ -115,85 +177,102 @@ class NotificationManager:
             end_str = task.get('end', '')
 
             try:
-                start_parts = start_str.split(':')
-                end_parts = end_str.split(':')
-
-                start_time = QTime(int(start_parts[0]), int(start_parts[1]))
+                start_secs = self._time_to_minutes(start_str) * 60
 
                 # 处理 24:00 的情况
                 if end_str == "24:00":
-                    end_time = QTime(23, 59)
+                    end_secs = (23 * 60 + 59) * 60
                 else:
-                    end_time = QTime(int(end_parts[0]), int(end_parts[1]))
+                    end_secs = self._time_to_minutes(end_str) * 60
 
-                # 检查任务开始前的提醒
-                before_start_minutes = notification_config.get('before_start_minutes', [])
+                # 任务开始前的提醒
                 for minutes in before_start_minutes:
-                    remind_time = start_time.addSecs(-minutes * 60)
-                    if self._should_notify(current_time, remind_time):
-                        notify_key = f"{task_name}_before_start_{minutes}_{current_date}"
-                        if notify_key not in self.sent_notifications:
-                            self._send_notification(
-                                f"【提前{minutes}分钟】{task_name}",
-                                f"将在 {start_str} 开始"
-                            )
-                            self.sent_notifications[notify_key] = True
-
-                # 检查任务开始时的提醒
-                if notification_config.get('on_start', False):
-                    if self._should_notify(current_time, start_time):
-                        notify_key = f"{task_name}_on_start_{current_date}"
-                        if notify_key not in self.sent_notifications:
-                            self._send_notification(
-                                f"【现在】{task_name}",
-                                f"已开始 ({start_str} - {end_str})"
-                            )
-                            self.sent_notifications[notify_key] = True
-
-                # 检查任务结束前的提醒
-                before_end_minutes = notification_config.get('before_end_minutes', [])
+                    add(start_secs - minutes * 60,
+                        f"{task_name}_before_start_{minutes}",
+                        f"【提前{minutes}分钟】{task_name}",
+                        f"将在 {start_str} 开始")
+
+                # 任务开始时的提醒
+                if on_start:
+                    add(start_secs,
+                        f"{task_name}_on_start",
+                        f"【现在】{task_name}",
+                        f"已开始 ({start_str} - {end_str})")
+
+                # 任务结束前的提醒
                 for minutes in before_end_minutes:
-                    remind_time = end_time.addSecs(-minutes * 60)
-                    if self._should_notify(current_time, remind_time):
-                        notify_key = f"{task_name}_before_end_{minutes}_{current_date}"
-                        if notify_key not in self.sent_notifications:
-                            self._send_notification(
-                                f"【提前{minutes}分钟】{task_name}",
-                                f"将在 {end_str} 结束"
-                            )
-                            self.sent_notifications[notify_key] = True
-
-                # 检查任务结束时的提醒
-                if notification_config.get('on_end', False):
-                    if self._should_notify(current_time, end_time):
-                        notify_key = f"{task_name}_on_end_{current_date}"
-                        if notify_key not in self.sent_notifications:
-                            # 查找下一个任务
-                            next_task = self._get_next_task(end_str)
-                            next_info = f", 下一项: {next_task}" if next_task else ""
-                            self._send_notification(
-                                f"【结束】{task_name}",
-                                f"已结束{next_info}"
-                            )
-                            self.sent_notifications[notify_key] = True
+                    add(end_secs - minutes * 60,
+                        f"{task_name}_before_end_{minutes}",
+                        f"【提前{minutes}分钟】{task_name}",
+                        f"将在 {end_str} 结束")
+
+                # 任务结束时的提醒
+                if on_end:
+                    next_task = self._find_next_task(parsed_starts, self._time_to_minutes(end_str))
+                    next_info = f", 下一项: {next_task}" if next_task else ""
+                    add(end_secs,
+                        f"{task_name}_on_end",
+                        f"【结束】{task_name}",
+                        f"已结束{next_info}")
 
             except Exception as e:
                 self.logger.error(f"处理任务 {task_name} 的通知时出错: {e}")
 
-    def _should_notify(self, current_time, target_time):
-        """判断当前时间是否应该发送通知
+        triggers.sort(key=lambda trigger: trigger.fire_at)
+        return triggers
 
-        Args:
-            current_time: 当前时间 (QTime)
-            target_time: 目标时间 (QTime)
+    def check_and_notify(self, now: Optional[datetime] = None):
+        """发送已到期的通知并为下一个触发点重新启动定时器
 
-        Returns:
-            bool: 如果时间匹配(相差在1分钟内)返回 True
+        Args:
+            now: 当前时间(测试用,默认 datetime.now())
         """
-        # 计算时间差(秒)
-        diff = abs(current_time.secsTo(target_time))
-        # 如果在60秒内,认为匹配
-        return diff < 60
+        if not self.is_enabled():
+            return
+
+        now = now or datetime.now()
+
+        # 跨天: 重新编译当天的时间线
+        if self.timeline_date != now.date():
+            self.rebuild_timeline(now)
+            return
+
+        grace = timedelta(seconds=self.MISSED_GRACE_SECONDS)
+        for trigger in self.timeline:
+            if trigger.fire_at > now:
+                break
+            if trigger.key in self.sent_notifications:
+                continue
+            # 超过宽限时间的触发点视为已错过(例如系统休眠期间)
+            if now - trigger.fire_at <= grace:
+                self._send_notification(trigger.title, trigger.message)
+            self.sent_notifications[trigger.key] = True
+
+        self._arm_timer(now)
+
+    def get_next_trigger(self, now: Optional[datetime] = None) -> Optional[NotificationTrigger]:
+        """获取下一个尚未发送的触发点"""
+        now = now or datetime.now()
+        grace = timedelta(seconds=self.MISSED_GRACE_SECONDS)
+        for trigger in self.timeline:
+            if trigger.key not in self.sent_notifications and trigger.fire_at >= now - grace:
+                return trigger
+        return None
+
+    def _arm_timer(self, now: datetime):
+        """为下一个触发点(没有则为次日零点)启动单次定时器"""
+        self.check_timer.stop()
+        if not self.is_enabled():
+            return
+
+        next_trigger = self.get_next_trigger(now)
+        if next_trigger is not None:
+            wake_at = next_trigger.fire_at
+        else:
+            wake_at = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+
+        delay_ms = max(0, int((wake_at - now).total_seconds() * 1000))
+        self.check_timer.start(delay_ms)
 
     def _send_notification(self, title, message):
         """发送系统通知
@@ -276,6 +355,24 @@ class NotificationManager:
         if keys_to_delete:
             self.logger.info(f"清理了 {len(keys_to_delete)} 条过期通知记录")
 
+    @staticmethod
+    def _time_to_minutes(time_str):
+        """将 HH:MM 时间字符串转换为分钟数(24:00 为 1440)"""
+        parts = time_str.split(':')
+        hours = int(parts[0])
+        minutes = int(parts[1])
+        if hours == 24:
+            return 24 * 60
+        return hours * 60 + minutes
+
+    @staticmethod
+    def _find_next_task(parsed_starts, current_end_minutes):
+        """在预解析的 [(开始分钟数, 任务名)] 中查找紧接着开始的任务"""
+        for start_minutes, task_name in parsed_starts:
+            if start_minutes is not None and start_minutes >= current_end_minutes:
+                return task_name
+        return None
+
     def _get_next_task(self, current_end_time):
         """获取下一个任务的名称
 
@@ -286,24 +383,11 @@ class NotificationManager:
             str: 下一个任务名称,如果没有返回 None
         """
         try:
-            # 将时间字符串转换为分钟数
-            def time_to_minutes(time_str):
-                parts = time_str.split(':')
-                hours = int(parts[0])
-                minutes = int(parts[1])
-                if hours == 24:
-                    return 24 * 60
-                return hours * 60 + minutes
-
-            current_minutes = time_to_minutes(current_end_time)
-
-            # 查找紧接着开始的任务
-            for task in self.tasks:
-                start_minutes = time_to_minutes(task.get('start', '00:00'))
-                if start_minutes >= current_minutes:
-                    return task.get('task', '')
-
-            return None
+            parsed_starts = [
+                (self._time_to_minutes(task.get('start', '00:00')), task.get('task', ''))
+                for task in self.tasks
+            ]
+            return self._find_next_task(parsed_starts, self._time_to_minutes(current_end_time))
 
         except Exception as e:
             self.logger.error(f"获取下一个任务失败: {e}")
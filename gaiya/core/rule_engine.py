@@ -0,0 +1,387 @@
+"""
+Rule Engine - Compiled matchers shared by the activity classifiers
+
+Rule tables (app_rules.json, domain_rules.json, title/task keyword tables,
+inference rules) are compiled once into structures whose lookup cost depends
+on the length of the input, not on the number of rules:
+
+- KeywordAutomaton: Aho-Corasick automaton, "which keyword occurs in text"
+- SubstringIndex: two-way substring matching ("pattern in text" or "text in pattern")
+- DomainTrie: reversed-label trie for exact and *.wildcard domain rules
+- ClassificationEngine: (app, title, url) -> Classification, LRU-memoized, with a batch API
+
+When several rules match, the one added first (lowest priority value) wins,
+which preserves the first-match semantics of the original linear scans.
+
+Author: GaiYa Team
+Date: 2025-12-08
+"""
+
+import logging
+import threading
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick automaton over a set of keywords
+
+    first(text) returns the value of the highest-priority keyword occurring
+    anywhere in text, in a single pass over text.
+    """
+
+    def __init__(self, keywords: Iterable[Tuple[str, Any]] = ()):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._own: List[Optional[Tuple[int, Any]]] = [None]   # Keyword ending exactly here
+        self._best: List[Optional[Tuple[int, Any]]] = [None]  # Best keyword ending here (incl. fail chain)
+        self._count = 0
+        self._built = True
+
+        for keyword, value in keywords:
+            self.add(keyword, value)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def add(self, keyword: str, value: Any, priority: Optional[int] = None):
+        """Add a keyword (lower priority value wins; default: insertion order)"""
+        if priority is None:
+            priority = self._count
+        self._count += 1
+
+        node = 0
+        for ch in keyword:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._own.append(None)
+                self._best.append(None)
+            node = nxt
+
+        current = self._own[node]
+        if current is None or priority < current[0]:
+            self._own[node] = (priority, value)
+        self._built = False
+
+    def build(self):
+        """Compute failure links (called lazily by first())"""
+        self._best = list(self._own)
+        queue = deque()
+        for child in self._goto[0].values():
+            self._fail[child] = 0
+            queue.append(child)
+
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                queue.append(child)
+
+            inherited = self._best[self._fail[node]]
+            if inherited is not None and (self._best[node] is None or inherited[0] < self._best[node][0]):
+                self._best[node] = inherited
+
+        self._built = True
+
+    def first_match(self, text: str) -> Optional[Tuple[int, Any]]:
+        """(priority, value) of the highest-priority keyword found in text, or None"""
+        if not self._built:
+            self.build()
+
+        goto, fail, best_at = self._goto, self._fail, self._best
+        best = best_at[0]  # Empty keyword matches everything
+        node = 0
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            candidate = best_at[node]
+            if candidate is not None and (best is None or candidate[0] < best[0]):
+                best = candidate
+                if best[0] == 0:
+                    break
+        return best
+
+    def first(self, text: str, default: Any = None) -> Any:
+        """Value of the highest-priority keyword found in text"""
+        match = self.first_match(text)
+        return match[1] if match is not None else default
+
+
+class SubstringIndex:
+    """
+    Two-way substring matcher
+
+    lookup(text) finds the highest-priority pattern such that
+    pattern in text (Aho-Corasick) or text in pattern (suffix trie of the patterns).
+    """
+
+    def __init__(self, patterns: Iterable[Tuple[str, Any]] = ()):
+        self._automaton = KeywordAutomaton()
+        self._suffixes: Dict[str, Any] = {}  # Nested dicts; key None stores (priority, value)
+        self._count = 0
+
+        for pattern, value in patterns:
+            self.add(pattern, value)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def add(self, pattern: str, value: Any):
+        priority = self._count
+        self._count += 1
+        self._automaton.add(pattern, value, priority)
+
+        entry = (priority, value)
+        for start in range(len(pattern) + 1):
+            node = self._suffixes
+            self._keep_best(node, entry)
+            for ch in pattern[start:]:
+                node = node.setdefault(ch, {})
+                self._keep_best(node, entry)
+
+    @staticmethod
+    def _keep_best(node: Dict, entry: Tuple[int, Any]):
+        current = node.get(None)
+        if current is None or entry[0] < current[0]:
+            node[None] = entry
+
+    def lookup(self, text: str, default: Any = None) -> Any:
+        best = self._automaton.first_match(text)
+
+        node = self._suffixes
+        for ch in text:
+            node = node.get(ch)
+            if node is None:
+                break
+        if node is not None:
+            contained = node.get(None)
+            if contained is not None and (best is None or contained[0] < best[0]):
+                best = contained
+
+        return best[1] if best is not None else default
+
+
+class DomainTrie:
+    """
+    Reversed-label domain trie
+
+    "docs.google.com" is stored as com -> google -> docs. A "*.example.com"
+    rule matches example.com and any of its subdomains; an exact rule wins
+    over wildcards, and the most specific wildcard wins over broader ones.
+    """
+
+    _EXACT = "$exact"
+    _WILDCARD = "$wildcard"
+
+    def __init__(self):
+        self._root: Dict[str, Any] = {}
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def add(self, pattern: str, value: Any):
+        wildcard = pattern.startswith('*.')
+        if wildcard:
+            pattern = pattern[2:]
+
+        node = self._root
+        for label in reversed(pattern.lower().split('.')):
+            node = node.setdefault(label, {})
+        node[self._WILDCARD if wildcard else self._EXACT] = value
+        self._count += 1
+
+    def lookup(self, domain: str, default: Any = None) -> Any:
+        if not domain:
+            return default
+
+        node = self._root
+        wildcard = default
+        for label in reversed(domain.lower().split('.')):
+            node = node.get(label)
+            if node is None:
+                return wildcard
+            wildcard = node.get(self._WILDCARD, wildcard)
+
+        return node.get(self._EXACT, wildcard)
+
+
+# Window title keywords, in priority order (production keywords win)
+TITLE_KEYWORDS: Dict[str, List[str]] = {
+    'production': ['edit', 'write', 'code', 'develop', '编辑', '写', '开发', '代码'],
+    'consumption': ['watch', 'video', 'browse', '视频', '看', '浏览'],
+}
+
+
+def compile_keyword_table(table: Dict[str, Sequence[str]], lowercase: bool = True) -> KeywordAutomaton:
+    """
+    Compile {label: [keywords]} into an automaton returning the label
+
+    Earlier labels win when keywords of several labels occur.
+    """
+    automaton = KeywordAutomaton()
+    for priority, (label, keywords) in enumerate(table.items()):
+        for keyword in keywords:
+            automaton.add(keyword.lower() if lowercase else keyword, label, priority)
+    return automaton
+
+
+@dataclass(frozen=True)
+class Classification:
+    """Classification verdict for one (app, title, url) sample"""
+    app_type: str
+    domain: str
+    domain_category: str
+    domain_mode: str
+    mode: str
+    source: str  # Which rule decided the mode: domain/title/app_type/fallback
+
+
+class ClassificationEngine:
+    """
+    Classify activity samples with the compiled rule tables
+
+    Verdicts of recent (app, title, url) triples are memoized (LRU), so the
+    steady state of "same window for minutes" costs one dict lookup.
+    """
+
+    def __init__(self,
+                 app_classifier=None,
+                 domain_classifier=None,
+                 title_keywords: Optional[Dict[str, Sequence[str]]] = None,
+                 cache_size: int = 1024,
+                 logger: Optional[logging.Logger] = None):
+        """
+        Initialize Classification Engine
+
+        Args:
+            app_classifier: AppClassifier instance (creates new if None)
+            domain_classifier: DomainClassifier instance (creates new if None)
+            title_keywords: {mode: [keywords]} (default: TITLE_KEYWORDS)
+            cache_size: Maximum number of memoized verdicts
+            logger: Logger instance
+        """
+        from .app_classifier import AppClassifier
+        from .domain_classifier import DomainClassifier
+
+        self.logger = logger or logging.getLogger(__name__)
+        self.app_classifier = app_classifier or AppClassifier(logger=logger)
+        self.domain_classifier = domain_classifier or DomainClassifier(logger=logger)
+        self.title_matcher = compile_keyword_table(title_keywords or TITLE_KEYWORDS)
+
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[Tuple[str, str, str], Classification]" = OrderedDict()
+        self._rules_version = self._current_rules_version()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _current_rules_version(self) -> Tuple[int, int]:
+        return (self.app_classifier.version, self.domain_classifier.version)
+
+    def classify(self, app: str, window_title: str = "", url: str = "") -> Classification:
+        """Classify one sample (memoized)"""
+        key = (app or "", window_title or "", url or "")
+
+        with self._lock:
+            version = self._current_rules_version()
+            if version != self._rules_version:
+                # Runtime rule changes (add_app/add_domain) invalidate verdicts
+                self._cache.clear()
+                self._rules_version = version
+
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return cached
+
+        verdict = self._classify_uncached(*key)
+
+        with self._lock:
+            self.misses += 1
+            self._cache[key] = verdict
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+        return verdict
+
+    def classify_many(self, rows: Iterable[Tuple[str, str, str]]) -> List[Classification]:
+        """
+        Classify historical rows in bulk
+
+        Args:
+            rows: Iterable of (app, window_title, url)
+
+        Returns:
+            Verdicts in input order (duplicates are classified once)
+        """
+        seen: Dict[Tuple[str, str, str], Classification] = {}
+        results = []
+        for app, window_title, url in rows:
+            key = (app or "", window_title or "", url or "")
+            verdict = seen.get(key)
+            if verdict is None:
+                verdict = self._classify_uncached(*key)
+                seen[key] = verdict
+            results.append(verdict)
+        return results
+
+    def _classify_uncached(self, app: str, window_title: str, url: str) -> Classification:
+        app_type = self.app_classifier.classify(app)
+
+        domain = ""
+        domain_category, domain_mode = "other", "unknown"
+        if url:
+            domain = self.domain_classifier.extract_domain(url) or ""
+            if domain:
+                domain_category, domain_mode = self.domain_classifier.classify_domain(domain)
+
+        mode, source = self.determine_mode(app_type, domain, domain_mode, window_title)
+        return Classification(app_type, domain, domain_category, domain_mode, mode, source)
+
+    def determine_mode(self, app_type: str, domain: str, domain_mode: str,
+                       window_title: str) -> Tuple[str, str]:
+        """
+        Content mode with priority logic
+
+        Priority:
+        1. Domain rules (if browser with known domain)
+        2. Window title keywords
+        3. AppType default mode
+        4. Unknown
+
+        Returns:
+            (mode, source)
+        """
+        if domain and domain_mode != "unknown":
+            return domain_mode, "domain"
+
+        title_mode = self.title_matcher.first((window_title or "").lower())
+        if title_mode:
+            return title_mode, "title"
+
+        default_mode = self.app_classifier.get_default_mode(app_type)
+        if default_mode != "unknown":
+            return default_mode, "app_type"
+
+        return "unknown", "fallback"
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
+
+    def get_stats(self) -> Dict[str, int]:
+        """Cache statistics"""
+        return {'size': len(self._cache), 'hits': self.hits, 'misses': self.misses}
@@ -4,12 +4,15 @@
 管理每个模板的自动应用规则（按日期/星期/月份）
 """
 
+import copy
 import json
 import logging
 from pathlib import Path
-from typing import List, Dict, Optional, Set
+from typing import Callable, List, Dict, Optional, Set, Tuple
 from datetime import datetime, date, timedelta
 
+from gaiya.utils.json_store import write_json
+
 
 class ScheduleManager:
     """模板时间表管理器"""
@@ -31,6 +34,12 @@ class ScheduleManager:
         # 时间表数据
         self.schedules: List[Dict] = []
 
+        # 启用规则的查找索引（规则变化时置空，下次查询时惰性重建）
+        self._rule_index: Optional[Dict] = None
+
+        # 规则变化监听器 callback(changed_rules: List[Dict])
+        self._change_listeners: List[Callable[[List[Dict]], None]] = []
+
         # 加载时间表配置
         self._load_schedules()
 
@@ -63,14 +72,116 @@ class ScheduleManager:
                 "description": "PyDayBar 模板时间表配置",
                 "schedules": self.schedules
             }
-            with open(self.schedule_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            write_json(self.schedule_file, data, indent=2)
             self.logger.info(f"时间表配置已保存，共 {len(self.schedules)} 条规则")
             return True
         except Exception as e:
             self.logger.error(f"保存时间表配置失败: {e}")
             return False
 
+    def add_change_listener(self, callback: Callable[[List[Dict]], None]):
+        """
+        注册规则变化监听器
+
+        Args:
+            callback: 规则保存成功后调用，参数为发生变化的规则（修改前和修改后的副本）
+        """
+        self._change_listeners.append(callback)
+
+    def snapshot(self) -> 'ScheduleManager':
+        """
+        规则的独立副本（供后台线程使用）
+
+        副本不注册监听器、不读写磁盘，UI线程之后修改规则不会影响副本
+        """
+        clone = copy.copy(self)
+        clone.schedules = copy.deepcopy(self.schedules)
+        clone._rule_index = None
+        clone._change_listeners = []
+        return clone
+
+    def _on_rules_changed(self, changed_rules: List[Dict]):
+        """规则变化后使索引失效并通知监听器"""
+        self._rule_index = None
+        for callback in self._change_listeners:
+            try:
+                callback(changed_rules)
+            except Exception as e:
+                self.logger.error(f"时间表变化监听器执行失败: {e}")
+
+    def _get_rule_index(self) -> Dict:
+        """
+        获取启用规则的查找索引
+
+        Returns:
+            {
+                'dates': {'YYYY-MM-DD': [(规则序号, 模板ID), ...]},
+                'monthly': {日: [...]},
+                'weekdays': {星期: [...]},
+                'tokens': {冲突标识: [规则序号, ...]}
+            }
+        """
+        if self._rule_index is not None:
+            return self._rule_index
+
+        index = {'dates': {}, 'monthly': {}, 'weekdays': {}, 'tokens': {}}
+        for i, schedule in enumerate(self.schedules):
+            if not schedule.get('enabled', True):
+                continue
+
+            schedule_type = schedule.get('schedule_type')
+            entry = (i, schedule.get('template_id'))
+            if schedule_type == 'specific_dates':
+                for date_str in schedule.get('dates', []):
+                    index['dates'].setdefault(date_str, []).append(entry)
+            elif schedule_type == 'monthly':
+                for day in schedule.get('days_of_month', []):
+                    index['monthly'].setdefault(day, []).append(entry)
+            elif schedule_type == 'weekdays':
+                for weekday in schedule.get('weekdays', []):
+                    index['weekdays'].setdefault(weekday, []).append(entry)
+
+            for token in self._get_rule_dates(
+                schedule_type,
+                weekdays=schedule.get('weekdays'),
+                dates=schedule.get('dates'),
+                days_of_month=schedule.get('days_of_month')
+            ):
+                index['tokens'].setdefault(token, []).append(i)
+
+        self._rule_index = index
+        return index
+
+    def _match_rules(self, target_date: date) -> Tuple[List, List, List]:
+        """按规则类型返回匹配指定日期的 (具体日期, 每月, 星期) 规则列表"""
+        index = self._get_rule_index()
+        return (
+            index['dates'].get(target_date.strftime('%Y-%m-%d'), []),
+            index['monthly'].get(target_date.day, []),
+            index['weekdays'].get(target_date.isoweekday(), [])
+        )
+
+    def match_date(self, target_date: date) -> Tuple[Optional[str], List[str]]:
+        """
+        一次查询获取指定日期应用的模板和所有生效模板（不输出日志，供批量索引使用）
+
+        Args:
+            target_date: 目标日期
+
+        Returns:
+            (应用的模板ID或None, 按规则顺序的生效模板ID列表)
+        """
+        date_rules, monthly_rules, weekday_rules = self._match_rules(target_date)
+
+        template_id = None
+        for rules in (date_rules, monthly_rules, weekday_rules):
+            if rules:
+                template_id = rules[0][1]
+                break
+
+        matched = [tid for _, tid in sorted(set(date_rules + monthly_rules + weekday_rules))]
+        return template_id, matched
+
     def get_all_schedules(self) -> List[Dict]:
         """获取所有时间表规则"""
         return self.schedules.copy()
@@ -128,7 +239,10 @@ class ScheduleManager:
                 return False
 
             self.schedules.append(new_schedule)
-            return self._save_schedules()
+            if not self._save_schedules():
+                return False
+            self._on_rules_changed([new_schedule.copy()])
+            return True
 
         except Exception as e:
             self.logger.error(f"添加时间表规则失败: {e}")
@@ -148,7 +262,10 @@ class ScheduleManager:
             if 0 <= index < len(self.schedules):
                 removed = self.schedules.pop(index)
                 self.logger.info(f"已删除时间表规则: {removed}")
-                return self._save_schedules()
+                if not self._save_schedules():
+                    return False
+                self._on_rules_changed([removed])
+                return True
             else:
                 self.logger.warning(f"无效的索引: {index}")
                 return False
@@ -169,8 +286,12 @@ class ScheduleManager:
         """
         try:
             if 0 <= index < len(self.schedules):
+                before = dict(self.schedules[index])
                 self.schedules[index].update(kwargs)
-                return self._save_schedules()
+                if not self._save_schedules():
+                    return False
+                self._on_rules_changed([before, dict(self.schedules[index])])
+                return True
             else:
                 self.logger.warning(f"无效的索引: {index}")
                 return False
@@ -192,7 +313,11 @@ class ScheduleManager:
             if 0 <= index < len(self.schedules):
                 current = self.schedules[index].get('enabled', True)
                 self.schedules[index]['enabled'] = not current
-                return self._save_schedules()
+                if not self._save_schedules():
+                    return False
+                # 启用状态切换影响的日期与规则本身一致
+                self._on_rules_changed([dict(self.schedules[index], enabled=True)])
+                return True
             else:
                 self.logger.warning(f"无效的索引: {index}")
                 return False
@@ -213,33 +338,20 @@ class ScheduleManager:
         if target_date is None:
             target_date = date.today()
 
-        # 只返回启用的规则
-        enabled_schedules = [s for s in self.schedules if s.get('enabled', True)]
-
-        # 优先级：specific_dates > monthly > weekdays
-        # 1. 检查具体日期
-        for schedule in enabled_schedules:
-            if schedule['schedule_type'] == 'specific_dates':
-                date_str = target_date.strftime('%Y-%m-%d')
-                if date_str in schedule.get('dates', []):
-                    self.logger.info(f"日期 {date_str} 匹配到具体日期规则: {schedule['template_id']}")
-                    return schedule['template_id']
-
-        # 2. 检查每月日期
-        for schedule in enabled_schedules:
-            if schedule['schedule_type'] == 'monthly':
-                if target_date.day in schedule.get('days_of_month', []):
-                    self.logger.info(f"日期 {target_date} 匹配到每月规则: {schedule['template_id']}")
-                    return schedule['template_id']
-
-        # 3. 检查星期
-        for schedule in enabled_schedules:
-            if schedule['schedule_type'] == 'weekdays':
-                # isoweekday(): 1=Monday, 7=Sunday
-                weekday = target_date.isoweekday()
-                if weekday in schedule.get('weekdays', []):
-                    self.logger.info(f"日期 {target_date} (星期{weekday}) 匹配到星期规则: {schedule['template_id']}")
-                    return schedule['template_id']
+        # 优先级：specific_dates > monthly > weekdays，同类型按规则顺序取第一条
+        date_rules, monthly_rules, weekday_rules = self._match_rules(target_date)
+
+        if date_rules:
+            self.logger.info(f"日期 {target_date} 匹配到具体日期规则: {date_rules[0][1]}")
+            return date_rules[0][1]
+
+        if monthly_rules:
+            self.logger.info(f"日期 {target_date} 匹配到每月规则: {monthly_rules[0][1]}")
+            return monthly_rules[0][1]
+
+        if weekday_rules:
+            self.logger.info(f"日期 {target_date} (星期{target_date.isoweekday()}) 匹配到星期规则: {weekday_rules[0][1]}")
+            return weekday_rules[0][1]
 
         self.logger.debug(f"日期 {target_date} 没有匹配到任何时间表规则")
         return None
@@ -256,35 +368,26 @@ class ScheduleManager:
         Returns:
             冲突的规则列表（包含template_id和描述）
         """
-        conflicts = []
-
         # 生成新规则会覆盖的日期集合
         new_rule_dates = self._get_rule_dates(schedule_type, **kwargs)
 
-        # 检查与现有规则的冲突
-        for schedule in self.schedules:
+        # 通过标识索引找出有交集的现有启用规则，避免逐条规则两两比较
+        tokens_index = self._get_rule_index()['tokens']
+        conflicting = set()
+        for token in new_rule_dates:
+            conflicting.update(tokens_index.get(token, []))
+
+        conflicts = []
+        for i in sorted(conflicting):
+            schedule = self.schedules[i]
             # 跳过同一个模板的规则（允许同一模板有多条规则）
             if schedule['template_id'] == template_id:
                 continue
 
-            # 跳过未启用的规则
-            if not schedule.get('enabled', True):
-                continue
-
-            # 获取现有规则的日期集合
-            existing_dates = self._get_rule_dates(
-                schedule['schedule_type'],
-                weekdays=schedule.get('weekdays'),
-                dates=schedule.get('dates'),
-                days_of_month=schedule.get('days_of_month')
-            )
-
-            # 检查是否有交集
-            if new_rule_dates & existing_dates:
-                conflicts.append({
-                    'template_id': schedule['template_id'],
-                    'description': self._describe_schedule(schedule)
-                })
+            conflicts.append({
+                'template_id': schedule['template_id'],
+                'description': self._describe_schedule(schedule)
+            })
 
         return conflicts
 
@@ -406,31 +509,4 @@ class ScheduleManager:
         if target_date is None:
             target_date = date.today()
 
-        matched_templates = []
-
-        for schedule in self.schedules:
-            if not schedule.get('enabled', True):
-                continue
-
-            schedule_type = schedule['schedule_type']
-
-            # 检查具体日期
-            if schedule_type == 'specific_dates':
-                date_str = target_date.strftime('%Y-%m-%d')
-                if date_str in schedule.get('dates', []):
-                    matched_templates.append(schedule['template_id'])
-                    continue
-
-            # 检查每月日期
-            if schedule_type == 'monthly':
-                if target_date.day in schedule.get('days_of_month', []):
-                    matched_templates.append(schedule['template_id'])
-                    continue
-
-            # 检查星期
-            if schedule_type == 'weekdays':
-                weekday = target_date.isoweekday()
-                if weekday in schedule.get('weekdays', []):
-                    matched_templates.append(schedule['template_id'])
-
-        return matched_templates
+        return self.match_date(target_date)[1]
@@ -0,0 +1,341 @@
+"""
+统计分析内核 - 列式NumPy数据
+
+把 statistics.json 的 daily_records 按连续日期索引转成列式数组(每个指标一列),
+洞察报告、统计图表和AI周报共用同一份数据。构建时只遍历一次任务记录,
+之后的滚动平均、环比、分位数、按小时分布和分类汇总都是向量化运算,
+多月/全年视图也能在交互时间内完成。
+"""
+
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+MINUTES_PER_DAY = 24 * 60
+
+# 每日指标列(与 daily_records[date]["summary"] 字段对应)
+DAY_COLUMNS = (
+    "total_tasks",
+    "completed_tasks",
+    "completion_rate",
+    "planned_minutes",
+    "completed_minutes",
+)
+
+_SUMMARY_FIELDS = {
+    "total_tasks": "total_tasks",
+    "completed_tasks": "completed_tasks",
+    "completion_rate": "completion_rate",
+    "planned_minutes": "total_planned_minutes",
+    "completed_minutes": "total_completed_minutes",
+}
+
+DEFAULT_TASK_COLOR = "#795548"
+
+# 会议没有独立分类(归入"工作"), AI周报单独统计时按名称识别
+_MEETING_KEYWORDS = ("会议", "早会", "meeting")
+
+
+def _parse_minutes(value) -> Optional[int]:
+    """把 "HH:MM" 转为当天分钟数, "24:00" 视为1440, 无法解析时返回None"""
+    try:
+        hours, minutes = str(value).split(":")
+        total = int(hours) * 60 + int(minutes)
+    except (ValueError, TypeError):
+        return None
+    if not 0 <= total <= MINUTES_PER_DAY:
+        return None
+    return total
+
+
+class StatsFrame:
+    """
+    按日期索引的列式统计数据
+
+    日期列 dates 为连续的 datetime64[D], 没有记录的日期以0填充;
+    任务级数组(task_*)每个元素对应一条任务记录, 通过 task_day 关联到日期下标。
+    """
+
+    def __init__(self, dates: np.ndarray, columns: Dict[str, np.ndarray],
+                 task_day: np.ndarray, task_start: np.ndarray, task_minutes: np.ndarray,
+                 task_completed: np.ndarray, task_category: np.ndarray, task_color: np.ndarray,
+                 task_meeting: np.ndarray, categories: Sequence[str], colors: Sequence[str]):
+        self.dates = dates
+        self.columns = columns
+        self.task_day = task_day
+        self.task_start = task_start
+        self.task_minutes = task_minutes
+        self.task_completed = task_completed
+        self.task_category = task_category
+        self.task_color = task_color
+        self.task_meeting = task_meeting
+        self.categories = list(categories)
+        self.colors = list(colors)
+
+    @classmethod
+    def from_daily_records(cls, daily_records: Dict[str, Dict], days: int,
+                           end: Optional[date] = None,
+                           classify: Optional[Callable[[str], str]] = None) -> "StatsFrame":
+        """
+        从 daily_records 构建最近N天(含end当天)的数据
+
+        Args:
+            daily_records: statistics["daily_records"]
+            days: 天数
+            end: 最后一天, 默认今天
+            classify: 任务名称 -> 分类名称, 默认全部归为"其他"
+        """
+        days = max(int(days), 0)
+        end = end or date.today()
+        start = end - timedelta(days=days - 1) if days else end + timedelta(days=1)
+        dates = np.arange(np.datetime64(start, "D"), np.datetime64(end, "D") + 1)
+
+        columns = {name: np.zeros(days, dtype=np.float64) for name in DAY_COLUMNS}
+        task_day: List[int] = []
+        task_start: List[int] = []
+        task_minutes: List[int] = []
+        task_completed: List[bool] = []
+        task_category: List[int] = []
+        task_color: List[int] = []
+        task_meeting: List[bool] = []
+        category_codes: Dict[str, int] = {}
+        color_codes: Dict[str, int] = {}
+        # 同名任务每天重复出现, 分类结果按名称缓存
+        classified: Dict[str, int] = {}
+
+        for offset in range(days):
+            record = daily_records.get((start + timedelta(days=offset)).isoformat())
+            if not record:
+                continue
+
+            summary = record.get("summary", {})
+            for column, field in _SUMMARY_FIELDS.items():
+                columns[column][offset] = summary.get(field, 0) or 0
+
+            for task_name, task_info in record.get("tasks", {}).items():
+                code = classified.get(task_name)
+                if code is None:
+                    category = classify(task_name) if classify else "其他"
+                    code = classified[task_name] = category_codes.setdefault(category, len(category_codes))
+
+                color = task_info.get("color", DEFAULT_TASK_COLOR)
+                begin = _parse_minutes(task_info.get("start"))
+                finish = _parse_minutes(task_info.get("end"))
+                if begin is None or finish is None:
+                    begin, minutes = -1, 0
+                else:
+                    minutes = finish - begin
+                    # 结束早于开始视为跨天任务
+                    if minutes < 0:
+                        minutes += MINUTES_PER_DAY
+
+                lowered = task_name.lower()
+                task_day.append(offset)
+                task_start.append(begin)
+                task_minutes.append(minutes)
+                task_completed.append(task_info.get("status") == "completed")
+                task_category.append(code)
+                task_color.append(color_codes.setdefault(color, len(color_codes)))
+                task_meeting.append(any(keyword in lowered for keyword in _MEETING_KEYWORDS))
+
+        return cls(
+            dates=dates,
+            columns=columns,
+            task_day=np.asarray(task_day, dtype=np.int64),
+            task_start=np.asarray(task_start, dtype=np.int64),
+            task_minutes=np.asarray(task_minutes, dtype=np.int64),
+            task_completed=np.asarray(task_completed, dtype=bool),
+            task_category=np.asarray(task_category, dtype=np.int64),
+            task_color=np.asarray(task_color, dtype=np.int64),
+            task_meeting=np.asarray(task_meeting, dtype=bool),
+            categories=sorted(category_codes, key=category_codes.get),
+            colors=sorted(color_codes, key=color_codes.get),
+        )
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def column(self, name: str) -> np.ndarray:
+        """获取每日指标列"""
+        return self.columns[name]
+
+    def date_strings(self) -> List[str]:
+        """日期索引的 "YYYY-MM-DD" 字符串列表"""
+        return np.datetime_as_string(self.dates, unit="D").tolist()
+
+    def tail(self, days: int) -> "StatsFrame":
+        """最近N天的子集(数组为视图, 不复制)"""
+        first = max(len(self) - days, 0)
+        keep = self.task_day >= first
+        return StatsFrame(
+            dates=self.dates[first:],
+            columns={name: values[first:] for name, values in self.columns.items()},
+            task_day=self.task_day[keep] - first,
+            task_start=self.task_start[keep],
+            task_minutes=self.task_minutes[keep],
+            task_completed=self.task_completed[keep],
+            task_category=self.task_category[keep],
+            task_color=self.task_color[keep],
+            task_meeting=self.task_meeting[keep],
+            categories=self.categories,
+            colors=self.colors,
+        )
+
+    # ---------- 时间序列 ----------
+
+    def rolling_mean(self, name: str, window: int = 7) -> np.ndarray:
+        """尾随滚动平均, 序列开头不足一个窗口时按已有天数求平均"""
+        values = self.columns[name]
+        if window <= 1 or not len(values):
+            return values.astype(np.float64)
+        sums = np.cumsum(values, dtype=np.float64)
+        sums[window:] = sums[window:] - sums[:-window]
+        counts = np.minimum(np.arange(1, len(values) + 1), window)
+        return sums / counts
+
+    def week_over_week(self, name: str, period: int = 7) -> Dict[str, Optional[float]]:
+        """
+        最近一个周期与上一个周期的对比
+
+        比率类指标(completion_rate)取均值, 其余指标取总和;
+        数据不足两个周期或上一周期为0时 pct_change 为None。
+        """
+        values = self.columns[name]
+        reduce = np.mean if name == "completion_rate" else np.sum
+        current_values = values[-period:]
+        previous_values = values[-2 * period:-period] if len(values) > period else values[:0]
+
+        current = float(reduce(current_values)) if len(current_values) else 0.0
+        if len(previous_values) < period:
+            return {"current": current, "previous": None, "delta": None, "pct_change": None}
+
+        previous = float(reduce(previous_values))
+        delta = current - previous
+        pct_change = delta / previous * 100 if previous else None
+        return {"current": current, "previous": previous, "delta": delta, "pct_change": pct_change}
+
+    def percentiles(self, name: str, qs: Sequence[float] = (50, 90),
+                    active_only: bool = True) -> Dict[float, float]:
+        """
+        每日指标的分位数
+
+        Args:
+            active_only: 只统计有任务的日期(避免空白日期拉低完成率分布)
+        """
+        values = self.columns[name]
+        if active_only:
+            values = values[self.columns["total_tasks"] > 0]
+        if not len(values):
+            return {q: 0.0 for q in qs}
+        return dict(zip(qs, np.percentile(values, qs).tolist()))
+
+    def halves_mean(self, name: str):
+        """前半段与后半段的均值(奇数天时中间一天归后半段)"""
+        values = self.columns[name]
+        mid = len(values) // 2
+        first = float(values[:mid].mean()) if mid else 0.0
+        second = float(values[mid:].mean()) if len(values) > mid else 0.0
+        return first, second
+
+    def best_days(self, n: int = 3) -> List[int]:
+        """完成率最高的N天的下标(同分保持日期顺序)"""
+        order = np.argsort(-self.columns["completion_rate"], kind="stable")
+        return order[:n].tolist()
+
+    def trend_records(self) -> List[Dict]:
+        """按日期输出 {date, completion_rate, total_tasks, completed_tasks} 列表"""
+        return [
+            {
+                "date": day,
+                "completion_rate": rate,
+                "total_tasks": int(total),
+                "completed_tasks": int(completed),
+            }
+            for day, rate, total, completed in zip(
+                self.date_strings(),
+                self.columns["completion_rate"].tolist(),
+                self.columns["total_tasks"].tolist(),
+                self.columns["completed_tasks"].tolist(),
+            )
+        ]
+
+    # ---------- 任务分布 ----------
+
+    def hour_histogram(self, completed_only: bool = False) -> np.ndarray:
+        """
+        一天24小时中每小时的任务分钟数
+
+        任务按实际覆盖的时段分摊到各小时, 跨天任务的次日部分折回对应小时。
+        """
+        mask = self.task_start >= 0
+        if completed_only:
+            mask &= self.task_completed
+        starts = self.task_start[mask][:, None]
+        ends = starts + self.task_minutes[mask][:, None]
+
+        # 覆盖两天的48个小时格, 再折叠为24小时
+        edges = np.arange(49) * 60
+        overlap = np.minimum(ends, edges[1:]) - np.maximum(starts, edges[:-1])
+        minutes = np.clip(overlap, 0, None).sum(axis=0)
+        return minutes[:24] + minutes[24:]
+
+    def peak_hour(self, completed_only: bool = False) -> Optional[int]:
+        """任务分钟数最多的小时, 没有任务时返回None"""
+        histogram = self.hour_histogram(completed_only=completed_only)
+        if not histogram.any():
+            return None
+        return int(histogram.argmax())
+
+    def category_totals(self) -> Dict[str, Dict]:
+        """按分类汇总 {分类: {count, completed, total_minutes}}"""
+        size = len(self.categories)
+        counts = np.bincount(self.task_category, minlength=size)
+        completed = np.bincount(self.task_category, weights=self.task_completed, minlength=size)
+        minutes = np.bincount(self.task_category, weights=self.task_minutes, minlength=size)
+        return {
+            category: {
+                "count": int(counts[code]),
+                "completed": int(completed[code]),
+                "total_minutes": int(minutes[code]),
+            }
+            for code, category in enumerate(self.categories)
+            if counts[code]
+        }
+
+    def category_minutes(self, category: str) -> int:
+        """某个分类的任务总分钟数"""
+        if category not in self.categories:
+            return 0
+        return int(self.task_minutes[self.task_category == self.categories.index(category)].sum())
+
+    def color_counts(self) -> Dict[str, int]:
+        """按任务颜色计数"""
+        counts = np.bincount(self.task_color, minlength=len(self.colors))
+        return {color: int(counts[code]) for code, color in enumerate(self.colors) if counts[code]}
+
+    # ---------- AI周报 ----------
+
+    def weekly_report_payload(self) -> Dict:
+        """
+        AI周报接口(/api/generate-weekly-report)的 statistics 参数
+
+        completion_rate 与 get_weekly_summary 一致, 按完成分钟数/计划分钟数计算。
+        """
+        planned = float(self.columns["planned_minutes"].sum())
+        completed = float(self.columns["completed_minutes"].sum())
+        completion_rate = completed / planned * 100 if planned else 0.0
+        rate_percentiles = self.percentiles("completion_rate", qs=(50, 90))
+
+        return {
+            "total_tasks": int(self.columns["total_tasks"].sum()),
+            "completed_tasks": int(self.columns["completed_tasks"].sum()),
+            "work_hours": round(self.category_minutes("工作") / 60, 1),
+            "learning_hours": round(self.category_minutes("学习") / 60, 1),
+            "meeting_hours": round(int(self.task_minutes[self.task_meeting].sum()) / 60, 1),
+            "break_hours": round(self.category_minutes("休息") / 60, 1),
+            "completion_rate": round(completion_rate, 1),
+            "completion_rate_p50": round(rate_percentiles[50], 1),
+            "completion_rate_p90": round(rate_percentiles[90], 1),
+            "peak_hour": self.peak_hour(),
+        }
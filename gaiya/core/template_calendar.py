@@ -0,0 +1,420 @@
+# -*- coding: utf-8 -*-
+"""
+模板日历索引
+将时间表规则、模板自动应用条件和节假日数据物化为按日期索引的日历，
+日历预览和每日自动应用只需查表，无需逐条规则重新匹配
+"""
+
+import hashlib
+import json
+import logging
+from dataclasses import dataclass, field, asdict
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+from .schedule_manager import ScheduleManager
+
+
+@dataclass
+class CalendarDay:
+    """日历中单个日期的解析结果"""
+    date: str                                   # YYYY-MM-DD
+    date_type: str = 'weekday'                  # 'weekday' | 'weekend' | 'holiday'
+    is_holiday: bool = False
+    schedule_template_id: Optional[str] = None  # 时间表规则匹配的模板
+    auto_template_id: Optional[str] = None      # 自动应用条件匹配的最佳模板
+    conflicts: List[str] = field(default_factory=list)  # 该日期生效的全部时间表模板
+
+    @property
+    def template_id(self) -> Optional[str]:
+        """最终应用的模板（时间表规则优先于自动应用条件）"""
+        return self.schedule_template_id or self.auto_template_id
+
+    @property
+    def has_conflict(self) -> bool:
+        """是否有多条时间表规则同时生效"""
+        return len(self.conflicts) > 1
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'CalendarDay':
+        return cls(**data)
+
+
+class TemplateCalendar:
+    """模板日历索引（滚动窗口：今天前后 horizon_days 天）"""
+
+    CACHE_VERSION = 1
+
+    def __init__(self, app_dir: Path, schedule_manager: ScheduleManager,
+                 template_manager=None, logger: Optional[logging.Logger] = None,
+                 horizon_days: int = 365, build: bool = True):
+        """
+        初始化模板日历
+
+        Args:
+            app_dir: 应用根目录（索引缓存保存在 cache/template_calendar.json）
+            schedule_manager: 时间表管理器
+            template_manager: 模板管理器（可选，提供自动应用条件和节假日服务）
+            logger: 日志记录器
+            horizon_days: 滚动窗口半径（天）
+            build: 为False时只加载磁盘缓存（不重建、不滚动窗口、不获取节假日数据），
+                   缓存无效时索引为空，查询请用 lookup()
+        """
+        self.app_dir = app_dir
+        self.schedule_manager = schedule_manager
+        self.template_manager = template_manager
+        self.logger = logger or logging.getLogger(__name__)
+        self.horizon_days = horizon_days
+
+        self.cache_file = self.cache_path(app_dir)
+
+        # 日期字符串 -> CalendarDay
+        self.days: Dict[str, CalendarDay] = {}
+        self.start_date: Optional[date] = None
+        self.end_date: Optional[date] = None
+
+        # 构建时节假日数据可用的年份（数据后续可用时只重算这些年份之外的日期类型）
+        self._holiday_years: Set[int] = set()
+
+        schedule_manager.add_change_listener(self._on_schedules_changed)
+        if template_manager is not None:
+            template_manager.add_change_listener(self._on_templates_changed)
+
+        if not self._load(refresh=build) and build:
+            self.rebuild()
+
+    def attach(self, schedule_manager: ScheduleManager, template_manager=None):
+        """
+        改为跟随另一组管理器（后台线程用规则副本构建后，在UI线程绑定到正在使用的管理器）
+
+        副本与当前规则不一致时（构建期间规则被修改）按当前规则重算模板，日期类型不变
+        """
+        built_fingerprint = self._fingerprint()
+        self.schedule_manager = schedule_manager
+        self.template_manager = template_manager
+
+        schedule_manager.add_change_listener(self._on_schedules_changed)
+        if template_manager is not None:
+            template_manager.add_change_listener(self._on_templates_changed)
+
+        if self.is_ready and self._fingerprint() != built_fingerprint:
+            for key, day in self.days.items():
+                self._resolve_schedule(day, date.fromisoformat(key))
+                self._resolve_auto(day)
+            self.logger.info("模板日历构建期间规则已变化，已按当前规则重算")
+            self.save()
+
+    @staticmethod
+    def cache_path(app_dir: Path) -> Path:
+        """索引缓存文件路径"""
+        return app_dir / "cache" / "template_calendar.json"
+
+    # ------------------------------------------------------------------
+    # 查询
+    # ------------------------------------------------------------------
+
+    def get_day(self, target_date: Optional[date] = None) -> CalendarDay:
+        """
+        获取指定日期的日历项
+
+        Args:
+            target_date: 目标日期，默认为今天
+
+        Returns:
+            CalendarDay（窗口外的日期即时计算，不写入索引）
+        """
+        if target_date is None:
+            target_date = date.today()
+
+        day = self.days.get(target_date.isoformat())
+        if day is not None:
+            return day
+
+        holiday_dates = self._holiday_dates_for_years({target_date.year})
+        day = CalendarDay(date=target_date.isoformat())
+        self._resolve_date_type(day, target_date, holiday_dates)
+        self._resolve_schedule(day, target_date)
+        self._resolve_auto(day)
+        return day
+
+    @property
+    def is_ready(self) -> bool:
+        """索引是否已构建或已从缓存加载"""
+        return self.start_date is not None
+
+    def lookup(self, target_date: Optional[date] = None) -> Optional[CalendarDay]:
+        """
+        只查已物化的索引（不计算、不触发网络请求）
+
+        Returns:
+            CalendarDay，日期不在索引中（或索引尚未构建）返回None
+        """
+        if target_date is None:
+            target_date = date.today()
+        return self.days.get(target_date.isoformat())
+
+    def get_template_for_date(self, target_date: Optional[date] = None) -> Optional[str]:
+        """获取指定日期最终应用的模板ID"""
+        return self.get_day(target_date).template_id
+
+    def get_range(self, start: date, end: date) -> List[CalendarDay]:
+        """
+        范围查询（含首尾）
+
+        Args:
+            start: 开始日期
+            end: 结束日期
+
+        Returns:
+            按日期排序的日历项列表
+        """
+        result = []
+        current = start
+        while current <= end:
+            result.append(self.get_day(current))
+            current += timedelta(days=1)
+        return result
+
+    def get_conflict_days(self, start: Optional[date] = None, end: Optional[date] = None) -> List[CalendarDay]:
+        """获取窗口内（或指定范围内）存在规则冲突的日期"""
+        start = start or self.start_date
+        end = end or self.end_date
+        return [
+            day for day in self.days.values()
+            if day.has_conflict and start.isoformat() <= day.date <= end.isoformat()
+        ]
+
+    # ------------------------------------------------------------------
+    # 构建与增量更新
+    # ------------------------------------------------------------------
+
+    def rebuild(self, today: Optional[date] = None):
+        """全量重建索引"""
+        today = today or date.today()
+        self.start_date = today - timedelta(days=self.horizon_days)
+        self.end_date = today + timedelta(days=self.horizon_days)
+        self.days = {}
+
+        dates = list(self._iter_dates(self.start_date, self.end_date))
+        holiday_dates = self._holiday_dates_for_years({d.year for d in dates})
+        for target_date in dates:
+            day = CalendarDay(date=target_date.isoformat())
+            self._resolve_date_type(day, target_date, holiday_dates)
+            self._resolve_schedule(day, target_date)
+            self._resolve_auto(day)
+            self.days[day.date] = day
+
+        self.logger.info(f"模板日历已重建: {self.start_date} ~ {self.end_date}, 共 {len(self.days)} 天")
+        self.save()
+
+    def roll_forward(self, today: Optional[date] = None):
+        """
+        滚动窗口到新的一天（每日零点调用）：只计算新进入窗口的日期，丢弃移出窗口的日期
+        """
+        today = today or date.today()
+        new_start = today - timedelta(days=self.horizon_days)
+        new_end = today + timedelta(days=self.horizon_days)
+        if self.start_date == new_start and self.end_date == new_end:
+            return
+
+        # 窗口完全不重叠（长时间未运行）时直接重建
+        if self.end_date is None or new_start > self.end_date or new_end < self.start_date:
+            self.rebuild(today)
+            return
+
+        self.days = {key: day for key, day in self.days.items()
+                     if new_start.isoformat() <= key <= new_end.isoformat()}
+
+        added = [d for d in self._iter_dates(new_start, new_end) if d.isoformat() not in self.days]
+        holiday_dates = self._holiday_dates_for_years({d.year for d in added})
+        for target_date in added:
+            day = CalendarDay(date=target_date.isoformat())
+            self._resolve_date_type(day, target_date, holiday_dates)
+            self._resolve_schedule(day, target_date)
+            self._resolve_auto(day)
+            self.days[day.date] = day
+
+        self.start_date, self.end_date = new_start, new_end
+        self.logger.info(f"模板日历窗口已滚动: 新增 {len(added)} 天")
+        self.save()
+
+    def _on_schedules_changed(self, changed_rules: List[Dict]):
+        """时间表规则变化：只重算受影响规则覆盖的日期"""
+        affected = self._affected_dates(changed_rules)
+        for key in affected:
+            day = self.days.get(key)
+            if day is not None:
+                self._resolve_schedule(day, date.fromisoformat(key))
+        self.logger.debug(f"时间表规则变化，重算 {len(affected)} 天")
+        self.save()
+
+    def _on_templates_changed(self):
+        """自动应用条件变化：日期类型不变，只按缓存的日期类型重新选取模板"""
+        for day in self.days.values():
+            self._resolve_auto(day)
+        self.save()
+
+    def _affected_dates(self, rules: Iterable[Dict]) -> Set[str]:
+        """计算一组规则在窗口内覆盖的日期"""
+        affected: Set[str] = set()
+        if self.start_date is None:
+            return affected
+
+        start_key, end_key = self.start_date.isoformat(), self.end_date.isoformat()
+        weekdays: Set[int] = set()
+        days_of_month: Set[int] = set()
+
+        for rule in rules:
+            schedule_type = rule.get('schedule_type')
+            if schedule_type == 'specific_dates':
+                affected.update(d for d in rule.get('dates', []) if start_key <= d <= end_key)
+            elif schedule_type == 'monthly':
+                days_of_month.update(rule.get('days_of_month', []))
+            elif schedule_type == 'weekdays':
+                weekdays.update(rule.get('weekdays', []))
+
+        if weekdays or days_of_month:
+            for target_date in self._iter_dates(self.start_date, self.end_date):
+                if target_date.isoweekday() in weekdays or target_date.day in days_of_month:
+                    affected.add(target_date.isoformat())
+
+        return affected
+
+    # ------------------------------------------------------------------
+    # 单日解析
+    # ------------------------------------------------------------------
+
+    def _resolve_date_type(self, day: CalendarDay, target_date: date, holiday_dates: Set[str]):
+        day.is_holiday = day.date in holiday_dates
+        if day.is_holiday:
+            day.date_type = 'holiday'
+        elif target_date.isoweekday() in (6, 7):
+            day.date_type = 'weekend'
+        else:
+            day.date_type = 'weekday'
+
+    def _resolve_schedule(self, day: CalendarDay, target_date: date):
+        day.schedule_template_id, day.conflicts = self.schedule_manager.match_date(target_date)
+
+    def _resolve_auto(self, day: CalendarDay):
+        if self.template_manager is None:
+            day.auto_template_id = None
+            return
+        matching = self.template_manager.get_matching_templates_for_type(day.date_type)
+        day.auto_template_id = matching[0].get('id') if matching else None
+
+    def _holiday_dates_for_years(self, years: Set[int]) -> Set[str]:
+        """批量获取若干年份的节假日日期（数据不可用的年份按无节假日处理）"""
+        holiday_dates: Set[str] = set()
+        holiday_service = getattr(self.template_manager, 'holiday_service', None)
+        if holiday_service is None:
+            return holiday_dates
+
+        for year in years:
+            year_dates = holiday_service.get_holiday_dates(year)
+            if year_dates is not None:
+                holiday_dates.update(year_dates)
+                self._holiday_years.add(year)
+        return holiday_dates
+
+    @staticmethod
+    def _iter_dates(start: date, end: date):
+        current = start
+        while current <= end:
+            yield current
+            current += timedelta(days=1)
+
+    # ------------------------------------------------------------------
+    # 持久化
+    # ------------------------------------------------------------------
+
+    def _fingerprint(self) -> str:
+        """规则和自动应用条件的指纹，用于判断磁盘缓存是否仍然有效"""
+        auto_apply = []
+        if self.template_manager is not None:
+            auto_apply = [(t.get('id'), t.get('auto_apply', {})) for t in self.template_manager.templates]
+        payload = json.dumps(
+            {'schedules': self.schedule_manager.schedules, 'auto_apply': auto_apply},
+            sort_keys=True, ensure_ascii=False
+        )
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+    def save(self) -> bool:
+        """保存索引到磁盘"""
+        if not self.is_ready:
+            return False
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            data = {
+                'version': self.CACHE_VERSION,
+                'fingerprint': self._fingerprint(),
+                'start_date': self.start_date.isoformat(),
+                'end_date': self.end_date.isoformat(),
+                'holiday_years': sorted(self._holiday_years),
+                'days': [day.to_dict() for day in self.days.values()]
+            }
+            temp_file = self.cache_file.with_suffix('.tmp')
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+            temp_file.replace(self.cache_file)
+            return True
+        except Exception as e:
+            self.logger.error(f"保存模板日历失败: {e}")
+            return False
+
+    def _load(self, refresh: bool = True) -> bool:
+        """
+        从磁盘加载索引
+
+        Args:
+            refresh: 加载后补算节假日数据并滚动窗口到今天
+
+        Returns:
+            缓存有效并已加载返回True；规则已变化或缓存损坏返回False（需要重建）
+        """
+        if not self.cache_file.exists():
+            return False
+
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+
+            if data.get('version') != self.CACHE_VERSION or data.get('fingerprint') != self._fingerprint():
+                self.logger.info("模板日历缓存已过期，将重建")
+                return False
+
+            self.start_date = date.fromisoformat(data['start_date'])
+            self.end_date = date.fromisoformat(data['end_date'])
+            self._holiday_years = set(data.get('holiday_years', []))
+            self.days = {item['date']: CalendarDay.from_dict(item) for item in data.get('days', [])}
+        except Exception as e:
+            self.logger.warning(f"加载模板日历缓存失败，将重建: {e}")
+            return False
+
+        if refresh:
+            self._refresh_holiday_years()
+            self.roll_forward()
+        self.logger.info(f"已加载模板日历缓存: {self.start_date} ~ {self.end_date}")
+        return True
+
+    def _refresh_holiday_years(self):
+        """构建时缺少节假日数据、现在已有缓存的年份，重算其日期类型"""
+        holiday_service = getattr(self.template_manager, 'holiday_service', None)
+        if holiday_service is None:
+            return
+
+        years = {int(key[:4]) for key in self.days} - self._holiday_years
+        years = {year for year in years if holiday_service.has_year_data(year)}
+        if not years:
+            return
+
+        holiday_dates = self._holiday_dates_for_years(years)
+        for key, day in self.days.items():
+            if int(key[:4]) in years:
+                self._resolve_date_type(day, date.fromisoformat(key), holiday_dates)
+                self._resolve_auto(day)
+        self.save()
@@ -5,12 +5,14 @@ PyDayBar 模板管理器
 """
 
 import sys
+import copy
 import json
 import logging
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional
 from datetime import datetime
 from .holiday_service import HolidayService
+from gaiya.utils.json_store import write_json
 
 
 class TemplateManager:
@@ -41,6 +43,12 @@ class TemplateManager:
         # 模板数据
         self.templates: List[Dict] = []
 
+        # 日期类型 -> 匹配模板列表的缓存（自动应用配置变化时清空）
+        self._matching_cache: Dict[str, List[Dict]] = {}
+
+        # 自动应用配置变化监听器
+        self._change_listeners: List[Callable[[], None]] = []
+
         # 初始化节假日服务
         self.holiday_service = HolidayService(app_dir, logger)
 
@@ -69,8 +77,7 @@ class TemplateManager:
                 "description": "PyDayBar 任务模板配置",
                 "templates": self.templates
             }
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(config, f, ensure_ascii=False, indent=2)
+            write_json(self.config_file, config, indent=2)
             self.logger.info("模板配置已保存")
             return True
         except Exception as e:
@@ -206,6 +213,25 @@ class TemplateManager:
             匹配的模板列表，按优先级排序
         """
         date_type = self.get_date_type(date)
+        matching = self.get_matching_templates_for_type(date_type)
+
+        self.logger.info(f"日期类型: {date_type}, 匹配到 {len(matching)} 个模板")
+        return matching
+
+    def get_matching_templates_for_type(self, date_type: str) -> List[Dict]:
+        """
+        获取匹配指定日期类型的模板（按日期类型缓存）
+
+        Args:
+            date_type: 'weekday' | 'weekend' | 'holiday'
+
+        Returns:
+            匹配的模板列表，按优先级排序
+        """
+        cached = self._matching_cache.get(date_type)
+        if cached is not None:
+            return list(cached)
+
         matching = []
 
         for template in self.templates:
@@ -223,8 +249,34 @@ class TemplateManager:
         # 按优先级排序（优先级高的在前）
         matching.sort(key=lambda t: t.get('auto_apply', {}).get('priority', 0), reverse=True)
 
-        self.logger.info(f"日期类型: {date_type}, 匹配到 {len(matching)} 个模板")
-        return matching
+        self._matching_cache[date_type] = matching
+        return list(matching)
+
+    def add_change_listener(self, callback: Callable[[], None]):
+        """注册自动应用配置变化监听器（保存成功后调用）"""
+        self._change_listeners.append(callback)
+
+    def snapshot(self) -> 'TemplateManager':
+        """
+        模板配置的独立副本（供后台线程使用）
+
+        副本使用独立的节假日服务实例，不注册监听器，UI线程之后修改配置不会影响副本
+        """
+        clone = copy.copy(self)
+        clone.templates = copy.deepcopy(self.templates)
+        clone._matching_cache = {}
+        clone._change_listeners = []
+        clone.holiday_service = HolidayService(self.app_dir, self.logger)
+        return clone
+
+    def _on_auto_apply_changed(self):
+        """自动应用配置变化后清空匹配缓存并通知监听器"""
+        self._matching_cache.clear()
+        for callback in self._change_listeners:
+            try:
+                callback()
+            except Exception as e:
+                self.logger.error(f"模板变化监听器执行失败: {e}")
 
     def get_best_match_template(self, date: Optional[datetime] = None) -> Optional[Dict]:
         """
@@ -257,6 +309,7 @@ class TemplateManager:
                 current_enabled = auto_apply.get('enabled', False)
                 auto_apply['enabled'] = not current_enabled
                 self.logger.info(f"模板 {template_id} 自动应用已{'启用' if not current_enabled else '禁用'}")
+                self._on_auto_apply_changed()
                 return self._save_templates_config()
 
         self.logger.warning(f"模板不存在: {template_id}")
@@ -289,6 +342,7 @@ class TemplateManager:
                     auto_apply['priority'] = priority
 
                 self.logger.info(f"模板 {template_id} 自动应用配置已更新")
+                self._on_auto_apply_changed()
                 return self._save_templates_config()
 
         self.logger.warning(f"模板不存在: {template_id}")
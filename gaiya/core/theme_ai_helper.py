@@ -7,6 +7,7 @@ PyDayBar AI 主题助手
 import requests
 import urllib3
 from typing import Dict, List, Optional
+from gaiya.core.http_pool import get_shared_session
 from PySide6.QtWidgets import QMessageBox
 import json
 
@@ -91,7 +92,7 @@ class ThemeAIHelper:
             }
             
             # 调用后端API
-            response = requests.post(
+            response = get_shared_session().post(
                 f"{self.ai_client.backend_url}/api/recommend-theme",
                 json={
                     "user_id": self.ai_client.user_id,
@@ -100,8 +101,7 @@ class ThemeAIHelper:
                     "statistics": statistics or {},
                     "user_tier": self.ai_client.user_tier
                 },
-                timeout=self.ai_client.timeout,
-                verify=False  # 禁用SSL验证（解决Windows SSL兼容性问题）
+                timeout=self.ai_client.timeout
             )
             
             if response.status_code == 403:
@@ -153,15 +153,14 @@ class ThemeAIHelper:
         """
         try:
             # 调用后端API
-            response = requests.post(
+            response = get_shared_session().post(
                 f"{self.ai_client.backend_url}/api/generate-theme",
                 json={
                     "user_id": self.ai_client.user_id,
                     "description": description,
                     "user_tier": self.ai_client.user_tier
                 },
-                timeout=self.ai_client.timeout,
-                verify=False  # 禁用SSL验证（解决Windows SSL兼容性问题）
+                timeout=self.ai_client.timeout
             )
             
             if response.status_code == 403:
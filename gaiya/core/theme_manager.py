@@ -13,6 +13,7 @@ from typing import Dict, List, Optional, Any
 from PySide6.QtCore import QObject, Signal
 
 from i18n.translator import tr
+from gaiya.utils.json_store import write_json
 
 
 class ThemeManager(QObject):
@@ -229,8 +230,7 @@ class ThemeManager(QObject):
         }
         
         try:
-            with open(self.themes_file, 'w', encoding='utf-8') as f:
-                json.dump(themes_data, f, indent=4, ensure_ascii=False)
+            write_json(self.themes_file, themes_data, indent=4)
             self.logger.info("已创建默认 themes.json")
         except Exception as e:
             self.logger.error(f"创建 themes.json 失败: {e}")
@@ -257,8 +257,7 @@ class ThemeManager(QObject):
                 themes_data['ai_generated_themes'] = {}
             
             # 保存更新后的文件
-            with open(self.themes_file, 'w', encoding='utf-8') as f:
-                json.dump(themes_data, f, indent=4, ensure_ascii=False)
+            write_json(self.themes_file, themes_data, indent=4)
             
             # 清除缓存，强制下次重新加载
             self._themes_cache = None
@@ -390,8 +389,7 @@ class ThemeManager(QObject):
             config['theme']['current_theme_id'] = theme_id
             
             # 保存配置
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(config, f, indent=4, ensure_ascii=False)
+            write_json(self.config_file, config, indent=4)
             
             self.logger.info(f"已保存主题模式: {mode}, 主题ID: {theme_id}")
             
@@ -463,8 +461,7 @@ class ThemeManager(QObject):
             themes_data['custom_themes'][theme_id] = theme_config.copy()
             
             # 保存主题文件
-            with open(self.themes_file, 'w', encoding='utf-8') as f:
-                json.dump(themes_data, f, indent=4, ensure_ascii=False)
+            write_json(self.themes_file, themes_data, indent=4)
             
             # 清除缓存，强制下次重新加载
             self._themes_cache = None
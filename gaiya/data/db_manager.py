@@ -1,14 +1,26 @@
 import sqlite3
 import os
+import copy
+import time
+import threading
 from datetime import datetime, timedelta
 from pathlib import Path
 import logging
 import uuid
 
+from gaiya.data.sqlite_maintenance import DEFAULT_VACUUM_FREE_RATIO, delete_in_chunks, optimize_database
+
 # Setup logging
 logger = logging.getLogger("gaiya.data.db")
 
 class DatabaseManager:
+    # Report query results are reused for this many seconds (or until the next write)
+    REPORT_CACHE_TTL = 30
+    REPORT_CACHE_MAX_ENTRIES = 64
+
+    # PRAGMA user_version after activity_buckets has been backfilled from history
+    BUCKETS_SCHEMA_VERSION = 1
+
     def __init__(self, db_path=None):
         if db_path is None:
             # Use Windows AppData directory for database
@@ -19,6 +31,12 @@ class DatabaseManager:
 
         self.db_path = str(db_path)
         logger.info(f"Database path: {self.db_path}")
+
+        # Report cache: {(query, start, end, data_version): (expires_at, result)}
+        self._data_version = 0
+        self._report_cache = {}
+        self._cache_lock = threading.Lock()
+
         self._init_db()
 
     def _get_connection(self):
@@ -28,6 +46,50 @@ class DatabaseManager:
             logger.error(f"Failed to open database at {self.db_path}: {e}")
             raise
 
+    @property
+    def data_version(self) -> int:
+        """Incremented on every write; report results are cached per version."""
+        return self._data_version
+
+    def _bump_data_version(self):
+        with self._cache_lock:
+            self._data_version += 1
+            self._report_cache.clear()
+
+    def _cached_report(self, query: str, start_time, end_time, compute):
+        """Serve a range report from the cache, computing it at most once per data version."""
+        now = time.monotonic()
+        with self._cache_lock:
+            key = (query, start_time, end_time, self._data_version)
+            entry = self._report_cache.get(key)
+            if entry and entry[0] > now:
+                return copy.deepcopy(entry[1])
+
+        result = compute(start_time, end_time)
+
+        with self._cache_lock:
+            # Only cache if no write happened while computing
+            if key[3] == self._data_version:
+                if len(self._report_cache) >= self.REPORT_CACHE_MAX_ENTRIES:
+                    self._report_cache = {
+                        k: v for k, v in self._report_cache.items() if v[0] > now
+                    }
+                self._report_cache[key] = (now + self.REPORT_CACHE_TTL, result)
+        return copy.deepcopy(result)
+
+    @staticmethod
+    def today_range():
+        """(start, end) of today, the range used by all "today" reports."""
+        start_of_day = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        return start_of_day, start_of_day + timedelta(days=1)
+
+    @staticmethod
+    def _range_clause(column: str, start_time, end_time):
+        """WHERE fragment and params for [start_time, end_time); end_time=None is unbounded."""
+        if end_time is None:
+            return f"{column} >= ?", (start_time,)
+        return f"{column} >= ? AND {column} < ?", (start_time, end_time)
+
     def _init_db(self):
         """Initialize the database tables."""
         conn = self._get_connection()
@@ -114,6 +176,22 @@ class DatabaseManager:
             ON task_completions(user_confirmed)
         ''')
 
+        # Activity Buckets Table (seconds per hour/app/category, materialized from activity_sessions)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS activity_buckets (
+                bucket_start TEXT NOT NULL,
+                process_name TEXT NOT NULL,
+                category TEXT NOT NULL,
+                seconds REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (bucket_start, process_name, category)
+            )
+        ''')
+
+        cursor.execute('PRAGMA user_version')
+        if cursor.fetchone()[0] < self.BUCKETS_SCHEMA_VERSION:
+            self._backfill_activity_buckets(cursor)
+            cursor.execute(f'PRAGMA user_version = {self.BUCKETS_SCHEMA_VERSION}')
+
         conn.commit()
         conn.close()
 
@@ -192,6 +270,7 @@ class DatabaseManager:
         ''', (session_id, time_block_id, start_time, "RUNNING"))
         conn.commit()
         conn.close()
+        self._bump_data_version()
         return session_id
 
     def complete_focus_session(self, session_id: str):
@@ -225,6 +304,7 @@ class DatabaseManager:
             ''', (end_time, status, duration, session_id))
             conn.commit()
         conn.close()
+        self._bump_data_version()
 
     def get_active_focus_sessions(self):
         """Get all currently running focus sessions.
@@ -376,8 +456,10 @@ class DatabaseManager:
             INSERT INTO activity_sessions (id, process_name, window_title, start_time, end_time, duration_seconds, category)
             VALUES (?, ?, ?, ?, ?, ?, ?)
         ''', (session_id, process_name, window_title, start_time, end_time, duration_seconds, category))
+        self._add_to_buckets(cursor, process_name, category, start_time, end_time, duration_seconds)
         conn.commit()
         conn.close()
+        self._bump_data_version()
 
     def get_app_category(self, process_name: str) -> str:
         """Get category for an app, return 'UNKNOWN' if not found."""
@@ -408,69 +490,246 @@ class DatabaseManager:
         ''', (process_name, category, is_ignored, category, is_ignored))
         conn.commit()
         conn.close()
+        self._bump_data_version()
 
     def clear_activity_data(self):
         """Delete all recorded activity sessions."""
         conn = self._get_connection()
         cursor = conn.cursor()
         cursor.execute('DELETE FROM activity_sessions')
+        cursor.execute('DELETE FROM activity_buckets')
         conn.commit()
         conn.close()
+        self._bump_data_version()
 
     def cleanup_old_data(self, days: int = 90):
-        """Remove focus/activity sessions older than N days."""
+        """Remove focus/activity sessions older than N days (in chunks).
+
+        Returns:
+            int: number of deleted rows
+        """
         cutoff = datetime.now() - timedelta(days=days)
         conn = self._get_connection()
+        try:
+            deleted = delete_in_chunks(conn, 'focus_sessions', 'start_time < ?', (cutoff,))
+            deleted += delete_in_chunks(conn, 'activity_sessions', 'start_time < ?', (cutoff,))
+            deleted += delete_in_chunks(conn, 'activity_buckets', 'bucket_start < ?', (self._bucket_key(cutoff),))
+        finally:
+            conn.close()
+        self._bump_data_version()
+        return deleted
+
+    def optimize(self, vacuum_free_ratio: float = DEFAULT_VACUUM_FREE_RATIO) -> dict:
+        """WAL checkpoint + ANALYZE, and VACUUM once enough pages are free (see sqlite_maintenance)."""
+        conn = self._get_connection()
+        try:
+            return optimize_database(conn, vacuum_free_ratio)
+        finally:
+            conn.close()
+
+    # --- Activity Buckets ---
+    #
+    # activity_buckets holds seconds per (hour, app, category). Sessions are
+    # split across hour boundaries when saved, so hourly and hour-aligned range
+    # reports aggregate a few rows per hour instead of scanning every session.
+
+    @staticmethod
+    def _as_datetime(value):
+        """datetime / ISO string / epoch seconds -> datetime (None if unparseable)."""
+        if isinstance(value, datetime):
+            return value
+        if isinstance(value, (int, float)):
+            return datetime.fromtimestamp(value)
+        try:
+            return datetime.fromisoformat(str(value))
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _bucket_key(moment: datetime) -> str:
+        return moment.strftime('%Y-%m-%d %H:00:00')
+
+    @classmethod
+    def _split_into_buckets(cls, start_time, end_time, duration_seconds):
+        """Split a session into [(bucket_start, seconds)] at hour boundaries.
+
+        duration_seconds is spread over [start_time, end_time) in proportion to
+        the time spent in each hour; sessions without a usable end go entirely
+        to the start hour.
+        """
+        start = cls._as_datetime(start_time)
+        end = cls._as_datetime(end_time)
+        duration = float(duration_seconds or 0)
+        if start is None or duration <= 0:
+            return []
+        if end is None or end <= start:
+            return [(cls._bucket_key(start), duration)]
+
+        scale = duration / (end - start).total_seconds()
+        buckets = []
+        cursor = start
+        while cursor < end:
+            boundary = cursor.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+            stop = min(boundary, end)
+            buckets.append((cls._bucket_key(cursor), (stop - cursor).total_seconds() * scale))
+            cursor = stop
+        return buckets
+
+    def _add_to_buckets(self, cursor, process_name, category, start_time, end_time, duration_seconds):
+        cursor.executemany('''
+            INSERT INTO activity_buckets (bucket_start, process_name, category, seconds)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(bucket_start, process_name, category) DO UPDATE SET seconds = seconds + excluded.seconds
+        ''', [
+            (bucket, process_name or '', category or 'UNKNOWN', seconds)
+            for bucket, seconds in self._split_into_buckets(start_time, end_time, duration_seconds)
+        ])
+
+    def _backfill_activity_buckets(self, cursor):
+        """Rebuild activity_buckets from all recorded sessions (runs once per schema version)."""
+        cursor.execute('DELETE FROM activity_buckets')
+        cursor.execute('''
+            SELECT process_name, category, start_time, end_time, duration_seconds
+            FROM activity_sessions
+        ''')
+        rows = cursor.fetchall()
+        for process_name, category, start_time, end_time, duration_seconds in rows:
+            self._add_to_buckets(cursor, process_name, category, start_time, end_time, duration_seconds)
+        if rows:
+            logger.info(f"Backfilled activity buckets from {len(rows)} sessions")
+
+    def _bucket_range_clause(self, start_time, end_time):
+        """Bucket WHERE fragment for an hour-aligned range, or None if the range splits an hour."""
+        bounds = [self._as_datetime(start_time)]
+        if end_time is not None:
+            bounds.append(self._as_datetime(end_time))
+        if any(b is None or b.minute or b.second or b.microsecond for b in bounds):
+            return None
+        keys = [self._bucket_key(b) for b in bounds] + [None]
+        return self._range_clause('a.bucket_start', keys[0], keys[1])
+
+    def get_hourly_activity(self, start_time, end_time=None):
+        """Activity seconds by hour of day in [start_time, end_time), summed over all days.
+
+        Returns:
+            dict: {"total": [24 x seconds], "categories": {category: [24 x seconds]}}
+        """
+        return self._cached_report('hourly_activity', start_time, end_time, self._query_hourly_activity)
+
+    def _query_hourly_activity(self, start_time, end_time):
+        rows = self._query_bucket_rows(
+            "CAST(substr(a.bucket_start, 12, 2) AS INTEGER), a.category", start_time, end_time
+        )
+        total = [0] * 24
+        categories = {}
+        for hour, category, seconds in rows:
+            total[hour] += seconds
+            categories.setdefault(category, [0] * 24)[hour] += seconds
+        return {"total": total, "categories": categories}
+
+    def get_activity_heatmap(self, start_time, end_time=None):
+        """Activity seconds per date and hour in [start_time, end_time).
+
+        Returns:
+            dict: {"YYYY-MM-DD": [24 x seconds]} for dates with activity
+        """
+        return self._cached_report('activity_heatmap', start_time, end_time, self._query_activity_heatmap)
+
+    def _query_activity_heatmap(self, start_time, end_time):
+        rows = self._query_bucket_rows(
+            "substr(a.bucket_start, 1, 10), CAST(substr(a.bucket_start, 12, 2) AS INTEGER)",
+            start_time, end_time
+        )
+        heatmap = {}
+        for day, hour, seconds in rows:
+            heatmap.setdefault(day, [0] * 24)[hour] = seconds
+        return heatmap
+
+    def _query_bucket_rows(self, group_by: str, start_time, end_time):
+        """(*group_by, seconds) rows over the buckets overlapping the range, excluding ignored apps."""
+        # Unaligned bounds widen to the whole hours they fall in
+        end = None if end_time is None else self._as_datetime(end_time).strftime('%Y-%m-%d %H:%M:%S')
+        where, params = self._range_clause('a.bucket_start', self._bucket_key(self._as_datetime(start_time)), end)
+        conn = self._get_connection()
         cursor = conn.cursor()
-        cursor.execute('DELETE FROM focus_sessions WHERE start_time < ?', (cutoff,))
-        cursor.execute('DELETE FROM activity_sessions WHERE start_time < ?', (cutoff,))
-        conn.commit()
+        cursor.execute(f'''
+            SELECT {group_by}, CAST(round(sum(a.seconds)) AS INTEGER)
+            FROM activity_buckets a
+            LEFT JOIN app_categories c ON a.process_name = c.process_name
+            WHERE {where}
+            AND (c.is_ignored IS NULL OR c.is_ignored = 0)
+            GROUP BY {group_by}
+        ''', params)
+        rows = cursor.fetchall()
         conn.close()
+        return rows
 
     # --- Reporting Methods ---
+    #
+    # One parameterized range query per dataset. Results are cached per
+    # (query, range, data version), so windows showing the same range share them.
 
-    def get_today_focus_stats(self):
-        """Get focus sessions for today."""
-        start_of_day = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    def get_focus_stats(self, start_time, end_time=None):
+        """Completed focus sessions in [start_time, end_time), grouped by time block.
+
+        Returns:
+            dict: {"by_block": {block_id: {"duration", "count"}}, "total_minutes"}
+        """
+        return self._cached_report('focus_stats', start_time, end_time, self._query_focus_stats)
+
+    def _query_focus_stats(self, start_time, end_time):
+        where, params = self._range_clause('start_time', start_time, end_time)
         conn = self._get_connection()
         cursor = conn.cursor()
 
-        cursor.execute('''
+        cursor.execute(f'''
             SELECT time_block_id, sum(duration_minutes), count(*)
             FROM focus_sessions
-            WHERE start_time >= ? AND status = 'COMPLETED'
+            WHERE {where} AND status = 'COMPLETED'
             GROUP BY time_block_id
-        ''', (start_of_day,))
+        ''', params)
 
         stats = {} # {block_id: (duration, count)}
+        total = 0
         for row in cursor.fetchall():
             stats[row[0]] = {"duration": row[1], "count": row[2]}
-
-        # Get total
-        cursor.execute('''
-            SELECT sum(duration_minutes) FROM focus_sessions
-            WHERE start_time >= ? AND status = 'COMPLETED'
-        ''', (start_of_day,))
-        total = cursor.fetchone()[0] or 0
+            total += row[1] or 0
 
         conn.close()
         return {"by_block": stats, "total_minutes": total}
 
-    def get_today_activity_stats(self):
-        """Get aggregated stats for today."""
-        start_of_day = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    def get_activity_stats(self, start_time, end_time=None):
+        """Activity totals by category and top apps in [start_time, end_time).
+
+        Returns:
+            dict: {"total_seconds", "categories": {category: seconds}, "top_apps": [...]}
+        """
+        return self._cached_report('activity_stats', start_time, end_time, self._query_activity_stats)
+
+    def _query_activity_stats(self, start_time, end_time):
+        # Hour-aligned ranges (days, weeks...) aggregate the hourly buckets;
+        # other ranges fall back to sessions grouped by start time
+        bucket_clause = self._bucket_range_clause(start_time, end_time)
+        if bucket_clause is not None:
+            where, params = bucket_clause
+            source, seconds = 'activity_buckets', 'CAST(round(sum(a.seconds)) AS INTEGER)'
+        else:
+            where, params = self._range_clause('a.start_time', start_time, end_time)
+            source, seconds = 'activity_sessions', 'sum(a.duration_seconds)'
         conn = self._get_connection()
         cursor = conn.cursor()
 
-        # Total duration by category (exclude ignored apps)
-        cursor.execute('''
-            SELECT a.category, sum(a.duration_seconds)
-            FROM activity_sessions a
+        # Per (app, category) totals; category totals and top apps are derived from them (exclude ignored apps)
+        cursor.execute(f'''
+            SELECT a.process_name, a.category, {seconds}
+            FROM {source} a
             LEFT JOIN app_categories c ON a.process_name = c.process_name
-            WHERE a.start_time >= ?
+            WHERE {where}
             AND (c.is_ignored IS NULL OR c.is_ignored = 0)
-            GROUP BY a.category
-        ''', (start_of_day,))
+            GROUP BY a.process_name, a.category
+        ''', params)
+        rows = cursor.fetchall()
+        conn.close()
 
         category_totals = {
             "PRODUCTIVE": 0,
@@ -479,37 +738,26 @@ class DatabaseManager:
             "UNKNOWN": 0
         }
         total_seconds = 0
+        apps = {}  # {process_name: [total_secs, category, category_secs]}
 
-        for row in cursor.fetchall():
-            cat = row[0]
-            secs = row[1]
+        for name, cat, secs in rows:
+            secs = secs or 0
             if cat in category_totals:
-                category_totals[cat] = secs
+                category_totals[cat] += secs
             else:
                 category_totals["UNKNOWN"] += secs # Fallback
             total_seconds += secs
 
-        # Top Apps (exclude ignored apps)
-        cursor.execute('''
-            SELECT a.process_name, a.category, sum(a.duration_seconds) as total_secs
-            FROM activity_sessions a
-            LEFT JOIN app_categories c ON a.process_name = c.process_name
-            WHERE a.start_time >= ?
-            AND (c.is_ignored IS NULL OR c.is_ignored = 0)
-            GROUP BY a.process_name
-            ORDER BY total_secs DESC
-            LIMIT 10
-        ''', (start_of_day,))
-
-        top_apps = []
-        for row in cursor.fetchall():
-            top_apps.append({
-                "name": row[0],
-                "category": row[1],
-                "duration": row[2]
-            })
+            app = apps.setdefault(name, [0, cat, -1])
+            app[0] += secs
+            if secs > app[2]:
+                app[1], app[2] = cat, secs
 
-        conn.close()
+        top = sorted(apps.items(), key=lambda item: item[1][0], reverse=True)[:10]
+        top_apps = [
+            {"name": name, "category": cat, "duration": total}
+            for name, (total, cat, _) in top
+        ]
 
         return {
             "total_seconds": total_seconds,
@@ -517,8 +765,8 @@ class DatabaseManager:
             "top_apps": top_apps
         }
 
-    def get_today_activity_records(self):
-        """获取今日所有活动记录(用于专注时长计算)
+    def get_activity_records(self, start_time, end_time=None):
+        """活动记录(用于专注时长计算),按开始时间排序
 
         Returns:
             List[Dict]: 活动记录列表,每条记录包含:
@@ -527,12 +775,14 @@ class DatabaseManager:
                 - category: 应用分类
                 - duration: 持续时长(秒)
         """
-        start_of_day = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        return self._cached_report('activity_records', start_time, end_time, self._query_activity_records)
+
+    def _query_activity_records(self, start_time, end_time):
+        where, params = self._range_clause('a.start_time', start_time, end_time)
         conn = self._get_connection()
         cursor = conn.cursor()
 
-        # 获取今日所有活动会话,按时间排序
-        cursor.execute('''
+        cursor.execute(f'''
             SELECT
                 a.process_name,
                 a.start_time,
@@ -540,23 +790,23 @@ class DatabaseManager:
                 a.duration_seconds
             FROM activity_sessions a
             LEFT JOIN app_categories c ON a.process_name = c.process_name
-            WHERE a.start_time >= ?
+            WHERE {where}
             AND (c.is_ignored IS NULL OR c.is_ignored = 0)
             ORDER BY a.start_time ASC
-        ''', (start_of_day,))
+        ''', params)
 
         records = []
         for row in cursor.fetchall():
             # 转换时间字符串为timestamp
             start_time_str = row[1]
             if isinstance(start_time_str, str):
-                start_time = datetime.fromisoformat(start_time_str).timestamp()
+                start_ts = datetime.fromisoformat(start_time_str).timestamp()
             else:
-                start_time = start_time_str
+                start_ts = start_time_str
 
             records.append({
                 'app_name': row[0],
-                'timestamp': start_time,
+                'timestamp': start_ts,
                 'category': row[2] or 'UNKNOWN',
                 'duration': row[3] or 0
             })
@@ -564,6 +814,18 @@ class DatabaseManager:
         conn.close()
         return records
 
+    def get_today_focus_stats(self):
+        """Get focus sessions for today."""
+        return self.get_focus_stats(*self.today_range())
+
+    def get_today_activity_stats(self):
+        """Get aggregated stats for today."""
+        return self.get_activity_stats(*self.today_range())
+
+    def get_today_activity_records(self):
+        """获取今日所有活动记录(用于专注时长计算)"""
+        return self.get_activity_records(*self.today_range())
+
     # --- Task Completion Methods ---
 
     def create_task_completion(self, date, time_block_id, task_data, inference_result):
@@ -599,6 +861,7 @@ class DatabaseManager:
 
         conn.commit()
         conn.close()
+        self._bump_data_version()
 
         return completion_id
 
@@ -728,6 +991,7 @@ class DatabaseManager:
         cursor.execute(query, values)
         conn.commit()
         conn.close()
+        self._bump_data_version()
 
     def confirm_task_completion(self, completion_id, new_completion, note=''):
         """User confirms task completion with optional correction."""
@@ -760,11 +1024,11 @@ class DatabaseManager:
         cutoff_date = cutoff.date()
 
         conn = self._get_connection()
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM task_completions WHERE date < ?', (cutoff_date,))
-        deleted_count = cursor.rowcount
-        conn.commit()
-        conn.close()
+        try:
+            deleted_count = delete_in_chunks(conn, 'task_completions', 'date < ?', (cutoff_date,))
+        finally:
+            conn.close()
+        self._bump_data_version()
 
         return deleted_count
 
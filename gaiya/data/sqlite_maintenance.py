@@ -0,0 +1,61 @@
+"""
+SQLite maintenance helpers shared by the local databases
+(user_data.db via DatabaseManager, activity_log.db via ActivityCollector).
+
+Retention deletes run in small committed chunks so the write lock is released
+between chunks and foreground writers (activity sampling, session saves) never
+wait on one long transaction.
+"""
+
+import sqlite3
+import threading
+from contextlib import nullcontext
+from typing import Optional, Sequence
+
+DEFAULT_CHUNK_SIZE = 500
+
+# VACUUM rewrites the whole file, so it only runs once this share of pages is free
+DEFAULT_VACUUM_FREE_RATIO = 0.2
+
+
+def delete_in_chunks(conn: sqlite3.Connection, table: str, where: str, params: Sequence = (),
+                     chunk_size: int = DEFAULT_CHUNK_SIZE,
+                     lock: Optional[threading.Lock] = None) -> int:
+    """Delete rows of ``table`` matching ``where``, committing every ``chunk_size`` rows.
+
+    Args:
+        lock: Held per chunk (not for the whole delete) when the connection is shared.
+
+    Returns:
+        Number of deleted rows.
+    """
+    deleted = 0
+    while True:
+        with lock or nullcontext():
+            cursor = conn.execute(
+                f'DELETE FROM {table} WHERE rowid IN (SELECT rowid FROM {table} WHERE {where} LIMIT ?)',
+                (*params, chunk_size)
+            )
+            conn.commit()
+        deleted += cursor.rowcount
+        if cursor.rowcount < chunk_size:
+            return deleted
+
+
+def optimize_database(conn: sqlite3.Connection,
+                      vacuum_free_ratio: float = DEFAULT_VACUUM_FREE_RATIO) -> dict:
+    """Checkpoint the WAL, refresh planner statistics and VACUUM when enough pages are free.
+
+    Returns:
+        dict: {"pages", "free_pages", "vacuumed"} measured before VACUUM.
+    """
+    conn.commit()
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    conn.execute('ANALYZE')
+    pages = conn.execute('PRAGMA page_count').fetchone()[0]
+    free_pages = conn.execute('PRAGMA freelist_count').fetchone()[0]
+
+    vacuumed = bool(pages) and free_pages / pages >= vacuum_free_ratio
+    if vacuumed:
+        conn.execute('VACUUM')
+    return {"pages": pages, "free_pages": free_pages, "vacuumed": vacuumed}
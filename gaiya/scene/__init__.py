@@ -34,6 +34,11 @@ from .scene_manager import (
     SceneManager,
 )
 
+from .thumbnail_service import (
+    ThumbnailCache,
+    ThumbnailService,
+)
+
 __all__ = [
     # Models
     'EventTriggerType',
@@ -55,4 +60,7 @@ __all__ = [
     'SceneEventManager',
     # Scene Manager
     'SceneManager',
+    # Thumbnail Service
+    'ThumbnailCache',
+    'ThumbnailService',
 ]
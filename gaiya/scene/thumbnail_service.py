@@ -0,0 +1,224 @@
+"""
+素材缩略图服务 - ThumbnailService
+
+在线程池中解码并缩放素材图片，缩略图以内容哈希为键持久化到磁盘缓存，
+避免场景编辑器在UI线程上解码完整图片。
+"""
+
+import hashlib
+import logging
+import os
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from PySide6.QtCore import QObject, QRunnable, QSize, Qt, QThreadPool, Signal
+from PySide6.QtGui import QImage, QImageReader
+
+
+class ThumbnailCache:
+    """缩略图磁盘缓存
+
+    缓存键 = 文件内容SHA1 + 缩略图尺寸，文件改名或移动后仍可命中，
+    内容变化后自动失效。所有方法均可在工作线程中调用(QImage是线程安全的)。
+    """
+
+    def __init__(self, cache_dir: Path):
+        """
+        初始化缩略图缓存
+
+        Args:
+            cache_dir: 缓存目录(如 <app_dir>/cache/thumbnails)
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.logger = logging.getLogger(__name__)
+
+        # (路径, mtime, 大小) -> 内容哈希，避免重复读取未变化的文件
+        self._hash_memo: Dict[Tuple[str, int, int], str] = {}
+
+    def content_key(self, path: str) -> Optional[str]:
+        """计算文件内容哈希(按mtime/大小记忆化)"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+
+        memo_key = (path, stat.st_mtime_ns, stat.st_size)
+        digest = self._hash_memo.get(memo_key)
+        if digest is None:
+            sha1 = hashlib.sha1()
+            try:
+                with open(path, 'rb') as f:
+                    for chunk in iter(lambda: f.read(1 << 16), b''):
+                        sha1.update(chunk)
+            except OSError:
+                return None
+            digest = sha1.hexdigest()
+            self._hash_memo[memo_key] = digest
+        return digest
+
+    def cache_path(self, key: str, size: int) -> Path:
+        """获取缩略图缓存文件路径"""
+        return self.cache_dir / f"{key}_{size}.png"
+
+    def load_or_create(self, path: str, size: int) -> QImage:
+        """读取缓存的缩略图，未命中时解码缩放并写入缓存
+
+        Args:
+            path: 素材图片路径
+            size: 缩略图最大边长(像素)
+
+        Returns:
+            缩略图QImage，图片无法解码时返回空QImage
+        """
+        key = self.content_key(path)
+        if key is None:
+            return QImage()
+
+        cached_file = self.cache_path(key, size)
+        if cached_file.exists():
+            image = QImage(str(cached_file))
+            if not image.isNull():
+                return image
+
+        image = self._decode_scaled(path, size)
+        if image.isNull():
+            return image
+
+        # 先写临时文件再替换，避免并发任务读到半写入的缩略图
+        temp_file = cached_file.with_name(f"{cached_file.stem}.{os.getpid()}.{id(image)}.tmp")
+        try:
+            if image.save(str(temp_file), "PNG"):
+                os.replace(temp_file, cached_file)
+        except OSError as e:
+            self.logger.warning(f"[缩略图] 写入缓存失败 {cached_file}: {e}")
+            temp_file.unlink(missing_ok=True)
+
+        return image
+
+    @staticmethod
+    def _decode_scaled(path: str, size: int) -> QImage:
+        """按目标尺寸解码图片(解码器支持时直接缩放解码，不分配原图内存)"""
+        reader = QImageReader(path)
+        reader.setAutoTransform(True)
+        source_size = reader.size()
+        if source_size.isValid() and (source_size.width() > size or source_size.height() > size):
+            reader.setScaledSize(source_size.scaled(size, size, Qt.KeepAspectRatio))
+
+        image = reader.read()
+        if image.isNull():
+            return image
+
+        # 部分格式忽略setScaledSize，这里兜底缩放
+        if image.width() > size or image.height() > size:
+            image = image.scaled(QSize(size, size), Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        return image
+
+    def clear(self) -> int:
+        """清空缓存目录，返回删除的文件数"""
+        removed = 0
+        for cached_file in self.cache_dir.glob("*.png"):
+            try:
+                cached_file.unlink()
+                removed += 1
+            except OSError:
+                pass
+        self._hash_memo.clear()
+        return removed
+
+
+class _ThumbnailSignals(QObject):
+    """QRunnable不能直接发信号，通过此对象转发到UI线程"""
+
+    done = Signal(str, QImage)
+
+
+class _ThumbnailTask(QRunnable):
+    """单个缩略图生成任务"""
+
+    def __init__(self, cache: ThumbnailCache, path: str, size: int, signals: _ThumbnailSignals):
+        super().__init__()
+        self.cache = cache
+        self.path = path
+        self.size = size
+        self.signals = signals
+
+    def run(self) -> None:
+        try:
+            image = self.cache.load_or_create(self.path, self.size)
+        except Exception as e:
+            logging.getLogger(__name__).error(f"[缩略图] 生成失败 {self.path}: {e}")
+            image = QImage()
+        self.signals.done.emit(self.path, image)
+
+
+class ThumbnailService(QObject):
+    """素材缩略图服务
+
+    用法:
+        service = ThumbnailService(cache_dir, size=48)
+        service.thumbnail_ready.connect(on_ready)    # (path, QImage)
+        service.thumbnail_failed.connect(on_failed)  # (path)
+        service.request(file_path)
+    """
+
+    # 缩略图就绪(文件路径, 缩略图)，在UI线程中发出
+    thumbnail_ready = Signal(str, QImage)
+
+    # 图片无法解码(文件路径)
+    thumbnail_failed = Signal(str)
+
+    def __init__(self, cache_dir: Path, size: int = 48, max_threads: Optional[int] = None, parent=None):
+        """
+        初始化缩略图服务
+
+        Args:
+            cache_dir: 磁盘缓存目录
+            size: 缩略图最大边长(像素)
+            max_threads: 工作线程数，默认为CPU核数
+            parent: 父对象
+        """
+        super().__init__(parent)
+        self.size = size
+        self.cache = ThumbnailCache(cache_dir)
+        self.logger = logging.getLogger(__name__)
+
+        # 独立线程池，避免占满全局线程池
+        self.pool = QThreadPool(self)
+        if max_threads:
+            self.pool.setMaxThreadCount(max_threads)
+
+        self._signals = _ThumbnailSignals()
+        self._signals.done.connect(self._on_task_done, Qt.QueuedConnection)
+
+        # 正在处理中的路径，同一素材只排队一次
+        self._pending: set = set()
+
+    def request(self, path: str) -> None:
+        """异步请求一个缩略图(立即返回)"""
+        if path in self._pending:
+            return
+        self._pending.add(path)
+        self.pool.start(_ThumbnailTask(self.cache, path, self.size, self._signals))
+
+    def pending_count(self) -> int:
+        """获取尚未完成的请求数"""
+        return len(self._pending)
+
+    def wait_for_done(self, msecs: int = -1) -> bool:
+        """等待所有任务完成(用于关闭窗口和测试)"""
+        return self.pool.waitForDone(msecs)
+
+    def shutdown(self) -> None:
+        """取消排队中的任务并等待运行中的任务结束"""
+        self.pool.clear()
+        self.pool.waitForDone()
+        self._pending.clear()
+
+    def _on_task_done(self, path: str, image: QImage) -> None:
+        self._pending.discard(path)
+        if image.isNull():
+            self.logger.warning(f"[缩略图] 无法解码素材: {path}")
+            self.thumbnail_failed.emit(path)
+        else:
+            self.thumbnail_ready.emit(path, image)
@@ -1,11 +1,11 @@
 import sys
 import time
-import ctypes
-from ctypes import wintypes
+import threading
 from datetime import datetime
 import logging
 import os
-from PySide6.QtCore import QThread, Signal, QMutex, QWaitCondition
+from typing import Optional
+from PySide6.QtCore import QObject, Signal
 
 # Import database manager
 # Assuming the project structure allows this import, otherwise we might need relative imports
@@ -16,133 +16,81 @@ except ImportError:
     sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
     from gaiya.data.db_manager import db
 
-logger = logging.getLogger("gaiya.services.tracker")
-
-# --- Win32 API Definitions via ctypes ---
-
-user32 = ctypes.windll.user32
-kernel32 = ctypes.windll.kernel32
-psapi = ctypes.windll.psapi
-
-# Constants
-PROCESS_QUERY_INFORMATION = 0x0400
-PROCESS_VM_READ = 0x0010
-MAX_PATH = 260
-
-# Types
-LPSTR = ctypes.c_char_p
-LPWSTR = ctypes.c_wchar_p
-DWORD = ctypes.c_ulong
-HANDLE = ctypes.c_void_p
-
-# Function signatures
-user32.GetForegroundWindow.restype = HANDLE
-user32.GetWindowThreadProcessId.argtypes = [HANDLE, ctypes.POINTER(DWORD)]
-user32.GetWindowThreadProcessId.restype = DWORD
-
-user32.GetWindowTextW.argtypes = [HANDLE, LPWSTR, ctypes.c_int]
-user32.GetWindowTextW.restype = ctypes.c_int
+from gaiya.core.activity_sampler import ActivitySampler, ActivitySnapshot, get_activity_sampler
 
-kernel32.OpenProcess.argtypes = [DWORD, ctypes.c_int, DWORD]
-kernel32.OpenProcess.restype = HANDLE
-
-kernel32.CloseHandle.argtypes = [HANDLE]
-kernel32.CloseHandle.restype = ctypes.c_int
+logger = logging.getLogger("gaiya.services.tracker")
 
-psapi.GetModuleFileNameExW.argtypes = [HANDLE, HANDLE, LPWSTR, DWORD]
-psapi.GetModuleFileNameExW.restype = DWORD
 
-def get_active_window_info():
-    """
-    Retrieves the process name and window title of the currently active foreground window.
-    Returns: (process_name, window_title) or (None, None) on failure.
+class ActivityTracker(QObject):
     """
-    hwnd = user32.GetForegroundWindow()
-    if not hwnd:
-        return None, None
-
-    # Get Process ID
-    pid = DWORD()
-    user32.GetWindowThreadProcessId(hwnd, ctypes.byref(pid))
-    
-    # Get Window Title
-    title_buffer = ctypes.create_unicode_buffer(MAX_PATH)
-    user32.GetWindowTextW(hwnd, title_buffer, MAX_PATH)
-    window_title = title_buffer.value
-
-    # Get Process Name
-    process_handle = kernel32.OpenProcess(PROCESS_QUERY_INFORMATION | PROCESS_VM_READ, False, pid)
-    process_name = "Unknown"
-    
-    if process_handle:
-        img_path_buffer = ctypes.create_unicode_buffer(MAX_PATH)
-        try:
-            length = psapi.GetModuleFileNameExW(process_handle, None, img_path_buffer, MAX_PATH)
-            if length > 0:
-                full_path = img_path_buffer.value
-                process_name = os.path.basename(full_path)
-        finally:
-            kernel32.CloseHandle(process_handle)
-    
-    return process_name, window_title
-
-class ActivityTracker(QThread):
-    """
-    Background thread that polls the active window and aggregates usage into sessions.
+    Aggregates foreground-window samples into usage sessions.
+
+    Samples come from the shared ActivitySampler bus (the same samples the
+    behavior danmaku system consumes), so the OS is queried once per tick no
+    matter how many consumers are active. Callbacks run on the sampler thread.
     """
     session_ended = Signal(str, str, int) # process_name, title, duration
-    
+
     def __init__(self, parent=None, polling_interval=5, min_session_duration=5,
-                 flush_interval=30):
+                 flush_interval=30, sampler: Optional[ActivitySampler] = None):
         super().__init__(parent)
         self.is_running = False
         self.polling_interval = max(1, int(polling_interval))  # seconds
         self.min_session_duration = max(1, int(min_session_duration))  # seconds
         self.flush_interval = max(10, int(flush_interval))  # seconds, minimum 10s
+        self.sampler = sampler or get_activity_sampler()
+        self._unsubscribe = None
 
         # Current tracking state
         self.current_process = None
         self.current_title = None
         self.current_start_time = None
         self.last_flush_time = None  # For periodic checkpoint
+        self.last_sample_time = None
 
-        # Thread safety
-        self.mutex = QMutex()
-        self.condition = QWaitCondition()
+        # Sampler thread vs. stop() from the UI thread
+        self._lock = threading.Lock()
 
-    def run(self):
-        """Main loop."""
+    def start(self):
+        """Subscribe to the sampling bus."""
+        if self.is_running:
+            return
         self.is_running = True
+        self._unsubscribe = self.sampler.subscribe(self.on_snapshot, interval=self.polling_interval)
         logger.info("Activity Tracker started.")
-        
-        while self.is_running:
-            try:
-                self._check_activity()
-            except Exception as e:
-                logger.error(f"Error in activity tracker: {e}")
-            
-            # Sleep for N seconds (interruptible)
-            self.mutex.lock()
-            self.condition.wait(self.mutex, self.polling_interval * 1000)
-            self.mutex.unlock()
-            
-        self._flush_current_session()
-        logger.info("Activity Tracker stopped.")
 
     def stop(self):
-        """Stop the tracker safely."""
+        """Unsubscribe and save the current session."""
+        if not self.is_running:
+            return
         self.is_running = False
-        self.condition.wakeAll()
-        self.wait()
+        if self._unsubscribe:
+            self._unsubscribe()
+            self._unsubscribe = None
+        with self._lock:
+            self._flush_current_session()
+        logger.info("Activity Tracker stopped.")
 
-    def _check_activity(self):
-        """Polls current window and handles session logic."""
-        process_name, window_title = get_active_window_info()
+    def isRunning(self) -> bool:
+        return self.is_running
+
+    def on_snapshot(self, snapshot: ActivitySnapshot):
+        """Sampler callback."""
+        try:
+            with self._lock:
+                self._check_activity(snapshot)
+        except Exception as e:
+            logger.error(f"Error in activity tracker: {e}")
+
+    def _check_activity(self, snapshot: ActivitySnapshot):
+        """Handles session logic for one sample."""
+        process_name, window_title = snapshot.app, snapshot.window_title
 
         if not process_name:
             return
 
-        now = datetime.now()
+        now = datetime.fromtimestamp(snapshot.timestamp)
+        self.last_sample_time = now
 
         # If this is the very first check
         if self.current_process is None:
@@ -166,7 +114,7 @@ class ActivityTracker(QThread):
 
         if has_changed:
             # 1. End current session
-            self._flush_current_session()
+            self._flush_current_session(now)
 
             # 2. Start new session
             self.current_process = process_name
@@ -177,12 +125,12 @@ class ActivityTracker(QThread):
             # No change - check if periodic checkpoint is needed
             self._check_periodic_flush(now)
 
-    def _flush_current_session(self):
+    def _flush_current_session(self, end_time: Optional[datetime] = None):
         """Saves the current session to DB."""
         if not self.current_process or not self.current_start_time:
             return
 
-        end_time = datetime.now()
+        end_time = end_time or datetime.now()
         duration_seconds = int((end_time - self.current_start_time).total_seconds())
 
         # Ignore very short sessions (noise)
@@ -257,7 +205,7 @@ if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)
     tracker = ActivityTracker()
     tracker.start()
-    
+
     print("Tracker running... Switch windows to test. Press Ctrl+C to stop.")
     try:
         while True:
@@ -0,0 +1,266 @@
+"""
+后台维护调度器
+
+把分散在各模块、原先在启动时同步执行的维护工作集中到一个后台线程:
+1. 跨天切换(统计记录进入新的一天)
+2. 按保留期分批清理旧数据
+3. SQLite 检查点 / ANALYZE / VACUUM
+4. JSON 存储压缩(统计记录、行为模型日志合并为快照)
+
+每个任务按自己的周期执行, 优先在用户空闲时运行(超过最长等待时间后不再等待)。
+运行指标(上次运行时间、耗时、结果、错误)保存在 maintenance_state.json,
+重启后不会重复执行周期内已完成的维护。
+"""
+import json
+import logging
+import platform
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from gaiya.utils.json_store import write_json
+
+logger = logging.getLogger("gaiya.services.maintenance_scheduler")
+
+DEFAULT_CONFIG = {
+    'enabled': True,
+    'startup_delay': 300,      # 启动后等待多少秒才开始维护(不与启动争抢资源)
+    'check_interval': 60,      # 检查到期任务的间隔(秒)
+    'idle_seconds': 120,       # 用户无输入多少秒视为空闲
+    'max_defer': 4 * 3600,     # 到期后最多为等待空闲推迟多少秒
+}
+
+
+def user_idle_seconds() -> Optional[float]:
+    """距用户最后一次键盘/鼠标输入的秒数(仅Windows, 其他平台返回None)"""
+    if platform.system() != 'Windows':
+        return None
+
+    import ctypes
+    from ctypes import wintypes
+
+    class LASTINPUTINFO(ctypes.Structure):
+        _fields_ = [('cbSize', wintypes.UINT), ('dwTime', wintypes.DWORD)]
+
+    info = LASTINPUTINFO()
+    info.cbSize = ctypes.sizeof(LASTINPUTINFO)
+    if not ctypes.windll.user32.GetLastInputInfo(ctypes.byref(info)):
+        return None
+    # GetTickCount 约49.7天回绕, 按32位无符号差值计算
+    elapsed_ms = (ctypes.windll.kernel32.GetTickCount() - info.dwTime) & 0xFFFFFFFF
+    return elapsed_ms / 1000.0
+
+
+@dataclass
+class MaintenanceJob:
+    """
+    维护任务
+
+    Attributes:
+        name: 任务名(也是指标的键)
+        func: 无参回调, 返回值(如删除行数)记入运行指标
+        interval: 执行周期(秒)
+        require_idle: 是否优先等待用户空闲后执行
+        main_thread: 是否交给主线程执行(操作UI线程持有的内存数据时使用)
+        persist: 是否把运行指标写入状态文件(高频的轻量任务只保留在内存)
+    """
+    name: str
+    func: Callable[[], Any]
+    interval: float
+    require_idle: bool = True
+    main_thread: bool = False
+    persist: bool = True
+
+
+class MaintenanceScheduler:
+    """后台维护调度器"""
+
+    def __init__(self, state_path: Path, config: Optional[Dict] = None,
+                 idle_probe: Optional[Callable[[], Optional[float]]] = user_idle_seconds,
+                 dispatcher: Optional[Callable[[Callable[[], None]], None]] = None,
+                 clock: Callable[[], float] = time.time):
+        """
+        初始化调度器
+
+        Args:
+            state_path: 运行指标文件路径 (maintenance_state.json)
+            config: 调度配置, 缺省项使用 DEFAULT_CONFIG
+            idle_probe: 返回用户空闲秒数, 返回None表示无法判断(视为空闲)
+            dispatcher: 把回调投递到主线程执行(如Qt信号的emit); 未提供时在调度线程执行
+            clock: 时间源(测试用)
+        """
+        self.state_path = Path(state_path)
+        self.config = {**DEFAULT_CONFIG, **(config or {})}
+        self.idle_probe = idle_probe
+        self.dispatcher = dispatcher
+        self.clock = clock
+
+        self.jobs: Dict[str, MaintenanceJob] = {}
+        self._registered_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._in_flight: set = set()
+        self._metrics: Dict[str, Dict] = self._load_state()
+
+        self._stop_event = threading.Event()
+        self.scheduler_thread: Optional[threading.Thread] = None
+
+    # ---------- 任务注册 ----------
+
+    def add_job(self, name: str, func: Callable[[], Any], interval: float, **options) -> MaintenanceJob:
+        """注册维护任务, options 见 MaintenanceJob"""
+        job = MaintenanceJob(name=name, func=func, interval=interval, **options)
+        self.jobs[name] = job
+        self._registered_at[name] = self.clock()
+        return job
+
+    # ---------- 生命周期 ----------
+
+    @property
+    def is_running(self) -> bool:
+        return self.scheduler_thread is not None and self.scheduler_thread.is_alive()
+
+    def start(self):
+        """启动调度线程"""
+        if self.is_running:
+            logger.warning("维护调度器已在运行,跳过启动")
+            return
+
+        if not self.config.get('enabled', True):
+            logger.info("维护调度器已禁用")
+            return
+
+        self._stop_event.clear()
+        self.scheduler_thread = threading.Thread(
+            target=self._schedule_loop,
+            name="maintenance-scheduler",
+            daemon=True
+        )
+        self.scheduler_thread.start()
+        logger.info(f"维护调度器已启动: {sorted(self.jobs)}")
+
+    def stop(self, timeout: float = 5):
+        """停止调度线程(正在执行的任务会执行完毕)"""
+        self._stop_event.set()
+        if self.scheduler_thread:
+            self.scheduler_thread.join(timeout=timeout)
+        logger.info("维护调度器已停止")
+
+    def _schedule_loop(self):
+        if self._stop_event.wait(self.config['startup_delay']):
+            return
+
+        while not self._stop_event.is_set():
+            try:
+                self.run_due_jobs()
+            except Exception as e:
+                logger.error(f"维护调度循环异常: {e}", exc_info=True)
+            self._stop_event.wait(self.config['check_interval'])
+
+    # ---------- 调度 ----------
+
+    def _is_idle(self) -> bool:
+        if self.idle_probe is None:
+            return True
+        try:
+            idle = self.idle_probe()
+        except Exception as e:
+            logger.debug(f"读取空闲时间失败: {e}")
+            return True
+        return idle is None or idle >= self.config['idle_seconds']
+
+    def due_jobs(self) -> List[MaintenanceJob]:
+        """当前应执行的任务(到期, 且用户空闲或已推迟超过 max_defer)"""
+        now = self.clock()
+        idle = None  # 只在有任务需要时才探测空闲状态
+        due = []
+        with self._lock:
+            for job in self.jobs.values():
+                if job.name in self._in_flight:
+                    continue
+                last_run = self._metrics.get(job.name, {}).get('last_run_ts')
+                # 从未运行过的任务从注册时起算到期
+                due_at = self._registered_at[job.name] if last_run is None else last_run + job.interval
+                if now < due_at:
+                    continue
+                if job.require_idle and now - due_at < self.config['max_defer']:
+                    if idle is None:
+                        idle = self._is_idle()
+                    if not idle:
+                        continue
+                due.append(job)
+        return due
+
+    def run_due_jobs(self) -> List[str]:
+        """执行所有到期任务, 返回已执行(或已投递到主线程)的任务名"""
+        started = []
+        for job in self.due_jobs():
+            if self._stop_event.is_set():
+                break
+            with self._lock:
+                self._in_flight.add(job.name)
+            if job.main_thread and self.dispatcher is not None:
+                self.dispatcher(lambda job=job: self.run_job(job))
+            else:
+                self.run_job(job)
+            started.append(job.name)
+        return started
+
+    def run_job(self, job: MaintenanceJob) -> Dict:
+        """执行单个任务并记录运行指标"""
+        started = time.perf_counter()
+        result, error = None, None
+        try:
+            result = job.func()
+        except Exception as e:
+            error = str(e)
+            logger.error(f"维护任务失败 ({job.name}): {e}", exc_info=True)
+
+        metrics = {
+            'last_run': datetime.now().isoformat(timespec='seconds'),
+            'last_run_ts': self.clock(),
+            'duration_ms': round((time.perf_counter() - started) * 1000, 1),
+            'result': result if isinstance(result, (int, float, str, bool, dict, list, type(None))) else str(result),
+            'error': error,
+        }
+        with self._lock:
+            metrics['runs'] = self._metrics.get(job.name, {}).get('runs', 0) + 1
+            self._metrics[job.name] = metrics
+            self._in_flight.discard(job.name)
+
+        if error is None and job.persist:
+            logger.info(f"维护任务完成 ({job.name}): {metrics['duration_ms']}ms, 结果={metrics['result']}")
+        if job.persist:
+            self._save_state()
+        return metrics
+
+    def get_metrics(self) -> Dict[str, Dict]:
+        """各任务最近一次运行的指标"""
+        with self._lock:
+            return {name: dict(metrics) for name, metrics in self._metrics.items()}
+
+    # ---------- 状态文件 ----------
+
+    def _load_state(self) -> Dict[str, Dict]:
+        if not self.state_path.exists():
+            return {}
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                return json.load(f).get('jobs', {})
+        except (OSError, ValueError, AttributeError) as e:
+            logger.warning(f"维护状态文件无效,将重新记录: {e}")
+            return {}
+
+    def _save_state(self):
+        with self._lock:
+            persisted = {
+                name: metrics for name, metrics in self._metrics.items()
+                if name not in self.jobs or self.jobs[name].persist
+            }
+
+        try:
+            write_json(self.state_path, {'jobs': persisted}, indent=2)
+        except OSError as e:
+            logger.warning(f"保存维护状态失败: {e}")
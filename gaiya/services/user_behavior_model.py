@@ -1,11 +1,25 @@
 """
 用户行为模型管理
+
+存储结构:
+- user_behavior_model.json: 模型快照(带 revision 版本号)
+- user_behavior_model.journal: 追加写的变更日志，每行一个事务
+  {"rev": 版本号, "ts": 时间, "changes": [{"path": [...], "value": ...}, ...]}
+
+每次学习只追加被修改的任务模式记录，开销与模型大小无关；日志达到阈值后压缩进快照。
+快照通过临时文件+os.replace原子替换，日志的半行(崩溃时写入中断)在加载时被忽略，
+因此任何时刻崩溃都不会损坏模型。
 """
+import copy
 import json
 import logging
+import os
+from contextlib import contextmanager
 from pathlib import Path
 from datetime import datetime, timedelta
-from typing import Dict, Optional
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from gaiya.utils.json_store import write_json
 
 logger = logging.getLogger("gaiya.services.user_behavior_model")
 
@@ -15,6 +29,7 @@ class UserBehaviorModel:
 
     DEFAULT_MODEL = {
         "version": "1.0",
+        "revision": 0,
         "user_id": None,
         "last_updated": None,
         "last_synced": None,
@@ -42,6 +57,9 @@ class UserBehaviorModel:
         }
     }
 
+    # 日志事务数达到该值时压缩进快照
+    COMPACT_THRESHOLD = 200
+
     def __init__(self, model_path: Path):
         """
         初始化用户行为模型
@@ -49,14 +67,21 @@ class UserBehaviorModel:
         Args:
             model_path: 模型文件路径
         """
-        self.model_path = model_path
+        self.model_path = Path(model_path)
+        self.journal_path = self.model_path.with_suffix('.journal')
+
+        # 事务状态
+        self._batch_depth = 0
+        self._dirty: List[Tuple[str, ...]] = []
+        self._journal_entries = 0  # 快照之后的日志事务数(决定何时压缩)
+
         self.model = self._load_model()
 
     def _load_model(self) -> Dict:
-        """加载模型文件,如果不存在则创建默认模型"""
+        """加载模型快照并重放变更日志,如果不存在则创建默认模型"""
         if not self.model_path.exists():
             logger.info(f"模型文件不存在,创建默认模型: {self.model_path}")
-            model = self.DEFAULT_MODEL.copy()
+            model = copy.deepcopy(self.DEFAULT_MODEL)
             model['last_updated'] = datetime.now().isoformat()
             self.save_model(model)
             return model
@@ -64,32 +89,135 @@ class UserBehaviorModel:
         try:
             with open(self.model_path, 'r', encoding='utf-8') as f:
                 model = json.load(f)
-            logger.info(f"成功加载用户行为模型: {self.model_path}")
-            return model
         except Exception as e:
             logger.error(f"加载模型失败,使用默认模型: {e}")
-            return self.DEFAULT_MODEL.copy()
+            return copy.deepcopy(self.DEFAULT_MODEL)
+
+        model.setdefault('revision', 0)
+        replayed = self._replay_journal(model)
+        logger.info(f"成功加载用户行为模型: {self.model_path} (revision={model['revision']}, 重放{replayed}个事务)")
+        return model
+
+    def _replay_journal(self, model: Dict) -> int:
+        """将快照之后的日志事务应用到模型"""
+        if not self.journal_path.exists():
+            return 0
+
+        replayed = 0
+        with open(self.journal_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # 写入中断留下的半行: 该事务未提交，其后不会再有内容
+                    logger.warning("变更日志末尾存在不完整的事务,已忽略")
+                    break
+
+                if entry['rev'] <= model['revision']:
+                    continue  # 已包含在快照中(快照落盘后未来得及截断的日志)
+
+                self._journal_entries += 1
+                self._apply_changes(model, entry['changes'])
+                model['revision'] = entry['rev']
+                model['last_updated'] = entry['ts']
+                replayed += 1
+
+        return replayed
+
+    @staticmethod
+    def _apply_changes(model: Dict, changes: Iterable[Dict]):
+        for change in changes:
+            *parents, key = change['path']
+            target = model
+            for part in parents:
+                target = target.setdefault(part, {})
+            if change.get('deleted'):
+                target.pop(key, None)
+            else:
+                target[key] = change['value']
 
     def save_model(self, model: Optional[Dict] = None):
-        """保存模型到文件"""
+        """保存完整模型快照(原子替换)并清空已压缩的日志"""
         if model is None:
             model = self.model
 
         try:
-            # 确保目录存在
-            self.model_path.parent.mkdir(parents=True, exist_ok=True)
-
             # 更新时间戳
             model['last_updated'] = datetime.now().isoformat()
 
-            # 保存到文件
-            with open(self.model_path, 'w', encoding='utf-8') as f:
-                json.dump(model, f, ensure_ascii=False, indent=2)
+            # 同步原子写入(紧凑格式): 快照落盘后才能截断日志
+            write_json(self.model_path, model)
+
+            self._journal_entries = 0
+            self.journal_path.unlink(missing_ok=True)
 
             logger.info(f"模型已保存: {self.model_path}")
         except Exception as e:
             logger.error(f"保存模型失败: {e}")
 
+    @contextmanager
+    def transaction(self):
+        """
+        批量修改事务: 期间标记的所有变更作为一个日志事务提交
+
+        用法:
+            with model.transaction():
+                model.learn_from_correction(...)
+                model.learn_from_correction(...)
+        """
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                self._commit()
+
+    def _mark_dirty(self, *paths: Tuple[str, ...]):
+        """记录变更路径(如 ('task_patterns', 任务名)),不在事务中时立即提交"""
+        for path in paths:
+            if path not in self._dirty:
+                self._dirty.append(path)
+        if self._batch_depth == 0:
+            self._commit()
+
+    def _commit(self):
+        """将待提交的变更作为一个事务追加到日志"""
+        if not self._dirty:
+            return
+
+        changes = []
+        for path in self._dirty:
+            target = self.model
+            for part in path[:-1]:
+                target = target.get(part, {})
+            if path[-1] in target:
+                changes.append({'path': list(path), 'value': target[path[-1]]})
+            else:
+                changes.append({'path': list(path), 'deleted': True})
+        self._dirty = []
+
+        now = datetime.now().isoformat()
+        entry = {'rev': self.model.get('revision', 0) + 1, 'ts': now, 'changes': changes}
+
+        try:
+            self.model_path.parent.mkdir(parents=True, exist_ok=True)
+            # 整个事务写成一行: 要么完整写入，要么在重放时作为半行被忽略
+            with open(self.journal_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False, separators=(',', ':')) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+        except Exception as e:
+            logger.error(f"写入模型变更日志失败: {e}")
+            return
+
+        self.model['revision'] = entry['rev']
+        self.model['last_updated'] = now
+        self._journal_entries += 1
+
+        if self._journal_entries >= self.COMPACT_THRESHOLD:
+            self.save_model()
+
     def get_task_pattern(self, task_name: str) -> Dict:
         """
         获取任务模式
@@ -137,7 +265,7 @@ class UserBehaviorModel:
             }
 
         self.model['task_patterns'][task_name] = initial_pattern
-        self.save_model()
+        self._mark_dirty(('task_patterns', task_name))
 
         logger.info(f"已初始化任务模式: {task_name}, 主要应用: {primary_apps}")
 
@@ -223,15 +351,31 @@ class UserBehaviorModel:
         else:
             self.model['learning_quality']['needs_relearning'] = False
 
-        self.save_model()
+        self._mark_dirty(('task_patterns', task_name), ('learning_quality',))
 
         logger.info(f"已从修正中学习: {task_name}, 修正类型: {correction_type}, 样本数: {pattern['learning_samples']}")
 
+    def learn_from_corrections(self, corrections: List[Dict]):
+        """
+        批量学习(如任务回顾窗口一次确认多个任务),所有修正在一个事务中提交
+
+        Args:
+            corrections: [{'task_name': ..., 'apps_used': [...], 'correction_type': ...}, ...]
+        """
+        with self.transaction():
+            for correction in corrections:
+                self.learn_from_correction(
+                    task_name=correction['task_name'],
+                    apps_used=correction['apps_used'],
+                    correction_type=correction['correction_type']
+                )
+
     def cleanup_old_data(self):
         """清理30天前的数据"""
         cutoff_date = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
 
         # 清理样本数过少且权重低的应用记录
+        cleaned = []
         for task_name, pattern in list(self.model['task_patterns'].items()):
             if 'typical_apps' not in pattern:
                 continue
@@ -246,11 +390,14 @@ class UserBehaviorModel:
                 del pattern['typical_apps'][app]
                 logger.debug(f"清理低质量应用记录: {task_name} - {app}")
 
+            if apps_to_remove:
+                cleaned.append(('task_patterns', task_name))
+
         # 更新清理时间
         self.model['data_retention']['cleanup_last_run'] = datetime.now().strftime('%Y-%m-%d')
         self.model['data_retention']['oldest_data'] = cutoff_date
 
-        self.save_model()
+        self._mark_dirty(*cleaned, ('data_retention',))
         logger.info(f"已清理30天前的数据,截止日期: {cutoff_date}")
 
     def get_model_stats(self) -> Dict:
@@ -267,7 +414,8 @@ class UserBehaviorModel:
             'accuracy_rate': self.model['learning_quality']['accuracy_rate'],
             'needs_relearning': self.model['learning_quality']['needs_relearning'],
             'last_updated': self.model['last_updated'],
-            'last_synced': self.model['last_synced']
+            'last_synced': self.model['last_synced'],
+            'revision': self.model.get('revision', 0)
         }
 
     def sync_to_cloud(self, auth_client) -> bool:
@@ -320,6 +468,7 @@ class UserBehaviorModel:
                 # 简单策略:云端数据覆盖本地
                 # TODO: 实现更智能的合并策略
                 self.model = cloud_model
+                self.model.setdefault('revision', 0)
                 self.save_model()
                 logger.info("已从云端同步模型")
                 return True
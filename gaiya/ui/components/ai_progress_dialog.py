@@ -10,9 +10,13 @@ from PySide6.QtGui import QFont
 class AiProgressDialog(QDialog):
     """AI生成进度对话框
 
-    显示AI任务生成的进度,提供取消功能
+    显示AI任务生成的进度,提供取消功能。
+    流式模式下通过 update_partial() 实时展示已生成的任务。
     """
 
+    # 预览区最多显示的任务数
+    MAX_PREVIEW_TASKS = 4
+
     # 信号
     cancel_requested = Signal()  # 用户请求取消
 
@@ -23,7 +27,7 @@ class AiProgressDialog(QDialog):
     def setup_ui(self):
         """设置UI"""
         self.setWindowTitle("AI任务生成中")
-        self.setFixedSize(400, 200)
+        self.setFixedSize(400, 280)
         self.setModal(True)
 
         # 禁用关闭按钮(必须通过取消按钮关闭)
@@ -65,10 +69,18 @@ class AiProgressDialog(QDialog):
         layout.addWidget(self.progress)
 
         # 提示文字
-        hint = QLabel("这通常需要10-30秒,请耐心等待...")
-        hint.setStyleSheet("color: #666666;")
-        hint.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        layout.addWidget(hint)
+        self.hint_label = QLabel("这通常需要10-30秒,请耐心等待...")
+        self.hint_label.setStyleSheet("color: #666666;")
+        self.hint_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        layout.addWidget(self.hint_label)
+
+        # 已生成任务预览(流式结果到达后显示)
+        self.preview_label = QLabel()
+        self.preview_label.setStyleSheet("color: #333333; font-size: 9pt;")
+        self.preview_label.setAlignment(Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignTop)
+        self.preview_label.setWordWrap(True)
+        self.preview_label.hide()
+        layout.addWidget(self.preview_label)
 
         layout.addStretch()
 
@@ -90,6 +102,25 @@ class AiProgressDialog(QDialog):
         """)
         layout.addWidget(cancel_btn)
 
+    def update_partial(self, partial: dict):
+        """显示流式到达的部分结果
+
+        Args:
+            partial: {"tasks": 已解析的任务列表, "text": 已接收的文本}
+        """
+        tasks = partial.get("tasks") or []
+        if not tasks:
+            self.hint_label.setText("AI已开始响应,正在生成任务...")
+            return
+
+        self.hint_label.setText(f"已生成 {len(tasks)} 个任务...")
+
+        lines = []
+        for task in tasks[-self.MAX_PREVIEW_TASKS:]:
+            lines.append(f"{task.get('start', '')}-{task.get('end', '')}  {task.get('task', '')}")
+        self.preview_label.setText("\n".join(lines))
+        self.preview_label.show()
+
     def on_cancel_clicked(self):
         """取消按钮点击"""
         self.cancel_requested.emit()
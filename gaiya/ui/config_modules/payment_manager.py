@@ -16,7 +16,15 @@ from PySide6.QtWidgets import (
 from PySide6.QtGui import QPixmap, QPainter, QPen, QBrush, QColor, QPainterPath
 from PySide6.QtCore import QRectF, QUrl
 from PySide6.QtGui import QDesktopServices
-from PySide6.QtNetwork import QNetworkAccessManager, QNetworkRequest, QNetworkReply
+
+
+def _fetch_image(url: str) -> bytes:
+    """Download an image via the shared HTTP pool (runs in a worker thread)."""
+    from gaiya.core.http_pool import get_http_pool
+
+    response = get_http_pool().get(url, timeout=15)
+    response.raise_for_status()
+    return response.content
 
 
 class PaymentOptionCard(QWidget):
@@ -169,6 +177,10 @@ class PaymentManager(QObject):
         "团队合伙人": "team_partner"
     }
 
+    # Backoff between payment long-polls after errors or early returns (ms)
+    WAIT_BACKOFF_INITIAL_MS = 1000
+    WAIT_BACKOFF_MAX_MS = 30000
+
     def __init__(self, parent_widget: QWidget, i18n=None, ai_client=None):
         """Initialize PaymentManager.
 
@@ -193,17 +205,20 @@ class PaymentManager(QObject):
         self.current_out_trade_no: Optional[str] = None
         self.current_trade_no: Optional[str] = None
         self.current_plan_name: Optional[str] = None
+        self._payment_wait_args: Optional[tuple] = None
+        self._wait_backoff_ms = self.WAIT_BACKOFF_INITIAL_MS
 
-        # Network manager for QR code downloads
-        self.network_manager: Optional[QNetworkAccessManager] = None
 
         # Worker references (prevent garbage collection)
         self._payment_worker = None
         self._payment_progress: Optional[QProgressDialog] = None
         self._status_check_worker = None
         self._manual_upgrade_worker = None
+        self._qrcode_worker = None
         self._subscription_refresh_worker = None
         self._manual_upgrade_context: Dict[str, Any] = {}
+        # Long-polls still in flight after the dialog closed (kept until finished)
+        self._retired_workers = []
 
     def tr(self, key: str) -> str:
         """Translate a key using i18n if available."""
@@ -621,12 +636,14 @@ class PaymentManager(QObject):
         # Download and display QR code
         self._download_qrcode(qrcode_url, qr_label)
 
-        # Start payment status polling
-        auth_client = AuthClient()
+        # Wait for the payment result: one outstanding long-poll at a time,
+        # the single-shot timer only spaces out retries
+        self._payment_wait_args = (out_trade_no, trade_no, AuthClient())
+        self._wait_backoff_ms = self.WAIT_BACKOFF_INITIAL_MS
         self.payment_timer = QTimer()
-        self.payment_timer.setInterval(3000)
-        self.payment_timer.timeout.connect(partial(self._check_payment_status, out_trade_no, trade_no, auth_client))
-        self.payment_timer.start()
+        self.payment_timer.setSingleShot(True)
+        self.payment_timer.timeout.connect(self._check_payment_status)
+        self._check_payment_status()
 
         # Show dialog (blocks until closed)
         dialog.exec()
@@ -642,33 +659,29 @@ class PaymentManager(QObject):
             qrcode_url: URL to the QR code image
             qr_label: Label widget to display the QR code
         """
-        if not self.network_manager:
-            self.network_manager = QNetworkAccessManager(self._parent)
-
-        request = QNetworkRequest(QUrl(qrcode_url))
-        reply = self.network_manager.get(request)
-
-        def on_finished():
-            if reply.error() == QNetworkReply.NetworkError.NoError:
-                data = reply.readAll()
-                pixmap = QPixmap()
-                pixmap.loadFromData(data)
-
-                if not pixmap.isNull():
-                    scaled_pixmap = pixmap.scaled(280, 280, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
-                    qr_label.setPixmap(scaled_pixmap)
-                    logging.info("[PAYMENT] QR code loaded successfully")
-                else:
-                    qr_label.setText("二维码加载失败\n请刷新重试")
-                    logging.error("[PAYMENT] Failed to parse QR code image")
+        from gaiya.core.async_worker import AsyncNetworkWorker
+
+        def on_loaded(result: dict):
+            pixmap = QPixmap()
+            pixmap.loadFromData(result.get("data", b""))
+
+            if not pixmap.isNull():
+                scaled_pixmap = pixmap.scaled(280, 280, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
+                qr_label.setPixmap(scaled_pixmap)
+                logging.info("[PAYMENT] QR code loaded successfully")
             else:
-                error_msg = reply.errorString()
-                qr_label.setText(f"二维码加载失败\n{error_msg}")
-                logging.error(f"[PAYMENT] Failed to download QR code: {error_msg}")
+                qr_label.setText("二维码加载失败\n请刷新重试")
+                logging.error("[PAYMENT] Failed to parse QR code image")
 
-            reply.deleteLater()
+        def on_error(error_msg: str):
+            qr_label.setText(f"二维码加载失败\n{error_msg}")
+            logging.error(f"[PAYMENT] Failed to download QR code: {error_msg}")
 
-        reply.finished.connect(on_finished)
+        # Fetched through the shared connection pool (same proxy/SSL settings, kept-alive connection)
+        self._qrcode_worker = AsyncNetworkWorker(_fetch_image, qrcode_url)
+        self._qrcode_worker.success.connect(on_loaded)
+        self._qrcode_worker.error.connect(on_error)
+        self._qrcode_worker.start()
 
     def _handle_order_creation_error(self, result: dict, pay_type: str):
         """Handle order creation error.
@@ -918,26 +931,28 @@ class PaymentManager(QObject):
             QMessageBox.critical(self._parent, self.tr("membership.payment.create_session_failed"), detailed_msg)
             self.payment_failed.emit(error_msg)
 
-    def _check_payment_status(self, out_trade_no: str, trade_no: str, auth_client):
-        """Check payment status asynchronously.
+    def _check_payment_status(self):
+        """Start a long-poll for the current order's payment status.
 
-        Args:
-            out_trade_no: External trade number
-            trade_no: Internal trade number
-            auth_client: AuthClient instance
+        The server holds the request until the payment webhook records the
+        order as paid or its deadline passes, so at most one request is
+        outstanding per dialog.
         """
         from gaiya.core.async_worker import AsyncNetworkWorker
 
-        # Skip if previous check is still running
+        if not self._payment_wait_args:
+            return
+
+        # Only one outstanding long-poll
         if self._status_check_worker and self._status_check_worker.isRunning():
-            logging.info("[PAYMENT] Previous status check still running, skipping...")
+            logging.info("[PAYMENT] Payment long-poll still outstanding, skipping...")
             return
 
-        logging.info(f"[PAYMENT] Checking payment status for order: {out_trade_no}")
+        out_trade_no, trade_no, auth_client = self._payment_wait_args
+        logging.info(f"[PAYMENT] Waiting for payment result of order: {out_trade_no}")
 
-        # Create async worker
         self._status_check_worker = AsyncNetworkWorker(
-            auth_client.query_payment_order,
+            auth_client.wait_payment_order,
             out_trade_no,
             trade_no=trade_no
         )
@@ -954,11 +969,27 @@ class PaymentManager(QObject):
         from gaiya.core.auth_client import AuthClient
         from gaiya.core.async_worker import AsyncNetworkWorker
 
+        if not result.get("success"):
+            self._on_payment_status_check_error(result.get("error", "Unknown error"))
+            return
+
         order = result.get("order", {})
         status = order.get("status")
 
         logging.info(f"[PAYMENT] Status check result: {status}")
 
+        if status != "paid":
+            # A long-poll that waited out its deadline is re-armed right away;
+            # an early unpaid answer backs off
+            if result.get("timed_out") and "retry_after" in result:
+                self._wait_backoff_ms = self.WAIT_BACKOFF_INITIAL_MS
+                self._schedule_payment_wait(int(result["retry_after"] * 1000))
+            else:
+                self._schedule_payment_wait(self._next_wait_backoff())
+            return
+
+        # Paid: activate via manual upgrade; waiting resumes (with backoff) only if it fails
+
         # Skip if already upgrading
         if self._manual_upgrade_worker and self._manual_upgrade_worker.isRunning():
             logging.info("[PAYMENT] Manual upgrade already running, skipping...")
@@ -974,7 +1005,7 @@ class PaymentManager(QObject):
             plan_type = self.PLAN_TYPE_MAP.get(plan_name, "pro_monthly")
 
             if out_trade_no and user_id:
-                logging.info(f"[PAYMENT] Vercel query returned: {status}, trying manual upgrade async...")
+                logging.info(f"[PAYMENT] Order reported {status}, trying manual upgrade async...")
 
                 # Store context for callback
                 self._manual_upgrade_context = {
@@ -990,14 +1021,17 @@ class PaymentManager(QObject):
                     plan_type=plan_type,
                     out_trade_no=out_trade_no
                 )
-                self._manual_upgrade_worker.success.connect(self._on_manual_upgrade_success)
-                self._manual_upgrade_worker.error.connect(self._on_manual_upgrade_error)
+                self._manual_upgrade_worker.success.connect(self._on_polled_upgrade_success)
+                self._manual_upgrade_worker.error.connect(self._on_polled_upgrade_error)
                 self._manual_upgrade_worker.start()
+                return
 
         except Exception as e:
             logging.error(f"[PAYMENT] Manual upgrade check error: {e}")
 
-    def _on_manual_upgrade_success(self, upgrade_result: dict):
+        self._schedule_payment_wait(self._next_wait_backoff())
+
+    def _on_polled_upgrade_success(self, upgrade_result: dict):
         """Callback for successful manual upgrade check.
 
         Args:
@@ -1028,17 +1062,19 @@ class PaymentManager(QObject):
             # Not paid yet
             error_msg = upgrade_result.get('error', '')
             if 'not paid' in error_msg.lower() or 'unpaid' in error_msg.lower():
-                logging.info("[PAYMENT] Manual upgrade confirms: order not paid yet, continue polling...")
+                logging.info("[PAYMENT] Manual upgrade confirms: order not paid yet, keep waiting...")
             else:
                 logging.warning(f"[PAYMENT] Manual upgrade failed: {error_msg}")
+            self._schedule_payment_wait(self._next_wait_backoff())
 
-    def _on_manual_upgrade_error(self, error_msg: str):
+    def _on_polled_upgrade_error(self, error_msg: str):
         """Callback for manual upgrade error.
 
         Args:
             error_msg: Error message
         """
-        logging.warning(f"[PAYMENT] Manual upgrade error (continuing polling): {error_msg}")
+        logging.warning(f"[PAYMENT] Manual upgrade error (keep waiting): {error_msg}")
+        self._schedule_payment_wait(self._next_wait_backoff())
 
     def _on_payment_status_check_error(self, error_msg: str):
         """Callback for payment status check error (non-critical).
@@ -1046,7 +1082,20 @@ class PaymentManager(QObject):
         Args:
             error_msg: Error message
         """
-        logging.warning(f"[PAYMENT] Status check error (continuing polling): {error_msg}")
+        delay = self._next_wait_backoff()
+        logging.warning(f"[PAYMENT] Status check error (retrying in {delay} ms): {error_msg}")
+        self._schedule_payment_wait(delay)
+
+    def _next_wait_backoff(self) -> int:
+        """Return the current retry delay and double it for the next failure."""
+        delay = self._wait_backoff_ms
+        self._wait_backoff_ms = min(delay * 2, self.WAIT_BACKOFF_MAX_MS)
+        return delay
+
+    def _schedule_payment_wait(self, delay_ms: int):
+        """Start the next long-poll after delay_ms (no-op once waiting stopped)."""
+        if self.payment_timer and self._payment_wait_args:
+            self.payment_timer.start(max(0, delay_ms))
 
     def confirm_payment_manually(self, dialog: QDialog, out_trade_no: str, plan_name: str):
         """Manually confirm payment completion.
@@ -1194,6 +1243,7 @@ class PaymentManager(QObject):
 
     def stop_payment_polling(self):
         """Stop payment status polling and cleanup all workers."""
+        self._payment_wait_args = None
         if self.payment_timer:
             self.payment_timer.stop()
             self.payment_timer = None
@@ -1204,6 +1254,7 @@ class PaymentManager(QObject):
                 self._status_check_worker.disconnect()
             except (RuntimeError, TypeError):
                 pass
+            self._retire_worker(self._status_check_worker)
             self._status_check_worker = None
 
         if self._manual_upgrade_worker:
@@ -1213,10 +1264,29 @@ class PaymentManager(QObject):
                 pass
             self._manual_upgrade_worker = None
 
+        if self._qrcode_worker:
+            try:
+                self._qrcode_worker.disconnect()
+            except (RuntimeError, TypeError):
+                pass
+            self._retire_worker(self._qrcode_worker)
+            self._qrcode_worker = None
+
         if self.payment_polling_dialog:
             self.payment_polling_dialog.close()
             self.payment_polling_dialog = None
 
+    def _retire_worker(self, worker):
+        """Keep a still-running worker alive until its request returns.
+
+        A long-poll can stay open for half a minute after the dialog closes;
+        dropping the last reference would destroy a running QThread.
+        """
+        if not worker.isRunning():
+            return
+        self._retired_workers.append(worker)
+        worker.finished.connect(partial(self._retired_workers.remove, worker))
+
     def on_plan_button_clicked(self, plan_id: str):
         """Handle plan button click - show payment method dialog.
 
@@ -1234,6 +1304,7 @@ class PaymentManager(QObject):
     def cleanup(self):
         """Clean up resources before destruction."""
         # Stop timers
+        self._payment_wait_args = None
         if self.payment_timer:
             self.payment_timer.stop()
             self.payment_timer = None
@@ -0,0 +1,284 @@
+"""
+GaiYa Config Modules - Task Table Model
+Model/view backing for the task list in the configuration window.
+
+The table used to create a QTimeEdit, two color buttons (each with a hidden
+QLineEdit) and a delete button per task row. Tasks now live in a
+QAbstractTableModel; delegates paint the cells and create an editor only for
+the cell being edited, so building the view costs the same for 5 or 500 tasks.
+"""
+import hashlib
+from typing import Any, Dict, List, Optional
+
+from PySide6.QtCore import QAbstractTableModel, QEvent, QModelIndex, QRect, Qt, QTime, Signal
+from PySide6.QtGui import QColor, QPen
+from PySide6.QtWidgets import (
+    QAbstractItemView, QColorDialog, QHeaderView, QStyledItemDelegate, QTableView, QTimeEdit,
+)
+
+COL_START, COL_END, COL_NAME, COL_COLOR, COL_TEXT_COLOR, COL_ACTIONS = range(6)
+
+DEFAULT_COLOR = "#4CAF50"
+DEFAULT_TEXT_COLOR = "#FFFFFF"
+ROW_HEIGHT = 48
+
+
+class TaskTableModel(QAbstractTableModel):
+    """Task list model (one row per task).
+
+    Rows are plain task dicts with 'start', 'end', 'task', 'color' and
+    'text_color'. tasks() returns them normalized for saving.
+    """
+
+    _KEYS = {COL_START: 'start', COL_END: 'end', COL_NAME: 'task',
+             COL_COLOR: 'color', COL_TEXT_COLOR: 'text_color'}
+
+    def __init__(self, headers: Optional[List[str]] = None, parent=None):
+        super().__init__(parent)
+        self._rows: List[Dict[str, Any]] = []
+        self._headers = headers or ["Start", "End", "Task", "Color", "Text Color", ""]
+
+    # ========== Qt model interface ==========
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._headers)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self._headers[section]
+        return super().headerData(section, orientation, role)
+
+    def set_headers(self, headers: List[str]):
+        self._headers = list(headers)
+        self.headerDataChanged.emit(Qt.Orientation.Horizontal, 0, len(self._headers) - 1)
+
+    def data(self, index: QModelIndex, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self._rows[index.row()]
+        column = index.column()
+
+        if role in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.EditRole):
+            if column == COL_ACTIONS:
+                return "🗑" if role == Qt.ItemDataRole.DisplayRole else None
+            return row.get(self._KEYS[column], "")
+        if role == Qt.ItemDataRole.ToolTipRole:
+            if column in (COL_COLOR, COL_TEXT_COLOR):
+                return "点击选择颜色"
+            if column == COL_ACTIONS:
+                return "删除任务"
+        if role == Qt.ItemDataRole.TextAlignmentRole and column != COL_NAME:
+            return int(Qt.AlignmentFlag.AlignCenter)
+        return None
+
+    def setData(self, index: QModelIndex, value, role=Qt.ItemDataRole.EditRole) -> bool:
+        if not index.isValid() or role != Qt.ItemDataRole.EditRole or index.column() == COL_ACTIONS:
+            return False
+        key = self._KEYS[index.column()]
+        row = self._rows[index.row()]
+        if row.get(key) == value:
+            return False
+        row[key] = value
+        self.dataChanged.emit(index, index, [Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.EditRole])
+        return True
+
+    def flags(self, index: QModelIndex):
+        if not index.isValid():
+            return Qt.ItemFlag.NoItemFlags
+        flags = Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable
+        if index.column() in (COL_START, COL_END, COL_NAME):
+            flags |= Qt.ItemFlag.ItemIsEditable
+        return flags
+
+    # ========== Task operations ==========
+
+    def set_tasks(self, tasks: List[Dict]):
+        """Replace all rows (single model reset, no per-row work)"""
+        self.beginResetModel()
+        self._rows = [
+            {
+                'start': task.get('start', '00:00'),
+                'end': task.get('end', '00:00'),
+                'task': task.get('task', ''),
+                'color': task.get('color', DEFAULT_COLOR),
+                'text_color': task.get('text_color', DEFAULT_TEXT_COLOR),
+            }
+            for task in tasks
+        ]
+        self.endResetModel()
+
+    def tasks(self) -> List[Dict[str, str]]:
+        """Rows as task dicts; an end of 00:00 on the last row means 24:00"""
+        result = []
+        last = len(self._rows) - 1
+        for i, row in enumerate(self._rows):
+            task = dict(row)
+            if task['end'] == "00:00" and i == last:
+                task['end'] = "24:00"
+            result.append(task)
+        return result
+
+    def task(self, row: int) -> Dict[str, Any]:
+        return dict(self._rows[row])
+
+    def add_task(self, name: str, color: str, duration_minutes: int = 60) -> int:
+        """Append a task starting where the previous one ends (09:00 for the first)"""
+        if self._rows:
+            start = _parse_time(self._rows[-1]['end'])
+        else:
+            start = QTime(9, 0)
+        end = start.addSecs(duration_minutes * 60)
+
+        row = len(self._rows)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._rows.append({
+            'start': start.toString("HH:mm"),
+            'end': end.toString("HH:mm"),
+            'task': name,
+            'color': color,
+            'text_color': DEFAULT_TEXT_COLOR,
+        })
+        self.endInsertRows()
+        return row
+
+    def remove_task(self, row: int):
+        if 0 <= row < len(self._rows):
+            self.beginRemoveRows(QModelIndex(), row, row)
+            del self._rows[row]
+            self.endRemoveRows()
+
+    def set_times(self, row: int, start: str, end: str):
+        """Update one row's times (timeline drag)"""
+        if not 0 <= row < len(self._rows):
+            return
+        current = self._rows[row]
+        if (current['start'], current['end']) == (start, end):
+            return
+        current['start'], current['end'] = start, end
+        self.dataChanged.emit(self.index(row, COL_START), self.index(row, COL_END))
+
+    def apply_colors(self, colors: List[str]):
+        """Cycle a theme palette over the task background colors"""
+        if not colors or not self._rows:
+            return
+        for i, row in enumerate(self._rows):
+            row['color'] = colors[i % len(colors)]
+        self.dataChanged.emit(self.index(0, COL_COLOR), self.index(len(self._rows) - 1, COL_COLOR))
+
+
+def stable_task_id(start: str, end: str, name: str) -> str:
+    """Stable task id derived from its time slot and name"""
+    return hashlib.sha1(f"{start}|{end}|{name}".encode('utf-8')).hexdigest()
+
+
+def _parse_time(value: str) -> QTime:
+    if value == "24:00":
+        return QTime(0, 0)
+    parsed = QTime.fromString(value, "HH:mm")
+    return parsed if parsed.isValid() else QTime(9, 0)
+
+
+class TimeDelegate(QStyledItemDelegate):
+    """HH:mm editor created only while a time cell is being edited"""
+
+    def __init__(self, editor_style: str = "", parent=None):
+        super().__init__(parent)
+        self._editor_style = editor_style
+
+    def createEditor(self, parent, option, index):
+        editor = QTimeEdit(parent)
+        editor.setDisplayFormat("HH:mm")
+        if self._editor_style:
+            editor.setStyleSheet(self._editor_style)
+        return editor
+
+    def setEditorData(self, editor, index):
+        editor.setTime(_parse_time(index.data(Qt.ItemDataRole.EditRole)))
+
+    def setModelData(self, editor, model, index):
+        value = editor.time().toString("HH:mm")
+        # 24:00 is shown as 00:00; keep it unless the user picked another time
+        if value == "00:00" and index.data(Qt.ItemDataRole.EditRole) == "24:00":
+            return
+        model.setData(index, value, Qt.ItemDataRole.EditRole)
+
+
+class ColorSwatchDelegate(QStyledItemDelegate):
+    """Paints a color swatch; a click opens the color dialog"""
+
+    SWATCH_WIDTH = 50
+    SWATCH_HEIGHT = 30
+
+    def paint(self, painter, option, index):
+        color = QColor(index.data(Qt.ItemDataRole.EditRole) or DEFAULT_COLOR)
+        rect = QRect(0, 0, self.SWATCH_WIDTH, self.SWATCH_HEIGHT)
+        rect.moveCenter(option.rect.center())
+
+        painter.save()
+        painter.setRenderHint(painter.RenderHint.Antialiasing)
+        painter.setBrush(color)
+        painter.setPen(QPen(QColor("#CCCCCC"), 2))
+        painter.drawRoundedRect(rect, 4, 4)
+        painter.restore()
+
+    def editorEvent(self, event, model, option, index):
+        if event.type() == QEvent.Type.MouseButtonRelease and event.button() == Qt.MouseButton.LeftButton:
+            current = QColor(index.data(Qt.ItemDataRole.EditRole) or DEFAULT_COLOR)
+            color = QColorDialog.getColor(current, self.parent(), "选择颜色")
+            if color.isValid():
+                model.setData(index, color.name(), Qt.ItemDataRole.EditRole)
+            return True
+        return super().editorEvent(event, model, option, index)
+
+
+class DeleteButtonDelegate(QStyledItemDelegate):
+    """Paints the delete icon; a click emits delete_requested(row)"""
+
+    delete_requested = Signal(int)
+
+    def paint(self, painter, option, index):
+        rect = QRect(0, 0, 32, 32)
+        rect.moveCenter(option.rect.center())
+
+        painter.save()
+        painter.setRenderHint(painter.RenderHint.Antialiasing)
+        painter.setPen(QPen(QColor("#CCCCCC"), 1))
+        painter.drawRoundedRect(rect, 4, 4)
+        painter.drawText(rect, Qt.AlignmentFlag.AlignCenter, index.data() or "")
+        painter.restore()
+
+    def editorEvent(self, event, model, option, index):
+        if event.type() == QEvent.Type.MouseButtonRelease and event.button() == Qt.MouseButton.LeftButton:
+            self.delete_requested.emit(index.row())
+            return True
+        return super().editorEvent(event, model, option, index)
+
+
+def create_task_table_view(model: TaskTableModel, stylesheet: str = "", time_editor_style: str = "",
+                           parent=None) -> QTableView:
+    """Build the task table view with its delegates"""
+    view = QTableView(parent)
+    view.setModel(model)
+    if stylesheet:
+        view.setStyleSheet(stylesheet)
+
+    view.setItemDelegateForColumn(COL_START, TimeDelegate(time_editor_style, view))
+    view.setItemDelegateForColumn(COL_END, TimeDelegate(time_editor_style, view))
+    view.setItemDelegateForColumn(COL_COLOR, ColorSwatchDelegate(view))
+    view.setItemDelegateForColumn(COL_TEXT_COLOR, ColorSwatchDelegate(view))
+    view.delete_delegate = DeleteButtonDelegate(view)
+    view.setItemDelegateForColumn(COL_ACTIONS, view.delete_delegate)
+
+    view.setEditTriggers(
+        QAbstractItemView.EditTrigger.DoubleClicked
+        | QAbstractItemView.EditTrigger.SelectedClicked
+        | QAbstractItemView.EditTrigger.EditKeyPressed
+    )
+    view.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+    view.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+    view.verticalHeader().setDefaultSectionSize(ROW_HEIGHT)
+    view.setMouseTracking(True)
+    return view
@@ -20,6 +20,7 @@ urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from i18n.translator import tr
 from gaiya.core.async_worker import AsyncNetworkWorker
+from gaiya.core.http_pool import get_shared_session
 
 
 class EmailVerificationDialog(QDialog):
@@ -210,14 +211,13 @@ class EmailVerificationDialog(QDialog):
         try:
             print(tr("email_verification.log.checking", count=self.check_count))
 
-            response = requests.post(
+            response = get_shared_session().post(
                 f"{self.backend_url}/api/auth-check-verification",
                 json={
                     "email": self.email,
                     "user_id": self.user_id
                 },
-                timeout=10,
-                verify=False  # 禁用SSL验证（解决Windows SSL兼容性问题）
+                timeout=10
             )
 
             if response.status_code == 200:
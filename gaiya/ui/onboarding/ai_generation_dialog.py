@@ -14,8 +14,9 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspa
 try:
     from i18n.translator import tr
 except ImportError:
-    def tr(key):
-        return key
+    def tr(key, fallback=None, **kwargs):
+        text = fallback or key
+        return text.format(**kwargs) if kwargs else text
 
 
 class RotatingSvgWidget(QSvgWidget):
@@ -72,6 +73,7 @@ class AIGenerationDialog(QDialog):
         super().__init__(parent)
         self._current_status = 0
         self._status_messages = []
+        self._partial_task_count = 0
         self.setup_ui()
         self.setup_animations()
 
@@ -186,6 +188,7 @@ class AIGenerationDialog(QDialog):
     def start_generation(self):
         """开始生成动画"""
         self._current_status = 0
+        self._partial_task_count = 0
         self.progress_bar.setValue(0)
 
         # 启动动画和定时器
@@ -219,6 +222,52 @@ class AIGenerationDialog(QDialog):
         new_value = min(current_value + increment, 99)
         self.progress_bar.setValue(int(new_value))
 
+    def update_partial(self, partial: dict):
+        """根据流式到达的部分结果更新状态
+
+        收到真实进度后停止轮播的模拟状态文字，改为显示已生成的任务数。
+
+        Args:
+            partial: {"tasks": 已解析的任务列表, "text": 已接收的文本}
+        """
+        self.status_timer.stop()
+
+        tasks = partial.get("tasks") or []
+        if len(tasks) <= self._partial_task_count:
+            if not tasks:
+                self.status_label.setText(self._status_messages[2])  # 生成个性化任务列表...
+            return
+
+        self._partial_task_count = len(tasks)
+        latest = tasks[-1].get("task", "")
+        self.status_label.setText(tr(
+            "ai_generation.status.received",
+            "已生成 {count} 个任务: {task}",
+            count=len(tasks),
+            task=latest
+        ))
+
+        # 一日计划通常6-10个任务，按任务数推进进度(最高95%，完成时置为100%)
+        self.progress_bar.setValue(max(self.progress_bar.value(), min(30 + len(tasks) * 8, 95)))
+
+    def attach_worker(self, worker):
+        """连接AI任务生成工作线程(AsyncAIWorker)的信号
+
+        流式到达的任务实时更新状态, 结束时切换为完成或错误状态。
+
+        Args:
+            worker: AsyncAIWorker 实例(需在 start() 之前连接)
+        """
+        worker.partial.connect(self.update_partial)
+        worker.finished.connect(self._on_worker_finished)
+        worker.error.connect(self.set_error)
+
+    def _on_worker_finished(self, result: dict):
+        if result and result.get("success") and result.get("tasks"):
+            self.set_complete()
+        else:
+            self.set_error((result or {}).get("error") or tr("ai_generation.status.failed", "生成失败,请稍后重试"))
+
     def set_complete(self):
         """设置为完成状态"""
         self.stop_generation()
@@ -261,7 +310,7 @@ if __name__ == '__main__':
     from PySide6.QtWidgets import QApplication, QPushButton
 
     # 测试模式不加载i18n
-    def tr(key):
+    def tr(key, fallback=None, **kwargs):
         translations = {
             "ai_generation.window.title": "AI 智能生成",
             "ai_generation.title.main": "AI 正在为你规划...",
@@ -270,10 +319,13 @@ if __name__ == '__main__':
             "ai_generation.status.generating": "生成个性化任务列表...",
             "ai_generation.status.optimizing": "优化任务时间分配...",
             "ai_generation.status.finalizing": "完成最后的调整...",
+            "ai_generation.status.received": "已生成 {count} 个任务: {task}",
             "ai_generation.status.complete": "✓ 生成完成!",
+            "ai_generation.status.failed": "生成失败,请稍后重试",
             "ai_generation.tip.message": "AI 正在根据你的习惯生成专属时间规划"
         }
-        return translations.get(key, key)
+        text = translations.get(key, fallback or key)
+        return text.format(**kwargs) if kwargs else text
 
     # 覆盖全局tr函数
     import builtins
@@ -285,10 +337,15 @@ if __name__ == '__main__':
     test_btn = QPushButton("测试AI生成对话框")
 
     def show_dialog():
+        from ai_client import GaiyaAIClient
+        from gaiya.core.async_worker import AsyncAIWorker
+
         dialog = AIGenerationDialog()
-        # 模拟3秒后完成
-        QTimer.singleShot(3000, dialog.set_complete)
+        worker = AsyncAIWorker(GaiyaAIClient(), "明天9点开会1小时,然后写代码到下午5点")
+        dialog.attach_worker(worker)
+        worker.start()
         dialog.exec()
+        worker.wait()
 
     test_btn.clicked.connect(show_dialog)
     test_btn.show()
@@ -19,6 +19,7 @@ urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 # 添加父目录到路径以导入core模块
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from i18n.translator import tr
+from gaiya.core.http_pool import get_shared_session
 
 
 class OTPDialog(QDialog):
@@ -199,14 +200,13 @@ class OTPDialog(QDialog):
             self.resend_button.setEnabled(False)
             self.resend_button.setText(tr("otp.button.sending"))
 
-            response = requests.post(
+            response = get_shared_session().post(
                 f"{self.backend_url}/api/auth-send-otp",
                 json={
                     "email": self.email,
                     "purpose": self.purpose
                 },
-                timeout=10,
-                verify=False  # 禁用SSL验证（解决Windows SSL兼容性问题）
+                timeout=10
             )
 
             if response.status_code == 200:
@@ -267,14 +267,13 @@ class OTPDialog(QDialog):
         self.verify_button.setText(tr("otp.button.verifying"))
 
         try:
-            response = requests.post(
+            response = get_shared_session().post(
                 f"{self.backend_url}/api/auth-verify-otp",
                 json={
                     "email": self.email,
                     "otp_code": otp_code
                 },
-                timeout=10,
-                verify=False  # 禁用SSL验证（解决Windows SSL兼容性问题）
+                timeout=10
             )
 
             if response.status_code == 200:
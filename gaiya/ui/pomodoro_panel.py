@@ -10,6 +10,7 @@ from PySide6.QtCore import Qt, QRectF, QTimer, QPoint, Signal
 from PySide6.QtGui import QPainter, QColor, QPen, QFont, QCursor
 from gaiya.core.pomodoro_state import PomodoroState
 from gaiya.core.theme_manager import ThemeManager
+from gaiya.utils.json_store import write_json
 from i18n.translator import tr
 # 延迟导入数据库管理器，避免循环依赖
 
@@ -104,8 +105,7 @@ class PomodoroSettingsDialog(QDialog):
                 # 开发环境
                 config_file = Path(__file__).parent.parent.parent / 'config.json'
 
-            with open(config_file, 'w', encoding='utf-8') as f:
-                json.dump(self.config, f, indent=4, ensure_ascii=False)
+            write_json(config_file, self.config, indent=4)
 
             self.logger.info(tr("pomodoro.settings.saved"))
 
@@ -545,13 +545,13 @@ class StyleManager:
     @staticmethod
     def table() -> str:
         """
-        表格 (QTableWidget)
+        表格 (QTableWidget / QTableView)
 
         Returns:
             表格QSS字符串
         """
         return f"""
-            QTableWidget {{
+            QTableWidget, QTableView {{
                 background-color: {Theme.BG_PRIMARY};
                 alternate-background-color: {Theme.BG_TERTIARY};
                 gridline-color: {Theme.BORDER_LIGHT};
@@ -559,10 +559,10 @@ class StyleManager:
                 border-radius: {Theme.RADIUS_SMALL}px;
                 font-size: {Theme.FONT_BODY}px;
             }}
-            QTableWidget::item {{
+            QTableWidget::item, QTableView::item {{
                 padding: 8px;
             }}
-            QTableWidget::item:selected {{
+            QTableWidget::item:selected, QTableView::item:selected {{
                 background-color: {Theme.BG_HOVER};
                 color: {Theme.TEXT_PRIMARY};
             }}
@@ -576,6 +576,54 @@ class StyleManager:
             }}
         """
 
+    # ============================================================
+    # 页面级样式
+    # ============================================================
+    @staticmethod
+    def config_page() -> str:
+        """
+        配置页容器样式 - 在标签页容器上设置一次,由子控件继承
+
+        代替逐个控件调用 setStyleSheet:
+        - 数字输入框、下拉框、时间输入框按类型匹配
+        - 提示文字: label.setProperty("role", "hint")
+        - 分组标题: group.setProperty("role", "section")
+        - 预设按钮: 可选中的 QPushButton[role="preset"]
+
+        Returns:
+            页面级QSS字符串
+        """
+        return StyleManager.input_number() + StyleManager.dropdown() + StyleManager.input_time() + """
+            QLabel[role="hint"] {
+                color: #888888;
+                font-size: 9pt;
+            }
+            QGroupBox[role="section"]::title {
+                color: #666666;
+                font-weight: bold;
+                font-size: 14px;
+            }
+            QPushButton[role="preset"] {
+                background-color: #f0f0f0;
+                color: #333;
+                border: 1px solid #ccc;
+                padding: 5px;
+            }
+            QPushButton[role="preset"]:hover {
+                background-color: #e0e0e0;
+                border: 1px solid #999;
+            }
+            QPushButton[role="preset"]:checked {
+                background-color: #2196F3;
+                color: white;
+                border: 2px solid #1976D2;
+                font-weight: bold;
+            }
+            QPushButton[role="preset"]:checked:hover {
+                background-color: #1976D2;
+            }
+        """
+
     # ============================================================
     # 标签样式
     # ============================================================
@@ -4,7 +4,7 @@
 """
 
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import Dict, List, Optional, Tuple
 from PySide6.QtWidgets import (
     QDialog, QVBoxLayout, QHBoxLayout, QFormLayout,
@@ -39,6 +39,7 @@ class TimeReviewWindow(QDialog):
         # 数据缓存
         self.review_data: Optional[Dict] = None
         self.activity_data: Optional[Dict] = None
+        self.range_start, self.range_end = db.today_range()
 
         # 初始化UI
         self.init_ui()
@@ -289,24 +290,26 @@ class TimeReviewWindow(QDialog):
 
     def load_today_data(self):
         """加载今日数据"""
+        self.load_range_data(*db.today_range())
+        self.logger.info("已加载今日时间回放数据")
+
+    def load_range_data(self, start_time: datetime, end_time: datetime):
+        """加载任意时间范围 [start_time, end_time) 的回放数据"""
         try:
-            start_of_day = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-            end_of_day = start_of_day + timedelta(days=1)
+            self.range_start, self.range_end = start_time, end_time
 
             # 加载专注统计数据
-            self.load_focus_data(start_of_day, end_of_day)
+            self.load_focus_data(start_time, end_time)
 
             # 加载行为统计数据
-            self.load_activity_data(start_of_day, end_of_day)
+            self.load_activity_data(start_time, end_time)
 
             # 更新UI显示
             self.update_focus_review()
             self.update_activity_review()
 
-            self.logger.info("已加载今日时间回放数据")
-
         except Exception as e:
-            self.logger.error(f"加载今日数据失败: {e}")
+            self.logger.error(f"加载时间回放数据失败: {e}")
 
     def _get_tasks(self):
         """获取用于统计的时间块列表。"""
@@ -346,7 +349,7 @@ class TimeReviewWindow(QDialog):
         """加载专注数据"""
         try:
             tasks = self._get_tasks()
-            focus_stats = db.get_today_focus_stats() or {}
+            focus_stats = db.get_focus_stats(start_time, end_time) or {}
             focus_by_block = focus_stats.get('by_block', {})
             total_focus_minutes = focus_stats.get('total_minutes', 0) or 0
 
@@ -406,8 +409,8 @@ class TimeReviewWindow(QDialog):
     def load_activity_data(self, start_time: datetime, end_time: datetime):
         """加载行为数据"""
         try:
-            # 从数据库获取今日行为统计
-            self.activity_data = db.get_today_activity_stats()
+            # 从数据库获取该时间范围的行为统计
+            self.activity_data = db.get_activity_stats(start_time, end_time)
 
             # 如果没有数据，使用默认值
             if not self.activity_data:
@@ -538,8 +541,8 @@ class TimeReviewWindow(QDialog):
 
         # 计算并更新专注时长 (新增)
         try:
-            # 从数据库获取今日活动记录
-            activity_records = db.get_today_activity_records()
+            # 从数据库获取同一时间范围的活动记录(与行为统计共享查询缓存)
+            activity_records = db.get_activity_records(self.range_start, self.range_end)
             if activity_records:
                 focus_stats = calculate_focus_from_activity_log(activity_records)
                 focus_seconds = focus_stats['productive_focus_time']
@@ -0,0 +1,111 @@
+"""
+Config Changes - 配置变更集
+配置窗口与进度条之间以"字段路径 → 新值"的变更集通信,
+进度条在内存中应用变更,不再为每次修改重新读取和解析整个配置文件
+"""
+import copy
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+ConfigPath = Tuple[str, ...]
+
+
+def diff_config(old: Dict, new: Dict, prefix: ConfigPath = ()) -> Dict[ConfigPath, Any]:
+    """
+    比较两份配置,返回发生变化的字段
+
+    嵌套字典逐层比较,列表等其他值整体比较。
+    只报告new中存在的字段: 新配置缺少的键在运行中保留原值,
+    磁盘文件仍以完整写入为准。
+
+    Args:
+        old: 旧配置
+        new: 新配置
+        prefix: 路径前缀(递归使用)
+
+    Returns:
+        {('danmaku', 'speed'): 1.5, ...}
+    """
+    changes: Dict[ConfigPath, Any] = {}
+    for key, value in new.items():
+        path = prefix + (key,)
+        if key not in old:
+            changes[path] = copy.deepcopy(value)
+            continue
+
+        old_value = old[key]
+        if isinstance(value, dict) and isinstance(old_value, dict):
+            changes.update(diff_config(old_value, value, path))
+        elif value != old_value:
+            changes[path] = copy.deepcopy(value)
+    return changes
+
+
+def apply_changes(target: Dict, changes: Dict[ConfigPath, Any]) -> Dict:
+    """
+    将变更集原地应用到配置字典
+
+    Args:
+        target: 要修改的配置
+        changes: diff_config() 的结果
+
+    Returns:
+        target
+    """
+    for path, value in changes.items():
+        node = target
+        for key in path[:-1]:
+            child = node.get(key)
+            if not isinstance(child, dict):
+                child = {}
+                node[key] = child
+            node = child
+        node[path[-1]] = copy.deepcopy(value)
+    return target
+
+
+@dataclass
+class ConfigChangeSet:
+    """
+    一次配置提交(或一次滑块预览)产生的变更
+
+    Attributes:
+        changes: {字段路径: 新值}
+        tasks: 任务列表发生变化时为新的完整列表,否则为None
+        live: True表示实时预览(尚未写入磁盘)
+    """
+    changes: Dict[ConfigPath, Any] = field(default_factory=dict)
+    tasks: Optional[List[Dict]] = None
+    live: bool = False
+
+    @classmethod
+    def between(cls, old_config: Dict, new_config: Dict,
+                old_tasks: Optional[List[Dict]] = None,
+                new_tasks: Optional[List[Dict]] = None,
+                live: bool = False) -> 'ConfigChangeSet':
+        """由新旧两份配置(和任务)计算变更集"""
+        tasks = None
+        if new_tasks is not None and new_tasks != old_tasks:
+            tasks = copy.deepcopy(new_tasks)
+        return cls(diff_config(old_config, new_config), tasks, live)
+
+    def __bool__(self) -> bool:
+        return bool(self.changes) or self.tasks is not None
+
+    def touches(self, *keys: str) -> bool:
+        """是否修改了任一顶层配置项"""
+        return any(path[0] in keys for path in self.changes)
+
+    def only_within(self, paths: Iterable[ConfigPath]) -> bool:
+        """是否所有变更都落在给定的路径(或其子路径)之内,且任务未变"""
+        if self.tasks is not None:
+            return False
+        allowed = tuple(paths)
+        return all(
+            any(path[:len(prefix)] == prefix for prefix in allowed)
+            for path in self.changes
+        )
+
+    def apply_to(self, config: Dict) -> Dict:
+        """将配置变更原地应用到config"""
+        return apply_changes(config, self.changes)
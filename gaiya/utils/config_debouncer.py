@@ -2,12 +2,15 @@
 Config Debouncer - 配置文件防抖动保存工具
 避免频繁的磁盘I/O操作,合并短时间内的多次配置修改
 """
-import json
+import copy
 import logging
+import threading
 from pathlib import Path
 from typing import Dict, Callable, Optional
 from PySide6.QtCore import QTimer
 
+from gaiya.utils.json_store import write_json
+
 logger = logging.getLogger(__name__)
 
 
@@ -20,6 +23,8 @@ class ConfigDebouncer:
     - 启动一个定时器(默认500ms)
     - 如果在定时器触发前又有新的修改,则重置定时器
     - 定时器触发时才真正执行保存操作
+    - 定时器触发的写入在后台线程执行(json_store 原子写入),不阻塞UI;
+      写入进行中到达的新版本会合并,写入结束后只写最新的一份
 
     优势:
     - 减少磁盘I/O次数 60-80%
@@ -54,7 +59,8 @@ class ConfigDebouncer:
         Args:
             config_file: 配置文件路径
             delay_ms: 防抖动延迟时间(毫秒),默认500ms
-            on_save_callback: 保存完成后的回调函数(可选)
+            on_save_callback: 保存完成后的回调函数(可选, 在执行写入的线程中调用,
+                可能是后台写入线程)
         """
         self.config_file = config_file
         self.delay_ms = delay_ms
@@ -66,6 +72,15 @@ class ConfigDebouncer:
         # 防抖动定时器
         self.timer: Optional[QTimer] = None
 
+        # 后台写入: 只保留最新的待写快照,按序号丢弃过期写入
+        self._write_lock = threading.Lock()
+        self._written = threading.Condition(self._write_lock)  # _written_seq 推进时通知 flush()
+        self._state_lock = threading.Lock()
+        self._queued: Optional[tuple] = None
+        self._writer_busy = False
+        self._seq = 0
+        self._written_seq = 0
+
         # 统计信息
         self.debounce_count = 0  # 被防抖动合并的保存次数
         self.actual_save_count = 0  # 实际执行的保存次数
@@ -81,8 +96,8 @@ class ConfigDebouncer:
         Args:
             config: 要保存的配置字典
         """
-        # 更新待保存的配置
-        self.pending_config = config.copy()
+        # 更新待保存的配置(深拷贝: 调用方之后修改嵌套字典不影响待写快照)
+        self.pending_config = copy.deepcopy(config)
         self.debounce_count += 1
 
         # 如果已有定时器在运行,先停止它
@@ -93,7 +108,7 @@ class ConfigDebouncer:
         # 创建或重置定时器
         if not self.timer:
             self.timer = QTimer()
-            self.timer.timeout.connect(self._do_save)
+            self.timer.timeout.connect(self._save_in_background)
             self.timer.setSingleShot(True)  # 只触发一次
 
         # 启动定时器
@@ -117,7 +132,7 @@ class ConfigDebouncer:
             self.timer.stop()
             logger.debug("ConfigDebouncer: 取消防抖动,执行立即保存")
 
-        self.pending_config = config.copy()
+        self.pending_config = copy.deepcopy(config)
         return self._do_save()
 
     def flush(self) -> bool:
@@ -129,34 +144,90 @@ class ConfigDebouncer:
         Returns:
             bool: 是否执行了保存操作
         """
+        saved = False
         if self.timer and self.timer.isActive():
             self.timer.stop()
-            return self._do_save()
-        return False
+            saved = self._do_save()
+
+        # 等待已分配序号的快照全部写完(包括后台线程已取出、尚未开始写入的),
+        # 保证返回时文件已是最新版本
+        with self._state_lock:
+            queued, self._queued = self._queued, None
+            seq_at_flush = self._seq
+        if queued is not None:
+            saved = self._write(*queued) or saved
+        with self._written:
+            self._written.wait_for(lambda: self._written_seq >= seq_at_flush)
+        return saved
+
+    def _take_pending(self) -> Optional[tuple]:
+        """取出待保存配置并分配写入序号"""
+        with self._state_lock:
+            if self.pending_config is None:
+                return None
+            self._seq += 1
+            snapshot = (self._seq, self.pending_config)
+            self.pending_config = None
+            return snapshot
+
+    def _save_in_background(self) -> None:
+        """定时器触发: 把最新快照交给后台写入线程"""
+        snapshot = self._take_pending()
+        if snapshot is None:
+            return
+
+        with self._state_lock:
+            self._queued = snapshot
+            if self._writer_busy:
+                return  # 正在写入的线程结束后会接着写最新快照
+            self._writer_busy = True
+
+        threading.Thread(target=self._writer_loop, name="ConfigWriter", daemon=True).start()
+
+    def _writer_loop(self) -> None:
+        while True:
+            with self._state_lock:
+                snapshot, self._queued = self._queued, None
+                if snapshot is None:
+                    self._writer_busy = False
+                    return
+            self._write(*snapshot)
 
     def _do_save(self) -> bool:
         """
-        实际执行保存操作(内部方法)
+        在当前线程立即保存待处理的配置(内部方法)
 
         Returns:
             bool: 保存是否成功
         """
-        if self.pending_config is None:
+        snapshot = self._take_pending()
+        if snapshot is None:
             logger.warning("ConfigDebouncer: 没有待保存的配置")
             return False
+        return self._write(*snapshot)
 
-        try:
-            # 确保父目录存在
-            self.config_file.parent.mkdir(parents=True, exist_ok=True)
-
-            # 原子性写入(先写临时文件,再重命名)
-            temp_file = self.config_file.with_suffix('.tmp')
-
-            with open(temp_file, 'w', encoding='utf-8') as f:
-                json.dump(self.pending_config, f, indent=4, ensure_ascii=False)
+    def _write(self, seq: int, config) -> bool:
+        """
+        原子性写入一个快照(json_store.write_json)
 
-            # 原子性替换
-            temp_file.replace(self.config_file)
+        序号不大于已写入序号的快照已过期,直接跳过;内容与文件现有内容相同时也跳过。
+        """
+        with self._written:
+            if seq <= self._written_seq:
+                return False
+            try:
+                return self._write_locked(seq, config)
+            finally:
+                # 写入失败也推进序号, flush() 不会一直等待
+                self._written_seq = seq
+                self._written.notify_all()
+
+    def _write_locked(self, seq: int, config) -> bool:
+        try:
+            # 与其他写入方(如 theme_manager、番茄钟面板写 config.json)共用 json_store 的文件锁和内容哈希
+            if not write_json(self.config_file, config, indent=4):
+                logger.debug("ConfigDebouncer: 内容未变化,跳过写入")
+                return True
 
             self.actual_save_count += 1
             saved_count = self.debounce_count - self.actual_save_count + 1
@@ -174,8 +245,6 @@ class ConfigDebouncer:
                 except Exception as callback_error:
                     logger.error(f"ConfigDebouncer: 保存回调执行失败: {callback_error}")
 
-            # 清空待保存配置
-            self.pending_config = None
             return True
 
         except Exception as e:
@@ -4,9 +4,12 @@ Config and task data loading utilities
 import json
 import logging
 from pathlib import Path
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 from . import time_utils, path_utils
+from .json_store import write_json
 from ..core.template_manager import TemplateManager
+from ..core.schedule_manager import ScheduleManager
+from ..core.template_calendar import TemplateCalendar
 
 
 def init_i18n(config: Dict[str, Any], logger: logging.Logger) -> None:
@@ -102,8 +105,7 @@ def load_config(app_dir: Path, logger: logging.Logger) -> Dict[str, Any]:
 
     if not config_file.exists():
         logger.info("config.json 不存在,创建默认配置")
-        with open(config_file, 'w', encoding='utf-8') as f:
-            json.dump(default_config, f, indent=4)
+        write_json(config_file, default_config, indent=4)
         return default_config
 
     try:
@@ -131,6 +133,34 @@ def load_config(app_dir: Path, logger: logging.Logger) -> Dict[str, Any]:
         return default_config
 
 
+def find_template_for_today(app_dir: Path, tm: TemplateManager,
+                            logger: logging.Logger) -> Optional[Dict[str, Any]]:
+    """Look up today's template in the template calendar index
+
+    Only the on-disk index is read (the index is never rebuilt here). When no
+    index covers today, today's entry is resolved on demand with the same
+    rules as the calendar: schedule rules first, then auto-apply conditions.
+
+    Args:
+        app_dir: Application directory (Path object)
+        tm: TemplateManager instance
+        logger: Logger instance
+
+    Returns:
+        Template dict, or None when no template applies today
+    """
+    try:
+        calendar = TemplateCalendar(app_dir, ScheduleManager(app_dir, logger), tm, logger, build=False)
+        day = calendar.lookup()
+        if day is None:
+            day = calendar.get_day()
+    except Exception as e:
+        logger.warning(f"读取模板日历失败: {e}")
+        return tm.get_best_match_template()
+
+    return tm.get_template_by_id(day.template_id) if day.template_id else None
+
+
 def load_tasks(app_dir: Path, logger: logging.Logger) -> List[Dict[str, str]]:
     """Load and validate task data from tasks.json
 
@@ -150,7 +180,7 @@ def load_tasks(app_dir: Path, logger: logging.Logger) -> List[Dict[str, str]]:
         # 尝试使用TemplateManager查找最佳匹配模板
         try:
             tm = TemplateManager(app_dir, logger)
-            best_match = tm.get_best_match_template()
+            best_match = find_template_for_today(app_dir, tm, logger)
 
             if best_match:
                 # 找到匹配的自动应用模板
@@ -162,8 +192,7 @@ def load_tasks(app_dir: Path, logger: logging.Logger) -> List[Dict[str, str]]:
                 template_tasks = tm.load_template_tasks(template_id)
                 if template_tasks:
                     # 保存为 tasks.json
-                    with open(tasks_file, 'w', encoding='utf-8') as f:
-                        json.dump(template_tasks, f, indent=4, ensure_ascii=False)
+                    write_json(tasks_file, template_tasks, indent=4)
                     logger.info(f"✅ 已自动应用模板 {template_name}，包含 {len(template_tasks)} 个任务")
                     return template_tasks
         except Exception as e:
@@ -178,8 +207,7 @@ def load_tasks(app_dir: Path, logger: logging.Logger) -> List[Dict[str, str]]:
                 with open(template_file, 'r', encoding='utf-8') as f:
                     default_tasks = json.load(f)
                 # 保存为 tasks.json(保存到 exe 所在目录)
-                with open(tasks_file, 'w', encoding='utf-8') as f:
-                    json.dump(default_tasks, f, indent=4, ensure_ascii=False)
+                write_json(tasks_file, default_tasks, indent=4)
                 logger.info(f"已从24小时模板加载 {len(default_tasks)} 个任务")
                 return default_tasks
             except Exception as e:
@@ -190,8 +218,7 @@ def load_tasks(app_dir: Path, logger: logging.Logger) -> List[Dict[str, str]]:
         default_tasks = [
             {"start": "09:00", "end": "12:00", "task": "上午工作", "color": "#4CAF50"}
         ]
-        with open(tasks_file, 'w', encoding='utf-8') as f:
-            json.dump(default_tasks, f, indent=4, ensure_ascii=False)
+        write_json(tasks_file, default_tasks, indent=4)
         return default_tasks
 
     try:
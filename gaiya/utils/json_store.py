@@ -0,0 +1,264 @@
+"""
+JSON Store - JSON文件的统一持久化
+
+所有JSON存储(statistics.json、tasks.json、config.json、成就、目标、主题、模板、
+节假日缓存、行为模型等)共用的写入组件:
+- 原子写入: 临时文件 + fsync + os.replace, 崩溃时旧文件保持完整, 不会留下截断的JSON
+- 内容哈希: 与上次写入(或磁盘上已有文件)内容相同时跳过写入
+- 紧凑序列化: 默认不缩进; 安装了 orjson 时用它序列化紧凑文档
+- 写入合并: submit() 把文档交给唯一的后台写入线程, 同一文件在延迟内的多次提交
+  只写最后一份; 进程退出时(atexit)自动刷新
+
+用法:
+    from gaiya.utils.json_store import write_json, get_json_writer
+
+    # 立即写入(用户可编辑/被其他模块监视的文件, 如 tasks.json、config.json)
+    write_json(tasks_file, tasks, indent=4)
+
+    # 合并写入(频繁更新的热数据, 如 statistics.json)
+    get_json_writer().submit(stats_file, statistics)
+"""
+import atexit
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+try:
+    import orjson
+except ImportError:  # 可选依赖
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+PathLike = Union[str, Path]
+
+# 合并写入的默认延迟(秒)
+DEFAULT_WRITE_DELAY = 1.0
+
+
+def dumps(data: Any, indent: Optional[int] = None) -> bytes:
+    """
+    序列化为UTF-8字节
+
+    indent=None 时输出紧凑JSON(优先 orjson), 否则按缩进输出便于手工编辑。
+    """
+    if indent is None:
+        if orjson is not None:
+            try:
+                return orjson.dumps(data)
+            except TypeError:
+                pass  # 非字符串键等 orjson 不支持的结构, 回退标准库
+        return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return json.dumps(data, ensure_ascii=False, indent=indent).encode('utf-8')
+
+
+class _FileState:
+    """单个文件的写入锁与已写入内容的哈希"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.digest: Optional[str] = None
+        self.digest_loaded = False
+
+
+_file_states: Dict[str, _FileState] = {}
+_file_states_lock = threading.Lock()
+
+
+def _state_for(path: Path) -> _FileState:
+    key = os.path.normcase(os.path.abspath(path))
+    with _file_states_lock:
+        state = _file_states.get(key)
+        if state is None:
+            state = _file_states[key] = _FileState()
+        return state
+
+
+def _digest(content: bytes) -> str:
+    return hashlib.sha1(content).hexdigest()
+
+
+def write_bytes_atomic(path: PathLike, content: bytes) -> bool:
+    """
+    原子写入字节内容, 与文件现有内容相同时跳过
+
+    Returns:
+        bool: 是否实际写入了磁盘
+    """
+    path = Path(path)
+    state = _state_for(path)
+    digest = _digest(content)
+
+    with state.lock:
+        if not state.digest_loaded:
+            # 首次写入该文件: 以磁盘上的现有内容为基准, 重启后未变化的文档也不重写
+            try:
+                state.digest = _digest(path.read_bytes())
+            except OSError:
+                state.digest = None
+            state.digest_loaded = True
+
+        if digest == state.digest:
+            return False
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                temp_path.unlink()
+            except OSError:
+                pass
+            raise
+
+        state.digest = digest
+        return True
+
+
+def write_json(path: PathLike, data: Any, indent: Optional[int] = None) -> bool:
+    """
+    立即原子写入JSON文档(内容未变化时跳过)
+
+    如果该文件有尚未写出的合并写入, 会被本次写入取代。
+
+    Returns:
+        bool: 是否实际写入了磁盘
+    """
+    if _writer is not None:
+        _writer.discard(path)
+    return write_bytes_atomic(path, dumps(data, indent))
+
+
+class JsonWriter:
+    """
+    后台合并写入线程(所有存储共用一个)
+
+    submit() 只登记"该文件需要写入", 延迟到期后由后台线程序列化并写出最新的文档;
+    延迟内对同一文件的多次提交只写一次。
+
+    紧凑文档在写入线程中序列化(C编码器执行期间不释放GIL, 与其他线程修改文档互不交错);
+    带缩进的文档走纯Python编码器, 因此在提交时就在调用线程序列化。
+    """
+
+    def __init__(self, delay: float = DEFAULT_WRITE_DELAY):
+        self.delay = delay
+        self._pending: Dict[Path, tuple] = {}  # path -> (due, data, indent, content)
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+
+        # 统计信息
+        self.submit_count = 0
+        self.write_count = 0
+        self.skipped_count = 0
+
+    def submit(self, path: PathLike, data: Any, indent: Optional[int] = None,
+               delay: Optional[float] = None) -> None:
+        """登记一次写入, 延迟(默认 self.delay 秒)后由后台线程写出"""
+        path = Path(path)
+        content = dumps(data, indent) if indent is not None else None
+        with self._cond:
+            if self._closed:
+                # 退出流程中不再排队, 直接写入
+                self._write(path, data, indent, content)
+                return
+            due = time.monotonic() + (self.delay if delay is None else delay)
+            previous = self._pending.get(path)
+            if previous is not None:
+                due = min(due, previous[0])  # 持续提交不会无限推迟写入
+            self._pending[path] = (due, data, indent, content)
+            self.submit_count += 1
+            self._ensure_thread()
+            self._cond.notify()
+
+    def discard(self, path: PathLike) -> None:
+        """丢弃该文件尚未写出的提交"""
+        with self._cond:
+            self._pending.pop(Path(path), None)
+
+    def flush(self, path: Optional[PathLike] = None) -> None:
+        """立即写出待写入的文档(path=None 时写出全部)"""
+        with self._cond:
+            if path is None:
+                items = list(self._pending.items())
+                self._pending.clear()
+            else:
+                path = Path(path)
+                entry = self._pending.pop(path, None)
+                items = [(path, entry)] if entry is not None else []
+        for item_path, (_, data, indent, content) in items:
+            self._write(item_path, data, indent, content)
+
+    def close(self) -> None:
+        """写出全部待写入文档并停止后台线程(之后的提交同步写入)"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self.flush()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def get_stats(self) -> Dict:
+        return {
+            "submitted": self.submit_count,
+            "written": self.write_count,
+            "skipped_unchanged": self.skipped_count,
+            "pending": len(self._pending),
+        }
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="JsonWriter", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._closed:
+                    now = time.monotonic()
+                    ready = [p for p, entry in self._pending.items() if entry[0] <= now]
+                    if ready:
+                        break
+                    timeout = min((entry[0] for entry in self._pending.values()), default=None)
+                    self._cond.wait(None if timeout is None else max(timeout - now, 0))
+                if self._closed:
+                    return
+                batch = [(p, self._pending.pop(p)) for p in ready]
+
+            for path, (_, data, indent, content) in batch:
+                self._write(path, data, indent, content)
+
+    def _write(self, path: Path, data: Any, indent: Optional[int], content: Optional[bytes]) -> None:
+        try:
+            if content is None:
+                content = dumps(data, indent)
+            if write_bytes_atomic(path, content):
+                self.write_count += 1
+            else:
+                self.skipped_count += 1
+        except Exception as e:
+            logger.error(f"JSON写入失败 ({path}): {e}", exc_info=True)
+
+
+_writer: Optional[JsonWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_json_writer() -> JsonWriter:
+    """获取全局合并写入器(首次调用时创建, 进程退出时自动刷新)"""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = JsonWriter()
+            atexit.register(_writer.close)
+        return _writer
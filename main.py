@@ -7,6 +7,7 @@ GaiYa每日进度条 - 桌面时间可视化工具
 import sys
 import json
 import copy
+import contextlib
 import logging
 import platform
 import time
@@ -35,6 +36,7 @@ from gaiya.ui.pomodoro_panel import PomodoroPanel, PomodoroSettingsDialog
 from gaiya.data.db_manager import db
 from gaiya.utils import time_utils, path_utils, data_loader, task_calculator, window_utils
 from gaiya.utils.time_block_utils import generate_time_block_id, legacy_time_block_keys
+from gaiya.utils.json_store import write_json, get_json_writer
 from gaiya.scene import SceneLoader, SceneRenderer, SceneEventManager, ResourceCache, SceneManager
 from gaiya.core.marker_presets import MarkerPresetManager
 from gaiya.core.danmaku_manager import DanmakuManager
@@ -70,6 +72,9 @@ class TimeProgressBar(QWidget):
     # 定义信号：从工作线程触发任务回顾窗口（必须在主线程中显示UI）
     task_review_requested = Signal(str, list)  # (date, unconfirmed_tasks)
 
+    # 维护调度器投递到主线程执行的回调(操作UI线程持有的内存数据)
+    maintenance_requested = Signal(object)
+
     def __init__(self):
         super().__init__()
         self.app_dir = path_utils.get_app_dir()  # Get app directory
@@ -173,6 +178,7 @@ class TimeProgressBar(QWidget):
         self.init_notification_manager()  # 初始化通知管理器
         self.init_statistics_manager()  # 初始化统计管理器
         self.init_task_tracking_system()  # 初始化任务完成追踪系统
+        self.init_maintenance_scheduler()  # 初始化后台维护调度器
         self.init_file_watcher()  # 初始化文件监视器
         self.installEventFilter(self)  # 安装事件过滤器
         self.setMouseTracking(True)  # 启用鼠标追踪
@@ -295,9 +301,7 @@ class TimeProgressBar(QWidget):
             if template_tasks:
                 # 保存任务
                 tasks_file = self.app_dir / 'tasks.json'
-                import json
-                with open(tasks_file, 'w', encoding='utf-8') as f:
-                    json.dump(template_tasks, f, indent=4, ensure_ascii=False)
+                write_json(tasks_file, template_tasks, indent=4)
 
                 # 重新加载任务
                 self.reload_all()
@@ -766,8 +770,7 @@ class TimeProgressBar(QWidget):
         """Persist current configuration to config.json."""
         try:
             config_file = self.app_dir / 'config.json'
-            with open(config_file, 'w', encoding='utf-8') as f:
-                json.dump(self.config, f, indent=4, ensure_ascii=False)
+            write_json(config_file, self.config, indent=4)
             self.logger.info("配置文件已更新")
         except Exception as e:
             self.logger.error(f"保存配置失败: {e}")
@@ -1395,10 +1398,13 @@ class TimeProgressBar(QWidget):
             self.logger.info("开始初始化自动推理引擎...")
             from gaiya.core.auto_inference_engine import AutoInferenceEngine
 
+            from gaiya.core.activity_sampler import get_activity_sampler
+
             self.auto_inference_engine = AutoInferenceEngine(
                 db_manager=db,
                 behavior_analyzer=None,  # 可选,未来可集成
-                interval_minutes=5       # 每5分钟推理一次
+                interval_minutes=5,      # 每5分钟推理一次
+                sampler=get_activity_sampler()  # 与行为追踪共用采样总线
             )
 
             # 连接信号槽
@@ -1412,6 +1418,51 @@ class TimeProgressBar(QWidget):
         except Exception as e:
             self.logger.error(f"任务完成追踪系统初始化异常: {e}", exc_info=True)
 
+    def init_maintenance_scheduler(self):
+        """初始化后台维护调度器(跨天切换、保留期清理、数据库优化、JSON压缩)"""
+        from gaiya.services.maintenance_scheduler import MaintenanceScheduler
+
+        DAY = 24 * 3600
+
+        self.maintenance_requested.connect(lambda callback: callback())
+        scheduler = MaintenanceScheduler(
+            self.app_dir / 'maintenance_state.json',
+            config=self.config.get('maintenance', {}),
+            dispatcher=self.maintenance_requested.emit
+        )
+
+        # 统计记录(UI线程持有)
+        scheduler.add_job('day_rollover', self.statistics_manager.roll_over_day, 60,
+                          require_idle=False, main_thread=True, persist=False)
+        scheduler.add_job('statistics_retention',
+                          lambda: self.statistics_manager.cleanup_old_records(days_to_keep=90),
+                          DAY, main_thread=True)
+
+        # user_data.db
+        scheduler.add_job('activity_retention', lambda: db.cleanup_old_data(
+            self.config.get('activity_tracking', {}).get('data_retention_days', 90)), DAY)
+        scheduler.add_job('task_completion_retention', lambda: db.cleanup_old_task_completions(days=90), DAY)
+        scheduler.add_job('user_db_optimize', db.optimize, 7 * DAY)
+
+        # 行为模型: 清理低质量记录并把变更日志合并为快照
+        if getattr(self, 'behavior_model', None):
+            def compact_behavior_model():
+                self.behavior_model.cleanup_old_data()
+                self.behavior_model.save_model()
+            scheduler.add_job('behavior_model_compaction', compact_behavior_model, DAY, main_thread=True)
+
+        # 行为识别弹幕(activity_log.db 与冷却记录)
+        behavior_manager = getattr(self.danmaku_manager, 'behavior_danmaku_manager', None)
+        if behavior_manager:
+            collector = behavior_manager.activity_collector
+            scheduler.add_job('activity_log_retention', lambda: collector.cleanup_old_data(days_to_keep=30), DAY)
+            scheduler.add_job('activity_log_optimize', collector.optimize, 7 * DAY)
+            scheduler.add_job('cooldown_cleanup', behavior_manager.cooldown_manager.cleanup_old_cooldowns, 3600,
+                              require_idle=False, persist=False)
+
+        self.maintenance_scheduler = scheduler
+        scheduler.start()
+
     def send_test_notification(self):
         """发送测试通知"""
         if hasattr(self, 'notification_manager'):
@@ -1665,42 +1716,45 @@ class TimeProgressBar(QWidget):
             modified_count = 0
             learned_count = 0
 
-            for result in results:
-                completion_id = result['completion_id']
-                new_completion = result['new_completion']
-                is_modified = result['is_modified']
-
-                if is_modified:
-                    # 用户修改了完成度
-                    original_completion = result['original_completion']
+            # 本次回顾产生的所有学习修正作为一个事务写入行为模型
+            behavior_model = getattr(self, 'behavior_model', None)
+            with behavior_model.transaction() if behavior_model else contextlib.nullcontext():
+                for result in results:
+                    completion_id = result['completion_id']
+                    new_completion = result['new_completion']
+                    is_modified = result['is_modified']
+
+                    if is_modified:
+                        # 用户修改了完成度
+                        original_completion = result['original_completion']
+
+                        # 更新数据库
+                        db.confirm_task_completion(
+                            completion_id=completion_id,
+                            new_completion=new_completion,
+                            note=result.get('note', '')
+                        )
 
-                    # 更新数据库
-                    db.confirm_task_completion(
-                        completion_id=completion_id,
-                        new_completion=new_completion,
-                        note=result.get('note', '')
-                    )
+                        modified_count += 1
 
-                    modified_count += 1
+                        # 触发学习反馈
+                        # 获取任务详情用于学习
+                        task_completion = db.get_task_completion(completion_id)
+                        if task_completion:
+                            self._trigger_learning_from_correction(
+                                task_completion,
+                                original_completion,
+                                new_completion
+                            )
+                            learned_count += 1
 
-                    # 触发学习反馈
-                    # 获取任务详情用于学习
-                    task_completion = db.get_task_completion(completion_id)
-                    if task_completion:
-                        self._trigger_learning_from_correction(
-                            task_completion,
-                            original_completion,
-                            new_completion
+                    else:
+                        # 用户未修改,直接确认
+                        db.update_task_completion_confirmation(
+                            completion_id=completion_id,
+                            user_confirmed=True,
+                            user_corrected=False
                         )
-                        learned_count += 1
-
-                else:
-                    # 用户未修改,直接确认
-                    db.update_task_completion_confirmation(
-                        completion_id=completion_id,
-                        user_confirmed=True,
-                        user_corrected=False
-                    )
 
             self.logger.info(
                 f"任务回顾完成: 共 {len(results)} 个任务, "
@@ -1923,20 +1977,20 @@ class TimeProgressBar(QWidget):
                 self.config_window.activateWindow()
                 self.config_window.raise_()
                 # 切换到指定标签页
-                if hasattr(self.config_window, 'tab_widget'):
-                    self.config_window.tab_widget.setCurrentIndex(initial_tab)
+                if hasattr(self.config_window, 'tabs'):
+                    self.config_window.tabs.setCurrentIndex(initial_tab)
                 return
 
             # 创建新窗口（传递主窗口引用以便访问 scene_manager）
             self.config_window = ConfigManager(main_window=self)
-            self.config_window.config_saved.connect(self.reload_all)
+            self.config_window.config_changed.connect(self.apply_config_changes)
             self.config_window.show()
 
             # 切换到指定标签页
-            if hasattr(self.config_window, 'tab_widget'):
+            if hasattr(self.config_window, 'tabs'):
                 from PySide6.QtCore import QTimer
                 # 延迟切换，确保窗口完全显示
-                QTimer.singleShot(100, lambda: self.config_window.tab_widget.setCurrentIndex(initial_tab))
+                QTimer.singleShot(100, lambda: self.config_window.tabs.setCurrentIndex(initial_tab))
 
             self.logger.info(f"配置界面已打开 (标签页={initial_tab})")
 
@@ -1950,8 +2004,51 @@ class TimeProgressBar(QWidget):
                 f"无法打开配置界面:\n{str(e)}\n\n请确保 config_gui.py 文件存在。"
             )
 
-    def reload_all(self):
-        """重载配置和任务"""
+    # 只需重绘即可生效的配置项
+    REPAINT_CONFIG_PATHS = (
+        ('background_color',), ('background_opacity',), ('corner_radius',),
+        ('marker_color',), ('marker_width',), ('marker_x_offset',),
+        ('marker_always_visible',), ('enable_shadow',),
+    )
+    # 需要重新计算窗口几何的配置项
+    GEOMETRY_CONFIG_PATHS = (('bar_height',), ('position',), ('screen_index',), ('marker_y_offset',))
+    # 弹幕参数(启用状态会影响窗口几何,不在此列)
+    DANMAKU_CONFIG_PATHS = tuple(
+        ('danmaku', key) for key in
+        ('frequency', 'speed', 'font_size', 'opacity', 'max_count', 'y_offset', 'color_mode')
+    )
+
+    def apply_config_changes(self, change_set):
+        """在内存中应用配置窗口发送的变更集(不重新读取配置文件)
+
+        Args:
+            change_set: ConfigChangeSet
+        """
+        if not change_set:
+            return
+
+        light_paths = self.REPAINT_CONFIG_PATHS + self.GEOMETRY_CONFIG_PATHS + self.DANMAKU_CONFIG_PATHS
+        if not change_set.only_within(light_paths):
+            # 涉及任务、主题、场景等: 走完整重载,但使用内存中的数据
+            new_config = change_set.apply_to(copy.deepcopy(self.config))
+            self.reload_all(config=new_config, tasks=change_set.tasks)
+            return
+
+        self.logger.debug(f"[配置变更] 轻量应用: {['.'.join(path) for path in change_set.changes]}")
+        change_set.apply_to(self.config)
+        if change_set.touches('danmaku') and hasattr(self, 'danmaku_manager'):
+            self.danmaku_manager.reload_config(self.config)
+        if change_set.touches(*(path[0] for path in self.GEOMETRY_CONFIG_PATHS)):
+            self.setup_geometry()
+        self.update()
+
+    def reload_all(self, config=None, tasks=None):
+        """重载配置和任务
+
+        Args:
+            config: 新配置(None则从文件读取)
+            tasks: 新任务列表(None: 未提供config时从文件读取,否则保持当前任务)
+        """
         self.logger.info("开始重载配置和任务...")
         self.logger.info(f"[reload_all] 当前任务数量: {len(self.tasks)}")
         old_height = self.config.get('bar_height', 20)
@@ -1976,10 +2073,15 @@ class TimeProgressBar(QWidget):
         if hasattr(self, 'danmaku_manager'):
             old_danmaku_enabled = self.danmaku_manager.enabled
 
-        # 重新加载配置和任务
-        self.config = data_loader.load_config(self.app_dir, self.logger)
+        # 重新加载配置和任务(配置窗口的变更集直接提供内存中的数据)
+        if config is None:
+            self.config = data_loader.load_config(self.app_dir, self.logger)
+            self.tasks = data_loader.load_tasks(self.app_dir, self.logger)
+        else:
+            self.config = config
+            if tasks is not None:
+                self.tasks = copy.deepcopy(tasks)
         self.logger.info(f"[reload_all] 加载的配置: 背景色={self.config.get('background_color')}, 透明度={self.config.get('background_opacity')}")
-        self.tasks = data_loader.load_tasks(self.app_dir, self.logger)
         self.logger.info(f"[reload_all] 重新加载后任务数量: {len(self.tasks)}")
         if len(self.tasks) > 0:
             self.logger.info(f"[reload_all] 第一个任务: {self.tasks[0].get('task', 'unknown')}")
@@ -2172,8 +2274,7 @@ class TimeProgressBar(QWidget):
         try:
             # 将临时任务数据写入tasks.json
             tasks_file = self.app_dir / 'tasks.json'
-            with open(tasks_file, 'w', encoding='utf-8') as f:
-                json.dump(self.temp_tasks, f, indent=4, ensure_ascii=False)
+            write_json(tasks_file, self.temp_tasks, indent=4)
 
             # 更新当前任务数据
             self.tasks = copy.deepcopy(self.temp_tasks)
@@ -3797,8 +3898,7 @@ class TimeProgressBar(QWidget):
                 # 保存更新后的任务到文件(使主题持久化)
                 try:
                     tasks_file = self.app_dir / 'tasks.json'
-                    with open(tasks_file, 'w', encoding='utf-8') as f:
-                        json.dump(self.tasks, f, indent=4, ensure_ascii=False)
+                    write_json(tasks_file, self.tasks, indent=4)
                     self.logger.info(f"已应用主题配色到 {len(self.tasks)} 个任务")
                 except Exception as e:
                     self.logger.error(f"保存任务配色失败: {e}")
@@ -3819,8 +3919,7 @@ class TimeProgressBar(QWidget):
                     config_data['background_color'] = new_bg_color
                     config_data['background_opacity'] = new_opacity
 
-                with open(config_file, 'w', encoding='utf-8') as f:
-                    json.dump(config_data, f, indent=4, ensure_ascii=False)
+                write_json(config_file, config_data, indent=4)
             except Exception as e:
                 self.logger.error(f"保存主题配置失败: {e}")
 
@@ -3893,6 +3992,13 @@ class TimeProgressBar(QWidget):
         # 停止行为追踪服务
         self.stop_activity_tracker()
 
+        # 停止后台维护调度器
+        if hasattr(self, 'maintenance_scheduler') and self.maintenance_scheduler:
+            try:
+                self.maintenance_scheduler.stop()
+            except Exception as e:
+                self.logger.warning(f"停止维护调度器时出错: {e}")
+
         # 停止任务完成推理调度器
         if hasattr(self, 'task_completion_scheduler') and self.task_completion_scheduler:
             try:
@@ -3901,6 +4007,14 @@ class TimeProgressBar(QWidget):
             except Exception as e:
                 self.logger.warning(f"停止调度器时出错: {e}")
 
+        # 写出尚未落盘的JSON存储(统计数据的延迟保存、后台写入线程中的待写文档)
+        try:
+            if hasattr(self, 'statistics_manager') and self.statistics_manager:
+                self.statistics_manager.flush()
+            get_json_writer().flush()
+        except Exception as e:
+            self.logger.warning(f"写出待保存数据时出错: {e}")
+
         # 接受关闭事件
         event.accept()
         self.logger.info("时间进度条已关闭，资源已清理")
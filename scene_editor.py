@@ -29,13 +29,16 @@ from PySide6.QtWidgets import (
 )
 from PySide6.QtCore import Qt, QPointF, QRectF, QLineF, QSize, Signal, QTimer, QEvent
 from PySide6.QtGui import (
-    QPixmap, QIcon, QPainter, QColor, QPen, QBrush, QAction, QKeySequence,
+    QPixmap, QIcon, QImage, QPainter, QColor, QPen, QBrush, QAction, QKeySequence,
     QUndoStack, QUndoCommand
 )
 
 # 添加i18n支持
 from i18n.translator import tr
 
+from gaiya.scene.thumbnail_service import ThumbnailService
+from gaiya.utils.path_utils import get_app_dir
+
 
 # ============================================================================
 # 事件配置数据类
@@ -1300,49 +1303,87 @@ class MiniMapWidget(QWidget):
         palette.setColor(self.backgroundRole(), QColor(240, 240, 240))
         self.setPalette(palette)
 
+        # 静态层缓存（场景底图+边框），仅在尺寸或场景范围变化时重绘
+        self._static_layer: Optional[QPixmap] = None
+        self._static_layer_key: Optional[tuple] = None
+
         # 监听画布视图变化
         if self.canvas:
             # 连接画布的滚动条信号
             self.canvas.horizontalScrollBar().valueChanged.connect(self.update)
             self.canvas.verticalScrollBar().valueChanged.connect(self.update)
 
-    def paintEvent(self, event):
-        """绘制小地图"""
-        super().paintEvent(event)
-
-        if not self.canvas:
-            return
-
-        painter = QPainter(self)
-        painter.setRenderHint(QPainter.Antialiasing)
+    def _thumb_geometry(self):
+        """计算缩略图的缩放比例和位置（保持宽高比，居中显示）
 
-        # 获取场景尺寸
+        Returns:
+            (scene_rect, scale, thumb_x, thumb_y, thumb_width, thumb_height)，场景为空时返回None
+        """
         scene_rect = self.canvas.sceneRect()
         scene_width = scene_rect.width()
         scene_height = scene_rect.height()
 
         if scene_width == 0 or scene_height == 0:
-            return
+            return None
 
-        # 计算缩放比例（保持宽高比）
         widget_width = self.width()
         widget_height = self.height()
 
-        scale_x = widget_width / scene_width
-        scale_y = widget_height / scene_height
-        scale = min(scale_x, scale_y)
+        scale = min(widget_width / scene_width, widget_height / scene_height)
 
-        # 计算缩略图尺寸和位置（居中显示）
         thumb_width = scene_width * scale
         thumb_height = scene_height * scale
         thumb_x = (widget_width - thumb_width) / 2
         thumb_y = (widget_height - thumb_height) / 2
+        return scene_rect, scale, thumb_x, thumb_y, thumb_width, thumb_height
+
+    def _get_static_layer(self, geometry) -> QPixmap:
+        """获取缓存的静态层，尺寸或场景范围变化时重新绘制"""
+        scene_rect, _, thumb_x, thumb_y, thumb_width, thumb_height = geometry
+        key = (self.width(), self.height(), scene_rect.x(), scene_rect.y(),
+               scene_rect.width(), scene_rect.height(), self.devicePixelRatioF())
+        if self._static_layer is not None and self._static_layer_key == key:
+            return self._static_layer
+
+        ratio = self.devicePixelRatioF()
+        layer = QPixmap(int(self.width() * ratio), int(self.height() * ratio))
+        layer.setDevicePixelRatio(ratio)
+        layer.fill(Qt.transparent)
+
+        painter = QPainter(layer)
+        painter.setRenderHint(QPainter.Antialiasing)
 
         # 绘制场景缩略图背景
         painter.setBrush(QBrush(QColor(255, 255, 255)))
         painter.setPen(QPen(QColor(200, 200, 200), 1))
         painter.drawRect(int(thumb_x), int(thumb_y), int(thumb_width), int(thumb_height))
 
+        # 绘制边框
+        painter.setPen(QPen(QColor(180, 180, 180), 1))
+        painter.setBrush(Qt.NoBrush)
+        painter.drawRect(0, 0, self.width() - 1, self.height() - 1)
+        painter.end()
+
+        self._static_layer = layer
+        self._static_layer_key = key
+        return layer
+
+    def paintEvent(self, event):
+        """绘制小地图（静态层取缓存，每次只绘制可视区域矩形）"""
+        super().paintEvent(event)
+
+        if not self.canvas:
+            return
+
+        geometry = self._thumb_geometry()
+        if geometry is None:
+            return
+        scene_rect, scale, thumb_x, thumb_y, _, _ = geometry
+
+        painter = QPainter(self)
+        painter.drawPixmap(0, 0, self._get_static_layer(geometry))
+        painter.setRenderHint(QPainter.Antialiasing)
+
         # 绘制可视区域矩形
         # 获取当前视图的可见区域（场景坐标）
         visible_rect = self.canvas.mapToScene(self.canvas.viewport().rect()).boundingRect()
@@ -1358,34 +1399,15 @@ class MiniMapWidget(QWidget):
         painter.setPen(QPen(QColor(50, 100, 200), 2))
         painter.drawRect(int(view_x), int(view_y), int(view_w), int(view_h))
 
-        # 绘制边框
-        painter.setPen(QPen(QColor(180, 180, 180), 1))
-        painter.setBrush(Qt.NoBrush)
-        painter.drawRect(0, 0, widget_width - 1, widget_height - 1)
-
     def mousePressEvent(self, event):
         """点击小地图跳转到对应位置"""
         if not self.canvas or event.button() != Qt.LeftButton:
             return
 
-        # 获取场景尺寸
-        scene_rect = self.canvas.sceneRect()
-        scene_width = scene_rect.width()
-        scene_height = scene_rect.height()
-
-        # 计算缩放比例
-        widget_width = self.width()
-        widget_height = self.height()
-
-        scale_x = widget_width / scene_width
-        scale_y = widget_height / scene_height
-        scale = min(scale_x, scale_y)
-
-        # 计算缩略图位置
-        thumb_width = scene_width * scale
-        thumb_height = scene_height * scale
-        thumb_x = (widget_width - thumb_width) / 2
-        thumb_y = (widget_height - thumb_height) / 2
+        geometry = self._thumb_geometry()
+        if geometry is None:
+            return
+        scene_rect, scale, thumb_x, thumb_y, _, _ = geometry
 
         # 将点击位置转换为场景坐标
         click_x = event.pos().x()
@@ -1401,6 +1423,12 @@ class MiniMapWidget(QWidget):
 class AssetLibraryPanel(QWidget):
     """素材库面板"""
 
+    # 列表缩略图尺寸
+    THUMBNAIL_SIZE = 48
+
+    # 每个事件循环周期插入的素材数量
+    ASSET_BATCH_SIZE = 200
+
     def __init__(self, parent=None):
         super().__init__(parent)
 
@@ -1416,7 +1444,7 @@ class AssetLibraryPanel(QWidget):
         road_group = QGroupBox(tr("scene_editor.asset_library.road_group"))
         road_layout = QVBoxLayout(road_group)
         self.road_list = QListWidget()
-        self.road_list.setIconSize(QSize(48, 48))  # 缩小缩略图尺寸，节省空间
+        self.road_list.setIconSize(QSize(self.THUMBNAIL_SIZE, self.THUMBNAIL_SIZE))  # 缩小缩略图尺寸，节省空间
         road_layout.addWidget(self.road_list)
         # 道路层上传按钮
         road_upload_btn = QPushButton(tr("scene_editor.asset_library.road_upload"))
@@ -1432,7 +1460,7 @@ class AssetLibraryPanel(QWidget):
         scene_group = QGroupBox(tr("scene_editor.asset_library.scene_group"))
         scene_layout = QVBoxLayout(scene_group)
         self.scene_list = QListWidget()
-        self.scene_list.setIconSize(QSize(48, 48))  # 缩小缩略图尺寸，节省空间
+        self.scene_list.setIconSize(QSize(self.THUMBNAIL_SIZE, self.THUMBNAIL_SIZE))  # 缩小缩略图尺寸，节省空间
         scene_layout.addWidget(self.scene_list)
         # 场景层上传按钮
         scene_upload_btn = QPushButton(tr("scene_editor.asset_library.scene_upload"))
@@ -1458,15 +1486,34 @@ class AssetLibraryPanel(QWidget):
         self.road_list.setDragDropMode(QListWidget.DragOnly)
         self.scene_list.setDragDropMode(QListWidget.DragOnly)
 
+        # 后台缩略图服务（磁盘缓存位于 <app_dir>/cache/thumbnails）
+        self.thumbnail_service = ThumbnailService(
+            get_app_dir() / "cache" / "thumbnails",
+            size=self.THUMBNAIL_SIZE,
+            parent=self
+        )
+        self.thumbnail_service.thumbnail_ready.connect(self._on_thumbnail_ready)
+        self.thumbnail_service.thumbnail_failed.connect(self._on_thumbnail_failed)
+
+        # 缩略图生成前使用的占位图标
+        placeholder = QPixmap(self.THUMBNAIL_SIZE, self.THUMBNAIL_SIZE)
+        placeholder.fill(QColor(230, 230, 230))
+        self._placeholder_icon = QIcon(placeholder)
+
+        # 文件路径 -> 等待缩略图的列表项
+        self._items_by_path: Dict[str, List[QListWidgetItem]] = {}
+
+        # 待插入的素材队列 [(类型, 文件路径)]
+        self._asset_queue: List[tuple] = []
+
         # 加载默认素材
         self.load_default_assets()
 
     def load_default_assets(self):
-        """加载默认素材库（scenes/default/assets/目录）"""
-        import os
-        import sys
-        from pathlib import Path
+        """加载默认素材库（scenes/default/assets/目录）
 
+        列表项立即以占位图标插入，缩略图由ThumbnailService在后台生成后逐个填充
+        """
         # 确定默认素材路径（支持开发环境和打包环境）
         if getattr(sys, 'frozen', False):
             # PyInstaller 打包环境：资源在 _MEIPASS 临时目录
@@ -1483,22 +1530,29 @@ class AssetLibraryPanel(QWidget):
             return
 
         # 加载所有PNG图片
-        asset_files = list(default_assets_dir.glob("*.png"))
+        asset_files = sorted(default_assets_dir.glob("*.png"))
         logging.info(f"[素材库] 找到 {len(asset_files)} 个PNG素材文件")
 
+        # 根据文件名判断是道路层还是场景层
+        # 道路层通常包含 "road" 关键词
         for asset_file in asset_files:
-            file_path = str(asset_file)
+            kind = "road" if "road" in asset_file.name.lower() else "scene"
+            self._asset_queue.append((kind, str(asset_file)))
+        self._drain_asset_queue()
 
-            # 根据文件名判断是道路层还是场景层
-            # 道路层通常包含 "road" 关键词
-            if "road" in asset_file.name.lower():
-                self.add_road_asset(file_path)
-                logging.debug(f"[素材库] 添加道路层素材: {asset_file.name}")
-            else:
-                self.add_scene_asset(file_path)
-                logging.debug(f"[素材库] 添加场景层素材: {asset_file.name}")
+    def _drain_asset_queue(self):
+        """分批插入排队的素材，每批之后让出事件循环，保证大量素材时界面可交互"""
+        batch = self._asset_queue[:self.ASSET_BATCH_SIZE]
+        del self._asset_queue[:self.ASSET_BATCH_SIZE]
 
-        logging.info(f"[素材库] 素材加载完成！道路层: {self.road_list.count()} 个，场景层: {self.scene_list.count()} 个")
+        for kind, file_path in batch:
+            target_list = self.road_list if kind == "road" else self.scene_list
+            self._add_asset_item(target_list, file_path)
+
+        if self._asset_queue:
+            QTimer.singleShot(0, self._drain_asset_queue)
+        elif batch:
+            logging.info(f"[素材库] 素材列表已填充！道路层: {self.road_list.count()} 个，场景层: {self.scene_list.count()} 个")
 
     def import_road_asset(self):
         """导入道路层素材"""
@@ -1509,8 +1563,8 @@ class AssetLibraryPanel(QWidget):
             tr("scene_editor.asset_library.file_filter_png")
         )
 
-        for file_path in file_paths:
-            self.add_road_asset(file_path)
+        self._asset_queue.extend(("road", file_path) for file_path in file_paths)
+        self._drain_asset_queue()
 
     def import_scene_asset(self):
         """导入场景层素材"""
@@ -1521,30 +1575,38 @@ class AssetLibraryPanel(QWidget):
             tr("scene_editor.asset_library.file_filter_png")
         )
 
-        for file_path in file_paths:
-            self.add_scene_asset(file_path)
+        self._asset_queue.extend(("scene", file_path) for file_path in file_paths)
+        self._drain_asset_queue()
 
     def add_road_asset(self, file_path: str):
         """添加道路层素材"""
-        pixmap = QPixmap(file_path)
-        if pixmap.isNull():
-            return
-
-        # 创建列表项
-        item = QListWidgetItem(QIcon(pixmap), os.path.basename(file_path))
-        item.setData(Qt.UserRole, file_path)
-        self.road_list.addItem(item)
+        self._add_asset_item(self.road_list, file_path)
 
     def add_scene_asset(self, file_path: str):
         """添加场景层素材"""
-        pixmap = QPixmap(file_path)
-        if pixmap.isNull():
-            return
+        self._add_asset_item(self.scene_list, file_path)
 
-        # 创建列表项
-        item = QListWidgetItem(QIcon(pixmap), os.path.basename(file_path))
+    def _add_asset_item(self, target_list: QListWidget, file_path: str):
+        """插入占位列表项并请求后台生成缩略图"""
+        item = QListWidgetItem(self._placeholder_icon, os.path.basename(file_path))
         item.setData(Qt.UserRole, file_path)
-        self.scene_list.addItem(item)
+        target_list.addItem(item)
+
+        self._items_by_path.setdefault(file_path, []).append(item)
+        self.thumbnail_service.request(file_path)
+
+    def _on_thumbnail_ready(self, file_path: str, image: QImage):
+        """缩略图就绪，更新所有使用该素材的列表项"""
+        icon = QIcon(QPixmap.fromImage(image))
+        for item in self._items_by_path.pop(file_path, []):
+            item.setIcon(icon)
+
+    def _on_thumbnail_failed(self, file_path: str):
+        """素材无法解码，移除对应列表项（与原先跳过无效图片的行为一致）"""
+        for item in self._items_by_path.pop(file_path, []):
+            target_list = item.listWidget()
+            if target_list is not None:
+                target_list.takeItem(target_list.row(item))
 
     def load_selected_road(self):
         """将选中的道路图片设为道路层背景"""
@@ -3837,6 +3899,7 @@ class SceneEditorWindow(QMainWindow):
 
     def closeEvent(self, event):
         """窗口关闭事件 - 发出信号通知父窗口"""
+        self.asset_panel.thumbnail_service.shutdown()
         self.editor_closed.emit()
         super().closeEvent(event)
 
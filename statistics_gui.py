@@ -9,7 +9,7 @@ from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel,
                                QMessageBox, QFileDialog, QProgressBar, QDialog,
                                QSpinBox, QComboBox, QDialogButtonBox, QFormLayout,
                                QGridLayout)
-from PySide6.QtCore import Qt, Signal, Q_ARG, Slot, QDateTime, QPropertyAnimation, QEasingCurve, QTimer
+from PySide6.QtCore import Qt, Signal, Q_ARG, Slot, QDateTime, QPointF, QPropertyAnimation, QEasingCurve, QTimer
 from PySide6.QtGui import QColor, QFont, QPainter, QPen, QIcon
 from PySide6.QtWidgets import QGraphicsDropShadowEffect, QFrame
 from PySide6.QtCharts import QChart, QChartView, QLineSeries, QValueAxis, QDateTimeAxis, QPieSeries, QPieSlice
@@ -926,7 +926,21 @@ class StatisticsWindow(QWidget):
         return []
 
     def _get_most_active_period(self, tasks: list) -> str:
-        """获取最活跃时段"""
+        """获取最活跃时段
+
+        优先使用今日活动的小时统计(跨小时的会话已按小时拆分),
+        没有活动记录时按推理任务的开始时间估算。
+        """
+        try:
+            hourly = db.get_hourly_activity(*db.today_range())["total"]
+        except Exception as e:
+            self.logger.warning(f"读取小时活动统计失败: {e}")
+            hourly = []
+
+        if any(hourly):
+            max_hour = max(range(24), key=hourly.__getitem__)
+            return f"{max_hour:02d}:00-{max_hour+1:02d}:00"
+
         if not tasks:
             return "--"
 
@@ -1406,6 +1420,9 @@ class StatisticsWindow(QWidget):
         weekly_summary_layout.addLayout(cards_layout)
         content_layout.addWidget(weekly_summary_group)
 
+        # 图表和洞察共用的分析数据(含上一周, 用于7日均线和环比)
+        analytics = self.stats_manager.get_analytics(days=14)
+
         # 任务完成率趋势图
         chart_group = QGroupBox("📈 完成率趋势")
         chart_group.setStyleSheet("QGroupBox::title { color: #666666; font-weight: bold; font-size: 14px; }")
@@ -1413,7 +1430,7 @@ class StatisticsWindow(QWidget):
         chart_layout.setContentsMargins(10, 10, 10, 10)
 
         # 创建并添加折线图
-        trend_chart = self.create_completion_trend_chart()
+        trend_chart = self.create_completion_trend_chart(analytics)
         chart_layout.addWidget(trend_chart)
 
         content_layout.addWidget(chart_group)
@@ -1425,7 +1442,7 @@ class StatisticsWindow(QWidget):
         pie_chart_layout.setContentsMargins(10, 10, 10, 10)
 
         # 创建并添加饼图
-        category_pie_chart = self.create_category_pie_chart()
+        category_pie_chart = self.create_category_pie_chart(analytics.tail(7))
         pie_chart_layout.addWidget(category_pie_chart)
 
         content_layout.addWidget(pie_chart_group)
@@ -1437,7 +1454,7 @@ class StatisticsWindow(QWidget):
         insights_layout.setContentsMargins(10, 10, 10, 10)
 
         # 创建并添加洞察报告
-        insights_widget = self.create_insights_widget()
+        insights_widget = self.create_insights_widget(analytics)
         insights_layout.addWidget(insights_widget)
 
         content_layout.addWidget(insights_group)
@@ -2296,9 +2313,9 @@ class StatisticsWindow(QWidget):
             self.trigger_inference_button.setText("🔄 手动生成推理")
 
     def trigger_ai_analysis(self):
-        """触发AI深度分析"""
+        """触发AI深度分析(后台流式调用, 结果在主线程显示)"""
         from datetime import date
-        import threading
+        from gaiya.core.async_worker import AsyncNetworkWorker
 
         today = date.today().isoformat()
 
@@ -2315,77 +2332,15 @@ class StatisticsWindow(QWidget):
                 )
                 return
 
-            # 禁用按钮
-            self.ai_analysis_button.setEnabled(False)
-            self.ai_analysis_button.setText("🤖 分析中...")
-
-            # 在后台线程调用AI
-            def run_analysis():
-                try:
-                    from ai_client import GaiyaAIClient
-
-                    self.logger.info(f"[AI分析] 开始分析: {today}, {len(task_completions)}个任务")
-
-                    # 获取或创建AI客户端
-                    ai_client = None
-
-                    # 尝试从主窗口获取
-                    main_window = self.parent()
-                    if hasattr(main_window, 'ai_client') and main_window.ai_client:
-                        ai_client = main_window.ai_client
-                        self.logger.info("[AI分析] 使用主窗口的AI客户端")
-                    else:
-                        # 创建新的AI客户端实例
-                        self.logger.info("[AI分析] 创建新的AI客户端")
-                        ai_client = GaiyaAIClient()
-
-                    if not ai_client:
-                        QMessageBox.warning(
-                            self,
-                            "错误",
-                            "AI客户端初始化失败"
-                        )
-                        self.ai_analysis_button.setEnabled(True)
-                        self.ai_analysis_button.setText("🤖 AI深度分析")
-                        return
-
-                    # 调用AI分析
-                    analysis_text = ai_client.analyze_task_completion(
-                        date=today,
-                        task_completions=task_completions,
-                        parent_widget=self
-                    )
-
-                    if analysis_text:
-                        self.logger.info(f"[AI分析] 分析成功")
-                        # 在主线程显示分析结果
-                        from PySide6.QtCore import QMetaObject, Q_ARG
-                        QMetaObject.invokeMethod(
-                            self,
-                            "_show_ai_analysis_result",
-                            Qt.QueuedConnection,
-                            Q_ARG(str, today),
-                            Q_ARG(str, analysis_text)
-                        )
-                    else:
-                        self.logger.warning(f"[AI分析] 分析失败或被取消")
-
-                    # 恢复按钮状态
-                    self.ai_analysis_button.setEnabled(True)
-                    self.ai_analysis_button.setText("🤖 AI深度分析")
-
-                except Exception as e:
-                    self.logger.error(f"[AI分析] 执行失败: {e}", exc_info=True)
-                    QMessageBox.warning(
-                        self,
-                        "错误",
-                        f"AI分析失败:\n{str(e)}"
-                    )
-                    self.ai_analysis_button.setEnabled(True)
-                    self.ai_analysis_button.setText("🤖 AI深度分析")
-
-            # 启动后台线程
-            threading.Thread(target=run_analysis, daemon=True).start()
+            # 获取或创建AI客户端
+            main_window = self.parent()
+            if hasattr(main_window, 'ai_client') and main_window.ai_client:
+                ai_client = main_window.ai_client
+                self.logger.info("[AI分析] 使用主窗口的AI客户端")
+            else:
+                from ai_client import GaiyaAIClient
+                self.logger.info("[AI分析] 创建新的AI客户端")
+                ai_client = GaiyaAIClient()
 
         except Exception as e:
             self.logger.error(f"触发AI分析失败: {e}", exc_info=True)
@@ -2394,8 +2349,52 @@ class StatisticsWindow(QWidget):
                 "错误",
                 f"触发AI分析失败:\n{str(e)}"
             )
-            self.ai_analysis_button.setEnabled(True)
-            self.ai_analysis_button.setText("🤖 AI深度分析")
+            return
+
+        # 禁用按钮
+        self.ai_analysis_button.setEnabled(False)
+        self.ai_analysis_button.setText("🤖 分析中...")
+
+        self.logger.info(f"[AI分析] 开始分析: {today}, {len(task_completions)}个任务")
+
+        # 在后台线程以流式模式调用AI, 信号在主线程处理
+        self._ai_analysis_worker = AsyncNetworkWorker.streaming(
+            ai_client.analyze_task_completion,
+            date=today,
+            task_completions=task_completions
+        )
+        self._ai_analysis_worker.partial.connect(self._on_ai_analysis_partial)
+        self._ai_analysis_worker.success.connect(lambda result: self._on_ai_analysis_success(today, result))
+        self._ai_analysis_worker.error.connect(self._on_ai_analysis_error)
+        self._ai_analysis_worker.finished.connect(self._on_ai_analysis_finished)
+        self._ai_analysis_worker.start()
+
+    def _on_ai_analysis_partial(self, partial: dict):
+        """流式片段到达: 在按钮上显示已接收的字数"""
+        self.ai_analysis_button.setText(f"🤖 分析中... ({len(partial.get('text', ''))}字)")
+
+    def _on_ai_analysis_success(self, today: str, result: dict):
+        analysis_text = result.get("data")
+        if analysis_text:
+            self.logger.info("[AI分析] 分析成功")
+            self._show_ai_analysis_result(today, analysis_text)
+        else:
+            self.logger.warning("[AI分析] 分析失败或被取消")
+
+    def _on_ai_analysis_error(self, error_msg: str):
+        self.logger.error(f"[AI分析] 执行失败: {error_msg}")
+        QMessageBox.warning(
+            self,
+            "错误",
+            f"AI分析失败:\n{error_msg}"
+        )
+
+    def _on_ai_analysis_finished(self):
+        """恢复按钮状态"""
+        self._ai_analysis_worker.deleteLater()
+        self._ai_analysis_worker = None
+        self.ai_analysis_button.setEnabled(True)
+        self.ai_analysis_button.setText("🤖 AI深度分析")
 
     @Slot(str, str)
     def _show_ai_analysis_result(self, date: str, analysis_text: str):
@@ -2488,32 +2487,40 @@ class StatisticsWindow(QWidget):
                 f"请检查日志文件获取详细错误信息。"
             )
 
-    def create_completion_trend_chart(self) -> QChartView:
-        """创建任务完成率趋势折线图(最近7天)
+    def create_completion_trend_chart(self, analytics=None, days: int = 7) -> QChartView:
+        """创建任务完成率趋势折线图(最近N天,附7日滚动平均)
+
+        Args:
+            analytics: StatsFrame, 默认按 days 构建; 覆盖天数超过 days 时
+                多出的前段只用于让滚动平均从第一天起就有完整窗口
+            days: 图表显示的天数
 
         Returns:
             QChartView: 图表视图组件
         """
-        # 获取最近7天的趋势数据
-        trend_data = self.stats_manager.get_weekly_trend(days=7)
+        if analytics is None:
+            analytics = self.stats_manager.get_analytics(days=days * 2)
+        rolling = analytics.rolling_mean('completion_rate', window=7)[-days:]
+        frame = analytics.tail(days)
+
+        # 将日期字符串转换为 QDateTime 时间戳(本地时区,与日期轴一致)
+        timestamps = [QDateTime.fromString(day, "yyyy-MM-dd").toMSecsSinceEpoch()
+                      for day in frame.date_strings()]
 
-        # 创建折线系列
+        # 创建折线系列(批量替换数据点,长周期视图也只触发一次重绘)
         series = QLineSeries()
         series.setName("任务完成率")
+        series.replace([QPointF(t, v) for t, v in zip(timestamps, frame.column('completion_rate').tolist())])
 
-        # 添加数据点
-        for day_stat in trend_data:
-            # 将日期字符串转换为 QDateTime
-            date_time = QDateTime.fromString(day_stat['date'], "yyyy-MM-dd")
-            timestamp = date_time.toMSecsSinceEpoch()
-            completion_rate = day_stat['completion_rate']
-
-            series.append(timestamp, completion_rate)
+        average_series = QLineSeries()
+        average_series.setName("7日平均")
+        average_series.replace([QPointF(t, v) for t, v in zip(timestamps, rolling.tolist())])
 
         # 创建图表
         chart = QChart()
         chart.addSeries(series)
-        chart.setTitle("📈 任务完成率趋势 (最近7天)")
+        chart.addSeries(average_series)
+        chart.setTitle(f"📈 任务完成率趋势 (最近{days}天)")
         chart.setAnimationOptions(QChart.AnimationOption.SeriesAnimations)
 
         # 设置图表样式
@@ -2527,6 +2534,7 @@ class StatisticsWindow(QWidget):
         axis_x.setLabelsFont(QFont("Microsoft YaHei", LightTheme.FONT_SMALL))
         chart.addAxis(axis_x, Qt.AlignmentFlag.AlignBottom)
         series.attachAxis(axis_x)
+        average_series.attachAxis(axis_x)
 
         # Y轴: 百分比
         axis_y = QValueAxis()
@@ -2536,12 +2544,18 @@ class StatisticsWindow(QWidget):
         axis_y.setTickCount(6)  # 0, 20, 40, 60, 80, 100
         chart.addAxis(axis_y, Qt.AlignmentFlag.AlignLeft)
         series.attachAxis(axis_y)
+        average_series.attachAxis(axis_y)
 
         # 设置系列颜色
         pen = QPen(QColor(LightTheme.ACCENT_GREEN))
         pen.setWidth(3)
         series.setPen(pen)
 
+        average_pen = QPen(QColor(LightTheme.ACCENT_BLUE))
+        average_pen.setWidth(2)
+        average_pen.setStyle(Qt.PenStyle.DashLine)
+        average_series.setPen(average_pen)
+
         # 创建视图
         chart_view = QChartView(chart)
         chart_view.setRenderHint(QPainter.RenderHint.Antialiasing)
@@ -2556,14 +2570,17 @@ class StatisticsWindow(QWidget):
 
         return chart_view
 
-    def create_category_pie_chart(self) -> QChartView:
+    def create_category_pie_chart(self, analytics=None) -> QChartView:
         """创建任务颜色分布饼图(本周)
 
+        Args:
+            analytics: 最近7天的 StatsFrame, 默认由统计管理器构建
+
         Returns:
             QChartView: 饼图视图组件
         """
         # 获取本周任务颜色分布数据
-        color_distribution = self.stats_manager.get_task_color_distribution(date_range="week")
+        color_distribution = self.stats_manager.get_task_color_distribution(date_range="week", analytics=analytics)
 
         # 如果没有数据,显示空图表
         if not color_distribution or len(color_distribution) == 0:
@@ -2655,8 +2672,12 @@ class StatisticsWindow(QWidget):
         window_rect.moveCenter(center_point)
         self.move(window_rect.topLeft())
 
-    def create_insights_widget(self) -> QWidget:
-        """创建智能洞察组件 (Sprint 3 - Task 3.2)"""
+    def create_insights_widget(self, analytics=None) -> QWidget:
+        """创建智能洞察组件 (Sprint 3 - Task 3.2)
+
+        Args:
+            analytics: 覆盖最近14天的 StatsFrame(与趋势图共用), 默认由洞察生成器构建
+        """
         container = QWidget()
         layout = QVBoxLayout(container)
         layout.setContentsMargins(0, 0, 0, 0)
@@ -2664,7 +2685,7 @@ class StatisticsWindow(QWidget):
 
         try:
             # 生成洞察报告
-            insights = self.insights_generator.generate_weekly_insights(days=7)
+            insights = self.insights_generator.generate_weekly_insights(days=7, history=analytics)
 
             # 1. 总体摘要卡片
             summary_card = self._create_insights_summary_card(insights)
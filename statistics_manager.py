@@ -8,8 +8,24 @@ import logging
 from pathlib import Path
 from datetime import datetime, date, timedelta
 from typing import Dict, List, Optional
-from collections import defaultdict
 from gaiya.data.db_manager import db
+from gaiya.core.rule_engine import compile_keyword_table
+from gaiya.core.stats_analytics import StatsFrame
+from gaiya.utils.json_store import get_json_writer
+
+
+# 任务分类关键词(按优先级排列，先匹配的分类优先)
+TASK_CATEGORY_KEYWORDS = {
+    '工作': ['工作', '会议', '开发', '项目', '讨论', '设计', '编程', '代码', '测试', '部署', '早会'],
+    '学习': ['学习', '阅读', '课程', '培训', '研究', '充电', '看书', '教程'],
+    '运动': ['健身', '运动', '跑步', '游泳', '瑜伽', '锻炼', '散步', '球类', '体育'],
+    '饮食': ['早餐', '午餐', '晚餐', '吃饭', '用餐', '饮食', '做饭', '烹饪'],
+    '休息': ['睡眠', '休息', '午休', '小憩', '放松', '打盹', '睡觉'],
+    '娱乐': ['娱乐', '游戏', '电影', '追剧', '看剧', '综艺', '音乐', '唱歌', 'ktv'],
+    '通勤': ['通勤', '上班', '下班', '路上', '交通', '地铁', '公交', '开车'],
+}
+
+_task_category_matcher = compile_keyword_table(TASK_CATEGORY_KEYWORDS)
 
 
 class StatisticsManager:
@@ -35,8 +51,8 @@ class StatisticsManager:
         # 确保今天的记录存在
         self._ensure_today_record()
 
-        # 自动清理90天前的旧记录（防止statistics.json无限增长）
-        self.cleanup_old_records(days_to_keep=90)
+        # 90天前的旧记录由后台维护调度器清理(见 gaiya/services/maintenance_scheduler.py),
+        # 启动时不再执行
 
         # ✅ 性能优化: 延迟写入机制
         self._pending_save = False  # 标记是否有待保存的数据
@@ -82,6 +98,20 @@ class StatisticsManager:
             }
         }
 
+    def roll_over_day(self) -> bool:
+        """跨天时切换到新一天的记录
+
+        Returns:
+            bool: 是否发生了跨天
+        """
+        today = date.today().isoformat()
+        if today == self.current_date:
+            return False
+
+        self.current_date = today
+        self._ensure_today_record()
+        return True
+
     def _ensure_today_record(self):
         """确保今天的记录存在"""
         if self.current_date not in self.statistics["daily_records"]:
@@ -103,6 +133,7 @@ class StatisticsManager:
     def save_statistics(self):
         """保存统计数据到文件 (立即写入)"""
         self._save_statistics()
+        get_json_writer().flush(self.stats_file)
 
     def schedule_save(self, delay_ms: int = 5000):
         """延迟保存统计数据 (批量写入,减少磁盘I/O)
@@ -131,15 +162,21 @@ class StatisticsManager:
             self._save_statistics()
             self._pending_save = False
 
+    def flush(self):
+        """写出尚未保存的统计数据并等待落盘 (退出前调用)"""
+        if self._save_timer is not None:
+            self._save_timer.stop()
+        self._do_delayed_save()
+        get_json_writer().flush(self.stats_file)
+
     def _save_statistics(self):
-        """内部保存方法 (实际写入文件)"""
+        """内部保存方法 (提交给后台写入线程, 紧凑格式原子写入)"""
         try:
             # 更新最后修改时间
             self.statistics["metadata"]["last_updated"] = datetime.now().isoformat()
 
-            with open(self.stats_file, 'w', encoding='utf-8') as f:
-                json.dump(self.statistics, f, indent=4, ensure_ascii=False)
-            self.logger.info("统计数据保存成功")
+            get_json_writer().submit(self.stats_file, self.statistics)
+            self.logger.info("统计数据已提交保存")
         except Exception as e:
             self.logger.error(f"保存统计数据失败: {e}", exc_info=True)
 
@@ -154,12 +191,9 @@ class StatisticsManager:
             task_color: 任务颜色
             status: 状态 "completed", "in_progress", "not_started"
         """
-        today = date.today().isoformat()
-
         # 确保今天的记录存在
-        if today != self.current_date:
-            self.current_date = today
-            self._ensure_today_record()
+        self.roll_over_day()
+        today = self.current_date
 
         daily_record = self.statistics["daily_records"][today]
 
@@ -667,6 +701,9 @@ class StatisticsManager:
 
         Args:
             days_to_keep: 保留最近多少天的记录(默认90天)
+
+        Returns:
+            int: 清理的天数
         """
         cutoff_date = (date.today() - timedelta(days=days_to_keep)).isoformat()
 
@@ -698,6 +735,8 @@ class StatisticsManager:
             self.logger.info(f"清理了 {len(dates_to_remove)} 天的旧记录和 {len(empty_tasks)} 个空任务")
             self._save_statistics()
 
+        return len(dates_to_remove)
+
     def export_to_csv(self, output_file: Path):
         """导出统计数据为CSV文件
 
@@ -737,6 +776,20 @@ class StatisticsManager:
             self.logger.error(f"导出CSV失败: {e}", exc_info=True)
             return False
 
+    def get_analytics(self, days: int = 7, end: Optional[date] = None) -> StatsFrame:
+        """构建最近N天的列式分析数据(洞察报告、统计图表和AI周报共用)
+
+        Args:
+            days: 天数(含今天),多月/全年视图直接传入对应天数
+            end: 最后一天,默认今天
+
+        Returns:
+            StatsFrame: 按日期索引的NumPy指标列
+        """
+        return StatsFrame.from_daily_records(
+            self.statistics["daily_records"], days, end=end, classify=self._classify_task
+        )
+
     def get_weekly_trend(self, days: int = 7) -> List[Dict]:
         """获取最近N天的任务完成率趋势数据
 
@@ -750,40 +803,15 @@ class StatisticsManager:
                 - total_tasks: 总任务数
                 - completed_tasks: 已完成任务数
         """
-        trend_data = []
-        today = date.today()
-
-        for i in range(days - 1, -1, -1):
-            target_date = today - timedelta(days=i)
-            date_str = target_date.isoformat()
+        return self.get_analytics(days=days).trend_records()
 
-            # 获取该日期的统计数据
-            if date_str in self.statistics["daily_records"]:
-                daily_record = self.statistics["daily_records"][date_str]
-                summary = daily_record.get("summary", {})
-
-                trend_data.append({
-                    'date': date_str,
-                    'completion_rate': summary.get('completion_rate', 0.0),
-                    'total_tasks': summary.get('total_tasks', 0),
-                    'completed_tasks': summary.get('completed_tasks', 0)
-                })
-            else:
-                # 没有数据的日期,填充0值
-                trend_data.append({
-                    'date': date_str,
-                    'completion_rate': 0.0,
-                    'total_tasks': 0,
-                    'completed_tasks': 0
-                })
-
-        return trend_data
-
-    def get_task_color_distribution(self, date_range: str = "today") -> List[Dict]:
+    def get_task_color_distribution(self, date_range: str = "today",
+                                    analytics: Optional[StatsFrame] = None) -> List[Dict]:
         """获取任务颜色分布统计(用于饼图)
 
         Args:
             date_range: 统计范围, "today"(今日) / "week"(本周) / "month"(本月)
+            analytics: 已构建的分析数据, 传入时忽略 date_range
 
         Returns:
             List[Dict]: 颜色分布数据列表,每个元素包含:
@@ -805,43 +833,12 @@ class StatisticsManager:
             "#795548": "其他",      # 棕色
         }
 
-        # 统计任务颜色
-        color_counts = defaultdict(int)
-        total_tasks = 0
-
-        if date_range == "today":
-            # 今日任务
-            today_str = date.today().isoformat()
-            if today_str in self.statistics["daily_records"]:
-                tasks = self.statistics["daily_records"][today_str].get("tasks", {})
-                for task_info in tasks.values():
-                    color = task_info.get("color", "#795548")
-                    color_counts[color] += 1
-                    total_tasks += 1
-
-        elif date_range == "week":
-            # 本周任务 (最近7天)
-            today = date.today()
-            for i in range(7):
-                target_date = (today - timedelta(days=i)).isoformat()
-                if target_date in self.statistics["daily_records"]:
-                    tasks = self.statistics["daily_records"][target_date].get("tasks", {})
-                    for task_info in tasks.values():
-                        color = task_info.get("color", "#795548")
-                        color_counts[color] += 1
-                        total_tasks += 1
-
-        elif date_range == "month":
-            # 本月任务 (最近30天)
-            today = date.today()
-            for i in range(30):
-                target_date = (today - timedelta(days=i)).isoformat()
-                if target_date in self.statistics["daily_records"]:
-                    tasks = self.statistics["daily_records"][target_date].get("tasks", {})
-                    for task_info in tasks.values():
-                        color = task_info.get("color", "#795548")
-                        color_counts[color] += 1
-                        total_tasks += 1
+        # 统计任务颜色 (今日 / 最近7天 / 最近30天)
+        if analytics is None:
+            days = {"today": 1, "week": 7, "month": 30}.get(date_range, 0)
+            analytics = self.get_analytics(days=days)
+        color_counts = analytics.color_counts()
+        total_tasks = sum(color_counts.values())
 
         # 构建结果列表
         distribution = []
@@ -867,38 +864,7 @@ class StatisticsManager:
         Returns:
             str: 分类名称
         """
-        task_name_lower = task_name.lower()
-
-        # 工作类
-        if any(keyword in task_name_lower for keyword in ['工作', '会议', '开发', '项目', '讨论', '设计', '编程', '代码', '测试', '部署', '早会']):
-            return '工作'
-
-        # 学习类
-        if any(keyword in task_name_lower for keyword in ['学习', '阅读', '课程', '培训', '研究', '充电', '看书', '教程']):
-            return '学习'
-
-        # 运动类
-        if any(keyword in task_name_lower for keyword in ['健身', '运动', '跑步', '游泳', '瑜伽', '锻炼', '散步', '球类', '体育']):
-            return '运动'
-
-        # 饮食类
-        if any(keyword in task_name_lower for keyword in ['早餐', '午餐', '晚餐', '吃饭', '用餐', '饮食', '做饭', '烹饪']):
-            return '饮食'
-
-        # 休息类
-        if any(keyword in task_name_lower for keyword in ['睡眠', '休息', '午休', '小憩', '放松', '打盹', '睡觉']):
-            return '休息'
-
-        # 娱乐类
-        if any(keyword in task_name_lower for keyword in ['娱乐', '游戏', '电影', '追剧', '看剧', '综艺', '音乐', '唱歌', 'ktv']):
-            return '娱乐'
-
-        # 通勤类
-        if any(keyword in task_name_lower for keyword in ['通勤', '上班', '下班', '路上', '交通', '地铁', '公交', '开车']):
-            return '通勤'
-
-        # 其他类
-        return '其他'
+        return _task_category_matcher.first(task_name.lower(), '其他')
 
     def get_category_distribution(self, days: int = 7) -> Dict[str, Dict]:
         """获取最近N天的任务分类分布统计
@@ -914,45 +880,7 @@ class StatisticsManager:
                     ...
                 }
         """
-        category_stats = defaultdict(lambda: {'count': 0, 'completed': 0, 'total_minutes': 0})
-        today = date.today()
-
-        for i in range(days - 1, -1, -1):
-            target_date = today - timedelta(days=i)
-            date_str = target_date.isoformat()
-
-            if date_str not in self.statistics["daily_records"]:
-                continue
-
-            daily_record = self.statistics["daily_records"][date_str]
-            tasks = daily_record.get("tasks", {})
-
-            for task_name, task_info in tasks.items():
-                # 分类任务
-                category = self._classify_task(task_name)
-
-                # 统计数量
-                category_stats[category]['count'] += 1
-
-                # 统计完成数
-                if task_info.get('status') == 'completed':
-                    category_stats[category]['completed'] += 1
-
-                # 计算任务时长（分钟）
-                try:
-                    start_time = datetime.strptime(task_info['start'], '%H:%M')
-                    end_time = datetime.strptime(task_info['end'], '%H:%M')
-                    duration = (end_time - start_time).total_seconds() / 60
-
-                    # 处理跨天任务（end < start）
-                    if duration < 0:
-                        duration += 24 * 60
-
-                    category_stats[category]['total_minutes'] += int(duration)
-                except (ValueError, KeyError):
-                    pass
-
-        return dict(category_stats)
+        return self.get_analytics(days=days).category_totals()
 
     def get_task_categories(self, days: int = 7) -> List[Dict]:
         """获取任务分类分布数据 (格式化为饼图所需格式)
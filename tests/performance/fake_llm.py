@@ -0,0 +1,115 @@
+"""
+OpenAI兼容的上游LLM替身
+
+在本地线程上提供 POST /chat/completions, 按配置的延迟返回固定的任务规划JSON,
+支持 "stream": true 时以SSE逐段返回。用于本地网关压测, 隔离真实模型的耗时与费用。
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+# 与plan-tasks提示词要求的结构一致, 其余AI接口也可将其当作普通文本使用
+DEFAULT_CONTENT = json.dumps({"tasks": [
+    {"start": "07:00", "end": "08:00", "task": "起床早餐", "category": "break"},
+    {"start": "08:00", "end": "12:00", "task": "上午工作", "category": "work"},
+    {"start": "12:00", "end": "13:00", "task": "午餐", "category": "break"},
+    {"start": "13:00", "end": "18:00", "task": "下午工作", "category": "work"},
+    {"start": "18:00", "end": "23:00", "task": "休闲娱乐", "category": "other"},
+    {"start": "23:00", "end": "07:00", "task": "睡眠", "category": "break"},
+]}, ensure_ascii=False)
+
+STREAM_CHUNK_CHARS = 32
+
+
+class _LLMHandler(BaseHTTPRequestHandler):
+    server: "FakeLLMServer"
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        llm = self.server.llm
+        llm.record_call()
+
+        if llm.latency > 0:
+            time.sleep(llm.latency)
+
+        content = llm.content
+        usage = {"prompt_tokens": 200, "completion_tokens": len(content) // 2}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+
+        if request.get("stream"):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            for i in range(0, len(content), STREAM_CHUNK_CHARS):
+                chunk = {"choices": [{"delta": {"content": content[i:i + STREAM_CHUNK_CHARS]}}]}
+                self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+            self.wfile.write(f"data: {json.dumps({'choices': [], 'usage': usage})}\n\n".encode("utf-8"))
+            self.wfile.write(b"data: [DONE]\n\n")
+            return
+
+        body = json.dumps({
+            "id": f"chatcmpl-local-{llm.calls}",
+            "object": "chat.completion",
+            "model": request.get("model", "fake"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                         "finish_reason": "stop"}],
+            "usage": usage,
+        }, ensure_ascii=False).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # 默认的监听队列(5)在并发压测时会丢弃连接, 客户端1秒后重试会污染P99
+    request_queue_size = 128
+
+    def __init__(self, address, llm: "FakeLLM"):
+        super().__init__(address, _LLMHandler)
+        self.llm = llm
+
+
+class FakeLLM:
+    """
+    上游LLM替身
+
+    Args:
+        latency: 每次调用返回前的等待秒数(模拟模型生成耗时)
+        content: assistant回复内容, 默认为任务规划JSON
+    """
+
+    def __init__(self, latency: float = 0.0, content: Optional[str] = None,
+                 host: str = "127.0.0.1", port: int = 0):
+        self.latency = latency
+        self.content = content or DEFAULT_CONTENT
+        self.calls = 0
+        self._calls_lock = threading.Lock()
+        self._server = FakeLLMServer((host, port), self)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def record_call(self) -> None:
+        with self._calls_lock:
+            self.calls += 1
+
+    def start(self) -> "FakeLLM":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-llm", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
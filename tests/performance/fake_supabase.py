@@ -0,0 +1,465 @@
+"""
+Supabase客户端的内存替身
+
+实现服务端代码用到的 table(...) 查询构造器、rpc(...) 和 auth 接口子集,
+供本地网关(local_gateway.py)离线压测使用。
+
+每次 execute() 都会记入当前线程的查询追踪, 网关据此统计每个请求的数据库往返次数,
+用于发现N+1查询回归。
+"""
+import os
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional
+
+import jwt
+
+API_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "api")
+if API_DIR not in sys.path:
+    sys.path.insert(0, API_DIR)
+
+from quota_manager import CONSUME_QUOTA_RPC, REFUND_QUOTA_RPC, QuotaManager, RPC_QUOTA_TYPES  # noqa: E402
+from webhook_jobs import LocalWebhookStore  # noqa: E402
+
+CHINA_TZ = timezone(timedelta(hours=8))
+
+# 新建配额记录的默认总量(与 consume_user_quota_rpc.sql 一致)
+QUOTA_TOTALS = {
+    "free": {"daily_plan_total": 3, "weekly_report_total": 1, "chat_total": 10},
+    "pro": {"daily_plan_total": 20, "weekly_report_total": 10, "chat_total": 100},
+}
+
+
+class FakeSupabaseError(Exception):
+    """模拟PostgREST错误(消息格式与supabase-py一致, 便于调用方按关键字判断)"""
+
+
+class _Query:
+    """模拟postgrest的查询构造器, execute()时在内存表上执行"""
+
+    def __init__(self, backend: "FakeSupabase", table: str):
+        self._backend = backend
+        self._table = table
+        self._op = "select"
+        self._columns = "*"
+        self._payload: Any = None
+        self._on_conflict: Optional[str] = None
+        self._filters: List[Callable[[Dict], bool]] = []
+        self._order: List[tuple] = []
+        self._limit: Optional[int] = None
+        self._offset = 0
+        self._single = False
+        self._maybe_single = False
+        self._count: Optional[str] = None
+
+    # 操作
+    def select(self, columns: str = "*", count: Optional[str] = None) -> "_Query":
+        self._columns = columns
+        self._count = count
+        return self
+
+    def insert(self, payload) -> "_Query":
+        self._op, self._payload = "insert", payload
+        return self
+
+    def upsert(self, payload, on_conflict: Optional[str] = None, **_kwargs) -> "_Query":
+        self._op, self._payload, self._on_conflict = "upsert", payload, on_conflict
+        return self
+
+    def update(self, payload: Dict) -> "_Query":
+        self._op, self._payload = "update", payload
+        return self
+
+    def delete(self) -> "_Query":
+        self._op = "delete"
+        return self
+
+    # 过滤条件
+    def _where(self, column: str, predicate: Callable[[Any], bool]) -> "_Query":
+        def check(row: Dict) -> bool:
+            value = row.get(column)
+            try:
+                return predicate(value)
+            except TypeError:
+                return False
+
+        self._filters.append(check)
+        return self
+
+    def eq(self, column: str, value) -> "_Query":
+        return self._where(column, lambda v: v == value)
+
+    def neq(self, column: str, value) -> "_Query":
+        return self._where(column, lambda v: v != value)
+
+    def gt(self, column: str, value) -> "_Query":
+        return self._where(column, lambda v: v is not None and v > value)
+
+    def gte(self, column: str, value) -> "_Query":
+        return self._where(column, lambda v: v is not None and v >= value)
+
+    def lt(self, column: str, value) -> "_Query":
+        return self._where(column, lambda v: v is not None and v < value)
+
+    def lte(self, column: str, value) -> "_Query":
+        return self._where(column, lambda v: v is not None and v <= value)
+
+    def in_(self, column: str, values) -> "_Query":
+        values = list(values)
+        return self._where(column, lambda v: v in values)
+
+    def is_(self, column: str, value) -> "_Query":
+        expected = None if value in (None, "null") else value
+        return self._where(column, lambda v: v is expected or v == expected)
+
+    # 结果形态
+    def order(self, column: str, desc: bool = False, **_kwargs) -> "_Query":
+        self._order.append((column, desc))
+        return self
+
+    def limit(self, count: int) -> "_Query":
+        self._limit = count
+        return self
+
+    def range(self, start: int, end: int) -> "_Query":
+        self._offset, self._limit = start, end - start + 1
+        return self
+
+    def single(self) -> "_Query":
+        self._single = True
+        return self
+
+    def maybe_single(self) -> "_Query":
+        self._maybe_single = True
+        return self
+
+    def execute(self):
+        return self._backend._execute(self)
+
+
+class _RpcCall:
+    def __init__(self, backend: "FakeSupabase", name: str, params: Dict):
+        self._backend = backend
+        self._name = name
+        self._params = params
+
+    def execute(self):
+        return self._backend._execute_rpc(self._name, self._params)
+
+
+class _FakeAdminAuth:
+    """模拟 client.auth.admin"""
+
+    def __init__(self, auth: "_FakeAuth"):
+        self._auth = auth
+
+    def get_user_by_id(self, user_id: str):
+        self._auth.backend._record("auth", "admin.get_user_by_id")
+        account = self._auth.accounts_by_id.get(user_id)
+        if account is None:
+            raise FakeSupabaseError("User not found")
+        return SimpleNamespace(user=self._auth._user(account))
+
+    def list_users(self):
+        self._auth.backend._record("auth", "admin.list_users")
+        return [self._auth._user(account) for account in self._auth.accounts_by_id.values()]
+
+    def update_user_by_id(self, user_id: str, attributes: Dict):
+        self._auth.backend._record("auth", "admin.update_user_by_id")
+        account = self._auth.accounts_by_id.get(user_id)
+        if account is None:
+            raise FakeSupabaseError("User not found")
+        account.update(attributes)
+        return SimpleNamespace(user=self._auth._user(account))
+
+
+class _FakeAuth:
+    """模拟 client.auth (GoTrue) 的邮箱密码登录子集, 签发的JWT可通过AuthManager的签名校验"""
+
+    TOKEN_TTL_SECONDS = 3600
+
+    def __init__(self, backend: "FakeSupabase", jwt_secret: str):
+        self.backend = backend
+        self.jwt_secret = jwt_secret
+        self.accounts_by_id: Dict[str, Dict] = {}
+        self.accounts_by_email: Dict[str, Dict] = {}
+        self.refresh_tokens: Dict[str, str] = {}
+        self.admin = _FakeAdminAuth(self)
+
+    def create_account(self, email: str, password: str, confirmed: bool = True) -> Dict:
+        account = {
+            "id": str(uuid.uuid4()),
+            "email": email,
+            "password": password,
+            "email_confirmed_at": datetime.now(timezone.utc).isoformat() if confirmed else None,
+        }
+        self.accounts_by_id[account["id"]] = account
+        self.accounts_by_email[email] = account
+        return account
+
+    @staticmethod
+    def _user(account: Dict):
+        return SimpleNamespace(id=account["id"], email=account["email"],
+                               email_confirmed_at=account["email_confirmed_at"])
+
+    def _session(self, account: Dict):
+        now = int(time.time())
+        access_token = jwt.encode({
+            "sub": account["id"],
+            "email": account["email"],
+            "aud": "authenticated",
+            "role": "authenticated",
+            "iat": now,
+            "exp": now + self.TOKEN_TTL_SECONDS,
+        }, self.jwt_secret, algorithm="HS256")
+        refresh_token = uuid.uuid4().hex
+        self.refresh_tokens[refresh_token] = account["id"]
+        return SimpleNamespace(access_token=access_token, refresh_token=refresh_token,
+                               expires_in=self.TOKEN_TTL_SECONDS, user=self._user(account))
+
+    def sign_up(self, credentials: Dict):
+        self.backend._record("auth", "sign_up")
+        with self.backend._lock:
+            if credentials["email"] in self.accounts_by_email:
+                raise FakeSupabaseError("User already registered")
+            account = self.create_account(credentials["email"], credentials["password"], confirmed=False)
+        return SimpleNamespace(user=self._user(account), session=None)
+
+    def sign_in_with_password(self, credentials: Dict):
+        self.backend._record("auth", "sign_in_with_password")
+        account = self.accounts_by_email.get(credentials.get("email"))
+        if account is None or account["password"] != credentials.get("password"):
+            raise FakeSupabaseError("Invalid login credentials")
+        session = self._session(account)
+        return SimpleNamespace(user=session.user, session=session)
+
+    def get_user(self, access_token: Optional[str] = None):
+        self.backend._record("auth", "get_user")
+        try:
+            claims = jwt.decode(access_token, self.jwt_secret, algorithms=["HS256"], audience="authenticated")
+        except jwt.InvalidTokenError as e:
+            raise FakeSupabaseError(f"Invalid JWT: {e}")
+        return SimpleNamespace(user=self._user(self.accounts_by_id[claims["sub"]]))
+
+    def refresh_session(self, refresh_token: Optional[str] = None):
+        self.backend._record("auth", "refresh_session")
+        user_id = self.refresh_tokens.pop(refresh_token, None)
+        if user_id is None:
+            raise FakeSupabaseError("Invalid Refresh Token")
+        session = self._session(self.accounts_by_id[user_id])
+        return SimpleNamespace(user=session.user, session=session)
+
+    def sign_out(self):
+        self.backend._record("auth", "sign_out")
+
+
+class FakeSupabase:
+    """
+    进程内的Supabase替身
+
+    所有由 create_client() 创建的客户端共享同一个实例(即同一份数据), 与真实部署中
+    多个函数实例访问同一个数据库一致。未实现的RPC会抛出PGRST202, 触发调用方已有的降级路径。
+    """
+
+    def __init__(self, jwt_secret: str = "local-gateway-jwt-secret"):
+        self.tables: Dict[str, List[Dict]] = {}
+        self.auth = _FakeAuth(self, jwt_secret)
+        self.webhooks = LocalWebhookStore()
+        self._lock = threading.RLock()
+        self._local = threading.local()
+
+    # 测试数据
+    def seed_user(self, email: str, password: str, user_tier: str = "free") -> str:
+        """创建已验证邮箱的账号及 users 记录, 返回user_id"""
+        with self._lock:
+            account = self.auth.create_account(email, password)
+            self.tables.setdefault("users", []).append({
+                "id": account["id"],
+                "email": email,
+                "user_tier": user_tier,
+                "email_verified": True,
+                "status": "active",
+                "created_at": datetime.now(timezone.utc).isoformat(),
+            })
+        return account["id"]
+
+    # 查询追踪
+    @contextmanager
+    def trace(self):
+        """在当前线程上收集执行的查询, 产出记录列表"""
+        previous = getattr(self._local, "ops", None)
+        ops: List[str] = []
+        self._local.ops = ops
+        try:
+            yield ops
+        finally:
+            self._local.ops = previous
+
+    def _record(self, target: str, op: str) -> None:
+        ops = getattr(self._local, "ops", None)
+        if ops is not None:
+            ops.append(f"{op} {target}")
+
+    # 客户端接口
+    def table(self, name: str) -> _Query:
+        return _Query(self, name)
+
+    from_ = table
+
+    def rpc(self, name: str, params: Optional[Dict] = None) -> _RpcCall:
+        return _RpcCall(self, name, params or {})
+
+    def _execute(self, query: _Query):
+        self._record(query._table, query._op)
+        with self._lock:
+            rows = self.tables.setdefault(query._table, [])
+            if query._op == "insert":
+                data = [self._insert(rows, record) for record in self._records(query._payload)]
+                return SimpleNamespace(data=data, count=None)
+            if query._op == "upsert":
+                keys = [k.strip() for k in (query._on_conflict or "id").split(",")]
+                data = [self._upsert(rows, record, keys) for record in self._records(query._payload)]
+                return SimpleNamespace(data=data, count=None)
+
+            matched = [row for row in rows if all(check(row) for check in query._filters)]
+            if query._op == "update":
+                for row in matched:
+                    row.update(query._payload)
+                return SimpleNamespace(data=[dict(row) for row in matched], count=None)
+            if query._op == "delete":
+                rows[:] = [row for row in rows if not any(row is m for m in matched)]
+                return SimpleNamespace(data=[dict(row) for row in matched], count=None)
+
+            for column, desc in reversed(query._order):
+                matched.sort(key=lambda row: (row.get(column) is None, row.get(column)), reverse=desc)
+            count = len(matched) if query._count else None
+            if query._limit is not None:
+                matched = matched[query._offset:query._offset + query._limit]
+            data = [self._project(row, query._columns) for row in matched]
+
+        if query._single:
+            if len(data) != 1:
+                raise FakeSupabaseError("PGRST116: JSON object requested, multiple (or no) rows returned")
+            return SimpleNamespace(data=data[0], count=count)
+        if query._maybe_single:
+            return SimpleNamespace(data=data[0] if data else None, count=count)
+        return SimpleNamespace(data=data, count=count)
+
+    def _execute_rpc(self, name: str, params: Dict):
+        self._record(name, "rpc")
+        if name == CONSUME_QUOTA_RPC:
+            return SimpleNamespace(data=self.consume_user_quota(**params))
+        if name == REFUND_QUOTA_RPC:
+            return SimpleNamespace(data=self.refund_user_quota(**params))
+        # 其余函数交给支付回调账本的进程内实现, 未知函数在其中抛出PGRST202
+        return self.webhooks.rpc(name, params).execute()
+
+    @staticmethod
+    def _records(payload) -> List[Dict]:
+        return list(payload) if isinstance(payload, (list, tuple)) else [payload]
+
+    @staticmethod
+    def _insert(rows: List[Dict], record: Dict) -> Dict:
+        row = {"id": str(uuid.uuid4()), **record}
+        rows.append(row)
+        return dict(row)
+
+    def _upsert(self, rows: List[Dict], record: Dict, keys: List[str]) -> Dict:
+        for row in rows:
+            if all(k in record and row.get(k) == record[k] for k in keys):
+                row.update(record)
+                return dict(row)
+        return self._insert(rows, record)
+
+    @staticmethod
+    def _project(row: Dict, columns: str) -> Dict:
+        if not columns or columns.strip() == "*":
+            return dict(row)
+        return {name: row.get(name) for name in (c.strip() for c in columns.split(","))}
+
+    # RPC
+    def consume_user_quota(self, p_user_id: str, p_quota_type: str,
+                           p_amount: int = 1, p_user_tier: str = "free") -> Dict:
+        """在 user_quotas 表上执行与SQL函数相同的重置-检查-扣除(一次往返)"""
+        if p_quota_type not in RPC_QUOTA_TYPES:
+            raise FakeSupabaseError(f"Unknown quota type: {p_quota_type}")
+        if p_amount is None or p_amount < 0:
+            raise FakeSupabaseError(f"Invalid quota amount: {p_amount}")
+
+        now = datetime.now(CHINA_TZ)
+        tomorrow = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+        next_week = (now + timedelta(days=7)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+        with self._lock:
+            rows = self.tables.setdefault("user_quotas", [])
+            row = next((r for r in rows if r.get("user_id") == p_user_id), None)
+            if row is None:
+                self._insert(rows, {
+                    "user_id": p_user_id,
+                    "user_tier": p_user_tier,
+                    **QUOTA_TOTALS["pro" if p_user_tier == "pro" else "free"],
+                    "daily_plan_used": 0,
+                    "weekly_report_used": 0,
+                    "chat_used": 0,
+                    "daily_plan_reset_at": tomorrow.isoformat(),
+                    "weekly_report_reset_at": next_week.isoformat(),
+                    "chat_reset_at": tomorrow.isoformat(),
+                })
+                row = rows[-1]
+
+            for qtype, next_reset in (("daily_plan", tomorrow), ("chat", tomorrow), ("weekly_report", next_week)):
+                reset_at = row.get(f"{qtype}_reset_at")
+                if reset_at and now >= datetime.fromisoformat(reset_at.replace("Z", "+00:00")):
+                    row[f"{qtype}_used"] = 0
+                    row[f"{qtype}_reset_at"] = next_reset.isoformat()
+
+            used = row[f"{p_quota_type}_used"]
+            total = row[f"{p_quota_type}_total"]
+            success = not (p_amount > 0 and used + p_amount > total)
+            if success:
+                used = used + p_amount
+                row[f"{p_quota_type}_used"] = used
+
+            result = {
+                "success": success,
+                "quota_type": p_quota_type,
+                "used": used,
+                "total": total,
+                "remaining": total - used,
+                "requested": p_amount,
+                "full_quota_status": QuotaManager._remaining_snapshot(row),
+            }
+        if not success:
+            result["error"] = "Quota exceeded"
+        return result
+
+    def refund_user_quota(self, p_user_id: str, p_quota_type: str, p_amount: int = 1) -> Dict:
+        """与SQL函数 refund_user_quota 相同: 已用次数减少 p_amount(不低于0)"""
+        if p_quota_type not in RPC_QUOTA_TYPES:
+            raise FakeSupabaseError(f"Unknown quota type: {p_quota_type}")
+        if p_amount is None or p_amount < 0:
+            raise FakeSupabaseError(f"Invalid refund amount: {p_amount}")
+
+        with self._lock:
+            rows = self.tables.setdefault("user_quotas", [])
+            row = next((r for r in rows if r.get("user_id") == p_user_id), None)
+            if row is None:
+                return {"success": False, "error": "No quota record", "quota_type": p_quota_type}
+
+            used = max(row[f"{p_quota_type}_used"] - p_amount, 0)
+            row[f"{p_quota_type}_used"] = used
+            total = row[f"{p_quota_type}_total"]
+            return {
+                "success": True,
+                "quota_type": p_quota_type,
+                "used": used,
+                "total": total,
+                "remaining": total - used,
+                "refunded": p_amount,
+                "full_quota_status": QuotaManager._remaining_snapshot(row),
+            }
@@ -0,0 +1,418 @@
+"""
+本地单进程API网关 - 离线压测所有Serverless处理器
+
+把 api/*.py 中的每个 handler 按Vercel路由(/api/<文件名>)挂载到一个多线程HTTP服务器上,
+并注入内存版Supabase(fake_supabase.py)和延迟可配置的上游LLM(fake_llm.py),
+从而可以在本机测量登录、配额、任务规划等流程的吞吐量和P95/P99, 并统计每个请求的数据库往返次数。
+
+使用方法:
+    # 启动网关(默认 http://127.0.0.1:8787, 预置100个压测账号)
+    python -m tests.performance.local_gateway --llm-latency 0.5
+
+    # 不借助Locust, 直接跑一轮内置场景并输出延迟分位数
+    python -m tests.performance.local_gateway --load plan-tasks --requests 500 --concurrency 20
+
+统计接口:
+    GET /__gateway/stats  每个路由的请求数及每请求查询次数(平均/最大)
+"""
+import argparse
+import importlib.util
+import json
+import math
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+import supabase
+
+try:
+    from tests.performance.fake_llm import FakeLLM
+    from tests.performance.fake_supabase import API_DIR, FakeSupabase
+except ImportError:
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from fake_llm import FakeLLM
+    from fake_supabase import API_DIR, FakeSupabase
+
+STATS_ROUTE = "/__gateway/stats"
+
+LOAD_TEST_EMAIL = "loadtest{index}@example.com"
+LOAD_TEST_PASSWORD = "LoadTest#2024"
+# 压测账号的配额足够大, 使请求走正常路径而不是429快速失败
+LOAD_TEST_QUOTA = {"daily_plan_total": 1_000_000, "weekly_report_total": 1_000_000, "chat_total": 1_000_000}
+
+# 注入给处理器的环境变量; 已导入的api模块上同名的模块级常量也会被覆盖
+FAKE_ENV = {
+    "SUPABASE_URL": "http://supabase.local",
+    "SUPABASE_ANON_KEY": "local-anon-key",
+    "SUPABASE_KEY": "local-anon-key",
+    "SUPABASE_SERVICE_KEY": "local-service-key",
+    "SUPABASE_JWT_SECRET": "local-gateway-jwt-secret",
+    "TUZI_API_KEY": "local-llm-key",
+    "AI_CACHE_BACKEND": "memory",
+    "CRON_SECRET": "local-cron-secret",
+}
+
+
+class _Patcher:
+    """记录并撤销对环境变量和模块属性的修改"""
+
+    def __init__(self):
+        self._env: Dict[str, Optional[str]] = {}
+        self._attrs: List[Tuple[object, str, object]] = []
+
+    def setenv(self, name: str, value: str) -> None:
+        self._env.setdefault(name, os.environ.get(name))
+        os.environ[name] = value
+
+    def setattr(self, target, name: str, value) -> None:
+        self._attrs.append((target, name, getattr(target, name)))
+        setattr(target, name, value)
+
+    def undo(self) -> None:
+        for target, name, value in reversed(self._attrs):
+            setattr(target, name, value)
+        for name, value in self._env.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+        self._attrs.clear()
+        self._env.clear()
+
+
+def _api_modules():
+    """已导入的、来自api目录的模块"""
+    for module in list(sys.modules.values()):
+        path = getattr(module, "__file__", None) or ""
+        if os.path.dirname(os.path.abspath(path)) == API_DIR:
+            yield module
+
+
+def load_routes(api_dir: str = API_DIR) -> Dict[str, type]:
+    """导入 api_dir 下定义了 handler 的模块, 返回 {路由: handler类}; 导入失败的模块跳过并告警"""
+    routes = {}
+    for filename in sorted(os.listdir(api_dir)):
+        if not filename.endswith(".py") or filename.startswith("_"):
+            continue
+        stem = filename[:-3]
+        module_name = "gateway_" + stem.replace("-", "_")
+        try:
+            spec = importlib.util.spec_from_file_location(module_name, os.path.join(api_dir, filename))
+            module = importlib.util.module_from_spec(spec)
+            sys.modules[module_name] = module
+            spec.loader.exec_module(module)
+        except Exception as e:
+            sys.modules.pop(module_name, None)
+            print(f"[GATEWAY] Skipping {filename}: {type(e).__name__}: {e}", file=sys.stderr)
+            continue
+
+        target = getattr(module, "handler", None)
+        if isinstance(target, type) and issubclass(target, BaseHTTPRequestHandler):
+            routes[f"/api/{stem}"] = target
+    return routes
+
+
+class _Dispatcher(BaseHTTPRequestHandler):
+    """解析请求行后按路径把自身切换为对应的处理器类, 其余流程交给原处理器"""
+
+    server: "GatewayServer"
+    gateway_route: Optional[str] = None
+
+    def parse_request(self):
+        if not super().parse_request():
+            return False
+
+        route = urlsplit(self.path).path.rstrip("/") or "/"
+        if route == STATS_ROUTE:
+            self.__class__ = _StatsHandler
+            return True
+
+        target = self.server.routes.get(route)
+        if target is None:
+            self.send_error(404, f"No handler mounted at {route}")
+            return False
+
+        self.gateway_route = route
+        self.__class__ = target
+        return True
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+class _StatsHandler(BaseHTTPRequestHandler):
+    server: "GatewayServer"
+
+    def do_GET(self):
+        body = json.dumps(self.server.stats()).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_DELETE(self):
+        self.server.reset_stats()
+        self.send_response(204)
+        self.end_headers()
+
+
+class GatewayServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # 默认的监听队列(5)在并发压测时会丢弃连接, 客户端1秒后重试会污染P99
+    request_queue_size = 128
+
+    def __init__(self, address, routes: Dict[str, type], backend: FakeSupabase, quiet: bool = False):
+        super().__init__(address, _Dispatcher)
+        self.routes = routes
+        self.backend = backend
+        self.quiet = quiet
+        self._stats_lock = threading.Lock()
+        self._queries: Dict[str, List[int]] = {}
+        self._last_queries: Dict[str, List[str]] = {}
+
+    def finish_request(self, request, client_address):
+        with self.backend.trace() as ops:
+            handler = self.RequestHandlerClass(request, client_address, self)
+        if handler.gateway_route:
+            with self._stats_lock:
+                self._queries.setdefault(handler.gateway_route, []).append(len(ops))
+                self._last_queries[handler.gateway_route] = list(ops)
+
+    def query_counts(self, route: str) -> List[int]:
+        """该路由每个请求执行的查询次数"""
+        with self._stats_lock:
+            return list(self._queries.get(route, []))
+
+    def last_queries(self, route: str) -> List[str]:
+        """该路由最近一个请求执行的查询(如 "select users")"""
+        with self._stats_lock:
+            return list(self._last_queries.get(route, []))
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            return {
+                route: {
+                    "requests": len(counts),
+                    "queries_avg": round(sum(counts) / len(counts), 2),
+                    "queries_max": max(counts),
+                    "last_queries": self._last_queries.get(route, []),
+                }
+                for route, counts in self._queries.items()
+            }
+
+    def reset_stats(self) -> None:
+        with self._stats_lock:
+            self._queries.clear()
+            self._last_queries.clear()
+
+
+class LocalGateway:
+    """
+    本地网关: 内存Supabase + 上游LLM替身 + 挂载全部api处理器的HTTP服务器
+
+    可作为上下文管理器使用; stop()会撤销对环境变量和模块的修改。
+
+    Args:
+        llm_latency: 上游LLM每次调用的延迟(秒)
+        seed_users: 预置的压测账号数量(邮箱见 LOAD_TEST_EMAIL, 密码为 LOAD_TEST_PASSWORD)
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, llm_latency: float = 0.0,
+                 seed_users: int = 0, quiet: bool = True):
+        self.backend = FakeSupabase(FAKE_ENV["SUPABASE_JWT_SECRET"])
+        self.llm = FakeLLM(latency=llm_latency)
+        self.user_ids: List[str] = []
+        self._host, self._port, self._quiet = host, port, quiet
+        self._patcher = _Patcher()
+        self.server: Optional[GatewayServer] = None
+        self._thread: Optional[threading.Thread] = None
+        self.seed_users(seed_users)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def seed_users(self, count: int) -> None:
+        for index in range(len(self.user_ids), len(self.user_ids) + count):
+            user_id = self.backend.seed_user(LOAD_TEST_EMAIL.format(index=index), LOAD_TEST_PASSWORD, "pro")
+            self.backend.consume_user_quota(user_id, "daily_plan", 0, "pro")
+            for row in self.backend.tables["user_quotas"]:
+                if row["user_id"] == user_id:
+                    row.update(LOAD_TEST_QUOTA)
+            self.user_ids.append(user_id)
+
+    def _install(self) -> None:
+        patcher = self._patcher
+        for name, value in dict(FAKE_ENV, TUZI_BASE_URL=self.llm.base_url).items():
+            patcher.setenv(name, value)
+
+        def create_client(*_args, **_kwargs):
+            return self.backend
+
+        patcher.setattr(supabase, "create_client", create_client)
+        routes = load_routes()
+
+        # 先于网关导入的模块已在导入时读取了环境变量和create_client
+        overrides = {
+            "create_client": create_client,
+            "SUPABASE_URL": FAKE_ENV["SUPABASE_URL"],
+            "SUPABASE_KEY": FAKE_ENV["SUPABASE_ANON_KEY"],
+            "SUPABASE_SERVICE_KEY": FAKE_ENV["SUPABASE_SERVICE_KEY"],
+            "TUZI_API_KEY": FAKE_ENV["TUZI_API_KEY"],
+            "TUZI_BASE_URL": self.llm.base_url,
+        }
+        for module in _api_modules():
+            for name, value in overrides.items():
+                if hasattr(module, name):
+                    patcher.setattr(module, name, value)
+        self.server = GatewayServer((self._host, self._port), routes, self.backend, self._quiet)
+
+    def start(self) -> "LocalGateway":
+        self.llm.start()
+        self._install()
+        self._thread = threading.Thread(target=self.server.serve_forever, name="local-gateway", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+        self.llm.stop()
+        self._patcher.undo()
+
+    def __enter__(self) -> "LocalGateway":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def scenario_request(name: str, index: int, user_ids: List[str]) -> Tuple[str, str, Dict]:
+    """
+    内置压测场景的第index个请求
+
+    Returns:
+        (HTTP方法, 路径, requests关键字参数)
+    """
+    slot = index % len(user_ids)
+    if name == "signin":
+        return "POST", "/api/auth-signin", {
+            "json": {"email": LOAD_TEST_EMAIL.format(index=slot), "password": LOAD_TEST_PASSWORD},
+            # 每个请求使用不同来源IP, 避免命中按IP的登录速率限制
+            "headers": {"X-Forwarded-For": f"10.{index // 65536 % 256}.{index // 256 % 256}.{index % 256}"},
+        }
+    if name == "quota":
+        return "GET", f"/api/quota-status?user_id={user_ids[slot]}&user_tier=pro", {}
+    if name == "plan-tasks":
+        return "POST", "/api/plan-tasks", {
+            # 输入各不相同, 避免AI响应缓存命中
+            "json": {"user_id": user_ids[slot], "user_tier": "pro", "input": f"压测计划 #{index}: 上午写代码, 下午开会"},
+        }
+    raise ValueError(f"Unknown scenario: {name}")
+
+
+SCENARIOS = ("signin", "quota", "plan-tasks")
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """最近秩法分位数"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = math.ceil(pct / 100 * len(ordered))
+    return ordered[min(max(rank, 1), len(ordered)) - 1]
+
+
+def run_load(send: Callable[[int], int], total: int, concurrency: int) -> Dict:
+    """
+    并发执行 send(0..total-1) 并汇总吞吐量与延迟分位数
+
+    Args:
+        send: 发送第i个请求并返回HTTP状态码
+
+    Returns:
+        {"requests", "errors", "throughput_rps", "p50_ms", "p95_ms", "p99_ms", "max_ms"}
+    """
+    def timed(index: int) -> Tuple[float, int]:
+        started = time.perf_counter()
+        try:
+            status = send(index)
+        except requests.RequestException:
+            status = 0
+        return (time.perf_counter() - started) * 1000, status
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(timed, range(total)))
+    elapsed = time.perf_counter() - started
+
+    latencies = [latency for latency, _ in results]
+    return {
+        "requests": total,
+        "errors": sum(1 for _, status in results if not 200 <= status < 300),
+        "throughput_rps": round(total / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "max_ms": round(max(latencies, default=0.0), 2),
+    }
+
+
+def run_scenario(gateway: LocalGateway, name: str, total: int, concurrency: int) -> Dict:
+    """对网关执行内置场景, 结果附带每请求查询次数"""
+    route = urlsplit(scenario_request(name, 0, gateway.user_ids)[1]).path
+
+    def send(index: int) -> int:
+        method, path, kwargs = scenario_request(name, index, gateway.user_ids)
+        return requests.request(method, gateway.url + path, timeout=60, **kwargs).status_code
+
+    report = run_load(send, total, concurrency)
+    counts = gateway.server.query_counts(route)
+    report["queries_per_request_max"] = max(counts, default=0)
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Run every api/*.py handler in one local process")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="fake upstream LLM latency in seconds")
+    parser.add_argument("--seed-users", type=int, default=100, help="number of load-test accounts to create")
+    parser.add_argument("--load", choices=SCENARIOS, help="run a built-in scenario and exit")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--verbose", action="store_true", help="keep handler logs on stderr")
+    args = parser.parse_args(argv)
+
+    if not args.verbose:
+        sys.stderr = open(os.devnull, "w")
+
+    gateway = LocalGateway(args.host, args.port, args.llm_latency, max(args.seed_users, 1),
+                           quiet=not args.verbose).start()
+    try:
+        if args.load:
+            print(json.dumps(run_scenario(gateway, args.load, args.requests, args.concurrency), indent=2))
+            return
+
+        print(f"Local gateway on {gateway.url} ({len(gateway.server.routes)} routes, "
+              f"LLM latency {args.llm_latency}s, {len(gateway.user_ids)} accounts)")
+        print(f"Query stats: {gateway.url}{STATS_ROUTE}")
+        gateway._thread.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        gateway.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Locust压力测试脚本 - 本地网关(离线)
+
+先启动本地网关, 再运行Locust:
+    python -m tests.performance.local_gateway --llm-latency 0.5 --seed-users 100
+    locust -f tests/performance/locust_local.py --host=http://127.0.0.1:8787 \\
+           --users 50 --spawn-rate 10 --run-time 2m --headless --csv=reports/local_gateway
+
+LOCAL_GATEWAY_USERS 需与网关的 --seed-users 一致(默认100)。
+压测结束后访问 /__gateway/stats 查看每个路由的每请求查询次数。
+
+测试场景:
+- 配额查询 (高频)
+- 任务规划 (中频, 经过上游LLM替身)
+- 邮箱登录 (低频)
+"""
+import itertools
+import os
+
+from locust import HttpUser, between, task
+
+from tests.performance.local_gateway import LOAD_TEST_EMAIL, LOAD_TEST_PASSWORD
+
+SEEDED_USERS = int(os.getenv("LOCAL_GATEWAY_USERS", "100"))
+
+# 所有Locust用户共享的递增序号, 保证计划输入和来源IP各不相同
+_sequence = itertools.count()
+
+
+class LocalGatewayUser(HttpUser):
+    """
+    登录后循环查询配额和生成计划
+
+    wait_time: 比线上脚本更短, 用于测出本地吞吐量上限
+    """
+    wait_time = between(0.1, 0.5)
+
+    def on_start(self):
+        self.index = next(_sequence) % SEEDED_USERS
+        self.user_id = None
+        self.signin()
+
+    @task(1)
+    def signin(self):
+        # 每次登录使用不同来源IP, 避免命中按IP的登录速率限制
+        seq = next(_sequence)
+        with self.client.post(
+            "/api/auth-signin",
+            json={"email": LOAD_TEST_EMAIL.format(index=self.index), "password": LOAD_TEST_PASSWORD},
+            headers={"X-Forwarded-For": f"10.{seq // 65536 % 256}.{seq // 256 % 256}.{seq % 256}"},
+            name="/api/auth-signin",
+            catch_response=True
+        ) as response:
+            if response.status_code == 200:
+                self.user_id = response.json().get("user_id")
+                response.success()
+            else:
+                response.failure(f"HTTP {response.status_code}")
+
+    @task(5)
+    def check_quota_status(self):
+        if not self.user_id:
+            return
+        with self.client.get(
+            f"/api/quota-status?user_id={self.user_id}&user_tier=pro",
+            name="/api/quota-status",
+            catch_response=True
+        ) as response:
+            if response.status_code == 200 and "remaining" in response.json():
+                response.success()
+            else:
+                response.failure(f"HTTP {response.status_code}")
+
+    @task(3)
+    def plan_tasks(self):
+        if not self.user_id:
+            return
+        with self.client.post(
+            "/api/plan-tasks",
+            json={"user_id": self.user_id, "user_tier": "pro", "input": f"压测计划 #{next(_sequence)}"},
+            name="/api/plan-tasks",
+            catch_response=True
+        ) as response:
+            if response.status_code == 200 and response.json().get("tasks"):
+                response.success()
+            else:
+                response.failure(f"HTTP {response.status_code}")
@@ -0,0 +1,128 @@
+"""
+本地网关压测场景
+
+不依赖线上环境: 通过 local_gateway.LocalGateway 在进程内挂载全部api处理器,
+校验登录/配额/任务规划流程的每请求查询次数(防止N+1回归)和延迟分位数。
+
+运行方法:
+    pytest tests/performance/test_local_gateway.py -v
+
+    # 安装pytest-benchmark后额外运行基准测试
+    pytest tests/performance/test_local_gateway.py --benchmark-only
+"""
+import importlib.util
+
+import pytest
+import requests
+
+from tests.performance.local_gateway import LocalGateway, percentile, run_scenario, scenario_request
+
+HAS_BENCHMARK = importlib.util.find_spec("pytest_benchmark") is not None
+
+LLM_LATENCY = 0.05
+
+# 每个场景单个请求允许的数据库往返次数; 超出说明引入了额外查询(如循环内查询)
+QUERY_BUDGETS = {
+    "signin": 5,      # 速率限制查询+记录, 登录, 更新登录时间, 读取用户
+    "quota": 1,       # 读取配额记录
+    "plan-tasks": 1,  # consume_user_quota 一次原子扣除
+}
+
+
+@pytest.fixture(scope="module")
+def gateway():
+    with LocalGateway(llm_latency=LLM_LATENCY, seed_users=20) as gateway:
+        yield gateway
+
+
+def _send(gateway, name, index=0):
+    method, path, kwargs = scenario_request(name, index, gateway.user_ids)
+    return requests.request(method, gateway.url + path, timeout=30, **kwargs)
+
+
+class TestRouting:
+    """测试处理器挂载"""
+
+    def test_core_routes_mounted(self, gateway):
+        for route in ("/api/auth-signin", "/api/quota-status", "/api/plan-tasks", "/api/webhook-worker"):
+            assert route in gateway.server.routes
+
+    def test_unknown_route_returns_404(self, gateway):
+        assert requests.get(gateway.url + "/api/does-not-exist", timeout=5).status_code == 404
+
+
+class TestFlows:
+    """测试各场景在替身上跑通"""
+
+    def test_signin_issues_tokens(self, gateway):
+        response = _send(gateway, "signin")
+
+        assert response.status_code == 200
+        assert response.json()["access_token"]
+
+    def test_quota_status(self, gateway):
+        response = _send(gateway, "quota")
+
+        assert response.status_code == 200
+        assert response.json()["user_tier"] == "pro"
+
+    def test_plan_tasks_calls_fake_llm(self, gateway):
+        calls = gateway.llm.calls
+        response = _send(gateway, "plan-tasks", index=1000)
+
+        assert response.status_code == 200
+        assert len(response.json()["tasks"]) == 6
+        assert gateway.llm.calls == calls + 1
+
+
+class TestQueryBudget:
+    """测试每请求数据库往返次数"""
+
+    @pytest.mark.parametrize("name", sorted(QUERY_BUDGETS))
+    def test_queries_within_budget(self, gateway, name):
+        for index in range(5):
+            assert _send(gateway, name, index=2000 + index).status_code == 200
+
+        route = scenario_request(name, 0, gateway.user_ids)[1].split("?")[0]
+        counts = gateway.server.query_counts(route)[-5:]
+        assert max(counts) <= QUERY_BUDGETS[name], gateway.server.last_queries(route)
+
+
+class TestLatency:
+    """测试并发下的吞吐量与延迟分位数"""
+
+    def test_percentile_nearest_rank(self):
+        samples = list(range(1, 101))
+
+        assert percentile(samples, 50) == 50
+        assert percentile(samples, 95) == 95
+        assert percentile(samples, 99) == 99
+
+    def test_plan_tasks_under_load(self, gateway):
+        report = run_scenario(gateway, "plan-tasks", total=40, concurrency=8)
+
+        assert report["errors"] == 0
+        assert report["p50_ms"] >= LLM_LATENCY * 1000
+        assert report["p99_ms"] < 5000
+        assert report["queries_per_request_max"] <= QUERY_BUDGETS["plan-tasks"]
+
+
+@pytest.mark.skipif(not HAS_BENCHMARK, reason="pytest-benchmark not installed")
+class TestBenchmark:
+    """pytest-benchmark基准(可用 --benchmark-compare 对比回归)"""
+
+    @pytest.mark.parametrize("name", ["signin", "quota"])
+    def test_benchmark_flow(self, benchmark, gateway, name):
+        counter = iter(range(10_000, 1_000_000))
+
+        response = benchmark(lambda: _send(gateway, name, index=next(counter)))
+
+        assert response.status_code == 200
+
+    def test_benchmark_plan_tasks(self, benchmark, gateway):
+        counter = iter(range(10_000, 1_000_000))
+
+        response = benchmark.pedantic(lambda: _send(gateway, "plan-tasks", index=next(counter)),
+                                      rounds=20, iterations=1)
+
+        assert response.status_code == 200
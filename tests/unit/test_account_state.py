@@ -0,0 +1,194 @@
+"""
+account_state.py 单元测试
+测试账户状态缓存的持久化、后台刷新与乐观更新
+"""
+import json
+import threading
+import time
+
+import pytest
+from PySide6.QtCore import QCoreApplication
+
+from gaiya.core.account_state import AccountStateCache, default_quota, last_quota_reset
+
+SERVER_QUOTA = {"remaining": {"daily_plan": 2, "weekly_report": 1, "chat": 8}, "user_tier": "free"}
+SUBSCRIPTION = {"success": True, "is_active": True, "user_tier": "pro"}
+
+
+@pytest.fixture
+def qt_app():
+    """提供Qt事件循环"""
+    app = QCoreApplication.instance() or QCoreApplication([])
+    yield app
+
+
+@pytest.fixture
+def state_file(tmp_path):
+    return tmp_path / "account_state.json"
+
+
+def _wait_refresh(state, qt_app):
+    """等待后台刷新结束并处理排队到主线程的信号"""
+    assert state.wait_for_refresh(5)
+    deadline = time.monotonic() + 2
+    while time.monotonic() < deadline:
+        qt_app.processEvents()
+        if not state.is_stale():
+            break
+
+
+class TestReads:
+    """测试缓存读取"""
+
+    def test_empty_cache_returns_tier_defaults(self, qt_app, state_file):
+        state = AccountStateCache(state_file, fetcher=lambda: {})
+        assert state.quota() == default_quota("free")
+        assert state.remaining("daily_plan") == 3
+        state.wait_for_refresh(5)
+
+    def test_reads_persisted_state_without_network(self, qt_app, state_file):
+        state_file.write_text(json.dumps({
+            "quota": SERVER_QUOTA, "user_tier": "free", "fetched_at": time.time()
+        }), encoding="utf-8")
+        calls = []
+        state = AccountStateCache(state_file, fetcher=lambda: calls.append(1) or {})
+
+        assert state.remaining("daily_plan") == 2
+        assert state.refresh() is False
+        assert calls == []
+
+    def test_corrupt_file_ignored(self, qt_app, state_file):
+        state_file.write_text("{not json", encoding="utf-8")
+        state = AccountStateCache(state_file, fetcher=lambda: {})
+        assert state.user_tier() == "free"
+
+
+class TestRefresh:
+    """测试后台刷新"""
+
+    def test_stale_read_refreshes_and_notifies(self, qt_app, state_file):
+        state = AccountStateCache(state_file, fetcher=lambda: {
+            "quota": SERVER_QUOTA, "subscription": SUBSCRIPTION
+        })
+        quotas, tiers = [], []
+        state.quota_changed.connect(quotas.append)
+        state.tier_changed.connect(tiers.append)
+
+        state.quota()
+        _wait_refresh(state, qt_app)
+
+        assert quotas[-1]["remaining"]["daily_plan"] == 2
+        assert tiers == ["pro"]
+        assert state.subscription()["is_active"] is True
+        assert json.loads(state_file.read_text(encoding="utf-8"))["user_tier"] == "pro"
+
+    def test_cache_from_before_daily_reset_is_stale(self, qt_app, state_file):
+        """测试北京时间零点重置前获取的配额即使未超过过期时长也需要刷新"""
+        reset = last_quota_reset()
+        exhausted = {"remaining": {"daily_plan": 0, "weekly_report": 0, "chat": 0}, "user_tier": "free"}
+        state_file.write_text(json.dumps({
+            "quota": exhausted, "user_tier": "free", "fetched_at": reset - 60
+        }), encoding="utf-8")
+        state = AccountStateCache(state_file, fetcher=lambda: {}, stale_after=86400)
+
+        assert state.quota_predates_reset() is True
+        assert state.is_stale() is True
+        state.wait_for_refresh(5)
+
+    def test_last_quota_reset_is_shanghai_midnight(self):
+        # 2025-01-01 15:30 UTC = 2025-01-01 23:30 北京时间; 2025-01-01 16:30 UTC = 01-02 00:30
+        assert last_quota_reset(1735745400) == 1735660800  # 2024-12-31 16:00 UTC
+        assert last_quota_reset(1735749000) == 1735747200  # 2025-01-01 16:00 UTC
+
+    def test_single_refresh_in_flight(self, qt_app, state_file):
+        release = threading.Event()
+        calls = []
+
+        def slow_fetch():
+            calls.append(1)
+            release.wait(5)
+            return {"quota": SERVER_QUOTA}
+
+        state = AccountStateCache(state_file, fetcher=slow_fetch)
+        assert state.refresh() is True
+        assert state.refresh(force=True) is False
+        state.quota()
+        release.set()
+        _wait_refresh(state, qt_app)
+
+        assert calls == [1]
+
+    def test_fallback_does_not_overwrite_server_quota(self, qt_app, state_file):
+        state = AccountStateCache(state_file, fetcher=lambda: {"quota": default_quota("free")})
+        state.update_quota(SERVER_QUOTA)
+
+        state.refresh(force=True)
+        _wait_refresh(state, qt_app)
+
+        assert state.remaining("daily_plan") == 2
+
+    def test_failed_refresh_keeps_cache(self, qt_app, state_file):
+        def failing_fetch():
+            raise ConnectionError("offline")
+
+        state = AccountStateCache(state_file, fetcher=failing_fetch)
+        state.update_quota(SERVER_QUOTA)
+        state.refresh(force=True)
+        _wait_refresh(state, qt_app)
+
+        assert state.remaining("chat") == 8
+        assert state.is_stale() is False
+
+
+class TestLocalUpdates:
+    """测试本地已知结果的乐观更新"""
+
+    def test_consume_quota(self, qt_app, state_file):
+        state = AccountStateCache(state_file, fetcher=lambda: {})
+        state.update_quota(SERVER_QUOTA)
+        quotas = []
+        state.quota_changed.connect(quotas.append)
+
+        state.consume_quota("daily_plan")
+        state.consume_quota("daily_plan")
+        state.consume_quota("daily_plan")
+
+        assert state.remaining("daily_plan") == 0
+        assert [q["remaining"]["daily_plan"] for q in quotas] == [1, 0, 0]
+        reloaded = AccountStateCache(state_file, fetcher=lambda: {})
+        assert reloaded.remaining("daily_plan") == 0
+
+    def test_tier_change_drops_old_quota(self, qt_app, state_file):
+        state = AccountStateCache(state_file, fetcher=lambda: {})
+        state.update_quota(SERVER_QUOTA)
+
+        state.set_user_tier("pro")
+
+        assert state.quota() == default_quota("pro")
+        assert state.is_stale()
+        state.wait_for_refresh(5)
+
+    def test_attach_other_account_clears_cache(self, qt_app, state_file):
+        class FakeAuth:
+            def __init__(self, user_id):
+                self.user_id = user_id
+
+            def get_user_id(self):
+                return self.user_id
+
+            def is_logged_in(self):
+                return True
+
+            def get_user_tier(self):
+                return "free"
+
+        state = AccountStateCache(state_file, fetcher=lambda: {})
+        state.attach(FakeAuth("u1"))
+        state.update_quota(SERVER_QUOTA)
+
+        state.attach(FakeAuth("u1"))
+        assert state.remaining("daily_plan") == 2
+
+        state.attach(FakeAuth("u2"))
+        assert state.remaining("daily_plan") == 3
+        state.wait_for_refresh(5)
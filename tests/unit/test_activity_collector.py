@@ -0,0 +1,160 @@
+"""
+activity_collector.py 单元测试
+测试活动样本的游程压缩存储(spans)与旧数据迁移
+"""
+import sqlite3
+import pytest
+
+from gaiya.core.activity_collector import ActivityCollector, ActivitySpan
+from gaiya.core.activity_sampler import ActivitySnapshot, ReplaySource
+
+START = 1_700_000_000
+
+
+def _snap(app, ts, title="doc", url=""):
+    return ActivitySnapshot(app=app, window_title=title, url=url, timestamp=ts)
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "activity_log.db")
+
+
+@pytest.fixture
+def collector(db_path):
+    c = ActivityCollector(db_path=db_path, collection_interval=5)
+    yield c
+    c.close()
+
+
+class TestSpanCompaction:
+    """测试样本合并为span"""
+
+    def test_unchanged_state_extends_span(self, collector):
+        """测试状态不变时原地延长span"""
+        for i in range(10):
+            collector.save_snapshot(_snap("code.exe", START + i * 5))
+
+        spans = collector.get_spans()
+        assert spans == [ActivitySpan("code.exe", "doc", "", START, START + 45, 10)]
+        assert spans[0].duration == 45
+
+    def test_switch_closes_previous_span(self, collector):
+        """测试切换应用时在切换时刻关闭上一个span"""
+        collector.save_snapshot(_snap("code.exe", START))
+        collector.save_snapshot(_snap("code.exe", START + 5))
+        collector.save_snapshot(_snap("chrome.exe", START + 10))
+        collector.save_snapshot(_snap("chrome.exe", START + 15, title="other"))
+
+        spans = collector.get_spans()
+        assert [(s.app, s.window_title, s.start_ts, s.end_ts) for s in spans] == [
+            ("code.exe", "doc", START, START + 10),
+            ("chrome.exe", "doc", START + 10, START + 15),
+            ("chrome.exe", "other", START + 15, START + 15),
+        ]
+
+    def test_gap_starts_new_span(self, collector):
+        """测试长时间无样本(休眠)后开始新span，不覆盖空档"""
+        collector.save_snapshot(_snap("code.exe", START))
+        collector.save_snapshot(_snap("code.exe", START + 600))
+
+        spans = collector.get_spans()
+        assert [(s.start_ts, s.end_ts) for s in spans] == [(START, START), (START + 600, START + 600)]
+
+    def test_replay_timeline(self, db_path):
+        """测试回放源采样: 行数与切换次数成正比"""
+        apps = ["code.exe"] * 40 + ["chrome.exe"] * 30 + ["code.exe"] * 30
+        source = ReplaySource([{"app": a, "window_title": "doc"} for a in apps], start=START, step=5)
+        collector = ActivityCollector(db_path=db_path, collection_interval=5, source=source)
+        for _ in apps:
+            collector.collect_once()
+
+        stats = collector.get_database_stats()
+        assert stats['total_records'] == 3
+        assert stats['total_samples'] == 100
+        collector.close()
+
+    def test_open_span_continues_after_restart(self, db_path):
+        """测试重启后继续延长最后一个span"""
+        first = ActivityCollector(db_path=db_path, collection_interval=5)
+        first.save_snapshot(_snap("code.exe", START))
+        first.close()
+
+        second = ActivityCollector(db_path=db_path, collection_interval=5)
+        second.save_snapshot(_snap("code.exe", START + 5))
+        assert [(s.start_ts, s.end_ts, s.sample_count) for s in second.get_spans()] == [(START, START + 5, 2)]
+        second.close()
+
+
+class TestQueries:
+    """测试span查询接口"""
+
+    @pytest.fixture
+    def filled(self, collector):
+        # code 0-100, chrome 100-160, code 160-200
+        for ts in range(START, START + 100, 5):
+            collector.save_snapshot(_snap("code.exe", ts))
+        for ts in range(START + 100, START + 160, 5):
+            collector.save_snapshot(_snap("chrome.exe", ts, url="https://example.com"))
+        for ts in range(START + 160, START + 205, 5):
+            collector.save_snapshot(_snap("code.exe", ts))
+        return collector
+
+    def test_range_returns_overlapping_spans(self, filled):
+        """测试按时间范围查询重叠的span"""
+        spans = filled.get_spans(START + 120, START + 130)
+        assert [s.app for s in spans] == ["chrome.exe"]
+        assert spans[0].url == "https://example.com"
+
+        assert len(filled.get_spans(START + 50, START + 170)) == 3
+
+    def test_app_durations_clipped_to_range(self, filled):
+        """测试应用时长统计按范围裁剪"""
+        assert filled.get_app_durations(START + 50, START + 180) == {"code.exe": 70, "chrome.exe": 60}
+
+    def test_recent_snapshots_newest_first(self, filled):
+        """测试兼容接口: 每个span一个快照，最新在前"""
+        recent = filled.get_recent_snapshots(limit=2)
+        assert [(s.app, s.timestamp) for s in recent] == [("code.exe", START + 200), ("chrome.exe", START + 160)]
+
+    def test_cleanup_removes_old_spans(self, collector):
+        """测试清理旧span"""
+        collector.save_snapshot(_snap("old.exe", 1000))
+        collector.cleanup_old_data(days_to_keep=30)
+        assert collector.get_spans() == []
+
+
+class TestMigration:
+    """测试旧activity_snapshots表迁移"""
+
+    def test_legacy_rows_compacted(self, db_path):
+        """测试旧的逐样本行被压缩为span并删除旧表"""
+        conn = sqlite3.connect(db_path)
+        conn.execute('''
+            CREATE TABLE activity_snapshots (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                app TEXT NOT NULL,
+                window_title TEXT,
+                url TEXT,
+                timestamp INTEGER NOT NULL,
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        rows = [("code.exe", "doc", None, START + i * 5) for i in range(6)]
+        rows += [("chrome.exe", "doc", "https://a.com", START + 30 + i * 5) for i in range(4)]
+        conn.executemany(
+            'INSERT INTO activity_snapshots (app, window_title, url, timestamp) VALUES (?, ?, ?, ?)', rows
+        )
+        conn.commit()
+        conn.close()
+
+        collector = ActivityCollector(db_path=db_path, collection_interval=5)
+        spans = collector.get_spans()
+        assert [(s.app, s.url, s.start_ts, s.end_ts, s.sample_count) for s in spans] == [
+            ("code.exe", "", START, START + 30, 6),
+            ("chrome.exe", "https://a.com", START + 30, START + 45, 4),
+        ]
+
+        tables = {row[0] for row in collector._conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+        assert "activity_snapshots" not in tables
+        collector.close()
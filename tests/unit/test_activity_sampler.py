@@ -0,0 +1,161 @@
+"""
+activity_sampler.py 单元测试
+使用ReplaySource在任意平台上确定性地测试采样总线
+"""
+import dataclasses
+import pytest
+from datetime import datetime
+from unittest.mock import Mock, patch
+
+from gaiya.core.activity_sampler import ActivitySampler, ActivitySnapshot, ReplaySource
+
+
+def _timeline(apps, title="doc"):
+    return [{"app": app, "window_title": title} for app in apps]
+
+
+@pytest.fixture
+def replay():
+    """10条记录的回放源: 5秒一条"""
+    apps = ["code.exe"] * 4 + ["chrome.exe"] * 3 + ["code.exe"] * 3
+    return ReplaySource(_timeline(apps), start=1_700_000_000, step=5)
+
+
+class TestSampling:
+    """测试采样"""
+
+    def test_snapshot_is_immutable(self, replay):
+        """测试快照不可变"""
+        snapshot = ActivitySampler(source=replay).sample()
+
+        assert snapshot.app == "code.exe"
+        assert snapshot.timestamp == 1_700_000_000
+        with pytest.raises(dataclasses.FrozenInstanceError):
+            snapshot.app = "other.exe"
+
+    def test_process_name_cached_per_pid(self, replay):
+        """测试进程名按pid缓存,只在新进程出现时查询"""
+        sampler = ActivitySampler(source=replay)
+        for _ in range(10):
+            sampler.tick()
+
+        assert replay.lookups == 2
+        assert sampler.stats['process_lookups'] == 2
+        assert sampler.stats['ticks'] == 10
+
+    def test_browser_url_from_title_or_replay(self):
+        """测试浏览器URL: 回放记录优先,否则从标题推断"""
+        source = ReplaySource([
+            {"app": "chrome.exe", "window_title": "GitHub - github.com"},
+            {"app": "chrome.exe", "window_title": "x", "url": "https://example.com/a"},
+            {"app": "code.exe", "window_title": "main.py - project"},
+        ])
+        sampler = ActivitySampler(source=source)
+
+        assert sampler.sample().url == "https://github.com"
+        assert sampler.sample().url == "https://example.com/a"
+        assert sampler.sample().url == ""
+
+    def test_end_of_replay(self):
+        """测试回放结束后不再产生快照"""
+        sampler = ActivitySampler(source=ReplaySource(_timeline(["a.exe"])))
+        assert sampler.tick() is not None
+        assert sampler.tick() is None
+
+
+class TestSubscriptions:
+    """测试订阅分发"""
+
+    def test_all_subscribers_share_one_sample(self, replay):
+        """测试同一次采样分发给所有订阅者(同一对象)"""
+        sampler = ActivitySampler(source=replay)
+        sampler.start = Mock()  # 手动tick,不启动线程
+        received_a, received_b = [], []
+        sampler.subscribe(received_a.append, interval=5)
+        sampler.subscribe(received_b.append, interval=5)
+
+        sampler.tick()
+
+        assert received_a[0] is received_b[0]
+
+    def test_per_subscriber_interval(self, replay):
+        """测试每个订阅者按自己的间隔节流,采样间隔取最小值"""
+        sampler = ActivitySampler(source=replay)
+        sampler.start = Mock()
+        fast, slow = [], []
+        sampler.subscribe(fast.append, interval=5)
+        sampler.subscribe(slow.append, interval=15)
+
+        assert sampler.get_tick_interval() == 5
+        for _ in range(10):
+            sampler.tick()
+
+        assert len(fast) == 10
+        assert [s.timestamp - 1_700_000_000 for s in slow] == [0, 15, 30, 45]
+
+    def test_passive_subscriber_does_not_start_sampling(self, replay):
+        """测试被动订阅不启动采样,最后一个主动订阅者退出时停止"""
+        sampler = ActivitySampler(source=replay)
+        sampler.start = Mock()
+        sampler.stop = Mock()
+
+        unsubscribe_passive = sampler.subscribe(lambda s: None, interval=60, passive=True)
+        sampler.start.assert_not_called()
+
+        unsubscribe_active = sampler.subscribe(lambda s: None, interval=5)
+        sampler.start.assert_called_once()
+
+        unsubscribe_active()
+        sampler.stop.assert_called_once()
+        unsubscribe_passive()
+
+    def test_failing_subscriber_isolated(self, replay):
+        """测试订阅者异常不影响其他订阅者"""
+        sampler = ActivitySampler(source=replay)
+        sampler.start = Mock()
+        received = []
+        sampler.subscribe(Mock(side_effect=RuntimeError("boom")))
+        sampler.subscribe(received.append)
+
+        sampler.tick()
+
+        assert len(received) == 1
+        assert sampler.stats['errors'] == 1
+
+    def test_background_thread(self):
+        """测试后台线程采样并在取消订阅后停止"""
+        import threading
+        source = ReplaySource(_timeline(["a.exe"]), loop=True)
+        sampler = ActivitySampler(source=source)
+        got = threading.Event()
+
+        unsubscribe = sampler.subscribe(lambda s: got.set(), interval=1)
+        assert got.wait(2)
+        unsubscribe()
+
+        assert not sampler.running
+
+
+class TestActivityTracker:
+    """测试会话聚合订阅者"""
+
+    def test_sessions_from_replay(self):
+        """测试回放时间线聚合为会话"""
+        from gaiya.services import activity_tracker
+
+        apps = ["code.exe"] * 4 + ["chrome.exe"] * 3 + ["code.exe"] * 3
+        sampler = ActivitySampler(source=ReplaySource(_timeline(apps), start=1_700_000_000, step=5))
+        sampler.start = Mock()
+
+        with patch.object(activity_tracker, "db") as mock_db:
+            tracker = activity_tracker.ActivityTracker(sampler=sampler, polling_interval=5,
+                                                       min_session_duration=5, flush_interval=300)
+            tracker.start()
+            for _ in range(len(apps)):
+                sampler.tick()
+
+            saved = [(c.args[0], c.args[4]) for c in mock_db.save_activity_session.call_args_list]
+
+        assert saved == [("code.exe", 20), ("chrome.exe", 15)]
+        assert tracker.current_process == "code.exe"
+        assert tracker.current_start_time == datetime.fromtimestamp(1_700_000_000 + 35)
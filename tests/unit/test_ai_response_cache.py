@@ -0,0 +1,232 @@
+"""
+ai_response_cache.py 单元测试
+测试缓存键规范化、存储后端TTL、单飞去重、配额策略和流式转发
+"""
+import json
+import pytest
+import sys
+import threading
+import time
+from io import BytesIO
+from pathlib import Path
+from unittest.mock import Mock, patch
+
+# 添加api目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "api"))
+
+from ai_response_cache import (
+    AIResponseCache, CacheEntry, MemoryCacheStore, SQLiteCacheStore,
+    SingleFlight, make_cache_key
+)
+from ai_stream import EventStream
+
+
+@pytest.fixture
+def request_body():
+    """上游请求体"""
+    return {
+        "model": "gpt-5",
+        "messages": [
+            {"role": "system", "content": "你是任务规划助手"},
+            {"role": "user", "content": "明天 上午写代码"}
+        ],
+        "temperature": 0.3
+    }
+
+
+def _upstream_response(status_code=200, content="ok"):
+    response = Mock()
+    response.status_code = status_code
+    response.text = content
+    response.json.return_value = {"choices": [{"message": {"content": content}}]}
+    return response
+
+
+class TestCacheKey:
+    """测试缓存键"""
+
+    def test_whitespace_normalized(self, request_body):
+        """测试仅空白差异的请求得到相同缓存键"""
+        other = dict(request_body, messages=[
+            request_body["messages"][0],
+            {"role": "user", "content": "  明天   上午写代码\n"}
+        ])
+        assert make_cache_key("plan_tasks", request_body) == make_cache_key("plan_tasks", other)
+
+    def test_params_and_endpoint_distinguish(self, request_body):
+        """测试模型参数和端点参与缓存键"""
+        key = make_cache_key("plan_tasks", request_body)
+        assert key != make_cache_key("plan_tasks", dict(request_body, temperature=0.7))
+        assert key != make_cache_key("chat_query", request_body)
+
+
+class TestStores:
+    """测试存储后端"""
+
+    @pytest.mark.parametrize("store_factory", [
+        lambda tmp_path: MemoryCacheStore(),
+        lambda tmp_path: SQLiteCacheStore(str(tmp_path / "cache.db")),
+    ])
+    def test_set_get_expire(self, tmp_path, store_factory):
+        """测试读写和过期"""
+        store = store_factory(tmp_path)
+        store.set("k1", CacheEntry({"a": 1}, "u1", time.time() + 60))
+        store.set("k2", CacheEntry({"b": 2}, "u1", time.time() - 1))
+
+        assert store.get("k1").response == {"a": 1}
+        assert store.get("k1").owner == "u1"
+        assert store.get("k2") is None
+
+        store.delete("k1")
+        assert store.get("k1") is None
+
+    def test_memory_store_lru_bound(self):
+        """测试内存存储容量上限"""
+        store = MemoryCacheStore(max_entries=2)
+        for key in ("a", "b", "c"):
+            store.set(key, CacheEntry({}, "u", time.time() + 60))
+
+        assert store.get("a") is None
+        assert store.get("c") is not None
+
+
+class TestSingleFlight:
+    """测试单飞去重"""
+
+    def test_concurrent_calls_share_result(self):
+        """测试相同键的并发调用只执行一次"""
+        flight = SingleFlight()
+        calls = []
+        started = threading.Event()
+
+        def slow():
+            calls.append(1)
+            started.set()
+            time.sleep(0.1)
+            return "result"
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(flight.do("k", slow)))
+        leader.start()
+        started.wait()
+        followers = [threading.Thread(target=lambda: results.append(flight.do("k", slow))) for _ in range(3)]
+        for t in followers:
+            t.start()
+        for t in [leader] + followers:
+            t.join()
+
+        assert len(calls) == 1
+        assert sorted(shared for _, shared in results) == [False, True, True, True]
+        assert all(value == "result" for value, _ in results)
+
+
+class TestAIResponseCache:
+    """测试缓存门面"""
+
+    def test_hit_skips_upstream_and_quota_for_same_user(self, request_body):
+        """测试同一用户重试命中缓存且不扣配额"""
+        cache = AIResponseCache()
+        with patch("ai_response_cache.requests.post", return_value=_upstream_response()) as mock_post:
+            first = cache.chat_completion("plan_tasks", "http://x", "key", request_body, 10, "u1")
+            retry = cache.chat_completion("plan_tasks", "http://x", "key", request_body, 10, "u1")
+
+        assert mock_post.call_count == 1
+        assert not first.cache_hit and first.charge_quota
+        assert retry.cache_hit and not retry.charge_quota
+        assert retry.data == first.data
+        assert cache.is_free_hit("plan_tasks", request_body, "u1")
+
+    def test_other_user_hit_is_charged(self, request_body):
+        """测试same_user策略下其他用户命中仍扣配额"""
+        cache = AIResponseCache()
+        with patch("ai_response_cache.requests.post", return_value=_upstream_response()):
+            cache.chat_completion("plan_tasks", "http://x", "key", request_body, 10, "u1")
+            other = cache.chat_completion("plan_tasks", "http://x", "key", request_body, 10, "u2")
+
+        assert other.cache_hit and other.charge_quota
+        assert not cache.is_free_hit("plan_tasks", request_body, "u2")
+
+    def test_errors_not_cached(self, request_body):
+        """测试非200响应不缓存"""
+        cache = AIResponseCache()
+        with patch("ai_response_cache.requests.post", return_value=_upstream_response(502, "bad gateway")) as mock_post:
+            result = cache.chat_completion("plan_tasks", "http://x", "key", request_body, 10, "u1")
+            cache.chat_completion("plan_tasks", "http://x", "key", request_body, 10, "u1")
+
+        assert result.status_code == 502
+        assert result.text == "bad gateway"
+        assert mock_post.call_count == 2
+
+    def test_ttl_zero_disables_cache(self, request_body):
+        """测试TTL为0时不缓存"""
+        cache = AIResponseCache(ttls={"plan_tasks": 0})
+        with patch("ai_response_cache.requests.post", return_value=_upstream_response()) as mock_post:
+            cache.chat_completion("plan_tasks", "http://x", "key", request_body, 10, "u1")
+            cache.chat_completion("plan_tasks", "http://x", "key", request_body, 10, "u1")
+
+        assert mock_post.call_count == 2
+
+    def test_invalidate(self, request_body):
+        """测试删除缓存条目"""
+        cache = AIResponseCache()
+        with patch("ai_response_cache.requests.post", return_value=_upstream_response()) as mock_post:
+            cache.chat_completion("plan_tasks", "http://x", "key", request_body, 10, "u1")
+            cache.invalidate("plan_tasks", request_body)
+            cache.chat_completion("plan_tasks", "http://x", "key", request_body, 10, "u1")
+
+        assert mock_post.call_count == 2
+
+
+class TestStreaming:
+    """测试流式上游调用"""
+
+    @staticmethod
+    def _stream_response(parts):
+        lines = []
+        for part in parts:
+            lines.append("data: " + json.dumps({"choices": [{"delta": {"content": part}}]}))
+        lines.append("data: " + json.dumps({"choices": [], "usage": {"total_tokens": 42}}))
+        lines.append("data: [DONE]")
+        response = Mock()
+        response.status_code = 200
+        response.iter_lines.return_value = iter(lines)
+        return response
+
+    def test_stream_relays_deltas_and_caches(self, request_body):
+        """测试流式调用逐片段回调并以非流式结构写入缓存"""
+        cache = AIResponseCache()
+        deltas = []
+        with patch("ai_stream.requests.post", return_value=self._stream_response(["你", "好"])) as mock_post:
+            result = cache.chat_completion("plan_tasks", "http://x", "key", request_body, 10, "u1",
+                                           on_delta=deltas.append)
+
+        assert deltas == ["你", "好"]
+        assert mock_post.call_args.kwargs["json"]["stream"] is True
+        assert result.data["choices"][0]["message"]["content"] == "你好"
+        assert result.data["usage"] == {"total_tokens": 42}
+
+        # 命中缓存时一次性回放完整内容
+        replayed = []
+        hit = cache.chat_completion("plan_tasks", "http://x", "key", request_body, 10, "u1",
+                                    on_delta=replayed.append)
+        assert hit.cache_hit
+        assert replayed == ["你好"]
+
+
+class TestEventStream:
+    """测试SSE输出"""
+
+    def test_writes_headers_once_and_events(self):
+        """测试首个事件时写出响应头，最终结果按状态码映射为done/error"""
+        handler = Mock()
+        handler.wfile = BytesIO()
+        stream = EventStream(handler, "https://app")
+
+        assert not stream.started
+        stream.delta("片段")
+        stream.finish(429, {"error": "配额"})
+
+        handler.send_response.assert_called_once_with(200)
+        body = handler.wfile.getvalue().decode("utf-8")
+        assert 'event: delta\ndata: {"text": "片段"}\n\n' in body
+        assert 'event: error\ndata: {"error": "配额", "status": 429}\n\n' in body
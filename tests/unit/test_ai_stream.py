@@ -0,0 +1,150 @@
+"""
+gaiya/core/ai_stream.py 单元测试
+测试SSE事件解析、增量任务解析以及GaiyaAIClient的流式请求
+"""
+import json
+import pytest
+from unittest.mock import Mock
+
+from gaiya.core.ai_stream import IncrementalTaskParser, iter_sse_events
+
+
+TASKS = [
+    {"start": "07:00", "end": "08:00", "task": "起床{早餐}", "category": "break"},
+    {"start": "08:00", "end": "12:00", "task": "写\"代码\"", "category": "work"},
+    {"start": "23:00", "end": "07:00", "task": "睡眠", "category": "break"},
+]
+
+
+def _chunks(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class TestIterSSEEvents:
+    """测试SSE解析"""
+
+    def test_parses_named_and_multiline_events(self):
+        """测试事件名、多行data、注释和默认事件名"""
+        lines = [
+            ": keep-alive", "",
+            "event: delta", 'data: {"text": "a"}', "",
+            "data: line1", "data: line2", "",
+            b"event: done", b'data: {"ok": true}',
+        ]
+        events = list(iter_sse_events(lines))
+
+        assert events == [
+            ("delta", '{"text": "a"}'),
+            ("message", "line1\nline2"),
+            ("done", '{"ok": true}'),
+        ]
+
+
+class TestIncrementalTaskParser:
+    """测试增量任务解析"""
+
+    @pytest.mark.parametrize("chunk_size", [1, 3, 17, 10000])
+    def test_tasks_emitted_as_objects_close(self, chunk_size):
+        """测试任意切分下逐个解析出任务，字符串中的括号和引号不影响解析"""
+        text = json.dumps({"tasks": TASKS}, ensure_ascii=False)
+        parser = IncrementalTaskParser()
+        emitted = []
+        for chunk in _chunks(text, chunk_size):
+            emitted.extend(parser.feed(chunk))
+
+        assert emitted == TASKS
+        assert parser.tasks == TASKS
+
+    def test_first_task_available_before_end(self):
+        """测试第一个任务在整体输出结束前即可得到"""
+        text = json.dumps({"tasks": TASKS}, ensure_ascii=False)
+        first_end = text.index('"break"}') + len('"break"}')
+        parser = IncrementalTaskParser()
+
+        assert parser.feed(text[:first_end - 1]) == []
+        assert parser.feed(text[first_end - 1:first_end]) == [TASKS[0]]
+
+    def test_markdown_fence_and_bare_array(self):
+        """测试markdown代码块包裹的裸数组"""
+        text = "```json\n" + json.dumps(TASKS, ensure_ascii=False) + "\n```"
+        parser = IncrementalTaskParser()
+        for chunk in _chunks(text, 5):
+            parser.feed(chunk)
+
+        assert parser.tasks == TASKS
+
+    def test_ignores_text_after_array(self):
+        """测试任务数组结束后的内容不再解析"""
+        parser = IncrementalTaskParser()
+        parser.feed('{"tasks": [{"task": "a"}], "extra": [{"task": "b"}]}')
+
+        assert parser.tasks == [{"task": "a"}]
+
+
+class TestClientStreaming:
+    """测试GaiyaAIClient流式请求"""
+
+    @pytest.fixture
+    def client(self):
+        from ai_client import GaiyaAIClient
+        client = GaiyaAIClient(backend_url="http://test", user_id="u1")
+        client.session = Mock()
+        return client
+
+    @staticmethod
+    def _sse_response(events):
+        lines = []
+        for event, data in events:
+            lines += [f"event: {event}", f"data: {json.dumps(data, ensure_ascii=False)}", ""]
+        response = Mock()
+        response.status_code = 200
+        response.headers = {"Content-Type": "text/event-stream; charset=utf-8"}
+        response.iter_lines.return_value = iter(lines)
+        return response
+
+    def test_plan_tasks_streams_partial_tasks(self, client):
+        """测试plan_tasks边接收边回调已解析的任务"""
+        text = json.dumps({"tasks": TASKS}, ensure_ascii=False)
+        final = {"success": True, "tasks": TASKS, "quota_info": {}}
+        events = [("delta", {"text": chunk}) for chunk in _chunks(text, 20)] + [("done", final)]
+        client.session.post.return_value = self._sse_response(events)
+
+        partials = []
+        result = client.plan_tasks("明天的计划", on_partial=partials.append)
+
+        assert result == final
+        assert client.session.post.call_args.kwargs["json"]["stream"] is True
+        # 首个片段回调一次，之后每解析出新任务回调一次
+        counts = [len(p["tasks"]) for p in partials]
+        assert counts[-1] == len(TASKS)
+        assert counts == sorted(counts)
+        assert sum(len(p["new_tasks"]) for p in partials) == len(TASKS)
+
+    def test_error_event_maps_to_status(self, client):
+        """测试error事件按状态码处理"""
+        client.session.post.return_value = self._sse_response([
+            ("delta", {"text": "部分"}),
+            ("error", {"status": 504, "error": "请求超时"}),
+        ])
+
+        assert client.chat_query("问题", {}, on_partial=lambda p: None) is None
+
+    def test_falls_back_to_json_response(self, client):
+        """测试后端未返回事件流时按普通JSON处理"""
+        response = Mock()
+        response.status_code = 200
+        response.headers = {"Content-Type": "application/json"}
+        response.json.return_value = {"response": "回答"}
+        client.session.post.return_value = response
+
+        assert client.chat_query("问题", {}, on_partial=lambda p: None) == "回答"
+
+    def test_non_streaming_unchanged(self, client):
+        """测试未传入on_partial时仍为普通请求"""
+        response = Mock()
+        response.status_code = 200
+        response.json.return_value = {"report": "周报"}
+        client.session.post.return_value = response
+
+        assert client.generate_weekly_report({}) == "周报"
+        assert "stream" not in client.session.post.call_args.kwargs
@@ -6,7 +6,12 @@ auth_manager.py 单元测试
 import pytest
 from unittest.mock import Mock, MagicMock, patch
 from datetime import datetime, timedelta, timezone
-from api.auth_manager import AuthManager
+import time
+
+import jwt
+
+import api.auth_manager as auth_module
+from api.auth_manager import AuthManager, invalidate_user_cache
 
 
 @pytest.fixture
@@ -562,6 +567,149 @@ class TestAdminEmailVerification:
         assert result is not None
 
 
+JWT_SECRET = "test-jwt-secret-with-at-least-32-bytes"
+
+
+def _make_token(sub="user-1", exp_offset=3600):
+    """签发测试用的Supabase访问令牌"""
+    return jwt.encode(
+        {"sub": sub, "aud": "authenticated", "exp": int(time.time()) + exp_offset},
+        JWT_SECRET, algorithm="HS256"
+    )
+
+
+@pytest.fixture
+def token_cache():
+    """配置JWT密钥并清空令牌/用户缓存"""
+    caches = (auth_module._token_claims_cache, auth_module._user_row_cache, auth_module._session_cache)
+    for cache in caches:
+        cache.clear()
+    with patch('api.auth_manager._get_jwt_secret', return_value=JWT_SECRET):
+        yield
+    for cache in caches:
+        cache.clear()
+
+
+def _active_session(client, user_id="user-1"):
+    """Supabase Auth确认会话有效"""
+    client.auth.get_user.return_value = Mock(user=Mock(id=user_id))
+
+
+class TestTokenCache:
+    """测试令牌验证与用户记录缓存"""
+
+    def test_repeated_token_skips_signature_verification(self, auth_manager, token_cache):
+        token = _make_token()
+
+        with patch('api.auth_manager.jwt.decode', wraps=jwt.decode) as decode:
+            assert auth_manager._verify_and_decode_token(token) == "user-1"
+            assert auth_manager._verify_and_decode_token(token) == "user-1"
+
+        assert decode.call_count == 1
+
+    def test_invalid_token_not_cached(self, auth_manager, token_cache):
+        token = _make_token(exp_offset=-10)
+
+        with patch('api.auth_manager.jwt.decode', wraps=jwt.decode) as decode:
+            assert auth_manager._verify_and_decode_token(token) is None
+            assert auth_manager._verify_and_decode_token(token) is None
+
+        assert decode.call_count == 2
+
+    def test_cached_claims_expire_with_token(self):
+        cache = auth_module._ExpiringCache(max_entries=2)
+        cache.set("expired", {"sub": "user-1"}, time.time() - 1)
+
+        assert cache.get("expired") is None
+
+    def test_cache_evicts_least_recently_used(self):
+        cache = auth_module._ExpiringCache(max_entries=2)
+        for key in ("a", "b"):
+            cache.set(key, key, time.time() + 60)
+        cache.get("a")
+        cache.set("c", "c", time.time() + 60)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == "a"
+
+    def test_get_user_by_token_caches_user_row(self, auth_manager, mock_supabase_client, token_cache):
+        token = _make_token()
+        select = mock_supabase_client.table.return_value.select.return_value.eq.return_value.execute
+        select.return_value = Mock(data=[{"id": "user-1", "user_tier": "free"}])
+        _active_session(mock_supabase_client)
+
+        assert auth_manager.get_user_by_token(token)["user_tier"] == "free"
+        assert auth_manager.get_user_by_token(token)["user_tier"] == "free"
+
+        assert select.call_count == 1
+        mock_supabase_client.auth.get_user.assert_called_once_with(token)
+
+    def test_forged_token_rejected_without_remote_call(self, auth_manager, mock_supabase_client, token_cache):
+        token = jwt.encode(
+            {"sub": "user-1", "aud": "authenticated", "exp": int(time.time()) + 3600},
+            "another-secret-with-at-least-32-bytes", algorithm="HS256"
+        )
+
+        assert auth_manager.get_user_by_token(token) is None
+        mock_supabase_client.auth.get_user.assert_not_called()
+
+    def test_revoked_session_rejected_despite_valid_signature(self, auth_manager, mock_supabase_client, token_cache):
+        token = _make_token()
+        mock_supabase_client.auth.get_user.return_value = Mock(user=None)
+
+        assert auth_manager.get_user_by_token(token) is None
+
+    def test_sign_out_drops_confirmed_session(self, auth_manager, mock_supabase_client, token_cache):
+        token = _make_token()
+        select = mock_supabase_client.table.return_value.select.return_value.eq.return_value.execute
+        select.return_value = Mock(data=[{"id": "user-1"}])
+        _active_session(mock_supabase_client)
+        auth_manager.get_user_by_token(token)
+
+        auth_manager.sign_out(token)
+        mock_supabase_client.auth.get_user.side_effect = Exception("Session not found")
+
+        assert auth_manager.get_user_by_token(token) is None
+
+    def test_profile_update_invalidates_user_row(self, auth_manager, mock_supabase_client, token_cache):
+        token = _make_token()
+        select = mock_supabase_client.table.return_value.select.return_value.eq.return_value.execute
+        select.return_value = Mock(data=[{"id": "user-1", "username": "old"}])
+        _active_session(mock_supabase_client)
+        auth_manager.get_user_by_token(token)
+
+        mock_supabase_client.table.return_value.update.return_value.eq.return_value.execute.return_value = Mock(
+            data=[{"id": "user-1", "username": "new"}]
+        )
+        auth_manager.update_user_profile("user-1", {"username": "new"})
+        select.return_value = Mock(data=[{"id": "user-1", "username": "new"}])
+
+        assert auth_manager.get_user_by_token(token)["username"] == "new"
+        assert select.call_count == 2
+
+    def test_subscription_write_invalidates_user_row(self, auth_manager, mock_supabase_client, token_cache):
+        token = _make_token()
+        select = mock_supabase_client.table.return_value.select.return_value.eq.return_value.execute
+        select.return_value = Mock(data=[{"id": "user-1", "user_tier": "free"}])
+        _active_session(mock_supabase_client)
+        auth_manager.get_user_by_token(token)
+
+        invalidate_user_cache("user-1")
+        select.return_value = Mock(data=[{"id": "user-1", "user_tier": "pro"}])
+
+        assert auth_manager.get_user_by_token(token)["user_tier"] == "pro"
+
+    def test_sign_out_drops_cached_claims(self, auth_manager, token_cache):
+        token = _make_token()
+        auth_manager._verify_and_decode_token(token)
+
+        auth_manager.sign_out(token)
+
+        with patch('api.auth_manager.jwt.decode', wraps=jwt.decode) as decode:
+            auth_manager._verify_and_decode_token(token)
+        assert decode.call_count == 1
+
+
 # Pytest配置
 if __name__ == "__main__":
     pytest.main([__file__, "-v", "--tb=short"])
@@ -127,25 +127,24 @@ class TestTokenRefresh:
         with patch.object(client.session, 'post') as mock_post:
             mock_post.side_effect = requests.exceptions.SSLError("SSL certificate error")
 
-            # Mock httpx成功响应 (注意:httpx是在refresh_access_token内部导入的)
-            with patch('httpx.Client') as mock_httpx_client:
-                mock_context = MagicMock()
-                mock_response = Mock()
-                mock_response.status_code = 200
-                mock_response.json.return_value = {
-                    "success": True,
-                    "access_token": "new_access_token_via_httpx",
-                    "refresh_token": "new_refresh_token_via_httpx"
-                }
-                mock_context.__enter__.return_value.post.return_value = mock_response
-                mock_httpx_client.return_value = mock_context
+            # Mock httpx成功响应 (共享连接池中的httpx后备客户端)
+            mock_fallback = Mock()
+            mock_response = Mock()
+            mock_response.status_code = 200
+            mock_response.json.return_value = {
+                "success": True,
+                "access_token": "new_access_token_via_httpx",
+                "refresh_token": "new_refresh_token_via_httpx"
+            }
+            mock_fallback.post.return_value = mock_response
 
+            with patch.object(client._http, 'fallback_client', return_value=mock_fallback):
                 result = client.refresh_access_token()
 
                 assert result["success"] is True
                 assert result["access_token"] == "new_access_token_via_httpx"
-                # 验证httpx被调用
-                mock_httpx_client.assert_called_once()
+                # 验证httpx后备客户端被调用
+                mock_fallback.post.assert_called_once()
 
 
 class TestAuthenticatedRequest:
@@ -0,0 +1,157 @@
+"""
+config_changes.py / config_debouncer.py 单元测试
+测试配置变更集的计算与应用,以及后台原子写入
+"""
+import json
+import threading
+
+from gaiya.utils.config_changes import ConfigChangeSet, apply_changes, diff_config
+from gaiya.utils.config_debouncer import ConfigDebouncer
+from gaiya.utils.json_store import write_json
+
+BASE = {
+    "bar_height": 20,
+    "background_opacity": 204,
+    "danmaku": {"enabled": True, "speed": 1.0, "opacity": 1.0},
+    "notification": {"before_start_minutes": [10, 5]},
+}
+
+
+def _changed(**overrides):
+    config = json.loads(json.dumps(BASE))
+    for dotted, value in overrides.items():
+        node = config
+        *parents, leaf = dotted.split("__")
+        for key in parents:
+            node = node[key]
+        node[leaf] = value
+    return config
+
+
+class TestDiff:
+    """测试变更集计算"""
+
+    def test_nested_field_path(self):
+        changes = diff_config(BASE, _changed(danmaku__speed=1.5, bar_height=30))
+        assert changes == {("danmaku", "speed"): 1.5, ("bar_height",): 30}
+
+    def test_lists_compared_whole(self):
+        changes = diff_config(BASE, _changed(notification__before_start_minutes=[10]))
+        assert changes == {("notification", "before_start_minutes"): [10]}
+
+    def test_new_keys_reported_missing_keys_ignored(self):
+        new = {"bar_height": 20, "language": "en_US"}
+        assert diff_config(BASE, new) == {("language",): "en_US"}
+
+    def test_apply_roundtrip(self):
+        new = _changed(danmaku__opacity=0.5, background_opacity=100)
+        target = json.loads(json.dumps(BASE))
+        apply_changes(target, diff_config(BASE, new))
+        assert target == new
+
+    def test_apply_copies_values(self):
+        value = [1, 2]
+        target = {}
+        apply_changes(target, {("a", "b"): value})
+        value.append(3)
+        assert target == {"a": {"b": [1, 2]}}
+
+
+class TestChangeSet:
+    """测试变更集分类"""
+
+    def test_empty_is_falsy(self):
+        assert not ConfigChangeSet.between(BASE, BASE, [{"task": "a"}], [{"task": "a"}])
+
+    def test_tasks_included_only_when_changed(self):
+        change_set = ConfigChangeSet.between(BASE, BASE, [{"task": "a"}], [{"task": "b"}])
+        assert change_set and change_set.tasks == [{"task": "b"}]
+        assert not change_set.only_within([("bar_height",)])
+
+    def test_only_within(self):
+        change_set = ConfigChangeSet.between(BASE, _changed(danmaku__speed=2.0), live=True)
+        assert change_set.live
+        assert change_set.touches("danmaku")
+        assert change_set.only_within([("danmaku", "speed"), ("bar_height",)])
+        assert not change_set.only_within([("danmaku", "opacity")])
+
+
+class TestBackgroundWrite:
+    """测试防抖动保存器的后台写入"""
+
+    def test_background_write_is_atomic_and_latest_wins(self, tmp_path):
+        path = tmp_path / "config.json"
+        saved = threading.Event()
+        debouncer = ConfigDebouncer(path, on_save_callback=saved.set)
+
+        for height in (10, 20, 30):
+            debouncer.pending_config = _changed(bar_height=height)
+            debouncer._save_in_background()
+        debouncer.flush()
+
+        assert saved.is_set()
+        assert json.loads(path.read_text(encoding="utf-8"))["bar_height"] == 30
+        assert not path.with_suffix(".tmp").exists()
+
+    def test_flush_waits_for_in_flight_background_write(self, tmp_path):
+        """测试后台线程已取出快照但尚未开始写入时, flush() 仍等待其写完"""
+        path = tmp_path / "config.json"
+        debouncer = ConfigDebouncer(path)
+        taken, release = threading.Event(), threading.Event()
+        original_write = debouncer._write
+
+        def delayed_write(seq, config):
+            taken.set()
+            release.wait(5)
+            return original_write(seq, config)
+
+        debouncer._write = delayed_write
+        debouncer.pending_config = _changed(bar_height=30)
+        debouncer._save_in_background()
+        assert taken.wait(5)
+
+        threading.Timer(0.1, release.set).start()
+        debouncer.flush()
+
+        assert json.loads(path.read_text(encoding="utf-8"))["bar_height"] == 30
+
+    def test_failed_write_does_not_block_flush(self, tmp_path):
+        path = tmp_path / "config.json"
+        debouncer = ConfigDebouncer(path)
+        debouncer.pending_config = {"bad": object()}
+        debouncer._save_in_background()
+
+        debouncer.flush()
+        assert not path.exists()
+
+    def test_stale_snapshot_skipped(self, tmp_path):
+        """测试较早的快照不会覆盖已写入的新版本"""
+        path = tmp_path / "config.json"
+        debouncer = ConfigDebouncer(path)
+        debouncer.pending_config = _changed(bar_height=10)
+        stale = debouncer._take_pending()
+        debouncer.save_immediately(_changed(bar_height=40))
+
+        assert debouncer._write(*stale) is False
+        assert json.loads(path.read_text(encoding="utf-8"))["bar_height"] == 40
+
+    def test_alternating_with_json_store_writer(self, tmp_path):
+        """测试与其他写入方交替写同一文件时, 不会把已被覆盖的内容当作未变化而跳过"""
+        path = tmp_path / "config.json"
+        debouncer = ConfigDebouncer(path)
+
+        debouncer.save_immediately(_changed(bar_height=10))
+        write_json(path, _changed(bar_height=20), indent=4)
+        debouncer.save_immediately(_changed(bar_height=10))
+        assert json.loads(path.read_text(encoding="utf-8"))["bar_height"] == 10
+
+        write_json(path, _changed(bar_height=20), indent=4)
+        assert json.loads(path.read_text(encoding="utf-8"))["bar_height"] == 20
+        assert debouncer.actual_save_count == 2
+
+    def test_unchanged_content_not_rewritten(self, tmp_path):
+        path = tmp_path / "config.json"
+        debouncer = ConfigDebouncer(path)
+        debouncer.save_immediately(BASE)
+        debouncer.save_immediately(BASE)
+        assert debouncer.actual_save_count == 1
@@ -0,0 +1,161 @@
+"""
+db_manager.py 报表接口单元测试
+测试时间范围查询与按数据版本失效的查询缓存
+"""
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from gaiya.data.db_manager import DatabaseManager
+
+DAY = datetime(2025, 12, 1)
+
+
+@pytest.fixture
+def db(tmp_path):
+    return DatabaseManager(tmp_path / "user_data.db")
+
+
+def _session(db, app, start, minutes, category="PRODUCTIVE"):
+    db.set_app_category(app, category)
+    end = start + timedelta(minutes=minutes)
+    db.save_activity_session(app, "title", start, end, minutes * 60)
+
+
+class TestRangeReports:
+    """测试时间范围报表"""
+
+    def test_activity_stats_respects_range(self, db):
+        """测试只统计范围内的会话"""
+        _session(db, "code.exe", DAY + timedelta(hours=9), 60)
+        _session(db, "game.exe", DAY + timedelta(hours=20), 30, "LEISURE")
+        _session(db, "code.exe", DAY + timedelta(days=1, hours=9), 45)
+
+        stats = db.get_activity_stats(DAY, DAY + timedelta(days=1))
+        assert stats["total_seconds"] == 90 * 60
+        assert stats["categories"]["PRODUCTIVE"] == 3600
+        assert stats["categories"]["LEISURE"] == 1800
+        assert [app["name"] for app in stats["top_apps"]] == ["code.exe", "game.exe"]
+
+        week = db.get_activity_stats(DAY, DAY + timedelta(days=7))
+        assert week["top_apps"][0] == {"name": "code.exe", "category": "PRODUCTIVE", "duration": 105 * 60}
+
+    def test_ignored_apps_excluded(self, db):
+        _session(db, "code.exe", DAY + timedelta(hours=9), 60)
+        _session(db, "idle.exe", DAY + timedelta(hours=10), 60)
+        db.set_app_category("idle.exe", "NEUTRAL", is_ignored=True)
+
+        records = db.get_activity_records(DAY, DAY + timedelta(days=1))
+        assert [r["app_name"] for r in records] == ["code.exe"]
+
+    def test_focus_stats_range(self, db):
+        """测试专注统计按范围汇总"""
+        conn = db._get_connection()
+        conn.execute(
+            "INSERT INTO focus_sessions (id, time_block_id, start_time, end_time, duration_minutes, status) "
+            "VALUES ('s1', 'block-1', ?, ?, 25, 'COMPLETED')",
+            (DAY + timedelta(hours=9), DAY + timedelta(hours=9, minutes=25))
+        )
+        conn.commit()
+        conn.close()
+
+        stats = db.get_focus_stats(DAY, DAY + timedelta(days=1))
+        assert stats == {"by_block": {"block-1": {"duration": 25, "count": 1}}, "total_minutes": 25}
+        assert db.get_focus_stats(DAY + timedelta(days=1))["total_minutes"] == 0
+
+
+class TestActivityBuckets:
+    """测试按小时拆分的活动时间桶"""
+
+    def test_session_split_across_hours(self, db):
+        """测试跨小时会话按实际时长拆分到各小时"""
+        _session(db, "code.exe", DAY + timedelta(hours=9, minutes=30), 90)
+
+        hourly = db.get_hourly_activity(DAY, DAY + timedelta(days=1))
+        assert hourly["total"][9] == 1800
+        assert hourly["total"][10] == 3600
+        assert hourly["categories"]["PRODUCTIVE"][10] == 3600
+        assert sum(hourly["total"]) == 5400
+
+    def test_cross_midnight_session_split_between_days(self, db):
+        _session(db, "game.exe", DAY + timedelta(hours=23, minutes=30), 60, "LEISURE")
+
+        heatmap = db.get_activity_heatmap(DAY, DAY + timedelta(days=2))
+        assert heatmap[DAY.strftime("%Y-%m-%d")][23] == 1800
+        assert heatmap[(DAY + timedelta(days=1)).strftime("%Y-%m-%d")][0] == 1800
+
+        # 按天对齐的范围报表使用时间桶, 只统计当天部分
+        assert db.get_activity_stats(DAY, DAY + timedelta(days=1))["total_seconds"] == 1800
+
+    def test_unaligned_range_uses_sessions(self, db):
+        _session(db, "code.exe", DAY + timedelta(hours=9, minutes=30), 90)
+
+        stats = db.get_activity_stats(DAY + timedelta(hours=9, minutes=15), DAY + timedelta(hours=9, minutes=45))
+        assert stats["total_seconds"] == 5400
+
+    def test_ignored_apps_excluded(self, db):
+        _session(db, "code.exe", DAY + timedelta(hours=9), 60)
+        _session(db, "idle.exe", DAY + timedelta(hours=9), 60)
+        db.set_app_category("idle.exe", "NEUTRAL", is_ignored=True)
+
+        assert db.get_hourly_activity(DAY, DAY + timedelta(days=1))["total"][9] == 3600
+
+    def test_backfill_from_existing_sessions(self, tmp_path):
+        """测试升级时从历史会话回填一次"""
+        db = DatabaseManager(tmp_path / "user_data.db")
+        _session(db, "code.exe", DAY + timedelta(hours=9, minutes=30), 90)
+        conn = db._get_connection()
+        conn.execute("DELETE FROM activity_buckets")
+        conn.execute("PRAGMA user_version = 0")
+        conn.commit()
+        conn.close()
+
+        upgraded = DatabaseManager(tmp_path / "user_data.db")
+        assert upgraded.get_hourly_activity(DAY, DAY + timedelta(days=1))["total"][10] == 3600
+
+        # 已回填的数据库再次打开不会重复累加
+        reopened = DatabaseManager(tmp_path / "user_data.db")
+        assert reopened.get_hourly_activity(DAY, DAY + timedelta(days=1))["total"][10] == 3600
+
+    def test_clear_and_cleanup_remove_buckets(self, db):
+        _session(db, "code.exe", datetime.now() - timedelta(days=100), 60)
+        db.cleanup_old_data(days=90)
+        assert db.get_activity_heatmap(datetime.now() - timedelta(days=200)) == {}
+
+        _session(db, "code.exe", DAY + timedelta(hours=9), 60)
+        db.clear_activity_data()
+        assert db.get_activity_heatmap(DAY) == {}
+
+
+class TestReportCache:
+    """测试查询缓存"""
+
+    def test_same_range_shares_result(self, db):
+        """测试相同范围的重复查询命中缓存"""
+        _session(db, "code.exe", DAY + timedelta(hours=9), 60)
+        with patch.object(db, "_query_activity_stats", wraps=db._query_activity_stats) as query:
+            first = db.get_activity_stats(DAY, DAY + timedelta(days=1))
+            second = db.get_activity_stats(DAY, DAY + timedelta(days=1))
+        assert query.call_count == 1
+        assert first == second
+
+        # 调用方修改结果不影响缓存
+        first["top_apps"].clear()
+        assert db.get_activity_stats(DAY, DAY + timedelta(days=1))["top_apps"]
+
+    def test_write_bumps_version(self, db):
+        """测试写入后缓存失效"""
+        _session(db, "code.exe", DAY + timedelta(hours=9), 60)
+        version = db.data_version
+        assert db.get_activity_stats(DAY, DAY + timedelta(days=1))["total_seconds"] == 3600
+
+        _session(db, "code.exe", DAY + timedelta(hours=11), 30)
+        assert db.data_version > version
+        assert db.get_activity_stats(DAY, DAY + timedelta(days=1))["total_seconds"] == 5400
+
+    def test_ttl_expiry(self, db, monkeypatch):
+        monkeypatch.setattr(DatabaseManager, "REPORT_CACHE_TTL", 0)
+        with patch.object(db, "_query_focus_stats", wraps=db._query_focus_stats) as query:
+            db.get_focus_stats(DAY)
+            db.get_focus_stats(DAY)
+        assert query.call_count == 2
@@ -0,0 +1,144 @@
+"""
+http_pool.py 单元测试
+测试共享连接池的GET合并与ETag条件请求缓存
+"""
+import threading
+from unittest.mock import Mock
+
+import pytest
+
+from gaiya.core.http_pool import HttpPool, get_http_pool, get_shared_session
+
+
+def _response(status=200, body=None, headers=None):
+    response = Mock()
+    response.status_code = status
+    response.headers = headers or {}
+    response.json.return_value = body
+    return response
+
+
+@pytest.fixture
+def pool():
+    pool = HttpPool()
+    pool.session.request = Mock()
+    return pool
+
+
+class TestConditionalCache:
+    """测试ETag/Last-Modified缓存"""
+
+    def test_304_returns_cached_response(self, pool):
+        first = _response(body={"tier": "pro"}, headers={"ETag": 'W/"abc"'})
+        pool.session.request.side_effect = [first, _response(304)]
+
+        assert pool.get("https://api.example.com/status").json() == {"tier": "pro"}
+        assert pool.get("https://api.example.com/status") is first
+
+        second_call = pool.session.request.call_args_list[1]
+        assert second_call.kwargs["headers"]["If-None-Match"] == 'W/"abc"'
+
+    def test_last_modified_validator(self, pool):
+        pool.session.request.side_effect = [
+            _response(headers={"Last-Modified": "Mon, 19 Oct 2026 08:00:00 GMT"}),
+            _response(304),
+        ]
+        pool.get("https://api.example.com/holidays")
+        pool.get("https://api.example.com/holidays")
+
+        headers = pool.session.request.call_args_list[1].kwargs["headers"]
+        assert headers["If-Modified-Since"] == "Mon, 19 Oct 2026 08:00:00 GMT"
+
+    def test_caller_headers_not_mutated(self, pool):
+        pool.session.request.side_effect = [_response(headers={"ETag": '"1"'}), _response(304)]
+        headers = {"Authorization": "Bearer t"}
+        pool.get("https://api.example.com/a", headers=headers)
+        pool.get("https://api.example.com/a", headers=headers)
+        assert headers == {"Authorization": "Bearer t"}
+
+    def test_cache_keyed_by_params_and_auth(self, pool):
+        pool.session.request.return_value = _response(headers={"ETag": '"1"'})
+        pool.get("https://api.example.com/q", params={"user_id": "a"})
+        pool.get("https://api.example.com/q", params={"user_id": "b"})
+        pool.get("https://api.example.com/q", params={"user_id": "a"}, headers={"Authorization": "Bearer x"})
+
+        sent = [call.kwargs.get("headers") or {} for call in pool.session.request.call_args_list]
+        assert all("If-None-Match" not in headers for headers in sent)
+
+    def test_cache_bounded(self):
+        pool = HttpPool(cache_size=2)
+        pool.session.request = Mock(return_value=_response(headers={"ETag": '"1"'}))
+        for i in range(5):
+            pool.get(f"https://api.example.com/{i}")
+        assert len(pool._validators) == 2
+
+    def test_clear_cache(self, pool):
+        pool.session.request.return_value = _response(headers={"ETag": '"1"'})
+        pool.get("https://api.example.com/a")
+        pool.clear_cache()
+        pool.get("https://api.example.com/a")
+        assert "If-None-Match" not in (pool.session.request.call_args.kwargs.get("headers") or {})
+
+    def test_post_bypasses_cache(self, pool):
+        pool.session.request.return_value = _response(headers={"ETag": '"1"'})
+        pool.request("POST", "https://api.example.com/a", json={})
+        assert pool._validators == {}
+
+
+class TestCoalescing:
+    """测试相同并发GET的合并"""
+
+    def test_concurrent_identical_gets_share_one_request(self, pool):
+        release = threading.Event()
+        entered = threading.Event()
+        response = _response(body={"ok": True})
+
+        def slow_request(*args, **kwargs):
+            entered.set()
+            release.wait(5)
+            return response
+
+        pool.session.request.side_effect = slow_request
+        results = []
+
+        def fetch():
+            results.append(pool.get("https://api.example.com/quota"))
+
+        leader = threading.Thread(target=fetch)
+        leader.start()
+        entered.wait(5)
+
+        # 记录等待中的调用方, 全部进入等待后再放行首个请求
+        flight = next(iter(pool._in_flight.values()))
+        waiting = threading.Semaphore(0)
+        done_wait = flight.done.wait
+
+        def counting_wait(timeout=None):
+            waiting.release()
+            return done_wait(timeout)
+
+        flight.done.wait = counting_wait
+        followers = [threading.Thread(target=fetch) for _ in range(3)]
+        for thread in followers:
+            thread.start()
+        for _ in followers:
+            assert waiting.acquire(timeout=5)
+
+        release.set()
+        for thread in [leader] + followers:
+            thread.join(5)
+
+        assert pool.session.request.call_count == 1
+        assert results == [response] * 4
+
+    def test_error_clears_in_flight(self, pool):
+        pool.session.request.side_effect = ConnectionError("down")
+        with pytest.raises(ConnectionError):
+            pool.get("https://api.example.com/quota")
+        assert pool._in_flight == {}
+
+
+def test_shared_singleton():
+    assert get_http_pool() is get_http_pool()
+    assert get_shared_session() is get_http_pool().session
+    assert get_shared_session().trust_env is False
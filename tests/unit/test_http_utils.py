@@ -25,6 +25,7 @@ from http_utils import (
     parse_request_body,
     send_success_response,
     send_error_response,
+    send_json_with_etag,
     validate_required_fields,
     handle_internal_error,
     BaseAPIHandler
@@ -184,6 +185,41 @@ class TestSendErrorResponse:
         assert response['locked_until'] == "2025-01-01T00:00:00Z"
 
 
+class TestSendJsonWithEtag:
+    """测试带ETag的JSON响应"""
+
+    def test_etag_sent_with_body(self):
+        handler = MockHTTPHandler()
+        send_json_with_etag(handler, {"user_tier": "pro"})
+
+        assert handler._response_code == 200
+        assert handler._response_headers['ETag'].startswith('W/"')
+        assert handler._response_headers['Vary'] == 'Origin'
+        assert handler.get_response_json() == {"user_tier": "pro"}
+
+    def test_matching_etag_returns_304(self):
+        first = MockHTTPHandler()
+        send_json_with_etag(first, {"user_tier": "pro"})
+
+        handler = MockHTTPHandler()
+        handler.headers['If-None-Match'] = first._response_headers['ETag']
+        send_json_with_etag(handler, {"user_tier": "pro"})
+
+        assert handler._response_code == 304
+        assert handler.get_response_data() == ""
+
+    def test_changed_content_returns_200(self):
+        first = MockHTTPHandler()
+        send_json_with_etag(first, {"user_tier": "free"})
+
+        handler = MockHTTPHandler()
+        handler.headers['If-None-Match'] = first._response_headers['ETag']
+        send_json_with_etag(handler, {"user_tier": "pro"})
+
+        assert handler._response_code == 200
+        assert handler.get_response_json() == {"user_tier": "pro"}
+
+
 class TestValidateRequiredFields:
     """测试必需字段验证"""
 
@@ -0,0 +1,150 @@
+"""
+JSON Store 单元测试
+测试原子写入、内容哈希跳过、紧凑序列化以及后台合并写入
+"""
+import json
+import os
+import threading
+
+import pytest
+from unittest.mock import patch
+
+from gaiya.utils import json_store
+from gaiya.utils.json_store import JsonWriter, dumps, write_json
+
+
+@pytest.fixture
+def writer():
+    writer = JsonWriter(delay=60)
+    yield writer
+    writer.close()
+
+
+class TestWriteJson:
+    """测试同步原子写入"""
+
+    def test_writes_compact_utf8_by_default(self, tmp_path):
+        path = tmp_path / "stats.json"
+
+        assert write_json(path, {"任务": [1, 2]}) is True
+        content = path.read_bytes()
+        assert b"\n" not in content and b": " not in content
+        assert json.loads(content.decode("utf-8")) == {"任务": [1, 2]}
+
+    def test_indent_for_hand_edited_files(self, tmp_path):
+        path = tmp_path / "tasks.json"
+        write_json(path, [{"task": "工作"}], indent=4)
+
+        assert path.read_text(encoding="utf-8") == json.dumps([{"task": "工作"}], ensure_ascii=False, indent=4)
+
+    def test_unchanged_document_not_rewritten(self, tmp_path):
+        path = tmp_path / "goals.json"
+        write_json(path, {"goals": []})
+        mtime = path.stat().st_mtime_ns
+
+        with patch.object(json_store.os, "replace") as replace:
+            assert write_json(path, {"goals": []}) is False
+        replace.assert_not_called()
+        assert path.stat().st_mtime_ns == mtime
+
+        assert write_json(path, {"goals": [1]}) is True
+
+    def test_existing_file_content_counts_as_written(self, tmp_path):
+        path = tmp_path / "config.json"
+        path.write_bytes(dumps({"a": 1}, indent=4))
+
+        assert write_json(path, {"a": 1}, indent=4) is False
+
+    def test_failed_write_keeps_old_file(self, tmp_path):
+        path = tmp_path / "achievements.json"
+        write_json(path, {"unlocked": ["a"]})
+
+        with patch.object(json_store.os, "replace", side_effect=OSError("disk full")):
+            with pytest.raises(OSError):
+                write_json(path, {"unlocked": ["a", "b"]})
+
+        assert json.loads(path.read_text(encoding="utf-8")) == {"unlocked": ["a"]}
+        assert [p.name for p in tmp_path.iterdir()] == ["achievements.json"]
+
+        # 失败后不记录哈希, 下次仍会写入
+        assert write_json(path, {"unlocked": ["a", "b"]}) is True
+
+    def test_non_string_keys_fall_back_to_stdlib(self, tmp_path):
+        path = tmp_path / "cache.json"
+        write_json(path, {2025: {"01-01": True}})
+
+        assert json.loads(path.read_text(encoding="utf-8")) == {"2025": {"01-01": True}}
+
+
+class TestJsonWriter:
+    """测试后台合并写入"""
+
+    def test_submits_coalesced_into_one_write(self, writer, tmp_path):
+        path = tmp_path / "statistics.json"
+        data = {"daily_records": {}}
+        for i in range(5):
+            data["daily_records"][str(i)] = i
+            writer.submit(path, data)
+
+        assert not path.exists()
+        writer.flush()
+
+        assert json.loads(path.read_text(encoding="utf-8"))["daily_records"]["4"] == 4
+        assert writer.get_stats()["submitted"] == 5
+        assert writer.get_stats()["written"] == 1
+
+    def test_background_thread_writes_after_delay(self, tmp_path):
+        writer = JsonWriter(delay=0.01)
+        path = tmp_path / "holidays_cache.json"
+        written = threading.Event()
+        original = json_store.write_bytes_atomic
+
+        def tracking_write(*args):
+            result = original(*args)
+            written.set()
+            return result
+
+        with patch.object(json_store, "write_bytes_atomic", side_effect=tracking_write):
+            writer.submit(path, {"2025": {}})
+            assert written.wait(timeout=5)
+
+        assert json.loads(path.read_text(encoding="utf-8")) == {"2025": {}}
+        writer.close()
+
+    def test_indented_documents_snapshot_at_submit(self, writer, tmp_path):
+        path = tmp_path / "config.json"
+        config = {"theme": "light"}
+        writer.submit(path, config, indent=4)
+        config["theme"] = "dark"
+
+        writer.flush(path)
+        assert json.loads(path.read_text(encoding="utf-8")) == {"theme": "light"}
+
+    def test_sync_write_supersedes_pending_submit(self, writer, tmp_path):
+        path = tmp_path / "statistics.json"
+        writer.submit(path, {"version": 1})
+
+        with patch.object(json_store, "_writer", writer):
+            write_json(path, {"version": 2})
+        writer.flush()
+
+        assert json.loads(path.read_text(encoding="utf-8")) == {"version": 2}
+
+    def test_close_flushes_and_later_submits_write_directly(self, tmp_path):
+        writer = JsonWriter(delay=60)
+        writer.submit(tmp_path / "a.json", {"a": 1})
+        writer.close()
+        assert (tmp_path / "a.json").exists()
+
+        writer.submit(tmp_path / "b.json", {"b": 1})
+        assert (tmp_path / "b.json").exists()
+
+    def test_write_errors_are_logged_not_raised(self, writer, tmp_path):
+        blocker = tmp_path / "not_a_dir"
+        blocker.write_text("", encoding="utf-8")
+
+        writer.submit(blocker / "stats.json", {})
+        writer.flush()
+
+        assert writer.get_stats()["written"] == 0
+        assert not os.path.exists(blocker / "stats.json")
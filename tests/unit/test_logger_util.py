@@ -4,12 +4,14 @@
 验证日志规范化功能:
 - 日志级别控制
 - 敏感信息脱敏
-- 日志格式统一
+- 日志格式统一（每个事件一行JSON）
 - 环境变量配置
+- 请求级缓冲与关联ID
 """
 
 import sys
 import os
+import json
 from pathlib import Path
 from io import StringIO
 
@@ -19,7 +21,12 @@ sys.path.insert(0, str(project_root))
 sys.path.insert(0, str(project_root / "api"))
 
 # 导入被测试模块
-from logger_util import get_logger, LogLevel, Logger
+from logger_util import get_logger, LogLevel, Logger, get_request_id, log_requests, request_logging
+
+
+def _records(text):
+    """解析stderr中的JSON日志行"""
+    return [json.loads(line) for line in text.splitlines() if line.startswith("{")]
 
 
 class TestLoggerSanitization:
@@ -151,12 +158,14 @@ class TestLoggerFormat:
 
         captured = capsys.readouterr()
 
-        # 验证格式：[时间戳] [级别] [模块名] 消息 key=value
-        assert "[INFO]" in captured.err
-        assert "[auth-signin]" in captured.err
-        assert "User login attempt" in captured.err
-        assert "email=u***@example.com" in captured.err
-        assert "ip=192.168.***.***" in captured.err
+        # 验证格式：每个事件一行JSON
+        [record] = _records(captured.err)
+        assert record["level"] == "INFO"
+        assert record["logger"] == "auth-signin"
+        assert record["msg"] == "User login attempt"
+        assert record["email"] == "u***@example.com"
+        assert record["ip"] == "192.168.***.***"
+        assert record["ts"].endswith("Z")
 
     def test_log_with_multiple_params(self, capsys):
         """测试多个参数的日志"""
@@ -171,10 +180,11 @@ class TestLoggerFormat:
 
         captured = capsys.readouterr()
 
-        assert "Order created" in captured.err
-        assert "user_id=550e8400***" in captured.err
-        assert "amount=29.0" in captured.err
-        assert "plan_type=pro_monthly" in captured.err
+        [record] = _records(captured.err)
+        assert record["msg"] == "Order created"
+        assert record["user_id"] == "550e8400***"
+        assert record["amount"] == 29.0
+        assert record["plan_type"] == "pro_monthly"
 
 
 class TestLoggerVerboseMode:
@@ -195,8 +205,9 @@ class TestLoggerVerboseMode:
         captured = capsys.readouterr()
 
         # verbose模式下应显示完整信息
-        assert "email=user@example.com" in captured.err
-        assert "ip=192.168.1.1" in captured.err
+        [record] = _records(captured.err)
+        assert record["email"] == "user@example.com"
+        assert record["ip"] == "192.168.1.1"
 
 
 class TestGetLogger:
@@ -211,7 +222,62 @@ class TestGetLogger:
         logger.info("Test message")
 
         captured = capsys.readouterr()
-        assert "[test-module]" in captured.err
+        assert _records(captured.err)[0]["logger"] == "test-module"
+
+
+class TestLazyFields:
+    """测试字段延迟求值"""
+
+    def test_lazy_field_skipped_below_level(self, capsys):
+        logger = Logger("test")
+        calls = []
+
+        logger.debug("Snapshot", data=lambda: calls.append(1))
+
+        assert calls == []
+        assert capsys.readouterr().err == ""
+
+    def test_lazy_field_evaluated_when_logged(self, capsys):
+        logger = Logger("test")
+
+        logger.info("Snapshot", remaining=lambda: 3)
+
+        assert _records(capsys.readouterr().err)[0]["remaining"] == 3
+
+
+class TestRequestLogging:
+    """测试请求级缓冲"""
+
+    def test_output_buffered_until_request_end(self, capsys):
+        logger = Logger("test")
+
+        with request_logging("req-1") as request_id:
+            logger.info("Inside request")
+            print("legacy print", file=sys.stderr)
+            assert get_request_id() == request_id == "req-1"
+            assert capsys.readouterr().err == ""
+
+        err = capsys.readouterr().err
+        assert _records(err)[0]["request_id"] == "req-1"
+        assert "legacy print" in err
+        assert get_request_id() is None
+
+    def test_handler_decorator_logs_request(self, capsys):
+        class FakeHandler:
+            command = "GET"
+            path = "/api/quota-status?user_id=secret"
+            headers = {"X-Request-Id": "abc"}
+
+            def do_GET(self):
+                Logger("handler").info("Handling")
+
+        log_requests(FakeHandler)
+        FakeHandler().do_GET()
+
+        records = _records(capsys.readouterr().err)
+        assert [r["msg"] for r in records] == ["Handling", "Request completed"]
+        assert {r["request_id"] for r in records} == {"abc"}
+        assert records[1]["path"] == "/api/quota-status"
 
 
 # ========================================
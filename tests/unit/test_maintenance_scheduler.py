@@ -0,0 +1,185 @@
+"""
+后台维护调度器单元测试
+测试到期判断、空闲等待、主线程投递、运行指标持久化以及SQLite维护工具
+"""
+import json
+import sqlite3
+
+import pytest
+from unittest.mock import Mock
+
+from gaiya.data.sqlite_maintenance import delete_in_chunks, optimize_database
+from gaiya.services.maintenance_scheduler import MaintenanceScheduler
+
+DAY = 24 * 3600
+
+
+class FakeClock:
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def idle():
+    """可调的空闲秒数"""
+    state = {'seconds': 600.0}
+    return state
+
+
+@pytest.fixture
+def scheduler(tmp_path, clock, idle):
+    return MaintenanceScheduler(
+        tmp_path / "maintenance_state.json",
+        config={'idle_seconds': 120, 'max_defer': 3600},
+        idle_probe=lambda: idle['seconds'],
+        clock=clock
+    )
+
+
+class TestScheduling:
+    """测试到期与空闲判断"""
+
+    def test_new_job_runs_then_waits_for_interval(self, scheduler, clock):
+        func = Mock(return_value=3)
+        scheduler.add_job('cleanup', func, DAY)
+
+        assert scheduler.run_due_jobs() == ['cleanup']
+        assert scheduler.run_due_jobs() == []
+
+        clock.now += DAY
+        assert scheduler.run_due_jobs() == ['cleanup']
+        assert func.call_count == 2
+
+    def test_waits_for_idle_until_max_defer(self, scheduler, clock, idle):
+        scheduler.add_job('vacuum', Mock(), DAY)
+        idle['seconds'] = 5
+
+        assert scheduler.run_due_jobs() == []
+
+        clock.now += 3600
+        assert scheduler.run_due_jobs() == ['vacuum']
+
+    def test_jobs_not_requiring_idle_run_while_busy(self, scheduler, idle):
+        scheduler.add_job('day_rollover', Mock(return_value=False), 60, require_idle=False)
+        idle['seconds'] = 0
+
+        assert scheduler.run_due_jobs() == ['day_rollover']
+
+    def test_unknown_idle_state_counts_as_idle(self, tmp_path, clock):
+        scheduler = MaintenanceScheduler(tmp_path / "state.json", idle_probe=lambda: None, clock=clock)
+        scheduler.add_job('cleanup', Mock(), DAY)
+
+        assert scheduler.run_due_jobs() == ['cleanup']
+
+
+class TestDispatch:
+    """测试主线程投递"""
+
+    def test_main_thread_job_is_dispatched_once(self, tmp_path, clock):
+        pending = []
+        scheduler = MaintenanceScheduler(tmp_path / "state.json", idle_probe=None,
+                                         dispatcher=pending.append, clock=clock)
+        func = Mock(return_value=True)
+        scheduler.add_job('statistics_retention', func, DAY, main_thread=True)
+
+        assert scheduler.run_due_jobs() == ['statistics_retention']
+        # 主线程还没执行时不会重复投递
+        assert scheduler.run_due_jobs() == []
+        func.assert_not_called()
+
+        pending.pop()()
+        func.assert_called_once()
+        assert scheduler.get_metrics()['statistics_retention']['result'] is True
+
+
+class TestMetrics:
+    """测试运行指标"""
+
+    def test_metrics_recorded_and_persisted(self, scheduler, tmp_path, clock):
+        scheduler.add_job('cleanup', Mock(return_value=42), DAY)
+        scheduler.run_due_jobs()
+
+        metrics = scheduler.get_metrics()['cleanup']
+        assert metrics['result'] == 42
+        assert metrics['runs'] == 1
+        assert metrics['error'] is None
+
+        # 重启后周期内不再执行
+        restarted = MaintenanceScheduler(tmp_path / "maintenance_state.json", idle_probe=None, clock=clock)
+        restarted.add_job('cleanup', Mock(), DAY)
+        assert restarted.run_due_jobs() == []
+
+    def test_failure_recorded_without_stopping_other_jobs(self, scheduler):
+        scheduler.add_job('broken', Mock(side_effect=RuntimeError("disk full")), DAY)
+        scheduler.add_job('cleanup', Mock(return_value=1), DAY)
+
+        assert scheduler.run_due_jobs() == ['broken', 'cleanup']
+        assert scheduler.get_metrics()['broken']['error'] == "disk full"
+
+    def test_non_persistent_jobs_stay_in_memory(self, scheduler, tmp_path):
+        scheduler.add_job('day_rollover', Mock(return_value=False), 60, persist=False)
+        scheduler.add_job('cleanup', Mock(), DAY)
+        scheduler.run_due_jobs()
+
+        state = json.loads((tmp_path / "maintenance_state.json").read_text(encoding='utf-8'))
+        assert list(state['jobs']) == ['cleanup']
+        assert 'day_rollover' in scheduler.get_metrics()
+
+    def test_corrupted_state_file_ignored(self, tmp_path):
+        state_path = tmp_path / "maintenance_state.json"
+        state_path.write_text("{not json", encoding='utf-8')
+
+        assert MaintenanceScheduler(state_path).get_metrics() == {}
+
+
+class TestLifecycle:
+    def test_disabled_scheduler_does_not_start(self, tmp_path):
+        scheduler = MaintenanceScheduler(tmp_path / "state.json", config={'enabled': False})
+        scheduler.start()
+
+        assert not scheduler.is_running
+
+    def test_start_and_stop(self, tmp_path):
+        scheduler = MaintenanceScheduler(tmp_path / "state.json", config={'startup_delay': 60})
+        scheduler.start()
+        assert scheduler.is_running
+
+        scheduler.stop(timeout=2)
+        assert not scheduler.is_running
+
+
+class TestSqliteMaintenance:
+    """测试分批删除与数据库优化"""
+
+    @pytest.fixture
+    def conn(self, tmp_path):
+        conn = sqlite3.connect(tmp_path / "test.db")
+        conn.execute("CREATE TABLE spans (id INTEGER PRIMARY KEY, ts INTEGER, payload TEXT)")
+        conn.executemany("INSERT INTO spans (ts, payload) VALUES (?, ?)",
+                         [(i, "x" * 500) for i in range(1200)])
+        conn.commit()
+        yield conn
+        conn.close()
+
+    def test_delete_in_chunks(self, conn):
+        deleted = delete_in_chunks(conn, 'spans', 'ts < ?', (1000,), chunk_size=300)
+
+        assert deleted == 1000
+        assert conn.execute("SELECT COUNT(*) FROM spans").fetchone()[0] == 200
+
+    def test_optimize_vacuums_fragmented_database(self, conn):
+        delete_in_chunks(conn, 'spans', 'ts < ?', (1000,))
+
+        result = optimize_database(conn)
+        assert result['vacuumed'] is True
+        assert conn.execute("PRAGMA freelist_count").fetchone()[0] == 0
+
+        assert optimize_database(conn)['vacuumed'] is False
@@ -0,0 +1,136 @@
+"""
+NotificationManager 单元测试
+测试提醒时间线编译、免打扰过滤和单次定时器触发
+"""
+import pytest
+from datetime import datetime, date
+from unittest.mock import Mock
+from PySide6.QtCore import QCoreApplication
+from gaiya.core.notification_manager import NotificationManager
+
+
+@pytest.fixture(autouse=True)
+def qt_app():
+    """QTimer需要Qt应用实例"""
+    app = QCoreApplication.instance() or QCoreApplication([])
+    yield app
+
+
+@pytest.fixture
+def config():
+    """创建通知配置"""
+    return {
+        'notification': {
+            'enabled': True,
+            'before_start_minutes': [5],
+            'on_start': True,
+            'before_end_minutes': [],
+            'on_end': True,
+            'sound_enabled': False,
+            'quiet_hours': {'enabled': False, 'start': '22:00', 'end': '08:00'}
+        }
+    }
+
+
+@pytest.fixture
+def tasks():
+    """创建任务列表"""
+    return [
+        {'task': '早餐', 'start': '08:00', 'end': '09:00'},
+        {'task': '工作', 'start': '09:00', 'end': '12:00'},
+        {'task': '睡觉', 'start': '23:00', 'end': '24:00'},
+    ]
+
+
+@pytest.fixture
+def manager(config, tasks):
+    """创建NotificationManager实例"""
+    nm = NotificationManager(config, tasks, Mock(), Mock())
+    yield nm
+    nm.check_timer.stop()
+
+
+DAY = date(2025, 12, 10)
+
+
+class TestCompileTimeline:
+    """测试时间线编译"""
+
+    def test_timeline_sorted_with_all_triggers(self, manager):
+        """测试每个任务生成提前/开始/结束触发点并按时间排序"""
+        timeline = manager.compile_timeline(DAY)
+
+        assert len(timeline) == 9
+        assert [t.fire_at for t in timeline] == sorted(t.fire_at for t in timeline)
+        assert timeline[0].fire_at == datetime(2025, 12, 10, 7, 55)
+        assert timeline[0].title == '【提前5分钟】早餐'
+
+    def test_end_trigger_includes_next_task(self, manager):
+        """测试结束提醒包含下一个任务名称"""
+        timeline = manager.compile_timeline(DAY)
+        end_breakfast = next(t for t in timeline if t.key.startswith('早餐_on_end'))
+
+        assert end_breakfast.fire_at == datetime(2025, 12, 10, 9, 0)
+        assert '下一项: 工作' in end_breakfast.message
+
+    def test_24_00_end_maps_to_23_59(self, manager):
+        """测试24:00结束时间按23:59处理"""
+        timeline = manager.compile_timeline(DAY)
+        end_sleep = next(t for t in timeline if t.key.startswith('睡觉_on_end'))
+
+        assert end_sleep.fire_at == datetime(2025, 12, 10, 23, 59)
+
+    def test_quiet_hours_filtered_at_compile_time(self, config, tasks):
+        """测试免打扰时段内的触发点在编译时被剔除"""
+        config['notification']['quiet_hours']['enabled'] = True
+        nm = NotificationManager(config, tasks, Mock(), Mock())
+        timeline = nm.compile_timeline(DAY)
+        nm.check_timer.stop()
+
+        assert all(t.fire_at.hour not in (23, 7) for t in timeline)
+        assert not any(t.key.startswith('睡觉') for t in timeline)
+
+
+class TestTriggering:
+    """测试触发与定时器"""
+
+    def test_fires_due_triggers_once(self, manager):
+        """测试到期触发点只发送一次"""
+        manager.rebuild_timeline(datetime(2025, 12, 10, 7, 0))
+        manager.check_and_notify(datetime(2025, 12, 10, 7, 55, 0))
+        manager.check_and_notify(datetime(2025, 12, 10, 7, 55, 30))
+
+        assert manager.tray_icon.showMessage.call_count == 1
+        assert '早餐' in manager.tray_icon.showMessage.call_args[0][1]
+
+    def test_missed_triggers_skipped(self, manager):
+        """测试超出宽限时间的触发点(如休眠期间)不补发"""
+        manager.rebuild_timeline(datetime(2025, 12, 10, 7, 0))
+        manager.check_and_notify(datetime(2025, 12, 10, 8, 30))
+
+        manager.tray_icon.showMessage.assert_not_called()
+        assert manager.get_next_trigger(datetime(2025, 12, 10, 8, 30)).fire_at == datetime(2025, 12, 10, 8, 55)
+
+    def test_timer_armed_for_next_trigger(self, manager):
+        """测试单次定时器按下一个触发点的剩余时间启动"""
+        manager.rebuild_timeline(datetime(2025, 12, 10, 7, 54, 30))
+
+        assert manager.check_timer.isSingleShot()
+        assert manager.check_timer.isActive()
+        assert manager.check_timer.interval() == 30 * 1000
+
+    def test_day_rollover_recompiles(self, manager):
+        """测试跨天时重新编译时间线"""
+        manager.rebuild_timeline(datetime(2025, 12, 10, 23, 59, 30))
+        manager.check_and_notify(datetime(2025, 12, 11, 0, 0, 1))
+
+        assert manager.timeline_date == date(2025, 12, 11)
+        assert manager.timeline[0].fire_at.date() == date(2025, 12, 11)
+
+    def test_disable_stops_timer(self, manager, config, tasks):
+        """测试禁用通知后停止定时器"""
+        config['notification']['enabled'] = False
+        manager.reload_config(config, tasks)
+
+        assert not manager.check_timer.isActive()
+        assert manager.timeline == []
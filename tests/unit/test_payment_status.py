@@ -0,0 +1,78 @@
+"""
+payment_status.py 单元测试
+测试支付状态发布与长轮询等待
+"""
+import threading
+import time
+
+from api import payment_status
+from api.payment_status import PaymentStatusBroker
+
+
+class FakeCache:
+    """内存中的payment_cache表"""
+
+    def __init__(self):
+        self.rows = {}
+        self.reads = 0
+
+    def read(self, out_trade_no):
+        self.reads += 1
+        return self.rows.get(out_trade_no)
+
+    def write(self, record):
+        self.rows[record["out_trade_no"]] = record
+        return True
+
+
+class TestPaymentStatusBroker:
+    """测试长轮询等待"""
+
+    def test_returns_immediately_when_paid(self):
+        cache = FakeCache()
+        cache.rows["A1"] = {"out_trade_no": "A1", "status": "paid"}
+        broker = PaymentStatusBroker(cache.read, cache.write)
+
+        assert broker.wait_for_paid("A1", timeout=5)["status"] == "paid"
+        assert cache.reads == 1
+
+    def test_times_out_when_unpaid(self):
+        cache = FakeCache()
+        broker = PaymentStatusBroker(cache.read, cache.write)
+
+        start = time.monotonic()
+        assert broker.wait_for_paid("A1", timeout=0.2) is None
+        assert time.monotonic() - start < 2
+
+    def test_publish_wakes_waiter(self, monkeypatch):
+        """测试同进程发布立即唤醒等待方,不必等到下一次重新读取"""
+        monkeypatch.setattr(payment_status, "MIN_RECHECK_SECONDS", 10.0)
+        cache = FakeCache()
+        broker = PaymentStatusBroker(cache.read, cache.write)
+        result = {}
+
+        waiter = threading.Thread(target=lambda: result.update(broker.wait_for_paid("A1", timeout=20) or {}))
+        waiter.start()
+        time.sleep(0.1)
+
+        start = time.monotonic()
+        assert broker.publish({"out_trade_no": "A1", "status": "paid"})
+        waiter.join(timeout=5)
+
+        assert result["status"] == "paid"
+        assert result["paid_at"] and result["updated_at"]
+        assert time.monotonic() - start < 2
+
+    def test_timeout_clamped(self, monkeypatch):
+        monkeypatch.setattr(payment_status, "MAX_WAIT_SECONDS", 0.1)
+        broker = PaymentStatusBroker(FakeCache().read, FakeCache().write)
+
+        start = time.monotonic()
+        assert broker.wait_for_paid("A1", timeout=60) is None
+        assert time.monotonic() - start < 2
+
+    def test_publish_requires_order_number(self):
+        cache = FakeCache()
+        broker = PaymentStatusBroker(cache.read, cache.write)
+        assert broker.publish({"status": "paid"}) is False
+        assert cache.rows == {}
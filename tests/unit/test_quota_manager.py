@@ -6,7 +6,8 @@ quota_manager.py 单元测试
 import pytest
 from unittest.mock import Mock, patch
 from datetime import datetime, timedelta, timezone
-from api.quota_manager import QuotaManager
+from api import quota_manager as quota_manager_module
+from api.quota_manager import QuotaManager, LocalQuotaRpc
 
 
 @pytest.fixture
@@ -14,6 +15,8 @@ def mock_supabase_client():
     """创建Mock的Supabase客户端"""
     client = Mock()
     client.table = Mock(return_value=Mock())
+    # 默认模拟尚未部署 consume_user_quota 的数据库, use_quota 走读-改-写路径
+    client.rpc = Mock(side_effect=Exception("consume_user_quota unavailable"))
     return client
 
 
@@ -579,6 +582,113 @@ class TestGetQuotaStatus:
         assert result["remaining"]["daily_plan"] >= 20  # Pro用户至少20次
 
 
+
+class TestAtomicQuotaRpc:
+    """测试通过 consume_user_quota 原子扣除配额(使用进程内等价实现)"""
+
+    @pytest.fixture
+    def rpc_manager(self, monkeypatch):
+        monkeypatch.setattr(quota_manager_module, "_missing_rpcs", set())
+        return QuotaManager(client=LocalQuotaRpc())
+
+    def test_single_round_trip_with_full_snapshot(self, rpc_manager):
+        """测试一次调用返回扣除结果与完整剩余配额"""
+        result = rpc_manager.use_quota("user-1", "daily_plan", 1, user_tier="free")
+
+        assert result["success"] is True
+        assert result["used"] == 1
+        assert result["remaining"] == 2
+        assert result["full_quota_status"] == {
+            "remaining": {"daily_plan": 2, "weekly_report": 1, "chat": 10},
+            "user_tier": "free"
+        }
+        assert "error" not in result
+
+    def test_exceeded_returns_snapshot(self, rpc_manager):
+        for _ in range(3):
+            assert rpc_manager.use_quota("user-1", "daily_plan")["success"] is True
+
+        result = rpc_manager.use_quota("user-1", "daily_plan")
+        assert result["success"] is False
+        assert result["error"] == "Quota exceeded"
+        assert result["full_quota_status"]["remaining"]["daily_plan"] == 0
+
+    def test_concurrent_requests_do_not_overspend(self, rpc_manager):
+        """测试并发扣除不会超过上限"""
+        import threading
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(rpc_manager.use_quota("user-1", "chat")))
+            for _ in range(30)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert sum(1 for r in results if r["success"]) == 10
+        assert rpc_manager.client.rows["user-1"]["chat_used"] == 10
+
+    def test_refund_restores_quota(self, rpc_manager):
+        rpc_manager.use_quota("user-1", "daily_plan")
+        result = rpc_manager.refund_quota("user-1", "daily_plan")
+
+        assert result["success"] is True
+        assert result["full_quota_status"]["remaining"]["daily_plan"] == 3
+        # 退还不会让已用配额变为负数
+        assert rpc_manager.refund_quota("user-1", "daily_plan")["used"] == 0
+
+    def test_negative_amount_rejected(self, rpc_manager):
+        """测试扣除函数不接受负数(退还只能走 refund_user_quota)"""
+        assert rpc_manager.use_quota("user-1", "daily_plan", -5)["success"] is False
+        with pytest.raises(Exception, match="Invalid quota amount"):
+            rpc_manager.client.consume_user_quota("user-1", "daily_plan", -5)
+        with pytest.raises(Exception, match="Invalid refund amount"):
+            rpc_manager.client.refund_user_quota("user-1", "daily_plan", -5)
+
+    def test_refund_uses_separate_function(self, rpc_manager):
+        rpc_manager.use_quota("user-1", "chat")
+        with patch.object(rpc_manager.client, "rpc", wraps=rpc_manager.client.rpc) as rpc:
+            rpc_manager.refund_quota("user-1", "chat", 1)
+
+        rpc.assert_called_once_with("refund_user_quota", {
+            "p_user_id": "user-1", "p_quota_type": "chat", "p_amount": 1
+        })
+        assert rpc_manager.client.rows["user-1"]["chat_used"] == 0
+
+    def test_lazy_window_reset(self, monkeypatch):
+        monkeypatch.setattr(quota_manager_module, "_missing_rpcs", set())
+        china_tz = timezone(timedelta(hours=8))
+        now = [datetime(2026, 10, 19, 23, 0, tzinfo=china_tz)]
+        manager = QuotaManager(client=LocalQuotaRpc(now=lambda: now[0]))
+
+        for _ in range(3):
+            manager.use_quota("user-1", "daily_plan")
+        manager.use_quota("user-1", "weekly_report")
+        assert manager.use_quota("user-1", "daily_plan")["success"] is False
+
+        now[0] = datetime(2026, 10, 20, 0, 1, tzinfo=china_tz)
+        result = manager.use_quota("user-1", "daily_plan")
+        assert result["success"] is True
+        # 周配额窗口未到期, 不重置
+        assert result["full_quota_status"]["remaining"]["weekly_report"] == 0
+
+    def test_missing_function_falls_back(self, monkeypatch, quota_manager, mock_supabase_client):
+        """测试数据库未部署函数时回退到读-改-写, 并不再重复调用RPC"""
+        monkeypatch.setattr(quota_manager_module, "_missing_rpcs", set())
+        mock_supabase_client.rpc.side_effect = Exception(
+            "PGRST202: Could not find the function public.consume_user_quota"
+        )
+        mock_supabase_client.table.return_value.select.return_value.eq.return_value.execute.return_value = Mock(
+            data=[{"user_id": "user-1", "user_tier": "free", "daily_plan_total": 3, "daily_plan_used": 0}]
+        )
+
+        assert quota_manager.use_quota("user-1", "daily_plan")["success"] is True
+        assert quota_manager.use_quota("user-1", "daily_plan")["success"] is True
+        assert mock_supabase_client.rpc.call_count == 1
+
+
 # Pytest配置
 if __name__ == "__main__":
     pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,174 @@
+"""
+rule_engine.py 单元测试
+测试编译后的匹配器与原线性扫描结果一致
+"""
+import random
+import pytest
+
+from gaiya.core.rule_engine import (
+    ClassificationEngine, DomainTrie, KeywordAutomaton, SubstringIndex,
+    TITLE_KEYWORDS, compile_keyword_table,
+)
+from gaiya.core.app_classifier import AppClassifier
+from gaiya.core.domain_classifier import DomainClassifier
+from gaiya.core.inference_rules import INFERENCE_RULES, get_rule_by_app
+
+
+def _linear_first(table, text):
+    for label, keywords in table.items():
+        if any(kw in text for kw in keywords):
+            return label
+    return None
+
+
+def _random_text(rng, alphabet, max_len=12):
+    return "".join(rng.choice(alphabet) for _ in range(rng.randint(0, max_len)))
+
+
+class TestKeywordAutomaton:
+    """测试Aho-Corasick匹配"""
+
+    def test_overlapping_keywords(self):
+        """测试重叠关键词与失败链接"""
+        automaton = KeywordAutomaton([("he", 1), ("she", 2), ("hers", 3), ("his", 4)])
+        assert automaton.first("ushers") == 1
+        assert automaton.first("xhis") == 4
+        assert automaton.first("xyz", "none") == "none"
+
+    def test_priority_beats_position(self):
+        """测试优先级高的关键词即使出现在后面也胜出"""
+        automaton = compile_keyword_table({"production": ["code"], "consumption": ["video"]})
+        assert automaton.first("video about code") == "production"
+
+    def test_matches_linear_scan(self):
+        """测试随机文本上与线性扫描结果一致"""
+        rng = random.Random(7)
+        table = {
+            label: [_random_text(rng, "abc", 4) or "a" for _ in range(5)]
+            for label in ["x", "y", "z"]
+        }
+        automaton = compile_keyword_table(table)
+        for _ in range(500):
+            text = _random_text(rng, "abcd", 20)
+            assert automaton.first(text) == _linear_first(table, text)
+
+    def test_title_keywords(self):
+        """测试窗口标题关键词表"""
+        automaton = compile_keyword_table(TITLE_KEYWORDS)
+        assert automaton.first("正在编辑 main.py") == "production"
+        assert automaton.first("youtube - watch later") == "consumption"
+        assert automaton.first("settings") is None
+
+
+class TestSubstringIndex:
+    """测试双向子串匹配"""
+
+    def test_matches_linear_scan(self):
+        """测试与 pattern in text or text in pattern 线性扫描一致"""
+        rng = random.Random(11)
+        patterns = [(_random_text(rng, "abc", 6) or "b", i) for i in range(30)]
+        index = SubstringIndex(patterns)
+
+        for _ in range(500):
+            text = _random_text(rng, "abc", 8)
+            expected = next((v for p, v in patterns if p in text or text in p), None)
+            assert index.lookup(text) == expected
+
+
+class TestDomainTrie:
+    """测试反向标签域名树"""
+
+    def test_exact_and_wildcard(self):
+        trie = DomainTrie()
+        trie.add("*.github.io", "pages")
+        trie.add("docs.github.io", "docs")
+        trie.add("*.user.github.io", "user")
+
+        assert trie.lookup("docs.github.io") == "docs"
+        assert trie.lookup("foo.github.io") == "pages"
+        assert trie.lookup("github.io") == "pages"
+        assert trie.lookup("a.user.github.io") == "user"
+        assert trie.lookup("evilgithub.io") is None
+        assert trie.lookup("GitHub.IO") == "pages"
+
+
+class TestClassifiers:
+    """测试分类器编译后行为不变"""
+
+    @pytest.fixture(scope="class")
+    def app_classifier(self):
+        return AppClassifier()
+
+    def test_app_partial_match_matches_linear_scan(self, app_classifier):
+        """测试应用部分匹配与原线性扫描一致"""
+        def linear(app_name):
+            app_lower = app_name.lower()
+            if app_lower in app_classifier.app_to_type_map:
+                return app_classifier.app_to_type_map[app_lower]
+            for known_app, app_type in app_classifier.app_to_type_map.items():
+                known_base = known_app.replace('.exe', '')
+                app_base = app_lower.replace('.exe', '')
+                if known_base in app_base or app_base in known_base:
+                    return app_type
+            return "other"
+
+        names = ["chrome.exe", "Code.exe", "code", "msedge_proxy.exe", "steam",
+                 "unknown_app.exe", "wechat", "pot", "PotPlayerMini64", "x"]
+        for name in names:
+            assert app_classifier.classify(name) == linear(name), name
+
+    def test_add_app_rebuilds_index(self, app_classifier):
+        """测试运行时添加规则后索引失效重建"""
+        version = app_classifier.version
+        app_classifier.add_app("zyxwv.exe", "ide")
+        assert app_classifier.version > version
+        assert app_classifier.classify("zyxwv_pro.exe") == "ide"
+
+    def test_domain_classify(self):
+        classifier = DomainClassifier()
+        assert classifier.classify("https://github.com/user/repo") == ("code", "production")
+        assert classifier.classify("https://someone.github.io/blog")[1] == "production"
+        assert classifier.classify("https://unknown.example") == ("other", "unknown")
+
+    def test_inference_rule_by_app(self):
+        """测试推理规则查找保持规则顺序"""
+        assert get_rule_by_app("pycharm64.exe") is INFERENCE_RULES['coding_python']
+        assert get_rule_by_app("Code") is INFERENCE_RULES['coding_python']
+        assert get_rule_by_app("photoshop.exe") is INFERENCE_RULES['graphic_design']
+        assert get_rule_by_app("qwertyuiop") is None
+
+
+class TestClassificationEngine:
+    """测试分类引擎"""
+
+    @pytest.fixture
+    def engine(self):
+        return ClassificationEngine(cache_size=2)
+
+    def test_mode_priority(self, engine):
+        """测试域名 > 标题关键词 > 应用类型"""
+        assert engine.classify("chrome.exe", "GitHub", "https://github.com/a").source == "domain"
+        verdict = engine.classify("chrome.exe", "B站视频", "https://unknown.example")
+        assert (verdict.mode, verdict.source) == ("consumption", "title")
+        verdict = engine.classify("Code.exe", "main.py", "")
+        assert (verdict.app_type, verdict.mode, verdict.source) == ("ide", "production", "app_type")
+
+    def test_lru_cache(self, engine):
+        """测试LRU缓存命中与淘汰"""
+        engine.classify("a.exe", "t", "")
+        engine.classify("a.exe", "t", "")
+        engine.classify("b.exe", "t", "")
+        engine.classify("c.exe", "t", "")
+        stats = engine.get_stats()
+        assert stats == {'size': 2, 'hits': 1, 'misses': 3}
+
+    def test_rule_change_invalidates_cache(self, engine):
+        assert engine.classify("newtool.exe").app_type == "other"
+        engine.app_classifier.add_app("newtool.exe", "tool")
+        assert engine.classify("newtool.exe").app_type == "tool"
+
+    def test_classify_many(self, engine):
+        rows = [("Code.exe", "main.py", ""), ("chrome.exe", "", "https://github.com/x")] * 3
+        verdicts = engine.classify_many(rows)
+        assert [v.app_type for v in verdicts] == ["ide", "browser"] * 3
+        assert verdicts[0] is verdicts[2]
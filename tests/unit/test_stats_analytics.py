@@ -0,0 +1,199 @@
+"""
+统计分析内核单元测试
+测试 StatsFrame 的列式构建与向量化聚合
+"""
+import pytest
+from datetime import date, timedelta
+from unittest.mock import Mock
+
+import numpy as np
+
+from gaiya.core.insights_generator import InsightsGenerator
+from gaiya.core.stats_analytics import StatsFrame
+
+END = date(2026, 3, 15)
+
+
+def _day(offset: int) -> str:
+    """距END的天数 -> 日期字符串"""
+    return (END - timedelta(days=offset)).isoformat()
+
+
+def _record(tasks: dict, completion_rate: float, planned: int = 0, completed: int = 0) -> dict:
+    done = sum(1 for info in tasks.values() if info.get("status") == "completed")
+    return {
+        "tasks": tasks,
+        "summary": {
+            "total_tasks": len(tasks),
+            "completed_tasks": done,
+            "completion_rate": completion_rate,
+            "total_planned_minutes": planned,
+            "total_completed_minutes": completed,
+        },
+    }
+
+
+def _classify(name: str) -> str:
+    if "会议" in name or "工作" in name:
+        return "工作"
+    if "睡" in name:
+        return "休息"
+    return "其他"
+
+
+@pytest.fixture
+def daily_records():
+    """最近14天中的4天有记录"""
+    return {
+        _day(0): _record({
+            "上午工作": {"start": "09:00", "end": "12:00", "status": "completed", "color": "#4CAF50"},
+            "周会议": {"start": "14:30", "end": "15:30", "status": "completed", "color": "#4CAF50"},
+            "睡眠": {"start": "23:00", "end": "07:00", "status": "pending", "color": "#FFEB3B"},
+        }, completion_rate=80.0, planned=720, completed=240),
+        _day(2): _record({
+            "上午工作": {"start": "09:00", "end": "12:00", "status": "completed"},
+        }, completion_rate=100.0, planned=180, completed=180),
+        _day(8): _record({
+            "夜读": {"start": "22:00", "end": "24:00", "status": "completed", "color": "#2196F3"},
+        }, completion_rate=50.0, planned=120, completed=60),
+        _day(20): _record({
+            "上午工作": {"start": "09:00", "end": "12:00", "status": "completed"},
+        }, completion_rate=100.0),
+    }
+
+
+@pytest.fixture
+def frame(daily_records):
+    return StatsFrame.from_daily_records(daily_records, 14, end=END, classify=_classify)
+
+
+class TestBuild:
+    """测试从 daily_records 构建"""
+
+    def test_contiguous_date_index(self, frame):
+        dates = frame.date_strings()
+
+        assert len(frame) == 14
+        assert dates[0] == _day(13)
+        assert dates[-1] == _day(0)
+
+    def test_missing_days_zero_filled(self, frame):
+        rates = frame.column("completion_rate")
+
+        assert rates[-1] == 80.0
+        assert rates[-3] == 100.0
+        assert rates[-2] == 0.0
+
+    def test_records_outside_window_ignored(self, frame):
+        assert frame.column("total_tasks").sum() == 5
+
+    def test_cross_day_and_midnight_durations(self, frame):
+        totals = frame.category_totals()
+
+        assert totals["休息"]["total_minutes"] == 8 * 60
+        assert totals["其他"]["total_minutes"] == 120
+
+    def test_unparseable_time_counts_without_minutes(self):
+        records = {_day(0): _record({"工作": {"start": "bad", "end": "10:00"}}, 0.0)}
+
+        frame = StatsFrame.from_daily_records(records, 1, end=END, classify=_classify)
+
+        assert frame.category_totals() == {"工作": {"count": 1, "completed": 0, "total_minutes": 0}}
+        assert not frame.hour_histogram().any()
+
+    def test_tail_reindexes_tasks(self, frame):
+        week = frame.tail(7)
+
+        assert len(week) == 7
+        assert week.column("total_tasks").sum() == 4
+        assert week.task_day.max() == 6
+
+
+class TestTimeSeries:
+    """测试时间序列聚合"""
+
+    def test_rolling_mean_partial_then_full_window(self):
+        records = {_day(offset): _record({}, float(rate)) for offset, rate in zip(range(3, -1, -1), (10, 20, 30, 40))}
+        frame = StatsFrame.from_daily_records(records, 4, end=END)
+
+        np.testing.assert_allclose(frame.rolling_mean("completion_rate", window=2), [10, 15, 25, 35])
+
+    def test_week_over_week(self, frame):
+        result = frame.week_over_week("total_tasks")
+
+        assert result["current"] == 4
+        assert result["previous"] == 1
+        assert result["delta"] == 3
+        assert result["pct_change"] == 300.0
+
+    def test_week_over_week_needs_previous_period(self, frame):
+        result = frame.tail(7).week_over_week("completion_rate")
+
+        assert result["current"] == pytest.approx(180 / 7)
+        assert result["previous"] is None
+        assert result["pct_change"] is None
+
+    def test_percentiles_skip_inactive_days(self, frame):
+        result = frame.percentiles("completion_rate", qs=(0, 100))
+
+        assert result == {0: 50.0, 100: 100.0}
+
+    def test_best_days_stable_order(self, frame):
+        dates = frame.date_strings()
+
+        assert [dates[i] for i in frame.best_days(2)] == [_day(2), _day(0)]
+
+
+class TestDistributions:
+    """测试任务分布"""
+
+    def test_hour_histogram_splits_and_wraps(self, frame):
+        histogram = frame.hour_histogram()
+
+        assert histogram.shape == (24,)
+        assert histogram[9] == 120  # 两天的09:00-10:00
+        assert histogram[14] == 30 and histogram[15] == 30
+        assert histogram[23] == 120  # 睡眠23点 + 夜读23点
+        assert histogram[0] == 60  # 跨天任务折回次日凌晨
+        assert histogram.sum() == 3 * 180 + 60 + 8 * 60 + 120 - 180
+
+    def test_peak_hour_completed_only(self, frame):
+        assert frame.tail(7).peak_hour(completed_only=True) == 9
+
+    def test_color_counts_default_color(self, frame):
+        assert frame.color_counts() == {"#4CAF50": 2, "#FFEB3B": 1, "#795548": 1, "#2196F3": 1}
+
+    def test_weekly_report_payload(self, frame):
+        payload = frame.tail(7).weekly_report_payload()
+
+        assert payload["total_tasks"] == 4
+        assert payload["work_hours"] == 7.0
+        assert payload["meeting_hours"] == 1.0
+        assert payload["break_hours"] == 8.0
+        assert payload["completion_rate"] == 46.7
+        assert payload["peak_hour"] == 9
+
+    def test_empty_frame(self):
+        frame = StatsFrame.from_daily_records({}, 0, end=END)
+
+        assert len(frame) == 0
+        assert frame.category_totals() == {}
+        assert frame.color_counts() == {}
+        assert frame.peak_hour() is None
+
+
+class TestInsightsFromFrame:
+    """测试洞察报告读取共享的分析数据"""
+
+    def test_generate_weekly_insights(self, frame):
+        generator = InsightsGenerator(Mock(), Mock())
+
+        insights = generator.generate_weekly_insights(days=7, history=frame)
+
+        assert insights["focus_analysis"]["total_tasks"] == 4
+        assert insights["focus_analysis"]["best_days"][0]["date"] == _day(2)
+        assert insights["focus_analysis"]["peak_hour"] == 9
+        assert insights["top_apps"][0]["category"] == "休息"
+        assert insights["week_over_week"]["previous"] == pytest.approx(50 / 7)
+        assert insights["productivity_trend"]["status"] == "improving"
+        generator.stats_manager.get_analytics.assert_not_called()
@@ -0,0 +1,188 @@
+"""
+style_manager.py 单元测试
+测试样式目录快照、用户数据叠加、批量收藏查询与原子计数
+"""
+from types import SimpleNamespace
+
+import pytest
+
+from api.style_manager import StyleManager, clear_catalog_cache
+
+
+class FakeQuery:
+    """记录查询条件的Supabase查询链"""
+
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.filters = []
+        self.action = "select"
+        self.payload = None
+
+    def select(self, *args):
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def in_(self, column, values):
+        values = set(values)
+        self.filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def order(self, *args, **kwargs):
+        return self
+
+    def update(self, payload):
+        self.action, self.payload = "update", payload
+        return self
+
+    def insert(self, payload):
+        self.action, self.payload = "insert", payload
+        return self
+
+    def delete(self):
+        self.action = "delete"
+        return self
+
+    def execute(self):
+        self.client.queries.append((self.table, self.action))
+        rows = self.client.tables.setdefault(self.table, [])
+        if self.action == "insert":
+            row = dict(self.payload, id=f"fav-{len(rows)}", created_at="2026-10-19")
+            rows.append(row)
+            return SimpleNamespace(data=[row])
+        matched = [row for row in rows if all(f(row) for f in self.filters)]
+        if self.action == "update":
+            for row in matched:
+                row.update(self.payload)
+        elif self.action == "delete":
+            self.client.tables[self.table] = [row for row in rows if row not in matched]
+        return SimpleNamespace(data=[dict(row) for row in matched])
+
+
+class FakeSupabase:
+    def __init__(self, tables):
+        self.tables = tables
+        self.queries = []
+        self.rpc_calls = []
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    def rpc(self, name, params):
+        self.rpc_calls.append((name, params))
+        rows = self.tables[params["p_table"]]
+        for row in rows:
+            if row["id"] == params["p_item_id"]:
+                row[params["p_column"]] = max(0, row.get(params["p_column"], 0) + params["p_delta"])
+        return SimpleNamespace(execute=lambda: SimpleNamespace(data=None))
+
+
+def _style(style_id, tier="free", **extra):
+    return {"id": style_id, "tier": tier, "status": "published", "favorites": 0, **extra}
+
+
+@pytest.fixture
+def client():
+    clear_catalog_cache()
+    styles = [_style(f"s{i}") for i in range(5)] + [_style("p1", tier="pro"), _style("shop1", tier="shop")]
+    yield FakeSupabase({
+        "progress_bar_styles": styles,
+        "time_markers": [{"id": "m1", "status": "published", "favorites": 0}],
+        "user_favorites": [],
+        "user_purchased_styles": [],
+    })
+    clear_catalog_cache()
+
+
+class TestCatalogSnapshot:
+    """测试公共目录快照"""
+
+    def test_snapshot_reused_across_requests(self, client):
+        manager = StyleManager(client=client)
+        first = manager.get_catalog_snapshot("free")
+        second = StyleManager(client=client).get_catalog_snapshot("free")
+
+        assert first is second
+        assert [s["id"] for s in first["styles"]] == ["s0", "s1", "s2", "s3", "s4"]
+        assert client.queries.count(("progress_bar_styles", "select")) == 1
+
+    def test_paid_tiers_share_full_catalog(self, client):
+        manager = StyleManager(client=client)
+        assert manager.get_catalog_snapshot("pro") is manager.get_catalog_snapshot("lifetime")
+        assert len(manager.get_catalog_snapshot("pro")["styles"]) == 7
+
+    def test_version_tracks_content(self, client):
+        manager = StyleManager(client=client)
+        version = manager.get_catalog_snapshot("free")["version"]
+
+        clear_catalog_cache()
+        assert manager.get_catalog_snapshot("free")["version"] == version
+
+        clear_catalog_cache()
+        client.tables["progress_bar_styles"][0]["name"] = "renamed"
+        assert manager.get_catalog_snapshot("free")["version"] != version
+
+
+class TestUserOverlay:
+    """测试用户数据叠加"""
+
+    def test_available_styles_merge_purchases_and_favorites(self, client):
+        client.tables["user_purchased_styles"].append({"user_id": "u1", "item_type": "style", "item_id": "shop1"})
+        client.tables["user_favorites"].append({"id": "f1", "user_id": "u1", "item_type": "style", "item_id": "s2"})
+        manager = StyleManager(client=client)
+
+        styles = manager.get_available_styles("u1", "free")
+
+        assert [s["id"] for s in styles] == ["s0", "s1", "s2", "s3", "s4", "shop1"]
+        assert [s["id"] for s in styles if s["is_favorited"]] == ["s2"]
+        # 共享的目录快照不被修改
+        assert "is_favorited" not in manager.get_catalog_snapshot("free")["styles"][2]
+
+    def test_favorites_query_count_independent_of_size(self, client):
+        manager = StyleManager(client=client)
+        for i in range(5):
+            client.tables["user_favorites"].append(
+                {"id": f"f{i}", "user_id": "u1", "item_type": "style", "item_id": f"s{i}", "created_at": str(i)}
+            )
+        client.queries.clear()
+
+        manager.get_user_favorites("u1")
+
+        # 收藏列表1次 + 样式表1次批量查询
+        assert len(client.queries) == 2
+
+
+class TestFavorites:
+    """测试收藏"""
+
+    def test_get_user_favorites_batched_and_ordered(self, client):
+        client.tables["user_favorites"].extend([
+            {"id": "f1", "user_id": "u1", "item_type": "style", "item_id": "s3", "created_at": "2"},
+            {"id": "f2", "user_id": "u1", "item_type": "marker", "item_id": "m1", "created_at": "1"},
+            {"id": "f3", "user_id": "u1", "item_type": "style", "item_id": "s1", "created_at": "0"},
+        ])
+        favorites = StyleManager(client=client).get_user_favorites("u1")
+
+        assert [f["id"] for f in favorites] == ["s3", "m1", "s1"]
+        assert favorites[0]["favorited_at"] == "2"
+
+    def test_toggle_favorite_uses_atomic_counter(self, client):
+        manager = StyleManager(client=client)
+
+        assert manager.toggle_favorite("u1", "style", "s1") == {"success": True, "favorited": True}
+        assert manager.toggle_favorite("u1", "style", "s1") == {"success": True, "favorited": False}
+
+        assert [call[1]["p_delta"] for call in client.rpc_calls] == [1, -1]
+        assert ("progress_bar_styles", "update") not in client.queries
+
+    def test_counter_falls_back_without_function(self, client):
+        def missing_rpc(name, params):
+            raise Exception("PGRST202: Could not find the function")
+
+        client.rpc = missing_rpc
+        StyleManager(client=client).toggle_favorite("u1", "style", "s1")
+
+        assert client.tables["progress_bar_styles"][1]["favorites"] == 1
@@ -0,0 +1,71 @@
+"""
+task_table_model.py 单元测试
+测试任务表格模型(替代逐行控件的QTableWidget)
+"""
+import pytest
+from PySide6.QtCore import Qt
+
+from gaiya.ui.config_modules.task_table_model import (
+    TaskTableModel, stable_task_id, COL_START, COL_END, COL_NAME, COL_COLOR, COL_ACTIONS,
+)
+
+TASKS = [
+    {"start": "08:00", "end": "12:00", "task": "工作", "color": "#111111"},
+    {"start": "12:00", "end": "24:00", "task": "休息", "color": "#222222", "text_color": "#000000"},
+]
+
+
+@pytest.fixture
+def model():
+    m = TaskTableModel()
+    m.set_tasks(TASKS)
+    return m
+
+
+class TestTaskTableModel:
+    """测试任务模型"""
+
+    def test_rows_and_defaults(self, model):
+        assert model.rowCount() == 2
+        assert model.columnCount() == 6
+        assert model.data(model.index(0, COL_NAME)) == "工作"
+        assert model.task(0)["text_color"] == "#FFFFFF"
+        assert model.data(model.index(0, COL_ACTIONS), Qt.ItemDataRole.EditRole) is None
+
+    def test_only_time_and_name_editable(self, model):
+        editable = [c for c in range(6) if model.flags(model.index(0, c)) & Qt.ItemFlag.ItemIsEditable]
+        assert editable == [COL_START, COL_END, COL_NAME]
+
+    def test_set_data_emits_once(self, model):
+        changed = []
+        model.dataChanged.connect(lambda *args: changed.append(args))
+        assert model.setData(model.index(0, COL_NAME), "写作")
+        assert not model.setData(model.index(0, COL_NAME), "写作")
+        assert len(changed) == 1
+        assert model.tasks()[0]["task"] == "写作"
+
+    def test_midnight_on_last_row(self, model):
+        model.setData(model.index(1, COL_END), "00:00")
+        assert model.tasks()[1]["end"] == "24:00"
+
+    def test_add_task_continues_previous_end(self, model):
+        model.set_tasks(TASKS[:1])
+        row = model.add_task("新任务", "#333333")
+        assert model.task(row) == {
+            "start": "12:00", "end": "13:00", "task": "新任务",
+            "color": "#333333", "text_color": "#FFFFFF",
+        }
+
+    def test_remove_and_times(self, model):
+        model.set_times(1, "13:00", "14:00")
+        assert (model.task(1)["start"], model.task(1)["end"]) == ("13:00", "14:00")
+        model.remove_task(0)
+        assert [t["task"] for t in model.tasks()] == ["休息"]
+
+    def test_apply_colors_cycles_palette(self, model):
+        model.apply_colors(["#AAAAAA"])
+        assert [model.data(model.index(r, COL_COLOR)) for r in range(2)] == ["#AAAAAA", "#AAAAAA"]
+
+    def test_stable_id(self):
+        assert stable_task_id("08:00", "12:00", "工作") == stable_task_id("08:00", "12:00", "工作")
+        assert stable_task_id("08:00", "12:00", "工作") != stable_task_id("08:00", "12:30", "工作")
@@ -0,0 +1,210 @@
+"""
+TemplateCalendar / ScheduleManager 单元测试
+测试时间表规则索引、冲突检测和物化的模板日历
+"""
+import pytest
+import tempfile
+from pathlib import Path
+from datetime import date
+from unittest.mock import Mock
+from gaiya.core.schedule_manager import ScheduleManager
+from gaiya.core.template_calendar import TemplateCalendar, CalendarDay
+from gaiya.utils.data_loader import find_template_for_today
+
+
+@pytest.fixture
+def temp_app_dir():
+    """创建临时应用目录"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        yield Path(tmpdir)
+
+
+@pytest.fixture
+def schedule_manager(temp_app_dir):
+    """创建带规则的ScheduleManager实例"""
+    sm = ScheduleManager(temp_app_dir, Mock())
+    sm.add_schedule('workday', 'weekdays', weekdays=[1, 2, 3, 4, 5])
+    sm.add_schedule('payday', 'monthly', days_of_month=[15])
+    sm.add_schedule('newyear', 'specific_dates', dates=['2025-01-01'])
+    return sm
+
+
+@pytest.fixture
+def template_manager():
+    """创建Mock模板管理器(周末自动应用weekend_relax,节假日为2025-01-01)"""
+    tm = Mock()
+    tm.templates = [{'id': 'weekend_relax', 'auto_apply': {'enabled': True, 'conditions': ['weekend', 'holiday']}}]
+    tm.get_matching_templates_for_type.side_effect = (
+        lambda date_type: tm.templates if date_type in ('weekend', 'holiday') else []
+    )
+    tm.holiday_service.get_holiday_dates.side_effect = lambda year: {'2025-01-01'} if year == 2025 else set()
+    tm.holiday_service.has_year_data.return_value = True
+    return tm
+
+
+@pytest.fixture
+def calendar(temp_app_dir, schedule_manager, template_manager):
+    """创建以2025-01-10为中心的模板日历"""
+    cal = TemplateCalendar(temp_app_dir, schedule_manager, template_manager, Mock(), horizon_days=30)
+    cal.rebuild(date(2025, 1, 10))
+    return cal
+
+
+class TestScheduleManagerIndex:
+    """测试时间表规则索引"""
+
+    def test_priority_specific_over_monthly_over_weekdays(self, schedule_manager):
+        """测试优先级: 具体日期 > 每月 > 星期"""
+        assert schedule_manager.get_template_for_date(date(2025, 1, 1)) == 'newyear'   # 周三
+        assert schedule_manager.get_template_for_date(date(2025, 1, 15)) == 'payday'   # 周三
+        assert schedule_manager.get_template_for_date(date(2025, 1, 14)) == 'workday'
+        assert schedule_manager.get_template_for_date(date(2025, 1, 11)) is None       # 周六
+
+    def test_conflicts_for_date_in_rule_order(self, schedule_manager):
+        """测试某日生效的全部模板按规则顺序返回"""
+        assert schedule_manager.get_conflicts_for_date(date(2025, 1, 15)) == ['workday', 'payday']
+
+    def test_add_conflicting_rule_rejected(self, schedule_manager):
+        """测试与其他模板规则重叠的新规则被拒绝"""
+        assert schedule_manager.add_schedule('other', 'weekdays', weekdays=[3]) is False
+        assert schedule_manager.add_schedule('workday', 'weekdays', weekdays=[3]) is True
+        assert schedule_manager.add_schedule('other', 'weekdays', weekdays=[6]) is True
+
+    def test_index_invalidated_on_change(self, schedule_manager):
+        """测试规则修改后查询结果立即更新"""
+        schedule_manager.toggle_schedule(0)
+        assert schedule_manager.get_template_for_date(date(2025, 1, 14)) is None
+
+        schedule_manager.toggle_schedule(0)
+        assert schedule_manager.get_template_for_date(date(2025, 1, 14)) == 'workday'
+
+
+class TestTemplateCalendar:
+    """测试模板日历索引"""
+
+    def test_horizon_materialized(self, calendar):
+        """测试滚动窗口内每天都有索引项"""
+        assert len(calendar.days) == 61
+        assert calendar.start_date == date(2024, 12, 11)
+        assert calendar.end_date == date(2025, 2, 9)
+
+    def test_day_resolution(self, calendar):
+        """测试日期类型、节假日和最终模板"""
+        newyear = calendar.get_day(date(2025, 1, 1))
+        assert newyear.is_holiday and newyear.date_type == 'holiday'
+        assert newyear.template_id == 'newyear'
+
+        saturday = calendar.get_day(date(2025, 1, 11))
+        assert saturday.date_type == 'weekend'
+        assert saturday.schedule_template_id is None
+        assert saturday.template_id == 'weekend_relax'
+
+        payday = calendar.get_day(date(2025, 1, 15))
+        assert payday.template_id == 'payday'
+        assert payday.has_conflict
+
+    def test_range_query(self, calendar):
+        """测试范围查询"""
+        days = calendar.get_range(date(2025, 1, 13), date(2025, 1, 19))
+        assert [d.template_id for d in days] == [
+            'workday', 'workday', 'payday', 'workday', 'workday', 'weekend_relax', 'weekend_relax'
+        ]
+
+    def test_incremental_update_on_rule_change(self, calendar, schedule_manager):
+        """测试规则变化后只更新受影响的日期"""
+        untouched = calendar.days['2025-01-14']
+        schedule_manager.add_schedule('gym', 'weekdays', weekdays=[6])
+
+        assert calendar.get_day(date(2025, 1, 11)).template_id == 'gym'
+        assert calendar.days['2025-01-14'] is untouched
+
+    def test_persisted_and_reloaded(self, calendar, temp_app_dir, schedule_manager, template_manager):
+        """测试索引持久化后可直接加载,规则变化后缓存失效"""
+        assert calendar.cache_file.exists()
+
+        loaded = TemplateCalendar(temp_app_dir, schedule_manager, template_manager, Mock(), horizon_days=30)
+        assert loaded._load() is True
+
+        schedule_manager.schedules.append({'template_id': 'x', 'schedule_type': 'weekdays', 'weekdays': [7]})
+        assert loaded._load() is False
+
+    def test_built_from_snapshot_then_attached(self, temp_app_dir, schedule_manager, template_manager):
+        """测试用规则副本构建、绑定到原管理器: 构建期间的规则变化被补算,之后的变化照常增量更新"""
+        snapshot = schedule_manager.snapshot()
+        cal = TemplateCalendar(temp_app_dir, snapshot, template_manager, Mock(), horizon_days=30, build=False)
+        schedule_manager.add_schedule('gym', 'weekdays', weekdays=[6])
+        cal.rebuild(date(2025, 1, 10))
+
+        assert snapshot.schedules != schedule_manager.schedules
+        assert cal.get_day(date(2025, 1, 11)).template_id == 'weekend_relax'
+
+        cal.attach(schedule_manager, template_manager)
+        assert cal.get_day(date(2025, 1, 11)).template_id == 'gym'
+
+        schedule_manager.add_schedule('long_run', 'weekdays', weekdays=[7])
+        assert cal.get_day(date(2025, 1, 12)).template_id == 'long_run'
+
+    def test_roll_forward_adds_new_days(self, calendar):
+        """测试窗口滚动只计算新进入窗口的日期"""
+        kept = calendar.days['2025-01-20']
+        calendar.roll_forward(date(2025, 1, 12))
+
+        assert calendar.end_date == date(2025, 2, 11)
+        assert '2024-12-11' not in calendar.days
+        assert calendar.days['2025-01-20'] is kept
+
+    def test_cache_only_load_without_index(self, temp_app_dir, schedule_manager, template_manager):
+        """测试只读缓存模式: 没有索引时不构建、不获取节假日数据"""
+        template_manager.holiday_service.get_holiday_dates.reset_mock()
+        cal = TemplateCalendar(temp_app_dir, schedule_manager, template_manager, Mock(), build=False)
+
+        assert not cal.is_ready
+        assert cal.lookup(date(2025, 1, 15)) is None
+        template_manager.holiday_service.get_holiday_dates.assert_not_called()
+        assert not cal.cache_file.exists()
+
+    def test_cache_only_load_reads_index(self, calendar, temp_app_dir, schedule_manager, template_manager):
+        """测试只读缓存模式直接查表(不滚动窗口)"""
+        cal = TemplateCalendar(temp_app_dir, schedule_manager, template_manager, Mock(), build=False)
+
+        assert cal.start_date == date(2024, 12, 11)
+        assert cal.lookup(date(2025, 1, 15)).template_id == 'payday'
+        assert cal.lookup(date(2026, 1, 15)) is None
+
+    def test_calendar_day_round_trip(self):
+        """测试CalendarDay序列化"""
+        day = CalendarDay(date='2025-01-01', date_type='holiday', is_holiday=True, conflicts=['a'])
+        assert CalendarDay.from_dict(day.to_dict()) == day
+
+
+class TestStartupTemplateLookup:
+    """测试启动时自动应用模板的查询"""
+
+    def test_resolves_today_without_index(self, temp_app_dir, template_manager):
+        """测试没有索引时即时解析今天: 自动应用条件"""
+        template_manager.get_matching_templates_for_type.side_effect = lambda date_type: template_manager.templates
+        template_manager.get_template_by_id.side_effect = lambda template_id: {'id': template_id}
+
+        assert find_template_for_today(temp_app_dir, template_manager, Mock()) == {'id': 'weekend_relax'}
+        template_manager.get_best_match_template.assert_not_called()
+
+    def test_schedule_rule_wins_without_index(self, temp_app_dir, template_manager):
+        """测试没有索引时时间表规则仍优先于自动应用条件"""
+        ScheduleManager(temp_app_dir, Mock()).add_schedule('today_plan', 'specific_dates',
+                                                           dates=[date.today().isoformat()])
+        template_manager.get_matching_templates_for_type.side_effect = lambda date_type: template_manager.templates
+        template_manager.get_template_by_id.side_effect = lambda template_id: {'id': template_id}
+
+        assert find_template_for_today(temp_app_dir, template_manager, Mock()) == {'id': 'today_plan'}
+        assert not TemplateCalendar.cache_path(temp_app_dir).exists()
+
+    def test_reads_today_from_index(self, temp_app_dir, schedule_manager, template_manager):
+        cal = TemplateCalendar(temp_app_dir, schedule_manager, template_manager, Mock(), horizon_days=3)
+        cal.rebuild(date.today())
+        expected = cal.lookup().template_id
+        template_manager.get_template_by_id.side_effect = lambda template_id: {'id': template_id}
+
+        result = find_template_for_today(temp_app_dir, template_manager, Mock())
+
+        assert result == ({'id': expected} if expected else None)
+        template_manager.get_best_match_template.assert_not_called()
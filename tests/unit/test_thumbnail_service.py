@@ -0,0 +1,117 @@
+"""
+ThumbnailService 单元测试
+测试素材缩略图的缩放解码、内容哈希磁盘缓存和后台生成
+"""
+import pytest
+import tempfile
+from pathlib import Path
+from PySide6.QtCore import QCoreApplication, QElapsedTimer
+from PySide6.QtGui import QImage, QColor
+from gaiya.scene.thumbnail_service import ThumbnailCache, ThumbnailService
+
+
+@pytest.fixture
+def temp_dir():
+    """创建临时目录"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        yield Path(tmpdir)
+
+
+@pytest.fixture
+def qt_app():
+    """提供Qt事件循环"""
+    app = QCoreApplication.instance() or QCoreApplication([])
+    yield app
+
+
+def _make_png(path: Path, width: int, height: int, color=QColor(255, 0, 0)) -> str:
+    image = QImage(width, height, QImage.Format_ARGB32)
+    image.fill(color)
+    assert image.save(str(path), "PNG")
+    return str(path)
+
+
+class TestThumbnailCache:
+    """测试缩略图磁盘缓存"""
+
+    def test_downscale_keeps_aspect_ratio(self, temp_dir):
+        """测试缩略图按比例缩放到最大边长"""
+        cache = ThumbnailCache(temp_dir / "cache")
+        src = _make_png(temp_dir / "a.png", 400, 200)
+
+        image = cache.load_or_create(src, 48)
+
+        assert image.width() == 48
+        assert image.height() == 24
+
+    def test_small_image_not_upscaled(self, temp_dir):
+        """测试小图不放大"""
+        cache = ThumbnailCache(temp_dir / "cache")
+        src = _make_png(temp_dir / "small.png", 16, 16)
+
+        image = cache.load_or_create(src, 48)
+
+        assert image.width() == 16
+
+    def test_cache_keyed_by_content(self, temp_dir):
+        """测试相同内容的不同文件命中同一缓存"""
+        cache = ThumbnailCache(temp_dir / "cache")
+        a = _make_png(temp_dir / "a.png", 100, 100)
+        b = _make_png(temp_dir / "b.png", 100, 100)
+
+        cache.load_or_create(a, 48)
+        cache.load_or_create(b, 48)
+
+        assert cache.content_key(a) == cache.content_key(b)
+        assert len(list((temp_dir / "cache").glob("*.png"))) == 1
+
+    def test_content_change_invalidates(self, temp_dir):
+        """测试文件内容变化后生成新缓存"""
+        cache = ThumbnailCache(temp_dir / "cache")
+        src = temp_dir / "a.png"
+        _make_png(src, 100, 100, QColor(255, 0, 0))
+        key_before = cache.content_key(str(src))
+
+        _make_png(src, 120, 100, QColor(0, 255, 0))
+        key_after = cache.content_key(str(src))
+
+        assert key_before != key_after
+
+    def test_invalid_image_returns_null(self, temp_dir):
+        """测试无法解码的文件返回空图片且不写缓存"""
+        cache = ThumbnailCache(temp_dir / "cache")
+        bad = temp_dir / "bad.png"
+        bad.write_bytes(b"not an image")
+
+        assert cache.load_or_create(str(bad), 48).isNull()
+        assert cache.load_or_create(str(temp_dir / "missing.png"), 48).isNull()
+        assert list((temp_dir / "cache").glob("*.png")) == []
+
+
+class TestThumbnailService:
+    """测试后台缩略图服务"""
+
+    def test_request_emits_ready_and_failed(self, temp_dir, qt_app):
+        """测试请求后在事件循环中收到结果信号"""
+        service = ThumbnailService(temp_dir / "cache", size=32, max_threads=2)
+        ready, failed = {}, []
+        service.thumbnail_ready.connect(lambda path, image: ready.__setitem__(path, image))
+        service.thumbnail_failed.connect(failed.append)
+
+        good = _make_png(temp_dir / "good.png", 64, 64)
+        bad = temp_dir / "bad.png"
+        bad.write_bytes(b"broken")
+
+        service.request(good)
+        service.request(good)  # 重复请求只排队一次
+        service.request(str(bad))
+
+        timer = QElapsedTimer()
+        timer.start()
+        while service.pending_count() and timer.elapsed() < 5000:
+            service.wait_for_done(50)
+            qt_app.processEvents()
+
+        assert list(ready) == [good]
+        assert ready[good].width() == 32
+        assert failed == [str(bad)]
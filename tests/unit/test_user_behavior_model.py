@@ -0,0 +1,107 @@
+"""
+user_behavior_model.py 单元测试
+测试快照+变更日志的增量持久化与批量事务
+"""
+import json
+import pytest
+
+from gaiya.services.user_behavior_model import UserBehaviorModel
+
+
+def _apps(*names):
+    return [{'app': name, 'duration': 30} for name in names]
+
+
+@pytest.fixture
+def model_path(tmp_path):
+    return tmp_path / 'user_behavior_model.json'
+
+
+@pytest.fixture
+def model(model_path):
+    return UserBehaviorModel(model_path)
+
+
+def _journal_lines(model):
+    if not model.journal_path.exists():
+        return []
+    return model.journal_path.read_text(encoding='utf-8').splitlines()
+
+
+class TestIncrementalPersistence:
+    """测试增量持久化"""
+
+    def test_learning_appends_only_changed_task(self, model, model_path):
+        """测试学习只追加被修改的任务记录,快照不重写"""
+        for i in range(50):
+            model.initialize_task_pattern(f'任务{i}', 'work', ['Cursor.exe'])
+        model.save_model()
+        snapshot = model_path.read_bytes()
+
+        model.learn_from_correction('任务3', _apps('Cursor.exe'), 'underestimated')
+
+        assert model_path.read_bytes() == snapshot
+        entry = json.loads(_journal_lines(model)[-1])
+        assert [c['path'] for c in entry['changes']] == [['task_patterns', '任务3'], ['learning_quality']]
+
+    def test_reload_replays_journal(self, model, model_path):
+        """测试重新加载时重放日志"""
+        model.initialize_task_pattern('编程开发', 'work', ['Cursor.exe'])
+        model.learn_from_correction('编程开发', _apps('Cursor.exe'), 'underestimated')
+
+        reloaded = UserBehaviorModel(model_path)
+        pattern = reloaded.get_task_pattern('编程开发')
+        assert pattern['typical_apps']['Cursor.exe']['weight'] == 0.80
+        assert reloaded.model['revision'] == model.model['revision'] == 2
+        assert reloaded.model['learning_quality']['total_corrections'] == 1
+
+    def test_torn_journal_line_ignored(self, model, model_path):
+        """测试写入中断留下的半行不会损坏模型"""
+        model.initialize_task_pattern('编程开发', 'work', ['Cursor.exe'])
+        with open(model.journal_path, 'a', encoding='utf-8') as f:
+            f.write('{"rev": 2, "ts": "2025-01-01", "changes": [{"path": ["task_pat')
+
+        reloaded = UserBehaviorModel(model_path)
+        assert '编程开发' in reloaded.model['task_patterns']
+        assert reloaded.model['revision'] == 1
+
+    def test_compaction(self, model, model_path, monkeypatch):
+        """测试日志达到阈值后压缩进快照"""
+        monkeypatch.setattr(UserBehaviorModel, 'COMPACT_THRESHOLD', 5)
+        for i in range(5):
+            model.learn_from_correction('阅读', _apps('Kindle.exe'), 'accurate')
+
+        assert not model.journal_path.exists()
+        with open(model_path, encoding='utf-8') as f:
+            snapshot = json.load(f)
+        assert snapshot['revision'] == 5
+        assert snapshot['task_patterns']['阅读']['learning_samples'] == 5
+
+    def test_direct_edit_then_save_model(self, model, model_path):
+        """测试直接修改model后save_model仍写入完整快照"""
+        model.model['task_patterns']['测试任务'] = {'typical_apps': {}, 'learning_samples': 5}
+        model.save_model()
+
+        assert UserBehaviorModel(model_path).model['task_patterns']['测试任务']['learning_samples'] == 5
+
+
+class TestTransactions:
+    """测试批量事务"""
+
+    def test_batch_is_single_journal_entry(self, model, model_path):
+        """测试批量修正作为一个事务提交"""
+        model.learn_from_corrections([
+            {'task_name': '编程', 'apps_used': _apps('Cursor.exe'), 'correction_type': 'underestimated'},
+            {'task_name': '写作', 'apps_used': _apps('Typora.exe'), 'correction_type': 'overestimated'},
+            {'task_name': '编程', 'apps_used': _apps('chrome.exe'), 'correction_type': 'accurate'},
+        ])
+
+        lines = _journal_lines(model)
+        assert len(lines) == 1
+        paths = [c['path'] for c in json.loads(lines[0])['changes']]
+        assert paths == [['task_patterns', '编程'], ['learning_quality'], ['task_patterns', '写作']]
+
+        reloaded = UserBehaviorModel(model_path)
+        assert reloaded.model['learning_quality']['total_corrections'] == 3
+        assert set(reloaded.get_task_pattern('编程')['typical_apps']) == {'Cursor.exe', 'chrome.exe'}
+
@@ -0,0 +1,146 @@
+"""
+webhook_jobs.py 单元测试
+测试支付回调幂等账本、事务履约与失败重试
+"""
+import pytest
+
+from api.webhook_jobs import (
+    LocalWebhookStore, WebhookJobProcessor, WebhookLedger, accept_webhook_event, build_fulfillment
+)
+
+
+def _zpay_job(order_id="ORDER_001", plan_type="pro_monthly", user_id="user-1"):
+    return {
+        "kind": "subscription_payment",
+        "user_id": user_id,
+        "plan_type": plan_type,
+        "payment": {
+            "order_id": order_id,
+            "trade_no": "ZPAY123",
+            "amount": 29.0,
+            "currency": "CNY",
+            "payment_method": "alipay",
+        },
+        "status_record": {"out_trade_no": order_id, "trade_no": "ZPAY123", "money": "29.00"},
+    }
+
+
+@pytest.fixture
+def store():
+    store = LocalWebhookStore()
+    store.user_quotas["user-1"] = {"user_id": "user-1", "user_tier": "free", "daily_plan_total": 3}
+    return store
+
+
+@pytest.fixture
+def published():
+    return []
+
+
+@pytest.fixture
+def processor(store, published):
+    return WebhookJobProcessor(WebhookLedger(store), publisher=lambda record: published.append(record) or True)
+
+
+class TestLedger:
+    """测试幂等账本"""
+
+    def test_duplicate_event_rejected(self, store):
+        ledger = WebhookLedger(store)
+
+        assert accept_webhook_event("zpay", "ORDER_001", "TRADE_SUCCESS", _zpay_job(), ledger) is not None
+        assert accept_webhook_event("zpay", "ORDER_001", "TRADE_SUCCESS", _zpay_job(), ledger) is None
+        assert len(store.events) == 1
+
+    def test_same_id_from_other_provider_accepted(self, store):
+        ledger = WebhookLedger(store)
+
+        accept_webhook_event("zpay", "evt_1", "TRADE_SUCCESS", _zpay_job(), ledger)
+        assert accept_webhook_event("stripe", "evt_1", "checkout.session.completed", _zpay_job(), ledger)
+
+    def test_claim_leases_events(self, store):
+        ledger = WebhookLedger(store)
+        ledger.record("zpay", "ORDER_001", "TRADE_SUCCESS", _zpay_job())
+
+        assert [e["event_id"] for e in ledger.claim()] == ["ORDER_001"]
+        assert ledger.claim() == []
+
+
+class TestFulfillment:
+    """测试履约"""
+
+    def test_process_activates_subscription(self, store, processor, published):
+        event = accept_webhook_event("zpay", "ORDER_001", "TRADE_SUCCESS", _zpay_job(), processor.ledger)
+
+        result = processor.process(event)
+
+        assert result["success"] is True
+        assert result["status"] == "processed"
+        assert store.payments["ORDER_001"]["status"] == "completed"
+        assert store.subscriptions[0]["plan_type"] == "pro_monthly"
+        assert store.users["user-1"]["user_tier"] == "pro"
+        assert store.user_quotas["user-1"]["daily_plan_total"] == 20
+        assert published == [{"out_trade_no": "ORDER_001", "trade_no": "ZPAY123", "money": "29.00", "status": "paid"}]
+        assert store.events[("zpay", "ORDER_001")]["status"] == "processed"
+
+    def test_reprocessing_is_idempotent(self, store, processor):
+        event = accept_webhook_event("zpay", "ORDER_001", "TRADE_SUCCESS", _zpay_job(), processor.ledger)
+        processor.process(event)
+
+        assert processor.process(event)["status"] == "already_processed"
+        assert len(store.subscriptions) == 1
+
+    def test_same_order_from_two_events_paid_once(self, store, processor):
+        ledger = processor.ledger
+        first = accept_webhook_event("stripe", "evt_1", "checkout.session.completed", _zpay_job("cs_1"), ledger)
+        second = accept_webhook_event("stripe", "evt_2", "checkout.session.completed", _zpay_job("cs_1"), ledger)
+
+        processor.process(first)
+        assert processor.process(second)["status"] == "already_processed"
+        assert len(store.payments) == 1
+        assert len(store.subscriptions) == 1
+
+    def test_lifetime_plan_never_expires(self):
+        fulfillment = build_fulfillment(_zpay_job(plan_type="lifetime"))
+
+        assert fulfillment["user_tier"] == "lifetime"
+        assert fulfillment["subscription"]["expires_at"] is None
+        assert fulfillment["subscription"]["auto_renew"] is False
+
+    def test_cancel_downgrades_user(self, store, processor):
+        store.subscriptions.append({"stripe_subscription_id": "sub_1", "status": "active"})
+        event = accept_webhook_event("stripe", "evt_9", "customer.subscription.deleted", {
+            "kind": "subscription_canceled", "user_id": "user-1", "subscription_id": "sub_1"
+        }, processor.ledger)
+
+        processor.process(event)
+
+        assert store.subscriptions[0]["status"] == "canceled"
+        assert store.users["user-1"]["user_tier"] == "free"
+
+
+class TestRetry:
+    """测试履约失败与重试"""
+
+    def test_failed_event_retried_by_worker(self, store, processor, published):
+        event = accept_webhook_event("zpay", "ORDER_001", "TRADE_SUCCESS", _zpay_job(), processor.ledger)
+        original_fulfill = store.fulfill_webhook_event
+
+        def flaky_fulfill(**params):
+            raise Exception("connection reset")
+
+        store.fulfill_webhook_event = flaky_fulfill
+        assert processor.process(event)["status"] == "failed"
+        assert store.events[("zpay", "ORDER_001")]["attempts"] == 1
+        assert published == []
+
+        store.fulfill_webhook_event = original_fulfill
+        assert processor.run_pending() == {"claimed": 1, "processed": 1, "failed": 0}
+        assert store.users["user-1"]["user_tier"] == "pro"
+
+    def test_invalid_plan_discarded(self, store, processor):
+        event = accept_webhook_event("zpay", "ORDER_002", "TRADE_SUCCESS", _zpay_job(plan_type="bogus"), processor.ledger)
+
+        assert processor.process(event)["status"] == "discarded"
+        assert processor.run_pending()["claimed"] == 0
+        assert store.payments == {}
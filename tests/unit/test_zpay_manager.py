@@ -284,6 +284,21 @@ class TestPaymentNotifyVerification:
         # Assert
         assert is_valid is True
 
+    def test_verify_notify_repeated_callback_still_valid(self, zpay_manager):
+        """测试重复回调仍通过验签（去重由webhook_events账本负责）"""
+        callback_data = {
+            "pid": "test-merchant-123",
+            "out_trade_no": "ORDER_202501170002",
+            "trade_no": "ZPAY987654321",
+            "type": "alipay",
+            "money": "29.00",
+            "trade_status": "TRADE_SUCCESS"
+        }
+        callback_data["sign"] = zpay_manager._generate_sign(callback_data)
+
+        assert zpay_manager.verify_notify(dict(callback_data)) is True
+        assert zpay_manager.verify_notify(dict(callback_data)) is True
+
     def test_verify_notify_signature_fail(self, zpay_manager):
         """测试签名验证失败（篡改金额）"""
         # Arrange: 构造篡改的回调数据